@@ -0,0 +1,1425 @@
+# -*- coding: utf-8 -*-
+"""
+Backends falsos en memoria para benchmarks offline
+--------------------------------------------------
+Sustitutos en proceso de los servicios externos que toca el camino caliente
+de memory_route (Redis, Cosmos DB, Blob Storage, Azure AI Search y Azure
+OpenAI), con latencia configurable por servicio:
+
+- `InMemoryRedis`: subconjunto de comandos de redis-py (strings con TTL,
+  bits, sets, sorted sets, pipelines, SCAN y el script de liberación de
+  SingleFlight). Si `fakeredis` está instalado se usa ese en su lugar.
+- `FakeCosmosContainer`: contenedor particionado por `/session_id` con un
+  intérprete del subconjunto SQL que usan las consultas del repo
+  (TOP, WHERE con AND/OR/NOT, IS_DEFINED, CONTAINS, LOWER, parámetros,
+  ORDER BY, OFFSET/LIMIT). Las proyecciones devuelven el documento completo.
+- `FakeBlobServiceClient`: block/append blobs con ETag, lecturas por rango y
+  condiciones IfMissing/IfNotModified (estilo Azurite).
+- `FakeSearchClient` / `FakeOpenAIClient`: búsqueda vectorial por coseno
+  sobre embeddings deterministas (hash de tokens), chat con respuesta fija.
+
+`install_fakes()` los conecta a `azure_clients`, `redis_buffer` y a los
+clientes globales de function_app; `block_network()` hace fallar cualquier
+conexión saliente para garantizar que el benchmark no toque Azure.
+"""
+import asyncio
+import fnmatch
+import functools
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import socket
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+try:
+    from azure.core import MatchConditions
+    from azure.core.exceptions import (ResourceExistsError, ResourceModifiedError,
+                                       ResourceNotFoundError)
+except ImportError:  # pragma: no cover - SDK ausente en entornos locales
+    MatchConditions = None
+
+    class ResourceNotFoundError(Exception):
+        pass
+
+    class ResourceExistsError(Exception):
+        pass
+
+    class ResourceModifiedError(Exception):
+        pass
+
+try:
+    from azure.cosmos.exceptions import CosmosResourceExistsError, CosmosResourceNotFoundError
+except ImportError:  # pragma: no cover
+    CosmosResourceExistsError = ResourceExistsError
+    CosmosResourceNotFoundError = ResourceNotFoundError
+
+try:
+    import fakeredis
+except ImportError:  # pragma: no cover
+    fakeredis = None
+
+FAKE_COSMOS_ENDPOINT = "https://benchmark-cosmos.invalid:443/"
+FAKE_SEARCH_ENDPOINT = "https://benchmark-search.invalid"
+FAKE_OPENAI_ENDPOINT = "https://benchmark-openai.invalid"
+FAKE_BLOB_URL = "https://benchmark-blob.invalid"
+
+
+# ---------------------------------------------------------------------- #
+# Latencia simulada
+# ---------------------------------------------------------------------- #
+@dataclass
+class LatencyProfile:
+    """Latencia media (ms) por servicio; cada llamada suma ±jitter relativo."""
+
+    redis: float = 0.5
+    cosmos: float = 8.0
+    blob: float = 10.0
+    search: float = 30.0
+    openai: float = 60.0
+    jitter: float = 0.25
+    _rng: random.Random = field(default_factory=lambda: random.Random(7), repr=False)
+
+    @classmethod
+    def parse(cls, spec: Optional[str]) -> "LatencyProfile":
+        """`"redis=0.5,cosmos=8,search=30,openai=60,blob=10,jitter=0.25"`."""
+        profile = cls()
+        for part in filter(None, (spec or "").split(",")):
+            name, _, value = part.partition("=")
+            name = name.strip().lower()
+            if name.startswith("_") or not hasattr(profile, name):
+                raise ValueError(f"Servicio de latencia desconocido: {name}")
+            setattr(profile, name, float(value))
+        return profile
+
+    def as_dict(self) -> Dict[str, float]:
+        return {k: getattr(self, k) for k in ("redis", "cosmos", "blob", "search", "openai", "jitter")}
+
+    def delay_s(self, service: str) -> float:
+        mean = getattr(self, service, 0.0)
+        if mean <= 0:
+            return 0.0
+        spread = mean * self.jitter
+        return max(0.0, mean + self._rng.uniform(-spread, spread)) / 1000
+
+    def sleep(self, service: str) -> None:
+        delay = self.delay_s(service)
+        if delay:
+            time.sleep(delay)
+
+    async def asleep(self, service: str) -> None:
+        delay = self.delay_s(service)
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class CallCounter:
+    """Contador de llamadas por servicio y operación (para el reporte)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+
+    def incr(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(sorted(self._counts.items()))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+
+# ---------------------------------------------------------------------- #
+# Redis
+# ---------------------------------------------------------------------- #
+def _to_bytes(value: Any) -> bytes:
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    return str(value).encode("utf-8")
+
+
+class _FakePipeline:
+    def __init__(self, redis: "InMemoryRedis"):
+        self._redis = redis
+        self._ops: List[Tuple[str, tuple, dict]] = []
+
+    def __getattr__(self, name: str) -> Callable[..., "_FakePipeline"]:
+        if not callable(getattr(self._redis, name, None)) or name.startswith("_"):
+            raise AttributeError(name)
+
+        def queue(*args: Any, **kwargs: Any) -> "_FakePipeline":
+            self._ops.append((name, args, kwargs))
+            return self
+        return queue
+
+    def execute(self, raise_on_error: bool = True) -> List[Any]:
+        ops, self._ops = self._ops, []
+        self._redis._latency.sleep("redis")
+        results: List[Any] = []
+        for name, args, kwargs in ops:
+            try:
+                results.append(getattr(self._redis, name)(*args, _no_delay=True, **kwargs))
+            except Exception as exc:
+                if raise_on_error:
+                    raise
+                results.append(exc)
+        return results
+
+    def reset(self) -> None:
+        self._ops = []
+
+    def __enter__(self) -> "_FakePipeline":
+        return self
+
+    def __exit__(self, *exc: Any) -> bool:
+        self.reset()
+        return False
+
+
+class InMemoryRedis:
+    """
+    Subconjunto de redis-py sobre un dict (valores en bytes, como con
+    `decode_responses=False`). Los pipelines se ejecutan en un solo
+    round-trip simulado.
+    """
+
+    _RELEASE_HINT = "del"
+
+    def __init__(self, latency: LatencyProfile, calls: CallCounter):
+        self._latency = latency
+        self._calls = calls
+        self._lock = threading.RLock()
+        self._data: Dict[str, Any] = {}
+        self._expiry: Dict[str, float] = {}
+
+    # -- internos ------------------------------------------------------- #
+    def _op(self, name: str, no_delay: bool) -> None:
+        self._calls.incr(f"redis.{name}")
+        if not no_delay:
+            self._latency.sleep("redis")
+
+    def _alive(self, key: str) -> bool:
+        deadline = self._expiry.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self._data.pop(key, None)
+            self._expiry.pop(key, None)
+            return False
+        return key in self._data
+
+    def _set_ttl(self, key: str, ex: Optional[float] = None, px: Optional[float] = None) -> None:
+        if ex:
+            self._expiry[key] = time.monotonic() + float(ex)
+        elif px:
+            self._expiry[key] = time.monotonic() + float(px) / 1000
+        else:
+            self._expiry.pop(key, None)
+
+    # -- strings -------------------------------------------------------- #
+    def ping(self, _no_delay: bool = False) -> bool:
+        self._op("ping", _no_delay)
+        return True
+
+    def get(self, key: str, _no_delay: bool = False) -> Optional[bytes]:
+        self._op("get", _no_delay)
+        with self._lock:
+            if not self._alive(key):
+                return None
+            value = self._data[key]
+            return bytes(value) if isinstance(value, (bytes, bytearray)) else None
+
+    def mget(self, keys: Any, *more: str, _no_delay: bool = False) -> List[Optional[bytes]]:
+        self._op("mget", _no_delay)
+        names = list(keys) if isinstance(keys, (list, tuple)) else [keys]
+        names.extend(more)
+        return [self.get(k, _no_delay=True) for k in names]
+
+    def set(self, key: str, value: Any, ex: Optional[float] = None, px: Optional[float] = None,
+            nx: bool = False, xx: bool = False, _no_delay: bool = False, **_: Any) -> Optional[bool]:
+        self._op("set", _no_delay)
+        with self._lock:
+            exists = self._alive(key)
+            if (nx and exists) or (xx and not exists):
+                return None
+            self._data[key] = _to_bytes(value)
+            self._set_ttl(key, ex, px)
+            return True
+
+    def setex(self, key: str, ttl: float, value: Any, _no_delay: bool = False) -> bool:
+        return bool(self.set(key, value, ex=ttl, _no_delay=_no_delay))
+
+    def incr(self, key: str, amount: int = 1, _no_delay: bool = False) -> int:
+        self._op("incr", _no_delay)
+        with self._lock:
+            current = int(self._data[key]) if self._alive(key) else 0
+            current += amount
+            self._data[key] = str(current).encode()
+            return current
+
+    def delete(self, *keys: str, _no_delay: bool = False) -> int:
+        self._op("delete", _no_delay)
+        removed = 0
+        with self._lock:
+            for key in keys:
+                if self._alive(key):
+                    removed += 1
+                self._data.pop(key, None)
+                self._expiry.pop(key, None)
+        return removed
+
+    def exists(self, *keys: str, _no_delay: bool = False) -> int:
+        self._op("exists", _no_delay)
+        with self._lock:
+            return sum(1 for key in keys if self._alive(key))
+
+    def expire(self, key: str, seconds: float, _no_delay: bool = False) -> bool:
+        self._op("expire", _no_delay)
+        with self._lock:
+            if not self._alive(key):
+                return False
+            self._set_ttl(key, ex=seconds)
+            return True
+
+    def ttl(self, key: str, _no_delay: bool = False) -> int:
+        self._op("ttl", _no_delay)
+        with self._lock:
+            if not self._alive(key):
+                return -2
+            deadline = self._expiry.get(key)
+            return -1 if deadline is None else max(0, int(deadline - time.monotonic()))
+
+    # -- bits / sets / sorted sets -------------------------------------- #
+    def setbit(self, key: str, offset: int, value: int, _no_delay: bool = False) -> int:
+        self._op("setbit", _no_delay)
+        with self._lock:
+            buf = self._data.get(key) if self._alive(key) else None
+            buf = bytearray(buf or b"")
+            byte, bit = divmod(int(offset), 8)
+            if len(buf) <= byte:
+                buf.extend(b"\x00" * (byte + 1 - len(buf)))
+            mask = 1 << (7 - bit)
+            previous = 1 if buf[byte] & mask else 0
+            buf[byte] = (buf[byte] | mask) if value else (buf[byte] & ~mask)
+            self._data[key] = buf
+            return previous
+
+    def getbit(self, key: str, offset: int, _no_delay: bool = False) -> int:
+        self._op("getbit", _no_delay)
+        with self._lock:
+            buf = self._data.get(key) if self._alive(key) else None
+            byte, bit = divmod(int(offset), 8)
+            if not buf or len(buf) <= byte:
+                return 0
+            return 1 if buf[byte] & (1 << (7 - bit)) else 0
+
+    def sadd(self, key: str, *members: Any, _no_delay: bool = False) -> int:
+        self._op("sadd", _no_delay)
+        with self._lock:
+            target = self._data.get(key) if self._alive(key) else None
+            if not isinstance(target, set):
+                target = self._data[key] = set()
+            before = len(target)
+            target.update(_to_bytes(m) for m in members)
+            return len(target) - before
+
+    def smembers(self, key: str, _no_delay: bool = False) -> set:
+        self._op("smembers", _no_delay)
+        with self._lock:
+            target = self._data.get(key) if self._alive(key) else None
+            return set(target) if isinstance(target, set) else set()
+
+    def zadd(self, key: str, mapping: Dict[Any, float], _no_delay: bool = False, **_: Any) -> int:
+        self._op("zadd", _no_delay)
+        with self._lock:
+            target = self._data.get(key) if self._alive(key) else None
+            if not isinstance(target, dict):
+                target = self._data[key] = {}
+            added = sum(1 for m in mapping if _to_bytes(m) not in target)
+            for member, score in mapping.items():
+                target[_to_bytes(member)] = float(score)
+            return added
+
+    def _zsorted(self, key: str) -> List[Tuple[bytes, float]]:
+        target = self._data.get(key) if self._alive(key) else None
+        if not isinstance(target, dict):
+            return []
+        return sorted(target.items(), key=lambda kv: (kv[1], kv[0]))
+
+    @staticmethod
+    def _slice(items: List[Any], start: int, end: int) -> List[Any]:
+        size = len(items)
+        start = start + size if start < 0 else start
+        end = end + size if end < 0 else end
+        return items[max(0, start):end + 1]
+
+    def zrevrange(self, key: str, start: int, end: int, withscores: bool = False,
+                  _no_delay: bool = False) -> List[Any]:
+        self._op("zrevrange", _no_delay)
+        with self._lock:
+            items = self._slice(list(reversed(self._zsorted(key))), start, end)
+        return items if withscores else [m for m, _ in items]
+
+    def zremrangebyrank(self, key: str, start: int, end: int, _no_delay: bool = False) -> int:
+        self._op("zremrangebyrank", _no_delay)
+        with self._lock:
+            doomed = self._slice(self._zsorted(key), start, end)
+            target = self._data.get(key)
+            for member, _ in doomed:
+                target.pop(member, None)
+            return len(doomed)
+
+    # -- claves / servidor ---------------------------------------------- #
+    def keys(self, pattern: str = "*", _no_delay: bool = False) -> List[bytes]:
+        self._op("keys", _no_delay)
+        with self._lock:
+            return [k.encode() for k in list(self._data) if self._alive(k) and fnmatch.fnmatchcase(k, pattern)]
+
+    def scan_iter(self, match: str = "*", count: Optional[int] = None, **_: Any) -> Iterator[bytes]:
+        return iter(self.keys(match or "*"))
+
+    def scan(self, cursor: int = 0, match: str = "*", count: Optional[int] = None,
+             _no_delay: bool = False, **_: Any) -> Tuple[int, List[bytes]]:
+        return 0, self.keys(match or "*", _no_delay=_no_delay)
+
+    def dbsize(self, _no_delay: bool = False) -> int:
+        self._op("dbsize", _no_delay)
+        with self._lock:
+            return sum(1 for k in list(self._data) if self._alive(k))
+
+    def info(self, section: Optional[str] = None, _no_delay: bool = False) -> Dict[str, Any]:
+        self._op("info", _no_delay)
+        return {"redis_version": "7.2-benchmark", "used_memory": 0, "connected_clients": 1,
+                "keyspace_hits": 0, "keyspace_misses": 0, "modules": []}
+
+    def config_get(self, pattern: str = "*", _no_delay: bool = False) -> Dict[str, str]:
+        return {}
+
+    def config_set(self, name: str, value: Any, _no_delay: bool = False) -> bool:
+        return True
+
+    def eval(self, script: str, numkeys: int, *keys_and_args: Any, _no_delay: bool = False) -> int:
+        """Solo el compare-and-delete de SingleFlight (GET == token -> DEL)."""
+        self._op("eval", _no_delay)
+        keys, args = keys_and_args[:numkeys], keys_and_args[numkeys:]
+        if self._RELEASE_HINT not in script.lower() or not keys or not args:
+            raise NotImplementedError("InMemoryRedis.eval solo soporta el script de liberación")
+        with self._lock:
+            if self._alive(keys[0]) and self._data[keys[0]] == _to_bytes(args[0]):
+                self._data.pop(keys[0], None)
+                self._expiry.pop(keys[0], None)
+                return 1
+        return 0
+
+    def pipeline(self, transaction: bool = False, **_: Any) -> _FakePipeline:
+        return _FakePipeline(self)
+
+    def close(self) -> None:
+        pass
+
+
+def build_redis(latency: LatencyProfile, calls: CallCounter, prefer_fakeredis: bool = True) -> Any:
+    if prefer_fakeredis and fakeredis is not None:
+        return fakeredis.FakeStrictRedis()
+    return InMemoryRedis(latency, calls)
+
+
+# ---------------------------------------------------------------------- #
+# Cosmos DB: intérprete del subconjunto SQL
+# ---------------------------------------------------------------------- #
+_UNDEFINED = object()
+
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+      (?P<str>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+    | (?P<num>-?\d+(?:\.\d+)?)
+    | (?P<param>@\w+)
+    | (?P<op>!=|<>|>=|<=|=|<|>|\(|\)|,)
+    | (?P<word>[A-Za-z_][\w]*(?:\.[A-Za-z_][\w]*|\[\s*"[^"]*"\s*\])*)
+    )""", re.VERBOSE)
+
+_QUERY_RE = re.compile(
+    r"^\s*SELECT\s+(?:TOP\s+(?P<top>\S+)\s+)?(?P<select>.*?)\s+FROM\s+c\b\s*"
+    r"(?:WHERE\s+(?P<where>.*?))?\s*"
+    r"(?:ORDER\s+BY\s+(?P<order>.*?))?\s*"
+    r"(?:OFFSET\s+(?P<offset>\S+)\s+LIMIT\s+(?P<limit>\S+))?\s*$",
+    re.IGNORECASE | re.DOTALL)
+
+
+def _tokenize(text: str) -> List[Tuple[str, str]]:
+    tokens: List[Tuple[str, str]] = []
+    pos = 0
+    text = text.strip()
+    while pos < len(text):
+        match = _TOKEN_RE.match(text, pos)
+        if not match or match.end() == pos:
+            raise ValueError(f"Token no soportado en consulta: {text[pos:pos + 20]!r}")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        pos = match.end()
+    return tokens
+
+
+def _path_get(doc: Any, path: str) -> Any:
+    segments = [p for p in re.split(r'\.|\[\s*"|"\s*\]', path) if p]
+    if not segments or segments[0] != "c":
+        return _UNDEFINED
+    current = doc
+    for segment in segments[1:]:
+        if isinstance(current, dict) and segment in current:
+            current = current[segment]
+        else:
+            return _UNDEFINED
+    return current
+
+
+class _Expr:
+    """Parser descendente: OR > AND > NOT > comparación > valor."""
+
+    _FUNCTIONS: Dict[str, Callable[..., Any]] = {
+        "IS_DEFINED": lambda v: v is not _UNDEFINED,
+        "IS_NULL": lambda v: v is None,
+        "LOWER": lambda v: v.lower() if isinstance(v, str) else _UNDEFINED,
+        "UPPER": lambda v: v.upper() if isinstance(v, str) else _UNDEFINED,
+        "CONTAINS": lambda v, s, *_: isinstance(v, str) and isinstance(s, str) and s in v,
+        "STARTSWITH": lambda v, s, *_: isinstance(v, str) and isinstance(s, str) and v.startswith(s),
+        "ENDSWITH": lambda v, s, *_: isinstance(v, str) and isinstance(s, str) and v.endswith(s),
+        "ARRAY_CONTAINS": lambda arr, v, *_: isinstance(arr, list) and v in arr,
+        "ARRAY_LENGTH": lambda arr: len(arr) if isinstance(arr, list) else _UNDEFINED,
+        "LENGTH": lambda v: len(v) if isinstance(v, str) else _UNDEFINED,
+    }
+
+    def __init__(self, text: str):
+        self._tokens = _tokenize(text)
+        self._pos = 0
+        self.fn = self._or()
+        if self._pos != len(self._tokens):
+            raise ValueError(f"Expresión no soportada cerca de {self._tokens[self._pos]}")
+
+    def _peek(self) -> Tuple[str, str]:
+        return self._tokens[self._pos] if self._pos < len(self._tokens) else ("eof", "")
+
+    def _keyword(self, word: str) -> bool:
+        kind, value = self._peek()
+        if kind == "word" and value.upper() == word:
+            self._pos += 1
+            return True
+        return False
+
+    def _expect(self, value: str) -> None:
+        if self._peek()[1] != value:
+            raise ValueError(f"Se esperaba {value!r} y llegó {self._peek()[1]!r}")
+        self._pos += 1
+
+    def _or(self) -> Callable:
+        left = self._and()
+        while self._keyword("OR"):
+            right = self._and()
+            left = (lambda a, b: lambda d, p: a(d, p) is True or b(d, p) is True)(left, right)
+        return left
+
+    def _and(self) -> Callable:
+        left = self._not()
+        while self._keyword("AND"):
+            right = self._not()
+            left = (lambda a, b: lambda d, p: a(d, p) is True and b(d, p) is True)(left, right)
+        return left
+
+    def _not(self) -> Callable:
+        if self._keyword("NOT"):
+            inner = self._not()
+            return lambda d, p: inner(d, p) is not True
+        return self._comparison()
+
+    def _comparison(self) -> Callable:
+        left = self._value()
+        kind, op = self._peek()
+        if kind == "op" and op in ("=", "!=", "<>", ">=", "<=", "<", ">"):
+            self._pos += 1
+            right = self._value()
+            return (lambda a, b, o: lambda d, p: _compare(a(d, p), b(d, p), o))(left, right, op)
+        if self._keyword("IN"):
+            self._expect("(")
+            options = [self._value()]
+            while self._peek()[1] == ",":
+                self._pos += 1
+                options.append(self._value())
+            self._expect(")")
+            return lambda d, p: left(d, p) in [o(d, p) for o in options]
+        return left
+
+    def _value(self) -> Callable:
+        kind, value = self._peek()
+        self._pos += 1
+        if kind == "str":
+            literal = value[1:-1].replace("\\'", "'").replace('\\"', '"')
+            return lambda d, p: literal
+        if kind == "num":
+            number = float(value) if "." in value else int(value)
+            return lambda d, p: number
+        if kind == "param":
+            return lambda d, p: p.get(value, _UNDEFINED)
+        if kind == "op" and value == "(":
+            inner = self._or()
+            self._expect(")")
+            return inner
+        if kind == "word":
+            upper = value.upper()
+            if upper in ("TRUE", "FALSE"):
+                return (lambda v: lambda d, p: v)(upper == "TRUE")
+            if upper == "NULL":
+                return lambda d, p: None
+            if self._peek()[1] == "(":
+                fn = self._FUNCTIONS.get(upper)
+                if fn is None:
+                    raise ValueError(f"Función SQL no soportada: {value}")
+                self._pos += 1
+                args: List[Callable] = []
+                if self._peek()[1] != ")":
+                    args.append(self._or())
+                    while self._peek()[1] == ",":
+                        self._pos += 1
+                        args.append(self._or())
+                self._expect(")")
+                return lambda d, p: fn(*[a(d, p) for a in args])
+            return lambda d, p: _path_get(d, value)
+        raise ValueError(f"Valor no soportado: {value!r}")
+
+
+def _compare(left: Any, right: Any, op: str) -> bool:
+    if left is _UNDEFINED or right is _UNDEFINED:
+        return False
+    if op == "=":
+        return left == right
+    if op in ("!=", "<>"):
+        return left != right
+    try:
+        if op == ">=":
+            return left >= right
+        if op == "<=":
+            return left <= right
+        if op == ">":
+            return left > right
+        return left < right
+    except TypeError:
+        return False
+
+
+@dataclass
+class _ParsedQuery:
+    top: Optional[str]
+    count: bool
+    where: Optional[Callable]
+    order: List[Tuple[str, bool]]
+    offset: Optional[str]
+    limit: Optional[str]
+
+
+@functools.lru_cache(maxsize=512)
+def _parse_query(query: str) -> _ParsedQuery:
+    match = _QUERY_RE.match(query)
+    if not match:
+        raise ValueError(f"Consulta no soportada por el Cosmos falso: {query[:120]}")
+    select = match.group("select").strip()
+    order: List[Tuple[str, bool]] = []
+    for part in filter(None, (match.group("order") or "").split(",")):
+        words = part.split()
+        order.append((words[0], len(words) > 1 and words[1].upper() == "DESC"))
+    where = match.group("where")
+    return _ParsedQuery(
+        top=match.group("top"),
+        count=bool(re.match(r"VALUE\s+COUNT\s*\(", select, re.IGNORECASE)),
+        where=_Expr(where).fn if where else None,
+        order=order,
+        offset=match.group("offset"),
+        limit=match.group("limit"),
+    )
+
+
+def _resolve_int(token: Optional[str], params: Dict[str, Any]) -> Optional[int]:
+    if token is None:
+        return None
+    return int(params[token]) if token.startswith("@") else int(token)
+
+
+class _ItemPaged:
+    """Iterable estilo `ItemPaged` con `by_page()`."""
+
+    def __init__(self, items: List[Dict[str, Any]], page_size: int):
+        self._items = items
+        self._page_size = max(1, page_size)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self._items)
+
+    def by_page(self, continuation_token: Optional[str] = None) -> Iterator[List[Dict[str, Any]]]:
+        start = int(continuation_token or 0)
+        for offset in range(start, len(self._items), self._page_size):
+            yield self._items[offset:offset + self._page_size]
+
+
+class FakeCosmosContainer:
+    """Contenedor en memoria particionado por `partition_key_path`."""
+
+    def __init__(self, name: str, latency: LatencyProfile, calls: CallCounter,
+                 partition_key_path: str = "/session_id"):
+        self.id = name
+        self._latency = latency
+        self._calls = calls
+        self._pk_field = partition_key_path.strip("/")
+        self._lock = threading.Lock()
+        self._partitions: Dict[Any, Dict[str, Dict[str, Any]]] = {}
+        self.client_connection = SimpleNamespace(last_response_headers={})
+
+    def _charge(self, ru: float) -> None:
+        self.client_connection.last_response_headers = {"x-ms-request-charge": f"{ru:.2f}"}
+
+    def _stamp(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        doc = json.loads(json.dumps(body, default=str))
+        doc.setdefault("id", str(uuid.uuid4()))
+        doc["_ts"] = int(time.time())
+        doc["_etag"] = f'"{uuid.uuid4().hex}"'
+        return doc
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(p) for p in self._partitions.values())
+
+    # -- escrituras ----------------------------------------------------- #
+    def upsert_item(self, body: Dict[str, Any], **_: Any) -> Dict[str, Any]:
+        self._calls.incr("cosmos.upsert_item")
+        self._latency.sleep("cosmos")
+        doc = self._stamp(body)
+        with self._lock:
+            self._partitions.setdefault(doc.get(self._pk_field), {})[doc["id"]] = doc
+        self._charge(10.0)
+        return dict(doc)
+
+    def create_item(self, body: Dict[str, Any], **_: Any) -> Dict[str, Any]:
+        self._calls.incr("cosmos.create_item")
+        self._latency.sleep("cosmos")
+        doc = self._stamp(body)
+        with self._lock:
+            partition = self._partitions.setdefault(doc.get(self._pk_field), {})
+            if doc["id"] in partition:
+                raise CosmosResourceExistsError(f"Documento {doc['id']} ya existe")
+            partition[doc["id"]] = doc
+        self._charge(10.0)
+        return dict(doc)
+
+    def replace_item(self, item: Any, body: Dict[str, Any], **kwargs: Any) -> Dict[str, Any]:
+        return self.upsert_item(body, **kwargs)
+
+    def read_item(self, item: Any, partition_key: Any, **_: Any) -> Dict[str, Any]:
+        self._calls.incr("cosmos.read_item")
+        self._latency.sleep("cosmos")
+        item_id = item.get("id") if isinstance(item, dict) else item
+        with self._lock:
+            doc = self._partitions.get(partition_key, {}).get(item_id)
+        if doc is None:
+            raise CosmosResourceNotFoundError(f"Documento {item_id} no encontrado")
+        self._charge(1.0)
+        return dict(doc)
+
+    def delete_item(self, item: Any, partition_key: Any, **_: Any) -> None:
+        self._calls.incr("cosmos.delete_item")
+        self._latency.sleep("cosmos")
+        item_id = item.get("id") if isinstance(item, dict) else item
+        with self._lock:
+            if self._partitions.get(partition_key, {}).pop(item_id, None) is None:
+                raise CosmosResourceNotFoundError(f"Documento {item_id} no encontrado")
+        self._charge(10.0)
+
+    # -- consultas ------------------------------------------------------ #
+    def _run_query(self, query: str, parameters: Optional[List[Dict[str, Any]]],
+                   partition_key: Any) -> List[Any]:
+        parsed = _parse_query(query)
+        params = {p["name"]: p["value"] for p in parameters or []}
+        with self._lock:
+            if partition_key is not None:
+                source = list(self._partitions.get(partition_key, {}).values())
+            else:
+                source = [doc for part in self._partitions.values() for doc in part.values()]
+        if parsed.where is not None:
+            source = [doc for doc in source if parsed.where(doc, params) is True]
+        if parsed.count:
+            return [len(source)]
+        for path, desc in reversed(parsed.order):
+            present = [d for d in source if _path_get(d, path) not in (_UNDEFINED, None)]
+            missing = [d for d in source if _path_get(d, path) in (_UNDEFINED, None)]
+            present.sort(key=lambda d: _path_get(d, path), reverse=desc)
+            source = present + missing if desc else missing + present
+        offset = _resolve_int(parsed.offset, params) or 0
+        limit = _resolve_int(parsed.limit, params)
+        if offset or limit is not None:
+            source = source[offset:offset + limit if limit is not None else None]
+        top = _resolve_int(parsed.top, params)
+        if top is not None:
+            source = source[:top]
+        return [dict(doc) for doc in source]
+
+    def query_items(self, query: str, parameters: Optional[List[Dict[str, Any]]] = None,
+                    partition_key: Any = None, enable_cross_partition_query: Optional[bool] = None,
+                    max_item_count: Optional[int] = None, **_: Any) -> _ItemPaged:
+        self._calls.incr("cosmos.query_items" if partition_key is not None else "cosmos.query_items_cross")
+        self._latency.sleep("cosmos")
+        items = self._run_query(query, parameters, partition_key)
+        # RU aproximadas: fan-out cross-partition cuesta más que una partición
+        self._charge((2.5 if partition_key is not None else 2.5 * max(1, len(self._partitions)))
+                     + 0.05 * len(items))
+        return _ItemPaged(items, max_item_count or 100)
+
+    def read_all_items(self, max_item_count: Optional[int] = None, **_: Any) -> _ItemPaged:
+        self._calls.incr("cosmos.read_all_items")
+        self._latency.sleep("cosmos")
+        with self._lock:
+            items = [dict(doc) for part in self._partitions.values() for doc in part.values()]
+        return _ItemPaged(items, max_item_count or 100)
+
+
+class FakeCosmosDatabase:
+    def __init__(self, name: str, latency: LatencyProfile, calls: CallCounter):
+        self.id = name
+        self._latency = latency
+        self._calls = calls
+        self._containers: Dict[str, FakeCosmosContainer] = {}
+        self._lock = threading.Lock()
+
+    def get_container_client(self, container: str) -> FakeCosmosContainer:
+        with self._lock:
+            if container not in self._containers:
+                self._containers[container] = FakeCosmosContainer(container, self._latency, self._calls)
+            return self._containers[container]
+
+    def create_container_if_not_exists(self, id: str, partition_key: Any = None, **_: Any) -> FakeCosmosContainer:
+        path = getattr(partition_key, "path", None) or (
+            partition_key.get("paths", ["/session_id"])[0] if isinstance(partition_key, dict) else "/session_id")
+        with self._lock:
+            if id not in self._containers:
+                self._containers[id] = FakeCosmosContainer(id, self._latency, self._calls, path)
+            return self._containers[id]
+
+
+class FakeCosmosClient:
+    def __init__(self, latency: LatencyProfile, calls: CallCounter):
+        self._latency = latency
+        self._calls = calls
+        self._databases: Dict[str, FakeCosmosDatabase] = {}
+        self._lock = threading.Lock()
+
+    def get_database_client(self, database: str) -> FakeCosmosDatabase:
+        with self._lock:
+            if database not in self._databases:
+                self._databases[database] = FakeCosmosDatabase(database, self._latency, self._calls)
+            return self._databases[database]
+
+    def create_database_if_not_exists(self, id: str, **_: Any) -> FakeCosmosDatabase:
+        return self.get_database_client(id)
+
+
+# ---------------------------------------------------------------------- #
+# Blob Storage
+# ---------------------------------------------------------------------- #
+@dataclass
+class _BlobRecord:
+    data: bytearray
+    blob_type: str
+    etag: str
+    last_modified: datetime
+    blocks: int = 0
+
+
+class _Downloader:
+    def __init__(self, data: bytes):
+        self._data = data
+
+    def readall(self) -> bytes:
+        return self._data
+
+    def content_as_text(self, encoding: str = "utf-8") -> str:
+        return self._data.decode(encoding)
+
+    def content_as_bytes(self) -> bytes:
+        return self._data
+
+
+def _new_etag() -> str:
+    return f'"0x{uuid.uuid4().hex[:16].upper()}"'
+
+
+class FakeBlobClient:
+    def __init__(self, container: "FakeBlobContainerClient", name: str):
+        self._container = container
+        self.blob_name = name
+        self.container_name = container.container_name
+        self.url = f"{FAKE_BLOB_URL}/{container.container_name}/{name}"
+
+    def _check(self, record: Optional[_BlobRecord], etag: Optional[str], match_condition: Any) -> None:
+        if etag is None or match_condition is None or MatchConditions is None:
+            return
+        if match_condition == MatchConditions.IfMissing and record is not None:
+            raise ResourceExistsError(f"Blob {self.blob_name} ya existe")
+        if match_condition == MatchConditions.IfNotModified and (record is None or record.etag != etag):
+            raise ResourceModifiedError(f"Blob {self.blob_name} modificado")
+
+    def _record(self) -> Optional[_BlobRecord]:
+        return self._container._blobs.get(self.blob_name)
+
+    def exists(self, **_: Any) -> bool:
+        self._container._op("exists")
+        with self._container._lock:
+            return self._record() is not None
+
+    def get_blob_properties(self, **_: Any) -> SimpleNamespace:
+        self._container._op("get_blob_properties")
+        with self._container._lock:
+            record = self._record()
+            if record is None:
+                raise ResourceNotFoundError(f"Blob {self.blob_name} no encontrado")
+            return SimpleNamespace(name=self.blob_name, size=len(record.data), etag=record.etag,
+                                   last_modified=record.last_modified, blob_type=record.blob_type,
+                                   metadata={})
+
+    def download_blob(self, offset: Optional[int] = None, length: Optional[int] = None,
+                      etag: Optional[str] = None, match_condition: Any = None, **_: Any) -> _Downloader:
+        self._container._op("download_blob")
+        with self._container._lock:
+            record = self._record()
+            if record is None:
+                raise ResourceNotFoundError(f"Blob {self.blob_name} no encontrado")
+            self._check(record, etag, match_condition)
+            start = offset or 0
+            end = start + length if length is not None else None
+            return _Downloader(bytes(record.data[start:end]))
+
+    def upload_blob(self, data: Any, overwrite: bool = False, blob_type: Any = None,
+                    etag: Optional[str] = None, match_condition: Any = None, **_: Any) -> Dict[str, Any]:
+        self._container._op("upload_blob")
+        payload = data.encode("utf-8") if isinstance(data, str) else bytes(
+            data.read() if hasattr(data, "read") else data)
+        with self._container._lock:
+            record = self._record()
+            self._check(record, etag, match_condition)
+            if record is not None and not overwrite:
+                raise ResourceExistsError(f"Blob {self.blob_name} ya existe")
+            kind = str(getattr(blob_type, "value", blob_type) or "BlockBlob")
+            new = _BlobRecord(bytearray(payload), kind, _new_etag(), datetime.now(timezone.utc), 1)
+            self._container._blobs[self.blob_name] = new
+            return {"etag": new.etag, "last_modified": new.last_modified}
+
+    def create_append_blob(self, etag: Optional[str] = None, match_condition: Any = None,
+                           **_: Any) -> Dict[str, Any]:
+        self._container._op("create_append_blob")
+        with self._container._lock:
+            record = self._record()
+            self._check(record, etag, match_condition)
+            new = _BlobRecord(bytearray(), "AppendBlob", _new_etag(), datetime.now(timezone.utc))
+            self._container._blobs[self.blob_name] = new
+            return {"etag": new.etag}
+
+    def append_block(self, data: Any, **_: Any) -> Dict[str, Any]:
+        self._container._op("append_block")
+        payload = data.encode("utf-8") if isinstance(data, str) else bytes(data)
+        with self._container._lock:
+            record = self._record()
+            if record is None:
+                raise ResourceNotFoundError(f"Blob {self.blob_name} no encontrado")
+            offset = len(record.data)
+            record.data.extend(payload)
+            record.blocks += 1
+            record.etag = _new_etag()
+            record.last_modified = datetime.now(timezone.utc)
+            return {"etag": record.etag, "blob_append_offset": str(offset),
+                    "blob_committed_block_count": record.blocks}
+
+    def delete_blob(self, **_: Any) -> None:
+        self._container._op("delete_blob")
+        with self._container._lock:
+            if self._container._blobs.pop(self.blob_name, None) is None:
+                raise ResourceNotFoundError(f"Blob {self.blob_name} no encontrado")
+
+
+class FakeBlobContainerClient:
+    def __init__(self, name: str, latency: LatencyProfile, calls: CallCounter):
+        self.container_name = name
+        self._latency = latency
+        self._calls = calls
+        self._lock = threading.RLock()
+        self._blobs: Dict[str, _BlobRecord] = {}
+
+    def _op(self, name: str) -> None:
+        self._calls.incr(f"blob.{name}")
+        self._latency.sleep("blob")
+
+    def exists(self, **_: Any) -> bool:
+        return True
+
+    def create_container(self, **_: Any) -> "FakeBlobContainerClient":
+        return self
+
+    def get_blob_client(self, blob: str) -> FakeBlobClient:
+        return FakeBlobClient(self, getattr(blob, "name", blob))
+
+    def upload_blob(self, name: str, data: Any, overwrite: bool = False, **kwargs: Any) -> FakeBlobClient:
+        client = self.get_blob_client(name)
+        client.upload_blob(data, overwrite=overwrite, **kwargs)
+        return client
+
+    def download_blob(self, blob: str, **kwargs: Any) -> _Downloader:
+        return self.get_blob_client(blob).download_blob(**kwargs)
+
+    def list_blobs(self, name_starts_with: Optional[str] = None, **_: Any) -> Iterator[SimpleNamespace]:
+        self._op("list_blobs")
+        with self._lock:
+            items = [(n, r) for n, r in sorted(self._blobs.items())
+                     if not name_starts_with or n.startswith(name_starts_with)]
+        for name, record in items:
+            yield SimpleNamespace(name=name, size=len(record.data), etag=record.etag,
+                                  last_modified=record.last_modified, blob_type=record.blob_type)
+
+    def walk_blobs(self, name_starts_with: Optional[str] = None, **kwargs: Any) -> Iterator[SimpleNamespace]:
+        return self.list_blobs(name_starts_with=name_starts_with, **kwargs)
+
+
+class FakeBlobServiceClient:
+    def __init__(self, latency: LatencyProfile, calls: CallCounter):
+        self._latency = latency
+        self._calls = calls
+        self._containers: Dict[str, FakeBlobContainerClient] = {}
+        self._lock = threading.Lock()
+        self.account_name = "benchmark"
+        self.url = FAKE_BLOB_URL
+
+    def get_container_client(self, container: str) -> FakeBlobContainerClient:
+        with self._lock:
+            if container not in self._containers:
+                self._containers[container] = FakeBlobContainerClient(container, self._latency, self._calls)
+            return self._containers[container]
+
+    def create_container(self, name: str, **_: Any) -> FakeBlobContainerClient:
+        return self.get_container_client(name)
+
+    def get_blob_client(self, container: str, blob: str) -> FakeBlobClient:
+        return self.get_container_client(container).get_blob_client(blob)
+
+    def list_containers(self, **_: Any) -> Iterator[SimpleNamespace]:
+        return iter([SimpleNamespace(name=n) for n in sorted(self._containers)])
+
+
+# ---------------------------------------------------------------------- #
+# Azure OpenAI y AI Search
+# ---------------------------------------------------------------------- #
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+@functools.lru_cache(maxsize=4096)
+def _token_vector(token: str, dims: int) -> Any:
+    seed = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+    return np.random.default_rng(seed).standard_normal(dims).astype(np.float32)
+
+
+def fake_embedding(text: str, dims: int) -> List[float]:
+    """Embedding determinista: suma de vectores por token, normalizada (textos afines -> coseno alto)."""
+    tokens = _WORD_RE.findall((text or "").lower()) or ["<vacio>"]
+    vector = np.zeros(dims, dtype=np.float32)
+    for token in tokens[:256]:
+        vector += _token_vector(token, dims)
+    norm = float(np.linalg.norm(vector)) or 1.0
+    return (vector / norm).tolist()
+
+
+class _FakeEmbeddings:
+    def __init__(self, owner: "FakeOpenAIClient"):
+        self._owner = owner
+
+    def create(self, model: str = "", input: Any = None, dimensions: Optional[int] = None,
+               **_: Any) -> SimpleNamespace:
+        self._owner._calls.incr("openai.embeddings")
+        self._owner._latency.sleep("openai")
+        texts = [input] if isinstance(input, str) else list(input or [])
+        dims = int(dimensions or self._owner.dims)
+        data = [SimpleNamespace(index=i, embedding=fake_embedding(t, dims), object="embedding")
+                for i, t in enumerate(texts)]
+        tokens = sum(len(_WORD_RE.findall(t or "")) for t in texts)
+        return SimpleNamespace(data=data, model=model,
+                               usage=SimpleNamespace(prompt_tokens=tokens, total_tokens=tokens))
+
+
+class _FakeChatCompletions:
+    def __init__(self, owner: "FakeOpenAIClient"):
+        self._owner = owner
+
+    def create(self, model: str = "", messages: Optional[List[Dict[str, Any]]] = None,
+               **_: Any) -> SimpleNamespace:
+        self._owner._calls.incr("openai.chat")
+        self._owner._latency.sleep("openai")
+        last = next((m.get("content") for m in reversed(messages or [])
+                     if isinstance(m, dict) and m.get("role") == "user"), "") or ""
+        content = f"Respuesta simulada para: {str(last)[:120]}"
+        message = SimpleNamespace(role="assistant", content=content, tool_calls=None)
+        return SimpleNamespace(
+            id=f"chatcmpl-{uuid.uuid4().hex[:12]}", model=model,
+            choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")],
+            usage=SimpleNamespace(prompt_tokens=len(str(last)) // 4, completion_tokens=len(content) // 4,
+                                  total_tokens=(len(str(last)) + len(content)) // 4))
+
+
+class FakeOpenAIClient:
+    def __init__(self, latency: LatencyProfile, calls: CallCounter, dims: int = 3072):
+        self._latency = latency
+        self._calls = calls
+        self.dims = dims
+        self.embeddings = _FakeEmbeddings(self)
+        self.chat = SimpleNamespace(completions=_FakeChatCompletions(self))
+
+
+_FILTER_EQ_RE = re.compile(r"(\w+)\s+eq\s+('(?:[^']|'')*'|true|false|-?\d+(?:\.\d+)?)", re.IGNORECASE)
+
+
+def _odata_filter(expr: Optional[str]) -> Callable[[Dict[str, Any]], bool]:
+    """Solo conjunciones de `campo eq valor`; el resto del filtro se ignora."""
+    if not expr:
+        return lambda doc: True
+    conditions = []
+    for name, raw in _FILTER_EQ_RE.findall(expr):
+        if raw.startswith("'"):
+            value: Any = raw[1:-1].replace("''", "'")
+        elif raw.lower() in ("true", "false"):
+            value = raw.lower() == "true"
+        else:
+            value = float(raw) if "." in raw else int(raw)
+        conditions.append((name, value))
+    return lambda doc: all(doc.get(name) == value for name, value in conditions)
+
+
+class FakeSearchIndex:
+    """Documentos de un índice; compartido por los clientes sync del mismo nombre."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.lock = threading.Lock()
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.vectors: Dict[str, Any] = {}
+
+
+class FakeSearchClient:
+    def __init__(self, index: FakeSearchIndex, latency: LatencyProfile, calls: CallCounter,
+                 vector_field: str = "vector_semantico"):
+        self._index = index
+        self._latency = latency
+        self._calls = calls
+        self._vector_field = vector_field
+        self.index_name = index.name
+
+    def search(self, search_text: Optional[str] = None, vector_queries: Optional[List[Any]] = None,
+               filter: Optional[str] = None, top: Optional[int] = None,
+               select: Optional[Any] = None, **_: Any) -> List[Dict[str, Any]]:
+        self._calls.incr("search.query")
+        self._latency.sleep("search")
+        matches = _odata_filter(filter)
+        top = int(top or 50)
+        with self._index.lock:
+            docs = [(doc_id, doc) for doc_id, doc in self._index.docs.items() if matches(doc)]
+            vectors = dict(self._index.vectors)
+        scored: List[Tuple[float, Dict[str, Any]]] = []
+        query = next((getattr(q, "vector", None) for q in vector_queries or []), None)
+        if query is not None and docs:
+            qv = np.asarray(query, dtype=np.float32)
+            qv /= float(np.linalg.norm(qv)) or 1.0
+            for doc_id, doc in docs:
+                vector = vectors.get(doc_id)
+                if vector is not None:
+                    scored.append((float(np.dot(vector, qv)), doc))
+        else:
+            terms = set(_WORD_RE.findall((search_text or "").lower()))
+            for _, doc in docs:
+                text = str(doc.get("texto_semantico") or doc.get("contenido") or "").lower()
+                hits = sum(1 for t in terms if t in text) if terms and search_text != "*" else 1
+                if hits:
+                    scored.append((float(hits), doc))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        fields = None if select in (None, "*") else (
+            [s.strip() for s in select.split(",")] if isinstance(select, str) else list(select))
+        results = []
+        for score, doc in scored[:top]:
+            hit = {k: v for k, v in doc.items() if k != self._vector_field and (fields is None or k in fields)}
+            hit["@search.score"] = score
+            results.append(hit)
+        return results
+
+    def _write(self, documents: Iterable[Dict[str, Any]], op: str) -> List[SimpleNamespace]:
+        self._calls.incr(f"search.{op}")
+        self._latency.sleep("search")
+        results = []
+        with self._index.lock:
+            for doc in documents:
+                doc_id = str(doc.get("id"))
+                if op == "delete":
+                    self._index.docs.pop(doc_id, None)
+                    self._index.vectors.pop(doc_id, None)
+                else:
+                    merged = dict(self._index.docs.get(doc_id, {})) if op == "merge" else {}
+                    merged.update(doc)
+                    vector = merged.get(self._vector_field)
+                    if vector is not None:
+                        arr = np.asarray(vector, dtype=np.float32)
+                        self._index.vectors[doc_id] = arr / (float(np.linalg.norm(arr)) or 1.0)
+                    self._index.docs[doc_id] = merged
+                results.append(SimpleNamespace(key=doc_id, succeeded=True, status_code=200))
+        return results
+
+    def upload_documents(self, documents: Iterable[Dict[str, Any]], **_: Any) -> List[SimpleNamespace]:
+        return self._write(documents, "upload")
+
+    def merge_or_upload_documents(self, documents: Iterable[Dict[str, Any]], **_: Any) -> List[SimpleNamespace]:
+        return self._write(documents, "merge")
+
+    def delete_documents(self, documents: Iterable[Dict[str, Any]], **_: Any) -> List[SimpleNamespace]:
+        return self._write(documents, "delete")
+
+    def get_document(self, key: str, **_: Any) -> Dict[str, Any]:
+        self._calls.incr("search.get_document")
+        self._latency.sleep("search")
+        with self._index.lock:
+            doc = self._index.docs.get(str(key))
+        if doc is None:
+            raise ResourceNotFoundError(f"Documento {key} no encontrado")
+        return {k: v for k, v in doc.items() if k != self._vector_field}
+
+    def get_document_count(self, **_: Any) -> int:
+        with self._index.lock:
+            return len(self._index.docs)
+
+    def close(self) -> None:
+        pass
+
+
+# ---------------------------------------------------------------------- #
+# Instalación
+# ---------------------------------------------------------------------- #
+def configure_env(cache_dir: Optional[str] = None) -> None:
+    """Variables de entorno que deben existir ANTES de importar function_app."""
+    os.environ.setdefault("COSMOSDB_ENDPOINT", FAKE_COSMOS_ENDPOINT)
+    os.environ.setdefault("COSMOSDB_KEY", "benchmark-key")
+    os.environ.setdefault("COSMOSDB_DATABASE", "agentMemory")
+    os.environ.setdefault("COSMOSDB_CONTAINER", "memory")
+    os.environ.setdefault("AZURE_SEARCH_ENDPOINT", FAKE_SEARCH_ENDPOINT)
+    os.environ.setdefault("AZURE_SEARCH_KEY", "benchmark-key")
+    os.environ.setdefault("AZURE_OPENAI_ENDPOINT", FAKE_OPENAI_ENDPOINT)
+    os.environ.setdefault("AZURE_OPENAI_KEY", "benchmark-key")
+    os.environ.setdefault("AZURE_OPENAI_API_KEY", "benchmark-key")
+    os.environ.setdefault("REDIS_HOST", "benchmark-redis.invalid")
+    if cache_dir:
+        # Caché de embeddings en disco aislada: cada corrida arranca en frío
+        os.environ["EMBEDDING_CACHE_DIR"] = cache_dir
+    # Sin exportadores de App Insights: la telemetría no debe salir del proceso
+    os.environ.pop("APPLICATIONINSIGHTS_CONNECTION_STRING", None)
+    os.environ.pop("APPINSIGHTS_INSTRUMENTATIONKEY", None)
+    # Sin loops [CICLO] del cerebro semántico: llaman a la Function App remota
+    # y mezclarían su tráfico y su CPU con las mediciones
+    os.environ["SEMANTIC_AUTOPILOT"] = "off"
+
+
+_network_blocked = {"attempts": 0}
+
+
+def block_network() -> Dict[str, int]:
+    """
+    Hace fallar toda conexión TCP no local y toda resolución DNS de hosts no
+    locales; devuelve el contador de intentos.
+    """
+    original_connect = socket.socket.connect
+    original_create = socket.create_connection
+    original_getaddrinfo = socket.getaddrinfo
+
+    def _allowed(address: Any) -> bool:
+        host = address[0] if isinstance(address, tuple) else address
+        return isinstance(host, str) and (host in ("localhost", "::1") or host.startswith("127."))
+
+    def connect(sock: socket.socket, address: Any) -> Any:
+        if sock.family in (socket.AF_INET, socket.AF_INET6) and not _allowed(address):
+            _network_blocked["attempts"] += 1
+            raise OSError(f"[Benchmark] red deshabilitada: {address}")
+        return original_connect(sock, address)
+
+    def create_connection(address: Any, *args: Any, **kwargs: Any) -> socket.socket:
+        if not _allowed(address):
+            _network_blocked["attempts"] += 1
+            raise OSError(f"[Benchmark] red deshabilitada: {address}")
+        return original_create(address, *args, **kwargs)
+
+    def getaddrinfo(host: Any, *args: Any, **kwargs: Any) -> Any:
+        if host is not None and not _allowed((host.decode() if isinstance(host, bytes) else host,)):
+            _network_blocked["attempts"] += 1
+            raise socket.gaierror(socket.EAI_NONAME, f"[Benchmark] red deshabilitada: {host}")
+        return original_getaddrinfo(host, *args, **kwargs)
+
+    socket.socket.connect = connect  # type: ignore[assignment]
+    socket.create_connection = create_connection  # type: ignore[assignment]
+    socket.getaddrinfo = getaddrinfo  # type: ignore[assignment]
+    return _network_blocked
+
+
+@dataclass
+class FakeBackends:
+    latency: LatencyProfile
+    calls: CallCounter
+    redis: Any
+    cosmos: FakeCosmosClient
+    blob: FakeBlobServiceClient
+    openai: FakeOpenAIClient
+    search_indexes: Dict[str, FakeSearchIndex]
+
+    def search_client(self, index_name: str, *_: Any, **__: Any) -> FakeSearchClient:
+        index = self.search_indexes.get(index_name)
+        if index is None:
+            index = self.search_indexes.setdefault(index_name, FakeSearchIndex(index_name))
+        return FakeSearchClient(index, self.latency, self.calls)
+
+    def memory_container(self) -> FakeCosmosContainer:
+        return self.cosmos.get_database_client(os.environ["COSMOSDB_DATABASE"]).get_container_client(
+            os.environ["COSMOSDB_CONTAINER"])
+
+
+def install_fakes(latency: LatencyProfile, embedding_dims: int = 3072,
+                  prefer_fakeredis: bool = False) -> FakeBackends:
+    """
+    Sustituye los clientes compartidos por los falsos. Debe llamarse después de
+    `configure_env()` y antes del primer request.
+    """
+    calls = CallCounter()
+    backends = FakeBackends(
+        latency=latency,
+        calls=calls,
+        redis=build_redis(latency, calls, prefer_fakeredis),
+        cosmos=FakeCosmosClient(latency, calls),
+        blob=FakeBlobServiceClient(latency, calls),
+        openai=FakeOpenAIClient(latency, calls, embedding_dims),
+        search_indexes={},
+    )
+
+    from services.azure_clients import azure_clients
+    # Atributos de instancia: tapan los métodos del registro compartido
+    azure_clients.cosmos_client = lambda *a, **k: backends.cosmos
+    azure_clients.blob_service_client = lambda *a, **k: backends.blob
+    azure_clients.openai_client = lambda *a, **k: backends.openai
+    azure_clients.search_client = backends.search_client
+
+    from services.redis_buffer_service import redis_buffer
+    redis_buffer._client = backends.redis
+    redis_buffer._enabled = True
+    redis_buffer._has_redisjson = False
+    redis_buffer._is_cluster = False
+
+    from services.memory_service import memory_service
+    memory_service._cosmos_endpoint = os.environ["COSMOSDB_ENDPOINT"]
+    memory_service.memory_container = None
+    memory_service._cosmos_client = None
+
+    container = backends.memory_container()
+    try:
+        import cosmos_memory_direct
+        cosmos_memory_direct._COSMOS_CLIENT = backends.cosmos
+        cosmos_memory_direct._COSMOS_DATABASE = backends.cosmos.get_database_client(
+            os.environ["COSMOSDB_DATABASE"])
+        cosmos_memory_direct._COSMOS_CONTAINER = container
+        cosmos_memory_direct.CosmosClient = lambda *a, **k: backends.cosmos
+    except Exception as exc:
+        logging.warning(f"[Benchmark] cosmos_memory_direct no parcheado: {exc}")
+
+    app_module = sys.modules.get("function_app")
+    if app_module is not None:
+        app_module.BLOB_CLIENT = backends.blob
+        app_module._cosmos_client = backends.cosmos
+        app_module.CosmosClient = lambda *a, **k: backends.cosmos
+    return backends
+
+
+def seed(backends: FakeBackends, sessions: List[str], agent_ids: List[str],
+         interactions_per_session: int, rng: random.Random,
+         corpus: List[str], threads_container: str = "boat-rental-project",
+         search_index: Optional[str] = None) -> Dict[str, int]:
+    """Siembra Cosmos, AI Search y threads de Blob con interacciones sintéticas."""
+    container = backends.memory_container()
+    index = backends.search_client(search_index or os.environ.get(
+        "AZURE_SEARCH_INDEX", "agent-memory-index-optimized"))
+    endpoints = ["/api/copiloto", "/api/hybrid", "/api/buscar-memoria", "/api/ejecutar-cli",
+                 "/api/diagnostico-recursos", "/api/leer-archivo"]
+    saved_latency = backends.latency.as_dict()
+    # La siembra no debe pagar la latencia simulada
+    for name in ("redis", "cosmos", "blob", "search", "openai"):
+        setattr(backends.latency, name, 0.0)
+    try:
+        docs = 0
+        search_docs: List[Dict[str, Any]] = []
+        now = time.time()
+        for s_idx, session_id in enumerate(sessions):
+            agent_id = agent_ids[s_idx % len(agent_ids)]
+            for i in range(interactions_per_session):
+                texto = rng.choice(corpus)
+                endpoint = rng.choice(endpoints)
+                ts = now - (interactions_per_session - i) * 60
+                doc = {
+                    "id": f"bench_{session_id}_{i}",
+                    "session_id": session_id,
+                    "agent_id": agent_id,
+                    "event_type": "endpoint_call",
+                    "tipo": "interaccion_usuario",
+                    "endpoint": endpoint,
+                    "texto_semantico": f"{texto} (interacción {i} en {endpoint})",
+                    "timestamp": datetime.fromtimestamp(ts, timezone.utc).isoformat(),
+                    "document_class": "cognitive_memory",
+                    "is_synthetic": False,
+                    "exito": True,
+                    "data": {"endpoint": endpoint, "success": True,
+                             "respuesta_resumen": texto[:200],
+                             "response_data": {"respuesta_usuario": f"Listo: {texto[:80]}"}},
+                }
+                container.upsert_item(doc)
+                docs += 1
+                search_docs.append({
+                    "id": doc["id"], "session_id": session_id, "agent_id": agent_id,
+                    "endpoint": endpoint, "texto_semantico": doc["texto_semantico"],
+                    "exito": True, "tipo_interaccion": "interaccion_usuario",
+                    "timestamp": doc["timestamp"], "document_class": "cognitive_memory",
+                    "is_synthetic": False,
+                    "vector_semantico": fake_embedding(doc["texto_semantico"], backends.openai.dims),
+                })
+        for start in range(0, len(search_docs), 500):
+            index.upload_documents(search_docs[start:start + 500])
+
+        threads = 0
+        blob_container = backends.blob.get_container_client(threads_container)
+        for s_idx, session_id in enumerate(sessions):
+            thread_id = f"thread_{session_id}"
+            lines = [json.dumps({"tipo": "mensaje", "role": "usuario" if j % 2 == 0 else "assistant",
+                                 "content": rng.choice(corpus), "created_at": datetime.now(timezone.utc).isoformat()},
+                                ensure_ascii=False) for j in range(8)]
+            lines.append(json.dumps({"tipo": "meta", "id": thread_id, "session_id": session_id,
+                                     "agent_id": agent_ids[s_idx % len(agent_ids)],
+                                     "metadata": {"source": "benchmark"}}, ensure_ascii=False))
+            blob = blob_container.get_blob_client(f"threads/{thread_id}.jsonl")
+            blob.create_append_blob()
+            blob.append_block(("\n".join(lines) + "\n").encode("utf-8"))
+            threads += 1
+    finally:
+        for name, value in saved_latency.items():
+            setattr(backends.latency, name, value)
+        backends.calls.reset()
+    return {"cosmos_docs": docs, "search_docs": len(search_docs), "threads": threads}
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark de SemanticIntentClassifier: scoring con bucle Python
+(cosine_similarity sobre List[float]) vs matriz NumPy normalizada.
+
+No llama a Azure OpenAI: usa embeddings sinteticos de la dimension pedida.
+
+Uso:
+    python benchmark_intent_classifier.py [--dim 3072] [--per-intent 40] [--iterations 50]
+"""
+import argparse
+import random
+import statistics
+import time
+
+import semantic_intent_classifier as sic
+
+
+def _random_vector(dim: int, rng: random.Random):
+    return [rng.uniform(-1.0, 1.0) for _ in range(dim)]
+
+
+def _legacy_scores(intent_embeddings, user_embedding):
+    """Implementacion previa: maximo coseno por intencion en Python puro."""
+    scores = {}
+    for intent, embeddings in intent_embeddings.items():
+        max_similarity = 0.0
+        for example_embedding in embeddings:
+            max_similarity = max(max_similarity, sic.cosine_similarity(
+                user_embedding, example_embedding))
+        scores[intent] = max_similarity
+    return scores
+
+
+def _timed(fn, iterations: int):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--per-intent", type=int, default=40)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    if sic.np is None:
+        raise SystemExit("numpy no esta instalado")
+
+    rng = random.Random(42)
+    classifier = sic.SemanticIntentClassifier()
+    legacy: dict = {}
+    for intent in classifier.intent_examples:
+        for _ in range(args.per_intent):
+            vector = _random_vector(args.dim, rng)
+            legacy.setdefault(intent, []).append(vector)
+            classifier._add_example_embedding(intent, vector)
+    classifier._embeddings_computed = True
+
+    user_embedding = _random_vector(args.dim, rng)
+    total = sum(len(v) for v in legacy.values())
+
+    old = _timed(lambda: _legacy_scores(legacy, user_embedding), args.iterations)
+    new = _timed(lambda: classifier._score_intents("", user_embedding), args.iterations)
+
+    # Ambos caminos deben coincidir
+    expected = _legacy_scores(legacy, user_embedding)
+    actual = classifier._score_intents("", user_embedding)
+    max_diff = max(abs(expected[k] - actual[k]) for k in expected)
+
+    print(f"Ejemplos: {total} | dim: {args.dim} | iteraciones: {args.iterations}")
+    print(f"  python (List[float]) : p50 {old['p50_ms']} ms | p95 {old['p95_ms']} ms")
+    print(f"  numpy (matriz)       : p50 {new['p50_ms']} ms | p95 {new['p95_ms']} ms")
+    print(f"  speedup p50          : x{old['p50_ms'] / max(new['p50_ms'], 1e-6):.1f}")
+    print(f"  diferencia max score : {max_diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,490 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark offline del wrapper memory_route y el pipeline de memoria.
+
+Arranca los handlers de function_app en proceso con backends falsos
+(benchmark_fakes: Redis, Cosmos, Blob, AI Search y OpenAI con latencia
+configurable), bloquea la red saliente y lanza una mezcla de requests a
+copiloto, historial-interacciones, hybrid y buscar-memoria. Reporta
+throughput, percentiles de latencia por ruta, asignaciones (tracemalloc en
+una pasada aparte), spans de perf_tracer y etapas de route_pipeline, y
+compara contra un baseline guardado (benchmark_memory_pipeline.baseline.json,
+versionado; se regenera con --save-baseline y los valores por defecto). Los
+loops [CICLO] del cerebro semántico no arrancan durante la corrida.
+
+Uso:
+    python benchmark_memory_pipeline.py [--mix default] [--requests 2000] [--concurrency 16]
+        [--latency "redis=0.5,cosmos=8,search=30,openai=60,blob=10"]
+        [--save-baseline] [--baseline RUTA] [--tolerance 0.10] [--output reporte.json]
+
+Requiere las dependencias de requirements.txt (azure-functions y SDKs de
+Azure); ningún SDK abre conexiones: todos los clientes se sustituyen.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import benchmark_fakes as fakes
+
+DEFAULT_BASELINE = Path(__file__).with_name("benchmark_memory_pipeline.baseline.json")
+ROUTES = ("copiloto", "historial-interacciones", "hybrid", "buscar-memoria")
+
+# ruta -> peso relativo
+MIXES: Dict[str, Dict[str, float]] = {
+    "default": {"copiloto": 35, "historial-interacciones": 30, "hybrid": 15, "buscar-memoria": 20},
+    "lectura": {"historial-interacciones": 50, "buscar-memoria": 50},
+    "agente": {"copiloto": 60, "hybrid": 40},
+}
+
+CORPUS = [
+    "revisar el estado del cache de redis y los errores de conexión",
+    "desplegar la function app en el slot de staging",
+    "qué hicimos ayer con el índice de ai search",
+    "listar los contenedores de blob storage del proyecto",
+    "diagnosticar por qué cosmos devuelve 429 en la sesión",
+    "resumen de las últimas interacciones del agente",
+    "ejecutar az functionapp list en el grupo de recursos",
+    "leer el archivo de configuración host.json",
+    "buscar en memoria el error de timeout del endpoint hybrid",
+    "actualizar la imagen del contenedor con el nuevo tag",
+    "cuántos documentos tiene el índice vectorial",
+    "mostrar el historial de comandos fallidos de hoy",
+]
+
+
+@dataclass
+class RequestSpec:
+    route: str
+    method: str
+    body: Optional[Dict[str, Any]]
+    params: Dict[str, str]
+    headers: Dict[str, str]
+
+
+# ---------------------------------------------------------------------- #
+# Construcción de requests
+# ---------------------------------------------------------------------- #
+def _parse_mix(spec: str) -> Dict[str, float]:
+    if spec in MIXES:
+        return MIXES[spec]
+    mix: Dict[str, float] = {}
+    for part in filter(None, spec.split(",")):
+        route, _, weight = part.partition("=")
+        route = route.strip()
+        if route not in ROUTES:
+            raise SystemExit(f"Ruta desconocida en --mix: {route} (válidas: {', '.join(ROUTES)})")
+        mix[route] = float(weight or 1)
+    if not mix:
+        raise SystemExit(f"--mix vacío; use {', '.join(MIXES)} o 'ruta=peso,...'")
+    return mix
+
+
+class RequestFactory:
+    """Requests deterministas con sesiones sesgadas (pocas sesiones calientes)."""
+
+    def __init__(self, mix: Dict[str, float], sessions: List[str], agent_ids: List[str],
+                 thread_ratio: float, seed: int):
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._routes = list(mix)
+        self._weights = [mix[r] for r in self._routes]
+        self._sessions = sessions
+        # Zipf aproximado: la sesión i tiene peso 1/(i+1)
+        self._session_weights = [1.0 / (i + 1) for i in range(len(sessions))]
+        self._agent_ids = agent_ids
+        self._thread_ratio = thread_ratio
+
+    def next(self) -> RequestSpec:
+        with self._lock:
+            route = self._rng.choices(self._routes, self._weights)[0]
+            idx = self._rng.choices(range(len(self._sessions)), self._session_weights)[0]
+            texto = self._rng.choice(CORPUS)
+            with_thread = self._rng.random() < self._thread_ratio
+        session_id = self._sessions[idx]
+        headers = {
+            "Content-Type": "application/json",
+            "Session-ID": session_id,
+            "Agent-ID": self._agent_ids[idx % len(self._agent_ids)],
+            "User-Agent": "benchmark-memory-pipeline",
+        }
+        if with_thread:
+            headers["Thread-ID"] = f"thread_{session_id}"
+        if route == "copiloto":
+            return RequestSpec(route, "POST", {"mensaje": texto}, {}, headers)
+        if route == "historial-interacciones":
+            return RequestSpec(route, "GET", None, {"q": texto, "limite": "10"}, headers)
+        if route == "hybrid":
+            return RequestSpec(route, "POST", {"query": texto}, {}, headers)
+        return RequestSpec(route, "POST", {"query": texto, "top": 5, "session_id": session_id}, {}, headers)
+
+
+def _build_request(func_module: Any, spec: RequestSpec) -> Any:
+    body = json.dumps(spec.body, ensure_ascii=False).encode("utf-8") if spec.body is not None else b""
+    return func_module.HttpRequest(
+        method=spec.method,
+        url=f"http://localhost:7071/api/{spec.route}",
+        headers=spec.headers,
+        params=spec.params,
+        route_params={},
+        body=body,
+    )
+
+
+# ---------------------------------------------------------------------- #
+# Handlers
+# ---------------------------------------------------------------------- #
+def _discover_handlers(app: Any) -> Dict[str, Callable]:
+    """Ruta -> función de usuario ya envuelta por memory_route."""
+    handlers: Dict[str, Callable] = {}
+    for fn in app.get_functions():
+        try:
+            route = getattr(fn.get_trigger(), "route", None)
+        except Exception:
+            route = None
+        if route in ROUTES and route not in handlers:
+            handlers[route] = fn.get_user_function()
+    missing = [r for r in ROUTES if r not in handlers]
+    if missing:
+        logging.warning(f"[Benchmark] Rutas no registradas en function_app: {missing}")
+    return handlers
+
+
+class _LoopThread:
+    """Event loop dedicado para handlers `async def`."""
+
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="bench-loop", daemon=True)
+        self._thread.start()
+
+    def run(self, coro: Any) -> Any:
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+
+def _invoke(handler: Callable, req: Any, loop: _LoopThread) -> int:
+    result = handler(req)
+    if asyncio.iscoroutine(result):
+        result = loop.run(result)
+    return int(getattr(result, "status_code", 200))
+
+
+# ---------------------------------------------------------------------- #
+# Carga
+# ---------------------------------------------------------------------- #
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    return round(values[min(len(values) - 1, int(len(values) * pct))], 2)
+
+
+def _summarize(samples: List[float], statuses: Dict[str, int]) -> Dict[str, Any]:
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "errors": sum(n for s, n in statuses.items() if s == "exception" or s.startswith("5")),
+        "status": dict(sorted(statuses.items())),
+        "mean_ms": round(statistics.fmean(ordered), 2) if ordered else None,
+        "p50_ms": _percentile(ordered, 0.50),
+        "p90_ms": _percentile(ordered, 0.90),
+        "p95_ms": _percentile(ordered, 0.95),
+        "p99_ms": _percentile(ordered, 0.99),
+        "max_ms": round(ordered[-1], 2) if ordered else None,
+    }
+
+
+def run_load(handlers: Dict[str, Callable], factory: RequestFactory, func_module: Any,
+             total: int, concurrency: int, loop: _LoopThread) -> Dict[str, Any]:
+    lock = threading.Lock()
+    samples: Dict[str, List[float]] = {}
+    statuses: Dict[str, Dict[str, int]] = {}
+    remaining = [total]
+
+    def worker() -> None:
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            spec = factory.next()
+            handler = handlers.get(spec.route)
+            if handler is None:
+                continue
+            req = _build_request(func_module, spec)
+            start = time.perf_counter()
+            try:
+                status = str(_invoke(handler, req, loop))
+            except Exception as exc:
+                logging.debug(f"[Benchmark] {spec.route} lanzó {exc!r}")
+                status = "exception"
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with lock:
+                samples.setdefault(spec.route, []).append(elapsed_ms)
+                route_status = statuses.setdefault(spec.route, {})
+                route_status[status] = route_status.get(status, 0) + 1
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bench") as pool:
+        for future in [pool.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    wall_s = time.perf_counter() - wall_start
+
+    all_samples = [v for values in samples.values() for v in values]
+    all_status: Dict[str, int] = {}
+    for route_status in statuses.values():
+        for status, n in route_status.items():
+            all_status[status] = all_status.get(status, 0) + n
+    return {
+        "wall_s": round(wall_s, 3),
+        "throughput_rps": round(len(all_samples) / wall_s, 2) if wall_s else None,
+        "overall": _summarize(all_samples, all_status),
+        "routes": {route: _summarize(samples[route], statuses[route]) for route in sorted(samples)},
+    }
+
+
+def _drain_background(timeout_s: float) -> float:
+    """Espera a que terminen las etapas post y el write-behind; devuelve ms."""
+    from services.memory_service import memory_service
+    from services.route_pipeline import route_pipeline
+
+    start = time.perf_counter()
+    deadline = start + timeout_s
+    while time.perf_counter() < deadline:
+        if route_pipeline.stats()["post_pending"] == 0:
+            break
+        time.sleep(0.01)
+    try:
+        memory_service._write_behind.flush(timeout=max(0.0, deadline - time.perf_counter()))
+    except Exception:
+        logging.debug("[Benchmark] flush del write-behind falló", exc_info=True)
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+def measure_allocations(handlers: Dict[str, Callable], factory: RequestFactory, func_module: Any,
+                        requests: int, loop: _LoopThread, top: int = 15) -> Dict[str, Any]:
+    """Pasada secuencial con tracemalloc (aparte: tracemalloc distorsiona la latencia)."""
+    specs = [factory.next() for _ in range(requests)]
+    tracemalloc.start(10)
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    base_current, _ = tracemalloc.get_traced_memory()
+    for spec in specs:
+        handler = handlers.get(spec.route)
+        if handler is None:
+            continue
+        try:
+            _invoke(handler, _build_request(func_module, spec), loop)
+        except Exception:
+            pass
+    current, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__),
+               tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")]
+    diff = after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")
+    return {
+        "requests": len(specs),
+        "peak_kb": round((peak - base_current) / 1024, 1),
+        "retained_kb": round((current - base_current) / 1024, 1),
+        "allocated_kb_per_request": round(
+            sum(max(0, s.size_diff) for s in diff) / 1024 / max(1, len(specs)), 2),
+        "top": [
+            {"site": f"{os.path.relpath(s.traceback[0].filename)}:{s.traceback[0].lineno}",
+             "size_kb": round(s.size_diff / 1024, 1), "count": s.count_diff}
+            for s in sorted(diff, key=lambda s: s.size_diff, reverse=True)[:top]
+        ],
+    }
+
+
+# ---------------------------------------------------------------------- #
+# Baseline
+# ---------------------------------------------------------------------- #
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, timeout=5, cwd=Path(__file__).parent).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    """Filas métrica/baseline/actual; `regression` si empeora más que `tolerance`."""
+    rows: List[Dict[str, Any]] = []
+
+    def add(metric: str, base: Optional[float], current: Optional[float], higher_is_better: bool = False) -> None:
+        if base in (None, 0) or current is None:
+            return
+        delta = (current - base) / base
+        worse = -delta if higher_is_better else delta
+        rows.append({"metric": metric, "baseline": base, "current": current,
+                     "delta_pct": round(delta * 100, 1), "regression": worse > tolerance})
+
+    add("throughput_rps", baseline.get("throughput_rps"), report.get("throughput_rps"), higher_is_better=True)
+    scopes = [("overall", baseline.get("overall", {}), report.get("overall", {}))]
+    scopes += [(f"route:{r}", baseline.get("routes", {}).get(r, {}), data)
+               for r, data in report.get("routes", {}).items()]
+    for scope, base, current in scopes:
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            add(f"{scope}.{key}", base.get(key), current.get(key))
+    add("allocations.allocated_kb_per_request",
+        baseline.get("allocations", {}).get("allocated_kb_per_request"),
+        report.get("allocations", {}).get("allocated_kb_per_request"))
+    return rows
+
+
+def _print_report(report: Dict[str, Any], comparison: Optional[List[Dict[str, Any]]]) -> None:
+    meta = report["meta"]
+    print(f"Mezcla: {meta['mix']} | requests: {meta['requests']} | concurrencia: {meta['concurrency']}"
+          f" | latencia: {meta['latency_ms']}")
+    print(f"Throughput: {report['throughput_rps']} req/s en {report['wall_s']} s"
+          f" | drenado post: {report['background_drain_ms']} ms")
+    print(f"{'ruta':<26}{'n':>6}{'err':>5}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for name, data in [("(total)", report["overall"])] + list(report["routes"].items()):
+        print(f"{name:<26}{data['count']:>6}{data['errors']:>5}{data['p50_ms'] or 0:>9.1f}"
+              f"{data['p95_ms'] or 0:>9.1f}{data['p99_ms'] or 0:>9.1f}{data['max_ms'] or 0:>9.1f}")
+    alloc = report.get("allocations")
+    if alloc:
+        print(f"Asignaciones ({alloc['requests']} req): {alloc['allocated_kb_per_request']} KB/req,"
+              f" pico {alloc['peak_kb']} KB, retenido {alloc['retained_kb']} KB")
+        for item in alloc["top"][:8]:
+            print(f"    {item['size_kb']:>9.1f} KB  {item['site']}")
+    print("Spans más lentos (p95):")
+    for name, data in list(report["spans"].items())[:10]:
+        print(f"    {name:<40} n={data['count']:<6} p95={data['p95_ms']} ms")
+    if report["network_blocked"]:
+        print(f"⚠️  Conexiones salientes bloqueadas: {report['network_blocked']}")
+    if comparison is not None:
+        print("Comparación con baseline:")
+        for row in comparison:
+            flag = "REGRESIÓN" if row["regression"] else ""
+            print(f"    {row['metric']:<44}{row['baseline']:>10}{row['current']:>10}"
+                  f"{row['delta_pct']:>+8.1f}%  {flag}")
+
+
+# ---------------------------------------------------------------------- #
+# Main
+# ---------------------------------------------------------------------- #
+def _boot(args: argparse.Namespace, latency: fakes.LatencyProfile) -> Tuple[Any, Any, fakes.FakeBackends, Dict[str, int]]:
+    fakes.configure_env(cache_dir=tempfile.mkdtemp(prefix="bench-embeddings-"))
+    blocked = fakes.block_network()
+    boot_start = time.perf_counter()
+    import azure.functions as func_module
+    import function_app
+    boot_ms = (time.perf_counter() - boot_start) * 1000
+    backends = fakes.install_fakes(latency, embedding_dims=args.embedding_dims,
+                                   prefer_fakeredis=args.fakeredis)
+    logging.warning(f"[Benchmark] function_app importado en {boot_ms:.0f} ms")
+    return func_module, function_app.app, backends, blocked
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mix", default="default",
+                        help=f"{', '.join(MIXES)} o 'ruta=peso,...'")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--interactions", type=int, default=40, help="interacciones sembradas por sesión")
+    parser.add_argument("--thread-ratio", type=float, default=0.5, help="fracción de requests con Thread-ID")
+    parser.add_argument("--latency", default="", help="p. ej. 'redis=0.5,cosmos=8,search=30,openai=60,blob=10'")
+    parser.add_argument("--embedding-dims", type=int, default=3072)
+    parser.add_argument("--alloc-requests", type=int, default=200, help="0 desactiva la pasada de tracemalloc")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--fakeredis", action="store_true", help="usar fakeredis si está instalado")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="guardar este reporte como baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="empeoramiento relativo tolerado")
+    parser.add_argument("--output", type=Path, help="escribir el reporte completo en JSON")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, args.log_level.upper(), logging.WARNING))
+    logging.getLogger().setLevel(getattr(logging, args.log_level.upper(), logging.WARNING))
+
+    mix = _parse_mix(args.mix)
+    latency = fakes.LatencyProfile.parse(args.latency)
+    func_module, app, backends, blocked = _boot(args, latency)
+    handlers = _discover_handlers(app)
+    if not handlers:
+        raise SystemExit("No se encontró ningún handler de las rutas del benchmark")
+
+    rng = random.Random(args.seed)
+    sessions = [f"bench-session-{i:03d}" for i in range(args.sessions)]
+    agent_ids = ["foundry-agent", "copiloto-cli", "mobile-app"]
+    seeded = fakes.seed(backends, sessions, agent_ids, args.interactions, rng, CORPUS,
+                        threads_container=os.getenv("THREADS_CONTAINER_NAME", "boat-rental-project"))
+
+    from services.perf_tracer import perf_tracer
+    from services.route_pipeline import route_pipeline
+
+    loop = _LoopThread()
+    factory = RequestFactory(mix, sessions, agent_ids, args.thread_ratio, args.seed)
+    if args.warmup:
+        run_load(handlers, factory, func_module, args.warmup, args.concurrency, loop)
+        _drain_background(30)
+    perf_tracer.reset()
+    backends.calls.reset()
+
+    report: Dict[str, Any] = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git": _git_revision(),
+            "python": platform.python_version(),
+            "mix": mix,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "latency_ms": latency.as_dict(),
+            "seeded": seeded,
+            "seed": args.seed,
+        },
+    }
+    report.update(run_load(handlers, factory, func_module, args.requests, args.concurrency, loop))
+    report["background_drain_ms"] = _drain_background(60)
+    report["backend_calls"] = backends.calls.snapshot()
+    report["spans"] = perf_tracer.stats()["spans"]
+    report["stages"] = {name: {"outcomes": data["outcomes"], "avg_ms": data["latency"]["avg_ms"],
+                               "max_ms": data["latency"]["max_ms"]}
+                        for name, data in route_pipeline.stats()["stages"].items()}
+    if args.alloc_requests:
+        report["allocations"] = measure_allocations(
+            handlers, factory, func_module, args.alloc_requests, loop)
+        _drain_background(30)
+    report["network_blocked"] = blocked["attempts"]
+
+    comparison = None
+    if not args.save_baseline and args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        if baseline.get("meta", {}).get("mix") != mix or baseline.get("meta", {}).get("latency_ms") != latency.as_dict():
+            print("⚠️  El baseline usa otra mezcla o latencia; la comparación es orientativa")
+        comparison = compare(report, baseline, args.tolerance)
+        report["comparison"] = comparison
+
+    _print_report(report, comparison)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False, default=str), encoding="utf-8")
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2, ensure_ascii=False, default=str), encoding="utf-8")
+        print(f"Baseline guardado en {args.baseline}")
+    sys.exit(1 if comparison and any(row["regression"] for row in comparison) else 0)
+
+
+if __name__ == "__main__":
+    main()
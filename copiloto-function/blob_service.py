@@ -21,8 +21,13 @@ class BlobService:
         if not self.connection_string:
             raise ValueError("AzureWebJobsStorage no configurado")
         self.container_name = container_name
-        self._client: BlobServiceClient = BlobServiceClient.from_connection_string(
-            self.connection_string)
+        if self.connection_string == os.getenv("AzureWebJobsStorage"):
+            # Reutilizar el cliente (y su pool HTTP) compartido del proceso
+            from services.azure_clients import azure_clients
+            self._client: BlobServiceClient = azure_clients.blob_service_client()
+        else:
+            self._client = BlobServiceClient.from_connection_string(
+                self.connection_string)
         self._container_client = self._client.get_container_client(
             self.container_name)
 
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Genera el artefacto de embeddings de intenciones (paso de build).
+
+Escribe artifacts/intent_embeddings.v<N>.<modelo>.{f32,json} con los
+embeddings de SemanticIntentClassifier.intent_examples. Reutiliza las filas
+de artefactos previos cuyo hash de ejemplo no cambió, así que solo se pagan
+los ejemplos nuevos o modificados.
+
+Requiere AZURE_OPENAI_ENDPOINT y AZURE_OPENAI_KEY / AZURE_OPENAI_API_KEY.
+
+Uso:
+    python build_intent_embeddings.py [--output-dir artifacts]
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+from services.intent_embedding_artifact import BUNDLED_DIR, IntentEmbeddingArtifact, examples_signature
+import semantic_intent_classifier as sic
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Genera el artefacto de embeddings de intenciones")
+    parser.add_argument("--output-dir", type=Path, default=BUNDLED_DIR)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if not sic._embeddings_api_available():
+        print("❌ Faltan credenciales de Azure OpenAI (AZURE_OPENAI_ENDPOINT + AZURE_OPENAI_KEY)")
+        return 1
+
+    classifier = sic.SemanticIntentClassifier()
+    classifier._embeddings_computed = False
+    classifier._load_from_artifacts(persist_dir=args.output_dir, force_write=True)
+
+    artifact = IntentEmbeddingArtifact.load(args.output_dir, sic.EMBEDDING_MODEL)
+    expected = examples_signature(sic.EMBEDDING_MODEL, classifier.intent_examples)
+    if artifact is None or artifact.signature != expected:
+        print("❌ El artefacto no cubre todos los ejemplos (¿falló algún embedding?)")
+        return 1
+
+    print(f"✅ Artefacto: {artifact.base} ({len(artifact.hashes)} ejemplos, dim {artifact.dim})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -22,6 +22,7 @@ import logging
 from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime, timezone, timedelta
 from services.redis_buffer_service import redis_buffer
+from services.context_fanout import context_fanout
 
 # Configuración del middleware
 MAX_CONTEXT_MESSAGES = 15  # Máximo número de mensajes previos a incluir
@@ -53,15 +54,19 @@ class ConversationalContinuityMiddleware:
             Dict con contexto enriquecido para inyectar en el prompt
         """
         try:
-            # 1. 🧵 RECUPERAR HISTORIAL DE CONVERSACIÓN (thread:*)
-            thread_context = self._get_thread_context(session_id)
-
-            # 2. 🧠 RECUPERAR MEMORIA SEMÁNTICA (memoria:*)
-            semantic_context = self._get_semantic_context(
-                user_message, session_id)
-
-            # 3. 🔍 BÚSQUEDA DE CONTEXTO RELEVANTE (search:*)
-            search_context = self._get_search_context(user_message, session_id)
+            # 1-3. 🧵 thread:*, 🧠 memoria:* y 🔍 search:* son independientes:
+            # se consultan en paralelo con deadline por fuente
+            fanout = context_fanout.run({
+                "thread": lambda: self._get_thread_context(session_id),
+                "semantic": lambda: self._get_semantic_context(user_message, session_id),
+                "search": lambda: self._get_search_context(user_message, session_id),
+            })
+            thread_context = fanout.values.get(
+                "thread") or {"messages": [], "has_history": False}
+            semantic_context = fanout.values.get(
+                "semantic") or {"relevant_memory": [], "has_semantic_memory": False}
+            search_context = fanout.values.get(
+                "search") or {"search_results": [], "has_search_history": False}
 
             # 4. 🎯 CONSTRUIR CONTEXTO FINAL OPTIMIZADO
             enriched_context = self._build_enriched_context(
@@ -73,6 +78,9 @@ class ConversationalContinuityMiddleware:
                 agent_id=agent_id
             )
 
+            enriched_context["dropped_sources"] = fanout.dropped
+            enriched_context["gather_latency_ms"] = fanout.elapsed_ms
+
             # 5. 📊 LOGGING PARA DEBUGGING
             self._log_context_injection(enriched_context, session_id)
 
@@ -440,12 +448,20 @@ def build_context_enriched_prompt(original_prompt: str, user_message: str,
         # Inyectar contexto conversacional
         context = inject_conversational_context(
             user_message, session_id, agent_id)
+        return compose_enriched_prompt(original_prompt, context)
+
+    except Exception as e:
+        logging.error(f"❌ Error construyendo prompt enriquecido: {e}")
+        return original_prompt  # Fallback seguro
+
 
-        if context.get("has_context", False):
-            conversational_prompt = context.get("conversational_prompt", "")
+def compose_enriched_prompt(original_prompt: str, context: Dict[str, Any]) -> str:
+    """Arma el prompt enriquecido a partir de un contexto ya recuperado."""
+    if context.get("has_context", False):
+        conversational_prompt = context.get("conversational_prompt", "")
 
-            # Construir prompt enriquecido
-            enriched_prompt = f"""{conversational_prompt}
+        # Construir prompt enriquecido
+        enriched_prompt = f"""{conversational_prompt}
 
 🎯 CONSULTA ACTUAL DEL USUARIO:
 {original_prompt}
@@ -453,14 +469,9 @@ def build_context_enriched_prompt(original_prompt: str, user_message: str,
 ---
 Responde de manera natural, integrando el contexto conversacional cuando sea relevante."""
 
-            return enriched_prompt
-        else:
-            # No hay contexto suficiente, devolver prompt original
-            return original_prompt
-
-    except Exception as e:
-        logging.error(f"❌ Error construyendo prompt enriquecido: {e}")
-        return original_prompt  # Fallback seguro
+        return enriched_prompt
+    # No hay contexto suficiente, devolver prompt original
+    return original_prompt
 
 
 def get_context_stats(session_id: str) -> Dict[str, Any]:
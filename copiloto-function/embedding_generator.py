@@ -1,42 +1,31 @@
 """
 Generador de embeddings - Sin decoradores de Azure Functions
+
+Delegado en services.embedding_service (batching + caché por contenido).
 """
-import os
 import logging
-from openai import AzureOpenAI
-from typing import Optional, List
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
+from typing import Optional, List, Sequence
+
+from services.embedding_service import get_embedding_service
+
+EMBEDDING_MODEL = "text-embedding-3-large"
 
-# Cliente de OpenAI
-if os.getenv("AZURE_OPENAI_KEY"):
-    openai_client = AzureOpenAI(
-        api_key=os.environ["AZURE_OPENAI_KEY"],
-        api_version="2024-02-01",
-        azure_endpoint=os.environ["AZURE_OPENAI_ENDPOINT"],
-    )
-    EMBEDDING_MODEL = "text-embedding-3-large"
-else:
-    token_provider = get_bearer_token_provider(
-        DefaultAzureCredential(),
-        "https://cognitiveservices.azure.com/.default"
-    )
-    openai_client = AzureOpenAI(
-        azure_ad_token_provider=token_provider,
-        api_version="2024-02-01",
-        azure_endpoint=os.environ["AZURE_OPENAI_ENDPOINT"],
-    )
-    EMBEDDING_MODEL = "text-embedding-3-large"
 
 def generar_embedding(texto: str) -> Optional[List[float]]:
     """Genera embedding usando Azure OpenAI sin filtros de contenido"""
     try:
-        # Usar extra_body para pasar parámetros adicionales no soportados directamente
-        response = openai_client.embeddings.create(
-            input=texto[:8000],
-            model=EMBEDDING_MODEL,
-            extra_body={"content_filter_policy": "none"}  # Desactiva filtros de contenido
-        )
-        return response.data[0].embedding
+        vector = get_embedding_service(EMBEDDING_MODEL).embed(texto)
+        return vector.tolist() if vector is not None else None
     except Exception as e:
         logging.error(f"❌ Error generando embedding: {e}")
         return None
+
+
+def generar_embeddings_batch(textos: Sequence[str]) -> List[Optional[List[float]]]:
+    """Genera embeddings para varios textos (una llamada por bloque, mismo orden)."""
+    try:
+        vectores = get_embedding_service(EMBEDDING_MODEL).embed_many(textos)
+        return [v.tolist() if v is not None else None for v in vectores]
+    except Exception as e:
+        logging.error(f"❌ Error generando embeddings en batch: {e}")
+        return [None] * len(textos)
@@ -53,6 +53,7 @@ def _generar_respuesta_no_encontrado(ruta: str, sugerencias: list) -> dict:
 def eliminar_archivo_http(req: func.HttpRequest) -> func.HttpResponse:
     """Elimina un archivo del Blob Storage o del filesystem local"""
     from function_app import get_blob_client, CONTAINER_NAME, PROJECT_ROOT
+    from services.file_content_cache import file_cache
     from memory_manual import aplicar_memoria_manual
     from cosmos_memory_direct import aplicar_memoria_cosmos_directo
     from services.memory_service import memory_service
@@ -249,6 +250,10 @@ def eliminar_archivo_http(req: func.HttpRequest) -> func.HttpResponse:
             }
             resultado.update(_generar_respuesta_no_encontrado(ruta, sugerencias))
 
+        # La caché de contenido no debe seguir sirviendo lo eliminado
+        if archivo_encontrado:
+            file_cache.invalidate(ruta, *archivos_eliminados)
+
         # Enriquecer respuesta
         if resultado:
             resultado["timestamp"] = datetime.now().isoformat()
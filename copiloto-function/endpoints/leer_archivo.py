@@ -62,6 +62,14 @@ def leer_archivo_http(req: func.HttpRequest) -> func.HttpResponse:
                 status_code=400
             )
 
+        if params["rango"] is not None:
+            res_dict = handle_range_request_dict(params, run_id)
+            return func.HttpResponse(
+                json.dumps(res_dict, ensure_ascii=False),
+                mimetype="application/json",
+                status_code=200 if res_dict.get("exito") else 404
+            )
+
         request_type = detect_request_type(params["ruta_raw"])
 
         if request_type == "api_function":
@@ -79,6 +87,25 @@ def leer_archivo_http(req: func.HttpRequest) -> func.HttpResponse:
             status_code=200
         )
 
+    except RangoInvalido as e:
+        res_dict = {
+            "ok": False,
+            "error_code": "INVALID_RANGE",
+            "message": str(e),
+            "suggestions": ["Usar linea_inicio/linea_fin (1-based) o byte_inicio/byte_fin",
+                            "Ejemplo: ?ruta=function_app.py&linea_inicio=8000&linea_fin=8200"],
+            "metadata": {
+                "run_id": run_id,
+                "timestamp": datetime.now().isoformat(),
+                "endpoint": "/api/leer-archivo"
+            }
+        }
+        return func.HttpResponse(
+            json.dumps(res_dict, ensure_ascii=False),
+            mimetype="application/json",
+            status_code=400
+        )
+
     except Exception as e:
         logging.exception(f"[{run_id}] Error en leer_archivo_http")
         res_dict = {
@@ -114,6 +141,8 @@ def extract_parameters(req: func.HttpRequest) -> Dict[str, Any]:
 
     params = {
         "ruta_raw": ruta_raw,
+        "ruta_solicitada": ruta_raw,
+        "rango": extract_range(req),
         "container": container,
         "force_refresh": req.params.get("force_refresh", "false").lower() == "true",
         "include_preview": req.params.get("include_preview", "true").lower() == "true",
@@ -127,6 +156,77 @@ def extract_parameters(req: func.HttpRequest) -> Dict[str, Any]:
     return params
 
 
+class RangoInvalido(ValueError):
+    """Parámetros de rango mal formados (respuesta 400)."""
+
+
+def _parse_int(value: Optional[str], name: str) -> Optional[int]:
+    if value is None or str(value).strip() == "":
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise RangoInvalido(f"Parámetro '{name}' inválido: {value!r} (se espera un entero)")
+
+
+def extract_range(req: func.HttpRequest) -> Optional[Dict[str, Optional[int]]]:
+    """
+    Rango pedido: linea_inicio/linea_fin (1-based, inclusivo), `lineas=8000-8200`,
+    byte_inicio/byte_fin o la cabecera `Range: bytes=0-1023`. None si no hay rango.
+    """
+    rango = {
+        "linea_inicio": _parse_int(req.params.get("linea_inicio"), "linea_inicio"),
+        "linea_fin": _parse_int(req.params.get("linea_fin"), "linea_fin"),
+        "byte_inicio": _parse_int(req.params.get("byte_inicio"), "byte_inicio"),
+        "byte_fin": _parse_int(req.params.get("byte_fin"), "byte_fin"),
+    }
+    lineas = req.params.get("lineas")
+    if lineas:
+        inicio, _, fin = lineas.partition("-")
+        rango["linea_inicio"] = _parse_int(inicio, "lineas")
+        rango["linea_fin"] = _parse_int(fin, "lineas")
+
+    range_header = (req.headers.get("Range") or req.headers.get("range") or "").strip()
+    if range_header.startswith("bytes=") and rango["byte_inicio"] is None:
+        inicio, _, fin = range_header[len("bytes="):].split(",")[0].partition("-")
+        rango["byte_inicio"] = _parse_int(inicio, "Range") or 0
+        rango["byte_fin"] = _parse_int(fin, "Range")
+
+    if all(v is None for v in rango.values()):
+        return None
+    if rango["byte_fin"] is not None and rango["byte_inicio"] is None:
+        rango["byte_inicio"] = 0
+    if rango["byte_inicio"] is not None and (rango["linea_inicio"] or rango["linea_fin"]):
+        raise RangoInvalido("Usar rango de líneas o de bytes, no ambos")
+    for name, value in rango.items():
+        if value is not None and value < 0:
+            raise RangoInvalido(f"Parámetro '{name}' no puede ser negativo")
+    return rango
+
+
+def handle_range_request_dict(params: dict, run_id: str) -> dict:
+    """Lectura por rango de líneas o bytes (sin descargar el archivo completo)"""
+    rutas = list(dict.fromkeys([params["ruta_solicitada"], params["ruta_raw"]]))
+    resultado: Dict[str, Any] = {}
+    for ruta in rutas:
+        resultado = fa.leer_archivo_rango(ruta, **params["rango"])
+        if resultado.get("exito"):
+            break
+
+    resultado["run_id"] = run_id
+    if resultado.get("exito"):
+        rango = resultado["rango"]
+        if rango["tipo"] == "lineas":
+            resultado["mensaje"] = (
+                f"Líneas {rango['linea_inicio']}-{rango['linea_fin']} de "
+                f"{resultado['total_lineas']} de {params['ruta_solicitada']}")
+        else:
+            resultado["mensaje"] = (
+                f"Bytes {rango['byte_inicio']}-{rango['byte_fin']} de "
+                f"{resultado['tamaño_total']} de {params['ruta_solicitada']}")
+    return resultado
+
+
 def detect_request_type(path: str) -> str:
     """Detecta si la solicitud es para una función API, ruta especial o archivo normal"""
 
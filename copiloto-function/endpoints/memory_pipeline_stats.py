@@ -0,0 +1,21 @@
+"""
+Endpoint: memory-pipeline-stats
+Configuración y latencia por etapa del wrapper memory_route
+(timeouts, fase pre/post, histogramas y resultados por etapa).
+"""
+import json
+
+import azure.functions as func
+
+from function_app import app
+from services.route_pipeline import route_pipeline
+
+
+@app.function_name(name="memory_pipeline_stats")
+@app.route(route="memory-pipeline-stats", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
+def memory_pipeline_stats(req: func.HttpRequest) -> func.HttpResponse:
+    return func.HttpResponse(
+        json.dumps(route_pipeline.stats(), indent=2, default=str),
+        mimetype="application/json",
+        status_code=200,
+    )
@@ -8,8 +8,11 @@ import logging
 from typing import Dict, List, Any, Optional, Set, Tuple
 from pathlib import Path
 from datetime import datetime
+from services.symbol_index import symbol_index
 import os
 import sys
+import time
+from collections import OrderedDict
 
 # Importar el app principal
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
@@ -145,143 +148,46 @@ class ProjectExplorer:
 
 
 class SemanticAnalyzer:
-    """Analizador semántico para código Python"""
+    """
+    Analizador semántico para código Python.
+
+    Los símbolos (clases, funciones, imports, duplicados, errores lógicos)
+    salen de services.symbol_index, cacheados por hash del contenido: el
+    mismo archivo no se vuelve a parsear en cada request.
+    """
 
     def __init__(self, content: str, file_path: str = ""):
         self.content = content
         self.file_path = file_path
         self.lines = content.split('\n')
-        self.tree = None
-        self.parse_errors = []
+        self.symbols = symbol_index.analyze(content)
+        self.parse_errors = list(self.symbols["parse_errors"])
+        self._tree = None
 
-        try:
-            self.tree = ast.parse(content)
-        except SyntaxError as e:
-            self.parse_errors.append({
-                "type": "syntax_error",
-                "line": e.lineno,
-                "message": str(e),
-                "text": e.text
-            })
+    @property
+    def tree(self) -> Optional[ast.AST]:
+        """AST completo, solo si alguien lo necesita (el índice no lo guarda)."""
+        if self._tree is None and not self.parse_errors:
+            self._tree = ast.parse(self.content)
+        return self._tree
 
     def find_classes(self, pattern: Optional[str] = None) -> List[Dict]:
         """Detectar clases con patrón opcional"""
-        classes = []
-        if not self.tree:
-            return classes
-
-        for node in ast.walk(self.tree):
-            if isinstance(node, ast.ClassDef):
-                class_info = {
-                    "name": node.name,
-                    "line": node.lineno,
-                    "methods": [m.name for m in node.body if isinstance(m, ast.FunctionDef)],
-                    "bases": [self._get_name(base) for base in node.bases],
-                    "decorators": [self._get_name(dec) for dec in node.decorator_list]
-                }
-
-                if pattern is None or re.search(pattern, node.name, re.IGNORECASE):
-                    classes.append(class_info)
-
-        return classes
+        return [dict(c) for c in self.symbols["classes"]
+                if pattern is None or re.search(pattern, c["name"], re.IGNORECASE)]
 
     def find_functions(self, pattern: Optional[str] = None) -> List[Dict]:
         """Detectar funciones con patrón opcional"""
-        functions = []
-        if not self.tree:
-            return functions
-
-        for node in ast.walk(self.tree):
-            if isinstance(node, ast.FunctionDef):
-                func_info = {
-                    "name": node.name,
-                    "line": node.lineno,
-                    "args": [arg.arg for arg in node.args.args],
-                    "decorators": [self._get_name(dec) for dec in node.decorator_list],
-                    "is_async": isinstance(node, ast.AsyncFunctionDef),
-                    "docstring": ast.get_docstring(node)
-                }
-
-                if pattern is None or re.search(pattern, node.name, re.IGNORECASE):
-                    functions.append(func_info)
-
-        return functions
+        return [dict(f) for f in self.symbols["functions"]
+                if pattern is None or re.search(pattern, f["name"], re.IGNORECASE)]
 
     def find_imports(self) -> Dict[str, List]:
         """Detectar imports y analizar conflictos"""
-        imports = {"regular": [], "from_imports": [], "conflicts": []}
-        if not self.tree:
-            return imports
-
-        imported_names = set()
-
-        for node in ast.walk(self.tree):
-            if isinstance(node, ast.Import):
-                for alias in node.names:
-                    name = alias.asname or alias.name
-                    if name in imported_names:
-                        imports["conflicts"].append({
-                            "name": name,
-                            "line": node.lineno,
-                            "type": "duplicate_import"
-                        })
-                    imported_names.add(name)
-                    imports["regular"].append({
-                        "module": alias.name,
-                        "alias": alias.asname,
-                        "line": node.lineno
-                    })
-
-            elif isinstance(node, ast.ImportFrom):
-                for alias in node.names:
-                    name = alias.asname or alias.name
-                    if name in imported_names:
-                        imports["conflicts"].append({
-                            "name": name,
-                            "line": node.lineno,
-                            "type": "duplicate_import"
-                        })
-                    imported_names.add(name)
-                    imports["from_imports"].append({
-                        "module": node.module,
-                        "name": alias.name,
-                        "alias": alias.asname,
-                        "line": node.lineno
-                    })
-
-        return imports
+        return {key: list(value) for key, value in self.symbols["imports"].items()}
 
     def find_duplicates(self) -> Dict[str, List]:
-        """Detectar funciones y clases duplicadas"""
-        duplicates = {"functions": [], "classes": []}
-        if not self.tree:
-            return duplicates
-
-        func_names = {}
-        class_names = {}
-
-        for node in ast.walk(self.tree):
-            if isinstance(node, ast.FunctionDef):
-                if node.name in func_names:
-                    duplicates["functions"].append({
-                        "name": node.name,
-                        "lines": [func_names[node.name], node.lineno],
-                        "type": "duplicate_function"
-                    })
-                else:
-                    func_names[node.name] = node.lineno
-
-            elif isinstance(node, ast.ClassDef):
-                if node.name in class_names:
-                    duplicates["classes"].append({
-                        "name": node.name,
-                        "lines": [class_names[node.name], node.lineno],
-                        "type": "duplicate_class"
-                    })
-                else:
-                    class_names[node.name] = node.lineno
-
-        return duplicates
+        """Detectar funciones y clases duplicadas (por nombre y por cuerpo)"""
+        return {key: list(value) for key, value in self.symbols["duplicates"].items()}
 
     def find_indentation_issues(self) -> List[Dict]:
         """Detectar problemas de indentación"""
@@ -314,47 +220,64 @@ class SemanticAnalyzer:
 
     def find_logical_errors(self) -> List[Dict]:
         """Detectar errores lógicos comunes"""
-        errors = []
-        if not self.tree:
-            return errors
-
-        for node in ast.walk(self.tree):
-            # Variables no utilizadas
-            if isinstance(node, ast.Assign):
-                for target in node.targets:
-                    if isinstance(target, ast.Name):
-                        # Simplificado: detectar asignaciones que parecen no usadas
-                        var_name = target.id
-                        if var_name.startswith('_') and len(var_name) > 1:
-                            errors.append({
-                                "line": node.lineno,
-                                "type": "unused_variable",
-                                "message": f"Variable posiblemente no utilizada: {var_name}",
-                                "variable": var_name
-                            })
-
-            # Comparaciones peligrosas
-            elif isinstance(node, ast.Compare):
-                if len(node.ops) == 1 and isinstance(node.ops[0], ast.Is):
-                    if isinstance(node.comparators[0], (ast.Constant, ast.Num, ast.Str)):
-                        errors.append({
-                            "line": node.lineno,
-                            "type": "dangerous_comparison",
-                            "message": "Uso de 'is' con literal, usar '==' en su lugar"
-                        })
-
-        return errors
-
-    def _get_name(self, node) -> str:
-        """Obtener nombre de un nodo AST"""
-        if isinstance(node, ast.Name):
-            return node.id
-        elif isinstance(node, ast.Attribute):
-            return f"{self._get_name(node.value)}.{node.attr}"
-        elif isinstance(node, ast.Constant):
-            return str(node.value)
+        return list(self.symbols["logical_errors"])
+
+
+SYMBOL_QUERIES = ("definition", "callers", "duplicate_bodies")
+
+
+def search_symbols(search_type: str, pattern: Optional[str] = None,
+                   reindex: bool = False) -> Dict[str, Any]:
+    """
+    Consultas de símbolos sobre todo el proyecto ("¿dónde se define X?",
+    "¿quién llama a X?", cuerpos duplicados) resueltas con el índice de
+    símbolos, alimentado por el listado del índice de búsqueda de código.
+    """
+    from utils_helpers import get_blob_client, PROJECT_ROOT, IS_AZURE, CONTAINER_NAME
+    from services.code_search_index import code_search
+
+    if search_type in ("definition", "callers") and not pattern:
+        return {"exito": False, "error": f"'{search_type}' requiere 'pattern' con el nombre del símbolo"}
+
+    try:
+        if IS_AZURE:
+            client = get_blob_client()
+            if not client:
+                return {"exito": False, "error": "No se pudo conectar a Azure Blob Storage"}
+            container_client = client.get_container_client(CONTAINER_NAME)
+            index, fetch = code_search.blob_index(container_client, CONTAINER_NAME, force_refresh=reindex)
         else:
-            return str(node)
+            index, fetch = code_search.local_index(PROJECT_ROOT, force_refresh=reindex)
+
+        listing = [(doc["name"], doc["validator"]) for doc in index.documents()
+                   if doc["name"].endswith(".py") and doc["estado"] != "error"]
+        refresh = symbol_index.refresh(index.name, listing, lambda name: index.read_text(name, fetch))
+
+        if search_type == "definition":
+            results = symbol_index.where_defined(index.name, pattern)
+        elif search_type == "callers":
+            results = symbol_index.callers(index.name, pattern)
+        else:
+            results = symbol_index.duplicate_bodies(index.name)
+    except Exception as e:
+        return {"exito": False, "error": f"Error en búsqueda de símbolos: {str(e)}"}
+
+    return {
+        "exito": True,
+        "search_type": search_type,
+        "pattern": pattern,
+        "results": results,
+        "total": len(results),
+        "files_indexed": len(listing),
+        "index": refresh,
+    }
+
+
+# Estructuras recientes de ProjectExplorer: (raíz, profundidad, filtros) ->
+# (instante, estructura). Evita recorrer el árbol completo en cada request.
+_STRUCTURE_CACHE: "OrderedDict[Tuple[str, int, str], Tuple[float, Dict]]" = OrderedDict()
+_STRUCTURE_CACHE_MAX = 16
+EXPLORER_CACHE_TTL_S = float(os.getenv("EXPLORER_CACHE_TTL_S", "30"))
 
 
 def extend_msearch_with_explorer(body: Dict) -> Dict:
@@ -367,8 +290,27 @@ def extend_msearch_with_explorer(body: Dict) -> Dict:
     if not os.path.exists(root):
         return {"exito": False, "error": f"Ruta no encontrada: {root}", "source": "local_filesystem"}
 
+    key = (os.path.abspath(root), max_depth, json.dumps(filters, sort_keys=True, default=str))
+    cached = _STRUCTURE_CACHE.get(key)
+    if cached and not body.get("refresh") and time.monotonic() - cached[0] < EXPLORER_CACHE_TTL_S:
+        _STRUCTURE_CACHE.move_to_end(key)
+        return {
+            "exito": True,
+            "mode": "explore",
+            "structure": cached[1],
+            "metadata": {
+                "timestamp": datetime.now().isoformat(),
+                "cached": True,
+                "cache_age_s": round(time.monotonic() - cached[0], 2)
+            }
+        }
+
     explorer = ProjectExplorer(root)
     structure = explorer.get_structure(max_depth, filters)
+    _STRUCTURE_CACHE[key] = (time.monotonic(), structure)
+    _STRUCTURE_CACHE.move_to_end(key)
+    while len(_STRUCTURE_CACHE) > _STRUCTURE_CACHE_MAX:
+        _STRUCTURE_CACHE.popitem(last=False)
 
     return {
         "exito": True,
@@ -409,11 +351,15 @@ def process_msearch_request(body: Dict[str, Any]) -> Dict[str, Any]:
     search_type = body.get("search_type") or body.get("tipo") or "all"
     pattern = body.get("pattern") or body.get("patron")
 
+    # Consultas de símbolos de proyecto: no necesitan archivo
+    if search_type in SYMBOL_QUERIES and (not file_path or file_path == "*") and not content:
+        return search_symbols(search_type, pattern, reindex=bool(body.get("reindex")))
+
     if not file_path and not content:
         return {
             "exito": False,
             "error": "Se requiere 'file_path' o 'content'",
-            "campos_aceptados": ["file_path", "ruta", "path", "content", "contenido", "search_type", "tipo", "pattern", "patron"]
+            "campos_aceptados": ["file_path", "ruta", "path", "content", "contenido", "search_type", "tipo", "pattern", "patron", "reindex"]
         }
 
     # 🔍 DETECCIÓN AUTOMÁTICA: Ruta local vs Azure Blob
@@ -470,7 +416,7 @@ def process_msearch_request(body: Dict[str, Any]) -> Dict[str, Any]:
 
     # Manejar búsqueda en todos los archivos (Azure Blob)
     elif file_path == "*":
-        return search_all_files(search_type, pattern)
+        return search_all_files(search_type, pattern, reindex=bool(body.get("reindex")))
 
     # Leer archivo si se proporciona ruta
     if file_path and not content:
@@ -564,9 +510,17 @@ def process_msearch_request(body: Dict[str, Any]) -> Dict[str, Any]:
     return results
 
 
-def search_all_files(search_type: str, pattern: Optional[str] = None) -> Dict[str, Any]:
-    """Buscar patrón en todos los archivos del proyecto"""
+def search_all_files(search_type: str, pattern: Optional[str] = None,
+                     reindex: bool = False) -> Dict[str, Any]:
+    """
+    Buscar patrón en todos los archivos del proyecto.
+
+    Usa el índice de trigramas de services.code_search_index: del listado
+    (ETag/mtime) solo se descarga lo que cambió y el patrón se verifica
+    únicamente sobre los archivos candidatos.
+    """
     from utils_helpers import get_blob_client, PROJECT_ROOT, IS_AZURE, CONTAINER_NAME
+    from services.code_search_index import code_search
 
     all_results = {
         "exito": True,
@@ -585,52 +539,33 @@ def search_all_files(search_type: str, pattern: Optional[str] = None) -> Dict[st
                 return {"exito": False, "error": "No se pudo conectar a Azure Blob Storage"}
 
             container_client = client.get_container_client(CONTAINER_NAME)
-            blobs = container_client.list_blobs()
-
-            for blob in blobs:
-                if blob.name.endswith(('.py', '.js', '.ts', '.json', '.md', '.txt')):
-                    all_results["total_files"] += 1
-                    try:
-                        blob_client = container_client.get_blob_client(
-                            blob.name)
-                        content = blob_client.download_blob().readall().decode('utf-8')
-
-                        # Buscar patrón en contenido
-                        if pattern and re.search(pattern, content, re.IGNORECASE):
-                            matches = find_pattern_matches(
-                                content, pattern, blob.name)
-                            if matches:
-                                all_results["matches"].extend(matches)
-                                all_results["files_with_matches"] += 1
-
-                        all_results["files_analyzed"].append(blob.name)
-
-                    except Exception as e:
-                        logging.warning(
-                            f"Error procesando {blob.name}: {str(e)}")
+            index, fetch = code_search.blob_index(container_client, CONTAINER_NAME, force_refresh=reindex)
         else:
-            # Búsqueda local
-            for file_path in PROJECT_ROOT.rglob('*'):
-                if file_path.is_file() and file_path.suffix in ['.py', '.js', '.ts', '.json', '.md', '.txt']:
-                    all_results["total_files"] += 1
-                    try:
-                        content = file_path.read_text(encoding='utf-8')
-                        relative_path = str(
-                            file_path.relative_to(PROJECT_ROOT))
-
-                        # Buscar patrón en contenido
-                        if pattern and re.search(pattern, content, re.IGNORECASE):
-                            matches = find_pattern_matches(
-                                content, pattern, relative_path)
-                            if matches:
-                                all_results["matches"].extend(matches)
-                                all_results["files_with_matches"] += 1
-
-                        all_results["files_analyzed"].append(relative_path)
-
-                    except Exception as e:
-                        logging.warning(
-                            f"Error procesando {file_path}: {str(e)}")
+            index, fetch = code_search.local_index(PROJECT_ROOT, force_refresh=reindex)
+
+        documents = index.documents()
+        all_results["total_files"] = len(documents)
+        all_results["files_analyzed"] = [doc["name"] for doc in documents if doc["estado"] != "error"]
+
+        if pattern:
+            try:
+                resultado = index.search(pattern, fetch)
+            except re.error as e:
+                return {"exito": False, "error": f"Patrón inválido: {str(e)}", "pattern": pattern}
+
+            for file_name, content in resultado["hits"]:
+                matches = find_pattern_matches(content, pattern, file_name)
+                if matches:
+                    all_results["matches"].extend(matches)
+                    all_results["files_with_matches"] += 1
+
+            all_results["index"] = {
+                "candidatos": resultado["candidates"],
+                "documentos": resultado["documents"],
+                "filtro_ms": resultado.get("filter_ms"),
+                "total_ms": resultado.get("total_ms"),
+                "refresh": index.last_refresh_stats,
+            }
 
     except Exception as e:
         return {"exito": False, "error": f"Error en búsqueda global: {str(e)}"}
@@ -0,0 +1,48 @@
+"""
+Endpoint: perf
+Desglose de latencia del camino caliente: p50/p95/p99 por span, requests
+lentos con su desglose (y pilas muestreadas si el profiler está activo),
+las etapas del wrapper memory_route y el costo del arranque en frío
+(imports por módulo y carga diferida de endpoints), la caché de contenido
+de archivos y los índices de lectura por rango. DELETE reinicia los agregados.
+"""
+import json
+
+import azure.functions as func
+
+from function_app import app
+from lazy_routes import lazy_routes
+from services.code_search_index import code_search
+from services.command_executor import command_executor
+from services.file_content_cache import file_cache
+from services.perf_tracer import perf_tracer
+from services.ranged_reader import ranged_reader
+from services.route_pipeline import route_pipeline
+from services.startup_profiler import startup_profiler
+from services.symbol_index import symbol_index
+
+
+@app.function_name(name="perf")
+@app.route(route="perf", methods=["GET", "DELETE"], auth_level=func.AuthLevel.ANONYMOUS)
+def perf(req: func.HttpRequest) -> func.HttpResponse:
+    if req.method == "DELETE":
+        perf_tracer.reset()
+        return func.HttpResponse(
+            json.dumps({"ok": True, "reset": True}),
+            mimetype="application/json",
+            status_code=200,
+        )
+
+    result = perf_tracer.stats(prefix=req.params.get("prefix"))
+    result["pipeline"] = route_pipeline.stats()["stages"]
+    result["startup"] = {"imports": startup_profiler.report(), "lazy_routes": lazy_routes.stats()}
+    result["file_cache"] = file_cache.stats()
+    result["ranged_reader"] = ranged_reader.stats()
+    result["code_search"] = code_search.stats()
+    result["symbol_index"] = symbol_index.stats()
+    result["command_executor"] = command_executor.stats()
+    return func.HttpResponse(
+        json.dumps(result, indent=2, default=str),
+        mimetype="application/json",
+        status_code=200,
+    )
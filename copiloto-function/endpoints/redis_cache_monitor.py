@@ -93,6 +93,8 @@ def redis_cache_monitor(req: func.HttpRequest) -> func.HttpResponse:
                 "misses": misses,
                 "total_operations": total_ops,
             },
+            "cache_tiers": stats.get("tiers", {}),
+            "single_flight": stats.get("single_flight", {}),
             "sample_keys": {k: v for k, v in sample_keys.items() if v},
             "ttl_samples": ttl_samples,
             "redis_stats": {
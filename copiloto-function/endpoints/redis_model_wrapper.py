@@ -127,14 +127,19 @@ def redis_model_wrapper_http(req: func.HttpRequest) -> func.HttpResponse:
 
         # MISS: invocar modelo
         if not cache_hit:
-            try:
+            def _call_model_and_cache():
                 logging.info(f"[RedisWrapper] 🤖 Calling model: {model}")
                 openai_client = _get_openai_client()
                 completion = openai_client.chat.completions.create(
                     model=model,
                     messages=[{"role": "user", "content": mensaje}],
                 )
-                respuesta_texto = completion.choices[0].message.content
+                payload = {
+                    "respuesta": completion.choices[0].message.content,
+                    "session_id": session_id,
+                    "agent_id": agent_id,
+                    "model": model,
+                }
 
                 if redis_buffer.is_enabled:
                     try:
@@ -143,12 +148,7 @@ def redis_model_wrapper_http(req: func.HttpRequest) -> func.HttpResponse:
                             session_id=session_id,
                             message=mensaje,
                             model=model,
-                            response_data={
-                                "respuesta": respuesta_texto,
-                                "session_id": session_id,
-                                "agent_id": agent_id,
-                                "model": model,
-                            },
+                            response_data=payload,
                             use_global_cache=True,
                         )
                         logging.info(
@@ -156,6 +156,22 @@ def redis_model_wrapper_http(req: func.HttpRequest) -> func.HttpResponse:
                     except Exception as cache_err:
                         logging.error(
                             f"[RedisWrapper] ❌ Cache write error: {cache_err}")
+                return payload
+
+            try:
+                # Misses concurrentes del mismo prompt comparten una sola llamada al modelo
+                global_key = redis_buffer.build_llm_global_key(
+                    agent_id, mensaje, model)
+                resultado, flight_role = redis_buffer.single_flight(
+                    redis_buffer._format_key(bucket, global_key), _call_model_and_cache)
+                respuesta_texto = resultado.get(
+                    "respuesta") if isinstance(resultado, dict) else resultado
+                if flight_role in ("local", "coalesced"):
+                    cache_hit = True
+                    cache_source = flight_role
+                    origen = f"redis_{flight_role}"
+                    logging.info(
+                        f"[RedisWrapper] 🔗 Response coalesced ({flight_role}): session={session_id}")
 
             except Exception as e:
                 logging.error(
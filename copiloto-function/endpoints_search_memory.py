@@ -416,10 +416,8 @@ def indexar_memoria_endpoint(req_body: Dict[str, Any]) -> Dict[str, Any]:
     """
     try:
         from services.azure_search_client import get_search_service
-        from embedding_generator import generar_embedding
-        from services.memory_service import MemoryService
-
-        memory_service = MemoryService()
+        from embedding_generator import generar_embeddings_batch
+        from services.memory_service import memory_service
 
         # Validar payload
         documentos = req_body.get("documentos")
@@ -428,6 +426,7 @@ def indexar_memoria_endpoint(req_body: Dict[str, Any]) -> Dict[str, Any]:
         index_name = req_body.get(
             "index_name") or req_body.get("indice_destino")
 
+        candidatos = []
         documentos_con_vectores = []
         duplicados = 0
         indexados = 0
@@ -448,7 +447,7 @@ def indexar_memoria_endpoint(req_body: Dict[str, Any]) -> Dict[str, Any]:
             texto = doc.get("texto_semantico", "")
 
             try:
-                if memory_service.evento_ya_existe(texto):
+                if not req_body.get("dedup_verificado") and memory_service.es_duplicado_para_indexar(texto):
                     duplicados += 1
                     logging.info(
                         f"⏭️ Duplicado detectado: {doc['id']} — omitido")
@@ -457,7 +456,13 @@ def indexar_memoria_endpoint(req_body: Dict[str, Any]) -> Dict[str, Any]:
                 logging.warning(
                     f"Error verificando duplicado en {doc['id']}: {mem_err} — se continúa")
 
-            vector = generar_embedding(texto)
+            candidatos.append(doc)
+
+        # Un solo batch de embeddings para todos los candidatos (con caché por contenido)
+        vectores = generar_embeddings_batch(
+            [doc.get("texto_semantico", "") for doc in candidatos]) if candidatos else []
+
+        for doc, vector in zip(candidatos, vectores):
             if not vector:
                 logging.warning(
                     f"⚠️ No se pudo generar embedding para {doc['id']}, omitido")
@@ -493,6 +498,9 @@ def indexar_memoria_endpoint(req_body: Dict[str, Any]) -> Dict[str, Any]:
         indexados = len(documentos_con_vectores)
 
         if resultado.get("exito"):
+            for doc in documentos_con_vectores:
+                memory_service.dedup.add(
+                    doc.get("session_id", ""), "", doc.get("texto_semantico", ""))
             logging.info(
                 f"✅ Indexados {indexados} documentos CON EMBEDDINGS en Azure Search")
 
@@ -1,21 +1,29 @@
+# --- Presupuesto de imports del arranque (antes de cualquier import pesado) ---
+from services.startup_profiler import startup_profiler
+startup_profiler.start()
+
 # --- Imports mínimos requeridos ---
 import os
 from typing import cast
 from typing import Optional
-from azure.mgmt.resource.resources.models import (
-    ResourceGroup,
-    Deployment,
-    DeploymentProperties,
-    TemplateLink,
-    DeploymentMode
-)
 from command_fixers.auto_fixers import apply_auto_fixes
 from services.memory_service import memory_service
 from services.redis_buffer_service import redis_buffer
-from azure.monitor.query._models import LogsQueryResult
-from hybrid_processor import process_hybrid_request
-from azure.mgmt.resource import ResourceManagementClient
-from bing_grounding_fallback import ejecutar_bing_grounding_fallback
+from services.file_content_cache import file_cache
+from services.ranged_reader import ranged_reader
+from services.command_executor import PRIORITY_BACKGROUND, command_executor
+from services.symbol_index import symbol_index
+from lazy_imports import (
+    get_web_client,
+    get_storage_client,
+    get_compute_client,
+    get_network_client,
+    get_monitor_client,
+    get_monitor_models,
+    get_resource_client,
+    get_resource_models,
+    mgmt_sdk_available,
+)
 from utils_helpers import (
     is_running_in_azure,
     get_run_id,
@@ -30,6 +38,7 @@ from utils_helpers import (
 from file_summarizer import generar_resumen_archivo
 from semantic_query_builder import interpretar_intencion_agente, construir_query_dinamica, ejecutar_query_cosmos
 from azure.storage.blob import BlobServiceClient
+from azure.core import MatchConditions
 from azure.core.exceptions import AzureError, ResourceNotFoundError, HttpResponseError
 from azure.identity import DefaultAzureCredential, ManagedIdentityCredential, AzureCliCredential
 from azure.cosmos import CosmosClient
@@ -67,7 +76,6 @@ import azure.functions as func
 import json
 from datetime import datetime
 from azure.functions import HttpRequest, HttpResponse
-from thread_enricher import generar_narrativa_contextual
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "services"))
 
@@ -75,6 +83,61 @@ auto_state = os.environ.get("SEMANTIC_AUTOPILOT", "off")
 if auto_state == "on":
     print("[*] Autopilot activado")
 
+# --- Dependencias de uso ocasional: se importan en la primera llamada ---
+
+
+def generar_narrativa_contextual(*args, **kwargs):
+    """Proxy diferido de thread_enricher.generar_narrativa_contextual."""
+    from thread_enricher import generar_narrativa_contextual as _impl
+    return _impl(*args, **kwargs)
+
+
+def ejecutar_bing_grounding_fallback(*args, **kwargs):
+    """Proxy diferido de bing_grounding_fallback.ejecutar_bing_grounding_fallback."""
+    from bing_grounding_fallback import ejecutar_bing_grounding_fallback as _impl
+    return _impl(*args, **kwargs)
+
+
+_LAZY_MGMT_ATTRS = {
+    "WebSiteManagementClient": get_web_client,
+    "StorageManagementClient": get_storage_client,
+    "ComputeManagementClient": get_compute_client,
+    "NetworkManagementClient": get_network_client,
+    "MonitorManagementClient": get_monitor_client,
+    "ResourceManagementClient": get_resource_client,
+    "monitor_models": get_monitor_models,
+    "MGMT_SDK": mgmt_sdk_available,
+}
+
+
+def __getattr__(name: str):
+    """
+    Compatibilidad con `from function_app import MGMT_SDK, WebSiteManagementClient, ...`:
+    los SDK de gestión ya no se importan en el arranque sino al primer acceso.
+    Los handlers movidos a routes/ (`from function_app import status`) se
+    resuelven por el manifiesto.
+    """
+    resolver = _LAZY_MGMT_ATTRS.get(name)
+    if resolver is not None:
+        return resolver()
+    handler = _route_handler(name) if not name.startswith("__") else None
+    if handler is None:
+        raise AttributeError(f"module 'function_app' has no attribute '{name}'")
+    return handler
+
+
+def _route_handler(name: str):
+    """Handler de ruta por nombre de función: definido aquí o declarado en route_manifest.json."""
+    handler = globals().get(name)
+    if handler is not None:
+        return handler
+    try:
+        from lazy_routes import lazy_routes
+    except Exception:
+        return None
+    return lazy_routes.handler(name)
+
+
 # Validation helpers
 
 
@@ -115,16 +178,6 @@ def _resolver_placeholders_dinamico(comando: str, memoria=None) -> str:
     return comando
 
 
-def validate_json_input(req):
-    try:
-        body = req.get_json()
-        if body is None:
-            return None, {"error": "Request body must be valid JSON", "status": 400}
-        return body, None
-    except ValueError as e:
-        return None, {"error": "Invalid JSON format", "details": str(e), "status": 400}
-
-
 def validate_required_params(body, required_fields):
     missing = [field for field in required_fields if not body.get(field)]
     if missing:
@@ -345,103 +398,73 @@ logging.info(f"  Available contexts: {list(AI_CONTEXT_MAP.keys())}")
 logging.info(
     f"Voice config: ENDPOINT={os.environ.get('AZURE_VOICE_LIVE_ENDPOINT')}, DEPLOYMENT={os.environ.get('AZURE_VOICE_LIVE_DEPLOYMENT')}")
 
-# Declaración inicial explícita
-WebSiteManagementClient: Optional[Type] = None
-StorageManagementClient: Optional[Type] = None
-ComputeManagementClient: Optional[Type] = None
-NetworkManagementClient: Optional[Type] = None
-MGMT_SDK: bool = False
+# --- Azure SDK de gestión ---
+# Web/Storage/Compute/Network/Monitor/Resource se resuelven vía lazy_imports en el
+# primer uso (get_web_client(), ...); `__getattr__` mantiene los nombres exportados.
 
-try:
-    from azure.mgmt.web import WebSiteManagementClient as WSClient
-    from azure.mgmt.storage import StorageManagementClient as STClient
-    from azure.mgmt.compute import ComputeManagementClient as CMClient
-    from azure.mgmt.network import NetworkManagementClient as NWClient
-
-    WebSiteManagementClient = WSClient
-    StorageManagementClient = STClient
-    ComputeManagementClient = CMClient
-    NetworkManagementClient = NWClient
-    MGMT_SDK = True
-except ImportError:
-    pass
+APPINSIGHTS_INIT_ASYNC = os.getenv(
+    "APPINSIGHTS_INIT_ASYNC", "1").lower() not in ("0", "false", "no", "off")
 
-# Variables de disponibilidad para compatibilidad con código existente
-STORAGE_AVAILABLE = StorageManagementClient is not None
-WEBAPP_AVAILABLE = WebSiteManagementClient is not None
-COMPUTE_AVAILABLE = ComputeManagementClient is not None
-NETWORK_AVAILABLE = NetworkManagementClient is not None
 
-# --- Azure SDK opcionales (con fallback si aplica en otros handlers) ---
-try:
-    from azure.mgmt.monitor import MonitorManagementClient
-    from azure.mgmt.monitor import models as monitor_models
-    from azure.mgmt.web.models import StringDictionary, SiteConfigResource, CorsSettings, SkuDescription, AppServicePlan
-    if not MGMT_SDK:
-        MGMT_SDK = True
-except ImportError:
-    MonitorManagementClient = None
-    monitor_models = None
-    StringDictionary = None
-    SiteConfigResource = None
-    CorsSettings = None
-    SkuDescription = None
-    AppServicePlan = None
-
-# Log de disponibilidad después de las importaciones
-logging.info(f"MGMT_SDK status: {MGMT_SDK}")
-logging.info(f"STORAGE_AVAILABLE: {STORAGE_AVAILABLE}")
-logging.info(f"WEBAPP_AVAILABLE: {WEBAPP_AVAILABLE}")
-logging.info(f"COMPUTE_AVAILABLE: {COMPUTE_AVAILABLE}")
-logging.info(f"NETWORK_AVAILABLE: {NETWORK_AVAILABLE}")
-
-# Habilitar trazas y métricas de Application Insights (una sola vez en el arranque)
-if not globals().get("_APPINSIGHTS_INITIALIZED", False):
-    try:
-        # Import dinámico para evitar errores si el paquete no está instalado
-        from azure.monitor.opentelemetry import configure_azure_monitor
+def _init_app_insights():
+    """Enlaza OpenTelemetry (azure-monitor) y customEvents (opencensus) a App Insights."""
+    # Habilitar trazas y métricas de Application Insights (una sola vez en el arranque)
+    if not globals().get("_APPINSIGHTS_INITIALIZED", False):
+        try:
+            # Import dinámico para evitar errores si el paquete no está instalado
+            from azure.monitor.opentelemetry import configure_azure_monitor
 
+            conn_str = os.environ.get("APPLICATIONINSIGHTS_CONNECTION_STRING") or os.environ.get(
+                "APPINSIGHTS_INSTRUMENTATIONKEY")
+            if conn_str:
+                try:
+                    configure_azure_monitor(connection_string=conn_str)
+                    logging.info(
+                        "✅ Azure Monitor OpenTelemetry inicializado correctamente.")
+                except Exception as init_err:
+                    logging.error(
+                        f"❌ Error inicializando Azure Monitor: {init_err}")
+            else:
+                logging.warning(
+                    "⚠️ No se encontró cadena de conexión para Application Insights.")
+        except Exception as e:
+            # Si no se puede importar el paquete o ocurre otro fallo, registrar y continuar
+            logging.warning(f"⚠️ No se pudo inicializar Azure Monitor OTel: {e}")
+        finally:
+            # Marcar como inicializado para evitar reintentos posteriores en este proceso
+            globals()["_APPINSIGHTS_INITIALIZED"] = True
+
+    # Enlazar logger de eventos personalizados hacia Application Insights (customEvents)
+    if not globals().get("_CUSTOM_EVENTS_LOGGER_BOUND", False):
         conn_str = os.environ.get("APPLICATIONINSIGHTS_CONNECTION_STRING") or os.environ.get(
             "APPINSIGHTS_INSTRUMENTATIONKEY")
         if conn_str:
             try:
-                configure_azure_monitor(connection_string=conn_str)
+                from opencensus.ext.azure.log_exporter import AzureLogHandler  # type: ignore
+
+                custom_logger = logging.getLogger("appinsights.customEvents")
+                handler = AzureLogHandler(connection_string=conn_str)
+                custom_logger.setLevel(logging.INFO)
+                custom_logger.addHandler(handler)
+                globals()["_CUSTOM_EVENTS_LOGGER_BOUND"] = True
                 logging.info(
-                    "✅ Azure Monitor OpenTelemetry inicializado correctamente.")
-            except Exception as init_err:
-                logging.error(
-                    f"❌ Error inicializando Azure Monitor: {init_err}")
+                    "✅ Logger appinsights.customEvents enlazado a App Insights.")
+            except Exception as e:
+                logging.warning(
+                    f"⚠️ No se pudo enlazar customEvents a App Insights: {e}")
         else:
             logging.warning(
-                "⚠️ No se encontró cadena de conexión para Application Insights.")
-    except Exception as e:
-        # Si no se puede importar el paquete o ocurre otro fallo, registrar y continuar
-        logging.warning(f"⚠️ No se pudo inicializar Azure Monitor OTel: {e}")
-    finally:
-        # Marcar como inicializado para evitar reintentos posteriores en este proceso
-        globals()["_APPINSIGHTS_INITIALIZED"] = True
-
-# Enlazar logger de eventos personalizados hacia Application Insights (customEvents)
-if not globals().get("_CUSTOM_EVENTS_LOGGER_BOUND", False):
-    conn_str = os.environ.get("APPLICATIONINSIGHTS_CONNECTION_STRING") or os.environ.get(
-        "APPINSIGHTS_INSTRUMENTATIONKEY")
-    if conn_str:
-        try:
-            from opencensus.ext.azure.log_exporter import AzureLogHandler  # type: ignore
+                "⚠️ APPLICATIONINSIGHTS_CONNECTION_STRING no configurado; customEvents no se enviará.")
 
-            custom_logger = logging.getLogger("appinsights.customEvents")
-            handler = AzureLogHandler(connection_string=conn_str)
-            custom_logger.setLevel(logging.INFO)
-            custom_logger.addHandler(handler)
-            globals()["_CUSTOM_EVENTS_LOGGER_BOUND"] = True
-            logging.info(
-                "✅ Logger appinsights.customEvents enlazado a App Insights.")
-        except Exception as e:
-            logging.warning(
-                f"⚠️ No se pudo enlazar customEvents a App Insights: {e}")
-    else:
-        logging.warning(
-            "⚠️ APPLICATIONINSIGHTS_CONNECTION_STRING no configurado; customEvents no se enviará.")
+
+# Los exportadores (OpenTelemetry + opencensus) cuestan cientos de ms de import:
+# por defecto se enlazan en segundo plano para no bloquear el indexado del host.
+if APPINSIGHTS_INIT_ASYNC:
+    threading.Thread(target=_init_app_insights,
+                     name="appinsights-init", daemon=True).start()
+else:
+    with startup_profiler.phase("app_insights"):
+        _init_app_insights()
 
 # --- FunctionApp instance (CREAR PRIMERO) ---
 app = func.FunctionApp()
@@ -466,168 +489,12 @@ except Exception as e:
     logging.error(f"❌ WRAPPER FALLÓ: {e}")
     logging.error(f"Traceback: {traceback.format_exc()}")
 
-# --- Registrar endpoints modulares DESPUÉS de crear app y aplicar wrapper ---
-# (Los endpoints se auto-registran al importarse con decoradores @app.route)
-try:
-    import endpoints.msearch
-    logging.info("✅ Endpoint msearch registrado correctamente")
-except ImportError as e:
-    logging.warning(f"⚠️ No se pudo registrar endpoint msearch: {e}")
-except Exception as e:
-    logging.error(f"❌ Error registrando msearch: {e}")
-    logging.error(f"Traceback: {traceback.format_exc()}")
-
-# Endpoints Redis Admin (en endpoints/redis_admin.py)
-try:
-    from endpoints.redis_admin import register_redis_admin_routes
-
-    register_redis_admin_routes(app)
-    logging.info("✅ Endpoints redis-admin registrados correctamente")
-except ImportError as e:
-    logging.warning(f"⚠️ No se pudo registrar redis-admin: {e}")
-except Exception as e:
-    logging.error(f"❌ Error registrando redis-admin: {e}")
-    logging.error(f"Traceback: {traceback.format_exc()}")
-
-try:
-    import endpoints.redis_model_wrapper
-    logging.info("✅ Endpoint redis-model-wrapper registrado correctamente")
-except ImportError as e:
-    logging.warning(f"⚠️ No se pudo registrar redis-model-wrapper: {e}")
-except Exception as e:
-    logging.error(f"❌ Error registrando redis-model-wrapper: {e}")
-    logging.error(f"Traceback: {traceback.format_exc()}")
-
-try:
-    import endpoints.redis_cache_monitor
-    logging.info("✅ Endpoint redis-cache-monitor registrado correctamente")
-except ImportError as e:
-    logging.warning(f"⚠️ No se pudo registrar redis-cache-monitor: {e}")
-except Exception as e:
-    logging.error(f"❌ Error registrando redis-cache-monitor: {e}")
-    logging.error(f"Traceback: {traceback.format_exc()}")
-
-try:
-    import endpoints.redis_cache_health
-    logging.info("✅ Endpoint redis-cache-health registrado correctamente")
-except ImportError as e:
-    logging.warning(f"⚠️ No se pudo registrar redis-cache-health: {e}")
-except Exception as e:
-    logging.error(f"❌ Error registrando redis-cache-health: {e}")
-    logging.error(f"Traceback: {traceback.format_exc()}")
-
-try:
-    import endpoints.guardar_memoria
-    logging.info("✅ Endpoint guardar_memoria registrado correctamente")
-except ImportError as e:
-    logging.warning(f"⚠️ No se pudo registrar endpoint guardar_memoria: {e}")
-except Exception as e:
-    logging.error(f"❌ Error registrando guardar_memoria: {e}")
-    logging.error(f"Traceback: {traceback.format_exc()}")
-
-try:
-    import buscar_interacciones_endpoint
-    logging.info("✅ Endpoint buscar-interacciones registrado correctamente")
-except ImportError as e:
-    logging.warning(
-        f"⚠️ No se pudo registrar endpoint buscar-interacciones: {e}")
-except Exception as e:
-    logging.error(f"❌ Error registrando buscar-interacciones: {e}")
-    logging.error(f"Traceback: {traceback.format_exc()}")
-
-# 🤖 Registro del endpoint de interacción con Foundry con optimización de modelos
-try:
-    from foundry_interaction_endpoint import create_foundry_interaction_endpoint
-    create_foundry_interaction_endpoint(app)
-    logging.info("✅ Endpoint foundry-interaction registrado correctamente")
-except ImportError as e:
-    logging.warning(
-        f"⚠️ No se pudo registrar endpoint foundry-interaction: {e}")
-except Exception as e:
-    logging.error(f"❌ Error registrando foundry-interaction: {e}")
-    logging.error(f"Traceback: {traceback.format_exc()}")
-
-try:
-    import endpoints.sugerencias
-    logging.info("✅ Endpoint sugerencias registrado correctamente")
-except Exception as e:
-    logging.warning(f"⚠️ No se pudo registrar endpoint sugerencias: {e}")
-
-try:
-    import endpoints.contexto_inteligente
-    logging.info("✅ Endpoint contexto-inteligente registrado correctamente")
-except Exception as e:
-    logging.warning(
-        f"⚠️ No se pudo registrar endpoint contexto-inteligente: {e}")
-
-try:
-    import endpoints.memoria_global
-    logging.info("✅ Endpoint memoria-global registrado correctamente")
-except Exception as e:
-    logging.warning(f"⚠️ No se pudo registrar endpoint memoria-global: {e}")
-
-try:
-    import endpoints.diagnostico
-    logging.info("✅ Endpoint diagnostico registrado correctamente")
-except Exception as e:
-    logging.warning(f"⚠️ No se pudo registrar endpoint diagnostico: {e}")
-
-try:
-    import endpoints.diagnostico_recursos
-    logging.info("✅ Endpoint diagnostico_recursos registrado correctamente")
-except Exception as e:
-    logging.warning(
-        f"⚠️ No se pudo registrar endpoint diagnostico_recursos: {e}")
-
-try:
-    import endpoints.escribir_archivo
-    logging.info("✅ Endpoint escribir_archivo registrado correctamente")
-except Exception as e:
-    logging.warning(f"⚠️ No se pudo registrar endpoint escribir_archivo: {e}")
-
-try:
-    import endpoints.leer_archivo
-    logging.info("✅ Endpoint leer_archivo registrado correctamente")
-except Exception as e:
-    logging.warning(f"⚠️ No se pudo registrar endpoint leer_archivo: {e}")
-
-try:
-    import endpoints.eliminar_archivo
-    logging.info("✅ Endpoint eliminar_archivo registrado correctamente")
-except Exception as e:
-    logging.warning(f"⚠️ No se pudo registrar endpoint eliminar_archivo: {e}")
-
-try:
-    import endpoints.crear_contenedor
-    logging.info("✅ Endpoint crear_contenedor registrado correctamente")
-except Exception as e:
-    logging.warning(f"⚠️ No se pudo registrar endpoint crear_contenedor: {e}")
-
-try:
-    import endpoints.introspection
-    logging.info("✅ Endpoint introspection registrado correctamente")
-except Exception as e:
-    logging.warning(f"⚠️ No se pudo registrar endpoint introspection: {e}")
-
-try:
-    import endpoints.agent_output
-    logging.info("✅ Endpoint agent_output registrado correctamente")
-except Exception as e:
-    logging.warning(f"⚠️ No se pudo registrar endpoint agent_output: {e}")
-
 try:
     import endpoints.ejecutar_cli
     logging.info("✅ Endpoint ejecutar_cli registrado correctamente")
 except Exception as e:
     logging.warning(f"⚠️ No se pudo registrar endpoint ejecutar_cli: {e}")
 
-# --- Cerebro Semántico Autónomo ---
-try:
-    from services.semantic_runtime import start_semantic_loop
-except Exception as e:
-    start_semantic_loop = None
-    logging.warning(f"⚠️ No se pudo importar start_semantic_loop: {e}")
-
 # --- Configuración de Storage ---
 STORAGE_CONNECTION_STRING = os.getenv("AzureWebJobsStorage", "")
 
@@ -647,9 +514,10 @@ logging.info(
 
 
 def _boot_semantic_loop():
-    """Arranca el cerebro semántico respetando la configuración y aplicando retardo."""
-    if not start_semantic_loop or not callable(start_semantic_loop):
-        return
+    """
+    Arranca el cerebro semántico respetando la configuración y aplicando retardo.
+    services.semantic_runtime se importa dentro del thread, fuera del arranque en frío.
+    """
     if SEMANTIC_AUTOPILOT == "off":
         logging.info(
             "🧠 Semantic autopilot desactivado por configuración; no se inicia loop.")
@@ -659,6 +527,12 @@ def _boot_semantic_loop():
         try:
             if SEMANTIC_LOOP_DELAY_SEC > 0:
                 time.sleep(SEMANTIC_LOOP_DELAY_SEC)
+            # --- Cerebro Semántico Autónomo ---
+            try:
+                from services.semantic_runtime import start_semantic_loop
+            except Exception as e:
+                logging.warning(f"⚠️ No se pudo importar start_semantic_loop: {e}")
+                return
             if callable(start_semantic_loop):
                 start_semantic_loop()
                 logging.info(
@@ -672,14 +546,6 @@ def _boot_semantic_loop():
 _boot_semantic_loop()
 
 
-def _json_body(req):
-    try:
-        b = req.get_json()
-        return b if isinstance(b, dict) else {}
-    except Exception:
-        return {}
-
-
 def _s(x):
     return x.strip() if isinstance(x, str) else ("" if x is None else str(x))
 
@@ -730,68 +596,14 @@ def _try_default_credential():
 
 
 # ---- Descubrimiento de endpoints para /api/status ----
-_EXPECTED_ENDPOINTS = {
-    "/api/health", "/api/status", "/api/copiloto",
-    "/api/hybrid", "/api/ejecutar", "/api/ejecutar-script", "/api/preparar-script", "/api/ejecutar-cli",
-    "/api/deploy", "/api/crear-contenedor",
-    "/api/escribir-archivo", "/api/leer-archivo", "/api/modificar-archivo", "/api/eliminar-archivo",
-    "/api/mover-archivo", "/api/copiar-archivo", "/api/info-archivo", "/api/descargar-archivo", "/api/listar-blobs",
-    "/api/configurar-cors", "/api/configurar-app-settings", "/api/escalar-plan",
-    "/api/auditar-deploy", "/api/diagnostico-recursos", "/api/diagnostico-recursos-completo",
-    "/api/diagnostico-configurar", "/api/diagnostico-listar", "/api/diagnostico-eliminar",
-    "/api/bateria-endpoints", "/api/render-error",
-}
-
-
-def _fn_to_route(name: str):
-    """Convierte <snake>_http -> /api/<kebab>."""
-    if not name.endswith("_http"):
-        return None
-    stem = name[:-5]                # quita '_http'
-    kebab = stem.replace("_", "-")
-    return f"/api/{kebab}"
-
-
 def _discover_endpoints():
-    routes = set()
-
-    # Usar app.get_functions() para obtener la lista real de funciones registradas
+    """Rutas declaradas en route_manifest.json (no requiere importar los módulos)."""
     try:
-        for func_obj in app.get_functions():
-            func_name = getattr(func_obj, 'name', None)
-            if func_name:
-                # Extraer rutas de los decoradores @app.route
-                bindings = getattr(func_obj, 'get_bindings', lambda: [])()
-                for binding in bindings:
-                    if hasattr(binding, 'route') and binding.route:
-                        route = binding.route
-                        if not route.startswith('/'):
-                            route = '/' + route
-                        if not route.startswith('/api/'):
-                            route = '/api' + route
-                        routes.add(route)
-
-                # Fallback: convertir nombre de función a ruta
-                if func_name.endswith('_http'):
-                    r = _fn_to_route(func_name)
-                    if r:
-                        routes.add(r)
-                else:
-                    # Para funciones sin sufijo _http (timers, etc.), inferir ruta
-                    kebab = func_name.replace("_", "-")
-                    routes.add(f"/api/{kebab}")
+        from lazy_routes import lazy_routes
+        return lazy_routes.endpoints()
     except Exception as e:
-        logging.warning(
-            f"Error descubriendo endpoints desde app.get_functions(): {e}")
-        # Fallback a método original si hay error
-        for n, obj in globals().items():
-            if callable(obj) and n.endswith("_http"):
-                r = _fn_to_route(n)
-                if r:
-                    routes.add(r)
-        routes |= _EXPECTED_ENDPOINTS
-
-    return sorted(list(routes))
+        logging.warning(f"Error leyendo endpoints del manifiesto de rutas: {e}")
+        return []
 
 
 # Función para configurar diagnósticos de Azure Monitor
@@ -829,7 +641,8 @@ def _subscription_id() -> str:
 
 
 def _web_client():  # type: ignore
-    if not MGMT_SDK or WebSiteManagementClient is None:
+    WebSiteManagementClient = get_web_client()
+    if WebSiteManagementClient is None:
         raise RuntimeError("SDK Web no disponible (azure-mgmt-web)")
     sub_id = _subscription_id()
     if not sub_id:
@@ -839,7 +652,8 @@ def _web_client():  # type: ignore
 
 
 def _monitor_client():  # type: ignore
-    if not MGMT_SDK or MonitorManagementClient is None or monitor_models is None:
+    MonitorManagementClient = get_monitor_client()
+    if MonitorManagementClient is None or get_monitor_models() is None:
         raise RuntimeError("SDK Monitor no disponible (azure-mgmt-monitor)")
     sub_id = _subscription_id()
     if not sub_id:
@@ -849,7 +663,8 @@ def _monitor_client():  # type: ignore
 
 
 def _resource_client():  # type: ignore
-    if not MGMT_SDK or ResourceManagementClient is None:
+    ResourceManagementClient = get_resource_client()
+    if ResourceManagementClient is None:
         raise RuntimeError("SDK Resource no disponible (azure-mgmt-resource)")
     sub_id = _subscription_id()
     if not sub_id:
@@ -1108,13 +923,6 @@ def set_app_settings_rest(resource_group: str, app_name: str, kv: dict) -> dict:
         }
 
 
-def configurar_diagnosticos_azure(resource_id: str, workspace_id: str, setting_name: str = "default", logs: Optional[list] = None, metrics: Optional[list] = None) -> dict:
-    """Configura diagnósticos de Azure Monitor usando REST API"""
-    if not resource_id or not workspace_id:
-        return {"ok": False, "error": "resource_id y workspace_id son requeridos"}
-    return rest_set_diagnostics(resource_id, workspace_id, setting_name)
-
-
 def process_hybrid_request(*args, **kwargs):
     return {"exito": False, "error": "hybrid_processor no disponible"}
 
@@ -1208,8 +1016,12 @@ else:
     COPILOT_ROOT = Path(
         "C:/ProyectosSimbolicos/boat-rental-app/copiloto-function")
 
-# Cache y clientes
-CACHE = {}
+# Líneas que devuelve una lectura sin rango de un archivo extenso (ver leer_archivo_rango)
+LEER_ARCHIVO_LINEAS_VENTANA = int(os.getenv("LEER_ARCHIVO_LINEAS_VENTANA", "500"))
+
+# Cache y clientes: contenido de archivos acotado por bytes y validado por
+# ETag/mtime (CACHE se mantiene como alias para los diagnósticos)
+CACHE = file_cache
 
 # Capacidades semánticas
 SEMANTIC_CAPABILITIES = {
@@ -1288,8 +1100,51 @@ def get_blob_client():
         return None
 
 
+def _rutas_candidatas_blob(ruta: str):
+    """Ruta normalizada y lista de nombres de blob a probar para `ruta`."""
+    clean_path = ruta.replace('\\', '/').lstrip('/')
+
+    # Remover prefijos redundantes del contenedor
+    if clean_path.startswith(f"{CONTAINER_NAME}/"):
+        clean_path = clean_path[len(CONTAINER_NAME)+1:]
+    elif clean_path.startswith("boat-rental-project/"):
+        clean_path = clean_path[len("boat-rental-project")+1:]
+
+    # Lista de rutas a probar (sin duplicados)
+    rutas_candidatas = [
+        clean_path,
+        clean_path.lstrip('/'),
+        ruta.replace('\\', '/').lstrip('/'),
+    ]
+    return clean_path, list(dict.fromkeys(rutas_candidatas))
+
+
+def _blob_read_result(blob_name: str, downloader) -> dict:
+    """Resultado de leer_archivo_blob a partir de un StorageStreamDownloader."""
+    contenido = downloader.readall().decode('utf-8')
+    props = downloader.properties
+    return {
+        "exito": True,
+        "contenido": contenido,
+        "ruta": f"blob://{CONTAINER_NAME}/{blob_name}",
+        "tamaño": len(contenido),
+        "fuente": "Azure Blob Storage",
+        "metadata": {
+            "last_modified": str(props.last_modified),
+            "content_type": props.content_settings.content_type,
+            "etag": props.etag,
+            "ruta_encontrada": blob_name
+        }
+    }
+
+
 def leer_archivo_blob(ruta: str) -> dict:
-    """Lee un archivo desde Azure Blob Storage con búsqueda robusta"""
+    """
+    Lee un archivo desde Azure Blob Storage con búsqueda robusta.
+    Con entrada en file_cache, una sola petición: GET condicional por ETag
+    (304 -> contenido cacheado). Sin ella, un GET por ruta candidata (el 404
+    reemplaza a exists() y las propiedades vienen en la misma descarga).
+    """
     try:
         client = get_blob_client()
         if not client:
@@ -1300,47 +1155,38 @@ def leer_archivo_blob(ruta: str) -> dict:
             }
 
         container_client = client.get_container_client(CONTAINER_NAME)
+        cache_key = f"blob:{ruta}"
 
-        # Normalizar y generar múltiples rutas candidatas
-        clean_path = ruta.replace('\\', '/').lstrip('/')
-
-        # Remover prefijos redundantes del contenedor
-        if clean_path.startswith(f"{CONTAINER_NAME}/"):
-            clean_path = clean_path[len(CONTAINER_NAME)+1:]
-        elif clean_path.startswith("boat-rental-project/"):
-            clean_path = clean_path[len("boat-rental-project")+1:]
-
-        # Lista de rutas a probar
-        rutas_candidatas = [
-            clean_path,
-            clean_path.lstrip('/'),
-            ruta.replace('\\', '/').lstrip('/'),
-        ]
+        cached = file_cache.get(cache_key)
+        if cached is not None:
+            if file_cache.fresh(cached):
+                return file_cache.hit(cached)
+            blob_client = container_client.get_blob_client(cached.source)
+            try:
+                downloader = blob_client.download_blob(
+                    etag=cached.etag, match_condition=MatchConditions.IfModified)
+                resultado = _blob_read_result(cached.source, downloader)
+                file_cache.put(cache_key, resultado, cached.source,
+                               etag=downloader.properties.etag)
+                return resultado
+            except HttpResponseError as e:
+                if e.status_code == 304:
+                    return file_cache.hit(cached, revalidated=True)
+                # 404 u otro error: descartar y buscar de nuevo
+                file_cache.discard(cache_key)
+            except Exception:
+                file_cache.discard(cache_key)
 
-        # Remover duplicados
-        rutas_candidatas = list(dict.fromkeys(rutas_candidatas))
+        clean_path, rutas_candidatas = _rutas_candidatas_blob(ruta)
 
         for ruta_candidata in rutas_candidatas:
             try:
                 blob_client = container_client.get_blob_client(ruta_candidata)
-
-                if blob_client.exists():
-                    # Descargar el contenido
-                    download_stream = blob_client.download_blob()
-                    contenido = download_stream.readall().decode('utf-8')
-
-                    return {
-                        "exito": True,
-                        "contenido": contenido,
-                        "ruta": f"blob://{CONTAINER_NAME}/{ruta_candidata}",
-                        "tamaño": len(contenido),
-                        "fuente": "Azure Blob Storage",
-                        "metadata": {
-                            "last_modified": str(blob_client.get_blob_properties().last_modified),
-                            "content_type": blob_client.get_blob_properties().content_settings.content_type,
-                            "ruta_encontrada": ruta_candidata
-                        }
-                    }
+                downloader = blob_client.download_blob()
+                resultado = _blob_read_result(ruta_candidata, downloader)
+                file_cache.put(cache_key, resultado, ruta_candidata,
+                               etag=downloader.properties.etag)
+                return resultado
             except Exception:
                 continue
 
@@ -1371,29 +1217,39 @@ def leer_archivo_blob(ruta: str) -> dict:
 
 
 def leer_archivo_local(ruta: str) -> dict:
-    """Lee un archivo del sistema local"""
+    """Lee un archivo del sistema local (revalida la caché por mtime y tamaño)"""
     posibles_rutas = [
         PROJECT_ROOT / ruta,
         COPILOT_ROOT / ruta if 'COPILOT_ROOT' in globals() else None,
         Path(ruta) if Path(ruta).is_absolute() else None
     ]
+    cache_key = f"local:{ruta}"
+    cached = file_cache.get(cache_key)
 
     for ruta_completa in filter(None, posibles_rutas):
-        if ruta_completa and ruta_completa.exists():
-            try:
-                contenido = ruta_completa.read_text(encoding='utf-8')
-                return {
-                    "exito": True,
-                    "contenido": contenido,
-                    "ruta": str(ruta_completa),
-                    "tamaño": len(contenido),
-                    "fuente": "Sistema Local",
-                    "metadata": {
-                        "last_modified": datetime.fromtimestamp(ruta_completa.stat().st_mtime).isoformat()
-                    }
-                }
-            except Exception as e:
-                continue
+        try:
+            st = ruta_completa.stat()
+        except OSError:
+            continue
+        firma = (st.st_mtime_ns, st.st_size)
+        if cached is not None and cached.source == str(ruta_completa) and cached.stat == firma:
+            return file_cache.hit(cached, revalidated=True)
+        try:
+            contenido = ruta_completa.read_text(encoding='utf-8')
+        except Exception as e:
+            continue
+        resultado = {
+            "exito": True,
+            "contenido": contenido,
+            "ruta": str(ruta_completa),
+            "tamaño": len(contenido),
+            "fuente": "Sistema Local",
+            "metadata": {
+                "last_modified": datetime.fromtimestamp(st.st_mtime).isoformat()
+            }
+        }
+        file_cache.put(cache_key, resultado, str(ruta_completa), stat=firma)
+        return resultado
 
     return {
         "exito": False,
@@ -1402,14 +1258,63 @@ def leer_archivo_local(ruta: str) -> dict:
     }
 
 
-def leer_archivo_dinamico(ruta: str) -> dict:
-    """Lee un archivo de forma dinámica con prioridad correcta"""
-    # Cache
-    if ruta in CACHE:
-        return CACHE[ruta]
+def leer_archivo_rango(ruta: str, linea_inicio: Optional[int] = None, linea_fin: Optional[int] = None,
+                       byte_inicio: Optional[int] = None, byte_fin: Optional[int] = None) -> dict:
+    """
+    Lee solo un rango de líneas (1-based, inclusivo) o de bytes de un archivo
+    (Blob en Azure, disco en local) sin descargarlo completo; ver
+    services/ranged_reader. El resultado lleva `parcial: True`.
+    """
+    rango = {"linea_inicio": linea_inicio, "linea_fin": linea_fin,
+             "byte_inicio": byte_inicio, "byte_fin": byte_fin}
+    intentos = []
+    try:
+        if IS_AZURE:
+            client = get_blob_client()
+            if not client:
+                return {"exito": False, "error": "Blob Storage no configurado correctamente"}
+            container_client = client.get_container_client(CONTAINER_NAME)
+            for ruta_candidata in _rutas_candidatas_blob(ruta)[1]:
+                intentos.append(f"blob:{ruta_candidata}")
+                try:
+                    parte = ranged_reader.read_blob(
+                        container_client.get_blob_client(ruta_candidata), **rango)
+                except ResourceNotFoundError:
+                    continue
+                return {"exito": True, "parcial": True,
+                        "ruta": f"blob://{CONTAINER_NAME}/{ruta_candidata}",
+                        "fuente": "Azure Blob Storage", **parte}
+        else:
+            posibles_rutas = [PROJECT_ROOT / ruta, Path(ruta) if Path(ruta).is_absolute() else None]
+            if 'COPILOT_ROOT' in globals():
+                posibles_rutas.insert(1, COPILOT_ROOT / ruta)
+            for ruta_completa in filter(None, posibles_rutas):
+                intentos.append(f"local:{ruta_completa}")
+                if ruta_completa.is_file():
+                    parte = ranged_reader.read_local(ruta_completa, **rango)
+                    return {"exito": True, "parcial": True, "ruta": str(ruta_completa),
+                            "fuente": "Sistema Local", **parte}
+    except Exception as e:
+        return {
+            "exito": False,
+            "error": f"Error leyendo rango de {ruta}: {str(e)}",
+            "tipo_error": type(e).__name__,
+            "rango_solicitado": rango
+        }
+
+    return {
+        "exito": False,
+        "error": f"Archivo no encontrado: {ruta}",
+        "rutas_intentadas": intentos,
+        "rango_solicitado": rango
+    }
+
 
+def leer_archivo_dinamico(ruta: str) -> dict:
+    """Lee un archivo de forma dinámica con prioridad correcta (caché en file_cache)"""
     # Regla explícita: si piden function_app.py en Azure y el blob es muy grande,
-    # devolver sugerencia de usar /api/ejecutar-cli en lugar de intentar leer completo.
+    # devolver solo la primera ventana de líneas (lectura por rango) e indicar
+    # cómo pedir las siguientes con linea_inicio/linea_fin.
     try:
         if ruta and ruta.lower().endswith("function_app.py") and IS_AZURE:
             try:
@@ -1420,32 +1325,23 @@ def leer_archivo_dinamico(ruta: str) -> dict:
                     candidates = [ruta, Path(ruta).name]
                     for candidate in candidates:
                         try:
-                            bc = cc.get_blob_client(candidate)
-                            if bc.exists():
-                                props = bc.get_blob_properties()
-                                size = getattr(props, "size", None) or getattr(
-                                    props, "content_length", None)
-                                try:
-                                    size_int = int(
-                                        size) if size is not None else None
-                                except Exception:
-                                    size_int = None
-                                # Umbral ~ 500 líneas -> ~40000 bytes
-                                if size_int and size_int > 40000:
-                                    return {
-                                        "exito": False,
-                                        "error": "Archivo demasiado extenso para /api/leer-archivo. Usa /api/ejecutar-cli.",
-                                        "endpoint_sugerido": "ejecutar-cli",
-                                        "sugerencias": [
-                                            "Usar /api/ejecutar-cli para ejecutar comandos sobre el archivo (p.ej. grep/head).",
-                                            "Ejemplo: POST /api/ejecutar-cli {\"comando\": \"grep -n 'def ' function_app.py | head -n 50\"}"
-                                        ],
-                                        "blob_path_checked": f"{CONTAINER_NAME}/{candidate}",
-                                        "size_bytes": size_int
-                                    }
+                            size_int = int(cc.get_blob_client(candidate).get_blob_properties().size)
                         except Exception:
-                            # No detener la ejecución por errores puntuales de metadata
+                            # 404 o error puntual de metadata: probar la siguiente
                             continue
+                        # Umbral ~ 500 líneas -> ~40000 bytes
+                        if size_int > 40000:
+                            ventana = leer_archivo_rango(
+                                candidate, linea_inicio=1, linea_fin=LEER_ARCHIVO_LINEAS_VENTANA)
+                            if ventana.get("exito"):
+                                ventana["sugerencias"] = [
+                                    "Archivo extenso: se devuelve solo la primera ventana de líneas.",
+                                    "Pedir más con GET /api/leer-archivo?ruta=function_app.py"
+                                    "&linea_inicio=N&linea_fin=M (o byte_inicio/byte_fin)."
+                                ]
+                                ventana["size_bytes"] = size_int
+                                return ventana
+                        break
             except Exception:
                 # Si falla la comprobación de blob metadata, seguir con el flujo normal
                 pass
@@ -1454,18 +1350,11 @@ def leer_archivo_dinamico(ruta: str) -> dict:
 
     # En Azure, intentar Blob primero
     if IS_AZURE:
-        resultado = leer_archivo_blob(ruta)
-        if resultado["exito"]:
-            CACHE[ruta] = resultado
-            return resultado
-        # Si falla, incluir información de debug
-        return resultado
+        # Si falla, el resultado incluye información de debug
+        return leer_archivo_blob(ruta)
     else:
         # En local, usar sistema de archivos
-        resultado = leer_archivo_local(ruta)
-        if resultado["exito"]:
-            CACHE[ruta] = resultado
-        return resultado
+        return leer_archivo_local(ruta)
 
 
 def explorar_directorio_blob(prefijo: str = "") -> list:
@@ -1585,170 +1474,36 @@ def generar_sugerencias_busqueda(intencion: dict, archivos: list) -> list:
     return sugerencias
 
 
-def _extraer_patron_archivo_desde_consulta(consulta: str) -> Optional[str]:
-    """Detecta un posible nombre de archivo dentro de la consulta."""
-    if not consulta:
-        return None
-    patron = re.compile(r"[a-zA-Z0-9_./\\-]+\.[a-zA-Z0-9_]{1,12}")
-    matches = patron.findall(consulta)
-    for match in matches:
-        cleaned = match.strip().strip("'\"")
-        if cleaned and not cleaned.lower().startswith(("que", "como")):
-            return cleaned
-    return None
-
-
-def _construir_comando_busqueda_archivo_cli(patron_archivo: str) -> str:
-    """Crea un comando Python cross-platform que lista coincidencias para el archivo."""
-    sanitized = (patron_archivo or "").strip().strip("'\"")
-    if not sanitized:
-        sanitized = ".*"
-    term_literal = json.dumps(sanitized)
-    root_literal = json.dumps(str(PROJECT_ROOT))
-    comando = (
-        "python -c \"import pathlib; term = {term}; term = term.lower(); "
-        "root = pathlib.Path({root}); "
-        "matches = [str(p) for p in root.rglob('*') if p.is_file() and term in p.name.lower()]; "
-        "print('\\\\n'.join(matches) if matches else 'NO_MATCH::' + term)\""
-    ).format(term=term_literal, root=root_literal)
-    return comando
-
-
-def _relativizar_ruta_detectada(ruta: str) -> Optional[str]:
-    """Normaliza rutas retornadas por CLI a rutas relativas del proyecto."""
-    if not ruta:
-        return None
-    ruta_limpia = ruta.strip().strip("'\"")
-    if not ruta_limpia or ruta_limpia.startswith("NO_MATCH"):
-        return None
-    ruta_limpia = ruta_limpia.replace("\\", "/")
-
-    try:
-        candidate = Path(ruta_limpia)
-        if candidate.is_absolute():
-            try:
-                return str(candidate.relative_to(PROJECT_ROOT)).replace("\\", "/")
-            except ValueError:
-                if "copiloto-function" in candidate.parts:
-                    idx = candidate.parts.index("copiloto-function")
-                    rel = Path(*candidate.parts[idx:])
-                    return str(rel).replace("\\", "/")
-                return str(candidate).replace("\\", "/")
-        resolved = (PROJECT_ROOT / candidate).resolve()
-        if resolved.exists():
-            return str(resolved.relative_to(PROJECT_ROOT)).replace("\\", "/")
-    except Exception:
-        pass
+def generar_test(contexto: dict) -> dict:
+    """Genera un archivo de prueba básico basado en el contexto"""
+    nombre_archivo = contexto.get("target", "test_sample.py")
+    contenido_test = f"""import unittest
 
-    return ruta_limpia
+class TestSample(unittest.TestCase):
+    def test_example(self):
+        self.assertEqual(1 + 1, 2)
 
+if __name__ == "__main__":
+    unittest.main()
+"""
+    return {
+        "exito": True,
+        "contenido": contenido_test,
+        "tipo": "test",
+        "metadata": {
+            "nombre_archivo": nombre_archivo,
+            "fecha_generacion": datetime.now().isoformat()
+        }
+    }
 
-def _normalizar_rutas_cli(resultado_cli: Dict[str, Any]) -> List[str]:
-    """Extrae rutas limpias del resultado devuelto por /api/ejecutar-cli."""
-    bruto = resultado_cli.get("resultado")
-    lineas: List[str] = []
-    if isinstance(bruto, list):
-        lineas = [str(item) for item in bruto]
-    elif isinstance(bruto, str):
-        lineas = bruto.splitlines()
 
-    rutas: List[str] = []
-    for linea in lineas:
-        linea = linea.strip()
-        if not linea or linea.startswith("? Perfil"):
-            continue
-        ruta_rel = _relativizar_ruta_detectada(linea)
-        if ruta_rel and ruta_rel not in rutas:
-            rutas.append(ruta_rel)
-    return rutas
+def generar_script(contexto: dict) -> dict:
+    """Genera un script básico basado en el contexto"""
+    nombre_archivo = contexto.get("target", "script_sample.py")
+    contenido_script = f"""#!/usr/bin/env python3
 
-
-def ejecutar_busqueda_cli_y_leer_archivo(consulta: str, session_id: Optional[str] = None, patron_preferido: Optional[str] = None) -> Dict[str, Any]:
-    """
-    Ejecuta un flujo CLI -> lectura:
-    1. Usa /api/ejecutar-cli para buscar el archivo.
-    2. Lee el archivo con /api/leer-archivo cuando la ruta está confirmada.
-    """
-    patron = patron_preferido or _extraer_patron_archivo_desde_consulta(
-        consulta)
-    if not patron:
-        patron = consulta.strip()
-
-    if not patron:
-        return {
-            "exito": False,
-            "flujo": "cli_search_then_read",
-            "error": "No se pudo extraer un patrón de archivo desde la consulta."
-        }
-
-    comando_cli = _construir_comando_busqueda_archivo_cli(patron)
-    payload_cli = {"comando": comando_cli}
-    if session_id:
-        payload_cli["session_id"] = session_id
-
-    cli_resultado = invocar_endpoint_directo_seguro(
-        "/api/ejecutar-cli",
-        method="POST",
-        body=payload_cli
-    )
-
-    rutas_encontradas = _normalizar_rutas_cli(cli_resultado)
-    if not rutas_encontradas:
-        return {
-            "exito": False,
-            "flujo": "cli_search_then_read",
-            "error": "La búsqueda CLI no devolvió rutas.",
-            "patron_busqueda": patron,
-            "busqueda": cli_resultado
-        }
-
-    ruta_objetivo = rutas_encontradas[0]
-    lectura = invocar_endpoint_directo_seguro(
-        "/api/leer-archivo",
-        method="GET",
-        params={"ruta": ruta_objetivo}
-    )
-
-    return {
-        "exito": lectura.get("exito", False),
-        "flujo": "cli_search_then_read",
-        "archivo_detectado": ruta_objetivo,
-        "todas_rutas_detectadas": rutas_encontradas,
-        "busqueda": cli_resultado,
-        "lectura": lectura
-    }
-
-
-def generar_test(contexto: dict) -> dict:
-    """Genera un archivo de prueba básico basado en el contexto"""
-    nombre_archivo = contexto.get("target", "test_sample.py")
-    contenido_test = f"""import unittest
-
-class TestSample(unittest.TestCase):
-    def test_example(self):
-        self.assertEqual(1 + 1, 2)
-
-if __name__ == "__main__":
-    unittest.main()
-"""
-    return {
-        "exito": True,
-        "contenido": contenido_test,
-        "tipo": "test",
-        "metadata": {
-            "nombre_archivo": nombre_archivo,
-            "fecha_generacion": datetime.now().isoformat()
-        }
-    }
-
-
-def generar_script(contexto: dict) -> dict:
-    """Genera un script básico basado en el contexto"""
-    nombre_archivo = contexto.get("target", "script_sample.py")
-    contenido_script = f"""#!/usr/bin/env python3
-
-def main():
-    print("Script generado automáticamente por Copiloto AI.")
+def main():
+    print("Script generado automáticamente por Copiloto AI.")
 
 if __name__ == "__main__":
     main()
@@ -1889,13 +1644,22 @@ def analizar_codigo_semantico(ruta: str) -> dict:
 
     # Análisis específico por tipo
     if ruta.endswith('.py'):
-        # Análisis Python
-        analisis["estructura"]["imports"] = len(
-            re.findall(r'^import |^from ', contenido, re.MULTILINE))
-        analisis["estructura"]["funciones"] = len(
-            re.findall(r'^def ', contenido, re.MULTILINE))
-        analisis["estructura"]["clases"] = len(
-            re.findall(r'^class ', contenido, re.MULTILINE))
+        # Análisis Python: conteos de nivel de módulo desde el índice de
+        # símbolos (cacheado por hash de contenido)
+        simbolos = symbol_index.analyze(contenido)
+        if not simbolos["parse_errors"]:
+            analisis["estructura"]["imports"] = simbolos["toplevel"]["imports"]
+            analisis["estructura"]["funciones"] = simbolos["toplevel"]["functions"]
+            analisis["estructura"]["clases"] = simbolos["toplevel"]["classes"]
+        else:
+            analisis["estructura"]["imports"] = len(
+                re.findall(r'^import |^from ', contenido, re.MULTILINE))
+            analisis["estructura"]["funciones"] = len(
+                re.findall(r'^def ', contenido, re.MULTILINE))
+            analisis["estructura"]["clases"] = len(
+                re.findall(r'^class ', contenido, re.MULTILINE))
+            analisis["sugerencias"].append(
+                f"Error de sintaxis en línea {simbolos['parse_errors'][0]['line']}")
 
         if "# TODO" in contenido or "# FIXME" in contenido:
             analisis["sugerencias"].append(
@@ -2304,11 +2068,11 @@ def procesar_intencion_semantica(intencion: str, parametros: Optional[Dict[str,
                 cmd_parts.extend(["--output", "json"])
 
             try:
-                resultado = subprocess.run(
+                resultado = command_executor.run(
                     cmd_parts,
-                    capture_output=True,
-                    text=True,
-                    timeout=30
+                    timeout=30,
+                    env=_az_env(),
+                    coalesce=_az_es_lectura(cmd_parts)
                 )
 
                 output = resultado.stdout
@@ -2752,27 +2516,21 @@ def invocar_endpoint_local(endpoint: str, method: str = "GET", body: Optional[di
     Invoca directamente un endpoint interno de la Function App
     """
     try:
-        # Mapear endpoints a funciones
-        from endpoints.diagnostico_recursos import diagnostico_recursos_http
-        from endpoints.escribir_archivo import escribir_archivo_http
-        from endpoints.crear_contenedor import crear_contenedor_http
-        from endpoints.eliminar_archivo import eliminar_archivo_http
-        from endpoints.leer_archivo import leer_archivo_http
-        from endpoints.ejecutar_cli import ejecutar_cli_http
+        # Mapear endpoints a funciones (se resuelven por el manifiesto al invocarse)
         endpoint_map = {
-            "/api/status": status,
-            "/api/health": health,
-            "/api/diagnostico-recursos": diagnostico_recursos_http,
-            "/api/escribir-archivo": escribir_archivo_http,
-            "/api/leer-archivo": leer_archivo_http,
-            "/api/modificar-archivo": modificar_archivo_http,
-            "/api/eliminar-archivo": eliminar_archivo_http,
-            "/api/mover-archivo": mover_archivo_http,
-            "/api/copiar-archivo": copiar_archivo_http,
-            "/api/descargar-archivo": descargar_archivo_http,
-            "/api/ejecutar-script": ejecutar_script_http,
-            "/api/crear-contenedor": crear_contenedor_http,
-            "/api/ejecutar-cli": ejecutar_cli_http
+            "/api/status": "status",
+            "/api/health": "health",
+            "/api/diagnostico-recursos": "diagnostico_recursos_http",
+            "/api/escribir-archivo": "escribir_archivo_http",
+            "/api/leer-archivo": "leer_archivo_http",
+            "/api/modificar-archivo": "modificar_archivo_http",
+            "/api/eliminar-archivo": "eliminar_archivo_http",
+            "/api/mover-archivo": "mover_archivo_http",
+            "/api/copiar-archivo": "copiar_archivo_http",
+            "/api/descargar-archivo": "descargar_archivo_http",
+            "/api/ejecutar-script": "ejecutar_script_http",
+            "/api/crear-contenedor": "crear_contenedor_http",
+            "/api/ejecutar-cli": "ejecutar_cli_http"
         }
 
         if endpoint not in endpoint_map:
@@ -2801,7 +2559,12 @@ def invocar_endpoint_local(endpoint: str, method: str = "GET", body: Optional[di
             )
 
         # Invocar función
-        function = endpoint_map[endpoint]
+        function = _route_handler(endpoint_map[endpoint])
+        if function is None:
+            return {
+                "exito": False,
+                "error": f"Handler no disponible para {endpoint}: {endpoint_map[endpoint]}",
+            }
         response = function(req_mock)
 
         # Parsear respuesta
@@ -2836,11 +2599,11 @@ def ejecutar_comando_azure(comando: str, formato: str = "json") -> dict:
         if formato and "--output" not in comando:
             cmd_parts.extend(["--output", formato])
 
-        resultado = subprocess.run(
+        resultado = command_executor.run(
             cmd_parts,
-            capture_output=True,
-            text=True,
-            timeout=30
+            timeout=30,
+            env=_az_env(),
+            coalesce=_az_es_lectura(cmd_parts)
         )
 
         if resultado.returncode == 0:
@@ -3386,87 +3149,6 @@ def contar_archivos_blob() -> int:
     return 0
 
 
-def generar_guia_contextual(tema: str, parametros: Optional[dict] = None) -> dict:
-    """Genera guías contextuales paso a paso"""
-    guias = {
-        "configurar_blob": {
-            "titulo": "Configurar Azure Blob Storage",
-            "pasos": [
-                "1. Ejecuta: ./sync_to_blob.ps1",
-                "2. Verifica con: az storage container list --account-name boatrentalstorage",
-                "3. Prueba con: leer:mobile-app/package.json"
-            ],
-            "comandos_utiles": [
-                "az storage blob list --container-name boat-rental-project --account-name boatrentalstorage",
-                "az functionapp config appsettings set --name copiloto-semantico-func --settings AZURE_STORAGE_CONNECTION_STRING=<connection-string>"
-            ]
-        },
-        "optimizar_performance": {
-            "titulo": "Optimizar Performance de Function App",
-            "pasos": [
-                "1. Habilitar Application Insights",
-                "2. Configurar auto-scaling",
-                "3. Implementar caché Redis"
-            ],
-            "metricas_clave": ["Latencia < 500ms", "Error rate < 1%", "Availability > 99.9%"]
-        },
-        "debug_errores": {
-            "titulo": "Debugging de Errores",
-            "pasos": [
-                "1. Revisar logs: az webapp log tail --name copiloto-semantico-func",
-                "2. Verificar App Settings",
-                "3. Probar endpoints individualmente"
-            ],
-            "herramientas": ["Azure Portal", "Application Insights", "Log Analytics"]
-        }
-    }
-
-    if tema in guias:
-        return {
-            "exito": True,
-            "guia": guias[tema],
-            "proximos_pasos": ["diagnosticar:completo", "dashboard"]
-        }
-
-    return {
-        "exito": True,
-        "guias_disponibles": list(guias.keys()),
-        "sugerencia": "Especifica un tema de la lista"
-    }
-
-
-def orquestar_flujo_trabajo(flujo: str, parametros: dict = {}) -> dict:
-    """Orquesta flujos de trabajo complejos"""
-    flujos = {
-        "deployment": [
-            {"paso": "Verificar código", "comando": "analizar:src"},
-            {"paso": "Sincronizar archivos", "comando": "sync_to_blob"},
-            {"paso": "Publicar función", "comando": "func azure functionapp publish"},
-            {"paso": "Verificar deployment", "comando": "diagnosticar:completo"}
-        ],
-        "monitoreo": [
-            {"paso": "Obtener métricas", "comando": "dashboard"},
-            {"paso": "Analizar logs", "comando": "analizar:logs"},
-            {"paso": "Generar reporte", "comando": "generar:reporte"}
-        ]
-    }
-
-    if flujo in flujos:
-        return {
-            "exito": True,
-            "flujo": flujo,
-            "pasos": flujos[flujo],
-            "estado": "Listo para ejecutar",
-            "comando_inicio": f"orquestar:ejecutar:{flujo}"
-        }
-
-    return {
-        "exito": True,
-        "flujos_disponibles": list(flujos.keys()),
-        "descripcion": "Flujos de trabajo automatizados"
-    }
-
-
 def generar_sugerencias_comando_azure(comando: str) -> list:
     """Genera sugerencias basadas en comandos Azure ejecutados"""
     sugerencias = []
@@ -3491,9 +3173,10 @@ def generar_sugerencias_comando_azure(comando: str) -> list:
 # Alias para compatibilidad con sistema de redirección
 def revisar_correcciones_http(req):
     """Alias para la función revisar_correcciones para compatibilidad"""
-    # Buscar la función revisar_correcciones en globals
-    if 'revisar_correcciones' in globals():
-        return globals()['revisar_correcciones'](req)
+    # Buscar la función revisar_correcciones (vive en routes/deploy.py)
+    handler = _route_handler('revisar_correcciones')
+    if handler is not None:
+        return handler(req)
     else:
         # Fallback si no se encuentra
         import json
@@ -3514,11301 +3197,3267 @@ def revisar_correcciones_http(req):
 # basándose en eventos[], texto_semantico y resumen_automatico
 
 
-@app.function_name(name="historial_interacciones")
-@app.route(route="historial-interacciones", methods=["GET", "POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def historial_interacciones(req: func.HttpRequest) -> func.HttpResponse:
-    """
-    ⚠️ IMPORTANTE: Este endpoint NO se guarda a sí mismo en memoria
-    para evitar bucle infinito de recursividad.
-
-    Es el primer endpoint que usa el agente para obtener contexto.
-    Si se guardara, crearía interacciones que contienen otras interacciones infinitamente.
-
-    🧠 QUERIES DINÁMICAS: Detecta parámetros adicionales del agente y construye queries inteligentes.
-    """
+def generar_respuesta_contextual_usuario(consulta: str, contexto_inteligente: dict, interpretacion_semantica: str, memoria_previa: dict, intencion_detectada: str = "") -> dict:
+    """Genera respuesta orientada al usuario basada en contexto semántico e intención clasificada"""
 
-    from memory_manual import aplicar_memoria_manual
-    from cosmos_memory_direct import consultar_memoria_cosmos_directo, aplicar_memoria_cosmos_directo
-    from services.memory_service import memory_service
-    from semantic_query_builder import interpretar_intencion_agente, construir_query_dinamica, ejecutar_query_cosmos
+    # Extraer información clave
+    resumen_inteligente = contexto_inteligente.get("resumen_inteligente", "")
+    total_analizado = contexto_inteligente.get("total_analizado", 0)
+    modo_operacion = contexto_inteligente.get("modo_operacion", "")
 
-    # Helper para previews en logs (evitar truncado excesivo)
-    def _preview(text, n=1000):
-        return preview_text(text, n)
+    # Construir respuesta natural basada en intención semántica
+    if intencion_detectada == "recuperar_contexto" or intencion_detectada == "diagnosticar_sistema":
+        if resumen_inteligente:
+            respuesta_natural = f"Anteriormente: {resumen_inteligente}. "
+        else:
+            respuesta_natural = "Se ejecutaron verificaciones del sistema. "
 
-    # === 🔍 CONSTRUCCIÓN DE QUERY UNIVERSAL (COMBINA TIPO + QUERY + MENSAJE) ===
-    session_id = req.headers.get("Session-ID") or req.params.get("session_id")
-    agent_id_header = req.headers.get("Agent-ID") or req.params.get("agent_id")
-    thread_id = req.headers.get(
-        "Thread-ID") or req.headers.get("X-Thread-ID") or req.params.get("thread_id")
+        if interpretacion_semantica:
+            respuesta_natural += f"Intención detectada: {interpretacion_semantica.split('(')[0].strip()}. "
 
-    try:
-        body = req.get_json() or {}
-    except ValueError:
-        body = dict(req.params)
-
-    # Actualizar session/agent si vinieron en el body
-    if not session_id:
-        session_id = body.get("session_id") or req.params.get("session_id")
-    agente_from_body = body.get("agent_id") or req.params.get("agent_id")
-    agent_id = agent_id_header or agente_from_body or "unknown_agent"
-
-    # 🧠 INTERPRETAR INTENCIÓN PRIMERO
-    query_texto = body.get("query") or body.get(
-        "mensaje") or body.get("tipo") or req.params.get("q") or ""
-    intencion_params = interpretar_intencion_agente(
-        query_texto, dict(req.headers))
-
-    # 🔥 FUSIONAR CON PARÁMETROS EXPLÍCITOS (overrides)
-    params_completos = {**intencion_params}
-    for key in ["tipo", "contiene", "endpoint", "exito", "fecha_inicio", "fecha_fin", "orden", "limite"]:
-        if body.get(key) is not None:
-            params_completos[key] = body.get(key)
-        elif req.params.get(key) is not None:
-            params_completos[key] = req.params.get(key)
-
-    params_completos["session_id"] = session_id or "unknown"
-    params_completos["agent_id"] = agent_id or "unknown_agent"
-    params_completos["intencion_detectada"] = query_texto
-    hist_limit = int(params_completos.get("limite") or req.params.get(
-        "limite") or body.get("limite") or 10)
-
-    logging.info(f"🧠 HISTORIAL: Parámetros interpretados: {params_completos}")
-
-    query_universal = query_texto or "últimas interacciones recientes"
-    logging.info(f"🔍 HISTORIAL: Query vectorial: '{query_universal}'")
-
-    def _inyectar_narrativa(payload: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Inserta la narrativa enriquecida (threads + Cosmos + AI Search) en la respuesta.
-        """
-        narrativa_ctx = None
-        try:
-            def _compute_narrativa():
-                return generar_narrativa_contextual(
-                    session_id=session_id,
-                    thread_id=thread_id,
-                    query=query_universal or query_texto or "",
-                    use_cache=False
-                )
+        if total_analizado > 0:
+            respuesta_natural += f"Total de {total_analizado} interacciones analizadas."
 
-            narrativa_ctx, cache_hit, cache_latency = redis_buffer.get_or_compute_narrativa(
-                session_id=session_id,
-                thread_id=thread_id,
-                compute_fn=_compute_narrativa
-            )
-            logging.debug(
-                f"[Narrativa] cache_hit={cache_hit} latency={cache_latency:.2f}ms para sesión={session_id} thread={thread_id}")
-        except Exception as narrativa_err:
-            logging.warning(
-                f"⚠️ No se pudo generar narrativa contextual para historial: {narrativa_err}")
-            narrativa_ctx = None
-
-        if narrativa_ctx and (narrativa_ctx.get("texto") or narrativa_ctx.get("mensajes")):
-            mensajes_fmt = narrativa_ctx.get(
-                "mensajes") or narrativa_ctx.get("mensajes_formateados") or []
-            texto_base = _construir_resumen_narrativo(
-                narrativa_ctx, payload) or narrativa_ctx.get("texto", "").strip()
-            payload["respuesta_usuario"] = texto_base
-            payload["texto_semantico"] = texto_base
-            payload.setdefault("metadata", {})
-            payload["metadata"]["narrativa_contexto"] = {
-                "thread_id": narrativa_ctx.get("thread_id"),
-                "blob": narrativa_ctx.get("fuente_blob"),
-                "mensajes_recuperados": len(mensajes_fmt),
-                "session_id": narrativa_ctx.get("session_id"),
-                "fragmento_conversacion": mensajes_fmt[:3]
-            }
+    elif intencion_detectada == "consultar_historial":
+        if modo_operacion:
+            respuesta_natural = f"Sesión en modo {modo_operacion}. "
         else:
-            payload.setdefault("respuesta_usuario", "")
-        return payload
+            respuesta_natural = "Sesión enfocada en diagnóstico. "
 
-    # === 🔍 BÚSQUEDA HÍBRIDA: AI Search (vectorial) + Cosmos (estructurado) ===
-    docs_search = []
+        if resumen_inteligente:
+            respuesta_natural += f"Contexto: {resumen_inteligente}."
 
-    # 1️⃣ AI Search: Búsqueda vectorial semántica
-    try:
-        from endpoints_search_memory import buscar_memoria_endpoint
-        memoria_result = buscar_memoria_endpoint({
-            "query": query_universal,
-            "session_id": session_id,
-            "top": 20
-        })
-        if memoria_result.get("exito") and memoria_result.get("documentos"):
-            docs_search = memoria_result["documentos"]
-            logging.info(f"✅ AI Search: {len(docs_search)} docs vectoriales")
-    except Exception as e:
-        logging.warning(f"⚠️ AI Search falló: {e}")
+    elif intencion_detectada == "resumen_sesion":
+        respuesta_natural = f"Resumen: "
+        if resumen_inteligente:
+            respuesta_natural += resumen_inteligente
+        else:
+            respuesta_natural += "Tareas de verificación y diagnóstico completadas."
 
-    # 2️⃣ Cosmos: Filtro estructurado por event_type derivado de intención
-    usar_query_cosmos = params_completos.get("tipo") or params_completos.get(
-        "endpoint") or params_completos.get("exito") is not None
+    else:  # fallback para intenciones no específicas
+        respuesta_natural = f"Contexto disponible: "
+        if resumen_inteligente:
+            respuesta_natural += resumen_inteligente
+        else:
+            respuesta_natural += "Sistema en funcionamiento normal."
 
-    if usar_query_cosmos:
-        try:
-            query_sql = construir_query_dinamica(**params_completos)
-            resultados_cosmos = ejecutar_query_cosmos(
-                query_sql, memory_service.memory_container)
-            logging.info(
-                f"✅ Cosmos: {len(resultados_cosmos)} docs estructurados (event_type filtrado)")
+    return {
+        "tipo": "respuesta_contextual",
+        "respuesta_usuario": respuesta_natural,
+        "intencion_clasificada": intencion_detectada,
+        "contexto_aplicado": {
+            "total_analizado": total_analizado,
+            "modo_operacion": modo_operacion,
+            "interpretacion": interpretacion_semantica
+        },
+        "metadata": {
+            "timestamp": datetime.now().isoformat(),
+            "consulta_original": consulta,
+            "fuente": "clasificador_semantico_robusto"
+        }
+    }
 
-            # 3️⃣ INTERSECCIÓN: Combinar resultados vectoriales + estructurados
-            if docs_search and resultados_cosmos:
-                ids_cosmos = {d.get("id") for d in resultados_cosmos}
-                docs_search = [
-                    d for d in docs_search if d.get("id") in ids_cosmos]
-                logging.info(
-                    f"🎯 Intersección: {len(docs_search)} docs (vectorial ∩ estructurado)")
-            elif resultados_cosmos and not docs_search:
-                docs_search = resultados_cosmos[:10]
-                logging.info(
-                    f"📊 Usando solo resultados estructurados de Cosmos")
-        except Exception as e:
-            logging.error(f"❌ Query Cosmos falló: {e}")
 
-    # 🧠 CONSULTAR MEMORIA COSMOS DB DIRECTAMENTE (para contexto general)
-    memoria_previa = consultar_memoria_cosmos_directo(req)
+def generar_proximas_acciones(intencion: str, resultado: dict) -> list:
+    """Genera sugerencias de próximas acciones basadas en el resultado"""
+    acciones = []
 
-    # 🔥 ENRIQUECER memoria_previa con resultados de búsqueda híbrida
-    if docs_search and memoria_previa:
-        memoria_previa["docs_hibridos"] = docs_search
-        memoria_previa["busqueda_hibrida_aplicada"] = True
+    if "generar" in intencion and resultado.get("exito"):
+        acciones.extend([
+            "leer:archivo generado",
+            "analizar:calidad",
+            "ejecutar:pruebas"
+        ])
+    elif "buscar" in intencion:
+        acciones.extend([
+            "leer:primer resultado",
+            "analizar:resultados",
+            "filtrar:por tipo"
+        ])
+    elif "diagnosticar" in intencion:
+        acciones.extend([
+            "corregir:problemas detectados",
+            "optimizar:rendimiento",
+            "generar:reporte"
+        ])
 
-    # 🔍 DETECCIÓN AUTOMÁTICA DE RECURSIÓN
-    recursion_detectada = False
-    interacciones_recursivas = 0
+    return acciones[:5]  # Limitar a 5 sugerencias
 
-    if memoria_previa and memoria_previa.get("tiene_historial"):
-        logging.info(
-            f"🧠 historial_interacciones: {memoria_previa['total_interacciones']} interacciones encontradas")
-
-        # Contar interacciones de historial-interacciones
-        interacciones_recientes = memoria_previa.get(
-            "interacciones_recientes", [])
-        for interaccion in interacciones_recientes:
-            endpoint = interaccion.get("endpoint") or interaccion.get(
-                "data", {}).get("endpoint", "")
-            if "historial" in endpoint.lower():
-                interacciones_recursivas += 1
-
-        # Si más del 80% son de historial, hay recursión
-        total = len(interacciones_recientes)
-        if total > 0 and (interacciones_recursivas / total) > 0.8:
-            recursion_detectada = True
-            logging.error(
-                f"🚨 RECURSIÓN DETECTADA: {interacciones_recursivas}/{total} interacciones son de historial-interacciones")
 
-        # Debug: verificar estructura de memoria_previa
-        if memoria_previa.get("interacciones_recientes"):
-            primera = memoria_previa["interacciones_recientes"][0] if memoria_previa["interacciones_recientes"] else {
-            }
-            logging.info(
-                f"   Primera interacción keys: {list(primera.keys())}")
-            texto_semantico = primera.get("texto_semantico", "")
-            if texto_semantico:
-                logging.info(
-                    f"   Texto semántico encontrado: '{_preview(texto_semantico, 500)}'")
-        logging.info(
-            f"📝 Historial: {_preview(memoria_previa.get('resumen_conversacion', ''), 500)}")
+# --- PARSER ROBUSTO PARA AGENT RESPONSE ---
+def clean_agent_response(agent_response: str) -> dict:
+    """
+    Parser ultra-flexible que acepta cualquier formato de texto
+    """
+    try:
+        logging.info(f"🔍 Parseando: {agent_response[:50]}...")
 
-    advertencias = []
-    total = 0
-    interacciones_recursivas = 0
+        # Caso 1: JSON directo
+        try:
+            direct_json = json.loads(agent_response)
+            if isinstance(direct_json, dict):
+                logging.info("✅ JSON directo detectado")
+                # Asegurar campos mínimos
+                if "endpoint" not in direct_json and "intencion" not in direct_json:
+                    direct_json["endpoint"] = "copiloto"
+                return direct_json
+        except json.JSONDecodeError:
+            pass
 
-    # Si hay recursión, devolver diagnóstico inmediato
-    if recursion_detectada:
-        return func.HttpResponse(
-            json.dumps({
-                "exito": False,
-                "error": "RECURSIÓN DETECTADA",
-                "diagnostico": {
-                    "problema": "El endpoint historial-interacciones se está registrando a sí mismo",
-                    "interacciones_recursivas": interacciones_recursivas,
-                    "total_interacciones": total,
-                    "porcentaje_recursivo": f"{(interacciones_recursivas/total*100):.1f}%",
-                    "causa": "El wrapper automático está registrando interacciones de historial-interacciones",
-                    "solucion": "El filtro en memory_route_wrapper.py ya está implementado. Las interacciones recursivas existentes deben limpiarse."
-                },
-                "acciones_recomendadas": [
-                    "Reiniciar el servidor para aplicar el filtro actualizado",
-                    "Ejecutar script de limpieza: python limpiar_historial_recursivo.py",
-                    "Verificar logs del servidor para confirmar que el filtro funciona"
-                ],
-                "metadata": {
-                    "timestamp": datetime.now().isoformat(),
-                    "session_id": req.headers.get("Session-ID"),
-                    "filtro_implementado": True,
-                    "wrapper_actualizado": True
-                }
-            }, ensure_ascii=False),
-            mimetype="application/json",
-            status_code=500
-        )
+        # Caso 2: Comandos simples
+        clean_text = agent_response.strip().lower()
+        simple_commands = {
+            "ping": {"endpoint": "status"},
+            "status": {"endpoint": "status"},
+            "health": {"endpoint": "status"},
+            "estado": {"endpoint": "status"},
+            "dashboard": {"endpoint": "ejecutar", "intencion": "dashboard"},
+            "diagnostico": {"endpoint": "ejecutar", "intencion": "diagnosticar:completo"}
+        }
 
-    # Inyectar memoria previa al contexto del request antes de generar respuesta
-    if memoria_previa and memoria_previa.get("tiene_historial"):
-        setattr(req, "_memoria_contexto", memoria_previa)
+        if clean_text in simple_commands:
+            logging.info(f"✅ Comando simple: {clean_text}")
+            return simple_commands[clean_text]
 
-    # Forzar lectura del contexto si el wrapper lo inyectó
-    try:
-        if not hasattr(req, "_memoria_contexto") or not getattr(req, "_memoria_contexto", {}):
-            from services.memory_service import memory_service
-            session_id = req.headers.get(
-                "Session-ID") or req.params.get("session_id")
-            if session_id:
-                interacciones = memory_service.get_session_history(session_id)
-                setattr(req, "_memoria_contexto", {
-                    "tiene_historial": len(interacciones) > 0,
-                    "interacciones_recientes": interacciones,
-                    "total_interacciones": len(interacciones),
-                    "session_id": session_id
-                })
-                logging.info(
-                    f"🧠 Cargado contexto manualmente dentro del endpoint ({len(interacciones)} interacciones)")
-    except Exception as e:
-        logging.warning(f"⚠️ Error cargando memoria dentro del endpoint: {e}")
+        # Caso 3: JSON embebido en markdown
+        patterns = [
+            r"```json\s*(\{.*?\})\s*```",
+            r"```\s*(\{.*?\})\s*```",
+            r"(\{[^}]*\"endpoint\"[^}]*\})"
+        ]
 
-    # 🔥 MEMORIA DIRECTA - FORZAR FUNCIONAMIENTO
-    logging.info("🔥 ENDPOINT EJECUTÁNDOSE CON MEMORIA DIRECTA")
+        for pattern in patterns:
+            match = re.search(pattern, agent_response,
+                              re.DOTALL | re.IGNORECASE)
+            if match:
+                try:
+                    parsed_json = json.loads(match.group(1).strip())
+                    if isinstance(parsed_json, dict):
+                        logging.info("✅ JSON embebido encontrado")
+                        return parsed_json
+                except json.JSONDecodeError:
+                    continue
 
-    memoria_previa = getattr(req, '_memoria_contexto', {})
-    response_data = {}
-    resolved_session_id = session_id or req.headers.get(
-        "Session-ID") or req.params.get("session_id") or "test_session"
-    resolved_agent_id = agent_id or req.headers.get(
-        "Agent-ID") or req.params.get("agent_id") or "TestAgent"
-    try:
-        session_id = resolved_session_id
-        agent_id = resolved_agent_id
-
-        logging.info(f"🔍 Headers: Session={session_id}, Agent={agent_id}")
-
-        # Solo intenta cargar desde memory_service si no hay memoria previa
-        if not memoria_previa or not memoria_previa.get("tiene_historial"):
-            interacciones = memory_service.get_session_history(session_id)
-            memoria_previa = {
-                "tiene_historial": len(interacciones) > 0,
-                "interacciones_recientes": interacciones,
-                "total_interacciones": len(interacciones),
-                "session_id": session_id,
-                "agent_id": agent_id
-            }
-            setattr(req, "_memoria_contexto", memoria_previa)
-            logging.info(
-                f"🧠 Memoria local cargada: {len(interacciones)} interacciones")
-            # Debug: verificar si las interacciones tienen texto_semantico
-            for idx, inter in enumerate(interacciones[:3]):
-                texto = inter.get("texto_semantico", "")
-                logging.info(
-                    f"   Interacción {idx}: texto_semantico = '{_preview(texto, 500)}'")
-        else:
-            logging.info(
-                "🧠 Usando memoria previa de Cosmos sin sobrescribirla.")
-
-        # Fallback: si no hubo historial por session_id, intentar agent_id o global
-        if (not memoria_previa or not memoria_previa.get("tiene_historial")):
-            try:
-                fallback_query = None
-                if agent_id and agent_id not in ["unknown_agent", "unknown", "TestAgent"]:
-                    fallback_query = construir_query_dinamica(
-                        session_id=None,
-                        agent_id=agent_id,
-                        limite=hist_limit
-                    )
-                else:
-                    fallback_query = construir_query_dinamica(
-                        session_id=None,
-                        agent_id=None,
-                        limite=hist_limit
-                    )
+        # Caso 4: Fallback universal - cualquier texto se convierte en comando
+        logging.info("ℹ️ Usando fallback universal")
+        return {
+            "endpoint": "copiloto",
+            "mensaje": agent_response[:200],
+            "method": "GET"
+        }
 
-                if fallback_query:
-                    resultados_fallback = ejecutar_query_cosmos(
-                        fallback_query, memory_service.memory_container)
-                    if resultados_fallback:
-                        interacciones = []
-                        for item in resultados_fallback:
-                            interacciones.append({
-                                "id": item.get("id"),
-                                "session_id": item.get("session_id"),
-                                "agent_id": item.get("agent_id"),
-                                "endpoint": item.get("endpoint"),
-                                "timestamp": item.get("timestamp"),
-                                "texto_semantico": item.get("texto_semantico"),
-                                "exito": item.get("exito", True),
-                                "tipo": item.get("tipo", "interaccion_usuario"),
-                                "data": {
-                                    "endpoint": item.get("endpoint"),
-                                    "timestamp": item.get("timestamp"),
-                                    "success": item.get("exito", True),
-                                    "params": {}
-                                }
-                            })
-                        memoria_previa = {
-                            "tiene_historial": True,
-                            "interacciones_recientes": interacciones,
-                            "total_interacciones": len(interacciones),
-                            "session_id": session_id or interacciones[0].get("session_id"),
-                            "agent_id": agent_id
-                        }
-                        setattr(req, "_memoria_contexto", memoria_previa)
-                        logging.info(
-                            f"🧠 Fallback por agent_id/global: {len(interacciones)} interacciones recuperadas")
-            except Exception as fallback_err:
-                logging.warning(
-                    f"⚠️ Fallback historial por agent_id/global falló: {fallback_err}")
-        # Debug: verificar estructura de memoria previa
-        if memoria_previa.get("interacciones_recientes"):
-            primera = memoria_previa["interacciones_recientes"][0] if memoria_previa["interacciones_recientes"] else {
-            }
-            logging.info(
-                f"   Primera interacción de Cosmos keys: {list(primera.keys())}")
-            texto_semantico = primera.get("texto_semantico", "")
-            if texto_semantico:
-                logging.info(
-                    f"   Texto semántico de Cosmos: '{_preview(texto_semantico, 500)}'")
-            else:
-                logging.warning(
-                    f"   ⚠️ No hay texto_semantico en interacción de Cosmos")
     except Exception as e:
-        logging.error(f"❌ Error cargando memoria: {e}")
-        memoria_previa = memoria_previa or {}
-        session_id = session_id or None
-    """Endpoint para consultar historial de interacciones con detección automática de endpoint"""
-
-    memoria_previa = getattr(req, '_memoria_contexto', {})
-    if memoria_previa and memoria_previa.get("tiene_historial"):
-        total = memoria_previa.get("total_interacciones", 0)
-        logging.info(f"🧠 Historial: {total} interacciones encontradas")
+        logging.error(f"💥 Error en parser: {str(e)}")
+        return {
+            "endpoint": "status",
+            "method": "GET"
+        }
 
-    try:
-        # 🧠 DETECTAR PARÁMETROS ADICIONALES DEL AGENTE
-        params_agente = dict(req.params)
-        body_agente = {}
-        try:
-            if req.method == "POST":
-                body_agente = req.get_json() or {}
-        except:
-            pass
 
-        # Combinar parámetros
-        params_completos = {**params_agente, **body_agente}
+def _get_endpoint_alternativo(campo_faltante: str, contexto: str = "") -> str:
+    """Determina endpoint alternativo según campo faltante"""
+    mapping = {
+        "resourceGroup": "/api/status",
+        "location": "/api/status",
+        "subscriptionId": "/api/status",
+        "storageAccount": "/api/listar-blobs"
+    }
+    return mapping.get(campo_faltante, "/api/status")
 
-        # Obtener identificadores prioritarios
-        session_id = params_completos.get(
-            "session_id") or resolved_session_id
-        agent_id_local = params_completos.get(
-            "agent_id") or resolved_agent_id
-        agent_id = agent_id_local
 
-        # 🔍 INTERPRETAR INTENCIÓN DEL AGENTE
-        intencion_params = interpretar_intencion_agente(
-            params_completos.get("query", params_completos.get("mensaje", "")),
-            dict(req.headers)
-        )
+def generate_user_friendly_response_v2(original_response: str, result: dict) -> str:
+    """Genera respuesta amigable basada en el resultado"""
 
-        # Sobrescribir con parámetros explícitos si existen
-        for key in ["tipo", "contiene", "endpoint", "exito", "fecha_inicio", "fecha_fin", "orden", "limite"]:
-            if key in params_completos:
-                intencion_params[key] = params_completos[key]
+    # Extraer explicación original si existe
+    explanation_part = ""
+    if "```json" in original_response:
+        explanation_part = original_response.split("```json")[0].strip()
 
-        # Asegurar session_id SIEMPRE desde headers/params
-        intencion_params["session_id"] = session_id or "unknown"
-        intencion_params["agent_id"] = agent_id_local or "unknown_agent"
+    if result.get("exito", True):
+        if explanation_part:
+            return f"{explanation_part}\n\n✅ Comando ejecutado exitosamente"
+        else:
+            return "✅ Comando ejecutado exitosamente"
+    else:
+        error_msg = result.get("error", "Error desconocido")
+        return f"❌ Error: {error_msg}"
 
-        limit = int(intencion_params.get("limite", hist_limit))
 
-        # Initialize validation stats
-        validation_stats = {
-            "checked": 0,
-            "missing_text_semantic": 0,
-            "generated_fallbacks": 0
-        }
+def build_status() -> dict:
+    """Construye el payload de estado para endpoints y agentes."""
+    storage_status = "desconectado"
+    try:
+        client = get_blob_client()
+        if client:
+            container_client = client.get_container_client(CONTAINER_NAME)
+            if container_client.exists():
+                storage_status = "conectado"
+    except Exception as e:
+        logging.warning(f"No se pudo verificar Storage: {str(e)}")
 
-        # === 🔍 USAR DOCS DE AI SEARCH AUTOMÁTICO ===
-        docs_sem = docs_search  # Usar los docs ya encontrados en la búsqueda automática
+    ambiente = "Azure" if (
+        storage_status == "conectado" or IS_AZURE) else "Local"
 
-        limit = int(intencion_params.get("limite", hist_limit))
+    return {
+        "copiloto": "activo",
+        "version": "2.0-semantic",
+        "timestamp": datetime.now().isoformat(),
+        "ambiente": ambiente,
+        "storage": storage_status,
+        "is_azure": IS_AZURE,
+        "container": CONTAINER_NAME,
+        "blob_ready": (storage_status == "conectado"),
+        "endpoints": _discover_endpoints(),
+        "ready": ambiente == "Azure" and storage_status == "conectado"
+    }
 
-        # 🧠 SI HAY PARÁMETROS AVANZADOS, USAR QUERY BUILDER DINÁMICO
-        usar_query_dinamica = any([
-            params_completos.get("tipo"),
-            params_completos.get("contiene"),
-            params_completos.get("endpoint"),
-            params_completos.get("exito") is not None,
-            params_completos.get("fecha_inicio"),
-            params_completos.get("fecha_fin")
-        ])
 
-        if usar_query_dinamica:
-            logging.info(f"🔍 Query dinámica detectada: {intencion_params}")
+def _serve_openapi_schema() -> func.HttpResponse:
+    """Función helper mejorada para servir el schema OpenAPI"""
+    try:
+        # Buscar el archivo en múltiples ubicaciones
+        schema_paths = [
+            Path(__file__).parent / "openapi.yaml",
+            Path(__file__).parent / "openapi_copiloto_local.yaml",
+            Path("/home/site/wwwroot/openapi.yaml"),  # Azure path
+            Path("/home/site/wwwroot/openapi_copiloto_local.yaml")
+        ]
 
-            # Construir query SQL dinámica
-            query_sql = construir_query_dinamica(**intencion_params)
+        schema_content = None
+        used_path = None
 
-            # Ejecutar contra Cosmos DB
-            try:
-                cosmos_container = memory_service.memory_container
-                resultados = ejecutar_query_cosmos(query_sql, cosmos_container)
-
-                eventos_dinamicos: List[Dict[str, Any]] = []
-                interacciones_formateadas = []
-                for i, item in enumerate(resultados[:limit]):
-                    texto = item.get("texto_semantico", "")
-                    if texto and not any([
-                        "consulta de historial completada" in texto.lower(),
-                        "sin resumen de conversación" in texto.lower(),
-                        "interacciones recientes:" in texto.lower()
-                    ]):
-                        registro = {
-                            "numero": i + 1,
-                            "timestamp": item.get("timestamp", ""),
-                            "endpoint": item.get("endpoint", ""),
-                            "texto_semantico": texto,
-                            "exito": item.get("exito", True),
-                            "tipo": item.get("tipo", "interaccion_usuario")
-                        }
-                        interacciones_formateadas.append(registro)
-                        eventos_dinamicos.append(
-                            build_event(
-                                endpoint=registro["endpoint"],
-                                descripcion=texto,
-                                estado="exito" if registro["exito"] else "error",
-                                sugerencia="",
-                                criticidad="",
-                                datos={
-                                    "timestamp": registro["timestamp"],
-                                    "tipo": registro["tipo"]
-                                },
-                                timestamp=registro["timestamp"]
-                            )
-                        )
-
-                if not eventos_dinamicos:
-                    eventos_dinamicos.append(
-                        build_event(
-                            endpoint="historial-interacciones",
-                            descripcion="Sin interacciones que coincidan con los filtros aplicados.",
-                            estado="informativo",
-                            sugerencia="",
-                            criticidad="",
-                            datos={"query_aplicada": True}
-                        )
-                    )
+        for schema_path in schema_paths:
+            logging.info(f"Buscando schema en: {schema_path}")
+            if schema_path.exists():
+                try:
+                    schema_content = schema_path.read_text(encoding='utf-8')
+                    used_path = str(schema_path)
+                    logging.info(
+                        f"Schema encontrado en: {used_path}, tamaño: {len(schema_content)}")
 
-                extras = {
-                    "interacciones": interacciones_formateadas,
-                    "total": len(resultados),
-                    "query_dinamica_aplicada": True,
-                    "filtros_aplicados": intencion_params,
-                    "metadata": {
-                        "query_sql": query_sql[:200] + "...",
-                        "timestamp": datetime.now().isoformat()
-                    }
-                }
-                contexto_directo = {
-                    "tiene_memoria": bool(interacciones_formateadas),
-                    "total_interacciones": len(resultados),
-                    "resumen": ""
-                }
-                response_data = build_structured_payload(
-                    "historial-interacciones",
-                    eventos_dinamicos,
-                    narrativa_base="",
-                    resumen_automatico="",
-                    extras=extras,
-                    contexto_inteligente=contexto_directo,
-                    exito=True
-                )
-                response_data.update({
-                    "session_id": session_id,
-                    "fuente": "wrapper_automatico",
-                    "validation_applied": True,
-                    "validation_stats": {
-                        "checked": len(interacciones_formateadas),
-                        "missing_text_semantic": 0,
-                        "generated_fallbacks": 0
-                    },
-                    "metadata": {
-                        "query_sql": query_sql[:200] + "...",
-                        "timestamp": datetime.now().isoformat()
-                    },
-                    "resumen_conversacion": memoria_previa.get("resumen_conversacion", "")
-                })
-                response_data["mensaje"] = ""
-                response_data["respuesta_usuario"] = ""
-                response_data["intencion_detectada"] = intencion_params.get(
-                    "intencion_detectada", params_completos.get("query", ""))
-
-                return func.HttpResponse(
-                    json.dumps(response_data, ensure_ascii=False),
-                    mimetype="application/json",
-                    status_code=200
-                )
-            except Exception as e:
-                logging.error(f"❌ Error ejecutando query dinámica: {e}")
-                # Continuar con flujo normal si falla
-
-        eventos_estructurados: List[Dict[str, Any]] = []
-
-        genericos = [
-            "he revisado el historial",
-            "actividad relevante",
-            "resumen de la última",
-            "resumen automático",
-            "consulta de historial completada",
-            "resumen consolidado"
-        ]
+                    # Verificar que tiene la versión correcta
+                    if 'openapi: 3.1.' in schema_content or '"openapi": "3.1.' in schema_content:
+                        logging.info("✅ Versión OpenAPI 3.1.x confirmada")
+                        break
+                    else:
+                        logging.warning(
+                            f"⚠️ Archivo encontrado pero versión incorrecta en: {used_path}")
+                        # Continuar buscando
+                        schema_content = None
 
-        def _es_texto_generico(texto: str) -> bool:
-            if not texto:
-                return True
-            t = texto.lower()
-            return any(g in t for g in genericos)
-
-        def _descripcion_evento(registro: Dict[str, Any], texto: str) -> Tuple[str, str]:
-            endpoint_val = registro.get(
-                "endpoint") or "historial-interacciones"
-            timestamp_val = registro.get("timestamp") or ""
-            estado_val = "éxito" if registro.get("exito", True) else "error"
-            detalle = (
-                registro.get("params", {}).get("comando")
-                or registro.get("consulta")
-                or registro.get("mensaje")
-                or ""
-            )
-            if texto and not _es_texto_generico(texto):
-                detalle = texto
-            descripcion = f"{format_timestamp_humano(timestamp_val)} · {humanizar_endpoint(endpoint_val)} ({estado_val})"
-            if detalle:
-                descripcion += f": {preview_text(detalle, 240)}"
-            return descripcion.strip(), detalle
-
-        # Prepare intelligent context default
-        contexto_inteligente = {
-            "resumen": memoria_previa.get("resumen_conversacion", ""),
-            "tiene_memoria": bool(memoria_previa and memoria_previa.get("tiene_historial")),
-            "total_interacciones": memoria_previa.get("total_interacciones", 0)
-        }
+                except Exception as e:
+                    logging.error(f"Error leyendo {schema_path}: {e}")
+                    continue
 
-        if not memoria_previa or not memoria_previa.get("tiene_historial"):
-            respuesta_sin_historial = "Sin interacciones previas para esta sesión."
-            evento = build_event(
-                endpoint="historial-interacciones",
-                descripcion=respuesta_sin_historial,
-                estado="informativo",
-                sugerencia="",
-                criticidad="",
-                datos={
-                    "session_id": session_id,
-                    "limit": limit
-                }
-            )
-            eventos_estructurados.append(evento)
-            response_data = build_structured_payload(
-                "historial-interacciones",
-                eventos_estructurados,
-                narrativa_base="",
-                resumen_automatico="",
-                extras={
-                    "interacciones": [],
-                    "total": 0,
-                    "validation_stats": validation_stats,
-                    "memoria_aplicada": False
-                },
-                contexto_inteligente=contexto_inteligente,
-                exito=True
+        if schema_content:
+            # Filtrar las claves con None para asegurar que headers solo contiene str:str
+            headers: dict[str, str] = {
+                k: v for k, v in {
+                    "Content-Type": "application/x-yaml",
+                    "Access-Control-Allow-Origin": "*",
+                    "Cache-Control": "no-cache",
+                    "X-Schema-Source": used_path
+                }.items() if v is not None
+            }
+            return func.HttpResponse(
+                schema_content,
+                mimetype="application/x-yaml",
+                status_code=200,
+                headers=headers
             )
-            response_data.update({
-                "session_id": session_id,
-                "fuente": "wrapper_automatico",
-                "resumen_conversacion": "",
-                "validation_applied": True,
-                "validation_stats": validation_stats,
-                "metadata": {
-                    "memoria_aplicada": False,
-                    "session_id": session_id,
-                    "agent_id": req.headers.get("Agent-ID", "unknown")
-                }
-            })
         else:
-            interacciones_formateadas = []
-            missing_count = 0
-            fallback_count = 0
-
-            raw_interacciones = memoria_previa.get(
-                "interacciones_recientes", [])[:limit]
-            for i, interaccion in enumerate(raw_interacciones):
-                validation_stats["checked"] += 1
-
-                registro = interaccion.get("data", interaccion)
-                texto_semantico = (
-                    interaccion.get("texto_semantico")
-                    or registro.get("texto_semantico")
-                    or interaccion.get("data", {}).get("texto_semantico")
-                    or ""
-                )
-
-                # Filtrar textos genéricos/narrativas pre-generadas
-                if texto_semantico and any([
-                    "consulta de historial completada" in texto_semantico.lower(),
-                    "sin resumen de conversación" in texto_semantico.lower(),
-                    "interacciones recientes:" in texto_semantico.lower(),
-                    "he revisado el historial" in texto_semantico.lower(),
-                    "encontré" in texto_semantico.lower(
-                    ) and "interacciones relevantes" in texto_semantico.lower(),
-                    "resumen de la última actividad" in texto_semantico.lower()
-                ]):
-                    # Reemplazar con descripción técnica
-                    endpoint_val = registro.get(
-                        "endpoint") or interaccion.get("endpoint") or "unknown"
-                    timestamp_val = registro.get(
-                        "timestamp") or interaccion.get("timestamp") or ""
-                    texto_semantico = f"Interacción en {endpoint_val} - {timestamp_val}"
-                    logging.debug(
-                        f"Texto genérico filtrado en interacción {i+1}")
-
-                if not texto_semantico:
-                    endpoint_val = registro.get(
-                        "endpoint") or interaccion.get("endpoint") or "unknown"
-                    timestamp_val = registro.get(
-                        "timestamp") or interaccion.get("timestamp") or ""
-                    texto_semantico = f"Interacción {i+1} en {endpoint_val} - {timestamp_val}"
-                    missing_count += 1
-                    fallback_count += 1
-                    logging.warning(
-                        f"⚠️ Interacción {i+1} sin texto_semantico - generado fallback")
-
-                interacciones_formateadas.append({
-                    "numero": i + 1,
-                    "timestamp": registro.get("timestamp", interaccion.get("timestamp", "")),
-                    "endpoint": registro.get("endpoint", "historial_interacciones"),
-                    "consulta": (_preview(registro.get("params", {}).get("comando") or registro.get("consulta") or "", 1000)),
-                    "exito": registro.get("success", registro.get("exito", True)),
-                    "texto_semantico": texto_semantico,
-                    "tipo": "interaccion_usuario"
-                })
-
-                endpoint_val = registro.get(
-                    "endpoint", "historial_interacciones")
-                timestamp_val = registro.get(
-                    "timestamp", interaccion.get("timestamp", ""))
-                exito_val = interacciones_formateadas[-1]["exito"]
-                descripcion_evento, detalle_evento = _descripcion_evento(
-                    {
-                        "endpoint": endpoint_val,
-                        "timestamp": timestamp_val,
-                        "exito": exito_val,
-                        "params": registro.get("params", {}),
-                        "consulta": interacciones_formateadas[-1]["consulta"]
-                    },
-                    texto_semantico
-                )
-                evento = build_event(
-                    endpoint=endpoint_val,
-                    descripcion=descripcion_evento,
-                    estado="exito" if exito_val else "error",
-                    sugerencia="",
-                    criticidad="",
-                    datos={
-                        "timestamp": timestamp_val,
-                        "consulta": interacciones_formateadas[-1]["consulta"],
-                        "exito": exito_val,
-                        "tipo": interacciones_formateadas[-1]["tipo"],
-                        "texto_original": texto_semantico,
-                        "detalle": detalle_evento
-                    },
-                    timestamp=timestamp_val
-                )
-                eventos_estructurados.append(evento)
-
-            validation_stats["missing_text_semantic"] = missing_count
-            validation_stats["generated_fallbacks"] = fallback_count
-
-            total_interacciones = memoria_previa.get("total_interacciones", 0)
-            resumen = memoria_previa.get("resumen_conversacion", "")
-
-            docs_para_modelo = docs_search if docs_search else docs_sem
-            if docs_para_modelo:
-                contexto_inteligente["documentos_relevantes"] = len(
-                    docs_para_modelo)
-                contexto_inteligente["fuente_datos"] = "AISearch+CognitiveSynth"
-
-            if not eventos_estructurados:
-                eventos_estructurados.append(build_event(
-                    endpoint="historial-interacciones",
-                    descripcion="No se encontraron interacciones relevantes tras aplicar los filtros.",
-                    estado="informativo",
-                    sugerencia="",
-                    criticidad="",
-                    datos={"total_interacciones": total_interacciones}
-                ))
-
-            extras = {
-                "interacciones": interacciones_formateadas,
-                "total": total_interacciones,
-                "validation_stats": validation_stats,
-                "fallbacks_generados": fallback_count,
-                "docs_vectoriales": len(docs_para_modelo or []),
-                "resumen_conversacion": resumen,
-                "filtros_aplicados": {
-                    "session_id": memoria_previa.get("session_id"),
-                    "agent_id": memoria_previa.get("agent_id", agent_id),
-                    "tipo": params_completos.get("tipo"),
-                    "endpoint": params_completos.get("endpoint")
+            # Sin openapi.yaml válido: esqueleto generado desde route_manifest.json
+            # (JSON es YAML válido; mismas rutas y métodos que se registran)
+            from lazy_routes import lazy_routes
+            logging.warning(
+                "⚠️ OpenAPI 3.1.x no encontrado; se sirve el esqueleto del manifiesto de rutas")
+            return func.HttpResponse(
+                json.dumps(lazy_routes.openapi_skeleton(), ensure_ascii=False, indent=2),
+                mimetype="application/x-yaml",
+                status_code=200,
+                headers={
+                    "Access-Control-Allow-Origin": "*",
+                    "Cache-Control": "no-cache",
+                    "X-Schema-Source": "route_manifest.json",
+                    "X-Schema-Searched-Paths": ",".join(str(p) for p in schema_paths),
                 }
-            }
-
-            response_data = build_structured_payload(
-                "historial-interacciones",
-                eventos_estructurados,
-                narrativa_base="",
-                resumen_automatico="",
-                extras=extras,
-                contexto_inteligente=contexto_inteligente,
-                exito=True
             )
-            response_data.update({
-                "session_id": memoria_previa.get("session_id"),
-                "fuente": "wrapper_automatico",
-                "resumen_conversacion": resumen,
-                "validation_applied": True,
-                "validation_stats": validation_stats,
-                "metadata": {
-                    "memoria_aplicada": True,
-                    "memoria_origen": "cosmos" if consultar_memoria_cosmos_directo else "local",
-                    "session_id": memoria_previa.get("session_id"),
-                    "agent_id": req.headers.get("Agent-ID", "unknown")
-                }
-            })
-
-            response_data["mensaje"] = ""
-
-        # Asegurar campos reservados para que el modelo genere la narrativa
-        response_data["mensaje"] = ""
-        response_data["_instruccion_modelo"] = "INTERPRETA eventos[] y genera respuesta conversacional. NO copies texto_semantico literalmente."
-
-        # Aplicar memoria Cosmos y memoria manual
-        response_data = aplicar_memoria_cosmos_directo(req, response_data)
-        response_data = aplicar_memoria_manual(req, response_data)
-
-        # Inyectar narrativa enriquecida y mantener coherencia de campos reservados
-        response_data = _inyectar_narrativa(response_data)
-        if not response_data.get("texto_semantico"):
-            response_data["texto_semantico"] = response_data.get(
-                "respuesta_usuario", "")
-        response_data["mensaje"] = ""
-
-        # ❌ NO REGISTRAR: Este endpoint consulta historial, no debe guardarse a sí mismo
-        # memory_service.registrar_llamada(...) DESHABILITADO para evitar bucle infinito
-        logging.info(
-            "⏭️ historial-interacciones: NO se guarda a sí mismo para evitar recursión")
-
-        response_data["intencion_detectada"] = intencion_params.get(
-            "intencion_detectada", query_texto)
-
-        logging.info(
-            "✅ Payload historial-interacciones listo para el modelo (datos estructurados)")
-
-        # NOTA: La memoria se registra automáticamente por el wrapper @registrar_memoria
-
-        response_data["_instruccion_modelo"] = "IMPORTANTE: Datos en eventos[] son CRUDOS. NO copies texto_semantico. Interpreta y genera respuesta conversacional."
-
-        return func.HttpResponse(
-            json.dumps(response_data, ensure_ascii=False),
-            mimetype="application/json",
-            status_code=200
-        )
-
     except Exception as e:
-        logging.error(f"Error en historial-interacciones: {e}")
-
-        error_msg = f"Error al consultar historial: {str(e)}"
-
-        error_event = build_event(
-            endpoint="historial-interacciones",
-            descripcion=error_msg,
-            estado="error",
-            sugerencia="",
-            criticidad="",
-            datos={
-                "error_type": type(e).__name__,
-                "session_id": req.headers.get("Session-ID"),
-                "agent_id": req.headers.get("Agent-ID")
-            }
-        )
-        contexto_error = {
-            "tiene_memoria": bool(getattr(req, "_memoria_contexto", {})),
-            "session_id": req.headers.get("Session-ID")
-        }
-        response_data = build_structured_payload(
-            "historial-interacciones",
-            [error_event],
-            narrativa_base="",
-            resumen_automatico="",
-            extras={
-                "error": str(e),
-                "validation_stats": {
-                    "checked": 0,
-                    "missing_text_semantic": 0,
-                    "generated_fallbacks": 0
-                }
-            },
-            contexto_inteligente=contexto_error,
-            exito=False
-        )
-        response_data.update({
-            "fuente": "wrapper_automatico",
-            "interpretacion_semantica": "Error al intentar consultar historial; revisar logs.",
-            "validation_applied": True,
-            "metadata": {
-                "memoria_aplicada": False,
-                "error_type": type(e).__name__,
-                "session_id": req.headers.get("Session-ID"),
-                "agent_id": req.headers.get("Agent-ID")
-            }
-        })
-        response_data["mensaje"] = ""
-        response_data["respuesta_usuario"] = ""
-        response_data["intencion_detectada"] = "error"
-
-        # Aplicar memoria Cosmos y memoria manual
-        response_data = aplicar_memoria_cosmos_directo(req, response_data)
-        response_data = aplicar_memoria_manual(req, response_data)
-
-        # ❌ NO REGISTRAR: Ni siquiera errores de este endpoint
-        logging.info(
-            "⏭️ historial-interacciones ERROR: NO se guarda para evitar recursión")
-
-        # NOTA: La memoria se registra automáticamente por el wrapper @registrar_memoria
-
+        logging.error(f"Error sirviendo OpenAPI schema: {e}")
         return func.HttpResponse(
-            json.dumps(response_data, ensure_ascii=False),
+            json.dumps({
+                "error": "Error loading OpenAPI schema",
+                "details": str(e)
+            }),
             mimetype="application/json",
             status_code=500
         )
 
 
-def _descripcion_evento(evento: Dict[str, Any], texto: str) -> Tuple[str, str]:
-    """Genera descripción y detalle de un evento para contexto."""
-    endpoint_val = evento.get("endpoint") or "evento"
-    timestamp_val = evento.get("timestamp") or ""
-    estado_val = "éxito" if evento.get("exito", True) else "error"
-    detalle = (
-        evento.get("params", {}).get("comando")
-        or evento.get("consulta")
-        or evento.get("mensaje")
-        or texto
-        or ""
-    )
-    descripcion = f"{timestamp_val} - {endpoint_val} ({estado_val})"
-    if detalle:
-        descripcion += f": {detalle[:240]}"
-    return descripcion.strip(), detalle
-
-
-@app.function_name(name="copiloto")
-@app.route(route="copiloto", auth_level=func.AuthLevel.ANONYMOUS)
-def copiloto(req: func.HttpRequest) -> func.HttpResponse:
-    # 🔥 MEMORIA DIRECTA - WRAPPER AUTOMÁTICO
-    logging.info("🔥 COPILOTO EJECUTÁNDOSE CON MEMORIA DIRECTA")
-
-    def _as_dict(d):
-        return d if isinstance(d, dict) else {}
-
-    # Importar memory_service al inicio para evitar "possibly unbound"
-    from services.memory_service import memory_service
-
-    memoria_previa = {}
-    session_id = None
-    thread_id = req.headers.get("Thread-ID") or req.headers.get("X-Thread-ID")
-
+def crear_archivo_local(
+    ruta: str,
+    contenido: str,
+    tipo_mime: Optional[str] = None,
+    binario: bool = False,
+    is_azure: Optional[bool] = None
+) -> dict:
+    """
+    Crea/sobrescribe archivo de texto plano o binario con manejo robusto de encoding.
+    En Azure, fuerza directorio base wwwroot y valida la ruta.
+    En local, permite rutas absolutas sin restricción.
+    """
     try:
-        session_id = (
-            req.headers.get("Session-ID")
-            or req.headers.get("X-Session-ID")
-            or thread_id
-            or "test_session"
-        )
-        agent_id = req.headers.get(
-            "Agent-ID") or req.headers.get("X-Agent-ID") or "TestAgent"
-
-        if not session_id or session_id == "test_session":
-            try:
-                body_identificadores = req.get_json()
-            except ValueError:
-                body_identificadores = {}
-            session_id = (
-                body_identificadores.get("session_id")
-                or body_identificadores.get("thread_id")
-                or req.params.get("session_id")
-                or req.params.get("thread_id")
-                or thread_id
-                or "test_session"
-            )
-            if not thread_id:
-                thread_id = body_identificadores.get("thread_id")
-
-        if not thread_id:
-            thread_id = (
-                req.params.get("thread_id")
-                or req.params.get("session_id")
-                or session_id
-            )
-
-        logging.info(
-            f"🔍 COPILOTO Headers: Session={session_id}, Agent={agent_id}")
-
-        interacciones = memory_service.get_session_history(session_id) or []
-        memoria_previa = {
-            "tiene_historial": len(interacciones) > 0,
-            "interacciones_recientes": interacciones,
-            "total_interacciones": len(interacciones),
-            "session_id": session_id
-        }
+        if is_azure is None:
+            is_azure = is_running_in_azure()
 
-        logging.info(
-            f"🧠 COPILOTO Memoria cargada: {len(interacciones)} interacciones")
+        if is_azure:
+            base_dir = "/home/site/wwwroot"
+            ruta_completa = os.path.join(base_dir, ruta.lstrip('/'))
+            # Seguridad: prevenir path traversal en Azure
+            if not os.path.abspath(ruta_completa).startswith(os.path.abspath(base_dir)):
+                return {
+                    "exito": False,
+                    "error": f"Ruta fuera del directorio permitido: {ruta}",
+                    "directorio_base": base_dir
+                }
+        else:
+            # En local: permitir rutas absolutas y relativas libremente
+            ruta_completa = os.path.abspath(ruta)
 
-        setattr(req, "_memoria_contexto", memoria_previa)
+        os.makedirs(os.path.dirname(ruta_completa), exist_ok=True)
 
-        # 💾 REGISTRAR INTERACCIÓN EN MEMORIA
-        try:
-            # Tolerancia a GET sin JSON
-            try:
-                body = req.get_json()
-            except ValueError:
-                body = {}
-
-            comando = (
-                (body or {}).get("mensaje")
-                or (body or {}).get("comando")
-                or (body or {}).get("consulta")
-                or req.params.get("q")
-                or req.params.get("mensaje")
-                or "resumen"
-            )
+        if binario:
+            # contenido debe ser base64
+            if not contenido:
+                return {
+                    "exito": False,
+                    "error": "Falta 'contenido_base64' para archivo binario"
+                }
+            try:
+                raw = base64.b64decode(contenido)
+            except Exception as e:
+                return {
+                    "exito": False,
+                    "error": f"Error decodificando base64: {str(e)}"
+                }
+            with open(ruta_completa, 'wb') as f:
+                f.write(raw)
+            tamaño_bytes = len(raw)
+        else:
+            with open(ruta_completa, 'w', encoding='utf-8') as f:
+                f.write(contenido)
+            tamaño_bytes = os.path.getsize(ruta_completa)
+            # Agregar encoding declaration si es un script Python
+            if ruta_completa.endswith('.py'):
+                with open(ruta_completa, 'r+', encoding='utf-8') as f:
+                    content = f.read()
+                    if not content.startswith('# -*- coding:'):
+                        f.seek(0, 0)
+                        f.write('# -*- coding: utf-8 -*-\n' + content)
+        file_cache.invalidate(ruta, ruta_completa)
 
-            memory_service.registrar_llamada(
-                source="copiloto",
-                endpoint="/api/copiloto",
-                method=req.method,
-                params={"comando": comando, "consulta": comando,
-                        "session_id": session_id, "agent_id": agent_id},
-                response_data={"procesando": True},
-                success=True
-            )
-            logging.info(f"💾 COPILOTO Interacción registrada: {comando}")
-        except Exception as reg_error:
-            logging.warning(f"⚠️ Error registrando en memoria: {reg_error}")
+        return {
+            "exito": True,
+            "mensaje": f"Archivo {'binario' if binario else 'de texto'} creado: {ruta}",
+            "encoding": "utf-8" if not binario else None,
+            "tamaño_bytes": tamaño_bytes,
+            "ubicacion": f"file://{ruta_completa}",
+            "ruta_absoluta": ruta_completa,
+            "tipo_operacion": "crear_archivo_local_binario" if binario else "crear_archivo_local",
+            "modo_acceso": "local_filesystem",
+            "advertencia": "⚠️ En Azure, los archivos locales son VOLÁTILES y se pierden al reiniciar" if is_azure else "",
+            "metadata": {
+                "tipo_mime": tipo_mime or ("application/octet-stream" if binario else "text/plain")
+            }
+        }
 
+    except UnicodeEncodeError as e:
+        return {
+            "exito": False,
+            "error": f"Error de encoding: {str(e)}",
+            "sugerencia": "Use solo caracteres UTF-8 o especifique encoding"
+        }
     except Exception as e:
-        logging.error(f"❌ COPILOTO Error cargando memoria: {e}")
-
-    # =========================
-    # Local helper: garantizar _inyectar_narrativa disponible
-    # =========================
-    def _inyectar_narrativa(payload: dict) -> dict:
-        """
-        Wrapper local que intenta:
-         1) llamar a una implementación global/module-level llamada _inyectar_narrativa si existe
-         2) en su defecto, usar generar_narrativa_contextual (si está disponible) como fallback mínimo
-         3) si todo falla, devolver payload sin modificar
-        Esto evita NameError cuando el fichero se ejecuta por fragmentos.
-        """
-        try:
-            # 1) Si existe una implementación global ya definida, usarla
-            fn = globals().get("_inyectar_narrativa")
-            if callable(fn) and getattr(fn, "__code__", None) is not None:
-                # evitamos recursión llamando a esta misma función
-                if fn is not _inyectar_narrativa:
-                    try:
-                        result = fn(payload)
-                        # Asegurar que el resultado es un dict
-                        return result if isinstance(result, dict) else payload
-                    except Exception:
-                        # seguir a fallback
-                        logging.warning(
-                            "Global _inyectar_narrativa falló, intentando fallback")
-        except Exception:
-            pass
+        return {
+            "exito": False,
+            "error": f"Error escribiendo archivo local: {str(e)}",
+            "ruta_intentada": ruta
+        }
 
-        # 2) Fallback: usar generar_narrativa_contextual si está presente
-        try:
-            # generar_narrativa_contextual fue importado en el módulo; usarlo si existe
-            if "generar_narrativa_contextual" in globals() and callable(globals().get("generar_narrativa_contextual")):
-                try:
-                    narrativa_ctx = generar_narrativa_contextual(
-                        session_id=session_id,
-                        thread_id=thread_id,
-                        query=payload.get("mensaje") or payload.get(
-                            "texto_semantico") or ""
-                    )
-                    if narrativa_ctx and isinstance(narrativa_ctx, dict) and (
-                        narrativa_ctx.get(
-                            "texto") or narrativa_ctx.get("mensajes")
-                    ):
-                        mensajes_fmt = narrativa_ctx.get(
-                            "mensajes") or narrativa_ctx.get("mensajes_formateados") or []
-                        texto_base = _construir_resumen_narrativo(
-                            narrativa_ctx, payload) or narrativa_ctx.get("texto", "").strip()
-
-                        payload["respuesta_usuario"] = texto_base
-                        payload["texto_semantico"] = texto_base
-                        payload.setdefault("metadata", {})
-                        payload["metadata"]["narrativa_contexto"] = {
-                            "thread_id": narrativa_ctx.get("thread_id"),
-                            "blob": narrativa_ctx.get("fuente_blob"),
-                            "mensajes_recuperados": len(mensajes_fmt),
-                            "session_id": narrativa_ctx.get("session_id"),
-                            "fragmento_conversacion": mensajes_fmt[:3]
-                        }
-                        if narrativa_ctx.get("detalles"):
-                            payload.setdefault("contexto_inteligente", {})
-                            payload["contexto_inteligente"]["pipeline_contexto"] = narrativa_ctx["detalles"]
-                        return payload
-                except Exception as e:
-                    logging.warning(
-                        f"Fallback generar_narrativa_contextual falló: {e}")
-        except Exception:
-            pass
 
-        # 3) No-op fallback
-        return payload
-    # =========================
+def _resolve_handler(endpoint: str):
+    if not endpoint:
+        return None, None
 
-    # === 🔍 BÚSQUEDA AUTOMÁTICA EN MEMORIA SEMÁNTICA (SIEMPRE PRIMERO) ===
-    docs_sem = []
-    narrativa_texto = None
-    narrativa_contextual = None
-    body = {}
-    agent_id = None
+    path = endpoint.strip()
+    if not path.startswith("/"):
+        path = "/" + path
+    if not path.startswith("/api/"):
+        path = "/api" + path
 
-    # 🔥 EXTRAER CONSULTA DEL USUARIO PRIMERO
-    try:
-        body = req.get_json() or {}
-    except ValueError:
-        body = dict(req.params)
-    if not thread_id:
-        thread_id = body.get("thread_id") or body.get(
-            "session_id") or thread_id
-
-    if not thread_id:
-        thread_id = (
-            body.get("thread_id")
-            or body.get("session_id")
-            or req.params.get("thread_id")
-            or req.params.get("session_id")
-            or session_id
-        )
+    # Excepción explícita para escribir-archivo-local
+    if endpoint == "escribir-archivo-local" or path == "/api/escribir-archivo-local":
+        # 1) Buscar en globals y en el manifiesto de rutas
+        fn = _route_handler("escribir_archivo_local_http")
+        if fn:
+            return path, fn
+        # 2) Buscar en funciones registradas en app
+        for f in app.get_functions():
+            if getattr(f, "name", None) == "escribir_archivo_local_http":
+                return path, f.get_user_function()  # <--- aquí está el handler real
 
-    consulta_usuario = (
-        body.get("mensaje") or
-        body.get("consulta") or
-        body.get("query") or
-        req.params.get("q") or
-        req.params.get("mensaje") or
-        "en qué quedamos"
-    )
+    # Otras excepciones
+    name = _INVOCAR_EXCEPTIONS.get(path) or _INVOCAR_EXCEPTIONS.get(endpoint)
+    if name:
+        fn = _route_handler(name)
+        if fn:
+            return path, fn
+        for f in app.get_functions():
+            if getattr(f, "name", None) == name:
+                return path, f.get_user_function()
 
-    # 🧠 BUSCAR EN MEMORIA SEMÁNTICA SIEMPRE (OBLIGATORIO)
-    # 🔥 PRIORIDAD 1: Usar docs vectoriales del wrapper si existen
-    if memoria_previa and memoria_previa.get("docs_vectoriales"):
-        docs_sem = memoria_previa["docs_vectoriales"]
-        logging.info(
-            f"✅ COPILOTO: Usando {len(docs_sem)} docs vectoriales del wrapper")
-    else:
-        # PRIORIDAD 2: Buscar directamente si el wrapper no lo hizo
-        try:
-            from endpoints_search_memory import buscar_memoria_endpoint
+    # Heurística
+    stem = path[len("/api/"):]
+    cand = stem.replace("-", "_") + "_http"
+    fn = _route_handler(cand)
+    if fn:
+        return path, fn
+    for f in app.get_functions():
+        if getattr(f, "name", None) == cand:
+            return path, f.get_user_function()
 
-            logging.info(
-                f"🔍 COPILOTO: Búsqueda AUTOMÁTICA en memoria para: '{consulta_usuario}'")
+    return path, None
 
-            # Crear payload para buscar_memoria
-            memoria_payload = {
-                "query": consulta_usuario,
-                "session_id": session_id,
-                "top": 5
-            }
 
-            # Ejecutar búsqueda en memoria
-            memoria_result = buscar_memoria_endpoint(memoria_payload)
+# Helper claro para extraer JSON embebido dinámicamente
 
-            if memoria_result.get("exito") and memoria_result.get("documentos"):
-                docs_sem = memoria_result["documentos"]
-                logging.info(
-                    f"✅ COPILOTO: Memoria encontró {len(docs_sem)} documentos relevantes")
-            else:
-                logging.info(
-                    "ℹ️ COPILOTO: No se encontraron documentos en memoria")
-        except Exception as e:
-            logging.warning(f"⚠️ Error en búsqueda automática de memoria: {e}")
 
-    # === 🔍 INTEGRACIÓN ADICIONAL CON AZURE SEARCH (OPCIONAL) ===
+def extraer_json_instruccion(texto: str):
     try:
-        from services.azure_search_client import get_search_service
-        search = get_search_service()
-
-        consulta_usuario = (
-            body.get("mensaje") or
-            body.get("consulta") or
-            body.get("query") or
-            req.params.get("q") or
-            req.params.get("mensaje") or
-            "en qué quedamos"
-        )
+        # Expresión clara que detecta JSON dentro de markdown ```
+        matches = re.findall(r'```json\s*(\{.*?\})\s*```', texto, re.DOTALL)
+        if matches:
+            instruccion = json.loads(matches[0])
+            intencion = instruccion.get(
+                'endpoint') or instruccion.get('intencion')
+            parametros = instruccion.get(
+                'data') or instruccion.get('parametros') or {}
+            return intencion, parametros
+    except Exception as e:
+        logging.warning(f"No se pudo extraer JSON claramente: {e}")
+    return None, {}
 
-        # ROUTER SEMANTICO DINAMICO - EJECUTAR PRIMERO
-        from intelligent_intent_detector import analizar_intencion_semantica
-        clasificacion_router = analizar_intencion_semantica(
-            consulta_usuario) or {}
-        endpoint_sugerido_router = clasificacion_router.get(
-            "endpoint_sugerido")
+# Procesamiento dinámico seguro (invocación de endpoints existentes)
 
-        if endpoint_sugerido_router:
-            logging.info(
-                f"ROUTER EARLY: Redirigiendo a {endpoint_sugerido_router}")
 
-            resultado_router = invocar_endpoint_directo_seguro(
-                endpoint=endpoint_sugerido_router,
-                method="GET",
-                params={"query": consulta_usuario, "session_id": session_id}
-            )
+def procesar_intencion_hybrid(intencion: str, parametros: dict):
+    try:
+        endpoint_url = f"{os.environ['FUNCTION_BASE_URL']}/api/{intencion}"
+        method = parametros.pop('method', 'POST').upper()
 
-            if resultado_router.get("exito"):
-                logging.info(f"ROUTER EARLY: Redireccion exitosa")
-                return func.HttpResponse(
-                    json.dumps(resultado_router.get(
-                        "data", resultado_router), ensure_ascii=False),
-                    mimetype="application/json",
-                    status_code=200
-                )
+        # Solicitud dinámica al endpoint (sin predefinir estructuras)
+        response = requests.request(
+            method, endpoint_url, json=parametros, timeout=30)
 
-        filtros = []
-        if session_id:
-            filtros.append(f"session_id eq '{session_id}'")
-        filter_str = " and ".join(filtros) if filtros else None
+        try:
+            data = response.json()
+        except:
+            data = {"raw_response": response.text}
 
-        logging.info(f"🔍 COPILOTO: Búsqueda semántica: '{consulta_usuario}'")
-        busqueda = search.search(
-            query=consulta_usuario, top=5, filters=filter_str)
-        docs_sem = busqueda.get(
-            "documentos", []) if busqueda.get("exito") else []
-        logging.info(
-            f"✅ Azure Search devolvió {len(docs_sem)} documentos semánticos")
+        return {
+            "exito": response.ok,
+            "status_code": response.status_code,
+            "data": data
+        }
 
-        # 🔥 NO RETORNAR INMEDIATAMENTE - Hacer MERGE primero
-        # Guardar docs_sem para usar después del merge
-        logging.info(
-            f"🔥 COPILOTO: Docs vectoriales guardados para MERGE posterior")
     except Exception as e:
-        logging.warning(f"⚠️ Error integrando búsqueda semántica: {e}")
-
-    from intelligent_intent_detector import integrar_con_validador_semantico_inteligente
-    from semantic_helpers import generar_sugerencias_contextuales, interpretar_con_contexto_semantico
-    from semantic_query_builder import interpretar_intencion_agente, construir_query_dinamica, ejecutar_query_cosmos
-
-    logging.info('🤖 Copiloto Semántico activado')
+        logging.error(
+            f"Error invocando endpoint dinámico '{intencion}': {str(e)}")
+        return {"exito": False, "error": str(e)}
 
-    # 🧠 OBTENER CONTEXTO SEMÁNTICO DEL WRAPPER AUTOMÁTICO
-    contexto_semantico = getattr(req, '_contexto_semantico', {}) or {}
-    memoria_previa = getattr(req, '_memoria_contexto', {}) or {}
 
-    # 🔥 CORRECCIÓN 1: Tolerancia a GET sin JSON
+def process_direct_command(command: dict) -> func.HttpResponse:
+    """Procesa un comando directo sin agent_response wrapper"""
     try:
-        body = req.get_json() or {}
-    except ValueError:
         logging.info(
-            "⚠️ GET sin JSON detectado, usando querystring como fallback")
-        body = dict(req.params)
-
-    comando = body.get("mensaje") or body.get(
-        "comando") or body.get("consulta") or "sin_comando"
-
-    # 🔍 DETECCIÓN DE QUERIES DINÁMICAS PARA MEMORIA
-    params_agente = dict(req.params)
-    params_completos = {**params_agente, **body}
-
-    # Detectar si el agente solicita consulta avanzada de memoria
-    usar_query_dinamica = any([
-        params_completos.get("tipo"),
-        params_completos.get("contiene"),
-        params_completos.get("endpoint"),
-        params_completos.get("exito") is not None,
-        params_completos.get("fecha_inicio"),
-        params_completos.get("fecha_fin"),
-        "historial" in comando.lower() and any(
-            k in params_completos for k in ["tipo", "contiene", "endpoint"])
-    ])
-
-    if usar_query_dinamica:
-        logging.info(
-            f"🔍 COPILOTO: Query dinámica detectada, redirigiendo a query builder")
-
-        # Interpretar intención del agente
-        intencion_params = interpretar_intencion_agente(
-            params_completos.get("query", params_completos.get("mensaje", "")),
-            dict(req.headers)
-        )
-
-        # Sobrescribir con parámetros explícitos
-        for key in ["tipo", "contiene", "endpoint", "exito", "fecha_inicio", "fecha_fin", "orden", "limite"]:
-            if key in params_completos:
-                intencion_params[key] = params_completos[key]
-
-        # Asegurar session_id
-        intencion_params["session_id"] = session_id or "unknown"
-
-        try:
-            # Construir y ejecutar query SQL dinámica
-            query_sql = construir_query_dinamica(**intencion_params)
-            cosmos_container = memory_service.memory_container
-            resultados = ejecutar_query_cosmos(query_sql, cosmos_container)
-
-            limit = int(intencion_params.get("limite", 10))
-            interacciones_formateadas = []
-            eventos_dinamicos: List[Dict[str, Any]] = []
-
-            for i, item in enumerate(resultados[:limit]):
-                registro = {
-                    "numero": i + 1,
-                    "timestamp": item.get("timestamp", ""),
-                    "endpoint": item.get("endpoint", ""),
-                    "texto_semantico": item.get("texto_semantico", ""),
-                    "exito": item.get("exito", True),
-                    "tipo": item.get("tipo", "interaccion_usuario")
-                }
-                interacciones_formateadas.append(registro)
-                eventos_dinamicos.append(
-                    build_event(
-                        endpoint=registro["endpoint"] or "copiloto",
-                        descripcion=registro[
-                            "texto_semantico"] or f"Interacción en {registro['endpoint']}",
-                        estado="exito" if registro["exito"] else "error",
-                        sugerencia="",
-                        criticidad="informativa",
-                        datos={
-                            "timestamp": registro["timestamp"],
-                            "tipo": registro["tipo"]
-                        },
-                        timestamp=registro["timestamp"]
-                    )
-                )
-
-            if not eventos_dinamicos:
-                eventos_dinamicos.append(
-                    build_event(
-                        endpoint="copiloto",
-                        descripcion="Sin interacciones que coincidan con los filtros solicitados.",
-                        estado="informativo",
-                        sugerencia="",
-                        criticidad="informativa",
-                        datos={"query_aplicada": True}
-                    )
-                )
+            f"Procesando comando directo: {command.get('endpoint', 'unknown')}")
 
-            extras = {
-                "interacciones": interacciones_formateadas,
-                "total": len(resultados),
-                "query_dinamica_aplicada": True,
-                "filtros_aplicados": intencion_params,
-                "metadata": {
-                    "query_sql": query_sql[:200] + "...",
-                    "timestamp": datetime.now().isoformat(),
-                    "dispatcher": "copiloto"
-                }
+        # Mapear a la estructura esperada
+        if command.get("endpoint") == "ejecutar":
+            resultado = procesar_intencion_semantica(
+                command.get("intencion", ""),
+                command.get("parametros", {})
+            )
+        elif command.get("endpoint") == "copiloto":
+            # Simular llamada a copiloto
+            resultado = {
+                "tipo": "respuesta_semantica",
+                "comando_original": command.get("mensaje", ""),
+                "accion": "procesado",
+                "resultado": {"exito": True}
             }
-            contexto_resp = {
-                "session_id": session_id,
-                "tiene_memoria": bool(memoria_previa and memoria_previa.get("tiene_historial")),
-                "total_interacciones": memoria_previa.get("total_interacciones", 0) if isinstance(memoria_previa, dict) else 0,
-                "resumen": memoria_previa.get("resumen_conversacion", "") if isinstance(memoria_previa, dict) else ""
+        elif command.get("endpoint") == "status":
+            resultado = build_status()
+        else:
+            resultado = {
+                "exito": False,
+                "error": f"Endpoint {command.get('endpoint')} no reconocido"
             }
-            respuesta_struct = build_structured_payload(
-                "copiloto",
-                eventos_dinamicos,
-                narrativa_base="",
-                resumen_automatico="",
-                extras=extras,
-                contexto_inteligente=contexto_resp,
-                exito=True
-            )
-            respuesta_struct.update({
-                "session_id": session_id,
-                "agent_id": req.headers.get("Agent-ID", "unknown"),
-                "fuente": "wrapper_automatico",
-                "validation_applied": True,
-                "validation_stats": {
-                    "checked": len(interacciones_formateadas),
-                    "missing_text_semantic": 0,
-                    "generated_fallbacks": 0
-                }
-            })
-            respuesta_struct["mensaje"] = ""
-            respuesta_struct["respuesta_usuario"] = ""
 
-            # Aplicar narrativa (usa helper local que evita NameError)
-            respuesta_struct = _inyectar_narrativa(respuesta_struct)
+        return func.HttpResponse(
+            json.dumps(resultado, indent=2, ensure_ascii=False),
+            mimetype="application/json"
+        )
 
-            return func.HttpResponse(
-                json.dumps(respuesta_struct, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=200
-            )
-        except Exception as e:
-            logging.error(
-                f"❌ Error ejecutando query dinámica en copiloto: {e}")
-            # Continuar con flujo normal si falla
+    except Exception as e:
+        return func.HttpResponse(
+            json.dumps({
+                "error": str(e),
+                "command_received": command
+            }, indent=2),
+            mimetype="application/json",
+            status_code=500
+        )
 
-    # Extraer consulta del request
-    limit = {}
-    contexto_detectado: Dict[str, Any] = {}
-    consulta = ""
-    try:
-        consulta = body.get("consulta") or body.get(
-            "query") or body.get("mensaje") or body.get("prompt") or ""
 
-        if consulta:
-            # 🧠 CLASIFICACIÓN SEMÁNTICA ROBUSTA PARA DETECTAR INTENCIÓN DE CONTEXTO
-            from intelligent_intent_detector import analizar_intencion_semantica
+def generate_semantic_explanation(command: dict) -> str:
+    """Genera una explicación semántica para un comando JSON"""
 
-            clasificacion = analizar_intencion_semantica(consulta) or {}
+    intencion = command.get("intencion", "")
+    urgencia = command.get("contexto", {}).get("urgencia", "normal")
 
-            # 🎯 ROUTER SEMÁNTICO DINAMICO
-            endpoint_sugerido = clasificacion.get("endpoint_sugerido")
-            if endpoint_sugerido:
-                logging.info(f"🔀 Redirigiendo a {endpoint_sugerido}")
+    explanations = {
+        "dashboard": "📊 Voy a generar el dashboard con insights del proyecto",
+        "diagnosticar:completo": "🔍 Realizaré un diagnóstico completo del sistema",
+        "guia:debug_errores": "🛠️ Te guiaré paso a paso para resolver el error",
+        "buscar": "🔎 Buscaré archivos en el proyecto",
+        "ejecutar:azure": "☁️ Ejecutaré el comando Azure CLI solicitado"
+    }
 
-                resultado = invocar_endpoint_directo_seguro(
-                    endpoint=endpoint_sugerido,
-                    method="GET",
-                    params={"query": consulta,
-                            "session_id": session_id}
-                )
+    # Buscar explicación base
+    base_explanation = None
+    for key, explanation in explanations.items():
+        if key in intencion:
+            base_explanation = explanation
+            break
 
-                if resultado.get("exito"):
-                    return func.HttpResponse(
-                        json.dumps(resultado.get("data", resultado),
-                                   ensure_ascii=False),
-                        mimetype="application/json",
-                        status_code=200
-                    )
+    if not base_explanation:
+        base_explanation = f"Procesando intención: {intencion}"
 
-            tipo_intencion = clasificacion.get("tipo", "")
-            confianza = clasificacion.get("confianza", 0)
+    # Agregar contexto de urgencia si es alta
+    if urgencia == "alta":
+        base_explanation = f"⚠️ URGENCIA ALTA: {base_explanation}"
+    elif urgencia == "critica":
+        base_explanation = f"🚨 CRÍTICO: {base_explanation}"
 
-            logging.info(
-                f"🎯 ROUTER: Intención={tipo_intencion}, Confianza={confianza}")
-
-            # 🔥 ROUTER SEMANTICO DINAMICO
-            if tipo_intencion and confianza > 0.5:
-                if tipo_intencion == "leer_archivo":
-                    resultado_flujo = ejecutar_busqueda_cli_y_leer_archivo(
-                        consulta,
-                        session_id=session_id,
-                        patron_preferido=clasificacion.get("archivo_objetivo")
-                    )
-                    status_code = 200 if resultado_flujo.get("exito") else 202
-                    return func.HttpResponse(
-                        json.dumps(resultado_flujo, ensure_ascii=False),
-                        mimetype="application/json",
-                        status_code=status_code
-                    )
+    return base_explanation
 
-                endpoint_map = {
-                    "ejecutar_comando_cli": ("/api/ejecutar-cli", "POST", {"comando": consulta}),
-                    "listar_storage": ("/api/listar-blobs", "GET", None),
-                    "buscar_memoria": ("/api/buscar-memoria", "POST", {"query": consulta}),
-                    "diagnostico_sistema": ("/api/diagnostico-recursos-completo", "GET", None),
-                    "crear_recurso": ("/api/crear-contenedor", "POST", {"nombre": consulta}),
-                }
 
-                if tipo_intencion in endpoint_map:
-                    endpoint, method, payload = endpoint_map[tipo_intencion]
-                    logging.info(f"🔄 ROUTER: Redirigiendo a {endpoint}")
-                    return func.HttpResponse(
-                        json.dumps(invocar_endpoint_directo_seguro(
-                            endpoint, method, body=payload), ensure_ascii=False),
-                        mimetype="application/json",
-                        status_code=200
-                    )
+def execute_hybrid_command(command: dict) -> dict:
+    """Ejecuta un comando del agente con mejor manejo de errores"""
+    try:
+        logging.info(f'Ejecutando comando: {command}')
 
-            # Detectar patrones específicos de consultas de contexto/memoria
-            contexto_detectado = detectar_consulta_contexto_semantica(consulta) or {
-            }
+        endpoint = command.get("endpoint", "ejecutar")
 
-            # Combinar clasificación semántica con detección de contexto
-            if contexto_detectado.get("es_contexto") and contexto_detectado.get("confianza", 0) > 0.6:
-                logging.info(
-                    f"🧠 Consulta de contexto detectada: {contexto_detectado.get('tipo')} (confianza: {contexto_detectado.get('confianza'):.2f})")
-
-                # 🔥 APLICAR WRAPPER PARA OBTENER CONTEXTO SEMÁNTICO
-                from cosmos_memory_direct import aplicar_memoria_cosmos_directo
-                temp_response = {"procesando_consulta": True,
-                                 "intencion_clasificada": contexto_detectado.get('tipo')}
-                temp_response = aplicar_memoria_cosmos_directo(
-                    req, temp_response) or {}
-                temp_response = _as_dict(temp_response)
-
-                interacciones = memoria_previa.get(
-                    "interacciones_recientes", []) or []
-                eventos_contexto: List[Dict[str, Any]] = []
-                for item in interacciones[:limit]:
-                    registro = item.get("data", item)
-                    texto = registro.get("texto_semantico") or item.get(
-                        "texto_semantico") or ""
-                    if not texto:
-                        continue
-                    descripcion_evento, detalle_evento = _descripcion_evento(
-                        {
-                            "endpoint": registro.get("endpoint"),
-                            "timestamp": registro.get("timestamp"),
-                            "exito": registro.get("exito", True),
-                            "params": registro.get("params", {}),
-                            "consulta": registro.get("consulta")
-                        },
-                        texto
-                    )
-                    eventos_contexto.append(
-                        build_event(
-                            endpoint=registro.get("endpoint", "copiloto"),
-                            descripcion=descripcion_evento,
-                            estado="exito" if registro.get(
-                                "exito", True) else "error",
-                            sugerencia="",
-                            criticidad="informativa",
-                            datos={
-                                "timestamp": registro.get("timestamp", ""),
-                                "tipo": registro.get("tipo", "interaccion_usuario"),
-                                "texto_original": texto,
-                                "detalle": detalle_evento
-                            },
-                            timestamp=registro.get("timestamp", "")
-                        )
-                    )
+        if endpoint == "ejecutar":
+            intencion = command.get("intencion", "")
+            parametros = command.get("parametros", {})
 
-                if not eventos_contexto:
-                    eventos_contexto.append(
-                        build_event(
-                            endpoint="copiloto",
-                            descripcion="Sin interacciones previas para contextualizar esta consulta.",
-                            estado="informativo",
-                            sugerencia="",
-                            criticidad="informativa"
-                        )
-                    )
+            # Llamar al procesador semántico
+            resultado = procesar_intencion_semantica(intencion, parametros)
 
-                extras_contexto = {
-                    "interacciones": interacciones,
-                    "contexto_inteligente": temp_response.get("contexto_inteligente", {}),
-                    "interpretacion_semantica": temp_response.get("interpretacion_semantica", ""),
-                    "clasificacion_contexto": contexto_detectado,
-                    "metadata": temp_response.get("metadata", {})
+            # Asegurar que el resultado tenga la estructura esperada
+            if not isinstance(resultado, dict):
+                resultado = {
+                    "exito": False,
+                    "error": f"Resultado inesperado del procesador: {type(resultado).__name__}",
+                    "resultado_original": str(resultado)
                 }
 
-                respuesta_struct = build_structured_payload(
-                    "copiloto",
-                    eventos_contexto,
-                    narrativa_base="",
-                    resumen_automatico="",
-                    extras=extras_contexto,
-                    contexto_inteligente=temp_response.get(
-                        "contexto_inteligente"),
-                    exito=True
-                )
-                respuesta_struct.update({
-                    "session_id": session_id,
-                    "agent_id": req.headers.get("Agent-ID", "unknown"),
-                    "fuente": "wrapper_automatico",
-                    "validation_applied": True
-                })
-                respuesta_struct["mensaje"] = ""
-                respuesta_struct = _inyectar_narrativa(respuesta_struct)
-
-                return func.HttpResponse(
-                    json.dumps(respuesta_struct, ensure_ascii=False),
-                    mimetype="application/json",
-                    status_code=200
-                )
-
-            # 🔍 DETECCIÓN INTELIGENTE DE BING GROUNDING (para otras consultas)
-            # 🔥 NO RETORNAR - Solo enriquecer contexto
-            try:
-                bing_result = integrar_con_validador_semantico_inteligente(
-                    req, consulta, memoria_previa) or {}
-
-                # 🔥 CAMBIO: No retornar inmediatamente, guardar para enriquecer después del MERGE
-                if isinstance(bing_result.get("respuesta_final"), (dict, list, str)):
-                    logging.info(
-                        "🔍 Bing Grounding ejecutado, guardando para MERGE posterior")
-                    # Guardar en variable para usar después del MERGE
-                    setattr(req, '_bing_enrichment',
-                            bing_result.get("respuesta_final"))
-                    # NO RETORNAR AQUÍ - continuar al MERGE
-
-                # Si se detectó necesidad de Bing pero falló, continuar con nota
-                if bing_result.get("bing_fallido"):
-                    logging.info(
-                        f"🔍 Bing Grounding detectado pero falló, continuando con flujo normal")
-            except Exception as redirect_error:
-                logging.warning(f"Error en redirección: {redirect_error}")
-                # Continuar con flujo normal si falla la redirección
-
-    except Exception as e:
-        logging.error(f"Error en detección Bing: {e}")
-        # Continuar con flujo normal si hay error
-
-    # 🔥 EXTRAER MENSAJE DE BODY JSON (prioridad) O PARAMS (fallback)
-    mensaje = (
-        body.get("mensaje") or
-        body.get("consulta") or
-        body.get("query") or
-        req.params.get('mensaje') or
-        req.params.get('consulta') or
-        req.params.get('q') or
-        ""
-    )
-
-    logging.info(
-        f"🔍 COPILOTO: Mensaje extraído: '{mensaje}' (body={bool(body.get('mensaje'))}, params={bool(req.params.get('mensaje'))})")
-
-    # ✅ Fallback final: intentar al menos devolver narrativa contextual
-    try:
-        narrativa_fallback = generar_narrativa_contextual(
-            session_id=session_id,
-            thread_id=thread_id,
-            query=mensaje or consulta or consulta_usuario or ""
-        )
-    except Exception as fallback_err:
-        narrativa_fallback = None
-        logging.warning(
-            f"⚠️ Fallback narrativa no disponible: {fallback_err}")
-
-    if narrativa_fallback and (narrativa_fallback.get("texto") or narrativa_fallback.get("mensajes")):
-        logging.info("✅ Fallback de narrativa contextual aplicado")
-        mensajes_fmt = narrativa_fallback.get(
-            "mensajes") or narrativa_fallback.get("mensajes_formateados") or []
-        texto_base = _construir_resumen_narrativo(
-            narrativa_fallback) or narrativa_fallback.get("texto", "").strip()
-
-        payload_fallback = {
-            "exito": True,
-            "respuesta_usuario": texto_base,
-            "texto_semantico": texto_base,
-            "metadata": {
-                "fuente": "narrativa_enriquecida",
-                "thread_id": narrativa_fallback.get("thread_id"),
-                "blob": narrativa_fallback.get("fuente_blob"),
-                "mensajes_recuperados": len(mensajes_fmt),
-                "session_id": narrativa_fallback.get("session_id"),
-                "fragmento_conversacion": mensajes_fmt[:3],
-                "wrapper_aplicado": True,
-                "memoria_aplicada": True,
-                "interacciones_previas": narrativa_fallback.get("total_interacciones", 0)
-            },
-            "timestamp": datetime.now().isoformat()
-        }
-        return func.HttpResponse(
-            json.dumps(payload_fallback, ensure_ascii=False),
-            mimetype="application/json",
-            status_code=200
-        )
-
-    return func.HttpResponse(
-        json.dumps({
-            "exito": False,
-            "error": "No se procesó la solicitud correctamente",
-            "mensaje": "El endpoint no generó una respuesta válida",
-            "timestamp": datetime.now().isoformat()
-        }, ensure_ascii=False),
-        mimetype="application/json",
-        status_code=500
-    )
-
-
-def detectar_consulta_contexto_semantica(consulta: str) -> dict:
-    """Detecta si la consulta es sobre contexto/memoria usando análisis semántico robusto"""
-    consulta_lower = consulta.lower().strip()
-
-    # Patrones semánticos para consultas de contexto
-    patrones_contexto = {
-        "recuperar_anterior": [
-            r"qué.*habíamos.*detectado",
-            r"qué.*detect.*antes",
-            r"cuál.*problema.*anterior",
-            r"recuérdame.*diagnóstico",
-            r"qué.*pasó.*antes"
-        ],
-        "estado_sesion": [
-            r"en.*qué.*estábamos",
-            r"dónde.*quedamos",
-            r"cuál.*estado.*actual",
-            r"seguimos.*con.*errores"
-        ],
-        "resumen_actividad": [
-            r"resumen.*sesión",
-            r"qué.*hicimos.*último",
-            r"actividad.*reciente",
-            r"historial.*interacciones"
-        ]
-    }
+            return resultado
 
-    # Evaluar cada patrón
-    for tipo, patrones in patrones_contexto.items():
-        for patron in patrones:
-            if re.search(patron, consulta_lower):
+        elif endpoint == "copiloto":
+            mensaje = command.get("mensaje", "")
+            if mensaje.startswith("leer:"):
+                archivo = mensaje.split(":", 1)[1]
+                return leer_archivo_dinamico(archivo)
+            elif mensaje.startswith("buscar:"):
+                patron = mensaje.split(":", 1)[1]
+                return buscar_archivos_semantico(patron)
+            else:
                 return {
-                    "es_contexto": True,
-                    "tipo": tipo,
-                    "confianza": 0.9,
-                    "patron_detectado": patron
+                    "exito": True,
+                    "mensaje": f"Comando copiloto procesado: {mensaje}",
+                    "tipo": "copiloto_response"
                 }
 
-    # Palabras clave de respaldo con menor confianza
-    palabras_contexto = ["antes", "habíamos",
-                         "detectado", "anterior", "resumen", "estábamos"]
-    coincidencias = sum(
-        1 for palabra in palabras_contexto if palabra in consulta_lower)
+        elif endpoint == "status":
+            return build_status()
+
+        else:
+            return {
+                "exito": False,
+                "error": f"Endpoint '{endpoint}' no implementado",
+                "endpoints_disponibles": ["ejecutar", "copiloto", "status"]
+            }
 
-    if coincidencias >= 2:
+    except Exception as e:
+        logging.error(f"Error ejecutando comando: {str(e)}")
         return {
-            "es_contexto": True,
-            "tipo": "consulta_general_contexto",
-            "confianza": min(0.7, coincidencias * 0.2),
-            "patron_detectado": "palabras_clave_multiples"
+            "exito": False,
+            "error": str(e),
+            "tipo_error": type(e).__name__,
+            "comando_fallido": command
         }
 
-    return {
-        "es_contexto": False,
-        "tipo": "no_contexto",
-        "confianza": 0.1,
-        "patron_detectado": "ninguno"
-    }
 
+def generate_user_friendly_response(processed: dict, execution_result: dict) -> str:
+    """Genera una respuesta amigable para el usuario"""
 
-def generar_respuesta_contextual_usuario(consulta: str, contexto_inteligente: dict, interpretacion_semantica: str, memoria_previa: dict, intencion_detectada: str = "") -> dict:
-    """Genera respuesta orientada al usuario basada en contexto semántico e intención clasificada"""
+    parts = []
 
-    # Extraer información clave
-    resumen_inteligente = contexto_inteligente.get("resumen_inteligente", "")
-    total_analizado = contexto_inteligente.get("total_analizado", 0)
-    modo_operacion = contexto_inteligente.get("modo_operacion", "")
+    # Agregar explicación semántica
+    if processed.get("semantic_explanation"):
+        parts.append(processed["semantic_explanation"])
 
-    # Construir respuesta natural basada en intención semántica
-    if intencion_detectada == "recuperar_contexto" or intencion_detectada == "diagnosticar_sistema":
-        if resumen_inteligente:
-            respuesta_natural = f"Anteriormente: {resumen_inteligente}. "
-        else:
-            respuesta_natural = "Se ejecutaron verificaciones del sistema. "
+    # Agregar resultado de ejecución
+    if execution_result.get("exito"):
+        parts.append("\n✅ Comando ejecutado exitosamente")
 
-        if interpretacion_semantica:
-            respuesta_natural += f"Intención detectada: {interpretacion_semantica.split('(')[0].strip()}. "
+        # Agregar detalles relevantes
+        if execution_result.get("resultado"):
+            if isinstance(execution_result["resultado"], dict):
+                # Extraer información importante
+                if "dashboard" in str(processed.get("command", {})).lower():
+                    parts.append(
+                        "\n📊 Dashboard generado con las siguientes secciones:")
+                    for seccion in execution_result["resultado"].get("secciones", {}).keys():
+                        parts.append(f"  • {seccion}")
 
-        if total_analizado > 0:
-            respuesta_natural += f"Total de {total_analizado} interacciones analizadas."
+    else:
+        error_msg = execution_result.get("error", "Error desconocido")
+        parts.append(f"\n❌ Error: {error_msg}")
 
-    elif intencion_detectada == "consultar_historial":
-        if modo_operacion:
-            respuesta_natural = f"Sesión en modo {modo_operacion}. "
-        else:
-            respuesta_natural = "Sesión enfocada en diagnóstico. "
+        # Sugerir acciones de recuperación
+        if execution_result.get("sugerencias"):
+            parts.append("\n💡 Sugerencias:")
+            for sug in execution_result["sugerencias"]:
+                parts.append(f"  • {sug}")
 
-        if resumen_inteligente:
-            respuesta_natural += f"Contexto: {resumen_inteligente}."
+    # Agregar próximas acciones
+    if processed.get("next_actions"):
+        parts.append("\n\n📌 Próximas acciones disponibles:")
+        for action in processed["next_actions"]:
+            parts.append(f"  • {action}")
 
-    elif intencion_detectada == "resumen_sesion":
-        respuesta_natural = f"Resumen: "
-        if resumen_inteligente:
-            respuesta_natural += resumen_inteligente
-        else:
-            respuesta_natural += "Tareas de verificación y diagnóstico completadas."
+    return "\n".join(parts)
 
-    else:  # fallback para intenciones no específicas
-        respuesta_natural = f"Contexto disponible: "
-        if resumen_inteligente:
-            respuesta_natural += resumen_inteligente
-        else:
-            respuesta_natural += "Sistema en funcionamiento normal."
 
-    return {
-        "tipo": "respuesta_contextual",
-        "respuesta_usuario": respuesta_natural,
-        "intencion_clasificada": intencion_detectada,
-        "contexto_aplicado": {
-            "total_analizado": total_analizado,
-            "modo_operacion": modo_operacion,
-            "interpretacion": interpretacion_semantica
-        },
-        "metadata": {
-            "timestamp": datetime.now().isoformat(),
-            "consulta_original": consulta,
-            "fuente": "clasificador_semantico_robusto"
-        }
-    }
+# Excepciones de nombre (handlers que no siguen *_http)
+_INVOCAR_EXCEPTIONS = {
+    "/api/health": "health",
+    "/api/status": "status",
+    "/api/copiloto": "copiloto",
+    "/api/escribir-archivo-local": "escribir_archivo_local_http",
+    "escribir-archivo-local": "escribir_archivo_local_http",
+}
 
 
-def generar_proximas_acciones(intencion: str, resultado: dict) -> list:
-    """Genera sugerencias de próximas acciones basadas en el resultado"""
-    acciones = []
+def generar_sugerencias_locales(query: str) -> list:
+    """Genera sugerencias locales cuando Bing Grounding falla"""
+    query_lower = query.lower()
+    sugerencias = []
 
-    if "generar" in intencion and resultado.get("exito"):
-        acciones.extend([
-            "leer:archivo generado",
-            "analizar:calidad",
-            "ejecutar:pruebas"
+    if "cosmos" in query_lower:
+        sugerencias.extend([
+            "az cosmosdb list --output json",
+            "az cosmosdb show --name <nombre> --resource-group <grupo>",
+            "az cosmosdb database list --account-name <cuenta>"
         ])
-    elif "buscar" in intencion:
-        acciones.extend([
-            "leer:primer resultado",
-            "analizar:resultados",
-            "filtrar:por tipo"
+
+    if "storage" in query_lower:
+        sugerencias.extend([
+            "az storage account list --output json",
+            "az storage account show --name <nombre>",
+            "az storage container list --account-name <cuenta>"
         ])
-    elif "diagnosticar" in intencion:
-        acciones.extend([
-            "corregir:problemas detectados",
-            "optimizar:rendimiento",
-            "generar:reporte"
+
+    if "resource" in query_lower or "grupo" in query_lower:
+        sugerencias.extend([
+            "az group list --output json",
+            "az group show --name <nombre>",
+            "az resource list --resource-group <grupo>"
         ])
 
-    return acciones[:5]  # Limitar a 5 sugerencias
+    if not sugerencias:
+        sugerencias = [
+            "az --help",
+            "az account show",
+            "az group list",
+            "az storage account list"
+        ]
 
+    return sugerencias[:5]  # Máximo 5 sugerencias
 
-# --- PARSER ROBUSTO PARA AGENT RESPONSE ---
-def clean_agent_response(agent_response: str) -> dict:
-    """
-    Parser ultra-flexible que acepta cualquier formato de texto
-    """
+
+# --------- CREAR ----------
+def crear_archivo(ruta: str, contenido: str) -> dict:
+    """Crea un nuevo archivo en el proyecto con validaciones robustas"""
     try:
-        logging.info(f"🔍 Parseando: {agent_response[:50]}...")
+        # Validación de entrada
+        if not ruta or not isinstance(ruta, str):
+            return {
+                "exito": False,
+                "error": "La ruta no puede estar vacía y debe ser una cadena válida",
+                "tipo_operacion": "crear_archivo"
+            }
 
-        # Caso 1: JSON directo
-        try:
-            direct_json = json.loads(agent_response)
-            if isinstance(direct_json, dict):
-                logging.info("✅ JSON directo detectado")
-                # Asegurar campos mínimos
-                if "endpoint" not in direct_json and "intencion" not in direct_json:
-                    direct_json["endpoint"] = "copiloto"
-                return direct_json
-        except json.JSONDecodeError:
-            pass
+        if contenido is None:
+            contenido = ""  # Permitir archivos vacíos
 
-        # Caso 2: Comandos simples
-        clean_text = agent_response.strip().lower()
-        simple_commands = {
-            "ping": {"endpoint": "status"},
-            "status": {"endpoint": "status"},
-            "health": {"endpoint": "status"},
-            "estado": {"endpoint": "status"},
-            "dashboard": {"endpoint": "ejecutar", "intencion": "dashboard"},
-            "diagnostico": {"endpoint": "ejecutar", "intencion": "diagnosticar:completo"}
-        }
+        # Validación de caracteres en la ruta
+        caracteres_invalidos = ['?', '*', '<', '>', '|', ':', '"']
+        if any(c in ruta for c in caracteres_invalidos):
+            return {
+                "exito": False,
+                "error": f"La ruta contiene caracteres inválidos: {', '.join(caracteres_invalidos)}",
+                "tipo_operacion": "crear_archivo"
+            }
 
-        if clean_text in simple_commands:
-            logging.info(f"✅ Comando simple: {clean_text}")
-            return simple_commands[clean_text]
+        # Normalizar la ruta (eliminar barras duplicadas y espacios)
+        ruta = ruta.strip().replace('\\', '/').replace('//', '/')
 
-        # Caso 3: JSON embebido en markdown
-        patterns = [
-            r"```json\s*(\{.*?\})\s*```",
-            r"```\s*(\{.*?\})\s*```",
-            r"(\{[^}]*\"endpoint\"[^}]*\})"
-        ]
+        if IS_AZURE:
+            # Creación en Azure Blob Storage
+            client = get_blob_client()
+            if not client:
+                return {
+                    "exito": False,
+                    "error": "No se pudo obtener el cliente de Blob Storage. Verifica la configuración de conexión",
+                    "tipo_operacion": "crear_archivo",
+                    "diagnostico": "Revisa AZURE_STORAGE_CONNECTION_STRING o las credenciales de Managed Identity"
+                }
 
-        for pattern in patterns:
-            match = re.search(pattern, agent_response,
-                              re.DOTALL | re.IGNORECASE)
-            if match:
-                try:
-                    parsed_json = json.loads(match.group(1).strip())
-                    if isinstance(parsed_json, dict):
-                        logging.info("✅ JSON embebido encontrado")
-                        return parsed_json
-                except json.JSONDecodeError:
-                    continue
+            try:
+                container_client = client.get_container_client(CONTAINER_NAME)
+                blob_client = container_client.get_blob_client(ruta)
+                blob_client.upload_blob(contenido, overwrite=True)
+                file_cache.invalidate(ruta)
+                return {
+                    "exito": True,
+                    "mensaje": f"Archivo creado exitosamente en Blob Storage: {ruta}",
+                    "ubicacion": f"blob://{CONTAINER_NAME}/{ruta}",
+                    "tipo_operacion": "crear_archivo",
+                    "tamaño_bytes": len(contenido.encode('utf-8'))
+                }
+            except Exception as blob_error:
+                return {
+                    "exito": False,
+                    "error": f"Error al interactuar con Blob Storage: {str(blob_error)}",
+                    "tipo_operacion": "crear_archivo",
+                    "tipo_error": type(blob_error).__name__,
+                    "sugerencia": "Verifica permisos del Storage Account y la existencia del contenedor"
+                }
 
-        # Caso 4: Fallback universal - cualquier texto se convierte en comando
-        logging.info("ℹ️ Usando fallback universal")
-        return {
-            "endpoint": "copiloto",
-            "mensaje": agent_response[:200],
-            "method": "GET"
-        }
+        else:
+            # --- Rama local ---
+            archivo_path = PROJECT_ROOT / ruta   # <- definir ANTES del try
+            try:
+                archivo_path.parent.mkdir(parents=True, exist_ok=True)
+                archivo_path.write_text(contenido, encoding='utf-8')
+                file_cache.invalidate(ruta, str(archivo_path))
+                return {
+                    "exito": True,
+                    "mensaje": f"Archivo creado exitosamente: {archivo_path.name}",
+                    "ubicacion": str(archivo_path),
+                    "tipo_operacion": "crear_archivo",
+                    "tamaño_bytes": len(contenido.encode('utf-8'))
+                }
+            except PermissionError:
+                return {
+                    "exito": False,
+                    "error": f"Sin permisos para crear el archivo en: {archivo_path.parent}",
+                    "tipo_operacion": "crear_archivo"
+                }
+            except OSError as os_error:
+                return {
+                    "exito": False,
+                    "error": f"Error del sistema operativo: {str(os_error)}",
+                    "tipo_operacion": "crear_archivo",
+                    "tipo_error": type(os_error).__name__
+                }
 
     except Exception as e:
-        logging.error(f"💥 Error en parser: {str(e)}")
         return {
-            "endpoint": "status",
-            "method": "GET"
+            "exito": False,
+            "error": f"Error inesperado al crear archivo: {str(e)}",
+            "tipo_operacion": "crear_archivo",
+            "tipo_error": type(e).__name__
         }
 
 
-def _get_endpoint_alternativo(campo_faltante: str, contexto: str = "") -> str:
-    """Determina endpoint alternativo según campo faltante"""
-    mapping = {
-        "resourceGroup": "/api/status",
-        "location": "/api/status",
-        "subscriptionId": "/api/status",
-        "storageAccount": "/api/listar-blobs"
-    }
-    return mapping.get(campo_faltante, "/api/status")
+# --------- MODIFICAR ----------
 
 
-def execute_parsed_command(command: dict) -> dict:
-    """
-    Ejecuta un comando ya parseado con máxima flexibilidad.
-    Acepta cualquier formato de payload y lo adapta automáticamente.
-    """
-    if not command:
-        return {"exito": False, "error": "Comando vacío"}
-
-    # Extraer endpoint con múltiples fallbacks
-    endpoint = (
-        command.get("endpoint") or
-        command.get("intencion") or
-        command.get("action") or
-        "copiloto"  # fallback por defecto
-    )
+def modificar_archivo(
+    ruta: str,
+    operacion: str,
+    contenido: Union[str, Dict[str, Any]] = "",
+    linea: int = -1,
+    body: Optional[dict] = None,
+) -> dict:
+    """Modifica un archivo existente con operaciones extensas y validaciones"""
+    try:
+        # Validación de entrada
+        if not ruta or not isinstance(ruta, str):
+            return {
+                "exito": False,
+                "error": "La ruta no puede estar vacía y debe ser una cadena válida",
+                "tipo_operacion": "modificar_archivo"
+            }
 
-    method = command.get("method", "POST").upper()
+        if not operacion or not isinstance(operacion, str):
+            return {
+                "exito": False,
+                "error": "La operación no puede estar vacía y debe ser una cadena válida",
+                "tipo_operacion": "modificar_archivo"
+            }
 
-    # Recoger datos de forma ultra-flexible
-    data = {}
+        # Operaciones válidas
+        operaciones_validas = [
+            "agregar_linea", "reemplazar_linea", "eliminar_linea",
+            "buscar_reemplazar", "agregar_inicio", "agregar_final",
+            "insertar_antes", "insertar_despues"
+        ]
+        if operacion not in operaciones_validas:
+            return {
+                "exito": False,
+                "error": f"Operación '{operacion}' no válida",
+                "operaciones_validas": operaciones_validas,
+                "tipo_operacion": "modificar_archivo"
+            }
 
-    # Prioridad 1: campos explícitos de datos
-    if "data" in command and isinstance(command["data"], dict):
-        data = command["data"]
-    elif "parametros" in command and isinstance(command["parametros"], dict):
-        data = command["parametros"]
-    elif "params" in command and isinstance(command["params"], dict):
-        data = command["params"]
-    else:
-        # Prioridad 2: todos los campos excepto metadatos
-        excluded_fields = {"endpoint", "method", "intencion",
-                           "action", "agent_response", "agent_name"}
-        data = {k: v for k, v in command.items() if k not in excluded_fields}
+        # Leer archivo actual
+        archivo_actual = leer_archivo_dinamico(ruta)
+        if not archivo_actual["exito"]:
+            return {
+                **archivo_actual,
+                "tipo_operacion": "modificar_archivo",
+                "operacion_solicitada": operacion
+            }
+        if archivo_actual.get("parcial"):
+            # Solo se leyó una ventana del archivo: reescribirlo lo truncaría
+            return {
+                "exito": False,
+                "error": f"Archivo demasiado extenso para modificar completo: {ruta}",
+                "tipo_operacion": "modificar_archivo",
+                "operacion_solicitada": operacion,
+                "total_lineas": archivo_actual.get("total_lineas")
+            }
 
-    # Si es una intención semántica, mapear al endpoint ejecutar
-    if endpoint in ["dashboard", "diagnosticar", "generar", "buscar", "leer"]:
-        data["intencion"] = endpoint
-        endpoint = "ejecutar"
+        contenido_actual = archivo_actual["contenido"]
+        lineas = contenido_actual.split('\n')
+        contenido_modificado = ""
 
-    logging.info(
-        f"[execute_parsed_command] endpoint={endpoint}, method={method}, data_keys={list(data.keys())}")
+        # Procesar operaciones
+        if operacion == "agregar_linea":
+            if linea != -1 and 0 <= linea <= len(lineas):
+                lineas.insert(linea, contenido)
+            else:
+                lineas.append(contenido)
 
-    IS_AZURE = is_running_in_azure()
+        elif operacion == "reemplazar_linea":
+            if linea == -1 or not (0 <= linea < len(lineas)):
+                return {
+                    "exito": False,
+                    "error": f"Línea {linea} no válida. El archivo tiene {len(lineas)} líneas (0-{len(lineas)-1})",
+                    "tipo_operacion": "modificar_archivo",
+                    "operacion": operacion
+                }
+            lineas[linea] = contenido
 
-    if IS_AZURE:
-        # 🔹 Azure: HTTP request
-        base_url = os.environ.get(
-            "FUNCTION_BASE_URL", "https://copiloto-semantico-func-us2.azurewebsites.net")
-        endpoint_str = str(endpoint)
-        ep = endpoint_str if endpoint_str.startswith(
-            ("api/", "/api/")) else f"/api/{endpoint_str}"
-        if not ep.startswith("/"):
-            ep = "/" + ep
-        url = f"{base_url}{ep}"
+        elif operacion == "eliminar_linea":
+            if linea == -1 or not (0 <= linea < len(lineas)):
+                return {
+                    "exito": False,
+                    "error": f"Línea {linea} no válida. El archivo tiene {len(lineas)} líneas (0-{len(lineas)-1})",
+                    "tipo_operacion": "modificar_archivo",
+                    "operacion": operacion
+                }
+            del lineas[linea]
 
-        try:
-            resp = requests.request(method, url, json=data, timeout=30)
-            try:
-                return resp.json()
-            except Exception:
-                return {"exito": resp.ok, "raw_response": resp.text, "status": resp.status_code}
-        except Exception as e:
-            return {"exito": False, "error": str(e), "endpoint": endpoint, "status": 500}
-    else:
-        # 🔹 Local: handler directo
-        path, handler = _resolve_handler(str(endpoint))
-        if handler:
-            payload = json.dumps(data, ensure_ascii=False).encode(
-                "utf-8") if method in {"POST", "PUT", "PATCH"} and data else b""
-            req_mock = func.HttpRequest(
-                method=method,
-                url=f"http://localhost{path}",
-                body=payload,
-                headers={"Content-Type": "application/json"},
-                params=data if method == "GET" else {}
-            )
-            try:
-                response = handler(req_mock)
-                try:
-                    return json.loads(response.get_body().decode())
-                except Exception:
-                    return {"exito": True, "raw_response": response.get_body().decode(), "status_code": response.status_code}
-            except Exception as e:
-                return {"exito": False, "error": str(e), "endpoint": endpoint, "status": 500}
-        else:
-            return {"exito": False, "error": f"Endpoint '{endpoint}' no encontrado", "endpoints_disponibles": ["status", "copiloto", "ejecutar", "listar-blobs"]}
+        elif operacion == "buscar_reemplazar":
+            params = {}
+            # a) contenido como dict
+            if isinstance(contenido, dict):
+                params = contenido
+            # b) contenido como string "OLD->NEW" o "OLD|NEW" o JSON
+            elif isinstance(contenido, str):
+                for sep in ("->", "|"):
+                    if sep in contenido:
+                        old, new = contenido.split(sep, 1)
+                        params = {"buscar": old.strip(
+                        ), "reemplazar": new.strip()}
+                        break
+                else:
+                    try:
+                        maybe = json.loads(contenido)
+                        if isinstance(maybe, dict):
+                            params = maybe
+                    except Exception:
+                        pass
+            # c) Fallback: claves al tope del body (si fue pasado)
+            if not params and isinstance(body, dict) and "buscar" in body and "reemplazar" in body:
+                params = {"buscar": str(
+                    body["buscar"]), "reemplazar": str(body["reemplazar"])}
 
+            # Validaciones rápidas
+            if not params or not str(params.get("buscar", "")).strip():
+                return {
+                    "exito": False,
+                    "error": "El contenido debe incluir 'buscar' y 'reemplazar' (no vacío)",
+                    "tipo_operacion": "modificar_archivo",
+                    "operacion": operacion,
+                    "ejemplo": {"buscar": "OK", "reemplazar": "OK ✅"},
+                }
 
-def generate_user_friendly_response_v2(original_response: str, result: dict) -> str:
-    """Genera respuesta amigable basada en el resultado"""
+            old = str(params["buscar"])
+            new = str(params.get("reemplazar", ""))
 
-    # Extraer explicación original si existe
-    explanation_part = ""
-    if "```json" in original_response:
-        explanation_part = original_response.split("```json")[0].strip()
+            ocurrencias = contenido_actual.count(old)
+            if ocurrencias == 0:
+                return {
+                    "exito": False,
+                    "error": f"No se encontró el texto '{old}' para reemplazar",
+                    "tipo_operacion": "modificar_archivo",
+                    "operacion": operacion
+                }
 
-    if result.get("exito", True):
-        if explanation_part:
-            return f"{explanation_part}\n\n✅ Comando ejecutado exitosamente"
-        else:
-            return "✅ Comando ejecutado exitosamente"
-    else:
-        error_msg = result.get("error", "Error desconocido")
-        return f"❌ Error: {error_msg}"
+            contenido_modificado = contenido_actual.replace(old, new)
+            res_write = crear_archivo(ruta, contenido_modificado)
+            if res_write.get("exito"):
+                res_write.update({
+                    "operacion_realizada": operacion,
+                    "ocurrencias": ocurrencias,
+                    "mensaje": f"Archivo modificado: {ocurrencias} reemplazos"
+                })
+            return res_write
 
+        elif operacion == "agregar_inicio":
+            lineas.insert(0, contenido)
 
-def build_status() -> dict:
-    """Construye el payload de estado para endpoints y agentes."""
-    storage_status = "desconectado"
-    try:
-        client = get_blob_client()
-        if client:
-            container_client = client.get_container_client(CONTAINER_NAME)
-            if container_client.exists():
-                storage_status = "conectado"
-    except Exception as e:
-        logging.warning(f"No se pudo verificar Storage: {str(e)}")
+        elif operacion == "agregar_final":
+            lineas.append(contenido)
 
-    ambiente = "Azure" if (
-        storage_status == "conectado" or IS_AZURE) else "Local"
+        elif operacion == "insertar_antes":
+            if linea == -1 or not (0 <= linea < len(lineas)):
+                return {
+                    "exito": False,
+                    "error": f"Línea {linea} no válida para insertar antes",
+                    "tipo_operacion": "modificar_archivo",
+                    "operacion": operacion
+                }
+            lineas.insert(linea, contenido)
 
-    return {
-        "copiloto": "activo",
-        "version": "2.0-semantic",
-        "timestamp": datetime.now().isoformat(),
-        "ambiente": ambiente,
-        "storage": storage_status,
-        "is_azure": IS_AZURE,
-        "container": CONTAINER_NAME,
-        "blob_ready": (storage_status == "conectado"),
-        "endpoints": _discover_endpoints(),
-        "ready": ambiente == "Azure" and storage_status == "conectado"
-    }
+        elif operacion == "insertar_despues":
+            if linea == -1 or not (0 <= linea < len(lineas)):
+                return {
+                    "exito": False,
+                    "error": f"Línea {linea} no válida para insertar después",
+                    "tipo_operacion": "modificar_archivo",
+                    "operacion": operacion
+                }
+            lineas.insert(linea + 1, contenido)
 
+        # Si no se procesó buscar_reemplazar, unir líneas
+        if operacion != "buscar_reemplazar":
+            contenido_modificado = '\n'.join(lineas)
 
-@app.function_name(name="status")
-@app.route(route="status", auth_level=func.AuthLevel.ANONYMOUS)
-def status(req: func.HttpRequest) -> func.HttpResponse:
-    """Status endpoint que confirma el estado y proporciona contexto semántico."""
+        # Guardar
+        resultado_creacion = crear_archivo(ruta, contenido_modificado)
+        if resultado_creacion["exito"]:
+            resultado_creacion.update({
+                "operacion_realizada": operacion,
+                "linea_afectada": linea if linea != -1 else None,
+                "lineas_totales": len(lineas),
+                "mensaje": f"Archivo modificado exitosamente con operación '{operacion}'"
+            })
+        return resultado_creacion
 
-    # 🧠 OBTENER CONTEXTO DEL WRAPPER AUTOMÁTICO
-    memoria_previa = getattr(req, '_memoria_contexto', {})
-    if memoria_previa and memoria_previa.get("tiene_historial"):
-        logging.info(
-            f"🧠 Status: Continuando sesión con {memoria_previa['total_interacciones']} interacciones")
+    except Exception as e:
+        return {
+            "exito": False,
+            "error": f"Error inesperado al modificar archivo: {str(e)}",
+            "tipo_operacion": "modificar_archivo",
+            "operacion": operacion,
+            "tipo_error": type(e).__name__
+        }
 
-    # Construir el estado del sistema
-    estado = build_status()
 
-    # Mensaje enriquecido con contexto semántico
-    if memoria_previa and memoria_previa.get("tiene_historial"):
-        resumen = memoria_previa.get(
-            "resumen_conversacion", "Sin resumen disponible.")
-        mensaje_enriquecido = f"""🔍 Estado del sistema consultado.
+# --------- HTTP WRAPPERS (columna 0) ----------
 
-📊 RESULTADO: El sistema está en funcionamiento.
 
-📝 CONTEXTO SEMÁNTICO:
-{resumen[:300] if resumen else 'Sin resumen de conversación disponible'}
+# arriba del módulo
+SOFT_ERRORS = True  # 200 para validación/no_encontrado; 500 solo para excepciones
 
-🎯 CONTINUIDAD: Esta sesión tiene contexto previo. Puedes hacer referencia a interacciones anteriores.
-"""
-    else:
-        mensaje_enriquecido = """🔍 Estado del sistema consultado.
 
-📊 RESULTADO: El sistema está en funcionamiento.
+def _status_from_result(res: dict) -> int:
+    if res.get("exito") is True:
+        return 200
+    if SOFT_ERRORS:
+        return 200
+    msg = str(res.get("error", "")).lower()
+    return 404 if ("no existe" in msg or "no encontrado" in msg) else 400
 
-💡 CONTEXTO: Esta es una nueva sesión o no hay interacciones guardadas previamente.
-🎯 RECOMENDACIÓN: Puedes comenzar a interactuar normalmente. Todas las nuevas interacciones se guardarán automáticamente.
-"""
 
-    # NOTA: La memoria se registra automáticamente por el wrapper @registrar_memoria
+def is_running_in_azure() -> bool:
+    # Detectar Azure SOLO si no estás en el emulador local
+    return bool(
+        os.environ.get("WEBSITE_INSTANCE_ID")
+        and not os.environ.get("AZURE_FUNCTIONS_ENVIRONMENT") == "Development"
+    )
 
-    # Construir la respuesta final
-    response_data = {
-        "exito": True,
-        "estado": estado,
-        "mensaje": mensaje_enriquecido,
-        "fuente": "wrapper_automatico"
-    }
 
-    return func.HttpResponse(
-        json.dumps(response_data, ensure_ascii=False),
-        mimetype="application/json",
-        status_code=200
-    )
+# Lista blanca de scripts permitidos para ejecución (desactivada temporalmente)
+ALLOWED_SCRIPTS = None
 
 
-@app.function_name(name="test_wrapper_memoria")
-@app.route(route="test-wrapper-memoria", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
-def test_wrapper_memoria(req: func.HttpRequest) -> func.HttpResponse:
-    """Endpoint específico para probar el wrapper de memoria"""
+def ejecutar_script(nombre_script: str, parametros: list = []) -> dict:
+    """Ejecuta un script PowerShell, Bash o Python.
+       Si no existe localmente y estamos en Azure, intenta descargarlo desde Blob a /tmp/scripts/..."""
     try:
-        # Detectar parámetros de memoria
-        session_id = (
-            req.params.get("session_id") or
-            (req.get_json() or {}).get("session_id") or
-            req.headers.get("X-Session-ID") or
-            f"auto_{hash(str(req.headers.get('User-Agent', '')) + str(req.url))}"
-        )
-
-        agent_id = (
-            req.params.get("agent_id") or
-            (req.get_json() or {}).get("agent_id") or
-            req.headers.get("X-Agent-ID") or
-            "AutoAgent"
-        )
+        # 1) Resolver ruta local existente
+        local_path = _resolve_local_script_path(nombre_script)
 
-        # Intentar consultar memoria
-        memoria_resultado = {}
-        try:
-            from memory_helpers import obtener_memoria_request
-            memoria_contexto = obtener_memoria_request(req)
-            memoria_resultado = memoria_contexto or {}
-        except Exception as e:
-            memoria_resultado = {"error_memoria": str(e)}
+        # 2) Si no existe y estamos en Azure: descargar desde Blob
+        descargado_de_blob = False
+        if not local_path and IS_AZURE:
+            local_path = _download_script_from_blob(nombre_script)
+            if not local_path:
+                alt_blob = f"scripts/{Path(nombre_script).name}"
+                local_path = _download_script_from_blob(alt_blob)
+            if local_path:
+                descargado_de_blob = True
 
-        resultado = {
-            "test_wrapper": True,
-            "timestamp": datetime.now().isoformat(),
-            "session_detectado": {
-                "session_id": session_id,
-                "agent_id": agent_id,
-                "origen_session": "params" if req.params.get("session_id") else "auto",
-                "origen_agent": "params" if req.params.get("agent_id") else "auto"
-            },
-            "memoria_sistema": memoria_resultado,
-            "metadata": {
-                "wrapper_test": True,
-                "memoria_disponible": True,
-                "session_info": {
-                    "session_id": session_id,
-                    "agent_id": agent_id
-                },
-                "wrapper_aplicado": True
+        if not local_path:
+            return {
+                "exito": False,
+                "error": f"No se encontró el script '{nombre_script}' localmente y no fue posible obtenerlo de Blob",
+                "script": nombre_script
             }
-        }
 
-        return func.HttpResponse(
-            json.dumps(resultado, indent=2, ensure_ascii=False),
-            mimetype="application/json",
-            status_code=200
+        # 3) Comando según extensión
+        path_str = str(local_path)
+        if path_str.endswith('.ps1'):
+            ps_cmd = shutil.which("pwsh") or shutil.which(
+                "powershell") or "powershell"
+            comando = [ps_cmd, "-ExecutionPolicy", "Bypass", "-File", path_str]
+        elif path_str.endswith('.sh'):
+            comando = ['bash', path_str]
+        elif path_str.endswith('.py'):
+            py = shutil.which("python3") or shutil.which("python") or "python"
+            comando = [py, path_str]
+        else:
+            comando = [path_str]
+        if parametros:
+            comando.extend(parametros)
+        resultado = command_executor.run(
+            comando,
+            timeout=60,
+            cwd=str(local_path.parent)
         )
-
+        return {
+            "exito": resultado.returncode == 0,
+            "stdout": resultado.stdout,
+            "stderr": resultado.stderr,
+            "codigo_salida": resultado.returncode,
+            "comando_ejecutado": ' '.join(comando),
+            "script_path_local": str(local_path),
+            "descargado_de_blob": descargado_de_blob
+        }
+    except subprocess.TimeoutExpired:
+        return {
+            "exito": False,
+            "error": "Script excedió tiempo límite (60s)",
+            "script": nombre_script
+        }
     except Exception as e:
-        return func.HttpResponse(
-            json.dumps({
-                "error": str(e),
-                "test_wrapper": False,
-                "timestamp": datetime.now().isoformat()
-            }),
-            mimetype="application/json",
-            status_code=500
-        )
+        return {
+            "exito": False,
+            "error": str(e),
+            "script": nombre_script,
+            "tipo_error": type(e).__name__
+        }
 
 
-def _serve_openapi_schema() -> func.HttpResponse:
-    """Función helper mejorada para servir el schema OpenAPI"""
-    try:
-        # Buscar el archivo en múltiples ubicaciones
-        schema_paths = [
-            Path(__file__).parent / "openapi.yaml",
-            Path(__file__).parent / "openapi_copiloto_local.yaml",
-            Path("/home/site/wwwroot/openapi.yaml"),  # Azure path
-            Path("/home/site/wwwroot/openapi_copiloto_local.yaml")
-        ]
+# --- helpers, cerca de api_ok/api_err ---
 
-        schema_content = None
-        used_path = None
 
-        for schema_path in schema_paths:
-            logging.info(f"Buscando schema en: {schema_path}")
-            if schema_path.exists():
-                try:
-                    schema_content = schema_path.read_text(encoding='utf-8')
-                    used_path = str(schema_path)
-                    logging.info(
-                        f"Schema encontrado en: {used_path}, tamaño: {len(schema_content)}")
+def get_run_id(req) -> str:
+    return (req.headers.get("x-run-id")
+            or req.headers.get("x-request-id")
+            or uuid.uuid4().hex[:12])
 
-                    # Verificar que tiene la versión correcta
-                    if 'openapi: 3.1.' in schema_content or '"openapi": "3.1.' in schema_content:
-                        logging.info("✅ Versión OpenAPI 3.1.x confirmada")
-                        break
-                    else:
-                        logging.warning(
-                            f"⚠️ Archivo encontrado pero versión incorrecta en: {used_path}")
-                        # Continuar buscando
-                        schema_content = None
 
-                except Exception as e:
-                    logging.error(f"Error leyendo {schema_path}: {e}")
-                    continue
+def with_run_header(run_id: str):
+    return {"X-Run-Id": run_id}
 
-        if schema_content:
-            # Filtrar las claves con None para asegurar que headers solo contiene str:str
-            headers: dict[str, str] = {
-                k: v for k, v in {
-                    "Content-Type": "application/x-yaml",
-                    "Access-Control-Allow-Origin": "*",
-                    "Cache-Control": "no-cache",
-                    "X-Schema-Source": used_path
-                }.items() if v is not None
-            }
-            return func.HttpResponse(
-                schema_content,
-                mimetype="application/x-yaml",
-                status_code=200,
-                headers=headers
-            )
-        else:
-            # Listar archivos disponibles para debug
-            available_files = []
-            try:
-                base_dir = Path(__file__).parent
-                for file in base_dir.glob("*.yaml"):
-                    available_files.append(str(file.name))
-                for file in base_dir.glob("*.yml"):
-                    available_files.append(str(file.name))
-            except Exception:
-                available_files = ["error_listing_files"]
 
-            return func.HttpResponse(
-                json.dumps({
-                    "error": "OpenAPI schema not found or incorrect version",
-                    "searched_paths": [str(p) for p in schema_paths],
-                    "available_yaml_files": available_files,
-                    "requirement": "OpenAPI 3.1.x required for Agent898"
-                }),
-                mimetype="application/json",
-                status_code=404
-            )
-    except Exception as e:
-        logging.error(f"Error sirviendo OpenAPI schema: {e}")
-        return func.HttpResponse(
-            json.dumps({
-                "error": "Error loading OpenAPI schema",
-                "details": str(e)
-            }),
-            mimetype="application/json",
-            status_code=500
-        )
+# === Respuestas estándar ===
 
 
-@app.function_name(name="openapi_schema")
-@app.route(route="openapi.yaml", auth_level=func.AuthLevel.ANONYMOUS)
-def openapi_schema(req: func.HttpRequest) -> func.HttpResponse:
-    """Sirve el schema OpenAPI completo para Agent898 - ruta estándar"""
-    return _serve_openapi_schema()
+# ==== Helpers de respuesta y utilidades ====
 
 
-@app.function_name(name="openapi_schema_api")
-@app.route(route="api/openapi.yaml", auth_level=func.AuthLevel.ANONYMOUS)
-def openapi_schema_api(req: func.HttpRequest) -> func.HttpResponse:
-    """Sirve el schema OpenAPI completo para Agent898 - ruta con /api/"""
-    return _serve_openapi_schema()
+T = TypeVar("T")
 
 
-# Agregar este endpoint temporal para verificar qué archivo se está sirviendo
-@app.function_name(name="debug_openapi")
-@app.route(route="debug-openapi", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
-def debug_openapi(req: func.HttpRequest) -> func.HttpResponse:
-    """Debug temporal para verificar archivos OpenAPI"""
+def _safe(obj: Any, attr: str, default: T) -> T:
+    """Devuelve obj.attr o default si obj es None o el atributo no existe/vale None."""
     try:
-        import os
-        from pathlib import Path
-
-        base_path = Path(__file__).parent
-
-        # Buscar TODOS los archivos
-        all_files = list(base_path.glob("*"))
-
-        # Verificar archivos
-        files_info = []
-        for file_path in all_files:
-            if file_path.exists():
-                try:
-                    content = file_path.read_text(encoding='utf-8')
-                    # Buscar la línea de versión
-                    version_line = None
-                    for line in content.split('\n'):
-                        if 'openapi:' in line.lower():
-                            version_line = line.strip()
-                            break
-
-                    files_info.append({
-                        "file": str(file_path.name),
-                        "full_path": str(file_path),
-                        "exists": True,
-                        "size": len(content),
-                        "version_line": version_line,
-                        "content_preview": content[:200]
-                    })
-                except Exception as e:
-                    files_info.append({
-                        "file": str(file_path.name),
-                        "full_path": str(file_path),
-                        "exists": True,
-                        "error": str(e)
-                    })
-
-        return func.HttpResponse(
-            json.dumps({
-                "working_directory": str(Path.cwd()),
-                "function_file_dir": str(base_path),
-                "all_files_found": files_info,
-                "expected_files": [
-                    "openapi.yaml",
-                    "openapi_copiloto_local.yaml"
-                ]
-            }, ensure_ascii=False, indent=2),
-            mimetype="application/json",
-            status_code=200
-        )
+        if obj is None:
+            return default
+        val = getattr(obj, attr, default)
+        return default if val is None else val
+    except Exception:
+        return default
 
-    except Exception as e:
-        return func.HttpResponse(
-            json.dumps({"error": str(e)}),
-            mimetype="application/json",
-            status_code=500
-        )
 
+def api_ok(endpoint: str, method: str, status: int, message: str, details: Optional[dict] = None, run_id: Optional[str] = None):
+    return {
+        "ok": True,
+        "endpoint": endpoint,
+        "method": method,
+        "status": status,
+        "runId": run_id,
+        "message": message,
+        "details": details or {}
+    }
 
-@app.function_name(name="listar_blobs")
-@app.route(route="listar-blobs", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
-def listar_blobs(req: func.HttpRequest) -> func.HttpResponse:
-    """Lista blobs con conteo total y muestra consistente usando api_ok/api_err."""
-    endpoint = "/api/listar-blobs"
-    method = "GET"
 
-    try:
-        # --- Inputs ---
-        prefix_raw = (req.params.get("prefix")
-                      or req.params.get("path") or "").strip()
-        container_in = (req.params.get("container")
-                        or req.params.get("contenedor") or "").strip()
-        container = container_in if container_in else CONTAINER_NAME
-
-        # --- Normalización del prefijo ---
-        prefix = prefix_raw
-        # Si el agente mandó el nombre del contenedor como prefix, trátalo como contenedor
-        if prefix == container:
-            prefix = ""
-        # Si viene "container/prefix", quita el nombre del contenedor
-        if prefix.startswith(container + "/"):
-            prefix = prefix[len(container) + 1:]
-        # Prefijos triviales → sin filtro
-        if prefix in ("", "/", "*", "."):
-            prefix = ""
-
-        # Cliente
-        client = get_blob_client()
-        if not client:
-            err = api_err(endpoint, method, 500, "BlobClientError",
-                          "Blob Storage no configurado")
-            return func.HttpResponse(json.dumps(err, ensure_ascii=False), mimetype="application/json", status_code=500)
-
-        container_client = client.get_container_client(container)
-        if not container_client.exists():
-            err = api_err(endpoint, method, 404, "ContainerNotFound",
-                          f"El contenedor '{container}' no existe")
-            return func.HttpResponse(json.dumps(err, ensure_ascii=False), mimetype="application/json", status_code=404)
-
-        # Listado
-        blobs_iter = container_client.list_blobs(
-            name_starts_with=prefix) if prefix else container_client.list_blobs()
-        blobs, total = [], 0
-        for b in blobs_iter:
-            total += 1
-            if len(blobs) < 50:
-                size = getattr(b, "size", getattr(b, "content_length", None))
-                lm = getattr(b, "last_modified", None)
-                last_modified = lm.isoformat() if lm and hasattr(
-                    lm, "isoformat") else (str(lm) if lm else None)
-                blobs.append({
-                    "name": b.name,
-                    "size": size,
-                    "last_modified": last_modified,
-                    "tipo": b.name.split(".")[-1] if "." in b.name else "sin_extension",
-                })
+def api_err(endpoint: str, method: str, status: int, code: str, reason: str, missing_params=None, run_id: Optional[str] = None, details: Optional[dict] = None):
+    return {
+        "ok": False,
+        "endpoint": endpoint,
+        "method": method,
+        "status": status,
+        "runId": run_id,
+        "error": {
+            "code": code,
+            "reason": reason,
+            "missing_params": missing_params or []
+        },
+        "details": details or {}
+    }
 
-        payload = api_ok(
-            endpoint, method, 200,
-            f"Listado de blobs completado (total={total})",
-            {
-                "container": container,
-                "prefix_recibido": prefix_raw,
-                "prefix_efectivo": prefix,
-                "count": total,
-                "sample": blobs,
-                "timestamp": datetime.now().isoformat()
-            }
-        )
-        # NOTA: La memoria se registra automáticamente por el wrapper @registrar_memoria
 
-        return func.HttpResponse(json.dumps(payload, ensure_ascii=False), mimetype="application/json", status_code=200)
+def _normalize_blob_path(container: str, raw_path: str) -> str:
+    p = (raw_path or "").strip()
+    p = unquote(p).lstrip("/")            # quita / iniciales
+    if not p:
+        return ""
+    if p.startswith(container + "/"):     # quita "container/"
+        p = p[len(container) + 1:]
+    while p.startswith("./") or p.startswith("/"):
+        p = p[1:]
+    return p
 
-    except Exception as e:
-        logging.exception("listar_blobs failed")
-        err = api_err(endpoint, method, 500, "ListBlobsError", str(e))
-        return func.HttpResponse(json.dumps(err, ensure_ascii=False), mimetype="application/json", status_code=500)
 
+def _mk_run_dirs(run_id: str):
+    base = Path(f"/tmp/agent/{run_id}")
+    scripts = base / "scripts"
+    work = base / "work"
+    logs = base / "logs"
+    for p in (scripts, work, logs):
+        p.mkdir(parents=True, exist_ok=True)
+    # carpeta común que tus scripts usan
+    (work / "verificacion").mkdir(parents=True, exist_ok=True)
+    return base, scripts, work, logs
 
-@app.function_name(name="ejecutar")
-@app.route(route="ejecutar", auth_level=func.AuthLevel.ANONYMOUS, methods=["POST"])
-def ejecutar(req: func.HttpRequest) -> func.HttpResponse:
-    """Versión mejorada del endpoint ejecutar con intenciones extendidas"""
 
-    logging.info('🚀 Endpoint ejecutar (orquestador mejorado) activado')
+def _split_blob_spec(spec: str):
+    s = (spec or "").strip().lstrip("/")
+    if not s:
+        return (None, None)
+    # blob://container/path
+    if s.startswith("blob://"):
+        s2 = s[7:]
+        if "/" in s2:
+            cont, path = s2.split("/", 1)
+            return (cont or None, path)
+        return (None, s2)
+    # container/path
+    if "/" in s:
+        cont, path = s.split("/", 1)
+        # si el cont coincide con tu contenedor por defecto, lo usamos; si no, asumimos que es path
+        if cont == CONTAINER_NAME:
+            return (cont, path)
+    # solo path → contenedor por defecto
+    return (CONTAINER_NAME, s)
 
-    # 🧠 OBTENER CONTEXTO SEMÁNTICO DEL WRAPPER AUTOMÁTICO
-    contexto_semantico = getattr(req, '_contexto_semantico', {})
-    memoria_contexto = getattr(req, '_memoria_contexto', {})
-    memoria_prompt = getattr(req, '_memoria_prompt', '')
-    session_info = {
-        'session_id': getattr(req, '_session_id', 'unknown'),
-        'agent_id': getattr(req, '_agent_id', 'unknown')
-    }
 
-    if memoria_contexto and memoria_contexto.get("tiene_historial"):
-        logging.info(
-            f"🧠 Continuando sesión con {memoria_contexto['total_interacciones_sesion']} interacciones previas")
+def _kudu_base():
+    site = os.environ.get("WEBSITE_SITE_NAME") or os.environ.get(
+        "WEBSITE_HOSTNAME", "copiloto-semantico-func")
+    base = f"https://{site}.scm.azurewebsites.net"
+    user = os.environ.get("KUDU_USER") or os.environ.get(
+        "SCM_USER") or os.environ.get("PUBLISH_USER")
+    pwd = os.environ.get("KUDU_PASS") or os.environ.get(
+        "SCM_PASS") or os.environ.get("PUBLISH_PASS")
+    if not user or not pwd:
+        raise RuntimeError("Missing KUDU_USER/KUDU_PASS")
+    return base, (user, pwd)
 
-    # Initialize req_body to handle potential exceptions
-    req_body = {}
 
-    try:
-        # Obtener y validar el body
-        try:
-            req_body = req.get_json()
-        except ValueError:
-            req_body = {}
-
-        # Valores por defecto más robustos
-        intencion = req_body.get('intencion', '')
-        parametros = req_body.get('parametros')
-        if parametros is None:
-            parametros = {}
-        contexto = req_body.get('contexto', {})
-        modo = req_body.get('modo', 'normal')
-
-        # VALIDACIÓN: Rechazar intención vacía con 400
-        if not intencion or not intencion.strip():
-            return func.HttpResponse(
-                json.dumps({
-                    "error": "El campo 'intencion' es requerido y no puede estar vacío",
-                    "error_code": "MISSING_REQUIRED_FIELD",
-                    "campo_faltante": "intencion",
-                    "ejemplo_valido": {
-                        "intencion": "dashboard",
-                        "parametros": {},
-                        "modo": "normal"
-                    }
-                }),
-                status_code=400,
-                mimetype="application/json"
-            )
+def _kudu_get(path, stream=False, timeout=60):
+    base, auth = _kudu_base()
+    r = requests.get(f"{base}{path}", auth=auth,
+                     timeout=timeout, stream=stream)
+    r.raise_for_status()
+    return r
 
-        # Logging mejorado para debug
-        logging.info(f'Procesando: intencion={intencion}, modo={modo}')
-        logging.debug(f'Parametros: {parametros}')
-        logging.debug(f'Contexto: {contexto}')
 
-        # Usar el procesador semántico principal
-        resultado = procesar_intencion_semantica(intencion, parametros)
-        procesador_usado = 'semantico'
+# cerca de otros helpers (debajo de _split_blob_spec, por ejemplo)
+_TMP_HINT_PREFIXES = ("/tmp/copiloto-scripts/", "/tmp/scripts/",
+                      "\\tmp\\copiloto-scripts\\", "C:\\temp\\copiloto-scripts\\")
 
-        # Si falla, intentar casos especiales
-        if not resultado.get("exito"):
-            logging.info(
-                f"Procesador semántico falló, intentando casos especiales para: {intencion}")
-            procesador_usado = 'fallback'
-
-        # Manejar casos especiales si ambos procesadores fallan
-        if not resultado.get("exito"):
-            if intencion == "dashboard":
-                resultado = generar_dashboard_insights()
-                procesador_usado = 'especial'
-            elif intencion == "diagnosticar:completo":
-                resultado = diagnosticar_function_app()
-                procesador_usado = 'especial'
-            elif intencion.startswith("guia:"):
-                tema = intencion.split(
-                    ":", 1)[1] if ":" in intencion else "ayuda"
-                resultado = generar_guia_contextual(tema, parametros)
-                procesador_usado = 'especial'
-            elif intencion.startswith("orquestar:"):
-                flujo = intencion.split(":", 1)[1] if ":" in intencion else ""
-                resultado = orquestar_flujo_trabajo(flujo, parametros)
-                procesador_usado = 'especial'
-
-        # Asegurar que siempre hay un resultado válido
-        if resultado is None:
-            resultado = {
-                "exito": False,
-                "error": "No se pudo procesar la intención",
-                "intencion_recibida": intencion,
-                "sugerencias": ["dashboard", "diagnosticar:completo", "verificar:almacenamiento", "git:status"]
-            }
-            procesador_usado = 'fallback'
 
-        # Enriquecer respuesta con metadata
-        if not isinstance(resultado, dict):
-            resultado = {"resultado": resultado}
+def _normalize_script_spec(spec: str) -> Tuple[Optional[str], Optional[str], str]:
+    s = (spec or "").strip()
+    if not s:
+        return None, None, "empty"
 
-        # Ensure resultado is a mutable dict and add metadata
-        if isinstance(resultado, dict):
-            # Create a completely new mutable dict to avoid type issues
-            nuevo_resultado = {}
-            # Copy all existing data
-            for key, value in resultado.items():
-                nuevo_resultado[key] = value
-
-            # Add metadata
-            nuevo_resultado['metadata'] = {
-                'timestamp': datetime.now().isoformat(),
-                'modo': modo,
-                'intencion_procesada': intencion,
-                'procesador': procesador_usado,
-                'ambiente': 'Azure' if IS_AZURE else 'Local',
-                'copiloto_version': '2.0-orchestrator-extendido',
-                'session_info': session_info,
-                'memoria_disponible': bool(memoria_contexto and memoria_contexto.get("tiene_historial"))
-            }
+    # hint: agente te manda un path local -> usamos el nombre y lo buscamos en blob/scripts/
+    for p in _TMP_HINT_PREFIXES:
+        if s.startswith(p):
+            name = Path(s).name
+            return CONTAINER_NAME, f"scripts/{name}", "mapped_from_tmp"
 
-            # 🧠 AGREGAR CONTEXTO DE MEMORIA
-            if memoria_prompt:
-                nuevo_resultado['contexto_memoria'] = memoria_prompt
+    # ya viene como blob relativo (scripts/foo.py)
+    if s.startswith("scripts/") or s.startswith("/scripts/"):
+        return CONTAINER_NAME, s.lstrip("/"), "blob_relative"
 
-            # Si hay error de urgencia alta, agregar diagnóstico
-            if not nuevo_resultado.get('exito', True) and contexto.get('urgencia') == 'alta':
-                nuevo_resultado['diagnostico_automatico'] = {
-                    "mensaje": "Detectada urgencia alta, ejecutando diagnóstico automático",
-                    "comando_sugerido": "diagnosticar:completo"
-                }
+    # contenedor:path explícito
+    c, path = _split_blob_spec(s)
+    if c and path:
+        return c, path, "blob_spec"
 
-            resultado = nuevo_resultado
-
-        # Agregar contexto de ayuda si falló
-        if not resultado.get('exito', True):
-            resultado['ayuda'] = {
-                'intenciones_extendidas': [
-                    "verificar:almacenamiento",
-                    "limpiar:cache",
-                    "generar:resumen",
-                    "git:status",
-                    "analizar:rendimiento",
-                    "confirmar:accion"
-                ],
-                'intenciones_basicas': [
-                    "dashboard",
-                    "diagnosticar:completo",
-                    "buscar:archivos",
-                    "generar:readme",
-                    "guia:configurar_blob"
-                ],
-                'ejemplo': {
-                    "intencion": "verificar:almacenamiento",
-                    "parametros": {},
-                    "modo": "normal"
-                }
-            }
+    return None, None, "unrecognized"
 
-        # Verificar si se solicita respuesta semántica
-        semantic_mode = req_body.get('semantic_response', False)
 
-        if semantic_mode:
-            status_code = 200 if resultado.get('exito', True) else 400
-            semantic_response = render_tool_response(status_code, {
-                "ok": resultado.get('exito', True),
-                "error_code": resultado.get('error') if not resultado.get('exito', True) else None,
-                "cause": resultado.get('error') if not resultado.get('exito', True) else None,
-                "data": resultado
-            })
-            return func.HttpResponse(
-                semantic_response,
-                mimetype="text/plain",
-                status_code=200
-            )
+def _blob_exists(container: str, blob_path: str) -> bool:
+    try:
+        cli = get_blob_client()
+        if not cli:
+            return False
+        bc = cli.get_container_client(container).get_blob_client(blob_path)
+        return bc.exists()
+    except Exception:
+        return False
 
-        # NOTA: La memoria semántica se registra automáticamente por el wrapper @registrar_memoria
 
-        return func.HttpResponse(
-            json.dumps(resultado, indent=2, ensure_ascii=False),
-            mimetype="application/json",
-            status_code=200  # Siempre 200 aunque haya error lógico
-        )
+def _stage_arg_to_local(arg: str, workdir: Path) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    Si el argumento apunta a un blob (p.ej. 'container/ruta/archivo.txt' o 'blob://container/ruta'),
+    lo descarga a workdir y devuelve la ruta local + metadatos. Si no, devuelve el arg tal cual.
+    """
+    cont, path = _split_blob_spec(arg)
+    if not (cont and path):
+        return arg, None
 
+    # Verificar existencia del blob (con try para no romper el flujo si falla)
+    try:
+        if not _blob_exists(cont, path):
+            return arg, None
     except Exception as e:
-        logging.error(f"Error en ejecutar: {str(e)}")
-        logging.error(f"Traceback: {traceback.format_exc()}")
-
-        # Respuesta de error estructurada
-        error_response = {
-            "error": str(e),
-            "tipo": type(e).__name__,
-            "intencion_recibida": req_body.get('intencion', 'desconocida') if 'req_body' in locals() else 'no_parseado',
-            "sugerencia": "Verifica el formato de la petición",
-            "ejemplo_valido": {
-                "intencion": "verificar:almacenamiento",
-                "parametros": {},
-                "modo": "normal"
-            },
-            "metadata": {
-                'timestamp': datetime.now().isoformat(),
-                'ambiente': 'Azure' if IS_AZURE else 'Local',
-                'version': '2.0-orchestrator-extendido'
-            }
-        }
+        logging.warning(f"_blob_exists falló para {cont}/{path}: {e}")
+        return arg, {"container": cont, "blob": path, "downloaded": False, "reason": "existence_check_failed", "error": type(e).__name__}
 
-        # Verificar si se solicita respuesta semántica para errores
-        semantic_mode = req_body.get(
-            'semantic_response', False) if req_body else False
+    cli = get_blob_client()
+    if cli is None:
+        # <- Esta guard elimina el warning "get_container_client of None" y evita crashes
+        logging.warning(
+            "Blob Storage no configurado (get_blob_client() = None); no se descarga el arg como blob.")
+        return arg, {"container": cont, "blob": path, "downloaded": False, "reason": "no_blob_client"}
 
-        if semantic_mode:
-            semantic_response = render_tool_response(500, {
-                "ok": False,
-                "error_code": "EXECUTION_ERROR",
-                "cause": str(e)
-            })
-            return func.HttpResponse(
-                semantic_response,
-                mimetype="text/plain",
-                status_code=200
-            )
+    try:
+        bc = cli.get_container_client(cont).get_blob_client(path)
+        local = workdir / path
+        local.parent.mkdir(parents=True, exist_ok=True)
+        with open(local, "wb") as f:
+            f.write(bc.download_blob().readall())
+        return str(local), {"container": cont, "blob": path, "downloaded": True, "local_path": str(local)}
+    except Exception as e:
+        logging.exception(
+            f"Fallo descargando {cont}/{path} hacia {workdir}: {e}")
+        return arg, {"container": cont, "blob": path, "downloaded": False, "reason": "download_failed", "error": str(e)}
 
-        return func.HttpResponse(
-            json.dumps(error_response, indent=2),
-            mimetype="application/json",
-            status_code=200  # Cambiar a 200 para evitar problemas con Logic App
-        )
 
+def _sync_work_to_blob(workdir: Path, container: str = CONTAINER_NAME, prefix: str = ""):
+    uploaded = []
+    cli = get_blob_client()
+    if not cli:
+        return uploaded  # sin storage configurado, salimos limpio
 
-@app.function_name(name="escribir_archivo_local_http")
-@app.route(route="escribir-archivo-local", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def escribir_archivo_local_http(req: func.HttpRequest) -> func.HttpResponse:
-    """
-    Endpoint HTTP para crear/escribir archivos en filesystem LOCAL.
-    Permite rutas absolutas (C:\\..., /tmp/...) en local.
-    Soporta:
-      - Texto plano (ruta + contenido)
-      - Binario/base64 (ruta + contenido_base64 + binario: true)
-      - tipo_mime opcional en metadata
-    """
     try:
-        # Parseo robusto del body
-        try:
-            body = req.get_json()
-        except ValueError:
-            body = {}
+        cc = cli.get_container_client(container)
+        for root, _, files in os.walk(workdir):
+            for name in files:
+                lp = Path(root) / name
+                rel = str(lp.relative_to(workdir))
+                blob = f"{prefix}/{rel}".lstrip("/")
+                with open(lp, "rb") as fh:
+                    cc.get_blob_client(blob).upload_blob(fh, overwrite=True)
+                uploaded.append(blob)
+    except Exception as e:
+        logging.warning(f"_sync_work_to_blob fallo: {e}")
+    return uploaded
 
-        if not body:
-            return func.HttpResponse(
-                json.dumps({
-                    "exito": False,
-                    "error": "Request body must be valid JSON",
-                    "ejemplo": {
-                        "ruta": "scripts/test.txt",
-                        "contenido": "Hola mundo",
-                        "contenido_base64": "<base64>",
-                        "binario": True,
-                        "tipo_mime": "image/png"
-                    }
-                }, ensure_ascii=False),
-                mimetype="application/json", status_code=400
-            )
 
-        ruta = (body.get("path") or body.get("ruta") or "").strip()
-        contenido = body.get("content") or body.get("contenido")
-        contenido_base64 = body.get("contenido_base64")
-        binario = bool(body.get("binario", False))
-        tipo_mime = (body.get("tipo_mime") or body.get(
-            "mime_type") or "application/octet-stream")
+_TRUE_SET = {"1", "true", "yes", "y", "si", "sí", "on"}
+_FALSE_SET = {"0", "false", "no", "n", "off"}
 
-        if not ruta:
-            return func.HttpResponse(
-                json.dumps({
-                    "exito": False,
-                    "error": "Parámetro 'ruta' o 'path' es requerido"
-                }, ensure_ascii=False),
-                mimetype="application/json", status_code=400
-            )
-
-        IS_AZURE = is_running_in_azure()
-
-        # Soporte binario/base64
-        if binario or contenido_base64:
-            if isinstance(contenido_base64, str) and isinstance(tipo_mime, str):
-                res = crear_archivo_local(
-                    ruta, contenido_base64, tipo_mime, binario=True, is_azure=IS_AZURE)
-            else:
-                return func.HttpResponse(
-                    json.dumps({
-                        "exito": False,
-                        "error": "Los parámetros 'contenido_base64' y 'tipo_mime' son requeridos y deben ser cadenas.",
-                        "ejemplo": {
-                            "ruta": "scripts/logo.png",
-                            "contenido_base64": "<cadena_base64>",
-                            "tipo_mime": "image/png"
-                        }
-                    }, ensure_ascii=False),
-                    mimetype="application/json",
-                    status_code=400
-                )
-        else:
-            res = crear_archivo_local(
-                ruta, contenido or "", tipo_mime, binario=False, is_azure=IS_AZURE)
 
-        return func.HttpResponse(
-            json.dumps(res, ensure_ascii=False),
-            mimetype="application/json",
-            status_code=201 if res.get("exito") else 400
+def operacion_git(comando: str, parametros: Optional[dict] = None) -> dict:
+    """Ejecuta operaciones Git permitidas"""
+    if parametros is None:
+        parametros = {}
+    comandos_permitidos = {
+        "status": "git status --porcelain",
+        "add": "git add",
+        "commit": "git commit -m",
+        "push": "git push",
+        "pull": "git pull",
+        "branch": "git branch",
+        "checkout": "git checkout"
+    }
+    if comando not in comandos_permitidos:
+        return {
+            "exito": False,
+            "error": f"Comando no permitido: {comando}",
+            "comandos_permitidos": list(comandos_permitidos.keys())
+        }
+    try:
+        cmd = comandos_permitidos[comando]
+        if comando == "add" and parametros.get("archivo"):
+            cmd += f" {parametros['archivo']}"
+        elif comando == "commit" and parametros.get("mensaje"):
+            cmd += f' "{parametros["mensaje"]}"'
+        elif comando == "checkout" and parametros.get("rama"):
+            cmd += f" {parametros['rama']}"
+        resultado = subprocess.run(
+            cmd.split(),
+            capture_output=True,
+            text=True,
+            cwd=str(PROJECT_ROOT)
         )
+        return {
+            "exito": resultado.returncode == 0,
+            "salida": resultado.stdout,
+            "error": resultado.stderr if resultado.stderr else None,
+            "comando": cmd
+        }
     except Exception as e:
-        logging.exception("escribir_archivo_local_http failed")
-        return func.HttpResponse(
-            json.dumps({"exito": False, "error": str(e)}),
-            mimetype="application/json", status_code=500
-        )
-
-
-def crear_archivo_local(
-    ruta: str,
-    contenido: str,
-    tipo_mime: Optional[str] = None,
-    binario: bool = False,
-    is_azure: Optional[bool] = None
-) -> dict:
-    """
-    Crea/sobrescribe archivo de texto plano o binario con manejo robusto de encoding.
-    En Azure, fuerza directorio base wwwroot y valida la ruta.
-    En local, permite rutas absolutas sin restricción.
-    """
-    try:
-        if is_azure is None:
-            is_azure = is_running_in_azure()
+        return {
+            "exito": False,
+            "error": str(e),
+            "comando_intentado": comando
+        }
 
-        if is_azure:
-            base_dir = "/home/site/wwwroot"
-            ruta_completa = os.path.join(base_dir, ruta.lstrip('/'))
-            # Seguridad: prevenir path traversal en Azure
-            if not os.path.abspath(ruta_completa).startswith(os.path.abspath(base_dir)):
-                return {
-                    "exito": False,
-                    "error": f"Ruta fuera del directorio permitido: {ruta}",
-                    "directorio_base": base_dir
-                }
-        else:
-            # En local: permitir rutas absolutas y relativas libremente
-            ruta_completa = os.path.abspath(ruta)
 
-        os.makedirs(os.path.dirname(ruta_completa), exist_ok=True)
+def ejecutar_agente_externo(agente: str, tarea: str, parametros: Optional[dict] = None) -> dict:
+    """Ejecuta o delega tarea a un agente externo"""
+    if parametros is None:
+        parametros = {}
+    agentes_disponibles = {
+        "Agent975": {
+            "endpoint": os.environ.get("AI_FOUNDRY_ENDPOINT"),
+            "proyecto": "booking-agents",
+            "capacidades": ["analizar", "refactorizar", "documentar"]
+        },
+        "CodeGPT": {
+            "api": "https://api.codegpt.co",
+            "capacidades": ["generar", "completar", "explicar"]
+        },
+        "Codex": {
+            "servicio": "openai-codex",
+            "capacidades": ["codigo", "traducir", "optimizar"]
+        }
+    }
+    if agente not in agentes_disponibles:
+        return {
+            "exito": False,
+            "error": f"Agente no disponible: {agente}",
+            "agentes_disponibles": list(agentes_disponibles.keys())
+        }
+    config_agente = agentes_disponibles[agente]
+    return {
+        "exito": True,
+        "agente": agente,
+        "tarea": tarea,
+        "estado": "delegado",
+        "configuracion": config_agente,
+        "parametros_enviados": parametros,
+        "mensaje": f"Tarea '{tarea}' delegada a {agente}",
+        "siguiente_accion": "verificar_resultado"
+    }
 
-        if binario:
-            # contenido debe ser base64
-            if not contenido:
-                return {
-                    "exito": False,
-                    "error": "Falta 'contenido_base64' para archivo binario"
-                }
-            try:
-                raw = base64.b64decode(contenido)
-            except Exception as e:
-                return {
-                    "exito": False,
-                    "error": f"Error decodificando base64: {str(e)}"
-                }
-            with open(ruta_completa, 'wb') as f:
-                f.write(raw)
-            tamaño_bytes = len(raw)
-        else:
-            with open(ruta_completa, 'w', encoding='utf-8') as f:
-                f.write(contenido)
-            tamaño_bytes = os.path.getsize(ruta_completa)
-            # Agregar encoding declaration si es un script Python
-            if ruta_completa.endswith('.py'):
-                with open(ruta_completa, 'r+', encoding='utf-8') as f:
-                    content = f.read()
-                    if not content.startswith('# -*- coding:'):
-                        f.seek(0, 0)
-                        f.write('# -*- coding: utf-8 -*-\n' + content)
 
+def comando_bash(cmd: str, seguro: bool = False) -> dict:
+    """Ejecuta comandos bash/shell de forma segura"""
+    comandos_seguros = [
+        "ls", "pwd", "echo", "cat", "grep", "find", "which",
+        "az", "git", "npm", "node", "python", "pip"
+    ]
+    primer_comando = cmd.split()[0]
+    if not seguro and primer_comando not in comandos_seguros:
         return {
-            "exito": True,
-            "mensaje": f"Archivo {'binario' if binario else 'de texto'} creado: {ruta}",
-            "encoding": "utf-8" if not binario else None,
-            "tamaño_bytes": tamaño_bytes,
-            "ubicacion": f"file://{ruta_completa}",
-            "ruta_absoluta": ruta_completa,
-            "tipo_operacion": "crear_archivo_local_binario" if binario else "crear_archivo_local",
-            "modo_acceso": "local_filesystem",
-            "advertencia": "⚠️ En Azure, los archivos locales son VOLÁTILES y se pierden al reiniciar" if is_azure else "",
-            "metadata": {
-                "tipo_mime": tipo_mime or ("application/octet-stream" if binario else "text/plain")
-            }
+            "exito": False,
+            "error": f"Comando '{primer_comando}' no está en la lista de comandos seguros",
+            "sugerencia": "Usa parametro 'seguro': true para forzar ejecución"
         }
-
-    except UnicodeEncodeError as e:
+    try:
+        resultado = command_executor.run(
+            cmd,
+            shell=True,
+            timeout=30,
+            cwd=str(PROJECT_ROOT)
+        )
+        return {
+            "exito": resultado.returncode == 0,
+            "stdout": resultado.stdout,
+            "stderr": resultado.stderr,
+            "comando": cmd,
+            "directorio": str(PROJECT_ROOT)
+        }
+    except subprocess.TimeoutExpired:
         return {
             "exito": False,
-            "error": f"Error de encoding: {str(e)}",
-            "sugerencia": "Use solo caracteres UTF-8 o especifique encoding"
+            "error": "Comando excedió tiempo límite (30s)",
+            "comando": cmd
         }
     except Exception as e:
         return {
             "exito": False,
-            "error": f"Error escribiendo archivo local: {str(e)}",
-            "ruta_intentada": ruta
+            "error": str(e),
+            "comando": cmd
         }
 
 
-def _resolve_handler(endpoint: str):
-    if not endpoint:
-        return None, None
+def procesar_intencion_extendida(intencion: str, parametros: Optional[Dict[str, Any]] = None) -> dict:
+    """
+    Procesa intenciones semánticas extendidas no cubiertas en el procesador base
+    """
+    if parametros is None:
+        parametros = {}
 
-    path = endpoint.strip()
-    if not path.startswith("/"):
-        path = "/" + path
-    if not path.startswith("/api/"):
-        path = "/api" + path
+    intenciones_map = {
+        "verificar:almacenamiento": verificar_almacenamiento,
+        "limpiar:cache": limpiar_cache,
+        "sincronizar:blobs": sincronizar_blob_storage if 'sincronizar_blob_storage' in globals() else lambda p: {"exito": False, "error": "Función no implementada"},
+        "generar:resumen": generar_resumen_ejecutivo,
+        "generar:documentacion": generar_documentacion_tecnica if 'generar_documentacion_tecnica' in globals() else lambda p: {"exito": False, "error": "Función no implementada"},
+        "git:status": git_status_seguro,
+        "git:push": git_push_seguro if 'git_push_seguro' in globals() else lambda p: {"exito": False, "error": "Función no implementada"},
+        "git:commit": git_commit_semantico if 'git_commit_semantico' in globals() else lambda p: {"exito": False, "error": "Función no implementada"},
+        "analizar:rendimiento": analizar_rendimiento_sistema if 'analizar_rendimiento_sistema' in globals() else lambda p: {"exito": False, "error": "Función no implementada"},
+        "analizar:seguridad": auditoria_seguridad if 'auditoria_seguridad' in globals() else lambda p: {"exito": False, "error": "Función no implementada"},
+        "analizar:dependencias": revisar_dependencias if 'revisar_dependencias' in globals() else lambda p: {"exito": False, "error": "Función no implementada"},
+        "confirmar:accion": confirmar_accion_pendiente,
+        "cancelar:accion": cancelar_operacion if 'cancelar_operacion' in globals() else lambda p: {"exito": False, "error": "Función no implementada"}
+    }
 
-    # Excepción explícita para escribir-archivo-local
-    if endpoint == "escribir-archivo-local" or path == "/api/escribir-archivo-local":
-        # 1) Buscar directamente en globals
-        fn = globals().get("escribir_archivo_local_http")
-        if fn:
-            return path, fn
-        # 2) Buscar en funciones registradas en app
-        for f in app.get_functions():
-            if getattr(f, "name", None) == "escribir_archivo_local_http":
-                return path, f.get_user_function()  # <--- aquí está el handler real
+    for patron, funcion in intenciones_map.items():
+        if intencion.startswith(patron) or patron in intencion:
+            return funcion(parametros)
 
-    # Otras excepciones
-    name = _INVOCAR_EXCEPTIONS.get(path) or _INVOCAR_EXCEPTIONS.get(endpoint)
-    if name:
-        fn = globals().get(name)
-        if fn:
-            return path, fn
-        for f in app.get_functions():
-            if getattr(f, "name", None) == name:
-                return path, f.get_user_function()
+    return interpretar_intencion_semantica(intencion, parametros)
 
-    # Heurística
-    stem = path[len("/api/"):]
-    cand = stem.replace("-", "_") + "_http"
-    fn = globals().get(cand)
-    if fn:
-        return path, fn
-    for f in app.get_functions():
-        if getattr(f, "name", None) == cand:
-            return path, f.get_user_function()
 
-    return path, None
-
-
-@app.function_name(name="hybrid")
-@app.route(route="hybrid", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def hybrid(req: func.HttpRequest) -> func.HttpResponse:
+def verificar_almacenamiento(params: dict) -> dict:
+    try:
+        client = get_blob_client()
+        if not client:
+            return {"exito": False, "error": "Blob Storage no configurado"}
+        container_client = client.get_container_client(CONTAINER_NAME)
+        total_blobs = 0
+        total_size = 0
+        tipos_archivo = {}
+        for blob in container_client.list_blobs():
+            total_blobs += 1
+            total_size += blob.size
+            extension = blob.name.split(
+                '.')[-1] if '.' in blob.name else 'sin_extension'
+            tipos_archivo[extension] = tipos_archivo.get(extension, 0) + 1
+        return {
+            "exito": True,
+            "almacenamiento": {
+                "container": CONTAINER_NAME,
+                "total_archivos": total_blobs,
+                "tamaño_total_mb": round(total_size / (1024 * 1024), 2),
+                "tipos_archivo": tipos_archivo,
+                "estado": "conectado"
+            },
+            "sugerencias": [
+                "limpiar:cache si hay muchos archivos temporales",
+                "sincronizar:blobs para actualizar archivos locales"
+            ] if total_blobs > 1000 else []
+        }
+    except Exception as e:
+        return {"exito": False, "error": str(e)}
 
-    logging.info('Hybrid (semantico inteligente) activado')
 
-    # 🧠 OBTENER CONTEXTO DEL WRAPPER AUTOMÁTICO
-    # asegura disponibilidad en este scope
-    from memory_manual import aplicar_memoria_manual
-    memoria_previa = getattr(req, '_memoria_contexto', {})
-    if memoria_previa and memoria_previa.get("contexto_recuperado"):
-        logging.info(
-            f"🧠 Hybrid: Continuando sesión con {memoria_previa['total_interacciones']} interacciones previas")
+def limpiar_cache(params: dict) -> dict:
+    archivos_antes = len(CACHE)
+    memoria_antes = sum(len(str(v)) for v in CACHE.values())
+    CACHE.clear()
+    return {
+        "exito": True,
+        "limpieza": {
+            "archivos_eliminados": archivos_antes,
+            "memoria_liberada_bytes": memoria_antes,
+            "timestamp": datetime.now().isoformat()
+        },
+        "mensaje": f"Cache limpiado: {archivos_antes} archivos, {memoria_antes/1024:.2f} KB liberados"
+    }
 
-    # 🧠 CONSULTAR MEMORIA AUTOMÁTICAMENTE (legacy)
-    from memory_helpers import obtener_memoria_request, obtener_prompt_memoria, extraer_session_info
 
-    memoria_contexto = obtener_memoria_request(req)
-    memoria_prompt = obtener_prompt_memoria(req)
-    session_info = extraer_session_info(req)
+def generar_resumen_ejecutivo(params: dict) -> dict:
+    diagnostico = diagnosticar_function_app()
+    almacenamiento = verificar_almacenamiento({})
+    resumen = {
+        "titulo": "Resumen Ejecutivo - Boat Rental System",
+        "fecha": datetime.now().strftime("%Y-%m-%d %H:%M"),
+        "estado_general": "operativo" if diagnostico.get("checks", {}).get("configuracion", {}).get("ambiente") else "degradado",
+        "metricas_clave": {
+            "archivos_proyecto": almacenamiento.get("almacenamiento", {}).get("total_archivos", 0),
+            "tamaño_total_mb": almacenamiento.get("almacenamiento", {}).get("tamaño_total_mb", 0),
+            "cache_activo": len(CACHE),
+            "ambiente": "Azure" if IS_AZURE else "Local"
+        },
+        "componentes": {
+            "mobile_app": {"estado": "activo", "tecnologia": "React Native + Expo"},
+            "backend": {"estado": "activo", "tecnologia": "AWS Lambda + DynamoDB"},
+            "admin_panel": {"estado": "activo", "tecnologia": "Next.js + Material-UI"},
+            "copiloto_ai": {"estado": "activo", "version": "2.0-orchestrator"}
+        },
+        "proximas_acciones": [
+            "Implementar CI/CD con Azure DevOps",
+            "Aumentar cobertura de tests al 80%",
+            "Optimizar queries de base de datos"
+        ],
+        "riesgos_identificados": []
+    }
+    if not almacenamiento.get("exito"):
+        resumen["riesgos_identificados"].append("Blob Storage desconectado")
+    if len(CACHE) > 500:
+        resumen["riesgos_identificados"].append("Cache sobrecargado")
+    return {
+        "exito": True,
+        "resumen": resumen,
+        "formato_disponible": ["json", "markdown", "pdf"],
+        "siguiente_accion": "generar:reporte para detalles completos"
+    }
 
-    if memoria_contexto and memoria_contexto.get("tiene_historial"):
-        logging.info(
-            f"🧠 Memoria de sesión disponible: {memoria_contexto['total_interacciones_sesion']} interacciones previas")
-    elif session_info.get("session_id"):
-        logging.info(f"🆕 Nueva sesión detectada: {session_info['session_id']}")
 
+def git_status_seguro(params: dict) -> dict:
     try:
-        from semantic_intent_parser import enhance_hybrid_parser, should_trigger_bing_grounding
-
-        # Validación flexible del JSON - acepta cualquier payload
-        req_body = req.get_json()
-        if req_body is None:
-            req_body = {}
-
-        logging.info(
-            f"Hybrid recibió payload: {json.dumps(req_body, ensure_ascii=False)[:200]}...")
-
-        # NUEVO: Parser semántico inteligente
-        user_input = None
-        parsed_command = None
-
-        # Extraer input del usuario de diferentes formatos
-        if "agent_response" in req_body:
-            user_input = req_body["agent_response"]
-            logging.info("Formato legacy detectado: agent_response")
-        elif "query" in req_body:
-            user_input = req_body["query"]
-            logging.info("Formato query detectado")
-        elif "mensaje" in req_body:
-            user_input = req_body["mensaje"]
-            logging.info("Formato mensaje detectado")
-        elif "intencion" in req_body:
-            user_input = req_body["intencion"]
-            logging.info("Formato intencion detectado")
-        elif isinstance(req_body, dict) and len(req_body) == 1:
-            # Si solo hay un campo, usarlo como input
-            key, value = next(iter(req_body.items()))
-            user_input = str(value)
-            logging.info(f"Formato single-field detectado: {key}")
-        else:
-            # Convertir todo el payload a string como último recurso
-            user_input = json.dumps(req_body, ensure_ascii=False)
-            logging.info("Formato libre - usando payload completo")
-
-        # Usar parser semántico inteligente
-        if user_input:
-            parsed_command = enhance_hybrid_parser(user_input)
-            logging.info(
-                f"Parser semántico result: {parsed_command.get('endpoint', 'unknown')}")
+        result = subprocess.run(
+            ["git", "status", "--porcelain"],
+            capture_output=True,
+            text=True,
+            cwd=str(PROJECT_ROOT),
+            timeout=10
+        )
+        if result.returncode == 0:
+            lines = result.stdout.strip().split('\n') if result.stdout.strip() else []
+            archivos_modificados = []
+            archivos_nuevos = []
+            archivos_eliminados = []
+            for line in lines:
+                if line.startswith(' M'):
+                    archivos_modificados.append(line[3:])
+                elif line.startswith('??'):
+                    archivos_nuevos.append(line[3:])
+                elif line.startswith(' D'):
+                    archivos_eliminados.append(line[3:])
+            return {
+                "exito": True,
+                "estado_git": {
+                    "modificados": archivos_modificados,
+                    "nuevos": archivos_nuevos,
+                    "eliminados": archivos_eliminados,
+                    "limpio": len(lines) == 0
+                },
+                "siguiente_accion": "git:commit" if lines else None
+            }
         else:
-            # Fallback si no hay input
-            parsed_command = {"endpoint": "status", "method": "GET"}
-
-        # Ejecutar el comando parseado con manejo especial para Bing Grounding
-        if parsed_command and "error" not in parsed_command:
-            logging.info(
-                f"Comando parseado: {parsed_command.get('endpoint', 'unknown')}")
+            return {"exito": False, "error": result.stderr}
+    except Exception as e:
+        return {"exito": False, "error": str(e)}
 
-            # Si requiere Bing Grounding, ejecutarlo con validación de tipos
-            if parsed_command.get("requires_grounding"):
-                logging.info(
-                    f"Activando Bing Grounding para: {user_input[:50]}...")
-                data = parsed_command.get("data")
-                if isinstance(data, dict):
-                    query = data.get("query", "")
-                    contexto = data.get("contexto", "general")
-                    resultado = ejecutar_bing_grounding_fallback(
-                        query,
-                        contexto,
-                        {"original_query": user_input}
-                    )
-                else:
-                    # Manejar caso donde data no es un dict (e.g., es un string)
-                    logging.warning(
-                        f"Data no es un dict: {type(data)}, usando fallback")
-                    resultado = ejecutar_bing_grounding_fallback(
-                        user_input or "help",
-                        "error_fallback",
-                        {"parse_error": "data no es dict", "payload": req_body}
-                    )
-            else:
-                resultado = execute_parsed_command(parsed_command)
-        else:
-            logging.warning(f"Error en parsing: {parsed_command}")
-            # Fallback - usar Bing Grounding incluso para errores
-            resultado = ejecutar_bing_grounding_fallback(
-                user_input or "help",
-                "error_fallback",
-                {"parse_error": parsed_command.get(
-                    "error"), "payload": req_body}
-            )
 
-        # Respuesta consistente con información semántica
-        response = {
-            "resultado": resultado,
-            "metadata": {
-                "timestamp": datetime.now().isoformat(),
-                "endpoint": "hybrid",
-                "version": "2.0-semantic-intelligent",
-                "user_input": user_input[:100] if user_input else "none",
-                "parsed_endpoint": parsed_command.get("endpoint") if parsed_command else "none",
-                "used_grounding": parsed_command.get("requires_grounding", False) if parsed_command else False,
-                "ambiente": "Azure" if IS_AZURE else "Local",
-                "session_info": session_info,
-                "memoria_disponible": bool(memoria_contexto and memoria_contexto.get("tiene_historial"))
-            }
+def confirmar_accion_pendiente(params: dict) -> dict:
+    accion_id = params.get("accion_id")
+    confirmar = params.get("confirmar", False)
+    if not accion_id:
+        return {"exito": False, "error": "Se requiere accion_id para confirmar"}
+    if confirmar:
+        return {
+            "exito": True,
+            "mensaje": f"Acción {accion_id} confirmada y ejecutada",
+            "timestamp": datetime.now().isoformat()
         }
-
-        # 🧠 AGREGAR CONTEXTO DE MEMORIA A LA RESPUESTA
-        if memoria_prompt:
-            response["contexto_memoria"] = memoria_prompt
-
-        from memory_helpers import agregar_memoria_a_respuesta
-        response = agregar_memoria_a_respuesta(response, req)
-
-        # ✅ MEMORIA AUTOMÁTICA: El wrapper ya inyectó memoria en req._memoria_contexto
-        # Solo aplicar memoria manual para enriquecimiento adicional
-        response = aplicar_memoria_manual(req, response)
-
-        return func.HttpResponse(json.dumps(response, ensure_ascii=False), mimetype="application/json", status_code=200)
-
-    except ValueError as ve:
-        # Error específico de parsing JSON
-        logging.error(f"Hybrid: Error parsing JSON: {str(ve)}")
-        return func.HttpResponse(
-            json.dumps({
-                "error": "Invalid JSON format in request body",
-                "error_code": "JSON_PARSE_ERROR",
-                "status": 400,
-                "details": str(ve)
-            }),
-            mimetype="application/json",
-            status_code=400
-        )
-
-    except Exception as e:
-        logging.error(f"Error en hybrid: {str(e)}")
-        logging.error(f"Traceback: {traceback.format_exc()}")
-
-        error_response = {
-            "error": str(e),
-            "error_code": "INTERNAL_ERROR",
-            "status": 500,
-            "metadata": {
-                "timestamp": datetime.now().isoformat(),
-                "endpoint": "hybrid",
-                "ambiente": "Azure" if IS_AZURE else "Local"
-            }
+    else:
+        return {
+            "exito": False,
+            "mensaje": f"Acción {accion_id} no confirmada",
+            "estado": "cancelada"
         }
-        return func.HttpResponse(json.dumps(error_response), mimetype="application/json", status_code=500)
 
 
-# Helper claro para extraer JSON embebido dinámicamente
+def interpretar_intencion_semantica(intencion: str, params: dict) -> dict:
+    keywords_map = {
+        "estado": "status",
+        "salud": "health",
+        "dashboard": "dashboard",
+        "diagnóstico": "diagnosticar:completo",
+        "diagnostico": "diagnosticar:completo",
+        "resumen": "generar:resumen",
+        "reporte": "generar:reporte",
+        "limpiar": "limpiar:cache",
+        "almacenamiento": "verificar:almacenamiento",
+        "storage": "verificar:almacenamiento",
+        "git": "git:status",
+        "commit": "git:commit",
+        "push": "git:push"
+    }
+    intencion_lower = intencion.lower()
+    for keyword, mapped_intent in keywords_map.items():
+        if keyword in intencion_lower:
+            return procesar_intencion_semantica(mapped_intent, params)
+    return {
+        "exito": False,
+        "mensaje": f"No pude interpretar la intención: '{intencion}'",
+        "sugerencias": [
+            "dashboard - Ver métricas del sistema",
+            "diagnosticar:completo - Diagnóstico exhaustivo",
+            "generar:resumen - Resumen ejecutivo",
+            "verificar:almacenamiento - Estado del storage",
+            "git:status - Estado del repositorio"
+        ],
+        "tip": "Puedes usar comandos más específicos o palabras clave conocidas"
+    }
 
+# --- FUNCIONES FALTANTES PARA INTENCIONES EXTENDIDAS ---
 
-def extraer_json_instruccion(texto: str):
+
+def sincronizar_blob_storage(params: dict) -> dict:
+    """Sincroniza archivos locales con Azure Blob Storage"""
     try:
-        # Expresión clara que detecta JSON dentro de markdown ```
-        matches = re.findall(r'```json\s*(\{.*?\})\s*```', texto, re.DOTALL)
-        if matches:
-            instruccion = json.loads(matches[0])
-            intencion = instruccion.get(
-                'endpoint') or instruccion.get('intencion')
-            parametros = instruccion.get(
-                'data') or instruccion.get('parametros') or {}
-            return intencion, parametros
+        # Aquí deberías implementar la lógica real de sincronización
+        # Por ahora, solo simula la operación
+        return {
+            "exito": True,
+            "mensaje": "Sincronización de archivos con Blob Storage iniciada.",
+            "detalles": "Esta función es un placeholder. Implementa la lógica real según tus necesidades."
+        }
     except Exception as e:
-        logging.warning(f"No se pudo extraer JSON claramente: {e}")
-    return None, {}
-
-# Procesamiento dinámico seguro (invocación de endpoints existentes)
+        return {"exito": False, "error": str(e)}
 
 
-def procesar_intencion_hybrid(intencion: str, parametros: dict):
+def generar_documentacion_tecnica(params: dict) -> dict:
+    """Genera documentación técnica del proyecto"""
     try:
-        endpoint_url = f"{os.environ['FUNCTION_BASE_URL']}/api/{intencion}"
-        method = parametros.pop('method', 'POST').upper()
-
-        # Solicitud dinámica al endpoint (sin predefinir estructuras)
-        response = requests.request(
-            method, endpoint_url, json=parametros, timeout=30)
-
-        try:
-            data = response.json()
-        except:
-            data = {"raw_response": response.text}
-
+        # Simulación de generación de documentación
         return {
-            "exito": response.ok,
-            "status_code": response.status_code,
-            "data": data
+            "exito": True,
+            "documentacion": "# Documentación Técnica\n\nEste es un ejemplo de documentación generada automáticamente.",
+            "formato": "markdown",
+            "mensaje": "Documentación técnica generada correctamente."
         }
-
     except Exception as e:
-        logging.error(
-            f"Error invocando endpoint dinámico '{intencion}': {str(e)}")
         return {"exito": False, "error": str(e)}
 
 
-def process_direct_command(command: dict) -> func.HttpResponse:
-    """Procesa un comando directo sin agent_response wrapper"""
+def git_push_seguro(params: dict) -> dict:
+    """Realiza un git push seguro"""
     try:
-        logging.info(
-            f"Procesando comando directo: {command.get('endpoint', 'unknown')}")
-
-        # Mapear a la estructura esperada
-        if command.get("endpoint") == "ejecutar":
-            resultado = procesar_intencion_semantica(
-                command.get("intencion", ""),
-                command.get("parametros", {})
-            )
-        elif command.get("endpoint") == "copiloto":
-            # Simular llamada a copiloto
-            resultado = {
-                "tipo": "respuesta_semantica",
-                "comando_original": command.get("mensaje", ""),
-                "accion": "procesado",
-                "resultado": {"exito": True}
-            }
-        elif command.get("endpoint") == "status":
-            resultado = build_status()
-        else:
-            resultado = {
-                "exito": False,
-                "error": f"Endpoint {command.get('endpoint')} no reconocido"
-            }
-
-        return func.HttpResponse(
-            json.dumps(resultado, indent=2, ensure_ascii=False),
-            mimetype="application/json"
+        result = subprocess.run(
+            ["git", "push"],
+            capture_output=True,
+            text=True,
+            cwd=str(PROJECT_ROOT),
+            timeout=20
         )
-
+        return {
+            "exito": result.returncode == 0,
+            "salida": result.stdout,
+            "error": result.stderr if result.stderr else None,
+            "mensaje": "Push realizado correctamente." if result.returncode == 0 else "Error en git push."
+        }
     except Exception as e:
-        return func.HttpResponse(
-            json.dumps({
-                "error": str(e),
-                "command_received": command
-            }, indent=2),
-            mimetype="application/json",
-            status_code=500
-        )
-
-
-def generate_semantic_explanation(command: dict) -> str:
-    """Genera una explicación semántica para un comando JSON"""
-
-    intencion = command.get("intencion", "")
-    urgencia = command.get("contexto", {}).get("urgencia", "normal")
-
-    explanations = {
-        "dashboard": "📊 Voy a generar el dashboard con insights del proyecto",
-        "diagnosticar:completo": "🔍 Realizaré un diagnóstico completo del sistema",
-        "guia:debug_errores": "🛠️ Te guiaré paso a paso para resolver el error",
-        "buscar": "🔎 Buscaré archivos en el proyecto",
-        "ejecutar:azure": "☁️ Ejecutaré el comando Azure CLI solicitado"
-    }
-
-    # Buscar explicación base
-    base_explanation = None
-    for key, explanation in explanations.items():
-        if key in intencion:
-            base_explanation = explanation
-            break
-
-    if not base_explanation:
-        base_explanation = f"Procesando intención: {intencion}"
-
-    # Agregar contexto de urgencia si es alta
-    if urgencia == "alta":
-        base_explanation = f"⚠️ URGENCIA ALTA: {base_explanation}"
-    elif urgencia == "critica":
-        base_explanation = f"🚨 CRÍTICO: {base_explanation}"
-
-    return base_explanation
+        return {"exito": False, "error": str(e)}
 
 
-def execute_hybrid_command(command: dict) -> dict:
-    """Ejecuta un comando del agente con mejor manejo de errores"""
+def git_commit_semantico(params: dict) -> dict:
+    """Realiza un git commit con mensaje semántico"""
+    mensaje = params.get("mensaje", "Commit semántico automático")
     try:
-        logging.info(f'Ejecutando comando: {command}')
-
-        endpoint = command.get("endpoint", "ejecutar")
+        result = subprocess.run(
+            ["git", "commit", "-am", mensaje],
+            capture_output=True,
+            text=True,
+            cwd=str(PROJECT_ROOT),
+            timeout=15
+        )
+        return {
+            "exito": result.returncode == 0,
+            "salida": result.stdout,
+            "error": result.stderr if result.stderr else None,
+            "mensaje": "Commit realizado correctamente." if result.returncode == 0 else "Error en git commit."
+        }
+    except Exception as e:
+        return {"exito": False, "error": str(e)}
 
-        if endpoint == "ejecutar":
-            intencion = command.get("intencion", "")
-            parametros = command.get("parametros", {})
 
-            # Llamar al procesador semántico
-            resultado = procesar_intencion_semantica(intencion, parametros)
+def analizar_rendimiento_sistema(params: dict) -> dict:
+    """Analiza el rendimiento del sistema"""
+    try:
+        # Simulación de análisis de rendimiento
+        return {
+            "exito": True,
+            "rendimiento": {
+                "cpu": "Bajo uso",
+                "memoria": "Óptima",
+                "latencia": "< 200ms"
+            },
+            "mensaje": "Análisis de rendimiento completado."
+        }
+    except Exception as e:
+        return {"exito": False, "error": str(e)}
 
-            # Asegurar que el resultado tenga la estructura esperada
-            if not isinstance(resultado, dict):
-                resultado = {
-                    "exito": False,
-                    "error": f"Resultado inesperado del procesador: {type(resultado).__name__}",
-                    "resultado_original": str(resultado)
-                }
 
-            return resultado
+def auditoria_seguridad(params: dict) -> dict:
+    """Realiza una auditoría de seguridad básica"""
+    try:
+        # Simulación de auditoría de seguridad
+        return {
+            "exito": True,
+            "seguridad": {
+                "vulnerabilidades": 0,
+                "dependencias_obsoletas": 0,
+                "recomendaciones": ["Actualizar dependencias regularmente", "Revisar logs de acceso"]
+            },
+            "mensaje": "Auditoría de seguridad completada."
+        }
+    except Exception as e:
+        return {"exito": False, "error": str(e)}
 
-        elif endpoint == "copiloto":
-            mensaje = command.get("mensaje", "")
-            if mensaje.startswith("leer:"):
-                archivo = mensaje.split(":", 1)[1]
-                return leer_archivo_dinamico(archivo)
-            elif mensaje.startswith("buscar:"):
-                patron = mensaje.split(":", 1)[1]
-                return buscar_archivos_semantico(patron)
-            else:
-                return {
-                    "exito": True,
-                    "mensaje": f"Comando copiloto procesado: {mensaje}",
-                    "tipo": "copiloto_response"
-                }
 
-        elif endpoint == "status":
-            return build_status()
+def revisar_dependencias(params: dict) -> dict:
+    """Revisa dependencias del proyecto"""
+    try:
+        # Simulación de revisión de dependencias
+        return {
+            "exito": True,
+            "dependencias": [
+                {"nombre": "azure-functions",
+                 "version": "1.16.0", "estado": "actualizada"},
+                {"nombre": "azure-storage-blob",
+                 "version": "12.14.1", "estado": "actualizada"}
+            ],
+            "mensaje": "Revisión de dependencias completada."
+        }
+    except Exception as e:
+        return {"exito": False, "error": str(e)}
 
-        else:
-            return {
-                "exito": False,
-                "error": f"Endpoint '{endpoint}' no implementado",
-                "endpoints_disponibles": ["ejecutar", "copiloto", "status"]
-            }
 
-    except Exception as e:
-        logging.error(f"Error ejecutando comando: {str(e)}")
+def cancelar_operacion(params: dict) -> dict:
+    """Cancela una operación pendiente"""
+    try:
+        operacion = params.get("operacion", "desconocida")
         return {
-            "exito": False,
-            "error": str(e),
-            "tipo_error": type(e).__name__,
-            "comando_fallido": command
+            "exito": True,
+            "mensaje": f"Operación '{operacion}' cancelada correctamente.",
+            "timestamp": datetime.now().isoformat()
         }
+    except Exception as e:
+        return {"exito": False, "error": str(e)}
 
 
-def generate_user_friendly_response(processed: dict, execution_result: dict) -> str:
-    """Genera una respuesta amigable para el usuario"""
+# ---------- util md5 ----------
+def _md5_to_b64(maybe_md5) -> Optional[str]:
+    if isinstance(maybe_md5, (bytes, bytearray)):
+        return base64.b64encode(bytes(maybe_md5)).decode("utf-8")
+    return None
 
-    parts = []
+# ---------- helper: format file size ----------
 
-    # Agregar explicación semántica
-    if processed.get("semantic_explanation"):
-        parts.append(processed["semantic_explanation"])
 
-    # Agregar resultado de ejecución
-    if execution_result.get("exito"):
-        parts.append("\n✅ Comando ejecutado exitosamente")
+def _format_file_size(size_bytes: int) -> str:
+    """Convierte tamaño en bytes a formato legible (KB, MB, GB, etc.)"""
+    try:
+        if size_bytes < 1024:
+            return f"{size_bytes} B"
+        elif size_bytes < 1024 ** 2:
+            return f"{size_bytes / 1024:.2f} KB"
+        elif size_bytes < 1024 ** 3:
+            return f"{size_bytes / (1024 ** 2):.2f} MB"
+        else:
+            return f"{size_bytes / (1024 ** 3):.2f} GB"
+    except Exception:
+        return str(size_bytes)
 
-        # Agregar detalles relevantes
-        if execution_result.get("resultado"):
-            if isinstance(execution_result["resultado"], dict):
-                # Extraer información importante
-                if "dashboard" in str(processed.get("command", {})).lower():
-                    parts.append(
-                        "\n📊 Dashboard generado con las siguientes secciones:")
-                    for seccion in execution_result["resultado"].get("secciones", {}).keys():
-                        parts.append(f"  • {seccion}")
+# ---------- info-archivo ----------
 
-    else:
-        error_msg = execution_result.get("error", "Error desconocido")
-        parts.append(f"\n❌ Error: {error_msg}")
 
-        # Sugerir acciones de recuperación
-        if execution_result.get("sugerencias"):
-            parts.append("\n💡 Sugerencias:")
-            for sug in execution_result["sugerencias"]:
-                parts.append(f"  • {sug}")
+def validate_info_archivo_params(req, run_id, CONTAINER_NAME, IS_AZURE, get_blob_client, PROJECT_ROOT, COPILOT_ROOT, Path, datetime, json, func, logging, os):
+    """
+    Validación robusta de parámetros y existencia física del archivo para info_archivo_http
+    """
+    try:
+        # ✅ VALIDACIÓN CRÍTICA: Verificar que ruta venga con archivo válido
+        ruta_raw = (req.params.get("ruta") or req.params.get("path") or
+                    req.params.get("archivo") or req.params.get("blob") or "").strip()
 
-    # Agregar próximas acciones
-    if processed.get("next_actions"):
-        parts.append("\n\n📌 Próximas acciones disponibles:")
-        for action in processed["next_actions"]:
-            parts.append(f"  • {action}")
-
-    return "\n".join(parts)
-
-
-# Excepciones de nombre (handlers que no siguen *_http)
-_INVOCAR_EXCEPTIONS = {
-    "/api/health": "health",
-    "/api/status": "status",
-    "/api/copiloto": "copiloto",
-    "/api/escribir-archivo-local": "escribir_archivo_local_http",
-    "escribir-archivo-local": "escribir_archivo_local_http",
-}
-
-
-@app.function_name(name="bridge_cli")
-@app.route(route="bridge-cli", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def bridge_cli(req: func.HttpRequest) -> func.HttpResponse:
-    """
-    Endpoint súper tolerante para agentes problemáticos que combina parsing raw + JSON
-    """
-    request_id = uuid.uuid4().hex[:8]
-    from endpoints.ejecutar_cli import ejecutar_cli_http
-    try:
-        # 🔥 VALIDACIÓN DEFENSIVA DE JSON + raw_body
-        raw_body = req.get_body().decode('utf-8') if req.get_body() else ""
-
-        # ✅ MEJORA: Aceptar body vacío y usar comando por defecto
-        if not raw_body and req.method == "POST":
-            logging.info(
-                f"[BRIDGE-{request_id}] ℹ️ Body vacío en POST, usando comando por defecto")
-            # En lugar de error, usar comando por defecto
-            comando_defecto = "storage account list"
-
-            # Ejecutar comando por defecto directamente
-            mock_req = func.HttpRequest(
-                method="POST",
-                url="http://localhost/api/ejecutar-cli",
-                body=json.dumps({"comando": comando_defecto}).encode(),
-                headers={"Content-Type": "application/json"}
-            )
-
-            result_response = ejecutar_cli_http(mock_req)
-            result_data = json.loads(result_response.get_body().decode())
-
-            # Agregar metadata indicando que se usó comando por defecto
-            if isinstance(result_data, dict):
-                result_data["bridge_metadata"] = {
-                    "request_id": request_id,
-                    "comando_extraido": comando_defecto,
-                    "origen_comando": "default_empty_body",
-                    "mensaje": "Body vacío - usando comando por defecto"
-                }
-
-            return func.HttpResponse(
-                json.dumps(result_data, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=200  # Siempre exitoso con comando por defecto
-            )
-
-        # ✅ SOLUCIÓN: Validar JSON malformado y devolver 400
-        json_body = {}
-        json_parse_error = None
-        is_malformed_json = False
-
-        try:
-            if raw_body.strip():
-                json_body = req.get_json() or {}
-        except ValueError as ve:
-            json_parse_error = str(ve)
-            is_malformed_json = True
-            logging.warning(
-                f"[BRIDGE-{request_id}] ⚠️ JSON inválido: {json_parse_error}")
-
-            # ✅ CORRECCIÓN: Rechazar JSON malformado con 400 en lugar de usar fallback
-            if raw_body.strip() and len(raw_body.strip()) > 5:  # Si hay contenido sustancial pero JSON inválido
-                return func.HttpResponse(
-                    json.dumps({
-                        "exito": False,
-                        "error_code": "MALFORMED_JSON",
-                        "error": "El cuerpo de la solicitud contiene JSON malformado",
-                        "details": {
-                            "parse_error": json_parse_error,
-                            "raw_body_preview": raw_body[:100],
-                            "request_id": request_id
-                        },
-                        "suggestion": "Verifica la sintaxis JSON del cuerpo de la solicitud",
-                        "status": 400
-                    }, ensure_ascii=False),
-                    mimetype="application/json",
-                    status_code=400
-                )
-
-            # Si es contenido mínimo malformado, también rechazar
-            return func.HttpResponse(
-                json.dumps({
-                    "exito": False,
-                    "error_code": "INVALID_REQUEST_BODY",
-                    "error": "Cuerpo de solicitud inválido o malformado",
-                    "details": {
-                        "parse_error": json_parse_error,
-                        "request_id": request_id
-                    },
-                    "status": 422
-                }, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=422
-            )
-
-        except Exception as e:
-            json_parse_error = str(e)
-            logging.error(
-                f"[BRIDGE-{request_id}] 💥 Error crítico parseando JSON: {json_parse_error}")
-
-            # ✅ CORRECCIÓN: Error crítico de parsing también debe devolver error
+        if not ruta_raw:
             return func.HttpResponse(
                 json.dumps({
                     "exito": False,
-                    "error_code": "JSON_PARSE_ERROR",
-                    "error": "Error crítico procesando el cuerpo de la solicitud",
-                    "details": {
-                        "parse_error": json_parse_error,
-                        "request_id": request_id
+                    "error": "Parámetro 'ruta' es requerido para obtener información del archivo",
+                    "error_code": "MISSING_REQUIRED_PARAMETER",
+                    "parametros_aceptados": {
+                        "ruta": "Ruta del archivo (requerido)",
+                        "path": "Alias para 'ruta'",
+                        "archivo": "Alias para 'ruta'",
+                        "blob": "Alias para 'ruta'"
                     },
-                    "status": 500
+                    "ejemplos_validos": [
+                        "?ruta=README.md",
+                        "?ruta=package.json",
+                        "?path=mobile-app/src/App.tsx",
+                        "?archivo=docs/API.md"
+                    ],
+                    "run_id": run_id,
+                    "timestamp": datetime.now().isoformat()
                 }, ensure_ascii=False),
                 mimetype="application/json",
-                status_code=500
+                status_code=400
             )
 
-        # Log detallado para debugging
-        logging.warning(
-            f"[BRIDGE-{request_id}] 🚨 Agente problemático detectado")
-        logging.info(f"[BRIDGE-{request_id}] Raw body: {raw_body[:300]}")
-        logging.info(
-            f"[BRIDGE-{request_id}] JSON body: {json.dumps(json_body, ensure_ascii=False)[:200]}")
-
-        comando = None
-        origen = "desconocido"
-
-        # 1. Intentar extraer comando del JSON body (primera prioridad)
-        if json_body:
-            if "comando" in json_body:
-                comando = json_body["comando"]
-                origen = "json_directo"
-            elif "servicio" in json_body and "comando" in json_body:
-                comando = f"{json_body['servicio']} {json_body['comando']}"
-                origen = "json_separado"
-            elif "agent_response" in json_body:
-                response = json_body["agent_response"]
-                if "group list" in response.lower():
-                    comando = "group list"
-                    origen = "agent_response_group"
-                elif "storage account" in response.lower():
-                    comando = "storage account list"
-                    origen = "agent_response_storage"
-            elif json_body.get("data", {}).get("comando"):
-                comando = json_body["data"]["comando"]
-                origen = "json_anidado"
-
-        # 2. Si no se encontró en JSON válido, buscar en raw_body
-        if not comando and raw_body and not is_malformed_json:
-            # Solo procesar raw_body si no era JSON malformado
-            if len(raw_body.strip()) < 2:
-                comando = "group list"
-                origen = "minimal_content_fallback"
-                logging.info(
-                    f"[BRIDGE-{request_id}] 🔄 Contenido mínimo, usando fallback: {comando}")
-            elif raw_body.strip() in ["{}", ""]:
-                # Query params o comando por defecto
-                comando = (req.params.get("comando") or
-                           req.params.get("cmd") or
-                           req.params.get("query") or
-                           "storage account list")
-                origen = "query_params_or_default"
-            else:
-                # Buscar patrones en el texto raw
-                raw_lower = raw_body.lower()
-                if "storage account" in raw_lower:
-                    comando = "storage account list"
-                    origen = "raw_pattern_storage"
-                elif "group list" in raw_lower:
-                    comando = "group list"
-                    origen = "raw_pattern_group"
-                elif "storage" in raw_lower:
-                    comando = "storage account list"
-                    origen = "raw_fallback_storage"
-                elif "group" in raw_lower:
-                    comando = "group list"
-                    origen = "raw_fallback_group"
-
-        # 3. Validación final - si no hay comando válido, rechazar
-        if not comando or len(comando.strip()) < 2:
+        # ✅ VALIDACIÓN ADICIONAL: Formato de ruta válido
+        if ruta_raw.startswith("//") or ".." in ruta_raw or len(ruta_raw.strip()) < 1:
             return func.HttpResponse(
                 json.dumps({
                     "exito": False,
-                    "error_code": "NO_VALID_COMMAND",
-                    "error": "No se pudo extraer un comando válido de la solicitud",
-                    "details": {
-                        "raw_body_preview": raw_body[:100] if raw_body else "vacío",
-                        "json_body_keys": list(json_body.keys()) if json_body else [],
-                        "request_id": request_id
-                    },
-                    "suggestion": "Proporciona un comando válido en el formato JSON esperado",
-                    "status": 400
+                    "error": "Formato de ruta inválido o inseguro",
+                    "error_code": "INVALID_PATH_FORMAT",
+                    "ruta_recibida": ruta_raw,
+                    "problema": "Contiene caracteres no permitidos o está vacía",
+                    "formatos_validos": [
+                        "archivo.txt",
+                        "carpeta/archivo.txt",
+                        "docs/readme.md"
+                    ],
+                    "run_id": run_id
                 }, ensure_ascii=False),
                 mimetype="application/json",
                 status_code=400
             )
 
-        logging.info(
-            f"[BRIDGE-{request_id}] ✅ Comando extraído: '{comando}' (origen: {origen})")
-
-        # 4. Ejecutar comando usando el handler interno
-        mock_req = func.HttpRequest(
-            method="POST",
-            url="http://localhost/api/ejecutar-cli",
-            body=json.dumps({"comando": comando}).encode(),
-            headers={"Content-Type": "application/json"}
-        )
-
-        # Llamar directamente al handler para evitar problemas de red
-        result_response = ejecutar_cli_http(mock_req)
-
-        # Agregar metadata de bridge al resultado
-        try:
-            result_data = json.loads(result_response.get_body().decode())
-            if isinstance(result_data, dict):
-                result_data["bridge_metadata"] = {
-                    "request_id": request_id,
-                    "comando_extraido": comando,
-                    "origen_comando": origen,
-                    "raw_body_size": len(raw_body),
-                    "json_body_keys": list(json_body.keys()) if json_body else [],
-                    "json_parse_error": json_parse_error,
-                    "fallback_usado": origen.endswith("_fallback") or "default" in origen
-                }
-
-            return func.HttpResponse(
-                json.dumps(result_data, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=200  # Solo 200 para comandos ejecutados exitosamente
-            )
-        except Exception as parse_error:
-            logging.error(
-                f"[BRIDGE-{request_id}] Error parseando respuesta: {str(parse_error)}")
-            return func.HttpResponse(
-                result_response.get_body(),
-                mimetype="application/json",
-                status_code=200,
-                headers={"X-Bridge-Request-Id": request_id}
-            )
-
-    except Exception as e:
-        logging.error(f"[BRIDGE-{request_id}] 💥 Error crítico: {str(e)}")
-
-        # ✅ CORRECCIÓN: Error crítico debe devolver error, no fallback
-        return func.HttpResponse(
-            json.dumps({
-                "exito": False,
-                "error_code": "CRITICAL_SYSTEM_ERROR",
-                "error": str(e),
-                "request_id": request_id,
-                "tipo_error": type(e).__name__,
-                "status": 500,
-                "timestamp": datetime.now().isoformat(),
-                "mensaje": "Error crítico del sistema"
-            }, ensure_ascii=False),
-            mimetype="application/json",
-            status_code=500
-        )
-
+        # ✅ VERIFICACIÓN FÍSICA: Comprobar que el archivo existe antes de procesar
+        container = req.params.get("container", CONTAINER_NAME)
+        archivo_existe = False
+        error_existencia = None
 
-@app.function_name(name="consultar_memoria_http")
-@app.route(route="consultar-memoria", methods=["GET", "POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def consultar_memoria_http(req: func.HttpRequest) -> func.HttpResponse:
-    from memory_manual import aplicar_memoria_manual
-    """Endpoint para consultar memoria de sesión manualmente"""
-    try:
-        # Extraer parámetros
-        if req.method == "GET":
-            session_id = req.params.get("session_id")
-            agent_id = req.params.get("agent_id")
+        # Verificar existencia en Azure Blob Storage
+        if IS_AZURE:
+            try:
+                client = get_blob_client()
+                if client:
+                    container_client = client.get_container_client(container)
+                    if container_client.exists():
+                        ruta_normalizada = ruta_raw.replace(
+                            '\\', '/').lstrip('/')
+                        blob_client = container_client.get_blob_client(
+                            ruta_normalizada)
+                        archivo_existe = blob_client.exists()
+                        if not archivo_existe:
+                            error_existencia = f"El archivo '{ruta_raw}' no existe en el contenedor '{container}'"
+                    else:
+                        error_existencia = f"El contenedor '{container}' no existe"
+                else:
+                    error_existencia = "Cliente de Blob Storage no disponible"
+            except Exception as e:
+                error_existencia = f"Error verificando existencia en Blob Storage: {str(e)}"
         else:
-            body = req.get_json() or {}
-            session_id = body.get("session_id")
-            agent_id = body.get("agent_id")
-
-        if not session_id:
-            return func.HttpResponse(
-                json.dumps({
-                    "exito": False,
-                    "error": "session_id es requerido",
-                    "ejemplo": {
-                        "session_id": "mi_session_123",
-                        "agent_id": "AzureSupervisor"
-                    }
-                }),
-                mimetype="application/json",
-                status_code=400
-            )
-
-        # Consultar memoria
-        from services.session_memory import consultar_memoria_sesion, generar_contexto_prompt
+            # Verificar existencia local
+            posibles_rutas = [
+                PROJECT_ROOT / ruta_raw,
+                COPILOT_ROOT / ruta_raw if COPILOT_ROOT else None,
+                Path(ruta_raw) if Path(ruta_raw).is_absolute() else None
+            ]
 
-        resultado = consultar_memoria_sesion(session_id, agent_id)
+            for ruta_completa in filter(None, posibles_rutas):
+                if ruta_completa and ruta_completa.exists() and ruta_completa.is_file():
+                    archivo_existe = True
+                    break
 
-        if resultado.get("exito"):
-            memoria = resultado["memoria"]
-            contexto_prompt = generar_contexto_prompt(memoria)
+            if not archivo_existe:
+                error_existencia = f"El archivo '{ruta_raw}' no existe en el sistema local"
 
+        # ✅ RESPUESTA DE ERROR SI NO EXISTE
+        if not archivo_existe:
             return func.HttpResponse(
                 json.dumps({
-                    "exito": True,
-                    "session_id": session_id,
-                    "agent_id": agent_id,
-                    "memoria": memoria,
-                    "contexto_prompt": contexto_prompt,
+                    "exito": False,
+                    "error": error_existencia or f"El archivo '{ruta_raw}' no existe",
+                    "error_code": "FILE_NOT_FOUND",
+                    "archivo_solicitado": {
+                        "ruta_recibida": ruta_raw,
+                        "container": container,
+                        "ambiente": "Azure" if IS_AZURE else "Local"
+                    },
+                    "acciones_recomendadas": [
+                        "Verificar que el archivo existe en la ubicación especificada",
+                        "Comprobar permisos de acceso al archivo",
+                        f"Listar archivos disponibles en el contenedor '{container}'"
+                    ],
+                    "run_id": run_id,
                     "timestamp": datetime.now().isoformat()
                 }, ensure_ascii=False),
                 mimetype="application/json",
-                status_code=200
-            )
-        else:
-            return func.HttpResponse(
-                json.dumps(resultado),
-                mimetype="application/json",
-                status_code=500
+                status_code=404
             )
 
-    except Exception as e:
-        return func.HttpResponse(
-            json.dumps({
-                "exito": False,
-                "error": str(e),
-                "tipo_error": type(e).__name__
-            }),
-            mimetype="application/json",
-            status_code=500
-        )
-
-
-@app.function_name(name="precalentar_memoria_http")
-@app.route(route="precalentar-memoria", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def precalentar_memoria_http(req: func.HttpRequest) -> func.HttpResponse:
-    """Carga explícitamente la memoria de una sesión desde Cosmos y la guarda en Redis."""
-    from cosmos_memory_direct import consultar_memoria_cosmos_directo
-    from memory_helpers import extraer_session_info
+        logging.info(f"[{run_id}] Archivo verificado y existe: {ruta_raw}")
 
-    try:
-        body = req.get_json()
-    except ValueError:
-        body = {}
-
-    session_id = (
-        (body or {}).get("session_id")
-        or req.headers.get("Session-ID")
-        or req.headers.get("X-Session-ID")
-    )
-    thread_id = (
-        (body or {}).get("thread_id")
-        or req.headers.get("Thread-ID")
-        or req.headers.get("X-Thread-ID")
-    )
-    agent_id = (
-        (body or {}).get("agent_id")
-        or req.headers.get("Agent-ID")
-        or req.headers.get("X-Agent-ID")
-    )
+        # Retornar None si todo está bien para continuar con el procesamiento normal
+        return None
 
-    try:
-        session_info = extraer_session_info(req, skip_api_call=True)
-    except AttributeError as e:
-        logging.warning(f"AttributeError: {e}")
-        session_info = {}
     except Exception as e:
-        logging.warning(f"Error: {e}")
-        session_info = {}
-
-    session_id = session_id or session_info.get("session_id")
-    agent_id = agent_id or session_info.get("agent_id")
-
-    # Clave estable para Redis (aunque Foundry cambie Session-ID).
-    redis_session_key = session_id or thread_id
-    if not redis_session_key and agent_id:
-        redis_session_key = f"agent-{agent_id}"
-    if not redis_session_key:
-        redis_session_key = "agent-global"
-
-    agent_id = agent_id or "foundry_user"
-    thread_id = thread_id or redis_session_key
-
-    logging.info(
-        f"[precalentar-memoria] Precargando sesión={redis_session_key} (session_id={session_id or 'N/A'}) agente={agent_id} thread={thread_id}")
-
-    memoria = consultar_memoria_cosmos_directo(
-        req, session_override=session_id, agent_override=agent_id)
-
-    if not memoria:
+        logging.exception(
+            f"[{run_id}] Error en validación de info_archivo: {str(e)}")
         return func.HttpResponse(
             json.dumps({
                 "exito": False,
-                "session_id": redis_session_key,
-                "agent_id": agent_id,
-                "error": "No se encontró memoria en Cosmos con los identificadores proporcionados."
+                "error": f"Error interno en validación: {str(e)}",
+                "error_code": "VALIDATION_ERROR",
+                "tipo_error": type(e).__name__,
+                "run_id": run_id,
+                "timestamp": datetime.now().isoformat()
             }, ensure_ascii=False),
             mimetype="application/json",
-            status_code=404
+            status_code=500
         )
 
-    redis_snapshot: Dict[str, Any] = {
-        "enabled": redis_buffer.is_enabled,
-        "cached": False,
-        "error": None,
-        "disabled": False,
-    }
-
-    if redis_buffer.is_enabled:
-        cache_ok = redis_buffer.cache_memoria_contexto(
-            redis_session_key, memoria, thread_id=thread_id)
-        redis_snapshot["cached"] = bool(cache_ok)
-        if not cache_ok:
-            redis_snapshot["error"] = getattr(
-                redis_buffer, "last_error", None)
-            redis_snapshot["disabled"] = bool(not redis_buffer.is_enabled)
 
-    total_interacciones = memoria.get("total_interacciones", 0)
+# ---------- preparar-script (descarga desde Blob a /tmp) ----------
 
-    respuesta = {
-        "exito": True,
-        "session_id": redis_session_key,
-        "thread_id": thread_id,
-        "agent_id": agent_id,
-        "interacciones_cacheadas": total_interacciones,
-        "redis": redis_snapshot,
-        "fuente": "cosmos",
-        "mensaje": (
-            "Memoria precalentada y enviada a Redis"
-            if redis_snapshot["cached"]
-            else "Memoria recuperada. Redis no disponible o caché fallida."
-        )
-    }
 
-    return func.HttpResponse(
-        json.dumps(respuesta, ensure_ascii=False),
-        mimetype="application/json",
-        status_code=200
-    )
+def _scripts_tmp_dir() -> Path:
+    # /tmp es writable en Linux consumption
+    base = Path(os.environ.get("TMPDIR") or "/tmp") / "copiloto-scripts"
+    return base
 
 
-@app.function_name(name="conocimiento_cognitivo_http")
-@app.route(route="conocimiento-cognitivo", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
-def conocimiento_cognitivo_http(req: func.HttpRequest) -> func.HttpResponse:
-    from memory_manual import aplicar_memoria_manual
-    """Endpoint para obtener el último conocimiento del supervisor cognitivo"""
+def preparar_script_desde_blob(ruta_blob: str) -> dict:
     try:
-        from services.cognitive_supervisor import CognitiveSupervisor
-
-        supervisor = CognitiveSupervisor()
-        conocimiento = supervisor.get_latest_knowledge()
+        if not ruta_blob:
+            return {"exito": False, "error": "Falta ruta_blob"}
+        if not IS_AZURE:
+            ruta_blob = ruta_blob.strip().replace("\\", "/")
+            if not ruta_blob.startswith("scripts/"):
+                ruta_blob = f"scripts/{ruta_blob}"
+            p = PROJECT_ROOT / ruta_blob
+            return {"exito": p.exists(), "local_path": str(p)}
 
-        return func.HttpResponse(
-            json.dumps(conocimiento, ensure_ascii=False, indent=2),
-            mimetype="application/json",
-            status_code=200 if conocimiento.get("exito") else 404
-        )
+        client = get_blob_client()
+        if not client:
+            return {"exito": False, "error": "Blob Storage no configurado"}
+        c = client.get_container_client(CONTAINER_NAME)
+        b = c.get_blob_client(ruta_blob)
+        if not b.exists():
+            return {"exito": False, "error": f"No existe en Blob: {ruta_blob}"}
 
-    except Exception as e:
-        logging.error(f"Error en conocimiento-cognitivo: {e}")
-        return func.HttpResponse(
-            json.dumps({"exito": False, "error": str(e)}),
-            mimetype="application/json",
-            status_code=500
-        )
-
-
-@app.function_name(name="contexto_agente_http")
-@app.route(route="contexto-agente", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
-def contexto_agente_http(req: func.HttpRequest) -> func.HttpResponse:
-    # 🔥 MEMORIA DIRECTA - WRAPPER AUTOMÁTICO
-    logging.info("🔥 CONTEXTO-AGENTE EJECUTÁNDOSE CON MEMORIA DIRECTA")
-
-    try:
-        from services.memory_service import memory_service
-        session_id = req.headers.get("Session-ID") or "test_session"
-        agent_id = req.headers.get("Agent-ID") or "TestAgent"
-
-        logging.info(
-            f"🔍 CONTEXTO-AGENTE Headers: Session={session_id}, Agent={agent_id}")
-
-        interacciones = memory_service.get_session_history(session_id)
-        memoria_previa = {
-            "tiene_historial": len(interacciones) > 0,
-            "interacciones_recientes": interacciones,
-            "total_interacciones": len(interacciones),
-            "session_id": session_id
-        }
-
-        logging.info(
-            f"🧠 CONTEXTO-AGENTE Memoria cargada: {len(interacciones)} interacciones")
-
-        setattr(req, "_memoria_contexto", memoria_previa)
-
-        # 💾 REGISTRAR INTERACCIÓN EN MEMORIA
-        try:
-            # Tolerancia a GET sin JSON
-            try:
-                body = req.get_json()
-            except ValueError:
-                body = {}
-
-            comando = (
-                (body or {}).get("mensaje")
-                or (body or {}).get("comando")
-                or (body or {}).get("consulta")
-                or req.params.get("q")
-                or req.params.get("mensaje")
-                or "resumen"
-            )
-
-            memory_service.registrar_llamada(
-                source="contexto_agente",
-                endpoint="/api/contexto-agente",
-                method=req.method,
-                params={"agent_id": req.params.get(
-                    "agent_id"), "session_id": session_id, "agent_id": agent_id},
-                response_data={"procesando": True},
-                success=True
-            )
-            logging.info(
-                f"💾 CONTEXTO-AGENTE Interacción registrada: {comando}")
-        except Exception as reg_error:
-            logging.warning(f"⚠️ Error registrando en memoria: {reg_error}")
-
-    except Exception as e:
-        logging.error(f"❌ CONTEXTO-AGENTE Error cargando memoria: {e}")
-        memoria_previa = {}
-        session_id = None
-
-    from memory_manual import aplicar_memoria_manual
-    """Endpoint que consulta memoria y devuelve contexto del agente"""
-    try:
-        from services.semantic_memory import obtener_estado_sistema, obtener_contexto_agente
-
-        agent_id = req.params.get("agent_id")
-
-        if agent_id:
-            # Contexto específico del agente
-            resultado = obtener_contexto_agente(agent_id)
-        else:
-            # Estado general del sistema
-            resultado = obtener_estado_sistema()
-
-        # Aplicar memoria manual al resultado
-        resultado = aplicar_memoria_manual(req, resultado)
-
-        return func.HttpResponse(
-            json.dumps(resultado, ensure_ascii=False, indent=2),
-            mimetype="application/json",
-            status_code=200 if resultado.get("exito") else 500
-        )
-
-    except Exception as e:
-        logging.error(f"Error en contexto-agente: {e}")
-        error_result = {"exito": False, "error": str(e)}
-        error_result = aplicar_memoria_manual(req, error_result)
-        return func.HttpResponse(
-            json.dumps(error_result, ensure_ascii=False, indent=2),
-            mimetype="application/json",
-            status_code=500
-        )
-
-
-@app.function_name(name="interpretar_intencion_http")
-@app.route(route="interpretar-intencion", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def interpretar_intencion_http(req: func.HttpRequest) -> func.HttpResponse:
-    from memory_manual import aplicar_memoria_manual
-    from endpoints.ejecutar_cli import ejecutar_comando_sistema
-    """Endpoint que interpreta lenguaje natural y genera comandos"""
-    try:
-        body = req.get_json() if req.get_body() else {}
-
-        # Extraer consulta del usuario
-        consulta = (
-            body.get("consulta") or
-            body.get("query") or
-            body.get("mensaje") or
-            body.get("texto") or
-            ""
-        ).strip()
-
-        if not consulta:
-            return func.HttpResponse(
-                json.dumps({
-                    "exito": False,
-                    "error": "Se requiere una consulta para interpretar",
-                    "ejemplos": [
-                        "quiero actualizar requests",
-                        "cómo instalo matplotlib",
-                        "dime el estado de mis recursos",
-                        "analizar logs de app insights"
-                    ]
-                }),
-                status_code=400,
-                mimetype="application/json"
-            )
-
-        # Parsear intención
-        from semantic_intent_parser import parse_natural_language
-
-        resultado = parse_natural_language(consulta)
-
-        # Si tiene comando directo
-        if "command" in resultado:
-            comando = resultado["command"]
-            tipo = resultado.get("type", "generic")
-
-            # Si requiere confirmación, no ejecutar automáticamente
-            if resultado.get("requires_confirmation", False):
-                return func.HttpResponse(
-                    json.dumps({
-                        "exito": True,
-                        "interpretacion": {
-                            "consulta_original": consulta,
-                            "comando_sugerido": comando,
-                            "tipo_comando": tipo,
-                            "explicacion": resultado.get("explanation", ""),
-                            "confianza": resultado.get("confidence", 0.8)
-                        },
-                        "requiere_confirmacion": True,
-                        "mensaje_confirmacion": resultado.get("confirmation_message", f"¿Confirmas ejecutar: {comando}?"),
-                        "acciones_disponibles": {
-                            "confirmar": f"POST /api/ejecutar-comando con {{\"comando\": \"{comando}\"}}",
-                            "cancelar": "No hacer nada"
-                        }
-                    }),
-                    mimetype="application/json",
-                    status_code=200
-                )
-
-            # Ejecutar comando directamente
-            resultado_ejecucion = ejecutar_comando_sistema(comando, tipo)
-
-            return func.HttpResponse(
-                json.dumps({
-                    "exito": True,
-                    "interpretacion": {
-                        "consulta_original": consulta,
-                        "comando_ejecutado": comando,
-                        "tipo_comando": tipo,
-                        "explicacion": resultado.get("explanation", ""),
-                        "confianza": resultado.get("confidence", 0.8)
-                    },
-                    "ejecucion": {
-                        "exitoso": resultado_ejecucion.get("exito", False),
-                        "resultado": resultado_ejecucion.get("output", ""),
-                        "error": resultado_ejecucion.get("error"),
-                        "tiempo": resultado_ejecucion.get("duration", "unknown")
-                    }
-                }),
-                mimetype="application/json",
-                status_code=200
-            )
-
-        # Si requiere grounding
-        elif resultado.get("requires_grounding", False):
-            try:
-                grounding_result = ejecutar_bing_grounding_fallback(
-                    resultado.get("grounding_query", consulta),
-                    resultado.get("context", "general"),
-                    {"original_query": consulta}
-                )
-
-                return func.HttpResponse(
-                    json.dumps({
-                        "exito": True,
-                        "interpretacion": {
-                            "consulta_original": consulta,
-                            "requiere_informacion_adicional": True,
-                            "explicacion": resultado.get("explanation", "Consulta requiere más contexto")
-                        },
-                        "grounding": grounding_result,
-                        "sugerencias": resultado.get("suggestions", [])
-                    }),
-                    mimetype="application/json",
-                    status_code=200
-                )
-            except Exception as e:
-                # Fallback si grounding falla
-                return func.HttpResponse(
-                    json.dumps({
-                        "exito": True,
-                        "interpretacion": {
-                            "consulta_original": consulta,
-                            "mensaje": "Tu consulta necesita más información específica",
-                            "explicacion": resultado.get("explanation", "")
-                        },
-                        "sugerencias": resultado.get("suggestions", [
-                            "Sé más específico sobre qué quieres hacer",
-                            "Menciona nombres exactos de paquetes o recursos"
-                        ]),
-                        "error_grounding": str(e)
-                    }),
-                    mimetype="application/json",
-                    status_code=200
-                )
-
-        # Respuesta general
-        return func.HttpResponse(
-            json.dumps({
-                "exito": False,
-                "interpretacion": {
-                    "consulta_original": consulta,
-                    "mensaje": "No se pudo interpretar la consulta"
-                },
-                "sugerencias": [
-                    "Reformula tu consulta",
-                    "Usa comandos más específicos",
-                    "Ejemplos: 'instalar numpy', 'actualizar requests', 'estado de recursos'"
-                ]
-            }),
-            mimetype="application/json",
-            status_code=422
-        )
-
-    except Exception as e:
-        logging.error(f"Error en interpretar-intencion: {e}")
-        return func.HttpResponse(
-            json.dumps({
-                "exito": False,
-                "error": str(e),
-                "mensaje": "Error procesando la consulta"
-            }),
-            mimetype="application/json",
-            status_code=500
-        )
-
-
-def generar_sugerencias_locales(query: str) -> list:
-    """Genera sugerencias locales cuando Bing Grounding falla"""
-    query_lower = query.lower()
-    sugerencias = []
-
-    if "cosmos" in query_lower:
-        sugerencias.extend([
-            "az cosmosdb list --output json",
-            "az cosmosdb show --name <nombre> --resource-group <grupo>",
-            "az cosmosdb database list --account-name <cuenta>"
-        ])
-
-    if "storage" in query_lower:
-        sugerencias.extend([
-            "az storage account list --output json",
-            "az storage account show --name <nombre>",
-            "az storage container list --account-name <cuenta>"
-        ])
-
-    if "resource" in query_lower or "grupo" in query_lower:
-        sugerencias.extend([
-            "az group list --output json",
-            "az group show --name <nombre>",
-            "az resource list --resource-group <grupo>"
-        ])
-
-    if not sugerencias:
-        sugerencias = [
-            "az --help",
-            "az account show",
-            "az group list",
-            "az storage account list"
-        ]
-
-    return sugerencias[:5]  # Máximo 5 sugerencias
-
-
-@app.function_name(name="health")
-@app.route(route="health", auth_level=func.AuthLevel.ANONYMOUS)
-def health(req: func.HttpRequest) -> func.HttpResponse:
-    """Health check con información detallada"""
-    health_status = {
-        "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
-        "version": "2.0-orchestrator",
-        "capabilities": {
-            "semantic_processing": True,
-            "azure_cli_integration": True,
-            "blob_storage": bool(STORAGE_CONNECTION_STRING),
-            "orchestration": True,
-            "guided_mode": True
-        },
-        "endpoints": {
-            "GET /api/copiloto": "Interfaz principal",
-            "POST /api/ejecutar": "Ejecución de comandos complejos",
-            "GET /api/status": "Estado detallado",
-            "GET /api/health": "Health check"
-        },
-        "ready": True
-    }
-
-    return func.HttpResponse(
-        json.dumps(health_status, indent=2),
-        mimetype="application/json"
-    )
-
-
-# --------- CREAR ----------
-def crear_archivo(ruta: str, contenido: str) -> dict:
-    """Crea un nuevo archivo en el proyecto con validaciones robustas"""
-    try:
-        # Validación de entrada
-        if not ruta or not isinstance(ruta, str):
-            return {
-                "exito": False,
-                "error": "La ruta no puede estar vacía y debe ser una cadena válida",
-                "tipo_operacion": "crear_archivo"
-            }
-
-        if contenido is None:
-            contenido = ""  # Permitir archivos vacíos
-
-        # Validación de caracteres en la ruta
-        caracteres_invalidos = ['?', '*', '<', '>', '|', ':', '"']
-        if any(c in ruta for c in caracteres_invalidos):
-            return {
-                "exito": False,
-                "error": f"La ruta contiene caracteres inválidos: {', '.join(caracteres_invalidos)}",
-                "tipo_operacion": "crear_archivo"
-            }
-
-        # Normalizar la ruta (eliminar barras duplicadas y espacios)
-        ruta = ruta.strip().replace('\\', '/').replace('//', '/')
-
-        if IS_AZURE:
-            # Creación en Azure Blob Storage
-            client = get_blob_client()
-            if not client:
-                return {
-                    "exito": False,
-                    "error": "No se pudo obtener el cliente de Blob Storage. Verifica la configuración de conexión",
-                    "tipo_operacion": "crear_archivo",
-                    "diagnostico": "Revisa AZURE_STORAGE_CONNECTION_STRING o las credenciales de Managed Identity"
-                }
-
-            try:
-                container_client = client.get_container_client(CONTAINER_NAME)
-                blob_client = container_client.get_blob_client(ruta)
-                blob_client.upload_blob(contenido, overwrite=True)
-                return {
-                    "exito": True,
-                    "mensaje": f"Archivo creado exitosamente en Blob Storage: {ruta}",
-                    "ubicacion": f"blob://{CONTAINER_NAME}/{ruta}",
-                    "tipo_operacion": "crear_archivo",
-                    "tamaño_bytes": len(contenido.encode('utf-8'))
-                }
-            except Exception as blob_error:
-                return {
-                    "exito": False,
-                    "error": f"Error al interactuar con Blob Storage: {str(blob_error)}",
-                    "tipo_operacion": "crear_archivo",
-                    "tipo_error": type(blob_error).__name__,
-                    "sugerencia": "Verifica permisos del Storage Account y la existencia del contenedor"
-                }
-
-        else:
-            # --- Rama local ---
-            archivo_path = PROJECT_ROOT / ruta   # <- definir ANTES del try
-            try:
-                archivo_path.parent.mkdir(parents=True, exist_ok=True)
-                archivo_path.write_text(contenido, encoding='utf-8')
-                return {
-                    "exito": True,
-                    "mensaje": f"Archivo creado exitosamente: {archivo_path.name}",
-                    "ubicacion": str(archivo_path),
-                    "tipo_operacion": "crear_archivo",
-                    "tamaño_bytes": len(contenido.encode('utf-8'))
-                }
-            except PermissionError:
-                return {
-                    "exito": False,
-                    "error": f"Sin permisos para crear el archivo en: {archivo_path.parent}",
-                    "tipo_operacion": "crear_archivo"
-                }
-            except OSError as os_error:
-                return {
-                    "exito": False,
-                    "error": f"Error del sistema operativo: {str(os_error)}",
-                    "tipo_operacion": "crear_archivo",
-                    "tipo_error": type(os_error).__name__
-                }
-
-    except Exception as e:
-        return {
-            "exito": False,
-            "error": f"Error inesperado al crear archivo: {str(e)}",
-            "tipo_operacion": "crear_archivo",
-            "tipo_error": type(e).__name__
-        }
-
-
-# --------- MODIFICAR ----------
-
-
-def modificar_archivo(
-    ruta: str,
-    operacion: str,
-    contenido: Union[str, Dict[str, Any]] = "",
-    linea: int = -1,
-    body: Optional[dict] = None,
-) -> dict:
-    """Modifica un archivo existente con operaciones extensas y validaciones"""
-    try:
-        # Validación de entrada
-        if not ruta or not isinstance(ruta, str):
-            return {
-                "exito": False,
-                "error": "La ruta no puede estar vacía y debe ser una cadena válida",
-                "tipo_operacion": "modificar_archivo"
-            }
-
-        if not operacion or not isinstance(operacion, str):
-            return {
-                "exito": False,
-                "error": "La operación no puede estar vacía y debe ser una cadena válida",
-                "tipo_operacion": "modificar_archivo"
-            }
-
-        # Operaciones válidas
-        operaciones_validas = [
-            "agregar_linea", "reemplazar_linea", "eliminar_linea",
-            "buscar_reemplazar", "agregar_inicio", "agregar_final",
-            "insertar_antes", "insertar_despues"
-        ]
-        if operacion not in operaciones_validas:
-            return {
-                "exito": False,
-                "error": f"Operación '{operacion}' no válida",
-                "operaciones_validas": operaciones_validas,
-                "tipo_operacion": "modificar_archivo"
-            }
-
-        # Leer archivo actual
-        archivo_actual = leer_archivo_dinamico(ruta)
-        if not archivo_actual["exito"]:
-            return {
-                **archivo_actual,
-                "tipo_operacion": "modificar_archivo",
-                "operacion_solicitada": operacion
-            }
-
-        contenido_actual = archivo_actual["contenido"]
-        lineas = contenido_actual.split('\n')
-        contenido_modificado = ""
-
-        # Procesar operaciones
-        if operacion == "agregar_linea":
-            if linea != -1 and 0 <= linea <= len(lineas):
-                lineas.insert(linea, contenido)
-            else:
-                lineas.append(contenido)
-
-        elif operacion == "reemplazar_linea":
-            if linea == -1 or not (0 <= linea < len(lineas)):
-                return {
-                    "exito": False,
-                    "error": f"Línea {linea} no válida. El archivo tiene {len(lineas)} líneas (0-{len(lineas)-1})",
-                    "tipo_operacion": "modificar_archivo",
-                    "operacion": operacion
-                }
-            lineas[linea] = contenido
-
-        elif operacion == "eliminar_linea":
-            if linea == -1 or not (0 <= linea < len(lineas)):
-                return {
-                    "exito": False,
-                    "error": f"Línea {linea} no válida. El archivo tiene {len(lineas)} líneas (0-{len(lineas)-1})",
-                    "tipo_operacion": "modificar_archivo",
-                    "operacion": operacion
-                }
-            del lineas[linea]
-
-        elif operacion == "buscar_reemplazar":
-            params = {}
-            # a) contenido como dict
-            if isinstance(contenido, dict):
-                params = contenido
-            # b) contenido como string "OLD->NEW" o "OLD|NEW" o JSON
-            elif isinstance(contenido, str):
-                for sep in ("->", "|"):
-                    if sep in contenido:
-                        old, new = contenido.split(sep, 1)
-                        params = {"buscar": old.strip(
-                        ), "reemplazar": new.strip()}
-                        break
-                else:
-                    try:
-                        maybe = json.loads(contenido)
-                        if isinstance(maybe, dict):
-                            params = maybe
-                    except Exception:
-                        pass
-            # c) Fallback: claves al tope del body (si fue pasado)
-            if not params and isinstance(body, dict) and "buscar" in body and "reemplazar" in body:
-                params = {"buscar": str(
-                    body["buscar"]), "reemplazar": str(body["reemplazar"])}
-
-            # Validaciones rápidas
-            if not params or not str(params.get("buscar", "")).strip():
-                return {
-                    "exito": False,
-                    "error": "El contenido debe incluir 'buscar' y 'reemplazar' (no vacío)",
-                    "tipo_operacion": "modificar_archivo",
-                    "operacion": operacion,
-                    "ejemplo": {"buscar": "OK", "reemplazar": "OK ✅"},
-                }
-
-            old = str(params["buscar"])
-            new = str(params.get("reemplazar", ""))
-
-            ocurrencias = contenido_actual.count(old)
-            if ocurrencias == 0:
-                return {
-                    "exito": False,
-                    "error": f"No se encontró el texto '{old}' para reemplazar",
-                    "tipo_operacion": "modificar_archivo",
-                    "operacion": operacion
-                }
-
-            contenido_modificado = contenido_actual.replace(old, new)
-            res_write = crear_archivo(ruta, contenido_modificado)
-            if res_write.get("exito"):
-                res_write.update({
-                    "operacion_realizada": operacion,
-                    "ocurrencias": ocurrencias,
-                    "mensaje": f"Archivo modificado: {ocurrencias} reemplazos"
-                })
-            return res_write
-
-        elif operacion == "agregar_inicio":
-            lineas.insert(0, contenido)
-
-        elif operacion == "agregar_final":
-            lineas.append(contenido)
-
-        elif operacion == "insertar_antes":
-            if linea == -1 or not (0 <= linea < len(lineas)):
-                return {
-                    "exito": False,
-                    "error": f"Línea {linea} no válida para insertar antes",
-                    "tipo_operacion": "modificar_archivo",
-                    "operacion": operacion
-                }
-            lineas.insert(linea, contenido)
-
-        elif operacion == "insertar_despues":
-            if linea == -1 or not (0 <= linea < len(lineas)):
-                return {
-                    "exito": False,
-                    "error": f"Línea {linea} no válida para insertar después",
-                    "tipo_operacion": "modificar_archivo",
-                    "operacion": operacion
-                }
-            lineas.insert(linea + 1, contenido)
-
-        # Si no se procesó buscar_reemplazar, unir líneas
-        if operacion != "buscar_reemplazar":
-            contenido_modificado = '\n'.join(lineas)
-
-        # Guardar
-        resultado_creacion = crear_archivo(ruta, contenido_modificado)
-        if resultado_creacion["exito"]:
-            resultado_creacion.update({
-                "operacion_realizada": operacion,
-                "linea_afectada": linea if linea != -1 else None,
-                "lineas_totales": len(lineas),
-                "mensaje": f"Archivo modificado exitosamente con operación '{operacion}'"
-            })
-        return resultado_creacion
-
-    except Exception as e:
-        return {
-            "exito": False,
-            "error": f"Error inesperado al modificar archivo: {str(e)}",
-            "tipo_operacion": "modificar_archivo",
-            "operacion": operacion,
-            "tipo_error": type(e).__name__
-        }
-
-
-# --------- HTTP WRAPPERS (columna 0) ----------
-
-
-# arriba del módulo
-SOFT_ERRORS = True  # 200 para validación/no_encontrado; 500 solo para excepciones
-
-
-def _status_from_result(res: dict) -> int:
-    if res.get("exito") is True:
-        return 200
-    if SOFT_ERRORS:
-        return 200
-    msg = str(res.get("error", "")).lower()
-    return 404 if ("no existe" in msg or "no encontrado" in msg) else 400
-
-
-def is_running_in_azure() -> bool:
-    # Detectar Azure SOLO si no estás en el emulador local
-    return bool(
-        os.environ.get("WEBSITE_INSTANCE_ID")
-        and not os.environ.get("AZURE_FUNCTIONS_ENVIRONMENT") == "Development"
-    )
-
-
-@app.function_name(name="modificar_archivo_http")
-@app.route(route="modificar-archivo", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def modificar_archivo_http(req: func.HttpRequest) -> func.HttpResponse:
-    from memory_manual import aplicar_memoria_manual
-    from cosmos_memory_direct import consultar_memoria_cosmos_directo, aplicar_memoria_cosmos_directo
-    from services.memory_service import memory_service
-    from helpers_file_operations import _generar_respuesta_no_encontrado
-    """Endpoint ultra-resiliente para modificar archivos - nunca falla por formato"""
-
-    # 🧠 CONSULTAR MEMORIA COSMOS DB DIRECTAMENTE
-    memoria_previa = consultar_memoria_cosmos_directo(req)
-    if memoria_previa and memoria_previa.get("tiene_historial"):
-        logging.info(
-            f"🧠 Modificar-archivo: {memoria_previa['total_interacciones']} interacciones encontradas")
-        logging.info(
-            f"📝 Historial: {memoria_previa.get('resumen_conversacion', '')[:100]}...")
-    advertencias = []
-
-    # PARSER ULTRA-RESILIENTE - nunca explota
-    body = {}
-    try:
-        # Intento 1: JSON normal
-        body = req.get_json() or {}
-    except Exception:
-        try:
-            # Intento 2: Decodificar body manualmente
-            raw_body = req.get_body()
-            if raw_body:
-                body_str = raw_body.decode(errors="ignore")
-                body = json.loads(body_str)
-        except Exception:
-            try:
-                # Intento 3: Regex para extraer campos clave
-                raw_body = req.get_body()
-                if raw_body:
-                    body_str = raw_body.decode(errors="ignore")
-                    # Buscar patrones simples
-                    ruta_match = re.search(
-                        r'"ruta"\s*:\s*"([^"]*)', body_str, re.IGNORECASE)
-                    if not ruta_match:
-                        ruta_match = re.search(
-                            r'"path"\s*:\s*"([^"]*)', body_str, re.IGNORECASE)
-
-                    contenido_match = re.search(
-                        r'"contenido"\s*:\s*"([^"]*)', body_str, re.IGNORECASE)
-                    if not contenido_match:
-                        contenido_match = re.search(
-                            r'"content"\s*:\s*"([^"]*)', body_str, re.IGNORECASE)
-
-                    operacion_match = re.search(
-                        r'"operacion"\s*:\s*"([^"]*)', body_str, re.IGNORECASE)
-
-                    if ruta_match:
-                        body["ruta"] = ruta_match.group(1)
-                    if contenido_match:
-                        body["contenido"] = contenido_match.group(1)
-                    if operacion_match:
-                        body["operacion"] = operacion_match.group(1)
-
-                    if body:
-                        advertencias.append("JSON roto - extraído con regex")
-            except Exception:
-                # Intento 4: Fallback total
-                body = {}
-                advertencias.append(
-                    "Request body no parseable - usando defaults")
-
-    # NORMALIZACIÓN ULTRA-FLEXIBLE
-    ruta = (body.get("ruta") or body.get("path") or body.get(
-        "file") or body.get("filename") or "").strip()
-    contenido = body.get("contenido") or body.get(
-        "content") or body.get("data") or body.get("text") or ""
-    operacion = (body.get("operacion") or body.get("operation")
-                 or body.get("action") or "agregar_final").strip()
-    linea = body.get("linea") or body.get(
-        "line") or body.get("lineNumber") or 0
-
-    # DEFAULTS INTELIGENTES
-    if not ruta:
-        import uuid
-        ruta = f"tmp_mod_{uuid.uuid4().hex[:8]}.txt"
-        advertencias.append(
-            f"Ruta no especificada - generada automáticamente: {ruta}")
-
-    if not contenido and operacion == "agregar_final":
-        contenido = "# Archivo creado automáticamente\n"
-        advertencias.append("Contenido vacío - agregado contenido por defecto")
-
-    # EJECUCIÓN ULTRA-TOLERANTE
-    res = {"exito": False}
-
-    try:
-        # Intentar operación normal primero
-        res = modificar_archivo(ruta, operacion, contenido, linea, body=body)
-    except Exception as e:
-        advertencias.append(f"Error en modificar_archivo: {str(e)}")
-        res = {"exito": False, "error": str(e)}
-
-    # AUTOCREACIÓN SI NO EXISTE
-    if not res.get("exito") and ("no existe" in str(res.get("error", "")).lower() or "no encontrado" in str(res.get("error", "")).lower()):
-        try:
-            # Detectar local vs blob
-            if ruta.startswith("C:/") or ruta.startswith("/tmp/") or ruta.startswith("/home/") or ruta.startswith("tmp_mod_"):
-                # Crear archivo local
-                os.makedirs(os.path.dirname(
-                    ruta) if "/" in ruta or "\\" in ruta else ".", exist_ok=True)
-                with open(ruta, 'w', encoding='utf-8') as f:
-                    f.write(contenido)
-                res = {"exito": True, "mensaje": f"Archivo local creado: {ruta}",
-                       "operacion_aplicada": "crear_archivo"}
-                advertencias.append(
-                    "Archivo no existía - creado automáticamente")
-            else:
-                # Crear archivo en blob
-                crear_res = crear_archivo(ruta, contenido)
-                if crear_res.get("exito"):
-                    res = {"exito": True, "mensaje": f"Archivo blob creado: {ruta}",
-                           "operacion_aplicada": "crear_archivo"}
-                    advertencias.append(
-                        "Archivo no existía - creado en blob storage")
-                else:
-                    # Fallback: crear local aunque la ruta parezca blob
-                    try:
-                        safe_ruta = ruta.replace("/", "_").replace(":", "_")
-                        with open(f"tmp_{safe_ruta}", 'w', encoding='utf-8') as f:
-                            f.write(contenido)
-                        res = {"exito": True, "mensaje": f"Archivo creado como fallback: tmp_{safe_ruta}",
-                               "operacion_aplicada": "crear_archivo_fallback"}
-                        advertencias.append(
-                            "Blob falló - creado archivo local como fallback")
-                    except Exception:
-                        res = {"exito": True, "mensaje": "Operación completada con advertencias",
-                               "operacion_aplicada": "fallback_total"}
-                        advertencias.append(
-                            "Todas las opciones fallaron - respuesta sintética")
-        except Exception as e:
-            # FALLBACK FINAL - nunca falla
-            res = {"exito": True, "mensaje": "Operación procesada con limitaciones",
-                   "operacion_aplicada": "fallback_total"}
-            advertencias.append(
-                f"Error en autocreación: {str(e)} - respuesta sintética")
-
-    # Enriquecer respuesta para archivos no encontrados
-    if not res.get("exito") and "no encontrado" in str(res.get("error", "")).lower():
-        res.update(_generar_respuesta_no_encontrado(
-            ruta, contenido, operacion, body))
-
-    # ACTIVAR BING FALLBACK GUARD SI SIGUE SIN ÉXITO
-    if not res.get("exito"):
-        try:
-            from bing_fallback_guard import ejecutar_grounding_fallback
-
-            fallback = ejecutar_grounding_fallback(
-                prompt=f"Cómo realizar la operación '{operacion}' sobre el archivo '{ruta}'",
-                contexto=f"Intento de modificación fallido: {res.get('error')}",
-                error_info={"tipo_error": "modificacion_fallida"}
-            )
-
-            if fallback.get("exito"):
-                res["fallback_sugerido"] = True
-                res["sugerencias_bing"] = fallback.get("sugerencias", [])
-                res["accion_sugerida"] = fallback.get("accion_sugerida")
-                advertencias.append("Sugerencias de Bing aplicadas")
-        except Exception as e:
-            advertencias.append(f"Error en fallback Bing: {str(e)}")
-
-    # RESPUESTA SIEMPRE EXITOSA CON METADATA
-    if not res.get("exito"):
-        res = {"exito": True, "mensaje": "Operación procesada con limitaciones",
-               "operacion_aplicada": "fallback"}
-        advertencias.append("Forzado éxito para evitar error 400")
-
-    # Enriquecer respuesta
-    res["operacion_aplicada"] = res.get("operacion_aplicada", operacion)
-    res["ruta_procesada"] = ruta
-    res["advertencias"] = advertencias
-    res["timestamp"] = datetime.now().isoformat()
-
-    # Aplicar memoria antes de responder
-    res = aplicar_memoria_cosmos_directo(req, res)
-    res = aplicar_memoria_manual(req, res)
-
-    # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
-    # Registrar llamada en memoria después de construir la respuesta final
-    logging.info(
-        f"💾 Registering call for modificar_archivo: success={res.get('exito', False)}, endpoint=/api/modificar-archivo")
-    memory_service.registrar_llamada(
-        source="modificar_archivo",
-        endpoint="/api/modificar-archivo",
-        method=req.method,
-        params={"session_id": req.headers.get(
-            "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
-        response_data=res,
-        success=res.get("exito", False)
-    )
-
-    # NUNCA devolver status de error
-    return func.HttpResponse(
-        json.dumps(res, ensure_ascii=False),
-        mimetype="application/json",
-        status_code=200  # Siempre 200
-    )
-
-
-# Lista blanca de scripts permitidos para ejecución (desactivada temporalmente)
-ALLOWED_SCRIPTS = None
-
-
-def ejecutar_script(nombre_script: str, parametros: list = []) -> dict:
-    """Ejecuta un script PowerShell, Bash o Python.
-       Si no existe localmente y estamos en Azure, intenta descargarlo desde Blob a /tmp/scripts/..."""
-    try:
-        # 1) Resolver ruta local existente
-        local_path = _resolve_local_script_path(nombre_script)
-
-        # 2) Si no existe y estamos en Azure: descargar desde Blob
-        descargado_de_blob = False
-        if not local_path and IS_AZURE:
-            local_path = _download_script_from_blob(nombre_script)
-            if not local_path:
-                alt_blob = f"scripts/{Path(nombre_script).name}"
-                local_path = _download_script_from_blob(alt_blob)
-            if local_path:
-                descargado_de_blob = True
-
-        if not local_path:
-            return {
-                "exito": False,
-                "error": f"No se encontró el script '{nombre_script}' localmente y no fue posible obtenerlo de Blob",
-                "script": nombre_script
-            }
-
-        # 3) Comando según extensión
-        path_str = str(local_path)
-        if path_str.endswith('.ps1'):
-            ps_cmd = shutil.which("pwsh") or shutil.which(
-                "powershell") or "powershell"
-            comando = [ps_cmd, "-ExecutionPolicy", "Bypass", "-File", path_str]
-        elif path_str.endswith('.sh'):
-            comando = ['bash', path_str]
-        elif path_str.endswith('.py'):
-            py = shutil.which("python3") or shutil.which("python") or "python"
-            comando = [py, path_str]
-        else:
-            comando = [path_str]
-        if parametros:
-            comando.extend(parametros)
-        resultado = subprocess.run(
-            comando,
-            capture_output=True,
-            text=True,
-            timeout=60,
-            cwd=str(local_path.parent)
-        )
-        return {
-            "exito": resultado.returncode == 0,
-            "stdout": resultado.stdout,
-            "stderr": resultado.stderr,
-            "codigo_salida": resultado.returncode,
-            "comando_ejecutado": ' '.join(comando),
-            "script_path_local": str(local_path),
-            "descargado_de_blob": descargado_de_blob
-        }
-    except subprocess.TimeoutExpired:
-        return {
-            "exito": False,
-            "error": "Script excedió tiempo límite (60s)",
-            "script": nombre_script
-        }
-    except Exception as e:
-        return {
-            "exito": False,
-            "error": str(e),
-            "script": nombre_script,
-            "tipo_error": type(e).__name__
-        }
-
-
-# --- helpers, cerca de api_ok/api_err ---
-
-
-def get_run_id(req) -> str:
-    return (req.headers.get("x-run-id")
-            or req.headers.get("x-request-id")
-            or uuid.uuid4().hex[:12])
-
-
-def with_run_header(run_id: str):
-    return {"X-Run-Id": run_id}
-
-
-# === Respuestas estándar ===
-
-
-# ==== Helpers de respuesta y utilidades ====
-
-
-T = TypeVar("T")
-
-
-def _safe(obj: Any, attr: str, default: T) -> T:
-    """Devuelve obj.attr o default si obj es None o el atributo no existe/vale None."""
-    try:
-        if obj is None:
-            return default
-        val = getattr(obj, attr, default)
-        return default if val is None else val
-    except Exception:
-        return default
-
-
-def api_ok(endpoint: str, method: str, status: int, message: str, details: Optional[dict] = None, run_id: Optional[str] = None):
-    return {
-        "ok": True,
-        "endpoint": endpoint,
-        "method": method,
-        "status": status,
-        "runId": run_id,
-        "message": message,
-        "details": details or {}
-    }
-
-
-def api_err(endpoint: str, method: str, status: int, code: str, reason: str, missing_params=None, run_id: Optional[str] = None, details: Optional[dict] = None):
-    return {
-        "ok": False,
-        "endpoint": endpoint,
-        "method": method,
-        "status": status,
-        "runId": run_id,
-        "error": {
-            "code": code,
-            "reason": reason,
-            "missing_params": missing_params or []
-        },
-        "details": details or {}
-    }
-
-
-def _normalize_blob_path(container: str, raw_path: str) -> str:
-    p = (raw_path or "").strip()
-    p = unquote(p).lstrip("/")            # quita / iniciales
-    if not p:
-        return ""
-    if p.startswith(container + "/"):     # quita "container/"
-        p = p[len(container) + 1:]
-    while p.startswith("./") or p.startswith("/"):
-        p = p[1:]
-    return p
-
-
-def _mk_run_dirs(run_id: str):
-    base = Path(f"/tmp/agent/{run_id}")
-    scripts = base / "scripts"
-    work = base / "work"
-    logs = base / "logs"
-    for p in (scripts, work, logs):
-        p.mkdir(parents=True, exist_ok=True)
-    # carpeta común que tus scripts usan
-    (work / "verificacion").mkdir(parents=True, exist_ok=True)
-    return base, scripts, work, logs
-
-
-def _split_blob_spec(spec: str):
-    s = (spec or "").strip().lstrip("/")
-    if not s:
-        return (None, None)
-    # blob://container/path
-    if s.startswith("blob://"):
-        s2 = s[7:]
-        if "/" in s2:
-            cont, path = s2.split("/", 1)
-            return (cont or None, path)
-        return (None, s2)
-    # container/path
-    if "/" in s:
-        cont, path = s.split("/", 1)
-        # si el cont coincide con tu contenedor por defecto, lo usamos; si no, asumimos que es path
-        if cont == CONTAINER_NAME:
-            return (cont, path)
-    # solo path → contenedor por defecto
-    return (CONTAINER_NAME, s)
-
-
-def _kudu_base():
-    site = os.environ.get("WEBSITE_SITE_NAME") or os.environ.get(
-        "WEBSITE_HOSTNAME", "copiloto-semantico-func")
-    base = f"https://{site}.scm.azurewebsites.net"
-    user = os.environ.get("KUDU_USER") or os.environ.get(
-        "SCM_USER") or os.environ.get("PUBLISH_USER")
-    pwd = os.environ.get("KUDU_PASS") or os.environ.get(
-        "SCM_PASS") or os.environ.get("PUBLISH_PASS")
-    if not user or not pwd:
-        raise RuntimeError("Missing KUDU_USER/KUDU_PASS")
-    return base, (user, pwd)
-
-
-def _kudu_get(path, stream=False, timeout=60):
-    base, auth = _kudu_base()
-    r = requests.get(f"{base}{path}", auth=auth,
-                     timeout=timeout, stream=stream)
-    r.raise_for_status()
-    return r
-
-
-# cerca de otros helpers (debajo de _split_blob_spec, por ejemplo)
-_TMP_HINT_PREFIXES = ("/tmp/copiloto-scripts/", "/tmp/scripts/",
-                      "\\tmp\\copiloto-scripts\\", "C:\\temp\\copiloto-scripts\\")
-
-
-def _normalize_script_spec(spec: str) -> Tuple[Optional[str], Optional[str], str]:
-    s = (spec or "").strip()
-    if not s:
-        return None, None, "empty"
-
-    # hint: agente te manda un path local -> usamos el nombre y lo buscamos en blob/scripts/
-    for p in _TMP_HINT_PREFIXES:
-        if s.startswith(p):
-            name = Path(s).name
-            return CONTAINER_NAME, f"scripts/{name}", "mapped_from_tmp"
-
-    # ya viene como blob relativo (scripts/foo.py)
-    if s.startswith("scripts/") or s.startswith("/scripts/"):
-        return CONTAINER_NAME, s.lstrip("/"), "blob_relative"
-
-    # contenedor:path explícito
-    c, path = _split_blob_spec(s)
-    if c and path:
-        return c, path, "blob_spec"
-
-    return None, None, "unrecognized"
-
-
-def _blob_exists(container: str, blob_path: str) -> bool:
-    try:
-        cli = get_blob_client()
-        if not cli:
-            return False
-        bc = cli.get_container_client(container).get_blob_client(blob_path)
-        return bc.exists()
-    except Exception:
-        return False
-
-
-def _stage_arg_to_local(arg: str, workdir: Path) -> Tuple[str, Optional[Dict[str, Any]]]:
-    """
-    Si el argumento apunta a un blob (p.ej. 'container/ruta/archivo.txt' o 'blob://container/ruta'),
-    lo descarga a workdir y devuelve la ruta local + metadatos. Si no, devuelve el arg tal cual.
-    """
-    cont, path = _split_blob_spec(arg)
-    if not (cont and path):
-        return arg, None
-
-    # Verificar existencia del blob (con try para no romper el flujo si falla)
-    try:
-        if not _blob_exists(cont, path):
-            return arg, None
-    except Exception as e:
-        logging.warning(f"_blob_exists falló para {cont}/{path}: {e}")
-        return arg, {"container": cont, "blob": path, "downloaded": False, "reason": "existence_check_failed", "error": type(e).__name__}
-
-    cli = get_blob_client()
-    if cli is None:
-        # <- Esta guard elimina el warning "get_container_client of None" y evita crashes
-        logging.warning(
-            "Blob Storage no configurado (get_blob_client() = None); no se descarga el arg como blob.")
-        return arg, {"container": cont, "blob": path, "downloaded": False, "reason": "no_blob_client"}
-
-    try:
-        bc = cli.get_container_client(cont).get_blob_client(path)
-        local = workdir / path
-        local.parent.mkdir(parents=True, exist_ok=True)
-        with open(local, "wb") as f:
-            f.write(bc.download_blob().readall())
-        return str(local), {"container": cont, "blob": path, "downloaded": True, "local_path": str(local)}
-    except Exception as e:
-        logging.exception(
-            f"Fallo descargando {cont}/{path} hacia {workdir}: {e}")
-        return arg, {"container": cont, "blob": path, "downloaded": False, "reason": "download_failed", "error": str(e)}
-
-
-def _sync_work_to_blob(workdir: Path, container: str = CONTAINER_NAME, prefix: str = ""):
-    uploaded = []
-    cli = get_blob_client()
-    if not cli:
-        return uploaded  # sin storage configurado, salimos limpio
-
-    try:
-        cc = cli.get_container_client(container)
-        for root, _, files in os.walk(workdir):
-            for name in files:
-                lp = Path(root) / name
-                rel = str(lp.relative_to(workdir))
-                blob = f"{prefix}/{rel}".lstrip("/")
-                with open(lp, "rb") as fh:
-                    cc.get_blob_client(blob).upload_blob(fh, overwrite=True)
-                uploaded.append(blob)
-    except Exception as e:
-        logging.warning(f"_sync_work_to_blob fallo: {e}")
-    return uploaded
-
-
-_TRUE_SET = {"1", "true", "yes", "y", "si", "sí", "on"}
-_FALSE_SET = {"0", "false", "no", "n", "off"}
-
-
-@app.function_name(name="ejecutar_script_local_http")
-@app.route(route="ejecutar-script-local", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def ejecutar_script_local_http(req: func.HttpRequest) -> func.HttpResponse:
-    from memory_manual import aplicar_memoria_manual
-    """Ejecuta scripts desde cualquier ruta local del contenedor con búsqueda automática y robusta"""
-
-    try:
-        body = req.get_json() if req.get_body() else {}
-    except Exception:
-        return func.HttpResponse(json.dumps({
-            "success": False,
-            "error": "JSON inválido"
-        }), status_code=400, mimetype="application/json")
-
-    # Unificación semántica de parámetros
-    script = body.get("script") or body.get("script_path")
-    args = body.get("args", [])
-    timeout_s = int(body.get("timeout_s") or body.get("timeout") or 300)
-
-    if not script or not isinstance(script, str) or not script.strip():
-        return func.HttpResponse(json.dumps({
-            "success": False,
-            "error": "Parámetro 'script' o 'script_path' es requerido y debe ser un string no vacío",
-            "example": {"script": "setup.py", "args": []}
-        }), mimetype="application/json", status_code=400)
-
-    script_path = script.strip()
-    found_script_path = _find_script_dynamically(script_path)
-
-    if found_script_path is None:
-        search_results = _generate_smart_suggestions(script_path)
-        return func.HttpResponse(json.dumps({
-            "success": False,
-            "error": "Script no encontrado",
-            "searched": script_path,
-            "attempted_paths": search_results["rutas_intentadas"],
-            "suggestions": search_results["sugerencias"],
-            "available_scripts": search_results["scripts_disponibles"][:10]
-        }), mimetype="application/json", status_code=404)
-
-    if not found_script_path.is_file():
-        return func.HttpResponse(json.dumps({
-            "success": False,
-            "error": f"Path exists but is not a file: {found_script_path}",
-            "path_type": "directory" if found_script_path.is_dir() else "other"
-        }), mimetype="application/json", status_code=400)
-
-    ext = found_script_path.suffix.lower()
-    interpreter = None
-    if ext == ".py":
-        interpreter = "python"
-        cmd = [sys.executable, str(found_script_path)]
-    elif ext == ".sh":
-        interpreter = "bash"
-        cmd = ["bash", str(found_script_path)]
-    elif ext == ".ps1":
-        interpreter = "powershell"
-        ps_cmd = shutil.which("pwsh") or shutil.which(
-            "powershell") or "powershell"
-        cmd = [ps_cmd, "-ExecutionPolicy", "Bypass",
-               "-File", str(found_script_path)]
-    else:
-        interpreter = "unknown"
-        cmd = [str(found_script_path)]
-
-    if args and isinstance(args, list):
-        cmd.extend(args)
-
-    if ext in [".sh", ".py"] and not platform.system() == "Windows":
-        try:
-            os.chmod(found_script_path, 0o755)
-        except Exception:
-            pass
-
-    try:
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=timeout_s,
-            cwd=str(found_script_path.parent)
-        )
-        return func.HttpResponse(json.dumps({
-            "success": result.returncode == 0,
-            "stdout": result.stdout,
-            "stderr": result.stderr,
-            "exit_code": result.returncode,
-            "script": str(found_script_path),
-            "interpreter": interpreter,
-            "args": args,
-            "working_dir": str(found_script_path.parent)
-        }, ensure_ascii=False), mimetype="application/json")
-    except subprocess.TimeoutExpired:
-        return func.HttpResponse(json.dumps({
-            "success": False,
-            "error": f"Script execution timed out after {timeout_s} seconds",
-            "script": str(found_script_path),
-            "interpreter": interpreter
-        }, ensure_ascii=False), mimetype="application/json", status_code=408)
-    except Exception as e:
-        logging.exception("ejecutar_script_local_http failed")
-        return func.HttpResponse(json.dumps({
-            "success": False,
-            "error": str(e),
-            "script": str(found_script_path),
-            "interpreter": interpreter
-        }, ensure_ascii=False), mimetype="application/json", status_code=500)
-
-
-def normalizar_blob_path(script_path: str) -> str:
-    """
-    Normaliza la ruta eliminando el prefijo blob:// y barras iniciales.
-    Ejemplo: blob://container/path → path
-    """
-    if isinstance(script_path, str):
-        if script_path.startswith("blob://"):
-            # blob://container/path → container/path, pero queremos solo path
-            partes = script_path.replace("blob://", "", 1).split("/", 1)
-            if len(partes) == 2:
-                return partes[1]
-            return partes[-1]
-        if script_path.startswith("/"):
-            return script_path.lstrip("/")
-    return script_path
-
-
-@app.function_name(name="ejecutar_script_http")
-@app.route(route="ejecutar-script", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def ejecutar_script_http(req: func.HttpRequest) -> func.HttpResponse:
-    from memory_manual import aplicar_memoria_manual
-    """
-    Ejecuta scripts desde Blob Storage o local, soportando múltiples tipos (.py, .sh, .ps1)
-    Dinámico y abierto: no restringe a scripts/ ni rutas fijas.
-    """
-    run_id = uuid.uuid4().hex[:12]
-    try:
-        req_body = req.get_json() if req.get_body() else {}
-    except Exception:
-        req_body = {}
-
-    # VALIDACIÓN ROBUSTA Y SEMÁNTICA - Acepta múltiples formatos
-    script_blob_path = (
-        req_body.get("script") or
-        req_body.get("script_path") or
-        req_body.get("parametros", {}).get("ruta") or
-        req_body.get("parametros", {}).get("script") or
-        req_body.get("ruta") or
-        req_body.get("archivo")
-    )
-
-    # Si hay intención semántica, interpretarla
-    if not script_blob_path and req_body.get("intencion"):
-        intencion = req_body.get("intencion", "")
-        parametros = req_body.get("parametros", {})
-
-        if "leer" in intencion and parametros.get("ruta"):
-            ruta = parametros.get("ruta")
-            if ruta.endswith(('.py', '.sh', '.ps1', '.bat')):
-                script_blob_path = ruta
-            else:
-                return func.HttpResponse(json.dumps({
-                    "exito": False,
-                    "success": False,
-                    "error": "La ruta especificada no es un script ejecutable",
-                    "sugerencia": "Use /api/leer-archivo para archivos de texto",
-                    "formatos_validos": [".py", ".sh", ".ps1", ".bat"]
-                }), status_code=200, mimetype="application/json")
-
-    timeout_s = int(req_body.get("timeout_s") or req_body.get("timeout") or 60)
-    args = req_body.get("args", [])
-    interpreter = req_body.get("interpreter")
-
-    if not script_blob_path or not isinstance(script_blob_path, str) or not script_blob_path.strip():
-        try:
-            blob_service_client = get_blob_client()
-            scripts_disponibles = []
-            if blob_service_client:
-                container_client = blob_service_client.get_container_client(
-                    CONTAINER_NAME)
-                scripts_disponibles = [
-                    blob.name for blob in container_client.list_blobs()
-                    if blob.name.endswith(('.py', '.sh', '.ps1', '.bat'))
-                ][:10]
-        except:
-            scripts_disponibles = []
-
-        return func.HttpResponse(json.dumps({
-            "exito": False,
-            "success": False,
-            "error": "Falta parámetro 'script' con la ruta del script a ejecutar",
-            "mensaje": "Este endpoint ejecuta scripts almacenados en el contenedor Azure Blob Storage",
-            "formato_correcto": {"script": "scripts/mi_script.py", "args": []},
-            "extensiones_soportadas": [".py", ".sh", ".ps1", ".bat"],
-            "scripts_disponibles": scripts_disponibles,
-            "ejemplo": {"script": "scripts/test_storage_access.py", "args": [], "timeout_s": 60}
-        }), status_code=200, mimetype="application/json")
-
-    # 4. Normalizar ruta del script en blob
-    script_blob_path = normalizar_blob_path(script_blob_path)
-
-    # Permitir cualquier ruta, no restringir a scripts/
-    blob_service_client = get_blob_client()
-    if not blob_service_client:
-        return func.HttpResponse(json.dumps({
-            "exito": False,
-            "success": False,
-            "error": "Blob Storage no configurado",
-            "mensaje": "No se pudo conectar al contenedor de Azure Blob Storage"
-        }), status_code=200, mimetype="application/json")
-
-    blob_client = blob_service_client.get_blob_client(
-        container=CONTAINER_NAME,
-        blob=script_blob_path
-    )
-
-    if not blob_client.exists():
-        container_client = blob_service_client.get_container_client(
-            CONTAINER_NAME)
-        scripts_disponibles = [
-            blob.name for blob in container_client.list_blobs()]
-        return func.HttpResponse(json.dumps({
-            "exito": False,
-            "success": False,
-            "error": f"Script no encontrado en el contenedor: {script_blob_path}",
-            "mensaje": "El script especificado no existe en Azure Blob Storage",
-            "scripts_disponibles": scripts_disponibles[:10],
-            "sugerencia": "Verifique que el script esté subido al contenedor o use /api/listar-blobs para ver scripts disponibles"
-        }), status_code=200, mimetype="application/json")
-
-    try:
-        extension = Path(script_blob_path).suffix.lower()
-        with tempfile.NamedTemporaryFile(mode='w', suffix=extension, delete=False) as temp_file:
-            temp_path = temp_file.name
-            script_content = blob_client.download_blob().readall().decode('utf-8')
-            temp_file.write(script_content)
-    except Exception as e:
-        return func.HttpResponse(json.dumps({
-            "success": False,
-            "error": f"Error descargando script: {str(e)}"
-        }), status_code=500, mimetype="application/json")
-
-    interpreter_final = interpreter
-    if not interpreter_final:
-        if extension == ".py":
-            interpreter_final = "python"
-        elif extension == ".sh":
-            interpreter_final = "bash"
-        elif extension == ".ps1":
-            interpreter_final = "powershell"
-        else:
-            interpreter_final = "unknown"
-
-    if extension == ".sh":
-        try:
-            os.chmod(temp_path, 0o755)
-        except Exception:
-            pass
-
-    if interpreter_final == "python":
-        cmd = [sys.executable, temp_path] + args
-    elif interpreter_final == "bash":
-        # En Windows, usar WSL o Git Bash si está disponible
-        if platform.system() == "Windows":
-            # Intentar WSL primero, luego Git Bash
-            wsl_bash = shutil.which("wsl")
-            git_bash = shutil.which("bash")
-            if wsl_bash:
-                # Convertir ruta de Windows a WSL
-                wsl_path = temp_path.replace("\\", "/").replace("C:", "/mnt/c")
-                cmd = ["wsl", "bash", wsl_path] + args
-            elif git_bash:
-                cmd = ["bash", temp_path] + args
-            else:
-                # Fallback: intentar ejecutar directamente
-                cmd = [temp_path] + args
-        else:
-            cmd = ["bash", temp_path] + args
-    elif interpreter_final == "powershell":
-        ps_cmd = shutil.which("pwsh") or shutil.which(
-            "powershell") or "powershell"
-        cmd = [ps_cmd, "-File", temp_path] + args
-    else:
-        cmd = [temp_path] + args
-
-    try:
-        result = subprocess.run(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            timeout=timeout_s,
-            text=True
-        )
-        salida = result.stdout
-        error = result.stderr
-        codigo = result.returncode
-        try:
-            os.unlink(temp_path)
-        except Exception:
-            pass
-
-        resultado = {
-            "success": codigo == 0,
-            "stdout": salida,
-            "stderr": error,
-            "exit_code": codigo,
-            "script": script_blob_path,
-            "interpreter": interpreter_final,
-            "args": args,
-            "run_id": run_id
-        }
-        resultado = aplicar_memoria_manual(req, resultado)
-        return func.HttpResponse(json.dumps(resultado, ensure_ascii=False), status_code=200, mimetype="application/json")
-    except subprocess.TimeoutExpired:
-        try:
-            os.unlink(temp_path)
-        except Exception:
-            pass
-        return func.HttpResponse(json.dumps({
-            "success": False,
-            "error": f"Timeout después de {timeout_s} segundos",
-            "exit_code": -1,
-            "script": script_blob_path,
-            "interpreter": interpreter_final,
-            "run_id": run_id
-        }), status_code=408, mimetype="application/json")
-    except Exception as e:
-        try:
-            os.unlink(temp_path)
-        except Exception:
-            pass
-        logging.error(f"[{run_id}] Error ejecutando script: {str(e)}")
-        return func.HttpResponse(json.dumps({
-            "success": False,
-            "error": str(e),
-            "exit_code": -1,
-            "script": script_blob_path,
-            "interpreter": interpreter_final,
-            "run_id": run_id
-        }), status_code=500, mimetype="application/json")
-
-
-@app.function_name(name="verificar_script_http")
-@app.route(route="verificar-script", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def verificar_script_http(req: func.HttpRequest) -> func.HttpResponse:
-    from memory_manual import aplicar_memoria_manual
-    """
-    Verifica propiedades de un script en Blob Storage: tamaño, permisos, ejecutabilidad, shebang, bash -n
-    """
-
-    try:
-        body = req.get_json() if req.get_body() else {}
-        ruta = body.get("ruta")
-        if not ruta or not ruta.startswith("scripts/"):
-            return func.HttpResponse(
-                json.dumps({
-                    "exito": False,
-                    "error": "Parámetro 'ruta' requerido y debe comenzar con 'scripts/'",
-                    "ejemplo": {"ruta": "scripts/validacion.sh"}
-                }, ensure_ascii=False),
-                status_code=400,
-                mimetype="application/json"
-            )
-
-        blob_service_client = get_blob_client()
-        if not blob_service_client:
-            return func.HttpResponse(
-                json.dumps(
-                    {"exito": False, "error": "Blob Storage no configurado"}),
-                status_code=500,
-                mimetype="application/json"
-            )
-        blob_client = blob_service_client.get_blob_client(CONTAINER_NAME, ruta)
-        if not blob_client.exists():
-            return func.HttpResponse(
-                json.dumps(
-                    {"exito": False, "error": f"Script no encontrado: {ruta}"}),
-                status_code=404,
-                mimetype="application/json"
-            )
-
-        # Descargar a temporal
-        extension = ruta.lower().split('.')[-1]
-        with tempfile.NamedTemporaryFile(mode='w', suffix=f".{extension}", delete=False) as temp_file:
-            tmp_path = temp_file.name
-            script_content = blob_client.download_blob().readall().decode('utf-8')
-            temp_file.write(script_content)
-
-        # Propiedades del archivo
-        file_stat = os.stat(tmp_path)
-        modo = stat.filemode(file_stat.st_mode)
-        es_ejecutable = os.access(tmp_path, os.X_OK)
-        tiene_shebang = False
-        ultima_mod = None
-        try:
-            with open(tmp_path, "r", encoding="utf-8") as f:
-                primera_linea = f.readline()
-                tiene_shebang = primera_linea.startswith("#!")
-            ultima_mod = datetime.fromtimestamp(file_stat.st_mtime).isoformat()
-        except Exception:
-            primera_linea = ""
-
-        # bash -n para sintaxis
-        bash_check = None
-        bash_ok = None
-        if extension == "sh":
-            try:
-                result = subprocess.run(
-                    ["bash", "-n", tmp_path],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    timeout=10,
-                    text=True
-                )
-                bash_ok = result.returncode == 0
-                bash_check = result.stderr.strip() if result.stderr else "OK"
-            except Exception as e:
-                bash_ok = False
-                bash_check = str(e)
-
-        # Limpieza
-        try:
-            os.unlink(tmp_path)
-        except Exception:
-            pass
-
-        return func.HttpResponse(
-            json.dumps({
-                "exito": True,
-                "ruta": ruta,
-                "tamaño_bytes": file_stat.st_size,
-                "modo": modo,
-                "es_ejecutable": es_ejecutable,
-                "tiene_shebang": tiene_shebang,
-                "ultima_modificacion": ultima_mod,
-                "bash_sintaxis_ok": bash_ok,
-                "bash_salida": bash_check,
-                "primeras_lineas": primera_linea.strip() if primera_linea else ""
-            }, ensure_ascii=False),
-            status_code=200,
-            mimetype="application/json"
-        )
-    except Exception as e:
-        return func.HttpResponse(
-            json.dumps({"exito": False, "error": str(e)}),
-            status_code=500,
-            mimetype="application/json"
-        )
-
-
-def operacion_git(comando: str, parametros: Optional[dict] = None) -> dict:
-    """Ejecuta operaciones Git permitidas"""
-    if parametros is None:
-        parametros = {}
-    comandos_permitidos = {
-        "status": "git status --porcelain",
-        "add": "git add",
-        "commit": "git commit -m",
-        "push": "git push",
-        "pull": "git pull",
-        "branch": "git branch",
-        "checkout": "git checkout"
-    }
-    if comando not in comandos_permitidos:
-        return {
-            "exito": False,
-            "error": f"Comando no permitido: {comando}",
-            "comandos_permitidos": list(comandos_permitidos.keys())
-        }
-    try:
-        cmd = comandos_permitidos[comando]
-        if comando == "add" and parametros.get("archivo"):
-            cmd += f" {parametros['archivo']}"
-        elif comando == "commit" and parametros.get("mensaje"):
-            cmd += f' "{parametros["mensaje"]}"'
-        elif comando == "checkout" and parametros.get("rama"):
-            cmd += f" {parametros['rama']}"
-        resultado = subprocess.run(
-            cmd.split(),
-            capture_output=True,
-            text=True,
-            cwd=str(PROJECT_ROOT)
-        )
-        return {
-            "exito": resultado.returncode == 0,
-            "salida": resultado.stdout,
-            "error": resultado.stderr if resultado.stderr else None,
-            "comando": cmd
-        }
-    except Exception as e:
-        return {
-            "exito": False,
-            "error": str(e),
-            "comando_intentado": comando
-        }
-
-
-def ejecutar_agente_externo(agente: str, tarea: str, parametros: Optional[dict] = None) -> dict:
-    """Ejecuta o delega tarea a un agente externo"""
-    if parametros is None:
-        parametros = {}
-    agentes_disponibles = {
-        "Agent975": {
-            "endpoint": os.environ.get("AI_FOUNDRY_ENDPOINT"),
-            "proyecto": "booking-agents",
-            "capacidades": ["analizar", "refactorizar", "documentar"]
-        },
-        "CodeGPT": {
-            "api": "https://api.codegpt.co",
-            "capacidades": ["generar", "completar", "explicar"]
-        },
-        "Codex": {
-            "servicio": "openai-codex",
-            "capacidades": ["codigo", "traducir", "optimizar"]
-        }
-    }
-    if agente not in agentes_disponibles:
-        return {
-            "exito": False,
-            "error": f"Agente no disponible: {agente}",
-            "agentes_disponibles": list(agentes_disponibles.keys())
-        }
-    config_agente = agentes_disponibles[agente]
-    return {
-        "exito": True,
-        "agente": agente,
-        "tarea": tarea,
-        "estado": "delegado",
-        "configuracion": config_agente,
-        "parametros_enviados": parametros,
-        "mensaje": f"Tarea '{tarea}' delegada a {agente}",
-        "siguiente_accion": "verificar_resultado"
-    }
-
-
-def comando_bash(cmd: str, seguro: bool = False) -> dict:
-    """Ejecuta comandos bash/shell de forma segura"""
-    comandos_seguros = [
-        "ls", "pwd", "echo", "cat", "grep", "find", "which",
-        "az", "git", "npm", "node", "python", "pip"
-    ]
-    primer_comando = cmd.split()[0]
-    if not seguro and primer_comando not in comandos_seguros:
-        return {
-            "exito": False,
-            "error": f"Comando '{primer_comando}' no está en la lista de comandos seguros",
-            "sugerencia": "Usa parametro 'seguro': true para forzar ejecución"
-        }
-    try:
-        resultado = subprocess.run(
-            cmd,
-            shell=True,
-            capture_output=True,
-            text=True,
-            timeout=30,
-            cwd=str(PROJECT_ROOT)
-        )
-        return {
-            "exito": resultado.returncode == 0,
-            "stdout": resultado.stdout,
-            "stderr": resultado.stderr,
-            "comando": cmd,
-            "directorio": str(PROJECT_ROOT)
-        }
-    except subprocess.TimeoutExpired:
-        return {
-            "exito": False,
-            "error": "Comando excedió tiempo límite (30s)",
-            "comando": cmd
-        }
-    except Exception as e:
-        return {
-            "exito": False,
-            "error": str(e),
-            "comando": cmd
-        }
-
-
-def procesar_intencion_extendida(intencion: str, parametros: Optional[Dict[str, Any]] = None) -> dict:
-    """
-    Procesa intenciones semánticas extendidas no cubiertas en el procesador base
-    """
-    if parametros is None:
-        parametros = {}
-
-    intenciones_map = {
-        "verificar:almacenamiento": verificar_almacenamiento,
-        "limpiar:cache": limpiar_cache,
-        "sincronizar:blobs": sincronizar_blob_storage if 'sincronizar_blob_storage' in globals() else lambda p: {"exito": False, "error": "Función no implementada"},
-        "generar:resumen": generar_resumen_ejecutivo,
-        "generar:documentacion": generar_documentacion_tecnica if 'generar_documentacion_tecnica' in globals() else lambda p: {"exito": False, "error": "Función no implementada"},
-        "git:status": git_status_seguro,
-        "git:push": git_push_seguro if 'git_push_seguro' in globals() else lambda p: {"exito": False, "error": "Función no implementada"},
-        "git:commit": git_commit_semantico if 'git_commit_semantico' in globals() else lambda p: {"exito": False, "error": "Función no implementada"},
-        "analizar:rendimiento": analizar_rendimiento_sistema if 'analizar_rendimiento_sistema' in globals() else lambda p: {"exito": False, "error": "Función no implementada"},
-        "analizar:seguridad": auditoria_seguridad if 'auditoria_seguridad' in globals() else lambda p: {"exito": False, "error": "Función no implementada"},
-        "analizar:dependencias": revisar_dependencias if 'revisar_dependencias' in globals() else lambda p: {"exito": False, "error": "Función no implementada"},
-        "confirmar:accion": confirmar_accion_pendiente,
-        "cancelar:accion": cancelar_operacion if 'cancelar_operacion' in globals() else lambda p: {"exito": False, "error": "Función no implementada"}
-    }
-
-    for patron, funcion in intenciones_map.items():
-        if intencion.startswith(patron) or patron in intencion:
-            return funcion(parametros)
-
-    return interpretar_intencion_semantica(intencion, parametros)
-
-
-def verificar_almacenamiento(params: dict) -> dict:
-    try:
-        client = get_blob_client()
-        if not client:
-            return {"exito": False, "error": "Blob Storage no configurado"}
-        container_client = client.get_container_client(CONTAINER_NAME)
-        total_blobs = 0
-        total_size = 0
-        tipos_archivo = {}
-        for blob in container_client.list_blobs():
-            total_blobs += 1
-            total_size += blob.size
-            extension = blob.name.split(
-                '.')[-1] if '.' in blob.name else 'sin_extension'
-            tipos_archivo[extension] = tipos_archivo.get(extension, 0) + 1
-        return {
-            "exito": True,
-            "almacenamiento": {
-                "container": CONTAINER_NAME,
-                "total_archivos": total_blobs,
-                "tamaño_total_mb": round(total_size / (1024 * 1024), 2),
-                "tipos_archivo": tipos_archivo,
-                "estado": "conectado"
-            },
-            "sugerencias": [
-                "limpiar:cache si hay muchos archivos temporales",
-                "sincronizar:blobs para actualizar archivos locales"
-            ] if total_blobs > 1000 else []
-        }
-    except Exception as e:
-        return {"exito": False, "error": str(e)}
-
-
-def limpiar_cache(params: dict) -> dict:
-    global CACHE
-    archivos_antes = len(CACHE)
-    memoria_antes = sum(len(str(v)) for v in CACHE.values())
-    CACHE.clear()
-    return {
-        "exito": True,
-        "limpieza": {
-            "archivos_eliminados": archivos_antes,
-            "memoria_liberada_bytes": memoria_antes,
-            "timestamp": datetime.now().isoformat()
-        },
-        "mensaje": f"Cache limpiado: {archivos_antes} archivos, {memoria_antes/1024:.2f} KB liberados"
-    }
-
-
-def generar_resumen_ejecutivo(params: dict) -> dict:
-    diagnostico = diagnosticar_function_app()
-    almacenamiento = verificar_almacenamiento({})
-    resumen = {
-        "titulo": "Resumen Ejecutivo - Boat Rental System",
-        "fecha": datetime.now().strftime("%Y-%m-%d %H:%M"),
-        "estado_general": "operativo" if diagnostico.get("checks", {}).get("configuracion", {}).get("ambiente") else "degradado",
-        "metricas_clave": {
-            "archivos_proyecto": almacenamiento.get("almacenamiento", {}).get("total_archivos", 0),
-            "tamaño_total_mb": almacenamiento.get("almacenamiento", {}).get("tamaño_total_mb", 0),
-            "cache_activo": len(CACHE),
-            "ambiente": "Azure" if IS_AZURE else "Local"
-        },
-        "componentes": {
-            "mobile_app": {"estado": "activo", "tecnologia": "React Native + Expo"},
-            "backend": {"estado": "activo", "tecnologia": "AWS Lambda + DynamoDB"},
-            "admin_panel": {"estado": "activo", "tecnologia": "Next.js + Material-UI"},
-            "copiloto_ai": {"estado": "activo", "version": "2.0-orchestrator"}
-        },
-        "proximas_acciones": [
-            "Implementar CI/CD con Azure DevOps",
-            "Aumentar cobertura de tests al 80%",
-            "Optimizar queries de base de datos"
-        ],
-        "riesgos_identificados": []
-    }
-    if not almacenamiento.get("exito"):
-        resumen["riesgos_identificados"].append("Blob Storage desconectado")
-    if len(CACHE) > 500:
-        resumen["riesgos_identificados"].append("Cache sobrecargado")
-    return {
-        "exito": True,
-        "resumen": resumen,
-        "formato_disponible": ["json", "markdown", "pdf"],
-        "siguiente_accion": "generar:reporte para detalles completos"
-    }
-
-
-def git_status_seguro(params: dict) -> dict:
-    try:
-        result = subprocess.run(
-            ["git", "status", "--porcelain"],
-            capture_output=True,
-            text=True,
-            cwd=str(PROJECT_ROOT),
-            timeout=10
-        )
-        if result.returncode == 0:
-            lines = result.stdout.strip().split('\n') if result.stdout.strip() else []
-            archivos_modificados = []
-            archivos_nuevos = []
-            archivos_eliminados = []
-            for line in lines:
-                if line.startswith(' M'):
-                    archivos_modificados.append(line[3:])
-                elif line.startswith('??'):
-                    archivos_nuevos.append(line[3:])
-                elif line.startswith(' D'):
-                    archivos_eliminados.append(line[3:])
-            return {
-                "exito": True,
-                "estado_git": {
-                    "modificados": archivos_modificados,
-                    "nuevos": archivos_nuevos,
-                    "eliminados": archivos_eliminados,
-                    "limpio": len(lines) == 0
-                },
-                "siguiente_accion": "git:commit" if lines else None
-            }
-        else:
-            return {"exito": False, "error": result.stderr}
-    except Exception as e:
-        return {"exito": False, "error": str(e)}
-
-
-def confirmar_accion_pendiente(params: dict) -> dict:
-    accion_id = params.get("accion_id")
-    confirmar = params.get("confirmar", False)
-    if not accion_id:
-        return {"exito": False, "error": "Se requiere accion_id para confirmar"}
-    if confirmar:
-        return {
-            "exito": True,
-            "mensaje": f"Acción {accion_id} confirmada y ejecutada",
-            "timestamp": datetime.now().isoformat()
-        }
-    else:
-        return {
-            "exito": False,
-            "mensaje": f"Acción {accion_id} no confirmada",
-            "estado": "cancelada"
-        }
-
-
-def interpretar_intencion_semantica(intencion: str, params: dict) -> dict:
-    keywords_map = {
-        "estado": "status",
-        "salud": "health",
-        "dashboard": "dashboard",
-        "diagnóstico": "diagnosticar:completo",
-        "diagnostico": "diagnosticar:completo",
-        "resumen": "generar:resumen",
-        "reporte": "generar:reporte",
-        "limpiar": "limpiar:cache",
-        "almacenamiento": "verificar:almacenamiento",
-        "storage": "verificar:almacenamiento",
-        "git": "git:status",
-        "commit": "git:commit",
-        "push": "git:push"
-    }
-    intencion_lower = intencion.lower()
-    for keyword, mapped_intent in keywords_map.items():
-        if keyword in intencion_lower:
-            return procesar_intencion_semantica(mapped_intent, params)
-    return {
-        "exito": False,
-        "mensaje": f"No pude interpretar la intención: '{intencion}'",
-        "sugerencias": [
-            "dashboard - Ver métricas del sistema",
-            "diagnosticar:completo - Diagnóstico exhaustivo",
-            "generar:resumen - Resumen ejecutivo",
-            "verificar:almacenamiento - Estado del storage",
-            "git:status - Estado del repositorio"
-        ],
-        "tip": "Puedes usar comandos más específicos o palabras clave conocidas"
-    }
-
-# --- FUNCIONES FALTANTES PARA INTENCIONES EXTENDIDAS ---
-
-
-def sincronizar_blob_storage(params: dict) -> dict:
-    """Sincroniza archivos locales con Azure Blob Storage"""
-    try:
-        # Aquí deberías implementar la lógica real de sincronización
-        # Por ahora, solo simula la operación
-        return {
-            "exito": True,
-            "mensaje": "Sincronización de archivos con Blob Storage iniciada.",
-            "detalles": "Esta función es un placeholder. Implementa la lógica real según tus necesidades."
-        }
-    except Exception as e:
-        return {"exito": False, "error": str(e)}
-
-
-def generar_documentacion_tecnica(params: dict) -> dict:
-    """Genera documentación técnica del proyecto"""
-    try:
-        # Simulación de generación de documentación
-        return {
-            "exito": True,
-            "documentacion": "# Documentación Técnica\n\nEste es un ejemplo de documentación generada automáticamente.",
-            "formato": "markdown",
-            "mensaje": "Documentación técnica generada correctamente."
-        }
-    except Exception as e:
-        return {"exito": False, "error": str(e)}
-
-
-def git_push_seguro(params: dict) -> dict:
-    """Realiza un git push seguro"""
-    try:
-        result = subprocess.run(
-            ["git", "push"],
-            capture_output=True,
-            text=True,
-            cwd=str(PROJECT_ROOT),
-            timeout=20
-        )
-        return {
-            "exito": result.returncode == 0,
-            "salida": result.stdout,
-            "error": result.stderr if result.stderr else None,
-            "mensaje": "Push realizado correctamente." if result.returncode == 0 else "Error en git push."
-        }
-    except Exception as e:
-        return {"exito": False, "error": str(e)}
-
-
-def git_commit_semantico(params: dict) -> dict:
-    """Realiza un git commit con mensaje semántico"""
-    mensaje = params.get("mensaje", "Commit semántico automático")
-    try:
-        result = subprocess.run(
-            ["git", "commit", "-am", mensaje],
-            capture_output=True,
-            text=True,
-            cwd=str(PROJECT_ROOT),
-            timeout=15
-        )
-        return {
-            "exito": result.returncode == 0,
-            "salida": result.stdout,
-            "error": result.stderr if result.stderr else None,
-            "mensaje": "Commit realizado correctamente." if result.returncode == 0 else "Error en git commit."
-        }
-    except Exception as e:
-        return {"exito": False, "error": str(e)}
-
-
-def analizar_rendimiento_sistema(params: dict) -> dict:
-    """Analiza el rendimiento del sistema"""
-    try:
-        # Simulación de análisis de rendimiento
-        return {
-            "exito": True,
-            "rendimiento": {
-                "cpu": "Bajo uso",
-                "memoria": "Óptima",
-                "latencia": "< 200ms"
-            },
-            "mensaje": "Análisis de rendimiento completado."
-        }
-    except Exception as e:
-        return {"exito": False, "error": str(e)}
-
-
-def auditoria_seguridad(params: dict) -> dict:
-    """Realiza una auditoría de seguridad básica"""
-    try:
-        # Simulación de auditoría de seguridad
-        return {
-            "exito": True,
-            "seguridad": {
-                "vulnerabilidades": 0,
-                "dependencias_obsoletas": 0,
-                "recomendaciones": ["Actualizar dependencias regularmente", "Revisar logs de acceso"]
-            },
-            "mensaje": "Auditoría de seguridad completada."
-        }
-    except Exception as e:
-        return {"exito": False, "error": str(e)}
-
-
-def revisar_dependencias(params: dict) -> dict:
-    """Revisa dependencias del proyecto"""
-    try:
-        # Simulación de revisión de dependencias
-        return {
-            "exito": True,
-            "dependencias": [
-                {"nombre": "azure-functions",
-                 "version": "1.16.0", "estado": "actualizada"},
-                {"nombre": "azure-storage-blob",
-                 "version": "12.14.1", "estado": "actualizada"}
-            ],
-            "mensaje": "Revisión de dependencias completada."
-        }
-    except Exception as e:
-        return {"exito": False, "error": str(e)}
-
-
-def cancelar_operacion(params: dict) -> dict:
-    """Cancela una operación pendiente"""
-    try:
-        operacion = params.get("operacion", "desconocida")
-        return {
-            "exito": True,
-            "mensaje": f"Operación '{operacion}' cancelada correctamente.",
-            "timestamp": datetime.now().isoformat()
-        }
-    except Exception as e:
-        return {"exito": False, "error": str(e)}
-
-
-def mover_archivo(origen: str, destino: str, overwrite: bool = False, eliminar_origen: bool = True) -> dict:
-    """Mueve/renombra un archivo (Blob o local). En Azure copia y luego borra el origen."""
-    try:
-        if not origen or not destino:
-            return {"exito": False, "error": "Parámetros 'origen' y 'destino' son requeridos"}
-
-        # Normalizar
-        origen = origen.strip().replace('\\', '/').replace('//', '/')
-        destino = destino.strip().replace('\\', '/').replace('//', '/')
-
-        if IS_AZURE:
-            client = get_blob_client()
-            if not client:
-                return {"exito": False, "error": "Blob Storage no configurado"}
-
-            container = client.get_container_client(CONTAINER_NAME)
-            src = container.get_blob_client(origen)
-            dst = container.get_blob_client(destino)
-
-            if not src.exists():
-                # ✅ FIX: Crear archivo origen para testing
-                try:
-                    container.get_blob_client(origen).upload_blob(
-                        f"Test content created at {datetime.now()}", overwrite=True)
-                    logging.info(f"Created test file for copying: {origen}")
-                except Exception as e:
-                    return {"exito": False, "error": f"Origen no existe: {origen}"}
-            if dst.exists() and not overwrite:
-                return {"exito": False, "error": f"Destino ya existe: {destino}. Usa overwrite=true"}
-
-            # Copia (descargar/subir para evitar fricciones de permisos con copy-from-url)
-            data = src.download_blob().readall()
-            dst.upload_blob(data, overwrite=True)
-
-            # Borrar origen si se pide "mover" (no solo copiar)
-            if eliminar_origen:
-                src.delete_blob()
-
-            return {
-                "exito": True,
-                "mensaje": f"Movido en Blob: {origen} -> {destino}",
-                "origen": origen,
-                "destino": destino,
-                "ubicacion": f"blob://{CONTAINER_NAME}/{destino}"
-            }
-        else:
-            src = PROJECT_ROOT / origen
-            dst = PROJECT_ROOT / destino
-            if not src.exists():
-                # ✅ FIX: Crear archivo origen para testing
-                try:
-                    src.parent.mkdir(parents=True, exist_ok=True)
-                    src.write_text(f"Test content created at {datetime.now()}")
-                    logging.info(f"Created test file for copying: {src}")
-                except Exception as e:
-                    return {"exito": False, "error": f"Origen no existe: {src}"}
-            dst.parent.mkdir(parents=True, exist_ok=True)
-            if dst.exists() and not overwrite:
-                return {"exito": False, "error": f"Destino ya existe: {dst}. Usa overwrite=true"}
-
-            # Copiar y borrar
-            data = src.read_bytes()
-            dst.write_bytes(data)
-            if eliminar_origen:
-                src.unlink()
-
-            return {
-                "exito": True,
-                "mensaje": f"Movido local: {src} -> {dst}",
-                "origen": str(src),
-                "destino": str(dst),
-                "ubicacion": str(dst)
-            }
-    except Exception as e:
-        return {"exito": False, "error": f"mover_archivo: {str(e)}", "tipo_error": type(e).__name__}
-
-
-@app.function_name(name="mover_archivo_http")
-@app.route(route="mover-archivo", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def mover_archivo_http(req: func.HttpRequest) -> func.HttpResponse:
-    from memory_manual import aplicar_memoria_manual
-    try:
-        # ✅ VALIDACIÓN DEFENSIVA INMEDIATA: Verificar que hay contenido en el body antes de procesar
-        request_body = req.get_body()
-        if not request_body:
-            return func.HttpResponse(
-                json.dumps({
-                    "ok": False,
-                    "error": "Request body es requerido para la operación de mover archivo",
-                    "problema": "El cuerpo de la solicitud está vacío",
-                    "ejemplo": {
-                        "origen": "archivo-origen.txt",
-                        "destino": "archivo-destino.txt",
-                        "overwrite": False,
-                        "eliminar_origen": True
-                    }
-                }, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=400
-            )
-
-        # ✅ VALIDACIÓN DEFENSIVA: Manejar body JSON de forma más robusta
-        try:
-            body = req.get_json()
-        except (ValueError, TypeError) as json_error:
-            return func.HttpResponse(
-                json.dumps({
-                    "ok": False,
-                    "error": "Request body contiene JSON inválido",
-                    "detalle_error": str(json_error),
-                    "body_preview": request_body.decode('utf-8', errors='ignore')[:100],
-                    "ejemplo": {
-                        "origen": "archivo-origen.txt",
-                        "destino": "archivo-destino.txt",
-                        "overwrite": False,
-                        "eliminar_origen": True
-                    }
-                }, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=400
-            )
-
-        # ✅ VALIDACIÓN ESTRICTA: Verificar que body sea un dict válido y no vacío
-        if not body or not isinstance(body, dict) or len(body) == 0:
-            return func.HttpResponse(
-                json.dumps({
-                    "ok": False,
-                    "error": "Request body debe ser un objeto JSON válido y no vacío",
-                    "body_recibido": body,
-                    "tipo_recibido": type(body).__name__ if body is not None else "None",
-                    "es_vacio": len(body) == 0 if isinstance(body, dict) else False,
-                    "campos_requeridos": ["origen", "destino"],
-                    "ejemplo": {
-                        "origen": "archivo-origen.txt",
-                        "destino": "archivo-destino.txt",
-                        "overwrite": False,
-                        "eliminar_origen": True
-                    }
-                }, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=400
-            )
-
-        # ✅ EXTRACCIÓN SEGURA: Obtener valores y validar presencia
-        origen = body.get("origen")
-        destino = body.get("destino")
-        blob_field = body.get("blob", None)
-
-        # ✅ VALIDACIÓN TEMPRANA: Verificar campos requeridos están presentes
-        if "origen" not in body or "destino" not in body:
-            campos_faltantes = []
-            if "origen" not in body:
-                campos_faltantes.append("origen")
-            if "destino" not in body:
-                campos_faltantes.append("destino")
-
-            return func.HttpResponse(
-                json.dumps({
-                    "ok": False,
-                    "error": f"Campos requeridos faltantes: {', '.join(campos_faltantes)}",
-                    "campos_faltantes": campos_faltantes,
-                    "campos_recibidos": list(body.keys()),
-                    "ejemplo": {
-                        "origen": "archivo-origen.txt",
-                        "destino": "archivo-destino.txt",
-                        "overwrite": False,
-                        "eliminar_origen": True
-                    }
-                }, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=400
-            )
-
-        # ✅ VALIDACIÓN DE VALORES NULL: Verificar que origen y destino no sean None/null
-        if origen is None or destino is None:
-            return func.HttpResponse(
-                json.dumps({
-                    "ok": False,
-                    "error": "Parámetros 'origen' y 'destino' no pueden ser null",
-                    "valores_recibidos": {
-                        "origen": origen,
-                        "destino": destino,
-                        "origen_es_null": origen is None,
-                        "destino_es_null": destino is None
-                    },
-                    "ejemplo": {
-                        "origen": "archivo-origen.txt",
-                        "destino": "archivo-destino.txt",
-                        "overwrite": False,
-                        "eliminar_origen": True
-                    }
-                }, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=400
-            )
-
-        # flags comunes
-        overwrite = _to_bool(body.get("overwrite", False))
-        eliminar = _to_bool(body.get("eliminar_origen", True))
-
-        # MODO A (legacy): {origen: contSrc, destino: contDst, blob: "carpeta/archivo.txt"}
-        if isinstance(blob_field, str) and _s(blob_field):
-            cont_src = _s(origen)
-            cont_dst = _s(destino)
-            blob_name = _s(blob_field)
-            if not cont_src or not cont_dst or not blob_name:
-                return func.HttpResponse(
-                    json.dumps({
-                        "ok": False,
-                        "error": "Parámetros faltantes para modo contenedor+blob",
-                        "requeridos": ["origen (contenedor)", "destino (contenedor)", "blob (nombre archivo)"],
-                        "valores_recibidos": {
-                            "origen": cont_src,
-                            "destino": cont_dst,
-                            "blob": blob_name
-                        },
-                        "ejemplo": {
-                            "origen": "contenedor-origen",
-                            "destino": "contenedor-destino",
-                            "blob": "carpeta/archivo.txt"
-                        }
-                    }, ensure_ascii=False),
-                    mimetype="application/json",
-                    status_code=400
-                )
-            src_path = f"{cont_src.rstrip('/')}/{blob_name}"
-            dst_path = f"{cont_dst.rstrip('/')}/{blob_name}"
-            try:
-                r = mover_archivo(src_path, dst_path,
-                                  overwrite=overwrite, eliminar_origen=eliminar)
-                return func.HttpResponse(
-                    json.dumps(
-                        {"ok": True, "mode": "containers+blob", **r}, ensure_ascii=False),
-                    mimetype="application/json",
-                    status_code=200
-                )
-            except FileNotFoundError as e:
-                return func.HttpResponse(
-                    json.dumps(
-                        {"ok": False, "error": f"Archivo no encontrado: {str(e)}"}, ensure_ascii=False),
-                    mimetype="application/json",
-                    status_code=404
-                )
-            except Exception as e:
-                return func.HttpResponse(
-                    json.dumps({"ok": False, "error": str(e)},
-                               ensure_ascii=False),
-                    mimetype="application/json",
-                    status_code=500
-                )
-
-        # MODO B (test actual): {origen: "tmp/a.txt", destino: "tmp/b.txt", overwrite?, eliminar_origen?}
-        # ✅ NORMALIZACIÓN SEGURA: Convertir a string y limpiar espacios
-        src_path = _s(origen) if origen is not None else ""
-        dst_path = _s(destino) if destino is not None else ""
-
-        # ✅ VALIDACIÓN ESTRICTA: Verificar que las rutas no estén vacías después de normalizar
-        if not src_path or not dst_path:
-            return func.HttpResponse(
-                json.dumps({
-                    "ok": False,
-                    "error": "Parámetros 'origen' y 'destino' no pueden estar vacíos",
-                    "valores_normalizados": {
-                        "origen_normalizado": src_path,
-                        "destino_normalizado": dst_path,
-                        "origen_original": origen,
-                        "destino_original": destino
-                    },
-                    "problema": "Los valores están vacíos o contienen solo espacios en blanco",
-                    "ejemplo": {
-                        "origen": "archivo-origen.txt",
-                        "destino": "archivo-destino.txt",
-                        "overwrite": False,
-                        "eliminar_origen": True
-                    }
-                }, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=400
-            )
-
-        # ✅ VALIDACIÓN INDIVIDUAL: Mensajes específicos para cada parámetro faltante
-        if not src_path:
-            return func.HttpResponse(
-                json.dumps({
-                    "ok": False,
-                    "error": "Parámetro 'origen' es requerido y no puede estar vacío",
-                    "destino_recibido": dst_path,
-                    "origen_problema": f"Valor recibido: '{origen}' -> normalizado: '{src_path}'"
-                }, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=400
-            )
-
-        if not dst_path:
-            return func.HttpResponse(
-                json.dumps({
-                    "ok": False,
-                    "error": "Parámetro 'destino' es requerido y no puede estar vacío",
-                    "origen_recibido": src_path,
-                    "destino_problema": f"Valor recibido: '{destino}' -> normalizado: '{dst_path}'"
-                }, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=400
-            )
-
-        try:
-            r = mover_archivo(src_path, dst_path,
-                              overwrite=overwrite, eliminar_origen=eliminar)
-
-            # Determinar código de estado basado en el resultado
-            status_code = 200
-            if r.get("exito") and "creado" in str(r.get("mensaje", "")).lower():
-                status_code = 201
-
-            return func.HttpResponse(
-                json.dumps({"ok": True, "mode": "path->path", **r},
-                           ensure_ascii=False),
-                mimetype="application/json",
-                status_code=status_code
-            )
-        except FileNotFoundError as e:
-            return func.HttpResponse(
-                json.dumps(
-                    {"ok": False, "error": f"Archivo no encontrado: {str(e)}"}, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=404
-            )
-        except Exception as e:
-            return func.HttpResponse(
-                json.dumps({"ok": False, "error": str(e)}, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=500
-            )
-
-    except Exception as e:
-        logging.exception("mover_archivo_http failed")
-        return func.HttpResponse(
-            json.dumps({
-                "ok": False,
-                "error": str(e),
-                "tipo_error": type(e).__name__
-            }, ensure_ascii=False),
-            mimetype="application/json",
-            status_code=500
-        )
-
-
-# ---------- util md5 ----------
-def _md5_to_b64(maybe_md5) -> Optional[str]:
-    if isinstance(maybe_md5, (bytes, bytearray)):
-        return base64.b64encode(bytes(maybe_md5)).decode("utf-8")
-    return None
-
-# ---------- helper: format file size ----------
-
-
-def _format_file_size(size_bytes: int) -> str:
-    """Convierte tamaño en bytes a formato legible (KB, MB, GB, etc.)"""
-    try:
-        if size_bytes < 1024:
-            return f"{size_bytes} B"
-        elif size_bytes < 1024 ** 2:
-            return f"{size_bytes / 1024:.2f} KB"
-        elif size_bytes < 1024 ** 3:
-            return f"{size_bytes / (1024 ** 2):.2f} MB"
-        else:
-            return f"{size_bytes / (1024 ** 3):.2f} GB"
-    except Exception:
-        return str(size_bytes)
-
-# ---------- info-archivo ----------
-
-
-def validate_info_archivo_params(req, run_id, CONTAINER_NAME, IS_AZURE, get_blob_client, PROJECT_ROOT, COPILOT_ROOT, Path, datetime, json, func, logging, os):
-    """
-    Validación robusta de parámetros y existencia física del archivo para info_archivo_http
-    """
-    try:
-        # ✅ VALIDACIÓN CRÍTICA: Verificar que ruta venga con archivo válido
-        ruta_raw = (req.params.get("ruta") or req.params.get("path") or
-                    req.params.get("archivo") or req.params.get("blob") or "").strip()
-
-        if not ruta_raw:
-            return func.HttpResponse(
-                json.dumps({
-                    "exito": False,
-                    "error": "Parámetro 'ruta' es requerido para obtener información del archivo",
-                    "error_code": "MISSING_REQUIRED_PARAMETER",
-                    "parametros_aceptados": {
-                        "ruta": "Ruta del archivo (requerido)",
-                        "path": "Alias para 'ruta'",
-                        "archivo": "Alias para 'ruta'",
-                        "blob": "Alias para 'ruta'"
-                    },
-                    "ejemplos_validos": [
-                        "?ruta=README.md",
-                        "?ruta=package.json",
-                        "?path=mobile-app/src/App.tsx",
-                        "?archivo=docs/API.md"
-                    ],
-                    "run_id": run_id,
-                    "timestamp": datetime.now().isoformat()
-                }, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=400
-            )
-
-        # ✅ VALIDACIÓN ADICIONAL: Formato de ruta válido
-        if ruta_raw.startswith("//") or ".." in ruta_raw or len(ruta_raw.strip()) < 1:
-            return func.HttpResponse(
-                json.dumps({
-                    "exito": False,
-                    "error": "Formato de ruta inválido o inseguro",
-                    "error_code": "INVALID_PATH_FORMAT",
-                    "ruta_recibida": ruta_raw,
-                    "problema": "Contiene caracteres no permitidos o está vacía",
-                    "formatos_validos": [
-                        "archivo.txt",
-                        "carpeta/archivo.txt",
-                        "docs/readme.md"
-                    ],
-                    "run_id": run_id
-                }, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=400
-            )
-
-        # ✅ VERIFICACIÓN FÍSICA: Comprobar que el archivo existe antes de procesar
-        container = req.params.get("container", CONTAINER_NAME)
-        archivo_existe = False
-        error_existencia = None
-
-        # Verificar existencia en Azure Blob Storage
-        if IS_AZURE:
-            try:
-                client = get_blob_client()
-                if client:
-                    container_client = client.get_container_client(container)
-                    if container_client.exists():
-                        ruta_normalizada = ruta_raw.replace(
-                            '\\', '/').lstrip('/')
-                        blob_client = container_client.get_blob_client(
-                            ruta_normalizada)
-                        archivo_existe = blob_client.exists()
-                        if not archivo_existe:
-                            error_existencia = f"El archivo '{ruta_raw}' no existe en el contenedor '{container}'"
-                    else:
-                        error_existencia = f"El contenedor '{container}' no existe"
-                else:
-                    error_existencia = "Cliente de Blob Storage no disponible"
-            except Exception as e:
-                error_existencia = f"Error verificando existencia en Blob Storage: {str(e)}"
-        else:
-            # Verificar existencia local
-            posibles_rutas = [
-                PROJECT_ROOT / ruta_raw,
-                COPILOT_ROOT / ruta_raw if COPILOT_ROOT else None,
-                Path(ruta_raw) if Path(ruta_raw).is_absolute() else None
-            ]
-
-            for ruta_completa in filter(None, posibles_rutas):
-                if ruta_completa and ruta_completa.exists() and ruta_completa.is_file():
-                    archivo_existe = True
-                    break
-
-            if not archivo_existe:
-                error_existencia = f"El archivo '{ruta_raw}' no existe en el sistema local"
-
-        # ✅ RESPUESTA DE ERROR SI NO EXISTE
-        if not archivo_existe:
-            return func.HttpResponse(
-                json.dumps({
-                    "exito": False,
-                    "error": error_existencia or f"El archivo '{ruta_raw}' no existe",
-                    "error_code": "FILE_NOT_FOUND",
-                    "archivo_solicitado": {
-                        "ruta_recibida": ruta_raw,
-                        "container": container,
-                        "ambiente": "Azure" if IS_AZURE else "Local"
-                    },
-                    "acciones_recomendadas": [
-                        "Verificar que el archivo existe en la ubicación especificada",
-                        "Comprobar permisos de acceso al archivo",
-                        f"Listar archivos disponibles en el contenedor '{container}'"
-                    ],
-                    "run_id": run_id,
-                    "timestamp": datetime.now().isoformat()
-                }, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=404
-            )
-
-        logging.info(f"[{run_id}] Archivo verificado y existe: {ruta_raw}")
-
-        # Retornar None si todo está bien para continuar con el procesamiento normal
-        return None
-
-    except Exception as e:
-        logging.exception(
-            f"[{run_id}] Error en validación de info_archivo: {str(e)}")
-        return func.HttpResponse(
-            json.dumps({
-                "exito": False,
-                "error": f"Error interno en validación: {str(e)}",
-                "error_code": "VALIDATION_ERROR",
-                "tipo_error": type(e).__name__,
-                "run_id": run_id,
-                "timestamp": datetime.now().isoformat()
-            }, ensure_ascii=False),
-            mimetype="application/json",
-            status_code=500
-        )
-
-
-@app.function_name(name="descargar_archivo_http")
-@app.route(route="descargar-archivo", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
-def descargar_archivo_http(req: func.HttpRequest) -> func.HttpResponse:
-    from memory_manual import aplicar_memoria_manual
-    try:
-        ruta = (req.params.get("ruta") or "").strip()
-        modo = (req.params.get("modo")
-                or "inline").strip().lower()  # inline|base64
-        if not ruta:
-            return func.HttpResponse(json.dumps({"exito": False, "error": "Falta 'ruta'"}), mimetype="application/json", status_code=400)
-
-        def pack_ok(raw: bytes, ct: str):
-            if modo == "base64":
-                return {"exito": True, "ruta": ruta, "content_type": ct, "base64": base64.b64encode(raw).decode("utf-8")}
-            try:
-                return {"exito": True, "ruta": ruta, "content_type": ct, "contenido": raw.decode("utf-8")}
-            except UnicodeDecodeError:
-                return {"exito": True, "ruta": ruta, "content_type": ct, "base64": base64.b64encode(raw).decode("utf-8")}
-
-        if IS_AZURE:
-            client = get_blob_client()
-            if not client:
-                return func.HttpResponse(json.dumps({"exito": False, "error": "Blob Storage no configurado"}), mimetype="application/json", status_code=500)
-            c = client.get_container_client(CONTAINER_NAME)
-            b = c.get_blob_client(ruta)
-            if not b.exists():
-                return func.HttpResponse(json.dumps({"exito": False, "error": "No existe"}), mimetype="application/json", status_code=404)
-            raw = b.download_blob().readall()
-            ct = getattr(b.get_blob_properties(), "content_type",
-                         "application/octet-stream")
-            return func.HttpResponse(json.dumps(pack_ok(raw, ct), ensure_ascii=False), mimetype="application/json", status_code=200)
-        else:
-            p = PROJECT_ROOT / ruta
-            if not p.exists():
-                return func.HttpResponse(json.dumps({"exito": False, "error": "No existe"}), mimetype="application/json", status_code=404)
-            raw = p.read_bytes()
-            return func.HttpResponse(json.dumps(pack_ok(raw, "text/plain"), ensure_ascii=False), mimetype="application/json", status_code=200)
-    except Exception as e:
-        logging.exception("descargar_archivo_http failed")
-        return func.HttpResponse(json.dumps({"exito": False, "error": str(e)}), mimetype="application/json", status_code=500)
-
-# ---------- copiar-archivo (envoltura de mover) ----------
-
-
-def copiar_archivo(origen: str, destino: str, overwrite: bool = False) -> dict:
-    return mover_archivo(origen, destino, overwrite=overwrite, eliminar_origen=False)
-
-
-@app.function_name(name="copiar_archivo_http")
-@app.route(route="copiar-archivo", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def copiar_archivo_http(req: func.HttpRequest) -> func.HttpResponse:
-    from memory_manual import aplicar_memoria_manual
-    from cosmos_memory_direct import consultar_memoria_cosmos_directo, aplicar_memoria_cosmos_directo
-    from services.memory_service import memory_service
-
-    # 🧠 CONSULTAR MEMORIA COSMOS DB DIRECTAMENTE
-    memoria_previa = consultar_memoria_cosmos_directo(req)
-    if memoria_previa and memoria_previa.get("tiene_historial"):
-        logging.info(
-            f"🧠 Modificar-archivo: {memoria_previa['total_interacciones']} interacciones encontradas")
-        logging.info(
-            f"📝 Historial: {memoria_previa.get('resumen_conversacion', '')[:100]}...")
-    advertencias = []
-
-    try:
-        # ✅ VALIDACIÓN DEFENSIVA: Verificar que body no sea None/vacío
-        body = None
-        body_raw = req.get_body()
-
-        # Si no hay body en absoluto, error inmediato
-        if not body_raw:
-            return func.HttpResponse(
-                json.dumps({
-                    "exito": False,
-                    "error": "Request body es requerido para la operación de copia",
-                    "problema": "El cuerpo de la solicitud está vacío",
-                    "ejemplo": {
-                        "origen": "archivo1.txt",
-                        "destino": "archivo2.txt",
-                        "overwrite": False
-                    }
-                }, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=400
-            )
-
-        # Intentar parsear JSON con manejo robusto de errores
-        try:
-            body = req.get_json()
-        except ValueError as json_error:
-            return func.HttpResponse(
-                json.dumps({
-                    "exito": False,
-                    "error": "Request body contiene JSON inválido",
-                    "detalle_error": str(json_error),
-                    "body_preview": body_raw.decode('utf-8', errors='ignore')[:100] if body_raw else "vacío",
-                    "ejemplo": {
-                        "origen": "archivo1.txt",
-                        "destino": "archivo2.txt",
-                        "overwrite": False
-                    }
-                }, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=400
-            )
-
-        # ✅ VALIDACIÓN ESTRICTA: Verificar que body sea un dict válido y no vacío
-        if not body or not isinstance(body, dict) or len(body) == 0:
-            return func.HttpResponse(
-                json.dumps({
-                    "exito": False,
-                    "error": "Request body debe ser un objeto JSON válido y no vacío con campos requeridos",
-                    "body_recibido": body,
-                    "tipo_recibido": type(body).__name__ if body is not None else "None",
-                    "es_vacio": len(body) == 0 if isinstance(body, dict) else False,
-                    "campos_requeridos": ["origen", "destino"],
-                    "ejemplo": {
-                        "origen": "archivo1.txt",
-                        "destino": "archivo2.txt",
-                        "overwrite": False
-                    }
-                }, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=400
-            )
-
-        # ✅ VERIFICACIÓN CAMPOS REQUERIDOS: Asegurar que origen y destino estén presentes
-        campos_faltantes = []
-        if "origen" not in body:
-            campos_faltantes.append("origen")
-        if "destino" not in body:
-            campos_faltantes.append("destino")
-
-        if campos_faltantes:
-            return func.HttpResponse(
-                json.dumps({
-                    "exito": False,
-                    "error": f"Campos requeridos faltantes: {', '.join(campos_faltantes)}",
-                    "campos_faltantes": campos_faltantes,
-                    "campos_recibidos": list(body.keys()),
-                    "ejemplo": {
-                        "origen": "archivo1.txt",
-                        "destino": "archivo2.txt",
-                        "overwrite": False
-                    }
-                }, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=400
-            )
-
-        # ✅ VERIFICACIÓN CAMPOS REQUERIDOS: Asegurar que origen y destino estén presentes
-        campos_faltantes = []
-        if "origen" not in body:
-            campos_faltantes.append("origen")
-        if "destino" not in body:
-            campos_faltantes.append("destino")
-
-        if campos_faltantes:
-            return func.HttpResponse(
-                json.dumps({
-                    "exito": False,
-                    "error": f"Campos requeridos faltantes: {', '.join(campos_faltantes)}",
-                    "campos_faltantes": campos_faltantes,
-                    "campos_recibidos": list(body.keys()),
-                    "ejemplo": {
-                        "origen": "archivo1.txt",
-                        "destino": "archivo2.txt",
-                        "overwrite": False
-                    }
-                }, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=400
-            )
-
-        # ✅ EXTRACCIÓN SEGURA: Obtener valores y validar no-nullidad
-        origen = body.get("origen")
-        destino = body.get("destino")
-        overwrite = bool(body.get("overwrite", False))
-
-        # ✅ VALIDACIÓN TEMPRANA: Verificar que origen y destino no sean None/null
-        if origen is None or destino is None:
-            return func.HttpResponse(
-                json.dumps({
-                    "exito": False,
-                    "error": "Parámetros 'origen' y 'destino' no pueden ser null",
-                    "valores_recibidos": {
-                        "origen": origen,
-                        "destino": destino,
-                        "origen_es_null": origen is None,
-                        "destino_es_null": destino is None
-                    },
-                    "ejemplo": {
-                        "origen": "archivo1.txt",
-                        "destino": "archivo2.txt",
-                        "overwrite": False
-                    }
-                }, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=400
-            )
-
-        # ✅ NORMALIZACIÓN SEGURA: Convertir a string y limpiar espacios
-        origen = str(origen).strip() if origen is not None else ""
-        destino = str(destino).strip() if destino is not None else ""
-
-        # ✅ VALIDACIÓN ESTRICTA: Verificar que las rutas no estén vacías después de normalizar
-        if not origen or not destino:
-            return func.HttpResponse(
-                json.dumps({
-                    "exito": False,
-                    "error": "Parámetros 'origen' y 'destino' no pueden estar vacíos",
-                    "valores_normalizados": {
-                        "origen_normalizado": origen,
-                        "destino_normalizado": destino,
-                        "origen_original": body.get("origen"),
-                        "destino_original": body.get("destino")
-                    },
-                    "problema": "Los valores están vacíos o contienen solo espacios en blanco",
-                    "ejemplo": {
-                        "origen": "archivo1.txt",
-                        "destino": "archivo2.txt",
-                        "overwrite": False
-                    }
-                }, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=400
-            )
-
-        # ✅ VALIDACIÓN INDIVIDUAL: Mensajes específicos para cada parámetro faltante
-        if not origen:
-            return func.HttpResponse(
-                json.dumps({
-                    "exito": False,
-                    "error": "Parámetro 'origen' es requerido y no puede estar vacío",
-                    "destino_recibido": destino,
-                    "origen_problema": f"Valor recibido: '{body.get('origen')}' -> normalizado: '{origen}'"
-                }, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=400
-            )
-
-        if not destino:
-            return func.HttpResponse(
-                json.dumps({
-                    "exito": False,
-                    "error": "Parámetro 'destino' es requerido y no puede estar vacío",
-                    "origen_recibido": origen,
-                    "destino_problema": f"Valor recibido: '{body.get('destino')}' -> normalizado: '{destino}'"
-                }, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=400
-            )
-
-        # ✅ VALIDACIÓN LÓGICA: Verificar que origen y destino sean diferentes
-        if origen == destino:
-            return func.HttpResponse(
-                json.dumps({
-                    "exito": False,
-                    "error": "Origen y destino no pueden ser el mismo archivo",
-                    "sugerencia": "Especifica un nombre diferente para el archivo de destino",
-                    "valores_recibidos": {
-                        "origen": origen,
-                        "destino": destino
-                    }
-                }, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=400
-            )
-
-        # ✅ EJECUCIÓN: Ahora que tenemos valores válidos, ejecutar la copia
-        try:
-            res = copiar_archivo(origen, destino, overwrite=overwrite)
-
-            # If failed because file exists, suggest using overwrite=true
-            if not res.get("exito") and "ya existe" in str(res.get("error", "")).lower():
-                res["sugerencia"] = "El archivo de destino ya existe. Usa 'overwrite': true para sobrescribirlo"
-                res["accion_sugerida"] = {
-                    "endpoint": "/api/copiar-archivo",
-                    "payload": {
-                        "origen": origen,
-                        "destino": destino,
-                        "overwrite": True
-                    },
-                    "descripcion": f"Copiar '{origen}' a '{destino}' sobrescribiendo el archivo existente"
-                }
-
-            # Aplicar memoria Cosmos y memoria manual DESPUES DE ULTIMA RESPUESTA
-            res = aplicar_memoria_cosmos_directo(req, res)
-            res = aplicar_memoria_manual(req, res)
-
-            # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
-            logging.info(
-                f"💾 Registering call for copiar_archivo: success={res.get('exito', False)}, endpoint=/api/copiar-archivo")
-            memory_service.registrar_llamada(
-                source="copiar_archivo",
-                endpoint="/api/copiar-archivo",
-                method=req.method,
-                params={"session_id": req.headers.get(
-                    "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
-                response_data=res,
-                success=res.get("exito", False)
-            )
-
-            # Determine appropriate status code
-            status_code = 200
-            if res.get("exito") and "creado" in str(res.get("mensaje", "")).lower():
-                status_code = 201
-
-            return func.HttpResponse(
-                json.dumps(res, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=status_code if res.get("exito") else 400
-            )
-
-        except FileNotFoundError as e:
-            return func.HttpResponse(
-                json.dumps({
-                    "exito": False,
-                    "error": f"Archivo no encontrado: {str(e)}",
-                    "origen": origen,
-                    "destino": destino
-                }, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=404
-            )
-
-    except Exception as e:
-        logging.exception("copiar_archivo_http failed")
-        return func.HttpResponse(
-            json.dumps({
-                "exito": False,
-                "error": f"Error inesperado: {str(e)}",
-                "tipo_error": type(e).__name__
-            }, ensure_ascii=False),
-            mimetype="application/json",
-            status_code=500
-        )
-
-# ---------- preparar-script (descarga desde Blob a /tmp) ----------
-
-
-def _scripts_tmp_dir() -> Path:
-    # /tmp es writable en Linux consumption
-    base = Path(os.environ.get("TMPDIR") or "/tmp") / "copiloto-scripts"
-    return base
-
-
-def preparar_script_desde_blob(ruta_blob: str) -> dict:
-    try:
-        if not ruta_blob:
-            return {"exito": False, "error": "Falta ruta_blob"}
-        if not IS_AZURE:
-            ruta_blob = ruta_blob.strip().replace("\\", "/")
-            if not ruta_blob.startswith("scripts/"):
-                ruta_blob = f"scripts/{ruta_blob}"
-            p = PROJECT_ROOT / ruta_blob
-            return {"exito": p.exists(), "local_path": str(p)}
-
-        client = get_blob_client()
-        if not client:
-            return {"exito": False, "error": "Blob Storage no configurado"}
-        c = client.get_container_client(CONTAINER_NAME)
-        b = c.get_blob_client(ruta_blob)
-        if not b.exists():
-            return {"exito": False, "error": f"No existe en Blob: {ruta_blob}"}
-
-        local_dir = _scripts_tmp_dir()
-        # ✅ crear en /tmp en tiempo de ejecución
-        local_dir.mkdir(parents=True, exist_ok=True)
-        local = local_dir / Path(ruta_blob).name
-        raw = b.download_blob().readall()
-        local.write_bytes(raw)
-        try:
-            os.chmod(local, 0o755)
-        except Exception:
-            pass
-        return {"exito": True, "local_path": str(local)}
-    except Exception as e:
-        return {"exito": False, "error": str(e)}
-
-
-def render_tool_response(status_code: int, payload: dict) -> str:
-    """Renderiza respuestas de herramientas de forma semántica para el agente"""
-    if not isinstance(payload, dict):
-        payload = {}
-
-    if status_code == 200:
-        if payload.get("exito") or payload.get("ok"):
-            return f"✅ Operación exitosa: {payload.get('mensaje', 'Completado correctamente')}"
-        else:
-            return f"ℹ️ Información: {payload.get('mensaje', 'Operación procesada')}"
-    elif status_code == 201:
-        return f"✅ Recurso creado exitosamente: {payload.get('mensaje', 'Nuevo recurso disponible')}"
-    elif status_code == 400:
-        error_msg = payload.get('error', 'Solicitud incorrecta')
-        return f"❌ Error de solicitud: {error_msg}"
-    elif status_code == 401:
-        return f"🔒 Error de autenticación: {payload.get('error', 'Credenciales requeridas')}"
-    elif status_code == 403:
-        return f"🚫 Error de permisos: {payload.get('error', 'Acceso denegado')}"
-    elif status_code == 404:
-        return f"🔍 No encontrado: {payload.get('error', 'Recurso no existe')}"
-    elif status_code == 409:
-        return f"⚠️ Conflicto: {payload.get('error', 'El recurso ya existe')}"
-    elif status_code == 500:
-        return f"💥 Error interno: {payload.get('error', 'Error del servidor')}"
-    else:
-        return f"ℹ️ Status {status_code}: {payload.get('error', payload.get('mensaje', 'Respuesta del servidor'))}"
-
-
-@app.function_name(name="render_error_http")
-@app.route(route="render-error", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def render_error_http(req: func.HttpRequest) -> func.HttpResponse:
-    from memory_manual import aplicar_memoria_manual
-    from cosmos_memory_direct import consultar_memoria_cosmos_directo, aplicar_memoria_cosmos_directo
-    from services.memory_service import memory_service
-
-    # 🧠 CONSULTAR MEMORIA COSMOS DB DIRECTAMENTE
-    memoria_previa = consultar_memoria_cosmos_directo(req)
-    if memoria_previa and memoria_previa.get("tiene_historial"):
-        logging.info(
-            f"🧠 Modificar-archivo: {memoria_previa['total_interacciones']} interacciones encontradas")
-        logging.info(
-            f"📝 Historial: {memoria_previa.get('resumen_conversacion', '')[:100]}...")
-    advertencias = []
-
-    """Endpoint dedicado para renderizar errores de forma semántica"""
-    try:
-        # ✅ VALIDACIÓN DEFENSIVA: Verificar que request_body no sea None
-        request_body = req.get_body()
-        if not request_body:
-            res = {
-                "exito": False,
-                "error": "Request body is empty",
-                "response": "❌ Error: Request body is empty"
-            }
-            # Aplicar memoria Cosmos y memoria manual
-            res = aplicar_memoria_cosmos_directo(req, res)
-            res = aplicar_memoria_manual(req, res)
-
-            # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
-            # Registrar llamada en memoria después de construir la respuesta final
-            logging.info(
-                f"💾 Registering call for render_error: success={res.get('exito', False)}, endpoint=/api/render-error")
-            memory_service.registrar_llamada(
-                source="render_error",
-                endpoint="/api/render-error",
-                method=req.method,
-                params={"session_id": req.headers.get(
-                    "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
-                response_data=res,
-                success=res.get("exito", False)
-            )
-
-            return func.HttpResponse(
-                json.dumps(res, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=200
-            )
-
-        # ✅ VALIDACIÓN DEFENSIVA: Manejar JSON inválido sin causar exceptions
-        body = None
-        try:
-            body = req.get_json()
-        except (ValueError, TypeError, AttributeError) as json_error:
-            logging.warning(f"Invalid JSON in render_error_http: {json_error}")
-            res = {
-                "exito": False,
-                "error": "Invalid JSON format in request body",
-                "response": "❌ Error: Invalid JSON format in request body"
-            }
-            # Aplicar memoria Cosmos y memoria manual
-            res = aplicar_memoria_cosmos_directo(req, res)
-            res = aplicar_memoria_manual(req, res)
-
-            # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
-            # Registrar llamada en memoria después de construir la respuesta final
-            logging.info(
-                f"💾 Registering call for render_error: success={res.get('exito', False)}, endpoint=/api/render-error")
-            memory_service.registrar_llamada(
-                source="render_error",
-                endpoint="/api/render-error",
-                method=req.method,
-                params={"session_id": req.headers.get(
-                    "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
-                response_data=res,
-                success=res.get("exito", False)
-            )
-
-            return func.HttpResponse(
-                json.dumps(res, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=200
-            )
-
-        # ✅ VALIDACIÓN DEFENSIVA: Verificar que body no sea None y sea dict
-        if body is None:
-            res = {
-                "exito": False,
-                "error": "Request body could not be parsed as JSON",
-                "response": "❌ Error: Request body could not be parsed as JSON"
-            }
-            # Aplicar memoria Cosmos y memoria manual
-            res = aplicar_memoria_cosmos_directo(req, res)
-            res = aplicar_memoria_manual(req, res)
-
-            # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
-            # Registrar llamada en memoria después de construir la respuesta final
-            logging.info(
-                f"💾 Registering call for render_error: success={res.get('exito', False)}, endpoint=/api/render-error")
-            memory_service.registrar_llamada(
-                source="render_error",
-                endpoint="/api/render-error",
-                method=req.method,
-                params={"session_id": req.headers.get(
-                    "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
-                response_data=res,
-                success=res.get("exito", False)
-            )
-
-            return func.HttpResponse(
-                json.dumps(res, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=200
-            )
-
-        if not isinstance(body, dict):
-            res = {
-                "exito": False,
-                "error": "Request body must be valid JSON object",
-                "response": "❌ Error: Request body must be valid JSON object"
-            }
-            # Aplicar memoria Cosmos y memoria manual
-            res = aplicar_memoria_cosmos_directo(req, res)
-            res = aplicar_memoria_manual(req, res)
-
-            # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
-            # Registrar llamada en memoria después de construir la respuesta final
-            logging.info(
-                f"💾 Registering call for render_error: success={res.get('exito', False)}, endpoint=/api/render-error")
-            memory_service.registrar_llamada(
-                source="render_error",
-                endpoint="/api/render-error",
-                method=req.method,
-                params={"session_id": req.headers.get(
-                    "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
-                response_data=res,
-                success=res.get("exito", False)
-            )
-
-            return func.HttpResponse(
-                json.dumps(res, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=200
-            )
-
-        # ✅ VALIDACIÓN DEFENSIVA: Extraer campos con valores por defecto seguros
-        status_code = body.get("status_code")
-        if status_code is None:
-            status_code = 500
-
-        # ✅ ASEGURAR: Convertir status_code a int de forma segura
-        try:
-            status_code = int(status_code)
-        except (ValueError, TypeError):
-            status_code = 500
-
-        payload = body.get("payload")
-        if payload is None:
-            payload = {}
-
-        # ✅ ASEGURAR: payload siempre sea un diccionario válido
-        if not isinstance(payload, dict):
-            if payload is not None:
-                payload = {"error": str(payload)}
-            else:
-                payload = {"error": "Unknown error"}
-
-        # ✅ VALIDACIÓN DEFENSIVA: Verificar que payload tenga al menos un campo error
-        if not payload.get("error") and not payload.get("message"):
-            payload["error"] = "No error details provided"
-
-        # ✅ RENDERIZACIÓN DEFENSIVA: Manejar errores en render_tool_response
-        semantic_response = None
-        try:
-            # Verificar que render_tool_response esté disponible
-            if 'render_tool_response' in globals() and callable(render_tool_response):
-                semantic_response = render_tool_response(status_code, payload)
-            else:
-                logging.warning("render_tool_response function not available")
-                semantic_response = None
-
-        except Exception as render_error:
-            logging.warning(f"Error in render_tool_response: {render_error}")
-            semantic_response = None
-
-        # ✅ FALLBACK SEGURO: Si render_tool_response falla, usar formato manual
-        if semantic_response is None:
-            error_msg = payload.get("error", payload.get(
-                "message", "Error desconocido"))
-            if status_code >= 500:
-                semantic_response = f"💥 Error interno: {error_msg}"
-            elif status_code >= 400:
-                semantic_response = f"❌ Error de solicitud: {error_msg}"
-            else:
-                semantic_response = f"ℹ️ Respuesta ({status_code}): {error_msg}"
-
-        # ✅ VALIDACIÓN FINAL: Asegurar que semantic_response no sea None
-        if semantic_response is None or not isinstance(semantic_response, str):
-            semantic_response = f"❌ Error procesando respuesta: {payload.get('error', 'Error desconocido')}"
-
-        res = {
-            "exito": True,
-            "response": semantic_response,
-            "status_code": status_code,
-            "payload": payload
-        }
-
-        # Aplicar memoria Cosmos y memoria manual
-        res = aplicar_memoria_cosmos_directo(req, res)
-        res = aplicar_memoria_manual(req, res)
-
-        # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
-        # Registrar llamada en memoria después de construir la respuesta final
-        logging.info(
-            f"💾 Registering call for render_error: success={res.get('exito', False)}, endpoint=/api/render-error")
-        memory_service.registrar_llamada(
-            source="render_error",
-            endpoint="/api/render-error",
-            method=req.method,
-            params={"session_id": req.headers.get(
-                "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
-            response_data=res,
-            success=res.get("exito", False)
-        )
-
-        return func.HttpResponse(
-            json.dumps(res, ensure_ascii=False),
-            mimetype="application/json",
-            status_code=200  # Siempre 200 para que el agente pueda leer la respuesta
-        )
-
-    except Exception as e:
-        logging.exception("render_error_http failed with unexpected error")
-        # ✅ FALLBACK ULTRA-SEGURO: Garantizar que siempre se devuelva una respuesta válida
-        try:
-            error_message = str(e) if e else "Unknown exception"
-            res = {
-                "exito": False,
-                "error": f"Error crítico de renderizado: {error_message}",
-                "response": f"❌ Error crítico: No se pudo procesar la respuesta"
-            }
-            # Aplicar memoria Cosmos y memoria manual
-            res = aplicar_memoria_cosmos_directo(req, res)
-            res = aplicar_memoria_manual(req, res)
-
-            # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
-            # Registrar llamada en memoria después de construir la respuesta final
-            logging.info(
-                f"💾 Registering call for render_error: success={res.get('exito', False)}, endpoint=/api/render-error")
-            memory_service.registrar_llamada(
-                source="render_error",
-                endpoint="/api/render-error",
-                method=req.method,
-                params={"session_id": req.headers.get(
-                    "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
-                response_data=res,
-                success=res.get("exito", False)
-            )
-
-            return func.HttpResponse(
-                json.dumps(res, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=200
-            )
-        except:
-            # Último recurso si incluso el fallback falla
-            return func.HttpResponse(
-                json.dumps({
-                    "exito": False,
-                    "error": "Error crítico: No se pudo procesar la respuesta",
-                    "response": "❌ Error crítico: No se pudo procesar la respuesta"
-                }),
-                mimetype="application/json",
-                status_code=200
-            )
-
-
-def debug_auth_environment():
-    """Debug completo del entorno de autenticación"""
-    env_vars = {
-        'IDENTITY_ENDPOINT': os.getenv('IDENTITY_ENDPOINT'),
-        'WEBSITE_INSTANCE_ID': os.getenv('WEBSITE_INSTANCE_ID'),
-        'AZURE_CLIENT_ID': 'SET' if os.getenv('AZURE_CLIENT_ID') else 'NOT SET',
-        'FUNCTIONS_WORKER_RUNTIME': os.getenv('FUNCTIONS_WORKER_RUNTIME')
-    }
-    az_available = shutil.which("az") is not None
-    auth_status = "UNKNOWN"
-    try:
-        result = subprocess.run(
-            ['az', 'account', 'show'],
-            capture_output=True, text=True, timeout=10
-        )
-        if result.returncode == 0:
-            account_info = json.loads(result.stdout)
-            auth_status = f"AUTHENTICATED - Type: {account_info.get('user', {}).get('type', 'unknown')}"
-        else:
-            auth_status = f"NOT_AUTHENTICATED - Error: {result.stderr}"
-    except Exception as e:
-        auth_status = f"CHECK_FAILED - {str(e)}"
-    return {
-        "environment_vars": env_vars,
-        "az_cli_available": az_available,
-        "authentication_status": auth_status
-    }
-
-
-@app.function_name(name="gestionar_despliegue_http")
-@app.route(route="gestionar-despliegue", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def gestionar_despliegue_http(req: func.HttpRequest) -> func.HttpResponse:
-    from memory_manual import aplicar_memoria_manual
-    from cosmos_memory_direct import consultar_memoria_cosmos_directo, aplicar_memoria_cosmos_directo
-    from services.memory_service import memory_service
-
-    # 🧠 CONSULTAR MEMORIA COSMOS DB DIRECTAMENTE
-    memoria_previa = consultar_memoria_cosmos_directo(req)
-    if memoria_previa and memoria_previa.get("tiene_historial"):
-        logging.info(
-            f"🧠 Modificar-archivo: {memoria_previa['total_interacciones']} interacciones encontradas")
-        logging.info(
-            f"📝 Historial: {memoria_previa.get('resumen_conversacion', '')[:100]}...")
-    advertencias = []
-
-    """🚀 ENDPOINT ROBUSTO Y SEMÁNTICO PARA GESTIÓN DE DESPLIEGUES
-    
-    Sistema completamente adaptativo que acepta cualquier formato de payload y se adapta
-    dinámicamente sin rechazar requests por condiciones predefinidas.
-    
-    Características:
-    - ✅ Validador dinámico que acepta múltiples formatos
-    - ✅ Detección automática de acción, entorno, target
-    - ✅ Respuestas estructuradas con sugerencias adaptativas
-    - ✅ Compatible con Foundry, CodeGPT, CLI sin conflictos
-    - ✅ Tolerante al desorden de parámetros
-    - ✅ Manejo de errores que guía a agentes para autocorrección
-    """
-
-    import json
-    import traceback
-
-    endpoint = "/api/gestionar-despliegue"
-    method = "POST"
-    run_id = get_run_id(req)
-
-    try:
-        # === PASO 1: EXTRACCIÓN ULTRA-FLEXIBLE DEL PAYLOAD ===
-        body = extraer_payload_robusto(req)
-
-        logging.info(f"[{run_id}] Payload extraído: keys={list(body.keys())}")
-
-        # === PASO 2: RESOLUCIÓN SEMÁNTICA DE COMANDO ===
-        accion, parametros, alias_usado = resolver_accion_semantica(body)
-
-        logging.info(
-            f"[{run_id}] Comando resuelto: accion={accion}, alias={alias_usado}")
-
-        # === PASO 3: EJECUCIÓN ROBUSTA ===
-        resultado = ejecutar_accion_robusta(accion, parametros, run_id)
-
-        # === PASO 4: CONSTRUIR RESPUESTA ===
-        response_data = {
-            "exito": True,
-            "accion_ejecutada": accion,
-            "alias_usado": alias_usado,
-            "resultado": resultado,
-            "metadata": {
-                "run_id": run_id,
-                "endpoint": endpoint,
-                "timestamp": datetime.now().isoformat(),
-                "version_sistema": "robusto_v2.0"
-            },
-            "proximas_acciones": resultado.get("proximas_acciones", [
-                "Verificar estado del sistema",
-                "Monitorear logs de la aplicación"
-            ])
-        }
-
-        # Aplicar memoria Cosmos y memoria manual
-        response_data = aplicar_memoria_cosmos_directo(req, response_data)
-        response_data = aplicar_memoria_manual(req, response_data)
-
-        # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
-        # Registrar llamada en memoria después de construir la respuesta final
-        logging.info(
-            f"💾 Registering call for gestionar_despliegue: success={response_data.get('exito', False)}, endpoint=/api/gestionar-despliegue")
-        memory_service.registrar_llamada(
-            source="gestionar_despliegue",
-            endpoint="/api/gestionar-despliegue",
-            method=req.method,
-            params={"session_id": req.headers.get(
-                "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
-            response_data=response_data,
-            success=response_data.get("exito", False)
-        )
-
-        # === PASO 5: RESPUESTA SIEMPRE EXITOSA ===
-        return func.HttpResponse(
-            json.dumps(response_data, ensure_ascii=False, indent=2),
-            mimetype="application/json",
-            status_code=200
-        )
-
-    except Exception as e:
-        logging.error(
-            f"[{run_id}] Error crítico en gestionar_despliegue: {str(e)}")
-        logging.error(f"[{run_id}] Traceback: {traceback.format_exc()}")
-
-        # Construir respuesta de error
-        error_response_data = {
-            "exito": True,  # SIEMPRE TRUE para compatibilidad con agentes
-            "accion_ejecutada": "error_recovery",
-            "alias_usado": None,
-            "resultado": {
-                "tipo": "error_critico",
-                "mensaje": f"Error del sistema: {str(e)}",
-                "sugerencias": [
-                    "Verificar logs del sistema",
-                    "Reintentar con payload simplificado",
-                    "Usar acción 'detectar' como fallback"
-                ],
-                "fallback_ejecutado": True
-            },
-            "metadata": {
-                "run_id": run_id,
-                "endpoint": endpoint,
-                "timestamp": datetime.now().isoformat(),
-                "error_type": type(e).__name__
-            }
-        }
-
-        # Aplicar memoria Cosmos y memoria manual
-        error_response_data = aplicar_memoria_cosmos_directo(
-            req, error_response_data)
-        error_response_data = aplicar_memoria_manual(req, error_response_data)
-
-        # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
-        # Registrar llamada en memoria después de construir la respuesta final
-        logging.info(
-            f"💾 Registering call for gestionar_despliegue: success={error_response_data.get('exito', False)}, endpoint=/api/gestionar-despliegue")
-        memory_service.registrar_llamada(
-            source="gestionar_despliegue",
-            endpoint="/api/gestionar-despliegue",
-            method=req.method,
-            params={"session_id": req.headers.get(
-                "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
-            response_data=error_response_data,
-            success=error_response_data.get("exito", False)
-        )
-
-        # Incluso errores críticos retornan éxito con información del error
-        return func.HttpResponse(
-            json.dumps(error_response_data, ensure_ascii=False, indent=2),
-            mimetype="application/json",
-            status_code=200  # SIEMPRE 200 para compatibilidad
-        )
-
-
-# === FUNCIONES DE SOPORTE INTEGRADAS ===
-
-def extraer_payload_robusto(req: func.HttpRequest) -> dict:
-    """Extrae payload de forma ultra-flexible, nunca falla"""
-    try:
-        # Intentar JSON estándar
-        body = req.get_json()
-        if body and isinstance(body, dict):
-            return body
-    except:
-        pass
-
-    try:
-        # Intentar raw body
-        raw_body = req.get_body().decode('utf-8')
-        if raw_body.strip():
-            return json.loads(raw_body)
-    except:
-        pass
-
-    try:
-        # Query parameters
-        params = dict(req.params)
-        if params:
-            return params
-    except:
-        pass
-
-    # Fallback: payload vacío
-    return {}
-
-
-def resolver_accion_semantica(body: dict) -> tuple:
-    """Resuelve acción de forma semántica con alias completos"""
-
-    # Mapeo completo de alias
-    alias_map = {
-        "deploy": "desplegar",
-        "validate": "preparar",
-        "prepare": "preparar",
-        "build": "preparar",
-        "detect": "detectar",
-        "check": "detectar",
-        "status": "estado",
-        "info": "estado",
-        "rollback": "rollback",
-        "revert": "rollback",
-        "update": "actualizar",
-        "upgrade": "actualizar",
-        "restart": "reiniciar",
-        "reboot": "reiniciar"
-    }
-
-    # Buscar acción en múltiples campos
-    accion_raw = None
-    alias_usado = None
-
-    for campo in ["accion", "action", "comando", "command", "operacion", "operation", "tipo", "type"]:
-        if campo in body and body[campo]:
-            accion_raw = str(body[campo]).lower().strip()
-            break
-
-    # Deducción inteligente si no hay acción explícita
-    if not accion_raw:
-        if body.get("tag") or body.get("version"):
-            accion_raw = "desplegar"
-        elif body.get("tag_anterior") or body.get("previous_version"):
-            accion_raw = "rollback"
-        elif any(key in body for key in ["preparar", "build", "compile"]):
-            accion_raw = "preparar"
-        else:
-            accion_raw = "detectar"  # Acción por defecto
-
-    # Resolver alias
-    if accion_raw in alias_map:
-        alias_usado = accion_raw
-        accion_final = alias_map[accion_raw]
-    else:
-        accion_final = accion_raw
-
-    # Extraer parámetros de forma flexible
-    parametros = {
-        "tag": body.get("tag") or body.get("version") or body.get("v"),
-        "tag_anterior": body.get("tag_anterior") or body.get("previous_version") or body.get("prev"),
-        "plataforma": body.get("plataforma") or body.get("platform") or body.get("target"),
-        "agente": body.get("agente") or body.get("agent") or body.get("client"),
-        "configuracion": body.get("configuracion") or body.get("config") or body.get("settings"),
-        "cambios": body.get("cambios") or body.get("changes"),
-        "forzar": body.get("forzar") or body.get("force") or body.get("f", False),
-        "timeout": body.get("timeout") or body.get("timeout_s") or 300
-    }
-
-    # Limpiar parámetros None
-    parametros = {k: v for k, v in parametros.items() if v is not None}
-
-    return accion_final, parametros, alias_usado
-
-
-def ejecutar_accion_robusta(accion: str, parametros: dict, run_id: str) -> dict:
-    """Ejecuta cualquier acción de forma robusta, nunca falla"""
-
-    try:
-        if accion == "detectar":
-            return ejecutar_detectar_simple(parametros)
-        elif accion == "preparar":
-            return ejecutar_preparar_simple(parametros)
-        elif accion == "desplegar":
-            return ejecutar_desplegar_simple(parametros)
-        elif accion == "rollback":
-            return ejecutar_rollback_simple(parametros)
-        elif accion == "estado":
-            return ejecutar_estado_simple(parametros)
-        elif accion == "actualizar":
-            return ejecutar_actualizar_simple(parametros)
-        elif accion == "reiniciar":
-            return ejecutar_reiniciar_simple(parametros)
-        else:
-            # Cualquier acción no reconocida usa detectar
-            logging.warning(
-                f"[{run_id}] Acción '{accion}' no reconocida, usando 'detectar'")
-            return ejecutar_detectar_simple(parametros)
-
-    except Exception as e:
-        logging.error(f"[{run_id}] Error ejecutando {accion}: {str(e)}")
-        # Fallback universal
-        return {
-            "tipo": "fallback",
-            "accion_original": accion,
-            "mensaje": f"Acción {accion} procesada con fallback",
-            "error_original": str(e),
-            "sugerencias": [
-                "La acción se procesó pero con limitaciones",
-                "Verificar parámetros si es necesario",
-                "Usar 'detectar' para verificar estado"
-            ],
-            "proximas_acciones": [
-                "Verificar estado del sistema",
-                "Revisar logs si es necesario"
-            ]
-        }
-
-
-def ejecutar_detectar_simple(parametros: dict) -> dict:
-    """Detecta estado actual de forma simple"""
-    import hashlib
-    import shutil
-    from pathlib import Path
-
-    # Buscar function_app.py
-    function_app_path = Path("function_app.py")
-    if not function_app_path.exists():
-        function_app_path = Path("/home/site/wwwroot/function_app.py")
-
-    hash_actual = "no_calculado"
-    if function_app_path.exists():
-        try:
-            with open(function_app_path, "r", encoding='utf-8') as f:
-                contenido = f.read()
-                hash_actual = hashlib.sha256(
-                    contenido.encode()).hexdigest()[:8]
-        except:
-            hash_actual = "error_lectura"
-
-    return {
-        "tipo": "deteccion",
-        "archivo_verificado": str(function_app_path),
-        "hash_funcion": hash_actual,
-        "herramientas_disponibles": {
-            "az_cli": shutil.which("az") is not None,
-            "docker": shutil.which("docker") is not None,
-            "git": shutil.which("git") is not None
-        },
-        "mensaje": f"Detección completada. Hash: {hash_actual}",
-        "proximas_acciones": [
-            "preparar - para generar script de despliegue",
-            "estado - para verificar estado actual"
-        ]
-    }
-
-
-def ejecutar_preparar_simple(parametros: dict) -> dict:
-    """Prepara script de despliegue"""
-    tag = parametros.get("tag", "v1.0.0")
-
-    script_content = f"""#!/bin/bash
-# Script de despliegue - Version: {tag}
-# Generado: {datetime.now().isoformat()}
-
-VERSION={tag}
-echo "Desplegando version $VERSION"
-
-docker build -t copiloto-func-azcli:$VERSION .
-docker tag copiloto-func-azcli:$VERSION boatrentalacr.azurecr.io/copiloto-func-azcli:$VERSION
-az acr login -n boatrentalacr
-docker push boatrentalacr.azurecr.io/copiloto-func-azcli:$VERSION
-
-echo "Imagen subida. Llamar /api/gestionar-despliegue con accion=desplegar y tag=$VERSION"
-"""
-
-    return {
-        "tipo": "preparacion",
-        "version": tag,
-        "script_generado": True,
-        "script_content": script_content,
-        "mensaje": f"Script preparado para versión {tag}",
-        "proximas_acciones": [
-            f"Ejecutar script generado",
-            f"Desplegar con tag {tag}"
-        ]
-    }
-
-
-def ejecutar_desplegar_simple(parametros: dict) -> dict:
-    """Ejecuta despliegue"""
-    tag = parametros.get("tag", "latest")
-
-    comandos = [
-        f"docker build -t copiloto-func-azcli:{tag} .",
-        f"docker tag copiloto-func-azcli:{tag} boatrentalacr.azurecr.io/copiloto-func-azcli:{tag}",
-        "az acr login -n boatrentalacr",
-        f"docker push boatrentalacr.azurecr.io/copiloto-func-azcli:{tag}"
-    ]
-
-    return {
-        "tipo": "despliegue",
-        "tag": tag,
-        "comandos_planificados": comandos,
-        "mensaje": f"Despliegue de {tag} planificado exitosamente",
-        "proximas_acciones": [
-            "Verificar estado después del despliegue",
-            "Monitorear logs de la aplicación"
-        ]
-    }
-
-
-def ejecutar_rollback_simple(parametros: dict) -> dict:
-    """Ejecuta rollback"""
-    tag_anterior = parametros.get("tag_anterior")
-
-    if not tag_anterior:
-        return {
-            "tipo": "rollback_error",
-            "mensaje": "Rollback requiere especificar tag_anterior",
-            "sugerencias": [
-                "Agregar parámetro 'tag_anterior'",
-                "Ejemplo: {'accion': 'rollback', 'tag_anterior': 'v1.2.2'}"
-            ],
-            "proximas_acciones": [
-                "Especificar tag_anterior",
-                "Verificar versiones disponibles"
-            ]
-        }
-
-    return {
-        "tipo": "rollback",
-        "tag_anterior": tag_anterior,
-        "comandos_rollback": [
-            f"az functionapp config container set -g boat-rental-app-group -n copiloto-semantico-func-us2 --docker-custom-image-name boatrentalacr.azurecr.io/copiloto-func-azcli:{tag_anterior}",
-            "az functionapp restart -g boat-rental-app-group -n copiloto-semantico-func-us2"
-        ],
-        "mensaje": f"Rollback a {tag_anterior} planificado",
-        "proximas_acciones": [
-            "Verificar estado después del rollback",
-            "Monitorear logs de la aplicación"
-        ]
-    }
-
-
-def ejecutar_estado_simple(parametros: dict) -> dict:
-    """Obtiene estado del sistema"""
-    import shutil
-
-    return {
-        "tipo": "estado",
-        "timestamp": datetime.now().isoformat(),
-        "herramientas": {
-            "az_cli": shutil.which("az") is not None,
-            "docker": shutil.which("docker") is not None,
-            "git": shutil.which("git") is not None
-        },
-        "ambiente": "Azure" if os.environ.get("WEBSITE_SITE_NAME") else "Local",
-        "function_app": os.environ.get("WEBSITE_SITE_NAME", "local"),
-        "mensaje": "Estado del sistema obtenido exitosamente",
-        "proximas_acciones": [
-            "detectar - para verificar cambios",
-            "preparar - para generar script"
-        ]
-    }
-
-
-def ejecutar_actualizar_simple(parametros: dict) -> dict:
-    """Actualiza configuración"""
-    agente = parametros.get("agente", "sistema")
-    configuracion = parametros.get("configuracion", {})
-    cambios = parametros.get("cambios", {})
-
-    return {
-        "tipo": "actualizacion",
-        "agente": agente,
-        "configuracion_aplicada": configuracion,
-        "cambios_aplicados": cambios,
-        "mensaje": f"Configuración actualizada para {agente}",
-        "proximas_acciones": [
-            "Verificar cambios con 'detectar'",
-            "Desplegar si es necesario"
-        ]
-    }
-
-
-def ejecutar_reiniciar_simple(parametros: dict) -> dict:
-    """Reinicia servicios"""
-    return {
-        "tipo": "reinicio",
-        "mensaje": "Reinicio planificado exitosamente",
-        "comando_sugerido": "az functionapp restart -g boat-rental-app-group -n copiloto-semantico-func-us2",
-        "proximas_acciones": [
-            "Verificar estado después del reinicio",
-            "Monitorear logs de la aplicación"
-        ]
-    }
-
-
-def _run_az(args, timeout=30):
-    """Ejecuta comandos Azure CLI con encoding UTF-8 forzado"""
-    az_bin = shutil.which("az.cmd") or shutil.which("az") or "az"
-
-    # Si el ejecutable es az.cmd, no repitas "az" en args
-    if az_bin.endswith("az.cmd") and args and args[0] == "az":
-        args = args[1:]
-
-    # Forzar entorno UTF-8
-    env = os.environ.copy()
-    env['PYTHONIOENCODING'] = 'utf-8'
-    env['LANG'] = 'en_US.UTF-8'
-
-    try:
-        result = subprocess.run(
-            [az_bin] + args,
-            capture_output=True,
-            text=True,
-            timeout=timeout,
-            encoding='utf-8',      # 👈 Forzar UTF-8
-            errors='replace',      # 👈 Reemplazar caracteres inválidos
-            env=env               # 👈 Pasar variables de entorno
-        )
-        return result
-    except Exception as e:
-        logging.error(f"Error ejecutando az CLI: {e}")
-        raise
-
-
-def _run_docker(command, timeout=300):
-    """Ejecuta comandos Docker con encoding UTF-8"""
-    # Forzar entorno UTF-8
-    env = os.environ.copy()
-    env['PYTHONIOENCODING'] = 'utf-8'
-    env['LANG'] = 'en_US.UTF-8'
-
-    try:
-        result = subprocess.run(
-            command,
-            shell=True,
-            capture_output=True,
-            text=True,
-            timeout=timeout,
-            encoding='utf-8',      # 👈 Forzar UTF-8
-            errors='replace',      # 👈 Reemplazar caracteres inválidos
-            env=env
-        )
-        return result
-    except Exception as e:
-        logging.error(f"Error ejecutando: {e}")
-        raise
-
-
-def ensure_mi_login():
-    """
-    Autenticación inteligente:
-    - PRIORIDAD 1: Managed Identity (en Azure)
-    - PRIORIDAD 2: Sesión ya iniciada
-    - PRIORIDAD 3: Service Principal (local)
-    - PRIORIDAD 4: Login interactivo (evitado)
-    """
-    def run_az(args):
-        az_bin = shutil.which("az.cmd") or shutil.which("az") or "az"
-        return subprocess.run(
-            [az_bin] + args,
-            capture_output=True,
-            text=True,
-            timeout=30,
-            encoding="utf-8",    # 👈 forzar utf-8
-            errors="replace"     # 👈 evita que se rompa con caracteres raros
-        )
-
-    env = {
-        "IDENTITY_ENDPOINT": os.getenv("IDENTITY_ENDPOINT"),
-        "WEBSITE_INSTANCE_ID": os.getenv("WEBSITE_INSTANCE_ID"),
-        "AZURE_CLIENT_ID": os.getenv("AZURE_CLIENT_ID"),
-        "FUNCTIONS_WORKER_RUNTIME": os.getenv("FUNCTIONS_WORKER_RUNTIME")
-    }
-
-    # 🔹 Prioridad 1: Managed Identity (si detectamos que estamos en Azure)
-    if env["IDENTITY_ENDPOINT"] or env["WEBSITE_INSTANCE_ID"]:
-        logging.info(
-            "🔐 Azure environment detectado. Probando Managed Identity...")
-        try:
-            result = run_az(["account", "show"])
-            if result.returncode == 0:
-                user = json.loads(result.stdout).get("user", {}).get("type")
-                if user == "managedIdentity":
-                    logging.info("✅ Ya autenticado con Managed Identity")
-                    return True
-            mi_result = run_az(
-                ["login", "--identity", "--allow-no-subscriptions"])
-            if mi_result.returncode == 0:
-                logging.info("✅ Autenticado con Managed Identity")
-                return True
-            logging.warning(f"⚠️ Falló MI: {mi_result.stderr}")
-        except Exception as e:
-            logging.warning(f"⚠️ Error en MI: {str(e)}")
-
-    # 🔹 Prioridad 2: Ya autenticado
-    try:
-        result = run_az(["account", "show"])
-        if result.returncode == 0:
-            logging.info("✅ Ya autenticado en Azure CLI")
-            return True
-    except Exception as e:
-        logging.warning(f"⚠️ Error verificando autenticación: {str(e)}")
-
-    # 🔹 Prioridad 3: Service Principal
-    client_id = os.getenv("AZURE_CLIENT_ID")
-    client_secret = os.getenv("AZURE_CLIENT_SECRET")
-    tenant_id = os.getenv("AZURE_TENANT_ID")
-    if client_id and client_secret and tenant_id:
-        logging.info("🔐 Intentando login con Service Principal")
-        try:
-            sp_result = run_az([
-                "login", "--service-principal",
-                "-u", client_id, "-p", client_secret,
-                "--tenant", tenant_id, "--allow-no-subscriptions"
-            ])
-            if sp_result.returncode == 0:
-                logging.info("✅ Login SP exitoso")
-                return True
-            logging.warning(f"⚠️ Falló SP: {sp_result.stderr}")
-        except Exception as e:
-            logging.warning(f"⚠️ Error SP: {str(e)}")
-
-    # 🔹 Fallback interactivo → NO usado en backend
-    logging.warning(
-        "🚨 No hay credenciales automáticas, requiere login interactivo")
-    return False
-
-
-# Usar la función is_running_in_azure ya definida más abajo
-
-def _buscar_en_memoria(campo_faltante: str) -> Optional[str]:
-    """Busca valor faltante en memoria de Cosmos"""
-
-    try:
-        from services.semantic_memory import obtener_estado_sistema
-        CosmosMemoryStore = None
-        try:
-            from services.cosmos_store import CosmosMemoryStore
-        except ImportError:
-            pass
-        estado_resultado = obtener_estado_sistema(48)  # Últimas 48h
-
-        if estado_resultado.get("exito"):
-            # Buscar en interacciones recientes
-            if CosmosMemoryStore:
-                cosmos = CosmosMemoryStore()
-                if not cosmos.enabled or not cosmos.container:
-                    return None
-                query = f"SELECT * FROM c WHERE CONTAINS(LOWER(c.response_data), '{campo_faltante.lower()}') ORDER BY c.timestamp DESC OFFSET 0 LIMIT 5"
-                items = list(cosmos.container.query_items(
-                    query, enable_cross_partition_query=True))
-            else:
-                return None
-
-            for item in items:
-                response_data = item.get("response_data", {})
-                if isinstance(response_data, dict):
-                    # Buscar patrones comunes
-                    if campo_faltante == "resourceGroup" and "resourceGroup" in str(response_data):
-                        return "boat-rental-app-group"  # Valor por defecto detectado
-                    elif campo_faltante == "location" and "location" in str(response_data):
-                        return "eastus"
-        return None
-    except Exception:
-        return None
-
-
-def _resolve_windows_absolute_path(raw_path: str, root_path: Path) -> Optional[Path]:
-    r"""
-    Convierte rutas absolutas estilo Windows (C:\...) a rutas dentro del proyecto actual.
-    Permite ejecutar comandos que envían rutas de su máquina local dentro de entornos Linux.
-    """
-    if not raw_path:
-        return None
-
-    import re
-
-    sanitized = re.sub(r'^[a-zA-Z]:[\\/]+', '', raw_path)
-    sanitized = sanitized.lstrip("\\/")
-    if not sanitized:
-        return None
-
-    parts = [p for p in re.split(r'[\\/]+', sanitized) if p]
-    if not parts:
-        return None
-
-    for idx in range(len(parts)):
-        candidate = root_path.joinpath(*parts[idx:])
-        if candidate.exists():
-            return candidate
-    return None
-
-
-def _locate_file_in_root(path_candidate: str, root_path: Path) -> Optional[Path]:
-    """
-    Busca un archivo dentro del root del proyecto considerando rutas absolutas,
-    rutas Windows provenientes del cliente y rutas relativas con subdirectorios.
-    """
-    if not path_candidate:
-        return None
-
-    import re
-
-    normalized = path_candidate.replace('/', os.sep).replace('\\', os.sep)
-    windows_absolute = bool(re.match(r'^[a-zA-Z]:[\\/]', path_candidate))
-    normalized_path = Path(normalized)
-    candidate_paths = []
-
-    # Rutas absolutas válidas (Linux/Unix)
-    if normalized_path.is_absolute() and not windows_absolute:
-        candidate_paths.append(normalized_path)
-
-    # Intentar mapear rutas absolutas de Windows
-    if windows_absolute:
-        candidate_paths.append(Path(path_candidate))
-        candidate_paths.append(normalized_path)
-        mapped = _resolve_windows_absolute_path(path_candidate, root_path)
-        if mapped:
-            candidate_paths.append(mapped)
-
-    # Interpretar como ruta relativa directa desde root
-    candidate_paths.append(root_path / normalized_path)
-
-    for candidate in candidate_paths:
-        try:
-            if candidate and candidate.exists():
-                return candidate
-        except Exception:
-            continue
-
-    # Búsqueda recursiva por nombre
-    filename = normalized_path.name
-    if not filename:
-        return None
-
-    try:
-        for ruta in root_path.rglob(filename):
-            if ruta.is_file():
-                return ruta
-    except Exception as e:
-        logging.warning(f"Error buscando {filename} en {root_path}: {e}")
-        return None
-
-    return None
-
-
-def _auto_resolve_file_paths(comando: str) -> str:
-    """
-    Resuelve rutas de archivos en comandos de forma robusta.
-    Convierte rutas relativas a absolutas automáticamente.
-    Busca recursivamente en subdirectorios si no encuentra en raíz.
-    """
-    if not comando:
-        return comando
-
-    import re
-    import glob
-
-    # Detectar comandos que usan archivos
-    file_commands = ['grep', 'sed', 'findstr', 'awk', 'cat', 'head',
-                     'tail', 'Get-Content', 'python', 'node', 'Select-String']
-    if not any(cmd in comando for cmd in file_commands):
-        return comando
-
-    # 🔥 FIX: Patrón mejorado que captura rutas con guiones, subdirectorios y discos de Windows
-    extensions = r'(py|js|ts|md|json|txt|sh|ps1|yml|yaml|tsx|jsx)'
-    file_pattern = re.compile(
-        rf'(?P<abs_win>[a-zA-Z]:[\\/][^\\s"\'|]+\.(?:{extensions}))|'
-        rf'(?P<rel>[a-zA-Z0-9_\-./\\]+\.(?:{extensions}))'
-    )
-    matches = []
-    for match in file_pattern.finditer(comando):
-        match_value = match.group('abs_win') or match.group('rel')
-        if match_value:
-            matches.append(match_value)
-
-    if not matches:
-        return comando
-
-    # Determinar root según entorno
-    root_path = Path("/home/site/wwwroot") if IS_AZURE else PROJECT_ROOT
-
-    for referenced_path in matches:
-        resolved_path = _locate_file_in_root(referenced_path, root_path)
-        if resolved_path:
-            logging.info(
-                f"✅ Ruta resuelta: {referenced_path} -> {resolved_path}")
-            if platform.system() == "Windows":
-                double_quoted = f'"{referenced_path}"'
-                single_quoted = f"'{referenced_path}'"
-                replacement = f'"{resolved_path}"'
-
-                if double_quoted in comando:
-                    comando = comando.replace(double_quoted, replacement)
-                elif single_quoted in comando:
-                    comando = comando.replace(
-                        single_quoted, f"'{resolved_path}'")
-                else:
-                    comando = comando.replace(referenced_path, replacement)
-            else:
-                comando = comando.replace(
-                    referenced_path, str(resolved_path).replace(' ', '\\ '))
-        else:
-            logging.warning(
-                f"⚠️ No existe (ni en raíz ni subdirectorios): {referenced_path}")
-    return comando
-
-
-def ejecutar_operacion_dinamica(cliente, operacion: str, params: list):
-    """
-    Ejecuta operaciones dinámicas usando los clientes SDK de Azure
-    Maneja operaciones comunes como list, show, create, etc.
-    """
-    # Mapeo de operaciones comunes a métodos SDK
-    if operacion == "list":
-        if hasattr(cliente, "resource_groups"):
-            # ResourceManagementClient
-            items = list(cliente.resource_groups.list())
-            return [{"name": item.name, "location": item.location, "id": item.id} for item in items]
-        elif hasattr(cliente, "storage_accounts"):
-            # StorageManagementClient
-            items = list(cliente.storage_accounts.list())
-            return [{"name": item.name, "location": item.location, "kind": item.kind} for item in items]
-        elif hasattr(cliente, "web_apps"):
-            # WebSiteManagementClient
-            items = list(cliente.web_apps.list())
-            return [{"name": item.name, "location": item.location, "state": item.state} for item in items]
-
-    elif operacion == "show" and len(params) >= 1:
-        resource_name = params[0]
-        resource_group = params[1] if len(params) >= 2 else None
-
-        if hasattr(cliente, "resource_groups") and not resource_group:
-            # ResourceManagementClient - mostrar resource group
-            item = cliente.resource_groups.get(resource_name)
-            return {
-                "name": item.name,
-                "location": item.location,
-                "id": item.id,
-                "properties": item.properties.__dict__ if item.properties else {}
-            }
-        elif hasattr(cliente, "storage_accounts") and resource_group:
-            # StorageManagementClient - mostrar storage account
-            item = cliente.storage_accounts.get_properties(
-                resource_group, resource_name)
-            return {
-                "name": item.name,
-                "location": item.location,
-                "kind": item.kind,
-                "sku": item.sku.name if item.sku else None,
-                "status": item.status_of_primary
-            }
-        elif hasattr(cliente, "web_apps") and resource_group:
-            # WebSiteManagementClient - mostrar web app
-            item = cliente.web_apps.get(resource_group, resource_name)
-            return {
-                "name": item.name,
-                "location": item.location,
-                "state": item.state,
-                "kind": item.kind,
-                "default_host_name": item.default_host_name
-            }
-
-    # Si no encuentra la operación, lanzar excepción descriptiva
-    raise NotImplementedError(
-        f"Operación '{operacion}' no implementada para este tipo de cliente")
-
-
-def generar_mensaje_natural_sdk(servicio: str, operacion: str, resultado):
-    """
-    Genera mensajes naturales basados en resultados del SDK
-    """
-    if operacion == "list":
-        if isinstance(resultado, list):
-            count = len(resultado)
-            if servicio == "group":
-                return f"✅ Encontré {count} grupos de recursos en la suscripción."
-            elif servicio == "storage":
-                return f"✅ Encontré {count} cuentas de almacenamiento en la suscripción."
-            elif servicio == "webapp":
-                return f"✅ Encontré {count} aplicaciones web en la suscripción."
-            else:
-                return f"✅ Operación list completada. {count} elementos encontrados."
-        else:
-            return "✅ Operación list completada."
-
-    elif operacion == "show":
-        if isinstance(resultado, dict):
-            nombre = resultado.get("name", "recurso")
-            ubicacion = resultado.get("location", "ubicación desconocida")
-            if servicio == "group":
-                return f"✅ Información del grupo de recursos '{nombre}' en {ubicacion}."
-            elif servicio == "storage":
-                tipo = resultado.get("kind", "tipo desconocido")
-                estado = resultado.get("status", "estado desconocido")
-                return f"✅ Cuenta de almacenamiento '{nombre}' ({tipo}) en {ubicacion}. Estado: {estado}."
-            elif servicio == "webapp":
-                estado = resultado.get("state", "estado desconocido")
-                url = resultado.get("default_host_name", "")
-                url_text = f" (https://{url})" if url else ""
-                return f"✅ Aplicación web '{nombre}' en {ubicacion}. Estado: {estado}{url_text}."
-            else:
-                return f"✅ Información del recurso '{nombre}' obtenida correctamente."
-        else:
-            return "✅ Operación show completada."
-
-    return f"✅ Operación {operacion} completada para {servicio}."
-
-
-def obtener_credenciales_azure():
-    """
-    Obtiene credenciales de Azure de forma híbrida:
-    - En Azure Functions: usa Managed Identity.
-    - En local: usa Azure CLI (az login).
-    """
-    try:
-        if os.getenv("WEBSITE_INSTANCE_ID"):
-            # Esta variable de entorno solo existe en Azure Functions
-            credential = ManagedIdentityCredential()
-            logging.info("Usando ManagedIdentityCredential (Azure).")
-        else:
-            credential = AzureCliCredential()
-            logging.info("Usando AzureCliCredential (Local).")
-
-        return credential
-
-    except Exception as e:
-        logging.error(f"Error obteniendo credenciales de Azure: {str(e)}")
-        return None
-
-
-def obtener_estado_function_app(app_name: str, resource_group: str, subscription_id: str) -> dict:
-    if not MGMT_SDK or WebSiteManagementClient is None:
-        return {"nombre": app_name, "estado": "Unknown", "error": "SDK de administración no instalado"}
-
-    try:
-        credential = obtener_credenciales_azure()
-        if not credential:
-            return {"nombre": app_name, "estado": "Unknown", "error": "Sin credenciales de Azure"}
-
-        client = WebSiteManagementClient(credential, subscription_id)
-
-        webapp = client.web_apps.get(resource_group, app_name)           # Site
-        config = client.web_apps.get_configuration(
-            resource_group, app_name)  # SiteConfigResource
-
-        server_farm_id = _safe(webapp, "server_farm_id", "") or ""
-        plan = server_farm_id.split("/")[-1] if server_farm_id else "Unknown"
-        default_host = _safe(webapp, "default_host_name", "")
-
-        return {
-            "nombre": _safe(webapp, "name", app_name),
-            "estado": _safe(webapp, "state", "Unknown"),
-            "plan": plan,
-            # python_version en Windows | linux_fx_version en Linux
-            "runtime": _safe(config, "python_version", None) or _safe(config, "linux_fx_version", "Unknown"),
-            "url": f"https://{default_host}" if default_host else "",
-            "location": _safe(webapp, "location", "Unknown"),
-            "kind": _safe(webapp, "kind", "app"),
-            "enabled": bool(_safe(webapp, "enabled", True)),
-            "availability_state": _safe(webapp, "availability_state", "Unknown"),
-        }
-
-    except ResourceNotFoundError:
-        return {"nombre": app_name, "estado": "NotFound", "error": f"Function App '{app_name}' no encontrada en '{resource_group}'"}
-    except AzureError as e:
-        return {"nombre": app_name, "estado": "Error", "error": str(e)}
-    except Exception as e:
-        logging.exception("obtener_estado_function_app failed")
-        return {"nombre": app_name, "estado": "Unknown", "error": str(e), "tipo_error": type(e).__name__}
-
-
-def obtener_info_storage_account(account_name: str, resource_group: str, subscription_id: str) -> dict:
-    if not MGMT_SDK or StorageManagementClient is None:
-        return {"nombre": account_name, "estado": "Unknown", "error": "SDK de administración no instalado"}
-
-    try:
-        credential = obtener_credenciales_azure()
-        if not credential:
-            return {"nombre": account_name, "estado": "Unknown", "error": "Sin credenciales"}
-
-        client = StorageManagementClient(credential, subscription_id)
-        sa = client.storage_accounts.get_properties(
-            resource_group, account_name)
-
-        # keys puede venir None o sin la propiedad .keys
-        try:
-            keys_obj = client.storage_accounts.list_keys(
-                resource_group, account_name)
-            keys_list = getattr(keys_obj, "keys", None)
-            has_keys = bool(keys_list) and len(keys_list) > 0
-        except Exception:
-            has_keys = False
-
-        sku = _safe(sa, "sku", None)
-        sku_name = getattr(sku, "name", "Unknown") if sku else "Unknown"
-        sku_tier = getattr(sku, "tier", "Unknown") if sku else "Unknown"
-        pe = _safe(sa, "primary_endpoints", None)
-        blob_endpoint = getattr(pe, "blob", None) if pe else None
-
-        return {
-            "nombre": _safe(sa, "name", account_name),
-            "tipo": sku_name,
-            "tier": sku_tier,
-            "replicacion": sku_name,
-            "location": _safe(sa, "location", "Unknown"),
-            "estado": _safe(sa, "status_of_primary", "Available"),
-            "access_tier": _safe(sa, "access_tier", "Hot"),
-            "kind": _safe(sa, "kind", "StorageV2"),
-            "provisioning_state": _safe(sa, "provisioning_state", "Unknown"),
-            "has_keys": has_keys,
-            "blob_endpoint": blob_endpoint,
-        }
-
-    except ResourceNotFoundError:
-        return {"nombre": account_name, "estado": "NotFound", "error": f"Storage Account '{account_name}' no encontrado"}
-    except Exception as e:
-        logging.exception("obtener_info_storage_account failed")
-        return {"nombre": account_name, "estado": "Unknown", "error": str(e), "tipo_error": type(e).__name__}
-
-
-def obtener_metricas_function_app(app_name: str, resource_group: str, subscription_id: str) -> dict:
-    """
-    Obtiene métricas de la Function App usando el SDK
-    """
-    if not MGMT_SDK or MonitorManagementClient is None:
-        return {"error": "SDK de administración no instalado"}
-
-    try:
-        credential = obtener_credenciales_azure()
-        if not credential:
-            return {"error": "No se pudieron obtener credenciales"}
-
-        client = MonitorManagementClient(credential, subscription_id)
-
-        # Construir el resource ID
-        resource_id = f"/subscriptions/{subscription_id}/resourceGroups/{resource_group}/providers/Microsoft.Web/sites/{app_name}"
-
-        # Obtener métricas de las últimas 24 horas
-        from datetime import datetime, timedelta
-        end_time = datetime.utcnow()
-        start_time = end_time - timedelta(hours=24)
-
-        metricas = {}
-
-        # Lista de métricas a obtener
-        metricas_a_consultar = [
-            "Http5xx",
-            "Requests",
-            "Http2xx",
-            "Http4xx",
-            "HttpResponseTime",
-            "AverageResponseTime",
-            "MemoryWorkingSet",
-            "FunctionExecutionCount",
-            "FunctionExecutionUnits"
-        ]
-
-        for metrica_name in metricas_a_consultar:
-            try:
-                result = client.metrics.list(
-                    resource_id,
-                    timespan=f"{start_time.isoformat()}/{end_time.isoformat()}",
-                    interval=timedelta(hours=1),
-                    metricnames=metrica_name,
-                    aggregation='Average,Count,Total'
-                )
-
-                # Acceder directamente a .value sin importar MetricListResult
-                for item in getattr(result, 'value', []):
-                    if item.timeseries:
-                        for ts in item.timeseries:
-                            if ts.data:
-                                ultimo_valor = ts.data[-1]
-                                metricas[metrica_name] = {
-                                    "average": ultimo_valor.average,
-                                    "count": ultimo_valor.count,
-                                    "total": ultimo_valor.total,
-                                    "timestamp": ultimo_valor.time_stamp.isoformat() if ultimo_valor.time_stamp else None
-                                }
-                                break  # Solo necesitamos el primer timeseries
-                        break  # Solo necesitamos el primer item
-
-            except Exception as e:
-                metricas[metrica_name] = {"error": str(e)}
-
-        return metricas
-
-    except Exception as e:
-        logging.error(f"Error obteniendo métricas: {str(e)}")
-        return {"error": str(e)}
-
-
-def diagnosticar_function_app_con_sdk() -> dict:
-    """
-    Diagnóstico completo usando SDK de Azure - OPTIMIZADO para respuesta rápida
-    """
-
-    diagnostico = {
-        "timestamp": datetime.now().isoformat(),
-        "function_app": os.environ.get("WEBSITE_SITE_NAME", "local"),
-        "checks": {},
-        "recomendaciones": [],
-        "metricas": {},
-        "optimizado": True
-    }
-
-    # Aplicación de clave App Insights (acepta ambos nombres de variable)
-    app_insights_key = (
-        os.environ.get("APPLICATIONINSIGHTS_CONNECTION_STRING")
-        or os.environ.get("APPINSIGHTS_INSTRUMENTATIONKEY")
-    )
-
-    # 1. Verificar configuración básica
-    diagnostico["checks"]["configuracion"] = {
-        "blob_storage": False,
-        "openai_configurado": bool(os.environ.get("AZURE_OPENAI_KEY")),
-        "app_insights": bool(app_insights_key),
-        "ambiente": "Azure" if IS_AZURE else "Local"
-    }
-
-    # 2. Verificar conectividad Blob Storage
-    client = get_blob_client()
-    if client:
-        try:
-            container_client = client.get_container_client(CONTAINER_NAME)
-            if container_client.exists():
-                blob_count = sum(1 for _ in container_client.list_blobs())
-                diagnostico["checks"]["blob_storage_detalles"] = {
-                    "conectado": True,
-                    "container": CONTAINER_NAME,
-                    "archivos": blob_count
-                }
-                diagnostico["checks"]["configuracion"]["blob_storage"] = True
-            else:
-                diagnostico["checks"]["blob_storage_detalles"] = {
-                    "conectado": False,
-                    "error": f"El contenedor '{CONTAINER_NAME}' no existe"
-                }
-        except Exception as e:
-            diagnostico["checks"]["blob_storage_detalles"] = {
-                "conectado": False,
-                "error": str(e)
-            }
-
-    # Asegurar que todas las claves existen antes de usarlas
-    diagnostico.setdefault("recursos", {})
-    diagnostico.setdefault("metricas", {})
-    diagnostico.setdefault("checks", {})
-    diagnostico.setdefault("alertas", [])
-    diagnostico.setdefault("recomendaciones", [])
-
-    # 3. Obtener estado de Function App usando SDK - PARALELO
-    app_name = None
-    resource_group = None
-    subscription_id = None
-
-    if IS_AZURE:
-        app_name = "copiloto-semantico-func-us2"  # Hardcoded para evitar problemas
-        resource_group = "boat-rental-app-group"  # Forzar el correcto
-        subscription_id = os.environ.get(
-            "AZURE_SUBSCRIPTION_ID") or "b6b7b7b7-b7b7-b7b7-b7b7-b7b7b7b7b7b7"  # Fallback
-
-        if app_name and subscription_id:
-            # Ejecutar operaciones en paralelo con timeout
-            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-                # Función con timeout
-                def get_function_state():
-                    try:
-                        return obtener_estado_function_app(app_name, resource_group, subscription_id)
-                    except Exception as e:
-                        return {"nombre": app_name, "estado": "Unknown", "error": str(e)}
-
-                def get_storage_info():
-                    try:
-                        if client:
-                            account_name = client.account_name
-                            if account_name:
-                                return obtener_info_storage_account(account_name, resource_group, subscription_id)
-                    except Exception as e:
-                        return {"estado": "error", "error": str(e)}
-                    return {"estado": "no_client"}
-
-                # Ejecutar con timeout de 5 segundos
-                future_function = executor.submit(get_function_state)
-                future_storage = executor.submit(get_storage_info)
-
-                try:
-                    diagnostico["recursos"]["function_app"] = future_function.result(
-                        timeout=5)
-                except concurrent.futures.TimeoutError:
-                    diagnostico["recursos"]["function_app"] = {
-                        "estado": "timeout", "mensaje": "Consulta excedió 5s"}
-
-                try:
-                    diagnostico["recursos"]["storage_account"] = future_storage.result(
-                        timeout=3)
-                except concurrent.futures.TimeoutError:
-                    diagnostico["recursos"]["storage_account"] = {
-                        "estado": "timeout", "mensaje": "Consulta excedió 3s"}
-
-        # Storage info ya se obtiene en paralelo arriba
-
-    # 5. Métricas de rendimiento local
-    diagnostico.setdefault("metricas", {})
-    diagnostico["metricas"]["cache"] = {
-        "archivos_en_cache": len(CACHE),
-        "memoria_cache_bytes": sum(len(str(v)) for v in CACHE.values())
-    }
-
-    # 5.1. Obtener métricas de Function App si estamos en Azure
-    logging.info(
-        f"🔍 Debug métricas: IS_AZURE={IS_AZURE}, app_name={app_name}, subscription_id={subscription_id}")
-    if IS_AZURE and app_name and subscription_id and resource_group:
-        try:
-            logging.info(
-                f"🔍 Obteniendo métricas de Function App: {app_name} en {resource_group}")
-            metricas_fa = obtener_metricas_function_app(
-                app_name, resource_group, subscription_id)
-            logging.info(
-                f"🔍 Resultado obtener_metricas_function_app: {type(metricas_fa)} con keys: {list(metricas_fa.keys()) if isinstance(metricas_fa, dict) else 'No dict'}")
-            if metricas_fa and not metricas_fa.get("error"):
-                diagnostico["metricas"]["function_app"] = metricas_fa
-                logging.info(
-                    f"✅ Métricas de Function App obtenidas: {len(metricas_fa)} métricas")
-            else:
-                logging.warning(
-                    f"⚠️ Error obteniendo métricas: {metricas_fa.get('error', 'Unknown error')}")
-                diagnostico["metricas"]["function_app"] = {
-                    "error": metricas_fa.get("error", "No se pudieron obtener métricas")}
-        except Exception as e:
-            logging.error(
-                f"❌ Excepción obteniendo métricas de Function App: {str(e)}")
-            diagnostico["metricas"]["function_app"] = {"error": str(e)}
-    else:
-        logging.warning(
-            f"⚠️ No se obtuvieron métricas: IS_AZURE={IS_AZURE}, app_name={app_name}, resource_group={resource_group}, subscription_id={subscription_id}")
-
-    # 6. Generar recomendaciones basadas en el diagnóstico
-    if diagnostico.get("recursos", {}).get("function_app", {}).get("estado") != "Running":
-        diagnostico["recomendaciones"].append({
-            "nivel": "critico",
-            "mensaje": "La Function App no está en estado Running",
-            "accion": "Verificar configuración y reiniciar si es necesario"
-        })
-
-    if not diagnostico["checks"].get("blob_storage_detalles", {}).get("conectado"):
-        diagnostico["recomendaciones"].append({
-            "nivel": "importante",
-            "mensaje": "Blob Storage no está conectado",
-            "accion": "Verificar connection string y permisos"
-        })
-
-    if diagnostico["metricas"]["cache"]["archivos_en_cache"] > 100:
-        diagnostico["recomendaciones"].append({
-            "nivel": "sugerencia",
-            "mensaje": "Cache con muchos archivos",
-            "accion": "Considerar limpiar cache para optimizar memoria"
-        })
-
-    # Verificar errores HTTP si hay métricas
-    metricas_fa = diagnostico.get("metricas", {}).get("function_app", {})
-    if metricas_fa.get("Http5xx", {}).get("total", 0) > 10:
-        diagnostico["recomendaciones"].append({
-            "nivel": "importante",
-            "mensaje": f"Se detectaron {metricas_fa['Http5xx']['total']} errores HTTP 5xx",
-            "accion": "Revisar logs para identificar causa de errores"
-        })
-
-    return diagnostico
-
-
-@app.function_name(name="diagnostico_recursos_completo_http")
-@app.route(route="diagnostico-recursos-completo", methods=["GET", "POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def diagnostico_recursos_completo_http(req: func.HttpRequest) -> func.HttpResponse:
-    from memory_manual import aplicar_memoria_manual
-    from cosmos_memory_direct import consultar_memoria_cosmos_directo, aplicar_memoria_cosmos_directo
-    from services.memory_service import memory_service
-
-    # 🧠 CONSULTAR MEMORIA COSMOS DB DIRECTAMENTE
-    memoria_previa = consultar_memoria_cosmos_directo(req)
-    if memoria_previa and memoria_previa.get("tiene_historial"):
-        logging.info(
-            f"🧠 Modificar-archivo: {memoria_previa['total_interacciones']} interacciones encontradas")
-        logging.info(
-            f"📝 Historial: {memoria_previa.get('resumen_conversacion', '')[:100]}...")
-    advertencias = []
-    # 🧩 Sobrescribir configuración desde headers si vienen en la redirección
-    os.environ["WEBSITE_SITE_NAME"] = req.headers.get(
-        "X-App-Name", os.environ.get("WEBSITE_SITE_NAME", ""))
-    # CORRECCIÓN: Usar siempre el resource group correcto
-    os.environ["RESOURCE_GROUP"] = "boat-rental-app-group"
-    os.environ["AZURE_SUBSCRIPTION_ID"] = req.headers.get(
-        "X-Subscription-Id", os.environ.get("AZURE_SUBSCRIPTION_ID", ""))
-
-    """
-    Diagnóstico completo de recursos Azure usando SDK en lugar de CLI
-    """
-    try:
-        if req.method == "GET":
-            # GET: parámetros opcionales de query string
-            incluir_metricas = req.params.get(
-                "metricas", "true").lower() == "true"
-            incluir_costos = req.params.get(
-                "costos", "false").lower() == "true"
-            recurso_especifico = req.params.get("recurso", "")
-
-            if not incluir_metricas:
-                logging.warning(
-                    "⚠️ Foundry request llegó sin metricas=true — activando por defecto.")
-                incluir_metricas = True
-
-            # Si no hay recurso específico en GET, hacer diagnóstico general
-            if not recurso_especifico:
-                # Diagnóstico general sin necesidad de credenciales específicas
-                diagnostico = {
-                    "timestamp": datetime.now().isoformat(),
-                    "ambiente": "Azure" if IS_AZURE else "Local",
-                    "recursos": {},
-                    "metricas": {},
-                    "alertas": [],
-                    "recomendaciones": [],
-                    "modo": "general"
-                }
-
-                # Usar el diagnóstico con SDK
-                resultado_sdk = diagnosticar_function_app_con_sdk()
-                diagnostico.update(resultado_sdk)
-
-                # Agregar estadísticas de storage sin credenciales ARM
-                try:
-                    client = get_blob_client()
-                    if client:
-                        contenedores = list(client.list_containers())
-                        total_blobs = 0
-                        for container in contenedores:
-                            if container.name:
-                                container_client = client.get_container_client(
-                                    container.name)
-                                total_blobs += sum(
-                                    1 for _ in container_client.list_blobs())
-
-                        diagnostico["recursos"]["storage_stats"] = {
-                            "contenedores": len(contenedores),
-                            "total_blobs": total_blobs,
-                            "contenedor_principal": CONTAINER_NAME
-                        }
-                except Exception as e:
-                    diagnostico["recursos"]["storage_stats"] = {
-                        "error": str(e)}
-
-                # Sistema info
-                diagnostico["sistema"] = {
-                    "cache_archivos": len(CACHE),
-                    "memoria_cache_kb": round(sum(len(str(v)) for v in CACHE.values()) / 1024, 2) if CACHE else 0,
-                    "endpoints_activos": [
-                        "/api/crear-contenedor",
-                        "/api/ejecutar-cli",
-                        "/api/diagnostico-recursos"
-                    ],
-                    "sdk_habilitado": MGMT_SDK,
-                    "cli_habilitado": False
-                }
-
-                # CONSTRUIR MENSAJE ENRIQUECIDO CON CONTEXTO SEMÁNTICO PARA DIAGNÓSTICO GENERAL
-                ambiente = diagnostico.get("ambiente", "Desconocido")
-                cache_archivos = diagnostico["sistema"]["cache_archivos"]
-                memoria_cache = diagnostico["sistema"]["memoria_cache_kb"]
-                storage_contenedores = diagnostico["recursos"].get(
-                    "storage_stats", {}).get("contenedores", 0)
-                storage_blobs = diagnostico["recursos"].get(
-                    "storage_stats", {}).get("total_blobs", 0)
-                alertas_count = len(diagnostico.get("alertas", []))
-                recomendaciones_count = len(
-                    diagnostico.get("recomendaciones", []))
-
-                mensaje_enriquecido = f"""DIAGNOSTICO DE RECURSOS COMPLETADO
-
-RESULTADO: Diagnostico general del sistema completado exitosamente.
-
-AMBIENTE: {ambiente}
-CACHE: {cache_archivos} archivos ({memoria_cache} KB)
-STORAGE: {storage_contenedores} contenedores, {storage_blobs} blobs totales
-ALERTAS: {alertas_count} detectadas
-RECOMENDACIONES: {recomendaciones_count} sugeridas
-
-CONTEXTO SEMANTICO: Sistema operativo en {ambiente}. Cache activo con {cache_archivos} archivos. Storage conectado con {storage_blobs} archivos distribuidos en {storage_contenedores} contenedores. {'Hay alertas criticas que requieren atencion.' if alertas_count > 0 else 'Sistema funcionando normalmente.'}"""
-
-                diagnostico["mensaje"] = mensaje_enriquecido
-                # ✅ ← Necesario para Foundry y tests
-                diagnostico["exito"] = True
-
-                # Aplicar memoria Cosmos y memoria manual
-                diagnostico = aplicar_memoria_cosmos_directo(req, diagnostico)
-                diagnostico = aplicar_memoria_manual(req, diagnostico)
-
-                # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
-                # Registrar llamada en memoria después de construir la respuesta final
-                logging.info(
-                    f"💾 Registering call for diagnostico_recursos_completo: success={diagnostico.get('exito', False)}, endpoint=/api/diagnostico-recursos-completo")
-                memory_service.registrar_llamada(
-                    source="diagnostico_recursos_completo",
-                    endpoint="/api/diagnostico-recursos-completo",
-                    method=req.method,
-                    params={"session_id": req.headers.get(
-                        "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
-                    response_data=diagnostico,
-                    success=diagnostico.get("exito", False)
-                )
-
-                return func.HttpResponse(
-                    json.dumps(diagnostico, indent=2, ensure_ascii=False),
-                    mimetype="application/json",
-                    status_code=200
-                )
-            else:
-                # GET con recurso específico → tratar como POST
-                pass
-
-        # POST o GET con recurso específico
-        body = _json_body(req) if req.method == "POST" else {}
-        rid = _s(body.get("recurso")) or _s(req.params.get("recurso", ""))
-
-        if not rid:
-            res = {"ok": False, "error": "Falta 'recurso'", "next_steps": [
-                "Proporciona 'recurso' en el body (POST) o query string (GET)"]}
-            # Aplicar memoria Cosmos y memoria manual
-            res = aplicar_memoria_cosmos_directo(req, res)
-            res = aplicar_memoria_manual(req, res)
-
-            # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
-            # Registrar llamada en memoria después de construir la respuesta final
-            logging.info(
-                f"💾 Registering call for diagnostico_recursos_completo: success={res.get('ok', False)}, endpoint=/api/diagnostico-recursos-completo")
-            memory_service.registrar_llamada(
-                source="diagnostico_recursos_completo",
-                endpoint="/api/diagnostico-recursos-completo",
-                method=req.method,
-                params={"session_id": req.headers.get(
-                    "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
-                response_data=res,
-                success=res.get("ok", False)
-            )
-            return _error("BadRequest", 400, "Falta 'recurso'",
-                          next_steps=["Proporciona 'recurso' en el body (POST) o query string (GET)"])
-
-        if not _try_default_credential():
-            res = {"ok": False, "error": "No se pudieron obtener credenciales para ARM",
-                   "next_steps": ["Configura identidad administrada o variables de servicio."]}
-            # Aplicar memoria Cosmos y memoria manual
-            res = aplicar_memoria_cosmos_directo(req, res)
-            res = aplicar_memoria_manual(req, res)
-
-            # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
-            # Registrar llamada en memoria después de construir la respuesta final
-            logging.info(
-                f"💾 Registering call for diagnostico_recursos_completo: success={res.get('ok', False)}, endpoint=/api/diagnostico-recursos-completo")
-            memory_service.registrar_llamada(
-                source="diagnostico_recursos_completo",
-                endpoint="/api/diagnostico-recursos-completo",
-                method=req.method,
-                params={"session_id": req.headers.get(
-                    "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
-                response_data=res,
-                success=res.get("ok", False)
-            )
-            return _error("AZURE_AUTH_MISSING", 401, "No se pudieron obtener credenciales para ARM",
-                          next_steps=["Configura identidad administrada o variables de servicio."])
-
-        try:
-            # Lógica de diagnóstico completo para recurso específico
-            diagnostico = {
-                "timestamp": datetime.now().isoformat(),
-                "recurso": rid,
-                "modo": "especifico",
-                "detalle": {},
-                "metricas": {},
-                "recomendaciones": []
-            }
-
-            # Intentar obtener información del recurso usando ARM
-            if MGMT_SDK:
-                try:
-                    # Extraer subscription_id del resource_id
-                    parts = rid.split('/')
-                    if len(parts) >= 3:
-                        subscription_id = parts[2]
-
-                        # Determinar tipo de recurso y obtener información específica
-                        if "/Microsoft.Web/sites/" in rid:
-                            # Es una Function App o Web App
-                            resource_group = parts[4] if len(
-                                parts) >= 5 else ""
-                            app_name = parts[8] if len(parts) >= 9 else ""
-
-                            if resource_group and app_name:
-                                diagnostico["detalle"] = obtener_estado_function_app(
-                                    app_name, resource_group, subscription_id)
-
-                                if body.get("incluir_metricas", True):
-                                    diagnostico["metricas"] = obtener_metricas_function_app(
-                                        app_name, resource_group, subscription_id)
-
-                        elif "/Microsoft.Storage/storageAccounts/" in rid:
-                            # Es un Storage Account
-                            resource_group = parts[4] if len(
-                                parts) >= 5 else ""
-                            account_name = parts[8] if len(parts) >= 9 else ""
-
-                            if resource_group and account_name:
-                                diagnostico["detalle"] = obtener_info_storage_account(
-                                    account_name, resource_group, subscription_id)
-
-                        else:
-                            diagnostico["detalle"] = {
-                                "tipo": "recurso_generico",
-                                "resource_id": rid,
-                                "mensaje": "Tipo de recurso no específicamente soportado"
-                            }
-
-                except Exception as e:
-                    diagnostico["detalle"] = {
-                        "error": f"Error específico del recurso: {str(e)}",
-                        "resource_id": rid
-                    }
-            else:
-                diagnostico["detalle"] = {
-                    "error": "SDK de administración no disponible",
-                    "resource_id": rid
-                }
-
-            # Generar recomendaciones basadas en el diagnóstico
-            if diagnostico["detalle"].get("estado") == "Error":
-                diagnostico["recomendaciones"].append({
-                    "nivel": "critico",
-                    "mensaje": "Recurso en estado de error",
-                    "accion": "Revisar configuración y logs del recurso"
-                })
-
-            # CONSTRUIR MENSAJE ENRIQUECIDO CON CONTEXTO SEMÁNTICO PARA RECURSO ESPECÍFICO
-            recurso = diagnostico.get("recurso", "Desconocido")
-            estado_detalle = diagnostico["detalle"].get(
-                "estado", "Desconocido")
-            tipo_recurso = diagnostico["detalle"].get("tipo", "Desconocido")
-            metricas_count = len(diagnostico.get("metricas", {}))
-            recomendaciones_count = len(diagnostico.get("recomendaciones", []))
-
-            mensaje_enriquecido = f"""DIAGNOSTICO DE RECURSO COMPLETADO
-
-RESULTADO: Diagnostico especifico del recurso '{recurso}' completado.
-
-TIPO: {tipo_recurso}
-ESTADO: {estado_detalle}
-METRICAS: {metricas_count} metricas analizadas
-RECOMENDACIONES: {recomendaciones_count} sugeridas
-
-CONTEXTO SEMANTICO: Recurso '{recurso}' de tipo {tipo_recurso} se encuentra en estado {estado_detalle}. {'Se detectaron metricas de rendimiento disponibles.' if metricas_count > 0 else 'No se obtuvieron metricas especificas.'} {'Hay recomendaciones importantes para revisar.' if recomendaciones_count > 0 else 'El recurso parece estar funcionando correctamente.'}"""
-
-            diagnostico["mensaje"] = mensaje_enriquecido
-            diagnostico["exito"] = True
-
-            result = {"ok": True, **diagnostico}
-            # Aplicar memoria Cosmos y memoria manual
-            result = aplicar_memoria_cosmos_directo(req, result)
-            result = aplicar_memoria_manual(req, result)
-
-            # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
-            # Registrar llamada en memoria después de construir la respuesta final
-            logging.info(
-                f"💾 Registering call for diagnostico_recursos_completo: success={result.get('ok', False)}, endpoint=/api/diagnostico-recursos-completo")
-            memory_service.registrar_llamada(
-                source="diagnostico_recursos_completo",
-                endpoint="/api/diagnostico-recursos-completo",
-                method=req.method,
-                params={"session_id": req.headers.get(
-                    "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
-                response_data=result,
-                success=result.get("ok", False)
-            )
-            return _json(result)
-
-        except PermissionError as e:
-            res = {
-                "ok": False,
-                "error": str(e),
-                "next_steps": ["Verifica permisos de la identidad en el recurso especificado."],
-                "timestamp": datetime.now().isoformat(),
-                "recursos": {},
-                "metricas": {},
-                "modo": "permission_error"
-            }
-            # Aplicar memoria Cosmos y memoria manual
-            res = aplicar_memoria_cosmos_directo(req, res)
-            res = aplicar_memoria_manual(req, res)
-
-            # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
-            # Registrar llamada en memoria después de construir la respuesta final
-            logging.info(
-                f"💾 Registering call for diagnostico_recursos_completo: success={res.get('ok', False)}, endpoint=/api/diagnostico-recursos-completo")
-            memory_service.registrar_llamada(
-                source="diagnostico_recursos_completo",
-                endpoint="/api/diagnostico-recursos-completo",
-                method=req.method,
-                params={"session_id": req.headers.get(
-                    "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
-                response_data=res,
-                success=res.get("ok", False)
-            )
-            return _error("AZURE_AUTH_FORBIDDEN", 403, str(e),
-                          next_steps=["Verifica permisos de la identidad en el recurso especificado."])
-        except Exception as e:
-            res = {
-                "ok": False,
-                "error": str(e),
-                "timestamp": datetime.now().isoformat(),
-                "recursos": {},
-                "metricas": {},
-                "modo": "inner_exception"
-            }
-            # Aplicar memoria Cosmos y memoria manual
-            res = aplicar_memoria_cosmos_directo(req, res)
-            res = aplicar_memoria_manual(req, res)
-
-            # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
-            # Registrar llamada en memoria después de construir la respuesta final
-            logging.info(
-                f"💾 Registering call for diagnostico_recursos_completo: success={res.get('ok', False)}, endpoint=/api/diagnostico-recursos-completo")
-            memory_service.registrar_llamada(
-                source="diagnostico_recursos_completo",
-                endpoint="/api/diagnostico-recursos-completo",
-                method=req.method,
-                params={"session_id": req.headers.get(
-                    "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
-                response_data=res,
-                success=res.get("ok", False)
-            )
-            return _error("DiagFullError", 500, str(e))
-
-    except Exception as e:
-        logging.exception("diagnostico_recursos_completo_http failed")
-        # CORRECCIÓN: Asegurar que res tenga todas las claves necesarias
-        res = {
-            "ok": False,
-            "error": str(e),
-            "timestamp": datetime.now().isoformat(),
-            "ambiente": "Azure" if IS_AZURE else "Local",
-            "recursos": {},
-            "metricas": {},
-            "alertas": [],
-            "recomendaciones": [],
-            "sistema": {
-                "cache_archivos": len(CACHE) if 'CACHE' in globals() else 0,
-                "memoria_cache_kb": 0,
-                "endpoints_activos": [],
-                "sdk_habilitado": False,
-                "cli_habilitado": False
-            },
-            "modo": "error_fallback",
-            "mensaje": f"Error en diagnostico: {str(e)}"
-        }
-        # Aplicar memoria Cosmos y memoria manual
-        res = aplicar_memoria_cosmos_directo(req, res)
-        res = aplicar_memoria_manual(req, res)
-
-        # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
-        # Registrar llamada en memoria después de construir la respuesta final
-        logging.info(
-            f"💾 Registering call for diagnostico_recursos_completo: success={res.get('ok', False)}, endpoint=/api/diagnostico-recursos-completo")
-        memory_service.registrar_llamada(
-            source="diagnostico_recursos_completo",
-            endpoint="/api/diagnostico-recursos-completo",
-            method=req.method,
-            params={"session_id": req.headers.get(
-                "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
-            response_data=res,
-            success=res.get("ok", False)
-
-        )
-
-        return _error("UnexpectedError", 500, str(e))
-
-# ========== FUNCIONES AUXILIARES PARA INTENCIONES ==========
-
-
-def ejecutar_comando_azure_seguro(servicio: str, comando: str, params: dict) -> dict:
-    """Wrapper seguro para comandos Azure CLI"""
-    try:
-        # Validaciones de seguridad
-        if any(x in comando.lower() for x in ["delete", "remove", "purge"]):
-            if not params.get("confirmar_operacion_peligrosa"):
-                return {
-                    "exito": False,
-                    "error": "Operación peligrosa requiere confirmación",
-                    "requiere": "confirmar_operacion_peligrosa: true"
-                }
-
-        # Construir y ejecutar
-        full_cmd = f"az {servicio} {comando}" if servicio else f"az {comando}"
-        return ejecutar_comando_azure(full_cmd, formato="json")
-
-    except Exception as e:
-        return {"exito": False, "error": str(e)}
-
-
-@app.function_name(name="auditar_deploy_http")
-@app.route(route="auditar-deploy", methods=["GET", "POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def auditar_deploy_http(req: func.HttpRequest) -> func.HttpResponse:
-    """
-    Auditoría de deployments vía ARM usando Managed Identity.
-    No usa Kudu ni credenciales estáticas.
-    ✅ Verifica existencia en ARM antes de consultar /deployments.
-    """
-    from memory_manual import aplicar_memoria_manual
-    # Initialize variables at function start to ensure they're always bound
-    sub = None
-    rg = None
-    site = None
-
-    try:
-        sub = os.getenv("AZURE_SUBSCRIPTION_ID")
-
-        # ✅ USAR VARIABLES PERSONALIZADAS con fallback
-        rg = os.getenv("AZURE_RESOURCE_GROUP") or os.getenv(
-            "RESOURCE_GROUP") or "boat-rental-app-group"
-        site = os.getenv("CUSTOM_SITE_NAME") or os.getenv(
-            "WEBSITE_SITE_NAME") or "copiloto-semantico-func-us2"
-
-        if not sub or not rg or not site:
-            body = {
-                "exito": False,
-                "error_code": "MISSING_ENV",
-                "missing": {
-                    "AZURE_SUBSCRIPTION_ID": bool(sub),
-                    "RESOURCE_GROUP/AZURE_RESOURCE_GROUP": bool(rg),
-                    "CUSTOM_SITE_NAME/WEBSITE_SITE_NAME": bool(site),
-                }
-            }
-            return func.HttpResponse(json.dumps(body, ensure_ascii=False), mimetype="application/json", status_code=500)
-
-        # 1) Obtener token AAD con Managed Identity (ARM scope)
-        credential = DefaultAzureCredential(
-            exclude_interactive_browser_credential=True)
-        token = credential.get_token(
-            "https://management.azure.com/.default").token
-        headers = {"Authorization": f"Bearer {token}"}
-
-        # 2) ✅ VERIFICAR EXISTENCIA: Primero comprobar que el recurso existe
-        resource_api = (
-            f"https://management.azure.com/subscriptions/{sub}"
-            f"/resourceGroups/{rg}/providers/Microsoft.Web/sites/{site}"
-            f"?api-version=2023-01-01"
-        )
-        resource_resp = requests.get(resource_api, headers=headers, timeout=15)
-
-        if resource_resp.status_code == 404:
-            # Recurso no encontrado - proporcionar información útil
-            body = {
-                "exito": False,
-                "error_code": "RESOURCE_NOT_FOUND",
-                "mensaje": f"Recurso '{site}' no encontrado en el resource group '{rg}'",
-                "verificacion": {
-                    "subscription_id": sub,
-                    "resource_group": rg,
-                    "site_name": site,
-                    "resource_type": "Microsoft.Web/sites"
-                },
-                "sugerencias": [
-                    f"Verificar que la Function App '{site}' existe",
-                    f"Confirmar que está en el resource group '{rg}'",
-                    "Revisar las variables de entorno WEBSITE_SITE_NAME y RESOURCE_GROUP",
-                    "Usar 'az webapp list' para listar Function Apps disponibles"
-                ],
-                "posibles_nombres": [
-                    f"{site}-us2",
-                    f"{site}-func",
-                    f"copiloto-func-azcli",
-                    "boat-rental-copiloto"
-                ],
-                "endpoint_verificado": resource_api
-            }
-            return func.HttpResponse(json.dumps(body, ensure_ascii=False), mimetype="application/json", status_code=404)
-
-        elif resource_resp.status_code != 200:
-            # Otro error (permisos, etc.)
-            body = {
-                "exito": False,
-                "error_code": "RESOURCE_ACCESS_ERROR",
-                "source": "ARM_RESOURCE_CHECK",
-                "status": resource_resp.status_code,
-                "mensaje": f"Error accediendo al recurso '{site}': HTTP {resource_resp.status_code}",
-                "response_body": resource_resp.text[:800],
-                "endpoint": resource_api,
-                "posibles_causas": [
-                    "Permisos insuficientes en la suscripción",
-                    "Resource group incorrecto",
-                    "Managed Identity sin acceso al recurso"
-                ]
-            }
-            return func.HttpResponse(json.dumps(body, ensure_ascii=False), mimetype="application/json", status_code=resource_resp.status_code)
-
-        # 3) ✅ RECURSO EXISTE: Obtener información básica del recurso
-        resource_info = resource_resp.json()
-        resource_location = resource_info.get("location", "unknown")
-        resource_state = resource_info.get(
-            "properties", {}).get("state", "unknown")
-
-        # 4) Ahora consultar deployments del recurso verificado
-        deployments_api = (
-            f"https://management.azure.com/subscriptions/{sub}"
-            f"/resourceGroups/{rg}/providers/Microsoft.Web/sites/{site}"
-            f"/deployments?api-version=2023-01-01"
-        )
-        deployments_resp = requests.get(
-            deployments_api, headers=headers, timeout=15)
-
-        if deployments_resp.status_code != 200:
-            body = {
-                "exito": False,
-                "error_code": "DEPLOYMENTS_ACCESS_ERROR",
-                "source": "ARM_DEPLOYMENTS",
-                "status": deployments_resp.status_code,
-                "mensaje": f"Error consultando deployments: HTTP {deployments_resp.status_code}",
-                "response_body": deployments_resp.text[:800],
-                "endpoint": deployments_api,
-                "recurso_verificado": True,
-                "recurso_info": {
-                    "name": site,
-                    "location": resource_location,
-                    "state": resource_state
-                }
-            }
-            return func.HttpResponse(json.dumps(body, ensure_ascii=False), mimetype="application/json", status_code=deployments_resp.status_code)
-
-        # 5) ✅ Éxito: Recurso existe y deployments obtenidos
-        deployments_data = deployments_resp.json()
-
-        body = {
-            "exito": True,
-            "source": "ARM",
-            "timestamp": datetime.utcnow().isoformat() + "Z",
-            "recurso_verificado": True,
-            "recurso_info": {
-                "name": site,
-                "location": resource_location,
-                "state": resource_state,
-                "resource_group": rg,
-                "subscription_id": sub
-            },
-            "deployments": deployments_data,
-            "total_deployments": len(deployments_data.get("value", [])) if isinstance(deployments_data.get("value"), list) else 0,
-            "endpoints_consultados": [resource_api, deployments_api]
-        }
-        body = aplicar_memoria_manual(req, body)
-        return func.HttpResponse(json.dumps(body, ensure_ascii=False), mimetype="application/json", status_code=200)
-
-    except requests.exceptions.Timeout:
-        body = {
-            "exito": False,
-            "error_code": "TIMEOUT_ERROR",
-            "mensaje": "Timeout consultando ARM API (15s)",
-            "sugerencia": "Reintentar la operación"
-        }
-        return func.HttpResponse(json.dumps(body, ensure_ascii=False), mimetype="application/json", status_code=408)
-
-    except Exception as e:
-        logging.exception("auditar_deploy_http (ARM) failed")
-        body = {
-            "exito": False,
-            "error_code": "UNEXPECTED_ERROR",
-            "error": str(e),
-            "tipo_error": type(e).__name__,
-            "configuracion": {
-                "subscription_id": sub if 'sub' in locals() else "not_set",
-                "resource_group": rg if 'rg' in locals() else "not_set",
-                "site_name": site if 'site' in locals() else "not_set"
-            }
-        }
-        return func.HttpResponse(json.dumps(body, ensure_ascii=False), mimetype="application/json", status_code=500)
-
-
-@app.function_name(name="bateria_endpoints_http")
-@app.route(route="bateria-endpoints", methods=["POST", "GET"], auth_level=func.AuthLevel.ANONYMOUS)
-def bateria_endpoints_http(req: func.HttpRequest) -> func.HttpResponse:
-    from memory_manual import aplicar_memoria_manual
-    from cosmos_memory_direct import consultar_memoria_cosmos_directo, aplicar_memoria_cosmos_directo
-    from services.memory_service import memory_service
-
-    # 🧠 CONSULTAR MEMORIA COSMOS DB DIRECTAMENTE
-    memoria_previa = consultar_memoria_cosmos_directo(req)
-    if memoria_previa and memoria_previa.get("tiene_historial"):
-        logging.info(
-            f"🧠 Modificar-archivo: {memoria_previa['total_interacciones']} interacciones encontradas")
-        logging.info(
-            f"📝 Historial: {memoria_previa.get('resumen_conversacion', '')[:100]}...")
-    advertencias = []
-
-    endpoint, method = "/api/bateria-endpoints", req.method
-    try:
-        # ✅ ROBUSTO: Acepta cualquier body o sin body, GET o POST
-        request_body = {}
-        if method == "POST":
-            try:
-                if req.get_body():
-                    request_body = req.get_json() or {}
-            except:
-                # Si hay error parseando JSON, continúa con body vacío
-                request_body = {}
-        # GET no necesita body, ya está inicializado como {}
-
-        # Base para invocación HTTP contra SÍ MISMA (sin hardcodear dominio)
-        if IS_AZURE:
-            base_url = f"https://{os.environ.get('WEBSITE_HOSTNAME')}"
-        else:
-            base_url = "http://localhost:7071"
-
-        def call(ep, m="GET", params=None, body=None, timeout=60):
-            # Forzar HTTP para localhost
-            if "localhost" in base_url:
-                url = urljoin("http://localhost:7071", ep)
-            else:
-                url = urljoin(base_url, ep)
-            if m == "GET":
-                r = requests.get(url, params=params or {}, timeout=timeout)
-            else:
-                r = requests.post(url, params=params or {},
-                                  json=body or {}, timeout=timeout)
-            # intenta parsear json
-            data = None
-            try:
-                data = r.json()
-            except Exception:
-                data = {"raw": r.text[:2000]}
-            return {"endpoint": ep, "method": m, "status_code": r.status_code, "ok": (r.status_code == 200), "data": data}
-
-        # --- Definición compacta de tu batería ---
-        tests = [
-            {"ep": "/api/info-archivo",      "m": "GET",
-             "params": {"ruta": "README.md"}},
-            {"ep": "/api/leer-archivo",      "m": "GET",
-                "params": {"ruta": "README.md"}},
-            {"ep": "/api/escribir-archivo",  "m": "POST",
-                "body":  {"ruta": "verificacion/hello.txt", "contenido": "hola mundo"}},
-            {"ep": "/api/modificar-archivo", "m": "POST", "body":  {"ruta": "verificacion/hello.txt",
-                                                                    "operacion": "agregar_final", "contenido": "\\nlínea nueva"}},
-            {"ep": "/api/copiar-archivo",    "m": "POST", "body":  {"origen": "verificacion/hello.txt",
-                                                                    "destino": "verificacion/hello.v2.txt", "overwrite": False}},
-            {"ep": "/api/ejecutar-script",   "m": "POST",
-                "body":  {"script": "scripts/setup.sh"}, "label": "bash setup.sh"},
-            {"ep": "/api/ejecutar-script",   "m": "POST", "body":  {"script": "scripts/lines.py",
-                                                                    "args": ["README.md"]}, "label": "python lines.py"},
-        ]
-        # ------------------------------------------
-
-        results = [call(t["ep"], t.get("m", "GET"), t.get(
-            "params"), t.get("body")) for t in tests]
-        ok_count = sum(1 for r in results if r["ok"])
-        summary = {"total": len(results), "ok": ok_count,
-                   "fail": len(results)-ok_count}
-
-        # extraer runId/exit_code si vienen en el payload de ejecutar-script
-        for r in results:
-            d = r.get("data", {})
-            if isinstance(d, dict):
-                det = d.get("details") or {}
-                r["runId"] = det.get("runId")
-                r["exit_code"] = det.get("exit_code")
-                r["stdout_preview"] = (det.get("stdout_preview") or "")[:200]
-
-        payload = {"summary": summary, "results": results}
-        ok = api_ok(endpoint, method, 200, "Batería ejecutada", payload)
-        ok = aplicar_memoria_manual(req, ok)
-        # Aplicar memoria Cosmos y memoria manual
-        ok = aplicar_memoria_cosmos_directo(req, ok)
-
-        # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
-        # Registrar llamada en memoria después de construir la respuesta final
-        logging.info(
-            f"💾 Registering call for bateria_endpoints: success={ok.get('ok', False)}, endpoint=/api/bateria-endpoints")
-        memory_service.registrar_llamada(
-            source="bateria_endpoints",
-            endpoint="/api/bateria-endpoints",
-            method=req.method,
-            params={"session_id": req.headers.get(
-                "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
-            response_data=ok,
-            success=ok.get("ok", False)
-        )
-
-        return func.HttpResponse(json.dumps(ok, ensure_ascii=False), mimetype="application/json", status_code=200)
-
-    except Exception as e:
-        err = api_err(endpoint, method, 500, "BatteryError", str(e))
-        err = aplicar_memoria_manual(req, err)
-        # Aplicar memoria Cosmos y memoria manual
-        err = aplicar_memoria_cosmos_directo(req, err)
-
-        # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
-        # Registrar llamada en memoria después de construir la respuesta final
-        logging.info(
-            f"💾 Registering call for bateria_endpoints: success={err.get('ok', False)}, endpoint=/api/bateria-endpoints")
-        memory_service.registrar_llamada(
-            source="bateria_endpoints",
-            endpoint="/api/bateria-endpoints",
-            method=req.method,
-            params={"session_id": req.headers.get(
-                "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
-            response_data=err,
-            success=err.get("ok", False)
-        )
-
-        return func.HttpResponse(json.dumps(err, ensure_ascii=False), mimetype="application/json", status_code=500)
-
-
-def procesar_intencion_crear_contenedor(parametros: dict) -> dict:
-    """Procesa la intención de crear un contenedor"""
-    nombre = parametros.get("nombre", "")
-    publico = parametros.get("publico", False)
-    metadata = parametros.get("metadata", {})
-
-    if not nombre:
-        return {
-            "exito": False,
-            "error": "Parámetro 'nombre' es requerido para crear contenedor"
-        }
-
-    try:
-        client = get_blob_client()
-        if not client:
-            return {
-                "exito": False,
-                "error": "Blob Storage no configurado"
-            }
-
-        from azure.storage.blob import PublicAccess
-        public_access = PublicAccess.Container.value if publico else None
-
-        container_client = client.create_container(
-            name=nombre,
-            public_access=public_access,
-            metadata=metadata
-        )
-
-        return {
-            "exito": True,
-            "mensaje": f"Contenedor '{nombre}' creado exitosamente",
-            "contenedor": nombre,
-            "publico": publico,
-            "metadata": metadata
-        }
-
-    except Exception as e:
-        return {
-            "exito": False,
-            "error": str(e),
-            "tipo_error": type(e).__name__
-        }
-
-
-def procesar_intencion_cli(parametros: dict) -> dict:
-    """Procesa intenciones de Azure CLI"""
-    servicio = parametros.get("servicio", "")
-    comando = parametros.get("comando", "")
-    cli_params = parametros.get("parametros", {})
-
-    # Initialize cmd_parts early to ensure it's available in exception handlers
-    cmd_parts = ["az"]
-
-    if not comando:
-        return {
-            "exito": False,
-            "error": "Parámetro 'comando' es requerido para ejecutar CLI"
-        }
-
-    # Construir comando Azure CLI
-    if servicio:
-        cmd_parts.append(servicio)
-    cmd_parts.extend(comando.split())
-
-    # Añadir parámetros
-    for key, value in cli_params.items():
-        if key.startswith("--"):
-            cmd_parts.append(key)
-        else:
-            cmd_parts.append(f"--{key}")
-        if value is not None:
-            cmd_parts.append(str(value))
-
-    # Añadir output JSON por defecto
-    if "--output" not in " ".join(cmd_parts):
-        cmd_parts.extend(["--output", "json"])
-
-    try:
-        resultado = subprocess.run(
-            cmd_parts,
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
-
-        output = resultado.stdout
+        local_dir = _scripts_tmp_dir()
+        # ✅ crear en /tmp en tiempo de ejecución
+        local_dir.mkdir(parents=True, exist_ok=True)
+        local = local_dir / Path(ruta_blob).name
+        raw = b.download_blob().readall()
+        local.write_bytes(raw)
         try:
-            output_json = json.loads(output) if output else None
-        except:
-            output_json = None
-
-        return {
-            "exito": resultado.returncode == 0,
-            "comando_ejecutado": " ".join(cmd_parts),
-            "codigo_salida": resultado.returncode,
-            "output": output_json if output_json else output,
-            "error": resultado.stderr if resultado.stderr else None
-        }
-
-    except subprocess.TimeoutExpired:
-        return {
-            "exito": False,
-            "error": "Comando excedió tiempo límite (30s)",
-            "comando": " ".join(cmd_parts)
-        }
+            os.chmod(local, 0o755)
+        except Exception:
+            pass
+        return {"exito": True, "local_path": str(local)}
     except Exception as e:
-        return {
-            "exito": False,
-            "error": str(e),
-            "comando": " ".join(cmd_parts)
-        }
-
-
-@app.function_name(name="diagnostico_configurar_http")
-@app.route(route="diagnostico-configurar", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def diagnostico_configurar_http(req: func.HttpRequest) -> func.HttpResponse:
-    from memory_manual import aplicar_memoria_manual
-    body = _json_body(req)
-    rid = _s(body.get("resourceId"))
-    ws = _s(body.get("workspaceId"))
-    setting = _s(body.get("settingName") or "fa-logs")
-    logs = body.get("logs") or []
-    metrics = body.get("metrics") or []
+        return {"exito": False, "error": str(e)}
 
-    if not rid or not ws:
-        return _error("BadRequest", 400, "Parámetros faltantes: resourceId, workspaceId")
 
-    # auth
-    if not _try_default_credential():
-        return _error("AZURE_AUTH_MISSING", 401, "No se pudieron obtener credenciales para ARM",
-                      next_steps=["Configura identidad administrada o variables de servicio."])
+def render_tool_response(status_code: int, payload: dict) -> str:
+    """Renderiza respuestas de herramientas de forma semántica para el agente"""
+    if not isinstance(payload, dict):
+        payload = {}
 
-    try:
-        result = configurar_diagnosticos_azure(
-            rid, ws, setting_name=setting, logs=logs, metrics=metrics)
-        if result.get("ok"):
-            return _json({"ok": True, "resourceId": rid, "settingName": setting, "result": result})
+    if status_code == 200:
+        if payload.get("exito") or payload.get("ok"):
+            return f"✅ Operación exitosa: {payload.get('mensaje', 'Completado correctamente')}"
         else:
-            code = result.get("status", 500) if isinstance(
-                result, dict) else 500
-            return _error("DiagConfigFailed", code, str(result.get("error", result)))
-    except PermissionError as e:
-        return _error("AZURE_AUTH_FORBIDDEN", 403, str(e))
-    except Exception as e:
-        return _error("DiagConfigError", 500, str(e))
-
-
-def _get_monitor_client_from_rid(resource_id: str):  # type: ignore
-    try:
-        cred = _get_arm_credential()
-        if not resource_id or len(resource_id.split('/')) < 3:
-            return None
-        sub = resource_id.split('/')[2]
-        return MonitorManagementClient(cred, sub)  # type: ignore
-    except Exception:
-        return None
-
-
-@app.function_name(name="diagnostico_listar_http")
-@app.route(route="diagnostico-listar", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
-def diagnostico_listar_http(req: func.HttpRequest) -> func.HttpResponse:
-    from memory_manual import aplicar_memoria_manual  # type: ignore
-    rid = req.params.get("resourceId", "")
-    if not rid:
-        return func.HttpResponse(json.dumps({"ok": False, "error": "resourceId requerido"}), mimetype="application/json", status_code=400)
-    try:
-        client = _get_monitor_client_from_rid(rid)
-        items = []  # type: ignore
-        return func.HttpResponse(json.dumps({"ok": True, "settings": items}, ensure_ascii=False), mimetype="application/json")
-    except Exception as e:
-        return func.HttpResponse(json.dumps({"ok": False, "error": str(e)}), mimetype="application/json", status_code=500)
-
-
-@app.function_name(name="diagnostico_eliminar_http")
-@app.route(route="diagnostico-eliminar", methods=["POST", "DELETE"], auth_level=func.AuthLevel.ANONYMOUS)
-# type: ignore
-def diagnostico_eliminar_http(req: func.HttpRequest) -> func.HttpResponse:
-    body = req.get_json() if req.method == "POST" else {}
-    rid = (body or {}).get("resourceId") or req.params.get("resourceId", "")
-    name = (body or {}).get("settingName") or req.params.get("settingName", "")
-    if not rid or not name:
-        return func.HttpResponse(json.dumps({"ok": False, "error": "resourceId y settingName requeridos"}), mimetype="application/json", status_code=400)
-    try:
-        return func.HttpResponse(json.dumps({"ok": True, "deleted": name, "resourceId": rid}), mimetype="application/json")
-    except Exception as e:
-        return func.HttpResponse(json.dumps({"ok": False, "error": str(e)}), mimetype="application/json", status_code=500)
-
-
-def _get_rm_client():  # type: ignore
-    cred = _get_arm_credential()
-    sub = os.environ.get("AZURE_SUBSCRIPTION_ID")
-    return ResourceManagementClient(cred, sub)  # type: ignore
-
-
-# type: ignore
-def set_cors(function_app: str, resource_group: str, allowed_origins: List[str]) -> dict:
-    """Configura CORS usando REST API"""
-    return set_cors_rest(resource_group, function_app, allowed_origins)
-
-
-def set_app_settings(function_app: str, resource_group: str, settings: dict) -> dict:  # type: ignore
-    """Actualiza app settings usando REST API"""
-    return set_app_settings_rest(resource_group, function_app, settings)
-
-
-def update_app_service_plan(plan_name: str, resource_group: str, sku: str) -> dict:  # type: ignore
-    """Actualiza el plan de App Service usando REST API"""
-    try:
-        path = f"/subscriptions/{_sub_id()}/resourceGroups/{resource_group}/providers/Microsoft.Web/serverfarms/{plan_name}?api-version=2023-12-01"
-        body = {"sku": {"name": sku}}
-        _arm_patch(path, body)
-        return {"ok": True, "plan_updated": sku}
-    except Exception as e:
-        return {"ok": False, "error": str(e)}
-
-
-def _deploy_foundry_models(req, body, memory_service, aplicar_memoria_cosmos_directo, aplicar_memoria_manual):
-    """
-    Despliega modelos en Microsoft Foundry basado en el AGENT_REGISTRY.
-
-    Payload esperado:
-    {
-        "models": ["claude-3-5-sonnet-20241022", "mistral-large-2411"],
-        "action": "deployModels"  # opcional
-    }
-
-    Returns:
-        HttpResponse con estado del deployment
-    """
-    import json
-    import time
-    from datetime import datetime
-
-    try:
-        # Obtener lista de modelos del router_agent
-        from router_agent import AGENT_REGISTRY
-
-        # Extraer modelos solicitados
-        requested_models = body.get("models", [])
-        if isinstance(requested_models, str):
-            requested_models = [requested_models]
-
-        # Si no se especifican modelos, usar todos del AGENT_REGISTRY
-        if not requested_models:
-            requested_models = list(set(
-                agent_config.get("model")
-                for agent_config in AGENT_REGISTRY.values()
-                if agent_config.get("model")
-            ))
-            logging.info(
-                f"🤖 [FoundryDeploy] No se especificaron modelos, usando todos del registry: {requested_models}")
-
-        # Validar que los modelos están en nuestro registry
-        registry_models = {
-            agent_config.get("model"): intent
-            for intent, agent_config in AGENT_REGISTRY.items()
-            if agent_config.get("model")
-        }
-
-        models_deployed = []
-        already_active = []
-        failed = []
-        deployment_details = []
-
-        for model in requested_models:
-            model_name = str(model or "").strip()
-            if not model_name:
-                failed.append({
-                    "model": model,
-                    "error": "Nombre de modelo vacío o inválido"
-                })
-                continue
-
-            try:
-                if model_name not in registry_models:
-                    failed.append({
-                        "model": model_name,
-                        "error": "Modelo no encontrado en AGENT_REGISTRY",
-                        "available_models": list(registry_models.keys())
-                    })
-                    continue
-
-                intent = registry_models[model_name]
-                agent_config = AGENT_REGISTRY[intent]
-
-                # Simular verificación de estado del modelo
-                # TODO: Reemplazar con llamada real al Foundry SDK
-                is_deployed = _check_model_deployment_status(
-                    model_name, agent_config)
-
-                if is_deployed:
-                    already_active.append(model_name)
-                    deployment_details.append({
-                        "model": model_name,
-                        "intent": intent,
-                        "agent": agent_config.get("agent_id"),
-                        "status": "already_active",
-                        "endpoint": agent_config.get("endpoint"),
-                        "project_id": agent_config.get("project_id")
-                    })
-                    logging.info(
-                        f"✅ [FoundryDeploy] Modelo {model_name} ya está activo")
-                else:
-                    # Simular deployment del modelo
-                    # TODO: Reemplazar con llamada real al Foundry SDK
-                    success = _deploy_model_to_foundry(model_name, agent_config)
-
-                    if success:
-                        models_deployed.append(model_name)
-                        deployment_details.append({
-                            "model": model_name,
-                            "intent": intent,
-                            "agent": agent_config.get("agent_id"),
-                            "status": "deployed",
-                            "endpoint": agent_config.get("endpoint"),
-                            "project_id": agent_config.get("project_id"),
-                            "deployment_time": datetime.now().isoformat()
-                        })
-                        logging.info(
-                            f"🚀 [FoundryDeploy] Modelo {model_name} desplegado exitosamente")
-                    else:
-                        failed.append({
-                            "model": model_name,
-                            "error": "Falló el deployment en Foundry",
-                            "intent": intent
-                        })
-                        logging.error(
-                            f"❌ [FoundryDeploy] Falló deployment de {model_name}")
-
-            except Exception as e:
-                failed.append({
-                    "model": model_name or model,
-                    "error": str(e),
-                    "traceback": str(e)
-                })
-                logging.error(
-                    f"❌ [FoundryDeploy] Error procesando modelo {model_name}: {e}")
-
-        # Preparar respuesta
-        all_successful = len(failed) == 0
-        res = {
-            "ok": all_successful,
-            "action": "deployModels",
-            "models_deployed": models_deployed,
-            "already_active": already_active,
-            "failed": failed,
-            "summary": {
-                "total_requested": len(requested_models),
-                "deployed": len(models_deployed),
-                "already_active": len(already_active),
-                "failed": len(failed)
-            },
-            "deployment_details": deployment_details,
-            "foundry_endpoint": AGENT_REGISTRY.get("conversacion_general", {}).get("endpoint", ""),
-            "timestamp": datetime.now().isoformat()
-        }
-
-        # Aplicar memoria
-        res = aplicar_memoria_cosmos_directo(req, res)
-        res = aplicar_memoria_manual(req, res)
-
-        # Registrar en memoria
-        memory_service.registrar_llamada(
-            source="deploy_foundry_models",
-            endpoint="/api/deploy",
-            method=req.method,
-            params={
-                "session_id": req.headers.get("Session-ID"),
-                "agent_id": req.headers.get("Agent-ID"),
-                "action": "deployModels",
-                "models_requested": requested_models
-            },
-            response_data=res,
-            success=all_successful
-        )
+            return f"ℹ️ Información: {payload.get('mensaje', 'Operación procesada')}"
+    elif status_code == 201:
+        return f"✅ Recurso creado exitosamente: {payload.get('mensaje', 'Nuevo recurso disponible')}"
+    elif status_code == 400:
+        error_msg = payload.get('error', 'Solicitud incorrecta')
+        return f"❌ Error de solicitud: {error_msg}"
+    elif status_code == 401:
+        return f"🔒 Error de autenticación: {payload.get('error', 'Credenciales requeridas')}"
+    elif status_code == 403:
+        return f"🚫 Error de permisos: {payload.get('error', 'Acceso denegado')}"
+    elif status_code == 404:
+        return f"🔍 No encontrado: {payload.get('error', 'Recurso no existe')}"
+    elif status_code == 409:
+        return f"⚠️ Conflicto: {payload.get('error', 'El recurso ya existe')}"
+    elif status_code == 500:
+        return f"💥 Error interno: {payload.get('error', 'Error del servidor')}"
+    else:
+        return f"ℹ️ Status {status_code}: {payload.get('error', payload.get('mensaje', 'Respuesta del servidor'))}"
 
-        # 207 Multi-Status para resultados mixtos
-        status_code = 200 if all_successful else 207
-        return func.HttpResponse(
-            json.dumps(res, ensure_ascii=False),
-            status_code=status_code,
-            mimetype="application/json"
-        )
 
+def debug_auth_environment():
+    """Debug completo del entorno de autenticación"""
+    env_vars = {
+        'IDENTITY_ENDPOINT': os.getenv('IDENTITY_ENDPOINT'),
+        'WEBSITE_INSTANCE_ID': os.getenv('WEBSITE_INSTANCE_ID'),
+        'AZURE_CLIENT_ID': 'SET' if os.getenv('AZURE_CLIENT_ID') else 'NOT SET',
+        'FUNCTIONS_WORKER_RUNTIME': os.getenv('FUNCTIONS_WORKER_RUNTIME')
+    }
+    az_available = shutil.which("az") is not None
+    auth_status = "UNKNOWN"
+    try:
+        result = command_executor.run(
+            ['az', 'account', 'show'],
+            timeout=10, env=_az_env(), coalesce=True
+        )
+        if result.returncode == 0:
+            account_info = json.loads(result.stdout)
+            auth_status = f"AUTHENTICATED - Type: {account_info.get('user', {}).get('type', 'unknown')}"
+        else:
+            auth_status = f"NOT_AUTHENTICATED - Error: {result.stderr}"
     except Exception as e:
-        error_msg = f"Error en deployment de modelos Foundry: {str(e)}"
-        logging.error(f"❌ [FoundryDeploy] {error_msg}")
+        auth_status = f"CHECK_FAILED - {str(e)}"
+    return {
+        "environment_vars": env_vars,
+        "az_cli_available": az_available,
+        "authentication_status": auth_status
+    }
 
-        res = {
-            "ok": False,
-            "error_code": "FOUNDRY_DEPLOYMENT_ERROR",
-            "cause": error_msg,
-            "action": "deployModels"
-        }
 
-        # Aplicar memoria
-        res = aplicar_memoria_cosmos_directo(req, res)
-        res = aplicar_memoria_manual(req, res)
+# === FUNCIONES DE SOPORTE INTEGRADAS ===
 
-        # Registrar error
-        memory_service.registrar_llamada(
-            source="deploy_foundry_models_error",
-            endpoint="/api/deploy",
-            method=req.method,
-            params={
-                "session_id": req.headers.get("Session-ID"),
-                "agent_id": req.headers.get("Agent-ID"),
-                "action": "deployModels"
-            },
-            response_data=res,
-            success=False
-        )
 
-        return func.HttpResponse(
-            json.dumps(res),
-            status_code=500,
-            mimetype="application/json"
-        )
+# Verbos de az sin efectos: llamadas idénticas concurrentes comparten proceso
+_AZ_VERBOS_LECTURA = {"show", "list", "get", "exists", "list-locations", "get-access-token"}
 
 
-def _check_model_deployment_status(model: str, agent_config: dict) -> bool:
+def _az_env() -> dict:
     """
-    Verifica si un modelo está desplegado en Foundry.
-
-    TODO: Reemplazar con llamada real al Foundry SDK/API
+    Entorno común de los procesos az: UTF-8 y la misma sesión (AZURE_CONFIG_DIR
+    y caché de tokens heredados). Sin telemetría, az no lanza un proceso
+    extra al terminar cada comando.
     """
+    env = os.environ.copy()
+    env['PYTHONIOENCODING'] = 'utf-8'
+    env['LANG'] = 'en_US.UTF-8'
+    env.setdefault('AZURE_CORE_COLLECT_TELEMETRY', 'false')
+    return env
+
+
+def _az_es_lectura(args) -> bool:
+    """True si el verbo del comando az (último posicional antes de flags) es de solo lectura."""
+    posicionales = []
+    for arg in args:
+        if str(arg).startswith("-"):
+            break
+        posicionales.append(str(arg))
+    return bool(posicionales) and posicionales[-1] in _AZ_VERBOS_LECTURA
+
+
+def _run_az(args, timeout=30):
+    """Ejecuta comandos Azure CLI con encoding UTF-8 forzado"""
+    az_bin = shutil.which("az.cmd") or shutil.which("az") or "az"
+
+    # Si el ejecutable es az.cmd, no repitas "az" en args
+    if az_bin.endswith("az.cmd") and args and args[0] == "az":
+        args = args[1:]
+
     try:
-        # Simulación - en producción usar Foundry SDK
-        # foundry_client = get_foundry_client()
-        # return foundry_client.models.is_deployed(model)
+        result = command_executor.run(
+            [az_bin] + args,
+            timeout=timeout,
+            env=_az_env(),
+            coalesce=_az_es_lectura(args)
+        )
+        return result
+    except Exception as e:
+        logging.error(f"Error ejecutando az CLI: {e}")
+        raise
 
-        # Por ahora simular que algunos modelos comunes ya están desplegados
-        commonly_deployed = [
-            "gpt-4o-mini-2024-07-18",
-            "gpt-4-2024-11-20"
-        ]
 
-        is_deployed = model in commonly_deployed
-        logging.info(
-            f"🔍 [FoundryDeploy] Verificando modelo {model}: {'desplegado' if is_deployed else 'no desplegado'}")
-        return is_deployed
+def _run_docker(command, timeout=300):
+    """Ejecuta comandos Docker con encoding UTF-8"""
+    # Forzar entorno UTF-8
+    env = os.environ.copy()
+    env['PYTHONIOENCODING'] = 'utf-8'
+    env['LANG'] = 'en_US.UTF-8'
 
+    try:
+        # Builds/push largos: prioridad baja para no retrasar comandos interactivos
+        result = command_executor.run(
+            command,
+            shell=True,
+            timeout=timeout,
+            env=env,
+            priority=PRIORITY_BACKGROUND
+        )
+        return result
     except Exception as e:
-        logging.error(f"❌ Error verificando estado de modelo {model}: {e}")
-        return False
+        logging.error(f"Error ejecutando: {e}")
+        raise
 
 
-def _deploy_model_to_foundry(model: str, agent_config: dict) -> bool:
+def ensure_mi_login():
     """
-    Despliega un modelo en Foundry.
-
-    TODO: Reemplazar con llamada real al Foundry SDK/API
+    Autenticación inteligente:
+    - PRIORIDAD 1: Managed Identity (en Azure)
+    - PRIORIDAD 2: Sesión ya iniciada
+    - PRIORIDAD 3: Service Principal (local)
+    - PRIORIDAD 4: Login interactivo (evitado)
     """
-    try:
-        # Simulación - en producción usar Foundry SDK
-        # foundry_client = get_foundry_client()
-        # deployment_result = foundry_client.models.deploy(
-        #     model_name=model,
-        #     project_id=agent_config.get("project_id"),
-        #     endpoint=agent_config.get("endpoint")
-        # )
-        # return deployment_result.success
+    def run_az(args):
+        az_bin = shutil.which("az.cmd") or shutil.which("az") or "az"
+        return command_executor.run(
+            [az_bin] + args,
+            timeout=30,
+            encoding="utf-8",    # 👈 forzar utf-8
+            errors="replace"     # 👈 evita que se rompa con caracteres raros
+        )
 
-        # Simulación: todos los deployments son exitosos por ahora
+    env = {
+        "IDENTITY_ENDPOINT": os.getenv("IDENTITY_ENDPOINT"),
+        "WEBSITE_INSTANCE_ID": os.getenv("WEBSITE_INSTANCE_ID"),
+        "AZURE_CLIENT_ID": os.getenv("AZURE_CLIENT_ID"),
+        "FUNCTIONS_WORKER_RUNTIME": os.getenv("FUNCTIONS_WORKER_RUNTIME")
+    }
+
+    # 🔹 Prioridad 1: Managed Identity (si detectamos que estamos en Azure)
+    if env["IDENTITY_ENDPOINT"] or env["WEBSITE_INSTANCE_ID"]:
         logging.info(
-            f"🚀 [FoundryDeploy] Simulando deployment de {model} en proyecto {agent_config.get('project_id')}")
-        time.sleep(0.5)  # Simular latencia de deployment
-        return True
+            "🔐 Azure environment detectado. Probando Managed Identity...")
+        try:
+            result = run_az(["account", "show"])
+            if result.returncode == 0:
+                user = json.loads(result.stdout).get("user", {}).get("type")
+                if user == "managedIdentity":
+                    logging.info("✅ Ya autenticado con Managed Identity")
+                    return True
+            mi_result = run_az(
+                ["login", "--identity", "--allow-no-subscriptions"])
+            if mi_result.returncode == 0:
+                logging.info("✅ Autenticado con Managed Identity")
+                return True
+            logging.warning(f"⚠️ Falló MI: {mi_result.stderr}")
+        except Exception as e:
+            logging.warning(f"⚠️ Error en MI: {str(e)}")
 
+    # 🔹 Prioridad 2: Ya autenticado
+    try:
+        result = run_az(["account", "show"])
+        if result.returncode == 0:
+            logging.info("✅ Ya autenticado en Azure CLI")
+            return True
     except Exception as e:
-        logging.error(f"❌ Error desplegando modelo {model}: {e}")
-        return False
+        logging.warning(f"⚠️ Error verificando autenticación: {str(e)}")
+
+    # 🔹 Prioridad 3: Service Principal
+    client_id = os.getenv("AZURE_CLIENT_ID")
+    client_secret = os.getenv("AZURE_CLIENT_SECRET")
+    tenant_id = os.getenv("AZURE_TENANT_ID")
+    if client_id and client_secret and tenant_id:
+        logging.info("🔐 Intentando login con Service Principal")
+        try:
+            sp_result = run_az([
+                "login", "--service-principal",
+                "-u", client_id, "-p", client_secret,
+                "--tenant", tenant_id, "--allow-no-subscriptions"
+            ])
+            if sp_result.returncode == 0:
+                logging.info("✅ Login SP exitoso")
+                return True
+            logging.warning(f"⚠️ Falló SP: {sp_result.stderr}")
+        except Exception as e:
+            logging.warning(f"⚠️ Error SP: {str(e)}")
 
+    # 🔹 Fallback interactivo → NO usado en backend
+    logging.warning(
+        "🚨 No hay credenciales automáticas, requiere login interactivo")
+    return False
 
-@app.function_name(name="deploy_http")
-@app.route(route="deploy", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def deploy_http(req: func.HttpRequest) -> func.HttpResponse:
-    from memory_manual import aplicar_memoria_manual
-    from cosmos_memory_direct import consultar_memoria_cosmos_directo, aplicar_memoria_cosmos_directo
-    from services.memory_service import memory_service
 
-    import json
-    import time
-    import traceback
+# Usar la función is_running_in_azure ya definida más abajo
 
-    # 🧠 CONSULTAR MEMORIA COSMOS DB DIRECTAMENTE
-    memoria_previa = consultar_memoria_cosmos_directo(req)
-    if memoria_previa and memoria_previa.get("tiene_historial"):
-        logging.info(
-            f"🧠 Modificar-archivo: {memoria_previa['total_interacciones']} interacciones encontradas")
-        logging.info(
-            f"📝 Historial: {memoria_previa.get('resumen_conversacion', '')[:100]}...")
-    advertencias = []
+def _buscar_en_memoria(campo_faltante: str) -> Optional[str]:
+    """Busca valor faltante en memoria de Cosmos"""
 
     try:
-        body = req.get_json()
-        if body is None:
-            body = {}
-    except Exception:
-        body = {}
+        from services.semantic_memory import obtener_estado_sistema
+        CosmosMemoryStore = None
+        try:
+            from services.cosmos_store import CosmosMemoryStore
+        except ImportError:
+            pass
+        estado_resultado = obtener_estado_sistema(48)  # Últimas 48h
 
-    # 🧠 INFERENCIA INTELIGENTE PARA BODY VACÍO O INCOMPLETO
-    # Si el body está vacío pero hay intención de deploy de modelos, construir payload automáticamente
-    if not body or (not body.get("models") and not body.get("resourceGroup") and not body.get("template")):
-        user_message = req.headers.get("X-User-Message", "")
-        intent_keywords = ["deploy", "desplegar",
-                           "model", "modelo", "foundry", "ai"]
+        if estado_resultado.get("exito"):
+            # Buscar en interacciones recientes
+            if CosmosMemoryStore:
+                cosmos = CosmosMemoryStore()
+                if not cosmos.enabled or not cosmos.container:
+                    return None
+                query = f"SELECT * FROM c WHERE CONTAINS(LOWER(c.response_data), '{campo_faltante.lower()}') ORDER BY c.timestamp DESC OFFSET 0 LIMIT 5"
+                items = list(cosmos.container.query_items(
+                    query, enable_cross_partition_query=True))
+            else:
+                return None
 
-        if any(keyword in user_message.lower() for keyword in intent_keywords) or not body:
-            logging.info(
-                "🧠 [DEPLOY] Body vacío detectado, aplicando inferencia inteligente para deployment de modelos")
-            try:
-                from router_agent import AGENT_REGISTRY
-
-                # Flatten de modelos, aceptando str o lista, ignorando tipos no hashable
-                unique_models = []
-                for agent_config in AGENT_REGISTRY.values():
-                    model_entry = agent_config.get("model")
-                    if isinstance(model_entry, str):
-                        unique_models.append(model_entry)
-                    elif isinstance(model_entry, (list, tuple)):
-                        for m in model_entry:
-                            if isinstance(m, str):
-                                unique_models.append(m)
-
-                # Deduplicar preservando orden
-                seen = set()
-                default_models = []
-                for m in unique_models:
-                    if m not in seen:
-                        seen.add(m)
-                        default_models.append(m)
-
-                if not default_models:
-                    raise ValueError(
-                        "AGENT_REGISTRY no contiene modelos válidos")
-
-                inferred_body = {
-                    "action": "deployModels",
-                    "models": body.get("models") or default_models[:2]
-                }
+            for item in items:
+                response_data = item.get("response_data", {})
+                if isinstance(response_data, dict):
+                    # Buscar patrones comunes
+                    if campo_faltante == "resourceGroup" and "resourceGroup" in str(response_data):
+                        return "boat-rental-app-group"  # Valor por defecto detectado
+                    elif campo_faltante == "location" and "location" in str(response_data):
+                        return "eastus"
+        return None
+    except Exception:
+        return None
 
-                for key, value in body.items():
-                    if key not in inferred_body:
-                        inferred_body[key] = value
 
-                body = inferred_body
-                logging.info(f"🧠 [DEPLOY] Payload inferido: {body}")
+def _resolve_windows_absolute_path(raw_path: str, root_path: Path) -> Optional[Path]:
+    r"""
+    Convierte rutas absolutas estilo Windows (C:\...) a rutas dentro del proyecto actual.
+    Permite ejecutar comandos que envían rutas de su máquina local dentro de entornos Linux.
+    """
+    if not raw_path:
+        return None
 
-            except Exception as e:
-                logging.warning(
-                    f"⚠️ [DEPLOY] No se pudo inferir payload de modelos: {e}")
-                res = {
-                    "ok": False,
-                    "error_code": "INVALID_PAYLOAD",
-                    "cause": "Body vacío y no se pudo inferir intención de deployment",
-                    "hint": "Envía payload con 'action': 'deployModels' y 'models': [...] para modelos, o 'resourceGroup' y 'template' para ARM",
-                    "examples": {
-                        "model_deployment": {"action": "deployModels", "models": ["mistral-large-2411"]},
-                        "arm_deployment": {"resourceGroup": "my-rg", "template": {}}
-                    }
-                }
-                res = aplicar_memoria_cosmos_directo(req, res)
-                res = aplicar_memoria_manual(req, res)
-                memory_service.registrar_llamada(
-                    source="deploy_inference_failed",
-                    endpoint="/api/deploy",
-                    method=req.method,
-                    params={"session_id": req.headers.get(
-                        "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
-                    response_data=res,
-                    success=False
-                )
-                return func.HttpResponse(json.dumps(res, ensure_ascii=False), status_code=200, mimetype="application/json")
-
-    # 🤖 DETECCIÓN DE TIPO DE DEPLOYMENT
-    # Si contiene 'models' o action='deployModels' → Foundry Models
-    # Si contiene 'resourceGroup'/'template' → ARM Deployment
-    is_foundry_deployment = (
-        body.get("models") or
-        body.get("action") == "deployModels" or
-        body.get("foundry_models") or
-        "models" in body
-    )
+    import re
 
-    if is_foundry_deployment:
-        logging.info("🤖 [DEPLOY] Detectado deployment de modelos Foundry")
-        return _deploy_foundry_models(req, body, memory_service, aplicar_memoria_cosmos_directo, aplicar_memoria_manual)
-    else:
-        logging.info("🏗️ [DEPLOY] Detectado deployment ARM tradicional")
-        # Continúa con lógica ARM existente...
-
-    rg_name = body.get("resourceGroup") or os.environ.get("RESOURCE_GROUP")
-    location = body.get("location", "eastus")
-    template = body.get("template")
-    template_uri = body.get("templateUri")
-    parameters = body.get("parameters") or {}
-    # acepta validate_only o validate (alias)
-    validate_only = bool(
-        body.get("validate_only", body.get("validate", False)))
-
-    # Validaciones previas
-    if not rg_name:
-        res = {
-            "ok": False, "error_code": "MISSING_RESOURCE_GROUP",
-            "cause": "Falta 'resourceGroup'."
-        }
-        # Aplicar memoria Cosmos y memoria manual
-        res = aplicar_memoria_cosmos_directo(req, res)
-        res = aplicar_memoria_manual(req, res)
+    sanitized = re.sub(r'^[a-zA-Z]:[\\/]+', '', raw_path)
+    sanitized = sanitized.lstrip("\\/")
+    if not sanitized:
+        return None
 
-        # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
-        # Registrar llamada en memoria después de construir la respuesta final
-        logging.info(
-            f"💾 Registering call for deploy: success={res.get('ok', False)}, endpoint=/api/deploy")
-        memory_service.registrar_llamada(
-            source="deploy",
-            endpoint="/api/deploy",
-            method=req.method,
-            params={"session_id": req.headers.get(
-                "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
-            response_data=res,
-            success=res.get("ok", False)
-        )
-        return func.HttpResponse(json.dumps(res), status_code=200, mimetype="application/json")
+    parts = [p for p in re.split(r'[\\/]+', sanitized) if p]
+    if not parts:
+        return None
 
-    if not (template or template_uri):
-        res = {
-            "ok": False, "error_code": "MISSING_TEMPLATE",
-            "cause": "No se recibió 'template' ni 'templateUri'."
-        }
-        # Aplicar memoria Cosmos y memoria manual
-        res = aplicar_memoria_cosmos_directo(req, res)
-        res = aplicar_memoria_manual(req, res)
+    for idx in range(len(parts)):
+        candidate = root_path.joinpath(*parts[idx:])
+        if candidate.exists():
+            return candidate
+    return None
 
-        # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
-        # Registrar llamada en memoria después de construir la respuesta final
-        logging.info(
-            f"💾 Registering call for deploy: success={res.get('ok', False)}, endpoint=/api/deploy")
-        memory_service.registrar_llamada(
-            source="deploy",
-            endpoint="/api/deploy",
-            method=req.method,
-            params={"session_id": req.headers.get(
-                "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
-            response_data=res,
-            success=res.get("ok", False)
-        )
-        return func.HttpResponse(json.dumps(res), status_code=200, mimetype="application/json")
-
-    # Validación más flexible del template para permitir templates básicos
-    if template is not None:
-        if not isinstance(template, dict):
-            res = {
-                "ok": False, "error_code": "INVALID_TEMPLATE",
-                "cause": "El 'template' debe ser un objeto JSON válido."
-            }
-            # Aplicar memoria Cosmos y memoria manual
-            res = aplicar_memoria_cosmos_directo(req, res)
-            res = aplicar_memoria_manual(req, res)
 
-            # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
-            # Registrar llamada en memoria después de construir la respuesta final
-            logging.info(
-                f"💾 Registering call for deploy: success={res.get('ok', False)}, endpoint=/api/deploy")
-            memory_service.registrar_llamada(
-                source="deploy",
-                endpoint="/api/deploy",
-                method=req.method,
-                params={"session_id": req.headers.get(
-                    "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
-                response_data=res,
-                success=res.get("ok", False)
-            )
-            return func.HttpResponse(json.dumps(res), status_code=200, mimetype="application/json")
-        # Si no tiene resources, agregamos un array vacío para hacer el template válido
-        if not template.get("resources"):
-            logging.info(
-                "Template sin resources detectado, agregando array vacío para validación")
-            template.setdefault("resources", [])
+def _locate_file_in_root(path_candidate: str, root_path: Path) -> Optional[Path]:
+    """
+    Busca un archivo dentro del root del proyecto considerando rutas absolutas,
+    rutas Windows provenientes del cliente y rutas relativas con subdirectorios.
+    """
+    if not path_candidate:
+        return None
 
-    # Normalizar parámetros a formato ARM { name: { value: ... } }
-    def _norm(p):
-        return {k: (v if isinstance(v, dict) and "value" in v else {"value": v})
-                for k, v in (p or {}).items()}
-    parameters = _norm(parameters)
+    import re
 
-    # ⬇️ Usa modelos tipados si tu SDK los expone
-    from typing import Dict, Any, cast
-    try:
-        # <- si existe en tu versión
-        from azure.mgmt.resource.resources.models import DeploymentParameter
-        deployment_parameters: Dict[str, DeploymentParameter] = {
-            k: DeploymentParameter(value=v["value"])
-            for k, v in parameters.items()
-        }
-        # ✅ tipado fuerte, sin warnings
-        params_for_props = deployment_parameters
-    except Exception:
-        # Fallback: usa el dict JSON normalizado (runtime OK) y silencia el checker
-        # type: ignore[assignment]
-        params_for_props = cast(Dict[str, Any], parameters)
+    normalized = path_candidate.replace('/', os.sep).replace('\\', os.sep)
+    windows_absolute = bool(re.match(r'^[a-zA-Z]:[\\/]', path_candidate))
+    normalized_path = Path(normalized)
+    candidate_paths = []
 
-    # Si es solo validación, no inicialices ARM ni credenciales
-    if validate_only:
-        res = {
-            "ok": True, "mode": "validate_only",
-            "resourceGroup": rg_name, "location": location,
-            "hasTemplate": bool(template), "hasTemplateUri": bool(template_uri),
-            "parameters_keys": list(parameters.keys())
-        }
-        # Aplicar memoria Cosmos y memoria manual
-        res = aplicar_memoria_cosmos_directo(req, res)
-        res = aplicar_memoria_manual(req, res)
+    # Rutas absolutas válidas (Linux/Unix)
+    if normalized_path.is_absolute() and not windows_absolute:
+        candidate_paths.append(normalized_path)
 
-        # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
-        # Registrar llamada en memoria después de construir la respuesta final
-        logging.info(
-            f"💾 Registering call for deploy: success={res.get('ok', False)}, endpoint=/api/deploy")
-        memory_service.registrar_llamada(
-            source="deploy",
-            endpoint="/api/deploy",
-            method=req.method,
-            params={"session_id": req.headers.get(
-                "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
-            response_data=res,
-            success=res.get("ok", False)
-        )
-        return func.HttpResponse(json.dumps(res), status_code=200, mimetype="application/json")
+    # Intentar mapear rutas absolutas de Windows
+    if windows_absolute:
+        candidate_paths.append(Path(path_candidate))
+        candidate_paths.append(normalized_path)
+        mapped = _resolve_windows_absolute_path(path_candidate, root_path)
+        if mapped:
+            candidate_paths.append(mapped)
 
-    # Credenciales: preferir MI de sistema; fallback a DefaultAzureCredential
-    try:
+    # Interpretar como ruta relativa directa desde root
+    candidate_paths.append(root_path / normalized_path)
+
+    for candidate in candidate_paths:
         try:
-            credential = ManagedIdentityCredential()  # sin client_id => MI de sistema
-            # touch token para fallar temprano si no hay MI
-            credential.get_token("https://management.azure.com/.default")
+            if candidate and candidate.exists():
+                return candidate
         except Exception:
-            credential = DefaultAzureCredential(
-                exclude_environment_credential=True,
-                exclude_shared_token_cache_credential=True
-            )
-        subscription_id = os.environ.get("AZURE_SUBSCRIPTION_ID")
-        if not subscription_id:
-            res = {
-                "ok": False, "error_code": "MISSING_SUBSCRIPTION_ID",
-                "cause": "Falta AZURE_SUBSCRIPTION_ID en App Settings."
-            }
-            # Aplicar memoria Cosmos y memoria manual
-            res = aplicar_memoria_cosmos_directo(req, res)
-            res = aplicar_memoria_manual(req, res)
+            continue
 
-            # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
-            # Registrar llamada en memoria después de construir la respuesta final
-            logging.info(
-                f"💾 Registering call for deploy: success={res.get('ok', False)}, endpoint=/api/deploy")
-            memory_service.registrar_llamada(
-                source="deploy",
-                endpoint="/api/deploy",
-                method=req.method,
-                params={"session_id": req.headers.get(
-                    "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
-                response_data=res,
-                success=res.get("ok", False)
-            )
-            return func.HttpResponse(json.dumps(res), status_code=500, mimetype="application/json")
-        rm_client = ResourceManagementClient(credential, subscription_id)
+    # Búsqueda recursiva por nombre
+    filename = normalized_path.name
+    if not filename:
+        return None
+
+    try:
+        for ruta in root_path.rglob(filename):
+            if ruta.is_file():
+                return ruta
     except Exception as e:
-        res = {
-            "ok": False, "error_code": "CREDENTIALS_ERROR",
-            "cause": str(e)
-        }
-        # Aplicar memoria Cosmos y memoria manual
-        res = aplicar_memoria_cosmos_directo(req, res)
-        res = aplicar_memoria_manual(req, res)
+        logging.warning(f"Error buscando {filename} en {root_path}: {e}")
+        return None
 
-        # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
-        # Registrar llamada en memoria después de construir la respuesta final
-        logging.info(
-            f"💾 Registering call for deploy: success={res.get('ok', False)}, endpoint=/api/deploy")
-        memory_service.registrar_llamada(
-            source="deploy",
-            endpoint="/api/deploy",
-            method=req.method,
-            params={"session_id": req.headers.get(
-                "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
-            response_data=res,
-            success=res.get("ok", False)
-        )
-        return func.HttpResponse(json.dumps(res), status_code=500, mimetype="application/json")
+    return None
 
-    # Crear RG y lanzar deployment
-    try:
-        rm_client.resource_groups.create_or_update(
-            rg_name, ResourceGroup(location=location))  # type: ignore
-
-        # Normalizar template antes de crear DeploymentProperties
-        import json as _json
-        template = template or {}
-        template = _json.loads(_json.dumps(template, separators=(",", ":")))
-        template.setdefault("parameters", {})
-        template.setdefault("variables", {})
-        template.setdefault("outputs", {})
-
-        # exclusividad: si hay templateUri, NO mandes template inline
-        tpl_link = TemplateLink(uri=template_uri) if template_uri else None
-        tpl_inline = None if tpl_link else (template or None)
-        props = DeploymentProperties(
-            mode=DeploymentMode.INCREMENTAL,
-            template=tpl_inline,
-            template_link=tpl_link,
-            parameters=params_for_props
-        )
-        deployment = Deployment(properties=props)
-        deployment_name = f"deploy-{int(time.time())}"
 
-        poller = rm_client.deployments.begin_create_or_update(
-            rg_name, deployment_name, deployment  # type: ignore
-        )
-        result = poller.result()
-        state = getattr(result.properties, "provisioning_state", "Unknown")
+def _auto_resolve_file_paths(comando: str) -> str:
+    """
+    Resuelve rutas de archivos en comandos de forma robusta.
+    Convierte rutas relativas a absolutas automáticamente.
+    Busca recursivamente en subdirectorios si no encuentra en raíz.
+    """
+    if not comando:
+        return comando
 
-        res = {
-            "ok": True, "deploymentName": deployment_name,
-            "resourceGroup": rg_name, "location": location, "state": state
-        }
-        # Aplicar memoria Cosmos y memoria manual
-        res = aplicar_memoria_cosmos_directo(req, res)
-        res = aplicar_memoria_manual(req, res)
+    import re
+    import glob
 
-        # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
-        # Registrar llamada en memoria después de construir la respuesta final
-        logging.info(
-            f"💾 Registering call for deploy: success={res.get('ok', False)}, endpoint=/api/deploy")
-        memory_service.registrar_llamada(
-            source="deploy",
-            endpoint="/api/deploy",
-            method=req.method,
-            params={"session_id": req.headers.get(
-                "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
-            response_data=res,
-            success=res.get("ok", False)
-        )
-        return func.HttpResponse(json.dumps(res, default=str), mimetype="application/json")
+    # Detectar comandos que usan archivos
+    file_commands = ['grep', 'sed', 'findstr', 'awk', 'cat', 'head',
+                     'tail', 'Get-Content', 'python', 'node', 'Select-String']
+    if not any(cmd in comando for cmd in file_commands):
+        return comando
 
-    except HttpResponseError as hre:
-        status = getattr(hre, "status_code", 500) or 500
-        res = {
-            "ok": False, "error_code": "ARM_HTTP_ERROR",
-            "status": status, "cause": getattr(hre, "message", str(hre))
-        }
-        # Aplicar memoria Cosmos y memoria manual
-        res = aplicar_memoria_cosmos_directo(req, res)
-        res = aplicar_memoria_manual(req, res)
+    # 🔥 FIX: Patrón mejorado que captura rutas con guiones, subdirectorios y discos de Windows
+    extensions = r'(py|js|ts|md|json|txt|sh|ps1|yml|yaml|tsx|jsx)'
+    file_pattern = re.compile(
+        rf'(?P<abs_win>[a-zA-Z]:[\\/][^\\s"\'|]+\.(?:{extensions}))|'
+        rf'(?P<rel>[a-zA-Z0-9_\-./\\]+\.(?:{extensions}))'
+    )
+    matches = []
+    for match in file_pattern.finditer(comando):
+        match_value = match.group('abs_win') or match.group('rel')
+        if match_value:
+            matches.append(match_value)
 
-        # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
-        # Registrar llamada en memoria después de construir la respuesta final
-        logging.info(
-            f"💾 Registering call for deploy: success={res.get('ok', False)}, endpoint=/api/deploy")
-        memory_service.registrar_llamada(
-            source="deploy",
-            endpoint="/api/deploy",
-            method=req.method,
-            params={"session_id": req.headers.get(
-                "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
-            response_data=res,
-            success=res.get("ok", False)
-        )
-        return func.HttpResponse(json.dumps(res), status_code=status, mimetype="application/json")
+    if not matches:
+        return comando
 
-    except Exception as e:
-        res = {
-            "ok": False, "error_code": "DEPLOYMENT_EXCEPTION",
-            "cause": str(e), "trace": traceback.format_exc()[:2000]
-        }
-        # Aplicar memoria Cosmos y memoria manual
-        res = aplicar_memoria_cosmos_directo(req, res)
-        res = aplicar_memoria_manual(req, res)
+    # Determinar root según entorno
+    root_path = Path("/home/site/wwwroot") if IS_AZURE else PROJECT_ROOT
 
-        # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
-        # Registrar llamada en memoria después de construir la respuesta final
-        logging.info(
-            f"💾 Registering call for deploy: success={res.get('ok', False)}, endpoint=/api/deploy")
-        memory_service.registrar_llamada(
-            source="deploy",
-            endpoint="/api/deploy",
-            method=req.method,
-            params={"session_id": req.headers.get(
-                "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
-            response_data=res,
-            success=res.get("ok", False)
-        )
-        return func.HttpResponse(json.dumps(res), status_code=500, mimetype="application/json")
+    for referenced_path in matches:
+        resolved_path = _locate_file_in_root(referenced_path, root_path)
+        if resolved_path:
+            logging.info(
+                f"✅ Ruta resuelta: {referenced_path} -> {resolved_path}")
+            if platform.system() == "Windows":
+                double_quoted = f'"{referenced_path}"'
+                single_quoted = f"'{referenced_path}'"
+                replacement = f'"{resolved_path}"'
+
+                if double_quoted in comando:
+                    comando = comando.replace(double_quoted, replacement)
+                elif single_quoted in comando:
+                    comando = comando.replace(
+                        single_quoted, f"'{resolved_path}'")
+                else:
+                    comando = comando.replace(referenced_path, replacement)
+            else:
+                comando = comando.replace(
+                    referenced_path, str(resolved_path).replace(' ', '\\ '))
+        else:
+            logging.warning(
+                f"⚠️ No existe (ni en raíz ni subdirectorios): {referenced_path}")
+    return comando
 
 
-@app.function_name(name="configurar_cors_http")
-@app.route(route="configurar-cors", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def configurar_cors_http(req: func.HttpRequest) -> func.HttpResponse:
-    from memory_manual import aplicar_memoria_manual
-    """Configura CORS usando SDK"""
-    try:
-        body = req.get_json() if req.get_body() else {}
-    except (ValueError, TypeError):
-        return func.HttpResponse(
-            json.dumps({
-                "ok": False,
-                "error": "Request body debe ser JSON válido",
-                "ejemplo": {
-                    "function_app": "mi-function-app",
-                    "resource_group": "mi-resource-group",
-                    "allowed_origins": ["https://mi-dominio.com", "*"]
-                }
-            }),
-            mimetype="application/json",
-            status_code=400
-        )
+def ejecutar_operacion_dinamica(cliente, operacion: str, params: list):
+    """
+    Ejecuta operaciones dinámicas usando los clientes SDK de Azure
+    Maneja operaciones comunes como list, show, create, etc.
+    """
+    # Mapeo de operaciones comunes a métodos SDK
+    if operacion == "list":
+        if hasattr(cliente, "resource_groups"):
+            # ResourceManagementClient
+            items = list(cliente.resource_groups.list())
+            return [{"name": item.name, "location": item.location, "id": item.id} for item in items]
+        elif hasattr(cliente, "storage_accounts"):
+            # StorageManagementClient
+            items = list(cliente.storage_accounts.list())
+            return [{"name": item.name, "location": item.location, "kind": item.kind} for item in items]
+        elif hasattr(cliente, "web_apps"):
+            # WebSiteManagementClient
+            items = list(cliente.web_apps.list())
+            return [{"name": item.name, "location": item.location, "state": item.state} for item in items]
 
-    if not body:
-        body = {}
+    elif operacion == "show" and len(params) >= 1:
+        resource_name = params[0]
+        resource_group = params[1] if len(params) >= 2 else None
 
-    # ✅ SOLUCIÓN: Fallback mejorado con DEFAULT_FUNCTION_APP
-    DEFAULT_FUNCTION_APP = os.getenv("DEFAULT_FUNCTION_APP")
+        if hasattr(cliente, "resource_groups") and not resource_group:
+            # ResourceManagementClient - mostrar resource group
+            item = cliente.resource_groups.get(resource_name)
+            return {
+                "name": item.name,
+                "location": item.location,
+                "id": item.id,
+                "properties": item.properties.__dict__ if item.properties else {}
+            }
+        elif hasattr(cliente, "storage_accounts") and resource_group:
+            # StorageManagementClient - mostrar storage account
+            item = cliente.storage_accounts.get_properties(
+                resource_group, resource_name)
+            return {
+                "name": item.name,
+                "location": item.location,
+                "kind": item.kind,
+                "sku": item.sku.name if item.sku else None,
+                "status": item.status_of_primary
+            }
+        elif hasattr(cliente, "web_apps") and resource_group:
+            # WebSiteManagementClient - mostrar web app
+            item = cliente.web_apps.get(resource_group, resource_name)
+            return {
+                "name": item.name,
+                "location": item.location,
+                "state": item.state,
+                "kind": item.kind,
+                "default_host_name": item.default_host_name
+            }
 
-    function_app = (
-        (body.get("function_app") if isinstance(body, dict) else None)
-        or os.getenv("WEBSITE_SITE_NAME")  # Azure (cloud)
-        or os.getenv("AZURE_FUNCTIONAPP_NAME")  # tu var opcional
-        or DEFAULT_FUNCTION_APP  # tu default opcional
-        or "copiloto-semantico-func-us2"  # fallback hardcoded para tests
-    )
+    # Si no encuentra la operación, lanzar excepción descriptiva
+    raise NotImplementedError(
+        f"Operación '{operacion}' no implementada para este tipo de cliente")
 
-    resource_group = (
-        (body.get("resource_group") if isinstance(body, dict) else None)
-        or os.environ.get("RESOURCE_GROUP")
-        or os.environ.get("AZURE_RESOURCE_GROUP")
-        or "boat-rental-app-group"  # fallback hardcoded para tests
-    )
 
-    allowed_origins = body.get("allowed_origins", ["*"])
+def generar_mensaje_natural_sdk(servicio: str, operacion: str, resultado):
+    """
+    Genera mensajes naturales basados en resultados del SDK
+    """
+    if operacion == "list":
+        if isinstance(resultado, list):
+            count = len(resultado)
+            if servicio == "group":
+                return f"✅ Encontré {count} grupos de recursos en la suscripción."
+            elif servicio == "storage":
+                return f"✅ Encontré {count} cuentas de almacenamiento en la suscripción."
+            elif servicio == "webapp":
+                return f"✅ Encontré {count} aplicaciones web en la suscripción."
+            else:
+                return f"✅ Operación list completada. {count} elementos encontrados."
+        else:
+            return "✅ Operación list completada."
 
-    # ✅ VALIDACIÓN SIMPLIFICADA: Solo verificar que los valores finales no estén vacíos
-    missing_params = []
-    if not function_app or not isinstance(function_app, str) or not function_app.strip():
-        missing_params.append("function_app")
-    if not resource_group or not isinstance(resource_group, str) or not resource_group.strip():
-        missing_params.append("resource_group")
+    elif operacion == "show":
+        if isinstance(resultado, dict):
+            nombre = resultado.get("name", "recurso")
+            ubicacion = resultado.get("location", "ubicación desconocida")
+            if servicio == "group":
+                return f"✅ Información del grupo de recursos '{nombre}' en {ubicacion}."
+            elif servicio == "storage":
+                tipo = resultado.get("kind", "tipo desconocido")
+                estado = resultado.get("status", "estado desconocido")
+                return f"✅ Cuenta de almacenamiento '{nombre}' ({tipo}) en {ubicacion}. Estado: {estado}."
+            elif servicio == "webapp":
+                estado = resultado.get("state", "estado desconocido")
+                url = resultado.get("default_host_name", "")
+                url_text = f" (https://{url})" if url else ""
+                return f"✅ Aplicación web '{nombre}' en {ubicacion}. Estado: {estado}{url_text}."
+            else:
+                return f"✅ Información del recurso '{nombre}' obtenida correctamente."
+        else:
+            return "✅ Operación show completada."
 
-    if missing_params:
-        return func.HttpResponse(
-            json.dumps({
-                "ok": False,
-                "error": f"Parámetros requeridos faltantes: {', '.join(missing_params)}",
-                "missing_params": missing_params,
-                "valores_detectados": {
-                    "function_app": function_app if function_app else "no_detectado",
-                    "resource_group": resource_group if resource_group else "no_detectado"
-                },
-                "ejemplo": {
-                    "function_app": "mi-function-app",
-                    "resource_group": "mi-resource-group",
-                    "allowed_origins": ["https://mi-dominio.com", "https://otro-dominio.com"]
-                },
-                "nota": "También puedes configurar las variables de entorno WEBSITE_SITE_NAME y RESOURCE_GROUP"
-            }),
-            mimetype="application/json",
-            status_code=400
-        )
+    return f"✅ Operación {operacion} completada para {servicio}."
 
-    # ✅ LIMPIEZA: Asegurar que sean strings válidos
-    function_app = str(function_app).strip()
-    resource_group = str(resource_group).strip()
 
+def obtener_credenciales_azure():
+    """
+    Obtiene credenciales de Azure de forma híbrida:
+    - En Azure Functions: usa Managed Identity.
+    - En local: usa Azure CLI (az login).
+    """
     try:
-        result = set_cors(function_app, resource_group, allowed_origins)
-        status_code = 200 if result.get("ok") else 500
-        return func.HttpResponse(
-            json.dumps(result),
-            mimetype="application/json",
-            status_code=status_code
-        )
-    except Exception as e:
-        return func.HttpResponse(
-            json.dumps({
-                "ok": False,
-                "error": f"Error inesperado: {str(e)}",
-                "tipo_error": type(e).__name__,
-                "parametros_enviados": {
-                    "function_app": function_app,
-                    "resource_group": resource_group,
-                    "allowed_origins": allowed_origins
-                }
-            }),
-            mimetype="application/json",
-            status_code=500
-        )
+        if os.getenv("WEBSITE_INSTANCE_ID"):
+            # Esta variable de entorno solo existe en Azure Functions
+            credential = ManagedIdentityCredential()
+            logging.info("Usando ManagedIdentityCredential (Azure).")
+        else:
+            credential = AzureCliCredential()
+            logging.info("Usando AzureCliCredential (Local).")
 
+        return credential
 
-@app.function_name(name="configurar_app_settings_http")
-@app.route(route="configurar-app-settings", methods=["GET", "POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def configurar_app_settings_http(req: func.HttpRequest) -> func.HttpResponse:
-    from memory_manual import aplicar_memoria_manual
-    """Configura/consulta app settings usando REST API con validación robusta"""
+    except Exception as e:
+        logging.error(f"Error obteniendo credenciales de Azure: {str(e)}")
+        return None
 
-    # === GET: LEER/VALIDAR CONFIGURACIÓN ===
-    if req.method == "GET":
-        function_app = req.params.get("function_app") or os.environ.get(
-            "WEBSITE_SITE_NAME") or "copiloto-semantico-func-us2"
-        resource_group = req.params.get("resource_group") or os.environ.get(
-            "RESOURCE_GROUP") or "boat-rental-app-group"
-        # Opcional: validar un setting específico
-        setting_name = req.params.get("setting")
 
-        try:
-            # Leer configuración actual usando Azure CLI
-            path = f"/subscriptions/{_sub_id()}/resourceGroups/{resource_group}/providers/Microsoft.Web/sites/{function_app}/config/appsettings/list?api-version=2023-12-01"
+def obtener_estado_function_app(app_name: str, resource_group: str, subscription_id: str) -> dict:
+    WebSiteManagementClient = get_web_client()
+    if WebSiteManagementClient is None:
+        return {"nombre": app_name, "estado": "Unknown", "error": "SDK de administración no instalado"}
 
-            url = f"https://management.azure.com{path}"
-            response = requests.post(url, headers={
-                "Authorization": f"Bearer {_arm_token()}",
-                "Content-Type": "application/json"
-            }, timeout=30)
+    try:
+        credential = obtener_credenciales_azure()
+        if not credential:
+            return {"nombre": app_name, "estado": "Unknown", "error": "Sin credenciales de Azure"}
 
-            if response.status_code == 200:
-                current_settings = response.json().get("properties", {})
-
-                # Si se solicita un setting específico
-                if setting_name:
-                    value = current_settings.get(setting_name)
-                    return func.HttpResponse(
-                        json.dumps({
-                            "ok": True,
-                            "function_app": function_app,
-                            "resource_group": resource_group,
-                            "setting": setting_name,
-                            "value": value,
-                            "exists": value is not None,
-                            "mensaje": f"Setting '{setting_name}' = '{value}'" if value else f"Setting '{setting_name}' no existe"
-                        }, ensure_ascii=False),
-                        mimetype="application/json",
-                        status_code=200
-                    )
+        client = WebSiteManagementClient(credential, subscription_id)
 
-                # Devolver todas las configuraciones
-                return func.HttpResponse(
-                    json.dumps({
-                        "ok": True,
-                        "function_app": function_app,
-                        "resource_group": resource_group,
-                        "settings": current_settings,
-                        "total_settings": len(current_settings),
-                        "mensaje": f"Configuración actual de {function_app}"
-                    }, ensure_ascii=False),
-                    mimetype="application/json",
-                    status_code=200
-                )
-            else:
-                return func.HttpResponse(
-                    json.dumps({
-                        "ok": False,
-                        "exito": False,
-                        "error": f"Function App '{function_app}' no encontrada" if response.status_code == 404 else f"Error: {response.status_code}",
-                        "details": response.text[:500],
-                        "sugerencias": [f"Verifica '{function_app}' en '{resource_group}'"],
-                        "status_code_original": response.status_code
-                    }, ensure_ascii=False),
-                    mimetype="application/json",
-                    status_code=200
-                )
-        except Exception as e:
-            return func.HttpResponse(
-                json.dumps({
-                    "ok": False,
-                    "error": f"Error consultando app settings: {str(e)}",
-                    "tipo_error": type(e).__name__
-                }, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=500
-            )
+        webapp = client.web_apps.get(resource_group, app_name)           # Site
+        config = client.web_apps.get_configuration(
+            resource_group, app_name)  # SiteConfigResource
 
-    # === POST: CONFIGURAR/ACTUALIZAR ===
-    try:
-        body = req.get_json() if req.get_body() else {}
-    except (ValueError, TypeError):
-        return func.HttpResponse(
-            json.dumps({
-                "ok": False,
-                "error": "Request body debe ser JSON válido",
-                "ejemplo": {
-                    "function_app": "mi-function-app",
-                    "resource_group": "mi-resource-group",
-                    "settings": {
-                        "SETTING_1": "valor1",
-                        "SETTING_2": "valor2"
-                    }
-                }
-            }),
-            mimetype="application/json",
-            status_code=400
-        )
+        server_farm_id = _safe(webapp, "server_farm_id", "") or ""
+        plan = server_farm_id.split("/")[-1] if server_farm_id else "Unknown"
+        default_host = _safe(webapp, "default_host_name", "")
 
-    if not body:
-        body = {}
+        return {
+            "nombre": _safe(webapp, "name", app_name),
+            "estado": _safe(webapp, "state", "Unknown"),
+            "plan": plan,
+            # python_version en Windows | linux_fx_version en Linux
+            "runtime": _safe(config, "python_version", None) or _safe(config, "linux_fx_version", "Unknown"),
+            "url": f"https://{default_host}" if default_host else "",
+            "location": _safe(webapp, "location", "Unknown"),
+            "kind": _safe(webapp, "kind", "app"),
+            "enabled": bool(_safe(webapp, "enabled", True)),
+            "availability_state": _safe(webapp, "availability_state", "Unknown"),
+        }
 
-    function_app = (
-        body.get("function_app")
-        or os.environ.get("WEBSITE_SITE_NAME")
-        or os.environ.get("AZURE_FUNCTIONAPP_NAME")
-        or "copiloto-semantico-func-us2"
-    )
-    resource_group = (
-        body.get("resource_group")
-        or os.environ.get("RESOURCE_GROUP")
-        or "boat-rental-app-group"
-    )
-    settings = body.get("settings", {})
-
-    # ✅ VALIDACIÓN MEJORADA: Verificar cada parámetro requerido individualmente
-    missing_params = []
-    if not function_app:
-        missing_params.append("function_app")
-    if not resource_group:
-        missing_params.append("resource_group")
-    if not settings or not isinstance(settings, dict):
-        missing_params.append("settings")
-
-    if missing_params:
-        return func.HttpResponse(
-            json.dumps({
-                "ok": False,
-                "error": f"Parámetros requeridos faltantes: {', '.join(missing_params)}",
-                "missing_params": missing_params,
-                "valores_recibidos": {
-                    "function_app": function_app if function_app else "no_proporcionado",
-                    "resource_group": resource_group if resource_group else "no_proporcionado",
-                    "settings": "proporcionado" if settings else "no_proporcionado"
-                },
-                "ejemplo": {
-                    "function_app": "mi-function-app",
-                    "resource_group": "mi-resource-group",
-                    "settings": {
-                        "AZURE_STORAGE_CONNECTION_STRING": "DefaultEndpointsProtocol=https;...",
-                        "CUSTOM_SETTING": "mi_valor",
-                        "ENVIRONMENT": "production"
-                    }
-                },
-                "nota": "También puedes configurar las variables de entorno WEBSITE_SITE_NAME y RESOURCE_GROUP"
-            }),
-            mimetype="application/json",
-            status_code=400
-        )
+    except ResourceNotFoundError:
+        return {"nombre": app_name, "estado": "NotFound", "error": f"Function App '{app_name}' no encontrada en '{resource_group}'"}
+    except AzureError as e:
+        return {"nombre": app_name, "estado": "Error", "error": str(e)}
+    except Exception as e:
+        logging.exception("obtener_estado_function_app failed")
+        return {"nombre": app_name, "estado": "Unknown", "error": str(e), "tipo_error": type(e).__name__}
 
-    # ✅ VALIDACIÓN ADICIONAL: Verificar que settings no esté vacío
-    if not settings:
-        return func.HttpResponse(
-            json.dumps({
-                "ok": False,
-                "error": "El parámetro 'settings' no puede estar vacío",
-                "ejemplo": {
-                    "function_app": function_app,
-                    "resource_group": resource_group,
-                    "settings": {
-                        "MI_SETTING": "mi_valor",
-                        "OTRO_SETTING": "otro_valor"
-                    }
-                }
-            }),
-            mimetype="application/json",
-            status_code=400
-        )
 
-    # ✅ VALIDACIÓN DE TIPOS: Asegurar que function_app y resource_group sean strings
-    if not isinstance(function_app, str) or not isinstance(resource_group, str):
-        return func.HttpResponse(
-            json.dumps({
-                "ok": False,
-                "error": "function_app y resource_group deben ser strings válidos",
-                "tipos_recibidos": {
-                    "function_app": type(function_app).__name__,
-                    "resource_group": type(resource_group).__name__
-                },
-                "valores_recibidos": {
-                    "function_app": str(function_app) if function_app else "None",
-                    "resource_group": str(resource_group) if resource_group else "None"
-                }
-            }),
-            mimetype="application/json",
-            status_code=400
-        )
+def obtener_info_storage_account(account_name: str, resource_group: str, subscription_id: str) -> dict:
+    StorageManagementClient = get_storage_client()
+    if StorageManagementClient is None:
+        return {"nombre": account_name, "estado": "Unknown", "error": "SDK de administración no instalado"}
 
     try:
-        # Log de debug antes de llamar a set_app_settings
-        logging.info(
-            f"Configurando app settings para {function_app} en {resource_group}")
-        logging.info(
-            f"Settings recibidos: {json.dumps(settings, ensure_ascii=False)[:300]}...")
+        credential = obtener_credenciales_azure()
+        if not credential:
+            return {"nombre": account_name, "estado": "Unknown", "error": "Sin credenciales"}
 
-        result = set_app_settings(function_app, resource_group, settings)
+        client = StorageManagementClient(credential, subscription_id)
+        sa = client.storage_accounts.get_properties(
+            resource_group, account_name)
 
-        # Log del resultado
-        logging.info(f"Resultado de set_app_settings: {result}")
+        # keys puede venir None o sin la propiedad .keys
+        try:
+            keys_obj = client.storage_accounts.list_keys(
+                resource_group, account_name)
+            keys_list = getattr(keys_obj, "keys", None)
+            has_keys = bool(keys_list) and len(keys_list) > 0
+        except Exception:
+            has_keys = False
 
-        # Determinar status code basado en el resultado
-        if result.get("ok"):
-            status_code = 200
-        else:
-            # Si hay error específico, usar código apropiado
-            if "Bad Request" in str(result.get("error", "")):
-                status_code = 400
-            elif "not found" in str(result.get("error", "")).lower():
-                status_code = 404
-            else:
-                status_code = 500
+        sku = _safe(sa, "sku", None)
+        sku_name = getattr(sku, "name", "Unknown") if sku else "Unknown"
+        sku_tier = getattr(sku, "tier", "Unknown") if sku else "Unknown"
+        pe = _safe(sa, "primary_endpoints", None)
+        blob_endpoint = getattr(pe, "blob", None) if pe else None
 
-        return func.HttpResponse(
-            json.dumps(result, ensure_ascii=False),
-            mimetype="application/json",
-            status_code=status_code
-        )
+        return {
+            "nombre": _safe(sa, "name", account_name),
+            "tipo": sku_name,
+            "tier": sku_tier,
+            "replicacion": sku_name,
+            "location": _safe(sa, "location", "Unknown"),
+            "estado": _safe(sa, "status_of_primary", "Available"),
+            "access_tier": _safe(sa, "access_tier", "Hot"),
+            "kind": _safe(sa, "kind", "StorageV2"),
+            "provisioning_state": _safe(sa, "provisioning_state", "Unknown"),
+            "has_keys": has_keys,
+            "blob_endpoint": blob_endpoint,
+        }
 
+    except ResourceNotFoundError:
+        return {"nombre": account_name, "estado": "NotFound", "error": f"Storage Account '{account_name}' no encontrado"}
     except Exception as e:
-        logging.error(
-            f"Error crítico en configurar_app_settings_http: {str(e)}")
-        logging.error(f"Traceback: {traceback.format_exc()}")
+        logging.exception("obtener_info_storage_account failed")
+        return {"nombre": account_name, "estado": "Unknown", "error": str(e), "tipo_error": type(e).__name__}
 
-        return func.HttpResponse(
-            json.dumps({
-                "ok": False,
-                "error": f"Error inesperado: {str(e)}",
-                "tipo_error": type(e).__name__,
-                "parametros_enviados": {
-                    "function_app": function_app,
-                    "resource_group": resource_group,
-                    "settings_count": len(settings),
-                    "settings_keys": list(settings.keys()),
-                    "settings_types": {k: type(v).__name__ for k, v in settings.items()}
-                },
-                "debug_info": {
-                    "subscription_id": os.environ.get("AZURE_SUBSCRIPTION_ID", "not_set"),
-                    "environment_vars": {
-                        "WEBSITE_SITE_NAME": bool(os.environ.get("WEBSITE_SITE_NAME")),
-                        "RESOURCE_GROUP": bool(os.environ.get("RESOURCE_GROUP"))
-                    }
-                },
-                "sugerencias": [
-                    "Verificar que todos los valores en 'settings' sean strings o tipos serializables",
-                    "Confirmar que function_app y resource_group existen en Azure",
-                    "Revisar permisos de la identidad administrada"
-                ]
-            }, ensure_ascii=False),
-            mimetype="application/json",
-            status_code=500
-        )
 
+def obtener_metricas_function_app(app_name: str, resource_group: str, subscription_id: str) -> dict:
+    """
+    Obtiene métricas de la Function App usando el SDK
+    """
+    MonitorManagementClient = get_monitor_client()
+    if MonitorManagementClient is None:
+        return {"error": "SDK de administración no instalado"}
 
-@app.function_name(name="escalar_plan_http")
-@app.route(route="escalar-plan", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def escalar_plan_http(req: func.HttpRequest) -> func.HttpResponse:
-    from memory_manual import aplicar_memoria_manual
-    """Escala el plan de App Service usando SDK"""
     try:
-        body = req.get_json() if req.get_body() else {}
-    except (ValueError, TypeError):
-        return func.HttpResponse(
-            json.dumps({
-                "ok": False,
-                "error": "Request body debe ser JSON válido",
-                "ejemplo": {
-                    "plan_name": "mi-app-service-plan",
-                    "resource_group": "mi-resource-group",
-                    "sku": "EP1"
-                }
-            }),
-            mimetype="application/json",
-            status_code=400
-        )
-
-    if not body:
-        body = {}
-
-    plan_name = body.get("plan_name", "").strip()
-    resource_group = body.get("resource_group") or os.environ.get(
-        "RESOURCE_GROUP", "").strip()
-    sku = body.get("sku", "EP1").strip()
+        credential = obtener_credenciales_azure()
+        if not credential:
+            return {"error": "No se pudieron obtener credenciales"}
 
-    # ✅ VALIDACIÓN: Verificar que plan_name no sea una cadena de prueba
-    if not plan_name:
-        return func.HttpResponse(
-            json.dumps({
-                "ok": False,
-                "error": "Parámetro 'plan_name' es requerido",
-                "ejemplo": {
-                    "plan_name": "mi-app-service-plan-real",
-                    "resource_group": "mi-resource-group",
-                    "sku": "EP1"
-                }
-            }),
-            mimetype="application/json",
-            status_code=400
-        )
+        client = MonitorManagementClient(credential, subscription_id)
 
-    # ✅ VALIDACIÓN: Detectar valores de prueba no válidos
-    invalid_test_values = ["test", "test-string",
-                           "ejemplo", "sample", "placeholder", "demo"]
-    if plan_name.lower() in invalid_test_values:
-        return func.HttpResponse(
-            json.dumps({
-                "ok": False,
-                "error": f"'{plan_name}' no es un nombre de plan válido",
-                "codigo_error": "INVALID_PLAN_NAME",
-                "valores_no_validos": invalid_test_values,
-                "sugerencia": "Proporciona el nombre real de tu App Service Plan",
-                "ejemplo": {
-                    "plan_name": "boat-rental-app-plan",
-                    "resource_group": "boat-rental-app-group",
-                    "sku": "EP1"
-                },
-                "skus_disponibles": ["B1", "B2", "B3", "S1", "S2", "S3", "P1V2", "P2V2", "P3V2", "EP1", "EP2", "EP3"]
-            }),
-            mimetype="application/json",
-            status_code=400
-        )
+        # Construir el resource ID
+        resource_id = f"/subscriptions/{subscription_id}/resourceGroups/{resource_group}/providers/Microsoft.Web/sites/{app_name}"
 
-    if not resource_group:
-        return func.HttpResponse(
-            json.dumps({
-                "ok": False,
-                "error": "Parámetro 'resource_group' es requerido",
-                "ejemplo": {
-                    "plan_name": plan_name,
-                    "resource_group": "mi-resource-group",
-                    "sku": sku
-                }
-            }),
-            mimetype="application/json",
-            status_code=400
-        )
+        # Obtener métricas de las últimas 24 horas
+        from datetime import datetime, timedelta
+        end_time = datetime.utcnow()
+        start_time = end_time - timedelta(hours=24)
 
-    # ✅ VALIDACIÓN: Verificar SKU válido
-    valid_skus = ["B1", "B2", "B3", "S1", "S2", "S3",
-                  "P1V2", "P2V2", "P3V2", "EP1", "EP2", "EP3", "Y1"]
-    if sku.upper() not in valid_skus:
-        return func.HttpResponse(
-            json.dumps({
-                "ok": False,
-                "error": f"SKU '{sku}' no es válido",
-                "skus_validos": valid_skus,
-                "recomendados": ["EP1", "EP2", "EP3"],
-                "ejemplo": {
-                    "plan_name": plan_name,
-                    "resource_group": resource_group,
-                    "sku": "EP1"
-                }
-            }),
-            mimetype="application/json",
-            status_code=400
-        )
+        metricas = {}
 
-    try:
-        result = update_app_service_plan(plan_name, resource_group, sku)
+        # Lista de métricas a obtener
+        metricas_a_consultar = [
+            "Http5xx",
+            "Requests",
+            "Http2xx",
+            "Http4xx",
+            "HttpResponseTime",
+            "AverageResponseTime",
+            "MemoryWorkingSet",
+            "FunctionExecutionCount",
+            "FunctionExecutionUnits"
+        ]
 
-        # Si el resultado indica que el plan no existe, proporcionar más información
-        if not result.get("ok") and "not found" in str(result.get("error", "")).lower():
-            return func.HttpResponse(
-                json.dumps({
-                    "ok": False,
-                    "error": f"App Service Plan '{plan_name}' no encontrado",
-                    "codigo_error": "PLAN_NOT_FOUND",
-                    "resource_group": resource_group,
-                    "plan_solicitado": plan_name,
-                    "sugerencias": [
-                        "Verificar que el nombre del plan sea correcto",
-                        "Confirmar que el plan existe en el resource group especificado",
-                        "Listar planes disponibles con: az appservice plan list --resource-group " + resource_group
-                    ],
-                    "posibles_causas": [
-                        "El plan no existe",
-                        "Permisos insuficientes",
-                        "Resource group incorrecto"
-                    ]
-                }),
-                mimetype="application/json",
-                status_code=404
-            )
+        for metrica_name in metricas_a_consultar:
+            try:
+                result = client.metrics.list(
+                    resource_id,
+                    timespan=f"{start_time.isoformat()}/{end_time.isoformat()}",
+                    interval=timedelta(hours=1),
+                    metricnames=metrica_name,
+                    aggregation='Average,Count,Total'
+                )
 
-        status_code = 200 if result.get("ok") else 500
-        return func.HttpResponse(
-            json.dumps(result),
-            mimetype="application/json",
-            status_code=status_code
-        )
+                # Acceder directamente a .value sin importar MetricListResult
+                for item in getattr(result, 'value', []):
+                    if item.timeseries:
+                        for ts in item.timeseries:
+                            if ts.data:
+                                ultimo_valor = ts.data[-1]
+                                metricas[metrica_name] = {
+                                    "average": ultimo_valor.average,
+                                    "count": ultimo_valor.count,
+                                    "total": ultimo_valor.total,
+                                    "timestamp": ultimo_valor.time_stamp.isoformat() if ultimo_valor.time_stamp else None
+                                }
+                                break  # Solo necesitamos el primer timeseries
+                        break  # Solo necesitamos el primer item
 
-    except Exception as e:
-        return func.HttpResponse(
-            json.dumps({
-                "ok": False,
-                "error": f"Error inesperado: {str(e)}",
-                "tipo_error": type(e).__name__,
-                "parametros_enviados": {
-                    "plan_name": plan_name,
-                    "resource_group": resource_group,
-                    "sku": sku
-                }
-            }),
-            mimetype="application/json",
-            status_code=500
-        )
+            except Exception as e:
+                metricas[metrica_name] = {"error": str(e)}
 
+        return metricas
 
-def _append_log(entry: dict):
-    log_path = Path("scripts/semantic_log.jsonl")
-    try:
-        with open(log_path, "a", encoding="utf-8", errors="replace") as f:
-            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
-    except Exception as e:
-        logging.error(f"❌ Error escribiendo en semantic_log.jsonl: {e}")
-
-
-def _enviar_alerta_slack(fix: dict, motivo: str):
-    mensaje = {
-        "text": f"⚠️ *Rollback ejecutado*\n"
-                f"*ID:* {fix.get('id')}\n"
-                f"*Acción:* {fix.get('accion')}\n"
-                f"*Target:* {fix.get('target')}\n"
-                f"*Prioridad:* {fix.get('prioridad')}\n"
-                f"*Motivo:* {motivo}\n"
-                f"👉 Revisión: https://copiloto-semantico-func-us2.azurewebsites.net/api/revisar-correcciones"
-    }
-    try:
-        webhook = os.environ.get("SLACK_WEBHOOK_URL")
-        if webhook:
-            requests.post(webhook, json=mensaje)
-        else:
-            logging.warning("SLACK_WEBHOOK_URL no definido en configuración.")
     except Exception as e:
-        logging.error(f"Fallo al notificar a Slack: {e}")
+        logging.error(f"Error obteniendo métricas: {str(e)}")
+        return {"error": str(e)}
 
 
-def _rollback_fix(fix_id: str) -> dict:
+def diagnosticar_function_app_con_sdk() -> dict:
     """
-    Realiza rollback de una corrección registrada.
-    - Si el recurso existe y se revierte, registra rollback.
-    - Si el recurso ya no existe o no hay nada que revertir, registra rollback_skip.
-    Ambos casos quedan en el log semántico y notifican a Slack.
+    Diagnóstico completo usando SDK de Azure - OPTIMIZADO para respuesta rápida
     """
-    fixes = _load_pending_fixes()
-    fix = next((f for f in fixes if f["id"] == fix_id), None)
-
-    if not fix:
-        return {"exito": False, "error": f"Fix {fix_id} no encontrado"}
-
-    # Verificar si rollback está disponible
-    if not fix.get("simulacion", {}).get("rollback_disponible", False):
-        return {"exito": False, "error": f"Rollback no disponible para fix {fix_id}"}
-
-    target = fix.get("target", "")
-    rollback_realizado = False
-    rollback_omitido = False
-    motivo_omitido = ""
-    mensaje_log = ""
-    tipo_log = ""
-    try:
-        # Ejemplo: revertir chmod solo si el archivo existe
-        if "Cambiar permisos a ejecutable" in fix.get("simulacion", {}).get("cambios_esperados", []):
-            script_path = Path("/home/site/wwwroot") / target
-            if script_path.exists():
-                os.system(f"chmod 755 {script_path}")
-                rollback_realizado = True
-                mensaje_log = f"Rollback ejecutado para fix {fix_id}"
-                tipo_log = "rollback"
-            else:
-                rollback_omitido = True
-                motivo_omitido = f"El archivo {target} no existe, no se aplicaron cambios"
-                mensaje_log = f"Rollback omitido, archivo {target} no existe"
-                tipo_log = "rollback_skip"
-        else:
-            # Si no hay acción específica, marcar como omitido
-            rollback_omitido = True
-            motivo_omitido = "No hay acción de rollback definida para este fix"
-            mensaje_log = f"Rollback omitido para fix {fix_id}: {motivo_omitido}"
-            tipo_log = "rollback_skip"
-
-        # Actualizar estado del fix
-        fix["estado"] = "revertido" if rollback_realizado else "omitido"
-        _append_log({
-            "tipo": tipo_log,
-            "fix_id": fix_id,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
-            "mensaje": mensaje_log
-        })
 
-        # Notificar Slack en ambos casos
-        if rollback_realizado:
-            _enviar_alerta_slack(
-                fix,
-                motivo="Rollback automático por fallo"
-            )
-            return {"exito": True, "mensaje": mensaje_log, "rollback": "ejecutado"}
-        else:
-            _enviar_alerta_slack(
-                fix,
-                motivo=motivo_omitido or "Rollback omitido"
-            )
-            return {"exito": True, "mensaje": mensaje_log, "rollback": "omitido", "motivo": motivo_omitido}
+    diagnostico = {
+        "timestamp": datetime.now().isoformat(),
+        "function_app": os.environ.get("WEBSITE_SITE_NAME", "local"),
+        "checks": {},
+        "recomendaciones": [],
+        "metricas": {},
+        "optimizado": True
+    }
 
-    except Exception as e:
-        return {"exito": False, "error": str(e)}
+    # Aplicación de clave App Insights (acepta ambos nombres de variable)
+    app_insights_key = (
+        os.environ.get("APPLICATIONINSIGHTS_CONNECTION_STRING")
+        or os.environ.get("APPINSIGHTS_INSTRUMENTATIONKEY")
+    )
+
+    # 1. Verificar configuración básica
+    diagnostico["checks"]["configuracion"] = {
+        "blob_storage": False,
+        "openai_configurado": bool(os.environ.get("AZURE_OPENAI_KEY")),
+        "app_insights": bool(app_insights_key),
+        "ambiente": "Azure" if IS_AZURE else "Local"
+    }
 
+    # 2. Verificar conectividad Blob Storage
+    client = get_blob_client()
+    if client:
+        try:
+            container_client = client.get_container_client(CONTAINER_NAME)
+            if container_client.exists():
+                blob_count = sum(1 for _ in container_client.list_blobs())
+                diagnostico["checks"]["blob_storage_detalles"] = {
+                    "conectado": True,
+                    "container": CONTAINER_NAME,
+                    "archivos": blob_count
+                }
+                diagnostico["checks"]["configuracion"]["blob_storage"] = True
+            else:
+                diagnostico["checks"]["blob_storage_detalles"] = {
+                    "conectado": False,
+                    "error": f"El contenedor '{CONTAINER_NAME}' no existe"
+                }
+        except Exception as e:
+            diagnostico["checks"]["blob_storage_detalles"] = {
+                "conectado": False,
+                "error": str(e)
+            }
 
-@app.function_name(name="rollback_correccion")
-@app.route(route="rollback", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def rollback_correccion(req: func.HttpRequest) -> func.HttpResponse:
-    from memory_manual import aplicar_memoria_manual
-    try:
-        body = req.get_json()
-        fix_id = body.get("id")
+    # Asegurar que todas las claves existen antes de usarlas
+    diagnostico.setdefault("recursos", {})
+    diagnostico.setdefault("metricas", {})
+    diagnostico.setdefault("checks", {})
+    diagnostico.setdefault("alertas", [])
+    diagnostico.setdefault("recomendaciones", [])
 
-        if not fix_id:
-            return func.HttpResponse(
-                json.dumps({"exito": False, "error": "ID de fix requerido"}),
-                mimetype="application/json",
-                status_code=400
-            )
+    # 3. Obtener estado de Function App usando SDK - PARALELO
+    app_name = None
+    resource_group = None
+    subscription_id = None
 
-        # ⚡ lógica de rollback mínima
-        # debes implementarlo según tu dominio
-        resultado = _rollback_fix(fix_id)
+    if IS_AZURE:
+        app_name = "copiloto-semantico-func-us2"  # Hardcoded para evitar problemas
+        resource_group = "boat-rental-app-group"  # Forzar el correcto
+        subscription_id = os.environ.get(
+            "AZURE_SUBSCRIPTION_ID") or "b6b7b7b7-b7b7-b7b7-b7b7-b7b7b7b7b7b7"  # Fallback
 
-        return func.HttpResponse(
-            json.dumps({"exito": True, "resultado": resultado},
-                       ensure_ascii=False, indent=2),
-            mimetype="application/json",
-            status_code=200
-        )
+        if app_name and subscription_id:
+            # Ejecutar operaciones en paralelo con timeout
+            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+                # Función con timeout
+                def get_function_state():
+                    try:
+                        return obtener_estado_function_app(app_name, resource_group, subscription_id)
+                    except Exception as e:
+                        return {"nombre": app_name, "estado": "Unknown", "error": str(e)}
 
-    except Exception as e:
-        return func.HttpResponse(
-            json.dumps({"exito": False, "error": str(e)}),
-            mimetype="application/json",
-            status_code=500
-        )
+                def get_storage_info():
+                    try:
+                        if client:
+                            account_name = client.account_name
+                            if account_name:
+                                return obtener_info_storage_account(account_name, resource_group, subscription_id)
+                    except Exception as e:
+                        return {"estado": "error", "error": str(e)}
+                    return {"estado": "no_client"}
 
+                # Ejecutar con timeout de 5 segundos
+                future_function = executor.submit(get_function_state)
+                future_storage = executor.submit(get_storage_info)
 
-@app.function_name(name="promover_http")
-@app.route(route="promover", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def promover_http(req: func.HttpRequest) -> func.HttpResponse:
-    from memory_manual import aplicar_memoria_manual
-    try:
-        from scripts.auto_promoter import main as run_promotor
-        run_promotor()
-        return func.HttpResponse(
-            json.dumps(
-                {"exito": True, "mensaje": "Promotor ejecutado manualmente"}),
-            status_code=200,
-            mimetype="application/json"
-        )
-    except Exception as e:
-        return func.HttpResponse(
-            json.dumps({"exito": False, "error": str(e)}),
-            status_code=500,
-            mimetype="application/json"
-        )
+                try:
+                    diagnostico["recursos"]["function_app"] = future_function.result(
+                        timeout=5)
+                except concurrent.futures.TimeoutError:
+                    diagnostico["recursos"]["function_app"] = {
+                        "estado": "timeout", "mensaje": "Consulta excedió 5s"}
 
+                try:
+                    diagnostico["recursos"]["storage_account"] = future_storage.result(
+                        timeout=3)
+                except concurrent.futures.TimeoutError:
+                    diagnostico["recursos"]["storage_account"] = {
+                        "estado": "timeout", "mensaje": "Consulta excedió 3s"}
 
-@app.function_name(name="promocion_reporte_http")
-@app.route(route="promocion-reporte", methods=["GET", "POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def promocion_reporte_http(req: func.HttpRequest) -> func.HttpResponse:
-    from memory_manual import aplicar_memoria_manual
-    try:
-        with open("scripts/semantic_log.jsonl", "r") as f:
-            lines = f.readlines()
-            ultimos = [json.loads(line)
-                       for line in lines[-10:]]  # Últimos 10 eventos
+        # Storage info ya se obtiene en paralelo arriba
 
-        return func.HttpResponse(
-            json.dumps({"ok": True, "ultimos_eventos": ultimos},
-                       ensure_ascii=False, indent=2),
-            mimetype="application/json",
-            status_code=200
-        )
-    except Exception as e:
-        return func.HttpResponse(
-            json.dumps({"ok": False, "error": str(e)}),
-            mimetype="application/json",
-            status_code=500
-        )
+    # 5. Métricas de rendimiento local
+    diagnostico.setdefault("metricas", {})
+    diagnostico["metricas"]["cache"] = {
+        "archivos_en_cache": len(CACHE),
+        "memoria_cache_bytes": sum(len(str(v)) for v in CACHE.values())
+    }
+
+    # 5.1. Obtener métricas de Function App si estamos en Azure
+    logging.info(
+        f"🔍 Debug métricas: IS_AZURE={IS_AZURE}, app_name={app_name}, subscription_id={subscription_id}")
+    if IS_AZURE and app_name and subscription_id and resource_group:
+        try:
+            logging.info(
+                f"🔍 Obteniendo métricas de Function App: {app_name} en {resource_group}")
+            metricas_fa = obtener_metricas_function_app(
+                app_name, resource_group, subscription_id)
+            logging.info(
+                f"🔍 Resultado obtener_metricas_function_app: {type(metricas_fa)} con keys: {list(metricas_fa.keys()) if isinstance(metricas_fa, dict) else 'No dict'}")
+            if metricas_fa and not metricas_fa.get("error"):
+                diagnostico["metricas"]["function_app"] = metricas_fa
+                logging.info(
+                    f"✅ Métricas de Function App obtenidas: {len(metricas_fa)} métricas")
+            else:
+                logging.warning(
+                    f"⚠️ Error obteniendo métricas: {metricas_fa.get('error', 'Unknown error')}")
+                diagnostico["metricas"]["function_app"] = {
+                    "error": metricas_fa.get("error", "No se pudieron obtener métricas")}
+        except Exception as e:
+            logging.error(
+                f"❌ Excepción obteniendo métricas de Function App: {str(e)}")
+            diagnostico["metricas"]["function_app"] = {"error": str(e)}
+    else:
+        logging.warning(
+            f"⚠️ No se obtuvieron métricas: IS_AZURE={IS_AZURE}, app_name={app_name}, resource_group={resource_group}, subscription_id={subscription_id}")
 
+    # 6. Generar recomendaciones basadas en el diagnóstico
+    if diagnostico.get("recursos", {}).get("function_app", {}).get("estado") != "Running":
+        diagnostico["recomendaciones"].append({
+            "nivel": "critico",
+            "mensaje": "La Function App no está en estado Running",
+            "accion": "Verificar configuración y reiniciar si es necesario"
+        })
 
-@app.function_name(name="revisar_correcciones")
-@app.route(route="revisar-correcciones", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
-def revisar_correcciones(req: func.HttpRequest) -> func.HttpResponse:
-    from memory_manual import aplicar_memoria_manual
-    from cosmos_memory_direct import consultar_memoria_cosmos_directo, aplicar_memoria_cosmos_directo
-    from services.semantic_intent_parser import aplicar_deteccion_intencion
+    if not diagnostico["checks"].get("blob_storage_detalles", {}).get("conectado"):
+        diagnostico["recomendaciones"].append({
+            "nivel": "importante",
+            "mensaje": "Blob Storage no está conectado",
+            "accion": "Verificar connection string y permisos"
+        })
 
-    # 🚫 GUARD CLAUSE: Prevenir redirección infinita
-    if req.url.endswith("/api/revisar-correcciones"):
-        try:
-            from services.semantic_intent_parser import detectar_intencion
-            deteccion_test = detectar_intencion(
-                "revisar correcciones", "/api/revisar-correcciones")
-
-            if deteccion_test.get("redirigir"):
-                destino = deteccion_test.get("endpoint_destino", "")
-                if "revisar-correcciones" in destino:
-                    logging.warning(
-                        "🚫 Previniendo redirección infinita en revisar-correcciones")
-                    # Forzar procesamiento local sin redirección
-                    pass
-        except Exception as e:
-            logging.warning(f"Error en guard clause: {e}")
+    if diagnostico["metricas"]["cache"]["archivos_en_cache"] > 100:
+        diagnostico["recomendaciones"].append({
+            "nivel": "sugerencia",
+            "mensaje": "Cache con muchos archivos",
+            "accion": "Considerar limpiar cache para optimizar memoria"
+        })
 
-    # 🔄 DETECCIÓN SIMPLE Y REDIRECCIÓN DIRECTA
-    try:
-        from services.semantic_intent_parser import detectar_intencion
+    # Verificar errores HTTP si hay métricas
+    metricas_fa = diagnostico.get("metricas", {}).get("function_app", {})
+    if metricas_fa.get("Http5xx", {}).get("total", 0) > 10:
+        diagnostico["recomendaciones"].append({
+            "nivel": "importante",
+            "mensaje": f"Se detectaron {metricas_fa['Http5xx']['total']} errores HTTP 5xx",
+            "accion": "Revisar logs para identificar causa de errores"
+        })
 
-        # Extraer input del usuario
-        input_usuario = req.params.get("consulta", "")
-        if not input_usuario:
-            try:
-                body = req.get_json()
-                if body:
-                    input_usuario = body.get("consulta", "")
-            except:
-                pass
+    return diagnostico
 
-        # Detectar si debe redirigir
-        deteccion = detectar_intencion(
-            input_usuario, "/api/revisar-correcciones")
 
-        if deteccion.get("redirigir") and "historial-interacciones" in deteccion.get("endpoint_destino", ""):
-            logging.info(f"🔄 Redirección detectada: {input_usuario[:50]}...")
-            # Llamar directamente a historial_interacciones
-            return historial_interacciones(req)
+# ========== FUNCIONES AUXILIARES PARA INTENCIONES ==========
 
-    except Exception as e:
-        logging.warning(f"⚠️ Error en detección: {e}")
-        # Continuar con flujo normal
 
-    # 🧠 CONSULTAR MEMORIA COSMOS DB DIRECTAMENTE
-    memoria_previa = consultar_memoria_cosmos_directo(req)
-    if memoria_previa and memoria_previa.get("tiene_historial"):
-        logging.info(
-            f"🧠 Revisar-correcciones: {memoria_previa['total_interacciones']} interacciones encontradas")
-        logging.info(
-            f"📝 Historial: {memoria_previa.get('resumen_conversacion', '')[:100]}...")
+def ejecutar_comando_azure_seguro(servicio: str, comando: str, params: dict) -> dict:
+    """Wrapper seguro para comandos Azure CLI"""
     try:
-        # Intentar usar Cosmos DB primero
-        try:
-            from services.cosmos_fixes_service import cosmos_fixes_service
-            if cosmos_fixes_service:
-                pendientes = cosmos_fixes_service.get_pending_fixes()
-                response_data = {
-                    "exito": True,
-                    "pendientes": pendientes,
-                    "fuente": "cosmos_db",
-                    "total": len(pendientes)
+        # Validaciones de seguridad
+        if any(x in comando.lower() for x in ["delete", "remove", "purge"]):
+            if not params.get("confirmar_operacion_peligrosa"):
+                return {
+                    "exito": False,
+                    "error": "Operación peligrosa requiere confirmación",
+                    "requiere": "confirmar_operacion_peligrosa: true"
                 }
-                # Aplicar memoria antes de responder
-                response_data = aplicar_memoria_cosmos_directo(
-                    req, response_data)
-                response_data = aplicar_memoria_manual(req, response_data)
-
-                return func.HttpResponse(
-                    json.dumps(response_data, ensure_ascii=False),
-                    mimetype="application/json",
-                    status_code=200
-                )
-        except ImportError:
-            pass
 
-        # Fallback a archivo JSON
-        pendientes = _load_pending_fixes()
-        response_data = {
-            "exito": True,
-            "pendientes": pendientes,
-            "fuente": "json_file",
-            "total": len(pendientes)
-        }
-        # Aplicar memoria antes de responder
-        response_data = aplicar_memoria_cosmos_directo(req, response_data)
-        response_data = aplicar_memoria_manual(req, response_data)
+        # Construir y ejecutar
+        full_cmd = f"az {servicio} {comando}" if servicio else f"az {comando}"
+        return ejecutar_comando_azure(full_cmd, formato="json")
 
-        return func.HttpResponse(
-            json.dumps(response_data, ensure_ascii=False),
-            mimetype="application/json",
-            status_code=200
-        )
     except Exception as e:
-        response_data = {"exito": False, "error": str(e)}
-        # Aplicar memoria antes de responder
-        response_data = aplicar_memoria_cosmos_directo(req, response_data)
-        response_data = aplicar_memoria_manual(req, response_data)
-
-        return func.HttpResponse(
-            json.dumps(response_data),
-            mimetype="application/json",
-            status_code=500
-        )
-
-
-@app.function_name(name="autocorregir_http")
-@app.route(route="autocorregir", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def autocorregir_http(req: func.HttpRequest) -> func.HttpResponse:
-    from memory_manual import aplicar_memoria_manual
-    """
-    Endpoint para registrar y simular correcciones automáticas.
-    Restringido a agentes AI (verifica header especial)
-    """
-    run_id = get_run_id(req)
-    pending_fixes: List[dict] = []
+        return {"exito": False, "error": str(e)}
 
-    # Verificar que es un agente autorizado
-    agent_header = req.headers.get("X-Agent-Auth", "")
-    if not _validate_agent_auth(agent_header):
-        return func.HttpResponse(
-            json.dumps({
-                "exito": False,
-                "error": "No autorizado. Este endpoint es solo para agentes AI.",
-                "codigo": "UNAUTHORIZED_AGENT"
-            }),
-            status_code=401
-        )
 
-    try:
-        body = req.get_json()
-
-        # Validar estructura requerida
-        required_fields = ["accion", "target", "propuesta", "tipo"]
-        for field in required_fields:
-            if field not in body:
-                return func.HttpResponse(
-                    json.dumps({
-                        "exito": False,
-                        "error": f"Campo requerido faltante: {field}",
-                        "campos_requeridos": required_fields
-                    }),
-                    status_code=400
-                )
+def procesar_intencion_crear_contenedor(parametros: dict) -> dict:
+    """Procesa la intención de crear un contenedor"""
+    nombre = parametros.get("nombre", "")
+    publico = parametros.get("publico", False)
+    metadata = parametros.get("metadata", {})
 
-        # Crear registro de corrección
-        correccion = {
-            "id": _generate_fix_id(body),
-            "timestamp": datetime.now().isoformat(),
-            "run_id": run_id,
-            "estado": "pendiente",
-            "accion": body.get("accion"),
-            "target": body.get("target"),
-            "propuesta": body.get("propuesta"),
-            "tipo": body.get("tipo"),
-            "detonante": body.get("detonante", "manual"),
-            "origen": body.get("origen", "AI Agent"),
-            "prioridad": _calculate_priority(body),
-            "validaciones_requeridas": _get_required_validations(body),
-            "intentos": 0,
-            "simulacion": _simulate_fix(body)
+    if not nombre:
+        return {
+            "exito": False,
+            "error": "Parámetro 'nombre' es requerido para crear contenedor"
         }
 
-        # Registrar en Cosmos DB
-        try:
-            from services.cosmos_fixes_service import cosmos_fixes_service
-            from services.app_insights_logger import app_insights_logger
-
-            if cosmos_fixes_service:
-                # Upsert en Cosmos
-                resultado_cosmos = cosmos_fixes_service.upsert_fix(correccion)
-                if not resultado_cosmos.get("exito"):
-                    return func.HttpResponse(
-                        json.dumps({
-                            "exito": False,
-                            "error": f"Error guardando en Cosmos: {resultado_cosmos.get('error')}"
-                        }),
-                        status_code=500
-                    )
+    try:
+        client = get_blob_client()
+        if not client:
+            return {
+                "exito": False,
+                "error": "Blob Storage no configurado"
+            }
 
-                # Log estructurado a App Insights
-                app_insights_logger.log_fix_event(
-                    "correccion_registrada",
-                    correccion["id"],
-                    run_id,
-                    "pendiente",
-                    correccion["target"],
-                    correccion["prioridad"]
-                )
-            else:
-                # Fallback a archivo JSON
-                pending_fixes = _load_pending_fixes()
-                pending_fixes.append(correccion)
-                _save_pending_fixes(pending_fixes)
-        except ImportError:
-            # Fallback a archivo JSON
-            pending_fixes = _load_pending_fixes()
-            pending_fixes.append(correccion)
-            _save_pending_fixes(pending_fixes)
+        from azure.storage.blob import PublicAccess
+        public_access = PublicAccess.Container.value if publico else None
 
-        # Evaluar si se puede auto-promover
-        auto_promote = _evaluate_auto_promotion(correccion)
+        container_client = client.create_container(
+            name=nombre,
+            public_access=public_access,
+            metadata=metadata
+        )
 
-        response = {
+        return {
             "exito": True,
-            "mensaje": f"Corrección registrada: {correccion['id']}",
-            "correccion": correccion,
-            "auto_promocion": auto_promote,
-            "bandeja_revision": {
-                "total_pendientes": len(pending_fixes),
-                "alta_prioridad": len([f for f in pending_fixes if f.get("prioridad", 0) >= 8]),
-                "url_revision": f"/api/revisar-correcciones"
-            }
+            "mensaje": f"Contenedor '{nombre}' creado exitosamente",
+            "contenedor": nombre,
+            "publico": publico,
+            "metadata": metadata
         }
 
-        # Si es auto-promocionable y de alta prioridad, ejecutar
-        if auto_promote["promocionable"] and correccion["prioridad"] >= 9:
-            resultado_promocion = _execute_fix(correccion)
-            response["promocion_automatica"] = resultado_promocion
-
-        return func.HttpResponse(
-            json.dumps(response, ensure_ascii=False, indent=2),
-            status_code=200
-        )
-
     except Exception as e:
-        logging.exception(f"[{run_id}] Error en autocorregir")
-        return func.HttpResponse(
-            json.dumps({
-                "exito": False,
-                "error": str(e),
-                "run_id": run_id
-            }),
-            status_code=500
-        )
-
-
-def _validate_agent_auth(header: str) -> bool:
-    """Valida que el request viene de un agente autorizado"""
-    # Implementar validación real según tu esquema de auth
-    valid_tokens = [
-        "AI-FOUNDRY-TOKEN",
-        "COPILOT-AGENT",
-        os.environ.get("AGENT_AUTH_TOKEN", "")
-    ]
-    return header in valid_tokens or header.startswith("Bearer ")
-
-
-def _generate_fix_id(body: dict) -> str:
-    """Genera ID único para la corrección"""
-    content = f"{body['target']}{body['accion']}{datetime.now().isoformat()}"
-    return hashlib.md5(content.encode()).hexdigest()[:8]
-
-
-def _calculate_priority(body: dict) -> int:
-    """Calcula prioridad de la corrección (0-10)"""
-    priority = 5  # Base
-
-    # Ajustar según tipo
-    tipo_priorities = {
-        "seguridad": 10,
-        "error_critico": 9,
-        "sintaxis": 7,
-        "optimizacion": 5,
-        "estilo": 3
-    }
-    priority = tipo_priorities.get(body.get("tipo", ""), priority)
-
-    # Ajustar según target
-    if "production" in body.get("target", "").lower():
-        priority += 2
-    if "test" in body.get("target", "").lower():
-        priority -= 1
-
-    return min(10, max(0, priority))
-
-
-def _get_required_validations(body: dict) -> List[str]:
-    """Define validaciones requeridas según el tipo de corrección"""
-    tipo = body.get("tipo", "")
-    validations = ["sintaxis"]
-
-    if tipo in ["seguridad", "error_critico"]:
-        validations.extend(["test_unitario", "test_integracion"])
-
-    if "script" in body.get("target", ""):
-        validations.append("ejecutar_script")
-
-    if "config" in body.get("target", ""):
-        validations.append("validar_json")
-
-    return validations
-
+        return {
+            "exito": False,
+            "error": str(e),
+            "tipo_error": type(e).__name__
+        }
 
-def _simulate_fix(body: dict) -> dict:
-    """Simula el resultado de aplicar la corrección"""
-    simulation = {
-        "exito_esperado": True,
-        "cambios_esperados": [],
-        "riesgos": [],
-        "rollback_disponible": True
-    }
 
-    # Simular según tipo de acción
-    accion = body.get("accion", "")
+def procesar_intencion_cli(parametros: dict) -> dict:
+    """Procesa intenciones de Azure CLI"""
+    servicio = parametros.get("servicio", "")
+    comando = parametros.get("comando", "")
+    cli_params = parametros.get("parametros", {})
 
-    if "shebang" in body.get("propuesta", ""):
-        simulation["cambios_esperados"].append("Agregar #!/bin/bash al inicio")
+    # Initialize cmd_parts early to ensure it's available in exception handlers
+    cmd_parts = ["az"]
 
-    if "chmod" in body.get("propuesta", ""):
-        simulation["cambios_esperados"].append("Cambiar permisos a ejecutable")
+    if not comando:
+        return {
+            "exito": False,
+            "error": "Parámetro 'comando' es requerido para ejecutar CLI"
+        }
 
-    if "sintaxis" in body.get("tipo", ""):
-        simulation["riesgos"].append("Posible cambio de comportamiento")
+    # Construir comando Azure CLI
+    if servicio:
+        cmd_parts.append(servicio)
+    cmd_parts.extend(comando.split())
 
-    return simulation
+    # Añadir parámetros
+    for key, value in cli_params.items():
+        if key.startswith("--"):
+            cmd_parts.append(key)
+        else:
+            cmd_parts.append(f"--{key}")
+        if value is not None:
+            cmd_parts.append(str(value))
 
+    # Añadir output JSON por defecto
+    if "--output" not in " ".join(cmd_parts):
+        cmd_parts.extend(["--output", "json"])
 
-def _load_pending_fixes() -> list[dict]:
-    path = Path("scripts/pending_fixes.json")
     try:
-        with open(path, "r", encoding="utf-8", errors="replace") as f:
-            return json.load(f)
-    except json.JSONDecodeError as e:
-        logging.error(f"❌ JSON inválido en pending_fixes.json: {e}")
-        _enviar_alerta_slack(
-            {"id": "sistema", "target": "pending_fixes.json"},
-            motivo=f"Archivo corrupto: {e}"
+        resultado = command_executor.run(
+            cmd_parts,
+            timeout=30,
+            env=_az_env(),
+            coalesce=_az_es_lectura(cmd_parts)
         )
-        return []
-    except Exception as e:
-        logging.error(f"❌ Error leyendo pending_fixes.json: {e}")
-        return []
-
-
-def _save_pending_fixes(fixes: list[dict]):
-    """Guarda correcciones pendientes"""
-    PENDING_FIXES_FILE.parent.mkdir(exist_ok=True)
-    with open(PENDING_FIXES_FILE, "w") as f:
-        json.dump(fixes, f, indent=2, ensure_ascii=False)
 
+        output = resultado.stdout
+        try:
+            output_json = json.loads(output) if output else None
+        except:
+            output_json = None
 
-# Función _log_semantic_event eliminada - ahora se usa memory_service.log_event()
+        return {
+            "exito": resultado.returncode == 0,
+            "comando_ejecutado": " ".join(cmd_parts),
+            "codigo_salida": resultado.returncode,
+            "output": output_json if output_json else output,
+            "error": resultado.stderr if resultado.stderr else None
+        }
 
+    except subprocess.TimeoutExpired:
+        return {
+            "exito": False,
+            "error": "Comando excedió tiempo límite (30s)",
+            "comando": " ".join(cmd_parts)
+        }
+    except Exception as e:
+        return {
+            "exito": False,
+            "error": str(e),
+            "comando": " ".join(cmd_parts)
+        }
 
-def _evaluate_auto_promotion(correccion: dict) -> dict:
-    """Evalúa si una corrección puede ser auto-promovida"""
-    criteria = {
-        "tipo_seguro": correccion["tipo"] not in ["seguridad", "produccion"],
-        "prioridad_alta": correccion["prioridad"] >= 8,
-        "validaciones_simples": len(correccion["validaciones_requeridas"]) <= 2,
-        "sin_riesgos": len(correccion["simulacion"]["riesgos"]) == 0
-    }
 
-    return {
-        "promocionable": all(criteria.values()),
-        "criterios": criteria,
-        "razon": _get_promotion_reason(criteria)
-    }
+def _get_rm_client():  # type: ignore
+    cred = _get_arm_credential()
+    sub = os.environ.get("AZURE_SUBSCRIPTION_ID")
+    return get_resource_client()(cred, sub)  # type: ignore
 
 
-def _get_promotion_reason(criteria: dict) -> str:
-    """Explica por qué se puede o no promover"""
-    if all(criteria.values()):
-        return "Cumple todos los criterios para promoción automática"
+def _deploy_foundry_models(req, body, memory_service, aplicar_memoria_cosmos_directo, aplicar_memoria_manual):
+    """
+    Despliega modelos en Microsoft Foundry basado en el AGENT_REGISTRY.
 
-    failed = [k for k, v in criteria.items() if not v]
-    return f"No cumple criterios: {', '.join(failed)}"
+    Payload esperado:
+    {
+        "models": ["claude-3-5-sonnet-20241022", "mistral-large-2411"],
+        "action": "deployModels"  # opcional
+    }
 
+    Returns:
+        HttpResponse con estado del deployment
+    """
+    import json
+    import time
+    from datetime import datetime
 
-def _apply_script_fix(fix: dict) -> dict:
-    """Aplica una corrección a un script (por ejemplo, agregar shebang o chmod)"""
     try:
-        ruta = fix["target"]
-        contenido = fix["propuesta"]
-
-        script_path = Path("/home/site/wwwroot") / ruta
-        if not script_path.exists():
-            return {"ejecutado": False, "error": f"Script no encontrado: {ruta}"}
-
-        # Guardar backup
-        backup_path = script_path.with_suffix(".bak")
-        backup_path.write_text(script_path.read_text())
-
-        # Aplicar la propuesta (sobrescribir el contenido)
-        script_path.write_text(contenido)
-
-        return {"ejecutado": True, "ruta_modificada": str(script_path)}
-    except Exception as e:
-        return {"ejecutado": False, "error": str(e)}
-
+        # Obtener lista de modelos del router_agent
+        from router_agent import AGENT_REGISTRY
 
-def _apply_config_fix(fix: dict) -> dict:
-    """Aplica corrección sobre configuración JSON o YAML"""
-    try:
-        ruta = fix["target"]
-        contenido = fix["propuesta"]
-        config_path = Path("/home/site/wwwroot") / ruta
+        # Extraer modelos solicitados
+        requested_models = body.get("models", [])
+        if isinstance(requested_models, str):
+            requested_models = [requested_models]
 
-        if not config_path.exists():
-            return {"ejecutado": False, "error": f"Archivo no encontrado: {ruta}"}
+        # Si no se especifican modelos, usar todos del AGENT_REGISTRY
+        if not requested_models:
+            requested_models = list(set(
+                agent_config.get("model")
+                for agent_config in AGENT_REGISTRY.values()
+                if agent_config.get("model")
+            ))
+            logging.info(
+                f"🤖 [FoundryDeploy] No se especificaron modelos, usando todos del registry: {requested_models}")
 
-        # Backup
-        backup_path = config_path.with_suffix(".bak")
-        backup_path.write_text(config_path.read_text())
+        # Validar que los modelos están en nuestro registry
+        registry_models = {
+            agent_config.get("model"): intent
+            for intent, agent_config in AGENT_REGISTRY.items()
+            if agent_config.get("model")
+        }
 
-        # Escribir contenido nuevo
-        config_path.write_text(contenido)
-        return {"ejecutado": True, "ruta_modificada": str(config_path)}
-    except Exception as e:
-        return {"ejecutado": False, "error": str(e)}
+        models_deployed = []
+        already_active = []
+        failed = []
+        deployment_details = []
 
+        for model in requested_models:
+            model_name = str(model or "").strip()
+            if not model_name:
+                failed.append({
+                    "model": model,
+                    "error": "Nombre de modelo vacío o inválido"
+                })
+                continue
 
-def _apply_generic_fix(fix: dict) -> dict:
-    """Fallback genérico para correcciones no clasificadas"""
-    return {"ejecutado": False, "error": "Tipo de corrección no soportado todavía"}
+            try:
+                if model_name not in registry_models:
+                    failed.append({
+                        "model": model_name,
+                        "error": "Modelo no encontrado en AGENT_REGISTRY",
+                        "available_models": list(registry_models.keys())
+                    })
+                    continue
 
+                intent = registry_models[model_name]
+                agent_config = AGENT_REGISTRY[intent]
 
-def _validate_fix(fix: dict) -> dict:
-    """Simula validaciones posteriores a la aplicación del fix"""
-    try:
-        # Aquí puedes agregar validaciones reales (bash -n, json.load, etc)
-        if "script" in fix["target"]:
-            return {"exito": True, "mensaje": "Validación básica de script exitosa"}
-        if "config" in fix["target"]:
-            return {"exito": True, "mensaje": "Validación de config exitosa"}
-        return {"exito": True, "mensaje": "Validación genérica pasada"}
-    except Exception as e:
-        return {"exito": False, "error": str(e)}
+                # Simular verificación de estado del modelo
+                # TODO: Reemplazar con llamada real al Foundry SDK
+                is_deployed = _check_model_deployment_status(
+                    model_name, agent_config)
 
+                if is_deployed:
+                    already_active.append(model_name)
+                    deployment_details.append({
+                        "model": model_name,
+                        "intent": intent,
+                        "agent": agent_config.get("agent_id"),
+                        "status": "already_active",
+                        "endpoint": agent_config.get("endpoint"),
+                        "project_id": agent_config.get("project_id")
+                    })
+                    logging.info(
+                        f"✅ [FoundryDeploy] Modelo {model_name} ya está activo")
+                else:
+                    # Simular deployment del modelo
+                    # TODO: Reemplazar con llamada real al Foundry SDK
+                    success = _deploy_model_to_foundry(model_name, agent_config)
 
-def _update_fix_status(fix_id: str, nuevo_estado: str) -> None:
-    """Actualiza el estado de una corrección en pending_fixes.json"""
-    fixes = _load_pending_fixes()
-    for fix in fixes:
-        if fix["id"] == fix_id:
-            fix["estado"] = nuevo_estado
-            break
-    _save_pending_fixes(fixes)
+                    if success:
+                        models_deployed.append(model_name)
+                        deployment_details.append({
+                            "model": model_name,
+                            "intent": intent,
+                            "agent": agent_config.get("agent_id"),
+                            "status": "deployed",
+                            "endpoint": agent_config.get("endpoint"),
+                            "project_id": agent_config.get("project_id"),
+                            "deployment_time": datetime.now().isoformat()
+                        })
+                        logging.info(
+                            f"🚀 [FoundryDeploy] Modelo {model_name} desplegado exitosamente")
+                    else:
+                        failed.append({
+                            "model": model_name,
+                            "error": "Falló el deployment en Foundry",
+                            "intent": intent
+                        })
+                        logging.error(
+                            f"❌ [FoundryDeploy] Falló deployment de {model_name}")
 
+            except Exception as e:
+                failed.append({
+                    "model": model_name or model,
+                    "error": str(e),
+                    "traceback": str(e)
+                })
+                logging.error(
+                    f"❌ [FoundryDeploy] Error procesando modelo {model_name}: {e}")
 
-def _execute_fix(correccion: dict) -> dict:
-    """Ejecuta una corrección aprobada"""
-    try:
-        resultado = {
-            "id_correccion": correccion["id"],
-            "timestamp": datetime.now().isoformat(),
-            "ejecutado": False,
-            "validado": False,
-            "errores": []
+        # Preparar respuesta
+        all_successful = len(failed) == 0
+        res = {
+            "ok": all_successful,
+            "action": "deployModels",
+            "models_deployed": models_deployed,
+            "already_active": already_active,
+            "failed": failed,
+            "summary": {
+                "total_requested": len(requested_models),
+                "deployed": len(models_deployed),
+                "already_active": len(already_active),
+                "failed": len(failed)
+            },
+            "deployment_details": deployment_details,
+            "foundry_endpoint": AGENT_REGISTRY.get("conversacion_general", {}).get("endpoint", ""),
+            "timestamp": datetime.now().isoformat()
         }
 
-        # Ejecutar según tipo de acción
-        if "script" in correccion["target"]:
-            resultado_ejecucion = _apply_script_fix(correccion)
-        elif "config" in correccion["target"]:
-            resultado_ejecucion = _apply_config_fix(correccion)
-        else:
-            resultado_ejecucion = _apply_generic_fix(correccion)
-
-        resultado.update(resultado_ejecucion)
-
-        # Validar
-        if resultado["ejecutado"]:
-            validacion = _validate_fix(correccion)
-            resultado["validado"] = validacion["exito"]
-            resultado["validacion_detalles"] = validacion
-
-        # Actualizar estado
-        _update_fix_status(
-            correccion["id"], "aplicado" if resultado["validado"] else "fallido")
+        # Aplicar memoria
+        res = aplicar_memoria_cosmos_directo(req, res)
+        res = aplicar_memoria_manual(req, res)
 
-        # Log semántico
-        try:
-            from services.memory_service import memory_service
-            if memory_service:
-                response_data = {
-                    "fecha": datetime.now().isoformat(),
-                    "origen": correccion["origen"],
-                    "target": correccion["target"],
-                    "accion": correccion["accion"],
-                    "validado_por": correccion["validaciones_requeridas"],
-                    "resultado": "exitoso" if resultado["validado"] else "fallido"
-                }
-                response_data["tipo"] = "correccion"
-                response_data["document_class"] = "cognitive_memory"
-                response_data["is_synthetic"] = False
-                memory_service.log_event("correccion_aplicada", response_data)
-        except ImportError:
-            pass
+        # Registrar en memoria
+        memory_service.registrar_llamada(
+            source="deploy_foundry_models",
+            endpoint="/api/deploy",
+            method=req.method,
+            params={
+                "session_id": req.headers.get("Session-ID"),
+                "agent_id": req.headers.get("Agent-ID"),
+                "action": "deployModels",
+                "models_requested": requested_models
+            },
+            response_data=res,
+            success=all_successful
+        )
 
-        return resultado
+        # 207 Multi-Status para resultados mixtos
+        status_code = 200 if all_successful else 207
+        return func.HttpResponse(
+            json.dumps(res, ensure_ascii=False),
+            status_code=status_code,
+            mimetype="application/json"
+        )
 
     except Exception as e:
-        logging.error(f"Error ejecutando fix {correccion['id']}: {e}")
-        return {
-            "ejecutado": False,
-            "error": str(e)
-        }
-
-
-# ========== ENDPOINTS DE DIAGNÓSTICO AVANZADO ==========
+        error_msg = f"Error en deployment de modelos Foundry: {str(e)}"
+        logging.error(f"❌ [FoundryDeploy] {error_msg}")
 
-@app.function_name(name="verificar_estado_sistema")
-@app.route(route="verificar-sistema", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
-def verificar_estado_sistema(req: func.HttpRequest) -> func.HttpResponse:
-    from memory_manual import aplicar_memoria_manual
-    """Autodiagnóstico completo del sistema"""
-    try:
-        import psutil
-        from services.memory_service import memory_service
-
-        estado = {
-            "timestamp": datetime.utcnow().isoformat(),
-            "sistema": platform.system(),
-            "cpu_percent": psutil.cpu_percent(interval=1),
-            "memoria": psutil.virtual_memory()._asdict(),
-            "disco": psutil.disk_usage("/" if platform.system() != "Windows" else "C:\\")._asdict(),
-            "python_version": platform.python_version(),
-            "app_service_plan": os.environ.get("WEBSITE_SKU", "Unknown"),
-            "app_insights": bool(os.environ.get("APPINSIGHTS_INSTRUMENTATIONKEY")),
-            "cosmos_endpoint": os.environ.get("COSMOSDB_ENDPOINT", "no_definido"),
-            "storage_connected": bool(get_blob_client()),
-            "cache_size": len(CACHE),
-            "ambiente": "Azure" if IS_AZURE else "Local"
+        res = {
+            "ok": False,
+            "error_code": "FOUNDRY_DEPLOYMENT_ERROR",
+            "cause": error_msg,
+            "action": "deployModels"
         }
 
-        # 👉 Registrar evento de monitoreo solo si no hubo error
-        memory_service.log_semantic_event({
-            "tipo": "monitoring_event",
-            "texto_semantico": "Monitoreo verificar-sistema OK - Sistema funcionando correctamente"
-        })
+        # Aplicar memoria
+        res = aplicar_memoria_cosmos_directo(req, res)
+        res = aplicar_memoria_manual(req, res)
 
-        return func.HttpResponse(
-            json.dumps(estado, indent=2),
-            mimetype="application/json",
-            status_code=200
+        # Registrar error
+        memory_service.registrar_llamada(
+            source="deploy_foundry_models_error",
+            endpoint="/api/deploy",
+            method=req.method,
+            params={
+                "session_id": req.headers.get("Session-ID"),
+                "agent_id": req.headers.get("Agent-ID"),
+                "action": "deployModels"
+            },
+            response_data=res,
+            success=False
         )
 
-    except Exception as e:
         return func.HttpResponse(
-            json.dumps({
-                "error": str(e),
-                "tipo_error": type(e).__name__,
-                "timestamp": datetime.utcnow().isoformat()
-            }),
-            mimetype="application/json",
-            status_code=500
+            json.dumps(res),
+            status_code=500,
+            mimetype="application/json"
         )
 
 
-@app.function_name(name="verificar_app_insights")
-@app.route(route="verificar-app-insights", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
-def verificar_app_insights(req: func.HttpRequest) -> func.HttpResponse:
-    from memory_manual import aplicar_memoria_manual
-    """Verifica telemetría de Application Insights sin depender de az CLI"""
-    app_name = os.environ.get(
-        "WEBSITE_SITE_NAME", "copiloto-semantico-func-us2")
-    workspace_id = os.environ.get("APPINSIGHTS_WORKSPACE_ID")
-
-    if not workspace_id:
-        memory_service.log_semantic_event({
-            "tipo": "monitoring_event",
-            "texto_semantico": "Monitoreo verificar-app-insights ERROR - APPINSIGHTS_WORKSPACE_ID no configurado"
-        })
-        return func.HttpResponse(
-            json.dumps({
-                "exito": False,
-                "error": "APPINSIGHTS_WORKSPACE_ID no configurado en las variables de entorno",
-                "app_name": app_name
-            }),
-            mimetype="application/json",
-            status_code=400
-        )
+def _check_model_deployment_status(model: str, agent_config: dict) -> bool:
+    """
+    Verifica si un modelo está desplegado en Foundry.
 
+    TODO: Reemplazar con llamada real al Foundry SDK/API
+    """
     try:
-        client = get_logs_query_client()
-        query = "Usage | take 5"
-        response = client.query_workspace(
-            workspace_id=workspace_id,
-            query=query,
-            timespan=timedelta(hours=1)
-        )
-
-        eventos_count = 0
-        has_data = False
-        metodo_parseo = "ninguno"
-        parse_error_msg = None
+        # Simulación - en producción usar Foundry SDK
+        # foundry_client = get_foundry_client()
+        # return foundry_client.models.is_deployed(model)
 
-        # Intentar parsear la respuesta con ambos métodos
-        try:
-            # Método 1: primary_table (recomendado por el SDK)
-            primary_table = getattr(response, "primary_table", None)
-            if primary_table is not None:
-                rows = getattr(primary_table, 'rows', None)
-                if rows:
-                    eventos_count = len(rows)
-                    has_data = True
-                    metodo_parseo = "primary_table"
-
-            # Método 2: tables (fallback para compatibilidad)
-            if not has_data:
-                tables = getattr(response, 'tables', None)
-                if tables:
-                    for table in tables:
-                        rows = getattr(table, 'rows', None)
-                        if rows:
-                            eventos_count += len(rows)
-                    has_data = eventos_count > 0
-                    metodo_parseo = "tables_iteration" if has_data else "tables_vacias"
-                else:
-                    metodo_parseo = "sin_atributos_reconocidos"
-
-        except Exception as parse_error:
-            parse_error_msg = f"{type(parse_error).__name__}: {str(parse_error)}"
-            eventos_count = -1  # Indica error en parsing
-            has_data = False
-            metodo_parseo = "error_parsing"
-            memory_service.log_semantic_event({
-                "tipo": "monitoring_event",
-                "texto_semantico": f"Monitoreo verificar-app-insights PARSE_ERROR - {parse_error_msg}"
-            })
+        # Por ahora simular que algunos modelos comunes ya están desplegados
+        commonly_deployed = [
+            "gpt-4o-mini-2024-07-18",
+            "gpt-4-2024-11-20"
+        ]
 
-        memory_service.log_semantic_event({
-            "tipo": "monitoring_event",
-            "texto_semantico": f"Monitoreo verificar-app-insights OK - {eventos_count} eventos usando {metodo_parseo}"
-        })
-        return func.HttpResponse(
-            json.dumps({
-                "exito": True,
-                "app_name": app_name,
-                "workspace_id": workspace_id,
-                "telemetria_activa": has_data,
-                "eventos_count": eventos_count,
-                "metodo_conexion": "sdk_managed_identity",
-                "metodo_parseo": metodo_parseo,
-                "parse_error": parse_error_msg,
-                "response_type": type(response).__name__,
-                "mensaje": (
-                    "SDK conectado exitosamente pero sin datos en última hora"
-                    if not has_data and eventos_count == 0
-                    else f"Encontrados {eventos_count} eventos usando {metodo_parseo}"
-                    if has_data
-                    else "Error procesando respuesta"
-                )
-            }),
-            mimetype="application/json",
-            status_code=200
-        )
+        is_deployed = model in commonly_deployed
+        logging.info(
+            f"🔍 [FoundryDeploy] Verificando modelo {model}: {'desplegado' if is_deployed else 'no desplegado'}")
+        return is_deployed
 
     except Exception as e:
-        memory_service.log_semantic_event({
-            "tipo": "monitoring_event",
-            "texto_semantico": f"Monitoreo verificar-app-insights ERROR - {type(e).__name__}: {str(e)}"
-        })
-        return func.HttpResponse(
-            json.dumps({
-                "exito": False,
-                "error": str(e),
-                "tipo_error": type(e).__name__,
-                "app_name": app_name,
-                "workspace_id": workspace_id or "no_configurado",
-                "metodo": "sdk_managed_identity_error"
-            }),
-            mimetype="application/json",
-            status_code=500
-        )
+        logging.error(f"❌ Error verificando estado de modelo {model}: {e}")
+        return False
 
 
-@app.function_name(name="verificar_cosmos")
-@app.route(route="verificar-cosmos", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
-def verificar_cosmos(req: func.HttpRequest) -> func.HttpResponse:
-    """Verifica conectividad y escrituras en CosmosDB usando clave o MI"""
-    endpoint = os.environ.get("COSMOSDB_ENDPOINT")
-    key = os.environ.get("COSMOSDB_KEY")
-    database = os.environ.get("COSMOSDB_DATABASE", "copiloto-db")
-    container_name = os.environ.get("COSMOSDB_CONTAINER", "memory")
+def _deploy_model_to_foundry(model: str, agent_config: dict) -> bool:
+    """
+    Despliega un modelo en Foundry.
 
-    if not endpoint:
-        return func.HttpResponse(
-            json.dumps({
-                "exito": False,
-                "error": "Endpoint de CosmosDB no configurado",
-                "configuracion": {"endpoint": False}
-            }),
-            mimetype="application/json",
-            status_code=200
-        )
+    TODO: Reemplazar con llamada real al Foundry SDK/API
+    """
+    try:
+        # Simulación - en producción usar Foundry SDK
+        # foundry_client = get_foundry_client()
+        # deployment_result = foundry_client.models.deploy(
+        #     model_name=model,
+        #     project_id=agent_config.get("project_id"),
+        #     endpoint=agent_config.get("endpoint")
+        # )
+        # return deployment_result.success
+
+        # Simulación: todos los deployments son exitosos por ahora
+        logging.info(
+            f"🚀 [FoundryDeploy] Simulando deployment de {model} en proyecto {agent_config.get('project_id')}")
+        time.sleep(0.5)  # Simular latencia de deployment
+        return True
 
-    try:
-        auth_method = "MI"
-        client = None
-        db = None
-        container = None
+    except Exception as e:
+        logging.error(f"❌ Error desplegando modelo {model}: {e}")
+        return False
 
-        if key:
-            try:
-                client = CosmosClient(endpoint, key)
-                auth_method = "clave"
-                db = client.get_database_client(database)
-                container = db.get_container_client(container_name)
-                # Test query más simple y segura
-                test_items = list(container.query_items(
-                    "SELECT VALUE COUNT(1) FROM c",
-                    enable_cross_partition_query=True,
-                    max_item_count=1
-                ))
-            except Exception:
-                client = None
 
-        if not client:
-            credential = DefaultAzureCredential()
-            client = CosmosClient(endpoint, credential)
-            auth_method = "MI"
-            db = client.get_database_client(database)
-            container = db.get_container_client(container_name)
-
-        if container:
-            # Query más eficiente y con límites apropiados
-            items = list(container.query_items(
-                "SELECT c.id, c._ts, c.session_id FROM c ORDER BY c._ts DESC OFFSET 0 LIMIT 5",
-                enable_cross_partition_query=True,
-                max_item_count=5
-            ))
-        else:
-            items = []
+# Función _log_semantic_event eliminada - ahora se usa memory_service.log_event()
 
-        return func.HttpResponse(
-            json.dumps({
-                "exito": True,
-                "cosmos_conectado": True,
-                "auth_method": auth_method,
-                "registros_encontrados": len(items),
-                "ultimo_registro": items[0] if items else None,
-                "estado": "funcionando" if items else "sin_escrituras",
-                "database": database,
-                "container": container_name
-            }, indent=2, default=str),
-            mimetype="application/json",
-            status_code=200
-        )
 
-    except Exception as e:
-        return func.HttpResponse(
-            json.dumps({
-                "exito": False,
-                "cosmos_conectado": False,
-                "error": str(e),
-                "tipo_error": type(e).__name__,
-                "sugerencia": "Verificar credenciales y configuración de CosmosDB"
-            }),
-            mimetype="application/json",
-            status_code=200
-        )
+# ========== HELPERS DE DIAGNÓSTICO (los endpoints viven en routes/) ==========
 
 
 def _analizar_error_cli(intentos_log: list, comando: str) -> dict:
@@ -14845,12 +6494,11 @@ def _reparar_comando_con_memoria(comando: str, campo: str, valor: str) -> str:
 def _ejecutar_comando_reparado(comando_reparado: str) -> func.HttpResponse:
     """Ejecuta comando reparado con memoria"""
     try:
-        result = subprocess.run(
+        result = command_executor.run(
             comando_reparado,
             shell=True,
-            capture_output=True,
-            text=True,
             timeout=60,
+            env=_az_env(),
             encoding='utf-8',
             errors='replace'
         )
@@ -14880,457 +6528,13 @@ def _ejecutar_comando_reparado(comando_reparado: str) -> func.HttpResponse:
         )
 
 
-@app.function_name(name="aplicar_correccion_manual_http")
-@app.route(route="aplicar-correccion-manual", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def aplicar_correccion_manual_http(req: func.HttpRequest) -> func.HttpResponse:
-    """
-    Endpoint universal para aplicar correcciones manuales de forma dinámica y robusta.
-    Adaptable como /api/ejecutar-cli - acepta cualquier tipo de corrección sin predefiniciones.
-    """
-    from memory_manual import aplicar_memoria_manual
-    endpoint = "/api/aplicar-correccion-manual"
-    method = "POST"
-    run_id = get_run_id(req)
-
-    try:
-        # === VALIDACIÓN Y EXTRACCIÓN DE PARÁMETROS ===
-        body, error = validate_json_input(req)
-        if error:
-            return func.HttpResponse(
-                json.dumps({
-                    "exito": False,
-                    "error_code": "INVALID_JSON",
-                    "error": error["error"],
-                    "status": error["status"],
-                    "run_id": run_id,
-                    "endpoint": endpoint
-                }, ensure_ascii=False),
-                mimetype="application/json",
-                status_code=error["status"]
-            )
-
-        # === VALIDACIÓN DE BODY ===
-        if body is None:
-            body = {}
-
-        # === DETECCIÓN AUTOMÁTICA DEL TIPO DE CORRECCIÓN ===
-        tipo_correccion = detectar_tipo_correccion(body)
-
-        logging.info(
-            f"[{run_id}] Tipo de corrección detectado: {tipo_correccion}")
-
-        # === PROCESAMIENTO DINÁMICO SEGÚN TIPO ===
-        if tipo_correccion == "cosmos_db":
-            resultado = aplicar_correccion_cosmos_db(body, run_id)
-        elif tipo_correccion == "azure_config":
-            resultado = aplicar_correccion_azure_config(body, run_id)
-        elif tipo_correccion == "archivo_local":
-            resultado = aplicar_correccion_archivo_local(body, run_id)
-        elif tipo_correccion == "comando_cli":
-            resultado = aplicar_correccion_comando_cli(body, run_id)
-        elif tipo_correccion == "configuracion_app":
-            resultado = aplicar_correccion_configuracion_app(body, run_id)
-        else:
-            # === FALLBACK UNIVERSAL ===
-            resultado = aplicar_correccion_generica(
-                body, tipo_correccion, run_id)
-
-        # === RESPUESTA ESTRUCTURADA ===
-        response_data = {
-            "exito": resultado.get("exito", True),
-            "tipo_correccion": tipo_correccion,
-            "resultado": resultado,
-            "metadata": {
-                "run_id": run_id,
-                "timestamp": datetime.now().isoformat(),
-                "endpoint": endpoint,
-                "ambiente": "Azure" if IS_AZURE else "Local"
-            }
-        }
-
-        response_data = aplicar_memoria_manual(req, response_data)
-        status_code = 200 if resultado.get("exito", True) else 400
-
-        return func.HttpResponse(
-            json.dumps(response_data, ensure_ascii=False, indent=2),
-            mimetype="application/json",
-            status_code=status_code
-        )
-
-    except Exception as e:
-        logging.exception(f"[{run_id}] Error en aplicar_correccion_manual")
-
-        error_response = {
-            "exito": False,
-            "error_code": "INTERNAL_ERROR",
-            "error": str(e),
-            "tipo_error": type(e).__name__,
-            "run_id": run_id,
-            "endpoint": endpoint,
-            "sugerencias": [
-                "Verificar formato del payload",
-                "Revisar logs del sistema",
-                "Intentar con parámetros más específicos"
-            ]
-        }
-
-        return func.HttpResponse(
-            json.dumps(error_response, ensure_ascii=False),
-            mimetype="application/json",
-            status_code=500
-        )
-
-
-def detectar_tipo_correccion(body: Optional[Dict]) -> str:
-    """
-    Detecta automáticamente el tipo de corrección basado en el contenido del payload.
-    Funciona de forma dinámica sin predefiniciones rígidas.
-    """
-    if body is None:
-        return "generico"
-
-    # Convertir todo a string para análisis
-    content_str = json.dumps(body, ensure_ascii=False).lower()
-
-    # Patrones de detección
-    if any(keyword in content_str for keyword in ["cosmos", "cosmosdb", "timeout", "database"]):
-        return "cosmos_db"
-
-    if any(keyword in content_str for keyword in ["azure", "subscription", "resource_group", "az "]) and "config" in content_str:
-        return "azure_config"
-
-    if any(keyword in content_str for keyword in ["archivo", "file", "ruta", "path", "contenido"]) and "local" in content_str:
-        return "archivo_local"
-
-    if any(keyword in content_str for keyword in ["comando", "cli", "az ", "powershell", "bash"]):
-        return "comando_cli"
-
-    if any(keyword in content_str for keyword in ["app.json", "settings", "configuracion", "config"]):
-        return "configuracion_app"
-
-    # Si no se detecta un tipo específico, usar genérico
-    return "generico"
-
-
-def aplicar_correccion_cosmos_db(body: Optional[Dict], run_id: str) -> Dict:
-    """
-    Aplica correcciones específicas para Cosmos DB (como timeout).
-    """
-    try:
-        if body is None:
-            body = {}
-
-        # Extraer parámetros de forma flexible
-        timeout = body.get("timeout") or body.get(
-            "timeout_seconds") or body.get("valor") or 30
-        database = body.get("database") or body.get("db") or "default"
-
-        logging.info(
-            f"[{run_id}] Aplicando corrección Cosmos DB: timeout={timeout}, database={database}")
-
-        # Simular aplicación de corrección (aquí iría la lógica real)
-        # Por ejemplo, actualizar configuración de Cosmos DB
-
-        # En un caso real, esto podría ser:
-        # - Actualizar connection string
-        # - Modificar configuración de timeout
-        # - Reiniciar servicios
-
-        return {
-            "exito": True,
-            "mensaje": f"Corrección Cosmos DB aplicada: timeout actualizado a {timeout}s",
-            "detalles": {
-                "timeout_anterior": "desconocido",
-                "timeout_nuevo": timeout,
-                "database": database,
-                "timestamp_aplicacion": datetime.now().isoformat()
-            },
-            "acciones_realizadas": [
-                f"Timeout configurado a {timeout} segundos",
-                "Configuración validada",
-                "Cambios aplicados exitosamente"
-            ]
-        }
-
-    except Exception as e:
-        logging.error(f"[{run_id}] Error aplicando corrección Cosmos DB: {e}")
-        return {
-            "exito": False,
-            "error": f"Error aplicando corrección Cosmos DB: {str(e)}",
-            "tipo_error": type(e).__name__
-        }
-
-
-def aplicar_correccion_azure_config(body: dict, run_id: str) -> dict:
-    """
-    Aplica correcciones de configuración de Azure.
-    """
-    try:
-        # Extraer configuraciones de forma flexible
-        config_type = body.get("tipo") or body.get("config_type") or "general"
-        valores = body.get("valores") or body.get(
-            "settings") or body.get("config") or {}
-
-        logging.info(
-            f"[{run_id}] Aplicando corrección Azure Config: tipo={config_type}")
-
-        # Aplicar configuraciones usando Azure CLI
-        resultados = []
-
-        for key, value in valores.items():
-            try:
-                # Ejemplo: az functionapp config appsettings set
-                cmd = f"az functionapp config appsettings set --name {os.environ.get('WEBSITE_SITE_NAME', 'unknown')} --settings {key}={value}"
-
-                # En lugar de ejecutar realmente, simular por seguridad
-                resultados.append({
-                    "setting": key,
-                    "valor": value,
-                    "status": "aplicado",
-                    "comando": cmd
-                })
-
-            except Exception as e:
-                resultados.append({
-                    "setting": key,
-                    "valor": value,
-                    "status": "error",
-                    "error": str(e)
-                })
-
-        return {
-            "exito": True,
-            "mensaje": f"Corrección Azure Config aplicada: {len(resultados)} configuraciones procesadas",
-            "detalles": {
-                "config_type": config_type,
-                "configuraciones": resultados,
-                "timestamp": datetime.now().isoformat()
-            }
-        }
-
-    except Exception as e:
-        logging.error(
-            f"[{run_id}] Error aplicando corrección Azure Config: {e}")
-        return {
-            "exito": False,
-            "error": f"Error aplicando corrección Azure Config: {str(e)}",
-            "tipo_error": type(e).__name__
-        }
-
-
-def aplicar_correccion_archivo_local(body: dict, run_id: str) -> dict:
-    """
-    Aplica correcciones en archivos locales.
-    """
-    try:
-        ruta = body.get("ruta") or body.get("path") or body.get("archivo")
-        contenido = body.get("contenido") or body.get("content")
-        operacion = body.get("operacion") or body.get(
-            "operation") or "escribir"
-
-        if not ruta:
-            return {
-                "exito": False,
-                "error": "Parámetro 'ruta' es requerido para corrección de archivo"
-            }
-
-        logging.info(
-            f"[{run_id}] Aplicando corrección archivo: {ruta}, operación={operacion}")
-
-        # Usar la función existente de crear archivo local
-        resultado = crear_archivo_local(
-            ruta, contenido or "", is_azure=IS_AZURE)
-
-        return {
-            "exito": resultado.get("exito", True),
-            "mensaje": f"Corrección de archivo aplicada: {ruta}",
-            "detalles": resultado
-        }
-
-    except Exception as e:
-        logging.error(f"[{run_id}] Error aplicando corrección archivo: {e}")
-        return {
-            "exito": False,
-            "error": f"Error aplicando corrección archivo: {str(e)}",
-            "tipo_error": type(e).__name__
-        }
-
-
-def aplicar_correccion_comando_cli(body: dict, run_id: str) -> dict:
-    """
-    Aplica correcciones ejecutando comandos CLI.
-    """
-
-    try:
-        comando = body.get("comando") or body.get("command") or body.get("cmd")
-
-        if not comando:
-            return {
-                "exito": False,
-                "error": "Parámetro 'comando' es requerido para corrección CLI"
-            }
-
-        logging.info(f"[{run_id}] Aplicando corrección CLI: {comando}")
-
-        # Importar la función desde el módulo de endpoints
-        from endpoints.ejecutar_cli import ejecutar_cli_http
-
-        # Usar el sistema existente de ejecutar CLI
-        mock_req = func.HttpRequest(
-            method="POST",
-            url="http://localhost/api/ejecutar-cli",
-            body=json.dumps({"comando": comando}).encode(),
-            headers={"Content-Type": "application/json"}
-        )
-
-        # Ejecutar usando el handler existente
-        response = ejecutar_cli_http(mock_req)
-        resultado_cli = json.loads(response.get_body().decode())
-
-        return {
-            "exito": resultado_cli.get("exito", True),
-            "mensaje": f"Corrección CLI aplicada: {comando}",
-            "detalles": resultado_cli
-        }
-
-    except Exception as e:
-        logging.error(f"[{run_id}] Error aplicando corrección CLI: {e}")
-        return {
-            "exito": False,
-            "error": f"Error aplicando corrección CLI: {str(e)}",
-            "tipo_error": type(e).__name__
-        }
-
-
-def aplicar_correccion_configuracion_app(body: dict, run_id: str) -> dict:
-    """
-    Aplica correcciones en configuraciones de aplicación (como app.json).
-    """
-    try:
-        archivo_config = body.get("archivo") or "app.json"
-        configuracion = body.get("configuracion") or body.get("config") or {}
-
-        logging.info(
-            f"[{run_id}] Aplicando corrección configuración app: {archivo_config}")
-
-        # Leer configuración actual si existe
-        ruta_config = os.path.join(os.getcwd(), archivo_config)
-        config_actual = {}
-
-        if os.path.exists(ruta_config):
-            try:
-                with open(ruta_config, 'r', encoding='utf-8') as f:
-                    config_actual = json.load(f)
-            except Exception:
-                config_actual = {}
-
-        # Fusionar configuraciones
-        config_nueva = {**config_actual, **configuracion}
-
-        # Escribir configuración actualizada
-        with open(ruta_config, 'w', encoding='utf-8') as f:
-            json.dump(config_nueva, f, indent=2, ensure_ascii=False)
-
-        return {
-            "exito": True,
-            "mensaje": f"Configuración aplicada en {archivo_config}",
-            "detalles": {
-                "archivo": archivo_config,
-                "ruta_completa": ruta_config,
-                "configuracion_anterior": config_actual,
-                "configuracion_nueva": config_nueva,
-                "cambios_aplicados": list(configuracion.keys())
-            }
-        }
-
-    except Exception as e:
-        logging.error(
-            f"[{run_id}] Error aplicando corrección configuración: {e}")
-        return {
-            "exito": False,
-            "error": f"Error aplicando corrección configuración: {str(e)}",
-            "tipo_error": type(e).__name__
-        }
-
-
-def aplicar_correccion_generica(body: dict, tipo_detectado: str, run_id: str) -> dict:
-    """
-    Fallback universal para cualquier tipo de corrección no específica.
-    """
-    try:
-        logging.info(
-            f"[{run_id}] Aplicando corrección genérica: tipo={tipo_detectado}")
-
-        # Analizar el contenido del body para determinar qué hacer
-        acciones_realizadas = []
-
-        # Si hay un comando, intentar ejecutarlo
-        if "comando" in body:
-            try:
-                resultado_cmd = aplicar_correccion_comando_cli(body, run_id)
-                acciones_realizadas.append(
-                    f"Comando ejecutado: {resultado_cmd.get('mensaje', 'OK')}")
-            except Exception as e:
-                acciones_realizadas.append(
-                    f"Error ejecutando comando: {str(e)}")
-
-        # Si hay configuración, intentar aplicarla
-        if any(key in body for key in ["config", "configuracion", "settings"]):
-            try:
-                resultado_config = aplicar_correccion_configuracion_app(
-                    body, run_id)
-                acciones_realizadas.append(
-                    f"Configuración aplicada: {resultado_config.get('mensaje', 'OK')}")
-            except Exception as e:
-                acciones_realizadas.append(
-                    f"Error aplicando configuración: {str(e)}")
-
-        # Si hay archivo, intentar procesarlo
-        if any(key in body for key in ["archivo", "ruta", "path"]):
-            try:
-                resultado_archivo = aplicar_correccion_archivo_local(
-                    body, run_id)
-                acciones_realizadas.append(
-                    f"Archivo procesado: {resultado_archivo.get('mensaje', 'OK')}")
-            except Exception as e:
-                acciones_realizadas.append(
-                    f"Error procesando archivo: {str(e)}")
-
-        # Si no se pudo hacer nada específico, al menos registrar la intención
-        if not acciones_realizadas:
-            acciones_realizadas.append(
-                "Corrección genérica registrada - sin acciones específicas detectadas")
-
-        return {
-            "exito": True,
-            "mensaje": f"Corrección genérica aplicada (tipo: {tipo_detectado})",
-            "detalles": {
-                "tipo_detectado": tipo_detectado,
-                "payload_recibido": body,
-                "acciones_realizadas": acciones_realizadas,
-                "timestamp": datetime.now().isoformat()
-            },
-            "sugerencias": [
-                "Para correcciones más específicas, incluye campos como 'comando', 'configuracion', o 'archivo'",
-                "Revisa la documentación para formatos de payload específicos"
-            ]
-        }
-
-    except Exception as e:
-        logging.error(f"[{run_id}] Error aplicando corrección genérica: {e}")
-        return {
-            "exito": False,
-            "error": f"Error aplicando corrección genérica: {str(e)}",
-            "tipo_error": type(e).__name__
-        }
-
-
 # Función para obtener ejecutar_cli_http si no está definida
 def get_ejecutar_cli_handler():
     """Busca el handler de ejecutar-cli en el sistema"""
-    # Buscar en globals
-    if 'ejecutar_cli_http' in globals():
-        return globals()['ejecutar_cli_http']
+    # Buscar en globals y en el manifiesto de rutas
+    handler = _route_handler('ejecutar_cli_http')
+    if handler is not None:
+        return handler
 
     # Buscar en funciones registradas
     for f in app.get_functions():
@@ -15340,60 +6544,19 @@ def get_ejecutar_cli_handler():
     return None
 
 
-@app.function_name(name="historial_directo")
-@app.route(route="historial-directo", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
-def historial_directo(req: func.HttpRequest) -> func.HttpResponse:
-    from cosmos_memory_direct import consultar_memoria_cosmos_directo
-    session_id = req.headers.get("Session-ID") or "none"
-    resultado = consultar_memoria_cosmos_directo(req)
-    return func.HttpResponse(
-        json.dumps({
-            "session_id": session_id,
-            "resultado": resultado
-        }, default=str, ensure_ascii=False),
-        mimetype="application/json",
-        status_code=200,
-        charset='utf-8'  # Forzar UTF-8
-    )
-
-
-@app.function_name(name="buscar_memoria_http")
-@app.route(route="buscar-memoria", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def buscar_memoria(req: func.HttpRequest) -> func.HttpResponse:
-    """Buscar en memoria semántica"""
-    try:
-        from endpoints_search_memory import buscar_memoria_endpoint
-        req_body = req.get_json()
-        resultado = buscar_memoria_endpoint(req_body)
-        return func.HttpResponse(
-            json.dumps(resultado, default=str),
-            mimetype="application/json",
-            status_code=200 if resultado.get("exito") else 400
-        )
-    except Exception as e:
-        return func.HttpResponse(
-            json.dumps({"exito": False, "error": str(e)}),
-            mimetype="application/json",
-            status_code=500
-        )
-
+# --- Registrar rutas DESPUÉS de crear app, aplicar wrapper y definir los helpers ---
+# route_manifest.json declara todas las rutas (familias de routes/*.py y
+# endpoints/*.py); se registran stubs y cada módulo se importa en la primera
+# llamada a una de sus rutas. Los módulos de routes/ importan helpers de este
+# archivo, por eso el registro va al final. LAZY_ROUTES_ENABLED=0 restaura el
+# import eager.
+try:
+    from lazy_routes import lazy_routes
+    with startup_profiler.phase("endpoints"):
+        lazy_routes.register(app)
+except Exception as e:
+    logging.error(f"❌ Error registrando rutas del manifiesto: {e}")
+    logging.error(f"Traceback: {traceback.format_exc()}")
 
-@app.function_name(name="indexar_memoria_http")
-@app.route(route="indexar-memoria", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def indexar_memoria(req: func.HttpRequest) -> func.HttpResponse:
-    """Indexar documentos en memoria semántica"""
-    try:
-        from endpoints_search_memory import indexar_memoria_endpoint
-        req_body = req.get_json()
-        resultado = indexar_memoria_endpoint(req_body)
-        return func.HttpResponse(
-            json.dumps(resultado, default=str),
-            mimetype="application/json",
-            status_code=200 if resultado.get("exito") else 400
-        )
-    except Exception as e:
-        return func.HttpResponse(
-            json.dumps({"exito": False, "error": str(e)}),
-            mimetype="application/json",
-            status_code=500
-        )
+# --- Fin del arranque: reporte de presupuesto de imports (ver /api/perf → startup) ---
+startup_profiler.finish()
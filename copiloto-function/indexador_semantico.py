@@ -78,7 +78,7 @@ def indexador_semantico(msg: func.QueueMessage) -> None:
                 return
 
         # 👇 NUEVO: Verificar duplicado ANTES de generar embedding
-        if memory_service.evento_ya_existe(texto_semantico):
+        if memory_service.es_duplicado_para_indexar(texto_semantico):
             logging.info(
                 f"⏭️ Embedding duplicado detectado, se omite generación e indexación para {doc_id}")
             return
@@ -112,6 +112,7 @@ def indexador_semantico(msg: func.QueueMessage) -> None:
         # Enviar a Azure Search
         result = search.indexar_documentos([search_doc])
         if result["exito"]:
+            memory_service.dedup.add(session_id or "", "", texto_semantico)
             logging.info(f"✅ Indexado: {doc_id} - {agent_id} - {endpoint}")
         else:
             logging.error(f"❌ Error indexando {doc_id}: {result.get('error')}")
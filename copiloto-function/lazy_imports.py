@@ -82,3 +82,37 @@ def get_resource_client():
         except ImportError:
             _azure_mgmt_resource = False
     return _azure_mgmt_resource if _azure_mgmt_resource is not False else None
+
+
+_azure_mgmt_monitor_models = None
+_azure_mgmt_resource_models = None
+
+
+def get_monitor_models():
+    """Lazy import de azure.mgmt.monitor.models"""
+    global _azure_mgmt_monitor_models
+    if _azure_mgmt_monitor_models is None:
+        try:
+            from azure.mgmt.monitor import models
+            _azure_mgmt_monitor_models = models
+        except ImportError:
+            _azure_mgmt_monitor_models = False
+    return _azure_mgmt_monitor_models if _azure_mgmt_monitor_models is not False else None
+
+
+def get_resource_models():
+    """Lazy import de azure.mgmt.resource.resources.models (ResourceGroup, Deployment, ...)"""
+    global _azure_mgmt_resource_models
+    if _azure_mgmt_resource_models is None:
+        try:
+            from azure.mgmt.resource.resources import models
+            _azure_mgmt_resource_models = models
+        except ImportError:
+            _azure_mgmt_resource_models = False
+    return _azure_mgmt_resource_models if _azure_mgmt_resource_models is not False else None
+
+
+def mgmt_sdk_available() -> bool:
+    """True si hay al menos un SDK de gestión instalado (equivale al antiguo MGMT_SDK)"""
+    return any(getter() is not None for getter in (
+        get_web_client, get_storage_client, get_monitor_client, get_resource_client))
@@ -0,0 +1,351 @@
+"""
+Registro diferido de rutas a partir de route_manifest.json.
+
+- El manifiesto declara cada ruta (route → module:function, methods, familia,
+  flag de memoria). Las familias de routes/*.py y los endpoints/*.py se
+  registran desde aquí; ningún módulo de rutas se importa en el arranque.
+- En el arranque cada ruta se registra con un stub liviano (mismo
+  function_name, route y methods); el módulo real se importa en la primera
+  llamada a cualquiera de sus rutas.
+- Mientras ese módulo se importa, `app.route` / `app.function_name` se
+  sustituyen por decoradores que solo capturan la función por ruta: el
+  wrapper de memoria ya envolvió al stub y no se agregan FunctionBuilders
+  después del indexado. Un finder en `sys.meta_path` aplica la misma captura
+  si el módulo se importa directamente (`from endpoints.x import y`). Los
+  módulos sin decoradores (routes/*) se resuelven por `module:function`.
+- Si el import falla, el stub responde 500 y se reintenta en la siguiente
+  llamada.
+- LAZY_ROUTES_ENABLED=0 importa todo en el arranque y registra los handlers
+  reales con los mismos datos del manifiesto; LAZY_ROUTES_WARMUP_S > 0
+  precarga los módulos en segundo plano tras ese retardo.
+"""
+import contextlib
+import importlib
+import importlib.abc
+import importlib.machinery
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import azure.functions as func
+
+MANIFEST_PATH = Path(__file__).with_name("route_manifest.json")
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() not in ("0", "false", "no", "off")
+
+
+@dataclass(frozen=True)
+class LazyRoute:
+    route: str
+    function_name: str
+    function: str
+    # None: sin restricción de métodos (como el @app.route original)
+    methods: Optional[Tuple[str, ...]]
+    family: str = ""
+    memory: bool = True
+
+
+@dataclass(frozen=True)
+class LazyModule:
+    module: str
+    routes: Tuple[LazyRoute, ...]
+    # Función `register(app)` para módulos que no registran al importarse
+    register: Optional[str] = None
+
+
+def load_manifest(path: Path = MANIFEST_PATH) -> Tuple[LazyModule, ...]:
+    """Agrupa las entradas del manifiesto por módulo, en el orden declarado."""
+    with open(path, encoding="utf-8") as fh:
+        data = json.load(fh)
+    grouped: Dict[str, List[LazyRoute]] = {}
+    registers: Dict[str, Optional[str]] = {}
+    for entry in data.get("routes", []):
+        module, _, function = entry["target"].partition(":")
+        methods = entry.get("methods")
+        grouped.setdefault(module, []).append(LazyRoute(
+            route=entry["route"],
+            function_name=entry.get("function_name") or function,
+            function=function,
+            methods=tuple(methods) if methods else None,
+            family=entry.get("family", ""),
+            memory=entry.get("memory", True),
+        ))
+        registers[module] = registers.get(module) or entry.get("register")
+    return tuple(LazyModule(module, tuple(routes), registers[module])
+                 for module, routes in grouped.items())
+
+
+class _CaptureLoader(importlib.abc.Loader):
+    """Ejecuta el módulo real con los decoradores de `app` en modo captura."""
+
+    def __init__(self, loader: Any, registry: "LazyRouteRegistry", name: str):
+        self._loader = loader
+        self._registry = registry
+        self._name = name
+
+    def create_module(self, spec: Any) -> Any:
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module: Any) -> None:
+        start = time.perf_counter()
+        try:
+            with self._registry._capture():
+                self._loader.exec_module(module)
+        except Exception as e:
+            self._registry._record(self._name, (time.perf_counter() - start) * 1000, str(e))
+            raise
+        self._registry._record(self._name, (time.perf_counter() - start) * 1000)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._loader, name)
+
+
+class _CaptureFinder(importlib.abc.MetaPathFinder):
+    def __init__(self, registry: "LazyRouteRegistry"):
+        self._registry = registry
+
+    def find_spec(self, fullname: str, path: Any, target: Any = None) -> Any:
+        spec_def = self._registry._modules.get(fullname)
+        if spec_def is None or spec_def.register:
+            return None
+        spec = importlib.machinery.PathFinder.find_spec(fullname, path)
+        if spec is None or spec.loader is None:
+            return None
+        spec.loader = _CaptureLoader(spec.loader, self._registry, fullname)
+        return spec
+
+
+class LazyRouteRegistry:
+    def __init__(self, modules: Optional[Tuple[LazyModule, ...]] = None):
+        self.enabled = _env_flag("LAZY_ROUTES_ENABLED", "1")
+        self._warmup_s = float(os.getenv("LAZY_ROUTES_WARMUP_S", "0"))
+        if modules is None:
+            try:
+                modules = load_manifest()
+            except Exception as e:
+                logging.error(f"[LazyRoutes] No se pudo leer {MANIFEST_PATH.name}: {e}")
+                modules = ()
+        self._modules: Dict[str, LazyModule] = {m.module: m for m in modules}
+        self._declared = {r.route for m in modules for r in m.routes}
+        self._by_function: Dict[str, Tuple[LazyModule, LazyRoute]] = {
+            r.function: (m, r) for m in modules for r in m.routes}
+        self._lock = threading.RLock()
+        self._app: Optional[func.FunctionApp] = None
+        self._capture_depth = 0
+        self._saved_decorators: Dict[str, Any] = {}
+        self._handlers: Dict[str, Callable] = {}
+        self._state: Dict[str, Dict[str, Any]] = {}
+
+    # ------------------------------------------------------------------ #
+    # Registro en el arranque
+    # ------------------------------------------------------------------ #
+    def register(self, app: func.FunctionApp) -> None:
+        self._app = app
+        if not self.enabled:
+            self._register_eager(app)
+            return
+        if not any(isinstance(f, _CaptureFinder) for f in sys.meta_path):
+            sys.meta_path.insert(0, _CaptureFinder(self))
+        for spec in self._modules.values():
+            for route in spec.routes:
+                self._register_stub(app, spec, route)
+        logging.info(
+            f"[LazyRoutes] {len(self._declared)} rutas de {len(self._modules)} módulos "
+            f"registradas con carga diferida")
+        if self._warmup_s > 0:
+            threading.Thread(target=self._warmup, name="lazy-routes-warmup", daemon=True).start()
+
+    def _register_eager(self, app: func.FunctionApp) -> None:
+        for spec in self._modules.values():
+            try:
+                handlers = [(route, self._load(spec, route)) for route in spec.routes]
+            except Exception as e:
+                logging.warning(f"⚠️ No se pudo registrar {spec.module}: {e}")
+                continue
+            for route, handler in handlers:
+                self._register_route(app, route, handler)
+            logging.info(f"✅ Endpoint {spec.module} registrado correctamente")
+
+    def _register_stub(self, app: func.FunctionApp, spec: LazyModule, route: LazyRoute) -> None:
+        def stub(req: func.HttpRequest) -> func.HttpResponse:
+            return self.dispatch(spec, route, req)
+
+        stub.__name__ = stub.__qualname__ = route.function
+        self._register_route(app, route, stub)
+
+    @staticmethod
+    def _register_route(app: func.FunctionApp, route: LazyRoute, fn: Callable) -> None:
+        route_decorator = app.route
+        if not route.memory:
+            # Ruta declarada sin memoria: decorador original de FunctionApp
+            route_decorator = getattr(route_decorator, "__wrapped__", route_decorator)
+        kwargs: Dict[str, Any] = {"route": route.route, "auth_level": func.AuthLevel.ANONYMOUS}
+        if route.methods is not None:
+            kwargs["methods"] = list(route.methods)
+        app.function_name(name=route.function_name)(route_decorator(**kwargs)(fn))
+
+    # ------------------------------------------------------------------ #
+    # Resolución en la primera llamada
+    # ------------------------------------------------------------------ #
+    def dispatch(self, spec: LazyModule, route: LazyRoute, req: func.HttpRequest) -> func.HttpResponse:
+        handler = self._handlers.get(route.route)
+        if handler is None:
+            try:
+                handler = self._load(spec, route)
+            except Exception as e:
+                logging.error(f"[LazyRoutes] No se pudo cargar {spec.module} para /api/{route.route}: {e}")
+                return func.HttpResponse(
+                    json.dumps({"exito": False, "error": f"Endpoint no disponible: {e}",
+                                "modulo": spec.module}, ensure_ascii=False),
+                    mimetype="application/json",
+                    status_code=500,
+                )
+        return handler(req)
+
+    def handler(self, function: str) -> Optional[Callable]:
+        """Handler real (sin stub ni memoria) por nombre de función del manifiesto."""
+        found = self._by_function.get(function)
+        if found is None:
+            return None
+        spec, route = found
+        try:
+            return self._handlers.get(route.route) or self._load(spec, route)
+        except Exception as e:
+            logging.warning(f"[LazyRoutes] {spec.module}:{function} no disponible: {e}")
+            return None
+
+    def _load(self, spec: LazyModule, route: LazyRoute) -> Callable:
+        with self._lock:
+            handler = self._handlers.get(route.route)
+            if handler is not None:
+                return handler
+            first = not self._state.get(spec.module, {}).get("loaded")
+            start = time.perf_counter()
+            try:
+                with self._capture():
+                    module = importlib.import_module(spec.module)
+                    if spec.register and first:
+                        getattr(module, spec.register)(self._app)
+            except Exception as e:
+                self._record(spec.module, (time.perf_counter() - start) * 1000, str(e))
+                raise
+            if not self._state.get(spec.module, {}).get("loaded"):
+                # El finder ya lo registró si el import pasó por _CaptureLoader
+                self._record(spec.module, (time.perf_counter() - start) * 1000)
+            # Módulos con decoradores quedan capturados por ruta; routes/* por nombre
+            handler = self._handlers.get(route.route) or getattr(module, route.function, None)
+            if handler is None:
+                raise RuntimeError(f"{spec.module} no registró la ruta '{route.route}'")
+            self._handlers[route.route] = handler
+            if first:
+                logging.info(
+                    f"[LazyRoutes] {spec.module} cargado en "
+                    f"{self._state.get(spec.module, {}).get('load_ms', 0):.0f} ms")
+            return handler
+
+    @contextlib.contextmanager
+    def _capture(self) -> Iterator[None]:
+        """Sustituye los decoradores de `app` por capturadores (reentrante)."""
+        with self._lock:
+            app = self._app
+            if app is None:
+                raise RuntimeError("LazyRouteRegistry.register(app) no fue llamado")
+            if self._capture_depth == 0:
+                # app.route es atributo de instancia (wrapper de memoria); function_name es de clase
+                self._saved_decorators = {
+                    name: app.__dict__[name] for name in ("route", "function_name") if name in app.__dict__}
+                app.route = self._capturing_route
+                app.function_name = self._capturing_function_name
+            self._capture_depth += 1
+            try:
+                yield
+            finally:
+                self._capture_depth -= 1
+                if self._capture_depth == 0:
+                    for name in ("route", "function_name"):
+                        if name in self._saved_decorators:
+                            setattr(app, name, self._saved_decorators[name])
+                        else:
+                            app.__dict__.pop(name, None)
+                    self._saved_decorators = {}
+
+    def _capturing_route(self, *args: Any, **kwargs: Any) -> Callable:
+        route_path = kwargs.get("route") or (args[0] if args else "")
+
+        def decorator(fn: Callable) -> Callable:
+            key = (route_path or fn.__name__).strip("/")
+            if key not in self._declared:
+                logging.warning(
+                    f"[LazyRoutes] Ruta '{key}' no declarada en {MANIFEST_PATH.name}; no se sirve")
+            self._handlers[key] = fn
+            return fn
+        return decorator
+
+    def _capturing_function_name(self, *args: Any, **kwargs: Any) -> Callable:
+        return lambda fn: fn
+
+    def _warmup(self) -> None:
+        time.sleep(self._warmup_s)
+        for spec in self._modules.values():
+            try:
+                self._load(spec, spec.routes[0])
+            except Exception as e:
+                logging.warning(f"[LazyRoutes] Precarga de {spec.module} falló: {e}")
+
+    # ------------------------------------------------------------------ #
+    # Consultas sobre el manifiesto (/api/status, OpenAPI)
+    # ------------------------------------------------------------------ #
+    def endpoints(self) -> List[str]:
+        return sorted(f"/api/{route}" for route in self._declared)
+
+    def openapi_skeleton(self, title: str = "Copiloto Function API") -> Dict[str, Any]:
+        """Esqueleto OpenAPI 3.1 (paths y métodos) generado desde el manifiesto."""
+        paths: Dict[str, Any] = {}
+        for spec in self._modules.values():
+            for route in spec.routes:
+                methods = route.methods or ("GET", "POST")
+                paths[f"/api/{route.route}"] = {
+                    method.lower(): {
+                        "operationId": route.function_name if len(methods) == 1
+                        else f"{route.function_name}_{method.lower()}",
+                        "tags": [route.family] if route.family else [],
+                        "responses": {"200": {"description": "OK"}},
+                    }
+                    for method in methods
+                }
+        return {
+            "openapi": "3.1.0",
+            "info": {"title": title, "version": "1.0.0",
+                     "description": f"Generado desde {MANIFEST_PATH.name}"},
+            "paths": dict(sorted(paths.items())),
+        }
+
+    # ------------------------------------------------------------------ #
+    # Métricas
+    # ------------------------------------------------------------------ #
+    def _record(self, module: str, load_ms: float, error: Optional[str] = None) -> None:
+        self._state[module] = {
+            "loaded": error is None,
+            "load_ms": round(load_ms, 2),
+            "error": error,
+            "at": time.time(),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        modules = {}
+        for name, spec in self._modules.items():
+            state = self._state.get(name, {"loaded": False})
+            modules[name] = {"family": spec.routes[0].family if spec.routes else "",
+                             "routes": [r.route for r in spec.routes], **state}
+        return {"enabled": self.enabled, "warmup_s": self._warmup_s, "modules": modules}
+
+
+lazy_routes = LazyRouteRegistry()
@@ -128,6 +128,12 @@ def _process_with_redis_cache(mensaje: str, session_id: str, agent_id: str, mode
         cached = redis_buffer.get_cached_payload("llm", global_key)
         cache_source = "global" if cached else "miss"
 
+        if not cached:
+            # Prompt parafraseado: vecino más cercano por embedding
+            cached = redis_buffer.get_llm_semantic_response(
+                agent_id, mensaje, model)
+            cache_source = "semantic" if cached else "miss"
+
         if cached:
             cache_hit = True
             origen = f"redis_{cache_source}"
@@ -144,34 +150,51 @@ def _process_with_redis_cache(mensaje: str, session_id: str, agent_id: str, mode
 
     # Cache miss: llamar al modelo
     if not cache_hit:
-        try:
+        def _call_model_and_cache() -> dict[str, Any]:
             logging.info(f"[MCP-RedisCache] 🤖 Calling OpenAI model: {model}")
             openai_client = _get_openai_client()
             completion = openai_client.chat.completions.create(
                 model=model,
                 messages=[{"role": "user", "content": mensaje}],
             )
-            respuesta_texto = completion.choices[0].message.content
+            texto = completion.choices[0].message.content
             logging.info(
-                f"[MCP-RedisCache] ✅ Model response received: {len(respuesta_texto or '')} chars")
+                f"[MCP-RedisCache] ✅ Model response received: {len(texto or '')} chars")
+            payload = {
+                "respuesta": texto,
+                "session_id": session_id,
+                "agent_id": agent_id,
+                "model": model,
+            }
 
             # Guardar en cache
             if redis_buffer.is_enabled:
                 try:
                     # GUARDAR SOLO en global cache para consistencia total
-                    global_key = redis_buffer.build_llm_global_key(
-                        agent_id, mensaje, model)
-                    redis_buffer.cache_response("llm", global_key, {
-                        "respuesta": respuesta_texto,
-                        "session_id": session_id,
-                        "agent_id": agent_id,
-                        "model": model,
-                    })
+                    redis_buffer.cache_response("llm", global_key, payload)
+                    redis_buffer.cache_llm_semantic_response(
+                        agent_id, mensaje, model, payload)
                     logging.info(
                         f"[MCP-RedisCache] 💾 Response cached successfully")
                 except Exception as cache_err:
                     logging.error(
                         f"[MCP-RedisCache] ❌ Cache write error: {cache_err}")
+            return payload
+
+        try:
+            global_key = redis_buffer.build_llm_global_key(
+                agent_id, mensaje, model)
+            # Workers concurrentes con el mismo prompt esperan a una sola llamada
+            resultado, flight_role = redis_buffer.single_flight(
+                redis_buffer._format_key("llm", global_key), _call_model_and_cache)
+            respuesta_texto = resultado.get(
+                "respuesta") if isinstance(resultado, dict) else resultado
+            if flight_role in ("local", "coalesced"):
+                cache_hit = True
+                cache_source = flight_role
+                origen = f"redis_{flight_role}"
+                logging.info(
+                    f"[MCP-RedisCache] 🔗 Response coalesced ({flight_role}), model not called")
 
         except Exception as e:
             logging.error(f"[MCP-RedisCache] ❌ OpenAI model error: {e}")
@@ -9,9 +9,12 @@ import azure.functions as func
 import json
 import time
 import re
-from typing import Any, Callable, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from datetime import datetime
 
+from services.perf_tracer import perf_tracer
+from services.route_pipeline import route_pipeline
+
 # Lazy loading para evitar timeouts en Azure Functions startup
 _queue_client = None
 _redis_buffer = None
@@ -321,14 +324,15 @@ def _extraer_respuesta_desde_response(response_data: dict) -> str:
 
 def guardar_thread_en_blob(req: func.HttpRequest, route_path: str, response_data: dict, respuesta_agente: str = ""):
     """
-    Persiste el thread completo (mensajes + metadata) en Blob Storage para historiales reales.
+    Persiste el thread (mensajes + metadata) en Blob Storage para historiales reales.
+    Solo anexa los mensajes nuevos al log `threads/{thread_id}.jsonl` (ver services.thread_store).
     """
     redis_buffer = _get_redis_buffer()
     try:
-        from utils_helpers import get_blob_client
+        from services.thread_store import get_thread_store
     except Exception:
         logging.debug(
-            "Blob client no disponible; se omite guardado de thread.")
+            "Thread store no disponible; se omite guardado de thread.")
         return
 
     thread_id, session_id, agent_id = _resolver_identificadores_thread(req)
@@ -341,47 +345,32 @@ def guardar_thread_en_blob(req: func.HttpRequest, route_path: str, response_data
         return
 
     try:
-        client = get_blob_client()
-        if not client:
-            logging.debug("Blob client is None; skipping thread storage.")
-            return
-        container = client.get_container_client(THREADS_CONTAINER_NAME)
-        blob_name = f"{THREADS_BLOB_PREFIX}{thread_id}.json"
-        blob_client = container.get_blob_client(blob_name)
-
-        existing_data = None
-        try:
-            existing_bytes = blob_client.download_blob().readall()
-            existing_data = json.loads(existing_bytes.decode("utf-8"))
-        except Exception:
-            existing_data = None
-
-        mensajes_existentes = []
-        if isinstance(existing_data, dict):
-            mensajes_existentes = existing_data.get("mensajes") or []
-            if not isinstance(mensajes_existentes, list):
-                mensajes_existentes = []
-
-        mensajes_totales = list(mensajes_existentes)
+        store = get_thread_store(THREADS_CONTAINER_NAME, MAX_MENSAJES_THREAD)
+
+        # El snapshot en Redis permite evitar duplicados consecutivos sin
+        # descargar el thread; el blob solo recibe un append con lo nuevo.
+        # En frío se reconstruye desde la cola del log (lectura por rango).
+        snapshot = redis_buffer.get_thread_cache(thread_id)
+        if not isinstance(snapshot, dict):
+            snapshot = store.read_tail(thread_id) or {}
+        mensajes_previos = snapshot.get("mensajes") if isinstance(
+            snapshot.get("mensajes"), list) else []
+        mensajes_totales = list(mensajes_previos)
         _append_message(mensajes_totales, "usuario", user_message)
         _append_message(mensajes_totales, "asistente", assistant_message)
+        mensajes_nuevos = mensajes_totales[len(mensajes_previos):]
 
         if not mensajes_totales:
             return
 
         timestamp = datetime.utcnow().isoformat() + "Z"
-        thread_payload = existing_data if isinstance(
-            existing_data, dict) else {}
-        thread_payload.update({
+        thread_meta = {
             "id": thread_id,
             "session_id": session_id,
             "agent_id": agent_id,
             "endpoint": route_path,
             "timestamp": timestamp,
-        })
-
-        # Limitar mensajes a MAX_MENSAJES_THREAD
-        thread_payload["mensajes"] = mensajes_totales[-MAX_MENSAJES_THREAD:]
+        }
 
         # Limpiar response_data antes de guardar (eliminar campos inútiles)
         if isinstance(response_data, dict):
@@ -392,9 +381,9 @@ def guardar_thread_en_blob(req: func.HttpRequest, route_path: str, response_data
                 if v and not (isinstance(v, str) and not v.strip()):
                     response_clean[k] = v
             if response_clean:
-                thread_payload["response_data"] = response_clean
+                thread_meta["response_data"] = response_clean
 
-        metadata = thread_payload.get("metadata")
+        metadata = snapshot.get("metadata")
         if not isinstance(metadata, dict):
             metadata = {}
         metadata.update({
@@ -403,13 +392,29 @@ def guardar_thread_en_blob(req: func.HttpRequest, route_path: str, response_data
             "ultima_actualizacion": timestamp,
             "wrapper_aplicado": True
         })
-        thread_payload["metadata"] = metadata
+        thread_meta["metadata"] = metadata
+
+        if not store.append(thread_id, mensajes_nuevos, thread_meta):
+            logging.debug(
+                f"[THREAD_STORE] Contenedor de threads no disponible; thread {thread_id} sin guardar.")
+            return
 
-        body_bytes = json.dumps(thread_payload, ensure_ascii=False,
-                                indent=2).encode("utf-8")
-        blob_client.upload_blob(body_bytes, overwrite=True)
+        try:
+            from services.thread_index import get_thread_index
+            get_thread_index().record(
+                thread_id, store.log_name(thread_id), session_id=session_id,
+                agent_id=agent_id, mensajes=min(len(mensajes_totales), MAX_MENSAJES_THREAD),
+                last_modified=timestamp)
+        except Exception:
+            logging.debug(
+                f"[THREAD_STORE] No se pudo indexar thread {thread_id}.", exc_info=True)
+
+        # Limitar mensajes a MAX_MENSAJES_THREAD
+        thread_payload = dict(snapshot)
+        thread_payload.update(thread_meta)
+        thread_payload["mensajes"] = mensajes_totales[-MAX_MENSAJES_THREAD:]
         logging.info(
-            f"[THREAD_STORE] Thread {thread_id} actualizado ({len(thread_payload['mensajes'])} mensajes).")
+            f"[THREAD_STORE] Thread {thread_id} actualizado (+{len(mensajes_nuevos)} mensajes).")
         try:
             redis_buffer.cache_thread_snapshot(thread_id, thread_payload)
         except Exception:
@@ -429,7 +434,7 @@ def recuperar_contexto_conversacional(session_id: str, endpoint_actual: str) ->
 
         # Obtener historial de la sesión
         interacciones = memory_service.get_session_history(
-            session_id, limit=50)
+            session_id, limit=50, fields=["id", "texto_semantico", "data.source"])
 
         if not interacciones:
             return ""
@@ -472,14 +477,12 @@ def memory_route(app: func.FunctionApp) -> Callable:
                 source_name = route_path.strip(
                     "/").replace("-", "_") or func_ref.__name__
 
-                def wrapper(req: func.HttpRequest) -> func.HttpResponse:
-                    """Lectura y escritura de memoria automática."""
-                    print(
-                        f"\n>>> WRAPPER EJECUTANDOSE para: {source_name} <<<\n", flush=True)
-                    logging.warning(
-                        f"🚨 Wrapper ACTIVADO en endpoint: {source_name}")
-                    from services.memory_service import memory_service
-
+                def _etapa_entrada(req: func.HttpRequest, route_path: str, memory_service) -> Optional[func.HttpResponse]:
+                    """
+                    Etapa 0: captura del input del usuario, routing semántico, Pre-Response
+                    Intelligence / continuidad conversacional y registro del input.
+                    Devuelve una respuesta temprana cuando la intención se resuelve aquí.
+                    """
                     # 0️⃣ CAPTURA COMPLETA DE ENTRADA DEL USUARIO
                     try:
                         body = req.get_json() if req.method in [
@@ -694,17 +697,22 @@ def memory_route(app: func.FunctionApp) -> Callable:
                             }
 
                             # Guardar en Cosmos + AI Search (flujo completo automático)
+                            # (write-behind: True = aceptado para escritura, no persistido aún)
                             ok_cosmos = memory_service._log_cosmos(evento)
                             if ok_cosmos:
                                 logging.info(
-                                    f"✅ Guardado e indexado: {evento['id']} ({len(user_message)} chars)")
+                                    f"✅ Encolado para guardar e indexar: {evento['id']} ({len(user_message)} chars)")
                             else:
                                 logging.warning(
                                     "⚠️ No se pudo guardar el input del usuario.")
                     except Exception as e:
                         logging.warning(
                             f"⚠️ Error capturando input del usuario: {e}")
+                    return None
 
+                def _etapa_memoria(req: func.HttpRequest, route_path: str, source_name: str,
+                                   memory_service) -> Dict[str, Any]:
+                    """Etapa 1: memoria de la sesión (Redis y, en miss, Cosmos)."""
                     # 1️⃣ CONSULTAR MEMORIA COMPLETA: Cosmos DB + Conversación Rica
                     memoria_previa = {}
                     try:
@@ -794,31 +802,42 @@ def memory_route(app: func.FunctionApp) -> Callable:
                         except:
                             setattr(req, "_memoria_contexto", {
                                     "tiene_historial": False})
+                    return memoria_previa
 
+                def _clave_busqueda_vectorial(req: func.HttpRequest, route_path: str) -> Tuple[str, str]:
+                    """(query, hash de caché) de la búsqueda vectorial por endpoint."""
+                    # Buscar por endpoint + contenido del request
+                    query_busqueda = f"{route_path}"
+                    try:
+                        body = req.get_json() or {}
+                        if body.get("mensaje"):
+                            query_busqueda += f" {body['mensaje']}"
+                        elif body.get("query"):
+                            query_busqueda += f" {body['query']}"
+                    except:
+                        pass
+                    search_material = f"{route_path}|{getattr(req, '_session_id', '')}|{query_busqueda}"
+                    return query_busqueda, _get_redis_buffer().stable_hash(search_material)
+
+                def _etapa_busqueda_vectorial(req: func.HttpRequest, route_path: str,
+                                              source_name: str) -> Tuple[List[Dict[str, Any]], bool]:
+                    """
+                    Etapa 1.5: búsqueda vectorial en AI Search por endpoint (con caché Redis).
+                    Retorna (documentos, recien_consultados).
+                    """
                     # 1.5️⃣ BÚSQUEDA VECTORIAL EN AI SEARCH POR ENDPOINT
                     docs_vectoriales = []
+                    docs_frescos = False
                     try:
                         from endpoints_search_memory import buscar_memoria_endpoint
 
-                        # Buscar por endpoint + contenido del request
-                        query_busqueda = f"{route_path}"
-                        try:
-                            body = req.get_json() or {}
-                            if body.get("mensaje"):
-                                query_busqueda += f" {body['mensaje']}"
-                            elif body.get("query"):
-                                query_busqueda += f" {body['query']}"
-                        except:
-                            pass
-
+                        query_busqueda, search_hash = _clave_busqueda_vectorial(req, route_path)
                         memoria_payload = {
                             "query": query_busqueda,
                             "top": 20  # Más resultados
                         }
 
-                        search_material = f"{route_path}|{getattr(req, '_session_id', '')}|{query_busqueda}"
                         redis_buffer = _get_redis_buffer()
-                        search_hash = redis_buffer.stable_hash(search_material)
                         search_metrics = {
                             "cache_scope": "search_vectorial",
                             "route": route_path,
@@ -857,11 +876,7 @@ def memory_route(app: func.FunctionApp) -> Callable:
                                     "search", search_hash, docs_vectoriales)
                                 logging.info(
                                     f"🔍 [{source_name}] AI Search: {len(docs_vectoriales)} docs vectoriales para endpoint {route_path}")
-
-                                # Inyectar en memoria_previa
-                                if memoria_previa:
-                                    memoria_previa["docs_vectoriales"] = docs_vectoriales
-                                    memoria_previa["fuente_datos"] = "Endpoint+AISearch"
+                                docs_frescos = True
 
                             search_metrics.update({
                                 "hit": False,
@@ -874,34 +889,48 @@ def memory_route(app: func.FunctionApp) -> Callable:
                     except Exception as e:
                         logging.warning(
                             f"⚠️ [{source_name}] Error en búsqueda vectorial: {e}")
-
-                    # 2️⃣ EJECUTAR ENDPOINT ORIGINAL
-                    try:
-                        response = func_ref(req)
-                        if response is None:
-                            logging.error(
-                                f"❌ [{source_name}] Endpoint devolvió None - esto no debería ocurrir")
-                            return func.HttpResponse(
-                                json.dumps(
-                                    {"ok": False, "error": "Endpoint devolvió None"}, ensure_ascii=False),
-                                mimetype="application/json",
-                                status_code=500
-                            )
-                    except Exception as endpoint_error:
+                    return docs_vectoriales, docs_frescos
+
+                def _memoria_vacia(req: func.HttpRequest, route_path: str) -> Dict[str, Any]:
+                    """Memoria por defecto cuando la etapa 1 vence, falla o está deshabilitada."""
+                    memoria = {"tiene_historial": False, "endpoint": route_path,
+                               "session_id": getattr(req, "_session_id", None)}
+                    if getattr(req, "_memoria_contexto", None) is None:
+                        setattr(req, "_memoria_contexto", memoria)
+                    return memoria
+
+                def _inyectar_docs_vectoriales(memoria_previa: Optional[Dict[str, Any]], docs_vectoriales: List[Dict[str, Any]]) -> None:
+                    if memoria_previa and docs_vectoriales:
+                        memoria_previa["docs_vectoriales"] = docs_vectoriales
+                        memoria_previa["fuente_datos"] = "Endpoint+AISearch"
+
+                def _respuesta_error_endpoint(source_name: str, endpoint_error: Optional[Exception]) -> func.HttpResponse:
+                    """Respuesta 500 cuando el endpoint envuelto falla o devuelve None."""
+                    if endpoint_error is None:
                         logging.error(
-                            f"❌ [{source_name}] Excepción en endpoint: {endpoint_error}")
-                        import traceback
-                        logging.error(f"Traceback: {traceback.format_exc()}")
+                            f"❌ [{source_name}] Endpoint devolvió None - esto no debería ocurrir")
                         return func.HttpResponse(
-                            json.dumps({
-                                "ok": False,
-                                "error": f"Error en endpoint: {str(endpoint_error)}",
-                                "tipo_error": type(endpoint_error).__name__
-                            }, ensure_ascii=False),
+                            json.dumps(
+                                {"ok": False, "error": "Endpoint devolvió None"}, ensure_ascii=False),
                             mimetype="application/json",
                             status_code=500
                         )
-
+                    logging.error(
+                        f"❌ [{source_name}] Excepción en endpoint: {endpoint_error}")
+                    import traceback
+                    logging.error(f"Traceback: {traceback.format_exc()}")
+                    return func.HttpResponse(
+                        json.dumps({
+                            "ok": False,
+                            "error": f"Error en endpoint: {str(endpoint_error)}",
+                            "tipo_error": type(endpoint_error).__name__
+                        }, ensure_ascii=False),
+                        mimetype="application/json",
+                        status_code=500
+                    )
+
+                def _etapa_refresco_cache(req: func.HttpRequest) -> None:
+                    """Post: guarda el contexto caliente de la sesión en Redis."""
                     # Guardar contexto caliente después de la ejecución
                     try:
                         redis_buffer = _get_redis_buffer()
@@ -917,6 +946,12 @@ def memory_route(app: func.FunctionApp) -> Callable:
                         logging.debug(
                             "No se pudo refrescar la caché de memoria post-ejecución.", exc_info=True)
 
+                def _etapa_metadata(req: func.HttpRequest, response: func.HttpResponse, memoria_previa: Optional[Dict[str, Any]],
+                                    source_name: str) -> Tuple[func.HttpResponse, Optional[Dict[str, Any]]]:
+                    """
+                    Pre-respuesta: inyecta metadata de memoria en el cuerpo JSON.
+                    Retorna (response, response_data_for_semantic).
+                    """
                     # 3️⃣ INYECTAR METADATA SIN PERDER CONTENIDO
                     response_data_for_semantic = None
                     try:
@@ -961,7 +996,12 @@ def memory_route(app: func.FunctionApp) -> Callable:
                             f"❌ [{source_name}] Error inyectando metadata: {e}")
                         import traceback
                         logging.error(traceback.format_exc())
+                    return response, response_data_for_semantic
 
+                def _etapa_snapshot_cognitivo(req: func.HttpRequest, response: func.HttpResponse,
+                                              memoria_previa: Optional[Dict[str, Any]], route_path: str,
+                                              source_name: str, memory_service) -> None:
+                    """Post: snapshot de conversación consolidada (solo con contexto real)."""
                     # 4️⃣ CAPTURA AUTOMÁTICA DE CONVERSACIÓN RICA COMPLETA (solo si hay contexto real)
                     try:
                         # CAPTURA AUTOMÁTICA DE THREAD
@@ -1059,6 +1099,7 @@ def memory_route(app: func.FunctionApp) -> Callable:
                         logging.warning(
                             f"⚠️ Error capturando snapshot cognitivo: {e}")
 
+                def _etapa_sync_thread(req: func.HttpRequest, response_data_for_semantic: Optional[Dict[str, Any]]) -> None:
                     # ------------------------------------------------------------------
                     # BLOQUE 5 eliminado intencionalmente para evitar doble registro de
                     # embeddings. Solo se conserva el Bloque 6 que utiliza
@@ -1068,11 +1109,18 @@ def memory_route(app: func.FunctionApp) -> Callable:
                     # 5.5️⃣ SINCRONIZAR THREAD DE FOUNDRY CON MEMORIA
                     try:
                         from thread_memory_hook import sync_thread_to_memory
-                        response_data = sync_thread_to_memory(
-                            req, response_data_for_semantic or {})
+                        sync_thread_to_memory(req, response_data_for_semantic or {})
                     except Exception as e:
                         logging.warning(f"⚠️ Error sincronizando thread: {e}")
 
+                def _etapa_registro_semantico(req: func.HttpRequest, route_path: str,
+                                              response_data_for_semantic: Optional[Dict[str, Any]],
+                                              registrar: Optional[Callable[..., Any]] = None) -> Optional[str]:
+                    """
+                    Prepara el registro de la respuesta semántica y retorna el texto del
+                    assistant para el thread. `registrar` reemplaza a
+                    registrar_respuesta_semantica (p. ej. para diferir la escritura).
+                    """
                     # 6️⃣ CAPTURA DE RESPUESTA COMPLETA FOUNDRY UI
                     assistant_thread_text = None
                     try:
@@ -1088,7 +1136,10 @@ def memory_route(app: func.FunctionApp) -> Callable:
                             logging.info(
                                 f"[BLOQUE 6] Usando response_data capturado, keys: {list(response_data_for_semantic.keys())[:5]}")
                             try:
-                                from registrar_respuesta_semantica import registrar_respuesta_semantica
+                                if registrar is not None:
+                                    registrar_respuesta_semantica = registrar
+                                else:
+                                    from registrar_respuesta_semantica import registrar_respuesta_semantica
 
                                 respuesta_texto = (
                                     response_data_for_semantic.get("respuesta_usuario") or
@@ -1164,7 +1215,11 @@ def memory_route(app: func.FunctionApp) -> Callable:
                     except Exception as e:
                         logging.warning(
                             f"⚠️ Error capturando respuesta Foundry UI: {e}")
+                    return assistant_thread_text
 
+                def _etapa_thread_blob(req: func.HttpRequest, route_path: str,
+                                       response_data_for_semantic: Optional[Dict[str, Any]],
+                                       assistant_thread_text: Optional[str]) -> None:
                     try:
                         guardar_thread_en_blob(
                             req,
@@ -1176,8 +1231,91 @@ def memory_route(app: func.FunctionApp) -> Callable:
                         logging.warning(
                             f"⚠️ Error guardando snapshot de thread: {e}")
 
+                def _etapa_post(req: func.HttpRequest, response: func.HttpResponse, memoria_previa: Optional[Dict[str, Any]],
+                                route_path: str, source_name: str, memory_service) -> func.HttpResponse:
+                    """
+                    Tras ejecutar el endpoint: metadata, caché de memoria, sync del thread y
+                    thread en blob van antes de responder (el siguiente turno los lee); el
+                    snapshot cognitivo y la escritura del registro semántico, después.
+                    """
+                    response, response_data_for_semantic = route_pipeline.run(
+                        "metadata", _etapa_metadata, req, response, memoria_previa, source_name,
+                        default=(response, None))
+
+                    # El texto del assistant se resuelve en línea (lo necesita el thread);
+                    # solo la escritura del registro semántico se difiere
+                    registros: List[Tuple[tuple, Dict[str, Any]]] = []
+                    assistant_thread_text = _etapa_registro_semantico(
+                        req, route_path, response_data_for_semantic,
+                        registrar=lambda *a, **k: registros.append((a, k)))
+
+                    def _registro_semantico() -> None:
+                        if not registros:
+                            return
+                        from registrar_respuesta_semantica import registrar_respuesta_semantica
+                        for reg_args, reg_kwargs in registros:
+                            registrar_respuesta_semantica(*reg_args, **reg_kwargs)
+
+                    route_pipeline.run_post([
+                        ("refresco_cache", lambda: _etapa_refresco_cache(req)),
+                        ("sync_thread", lambda: _etapa_sync_thread(req, response_data_for_semantic)),
+                        ("thread_blob", lambda: _etapa_thread_blob(
+                            req, route_path, response_data_for_semantic, assistant_thread_text)),
+                        ("snapshot_cognitivo", lambda: _etapa_snapshot_cognitivo(
+                            req, response, memoria_previa, route_path, source_name, memory_service)),
+                        ("registro_semantico", _registro_semantico),
+                    ])
                     return response
 
+                def _ejecutar(req: func.HttpRequest) -> func.HttpResponse:
+                    print(
+                        f"\n>>> WRAPPER EJECUTANDOSE para: {source_name} <<<\n", flush=True)
+                    logging.warning(
+                        f"🚨 Wrapper ACTIVADO en endpoint: {source_name}")
+                    from services.memory_service import memory_service
+
+                    # 0️⃣ CAPTURA COMPLETA DE ENTRADA DEL USUARIO
+                    respuesta_temprana = route_pipeline.run(
+                        "entrada", _etapa_entrada, req, route_path, memory_service, isolate=req)
+                    if respuesta_temprana is not None:
+                        return respuesta_temprana
+
+                    # 1️⃣ CONSULTAR MEMORIA COMPLETA: Cosmos DB + Conversación Rica
+                    memoria_previa = route_pipeline.run(
+                        "memoria", _etapa_memoria, req, route_path, source_name, memory_service,
+                        default=None, isolate=req) or _memoria_vacia(req, route_path)
+
+                    # 1.5️⃣ BÚSQUEDA VECTORIAL EN AI SEARCH POR ENDPOINT
+                    docs_vectoriales, docs_frescos = route_pipeline.run(
+                        "busqueda_vectorial", _etapa_busqueda_vectorial, req, route_path, source_name,
+                        default=([], False), isolate=req)
+                    if docs_frescos:
+                        _inyectar_docs_vectoriales(
+                            memoria_previa, docs_vectoriales)
+
+                    # 2️⃣ EJECUTAR ENDPOINT ORIGINAL
+                    inicio_endpoint = time.perf_counter()
+                    try:
+                        with perf_tracer.span("stage.endpoint"):
+                            response = func_ref(req)
+                    except Exception as endpoint_error:
+                        route_pipeline.observe(
+                            "endpoint", (time.perf_counter() - inicio_endpoint) * 1000, "error")
+                        return _respuesta_error_endpoint(source_name, endpoint_error)
+                    route_pipeline.observe(
+                        "endpoint", (time.perf_counter() - inicio_endpoint) * 1000)
+                    if response is None:
+                        return _respuesta_error_endpoint(source_name, None)
+
+                    # 3️⃣-6️⃣ POST-PROCESO (escrituras leídas por el siguiente turno en línea, el resto en segundo plano)
+                    return _etapa_post(req, response, memoria_previa,
+                                       route_path, source_name, memory_service)
+
+                def wrapper(req: func.HttpRequest) -> func.HttpResponse:
+                    """Lectura y escritura de memoria automática."""
+                    with perf_tracer.request_trace(route_path or source_name):
+                        return _ejecutar(req)
+
                 if "historial" not in route_path.lower():
                     logging.info(
                         f"✅ Memoria automática aplicada a endpoint: {route_path}")
@@ -1192,6 +1330,8 @@ def memory_route(app: func.FunctionApp) -> Callable:
 
         return decorator
 
+    # Rutas declaradas con "memory": false en route_manifest.json usan el original
+    route_with_memory.__wrapped__ = original_route
     return route_with_memory
 
 
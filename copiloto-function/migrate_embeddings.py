@@ -13,6 +13,8 @@ from azure.search.documents import SearchClient
 from azure.core.credentials import AzureKeyCredential
 from azure.identity import DefaultAzureCredential
 
+from services.embedding_service import EmbeddingService
+
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -74,17 +76,21 @@ else:
 EMBEDDING_MODEL = "text-embedding-3-large"
 
 
+BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+# Embeddings en batch con caché por contenido (re-ejecutar la migración no re-paga textos)
+embedding_service = EmbeddingService(model=EMBEDDING_MODEL, client=openai_client)
+
+
 def generar_embedding(texto: str) -> list:
     """Genera embedding real con OpenAI"""
-    try:
-        response = openai_client.embeddings.create(
-            model=EMBEDDING_MODEL,
-            input=texto
-        )
-        return response.data[0].embedding
-    except Exception as e:
-        logging.error(f"❌ Error generando embedding: {e}")
-        return None
+    vector = embedding_service.embed(texto)
+    return vector.tolist() if vector is not None else None
+
+
+def generar_embeddings(textos: list) -> list:
+    """Genera embeddings para un bloque de textos (mismo orden)"""
+    return [v.tolist() if v is not None else None for v in embedding_service.embed_many(textos)]
 
 
 def migrar_desde_cosmos():
@@ -141,6 +147,7 @@ def migrar_desde_cosmos():
     documentos_omitidos = 0
     errores = 0
 
+    pendientes = []
     for item in items:
         # Saltar si ya está indexado
         if item.get("id") in existing_ids:
@@ -148,26 +155,36 @@ def migrar_desde_cosmos():
             if documentos_omitidos % 100 == 0:
                 logging.info(f"⏭️ Omitidos: {documentos_omitidos}")
             continue
-        try:
-            doc_id = item.get("id")
-
-            # Extraer texto semántico
-            texto_semantico = (
-                item.get("texto_semantico")
-                or item.get("comando")
-                or item.get("mensaje")
-                or f"{item.get('endpoint', '')} {item.get('tipo', '')}"
-            )
-
-            if not texto_semantico or len(texto_semantico.strip()) < 5:
-                logging.warning(
-                    f"⚠️ Documento {item.get('id')} sin texto válido, omitiendo")
-                continue
 
-            # Generar embedding real
-            logging.info(f"🔄 Generando embedding para: {item.get('id')}")
-            vector = generar_embedding(texto_semantico)
+        # Extraer texto semántico
+        texto_semantico = (
+            item.get("texto_semantico")
+            or item.get("comando")
+            or item.get("mensaje")
+            or f"{item.get('endpoint', '')} {item.get('tipo', '')}"
+        )
+
+        if not texto_semantico or len(texto_semantico.strip()) < 5:
+            logging.warning(
+                f"⚠️ Documento {item.get('id')} sin texto válido, omitiendo")
+            continue
+
+        pendientes.append((item, texto_semantico))
+
+    for inicio in range(0, len(pendientes), BATCH_SIZE):
+        bloque = pendientes[inicio:inicio + BATCH_SIZE]
+        try:
+            # Generar embeddings reales (una llamada por bloque)
+            logging.info(
+                f"🔄 Generando embeddings para {len(bloque)} documentos ({inicio + len(bloque)}/{len(pendientes)})")
+            vectores = generar_embeddings([texto for _, texto in bloque])
+        except Exception as e:
+            logging.error(f"❌ Error generando embeddings del bloque: {e}")
+            errores += len(bloque)
+            continue
 
+        docs = []
+        for (item, texto_semantico), vector in zip(bloque, vectores):
             if not vector:
                 logging.error(
                     f"❌ No se pudo generar embedding para {item.get('id')}")
@@ -183,7 +200,7 @@ def migrar_desde_cosmos():
             else:
                 timestamp = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
 
-            doc = {
+            docs.append({
                 "id": item.get("id"),
                 "agent_id": item.get("agent_id", "unknown"),
                 "session_id": item.get("session_id", "unknown"),
@@ -193,22 +210,24 @@ def migrar_desde_cosmos():
                 "texto_semantico": texto_semantico,
                 "vector": vector,
                 "exito": item.get("exito", True)
-            }
-
-            # Subir a Azure Search
-            result = search_client.upload_documents(documents=[doc])
+            })
 
-            if result[0].succeeded:
-                documentos_indexados += 1
-                logging.info(f"✅ Indexado: {item.get('id')}")
-            else:
-                logging.error(f"❌ Fallo indexación: {item.get('id')}")
-                errores += 1
+        if not docs:
+            continue
 
+        # Subir a Azure Search (un upload por bloque)
+        try:
+            result = search_client.upload_documents(documents=docs)
+            for r in result:
+                if r.succeeded:
+                    documentos_indexados += 1
+                    logging.info(f"✅ Indexado: {r.key}")
+                else:
+                    logging.error(f"❌ Fallo indexación: {r.key}")
+                    errores += 1
         except Exception as e:
-            logging.error(
-                f"❌ Error procesando {item.get('id', 'unknown')}: {e}")
-            errores += 1
+            logging.error(f"❌ Error subiendo bloque de {len(docs)} documentos: {e}")
+            errores += len(docs)
 
     logging.info(f"""
     ✅ Migración completada
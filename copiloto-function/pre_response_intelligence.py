@@ -22,6 +22,7 @@ from dataclasses import dataclass
 # Reutilizar módulos existentes SIN duplicar lógica
 from conversational_continuity_middleware import ConversationalContinuityMiddleware
 from services.redis_buffer_service import redis_buffer
+from services.context_fanout import context_fanout
 
 
 @dataclass
@@ -46,6 +47,10 @@ class IntelligenceContext:
     # Prompt enriquecido final
     enriched_prompt: Optional[str] = None
 
+    # Fuentes que no llegaron a tiempo o fallaron ({fuente: motivo})
+    dropped_sources: Optional[Dict[str, str]] = None
+    gather_latency_ms: Optional[float] = None
+
 
 class PreResponseIntelligence:
     """
@@ -201,13 +206,12 @@ class PreResponseIntelligence:
         try:
             # Si hay contexto conversacional, usar el builder existente
             if intelligence_context.conversation_context:
-                from conversational_continuity_middleware import build_context_enriched_prompt
+                from conversational_continuity_middleware import compose_enriched_prompt
 
-                enriched = build_context_enriched_prompt(
-                    original_prompt=intelligence_context.user_query,
-                    user_message=intelligence_context.user_query,
-                    session_id=intelligence_context.session_id,
-                    agent_id=intelligence_context.agent_id
+                # El contexto ya se recuperó en la fase de fan-out: no volver a consultarlo
+                enriched = compose_enriched_prompt(
+                    intelligence_context.user_query,
+                    intelligence_context.conversation_context
                 )
 
                 # Agregar contexto adicional si existe
@@ -257,19 +261,29 @@ class PreResponseIntelligence:
         intent_analysis = self.analyze_query_intent(user_query)
         required_sources = intent_analysis["required_sources"]
 
-        # 2. Reunir contexto según las fuentes requeridas
+        # 2. Reunir contexto según las fuentes requeridas, en paralelo
+        sources = {}
         if "conversation" in required_sources or "redis" in required_sources:
-            context.conversation_context = self.gather_conversation_context(
-                user_query, session_id, agent_id
-            )
+            sources["conversation"] = lambda: self.gather_conversation_context(
+                user_query, session_id, agent_id)
 
         if "github" in required_sources:
-            context.github_context = self.gather_github_context(user_query)
+            sources["github"] = lambda: self.gather_github_context(user_query)
 
         if "semantic_search" in required_sources:
-            context.semantic_results = self.gather_semantic_context(
+            sources["semantic_search"] = lambda: self.gather_semantic_context(
                 user_query, session_id)
 
+        # "conversation" hace su propio fan-out interno con el mismo deadline:
+        # se le da un margen para que devuelva lo parcial en vez de descartarse
+        fanout = context_fanout.run(sources, deadlines={
+            "conversation": context_fanout.deadline_for("conversation") + 0.25})
+        context.conversation_context = fanout.values.get("conversation")
+        context.github_context = fanout.values.get("github")
+        context.semantic_results = fanout.values.get("semantic_search")
+        context.dropped_sources = fanout.dropped
+        context.gather_latency_ms = fanout.elapsed_ms
+
         # 3. Construir prompt enriquecido
         context.enriched_prompt = self.build_enriched_context(context)
 
@@ -4,6 +4,7 @@ Registrador de Respuestas Semánticas del Agente
 Vectoriza y persiste las respuestas generadas por el copiloto/agente.
 """
 import logging
+import os
 from datetime import datetime
 from typing import Optional
 
@@ -120,7 +121,9 @@ def registrar_respuesta_semantica(
         }
 
         # Usar flujo unificado que incluye validación de duplicados e indexación
-        ok = memory_service._log_cosmos(evento)
+        # Corre en la etapa post: se espera el resultado real de la escritura
+        ok = memory_service._log_cosmos(evento, wait=float(
+            os.environ.get("SEMANTIC_RESPONSE_WRITE_WAIT_S", "10")))
         if ok:
             logging.info(f"✅ Respuesta guardada e indexada: {evento['id']}")
         else:
@@ -9,6 +9,8 @@ from azure.search.documents import SearchClient
 from azure.core.credentials import AzureKeyCredential
 from openai import AzureOpenAI
 
+from services.embedding_service import EmbeddingService
+
 # Cargar variables de entorno
 search_endpoint = os.environ["AZURE_SEARCH_ENDPOINT"]
 search_key = os.environ["AZURE_SEARCH_KEY"]
@@ -24,17 +26,20 @@ openai_client = AzureOpenAI(
     api_version="2024-02-01"
 )
 
+# Embeddings en batch con caché por contenido (reindexar no re-paga textos ya vistos)
+embedding_service = EmbeddingService(model="text-embedding-3-large", client=openai_client)
+BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", "64"))
+
+
 def generar_embedding(texto: str):
     """Genera embeddings reales usando Azure OpenAI"""
-    try:
-        response = openai_client.embeddings.create(
-            input=texto[:8000],
-            model="text-embedding-3-large"
-        )
-        return response.data[0].embedding
-    except Exception as e:
-        logging.error(f"❌ Error generando embedding: {e}")
-        return None
+    vector = embedding_service.embed(texto)
+    return vector.tolist() if vector is not None else None
+
+
+def generar_embeddings(textos):
+    """Genera embeddings para un bloque de textos en una sola llamada"""
+    return [v.tolist() if v is not None else None for v in embedding_service.embed_many(textos)]
 
 def reindexar_documentos():
     """Reprocesa todos los documentos del índice"""
@@ -42,16 +47,16 @@ def reindexar_documentos():
     resultados = search_client.search(search_text="*", top=1000)
     actualizados = []
 
-    for doc in resultados:
-        texto = doc.get("texto_semantico", "")
-        if not texto.strip():
-            continue
-        
-        vector = generar_embedding(texto)
-        if vector:
-            doc["vector"] = vector
-            actualizados.append(doc)
-            print(f"✅ Reindexado: {doc['id']} ({len(vector)} dimensiones)")
+    pendientes = [doc for doc in resultados if doc.get("texto_semantico", "").strip()]
+
+    for inicio in range(0, len(pendientes), BATCH_SIZE):
+        bloque = pendientes[inicio:inicio + BATCH_SIZE]
+        vectores = generar_embeddings([doc["texto_semantico"] for doc in bloque])
+        for doc, vector in zip(bloque, vectores):
+            if vector:
+                doc["vector"] = vector
+                actualizados.append(doc)
+                print(f"✅ Reindexado: {doc['id']} ({len(vector)} dimensiones)")
     
     if actualizados:
         print(f"\n🚀 Subiendo {len(actualizados)} documentos reindexados...")
@@ -0,0 +1,6 @@
+"""
+Familias de rutas HTTP separadas de function_app.py.
+
+Ningún módulo de este paquete se importa en el arranque: lazy_routes registra
+cada ruta desde route_manifest.json y carga el módulo en la primera llamada.
+"""
@@ -0,0 +1,1058 @@
+"""
+Rutas: cli
+ejecutar, bridge-cli y scripts (ejecutar-script, ejecutar-script-local,
+verificar-script).
+
+Se importa en la primera llamada a una de sus rutas (ver route_manifest.json
+y lazy_routes); los helpers compartidos siguen en function_app.
+"""
+import json
+import logging
+import os
+import platform
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import traceback
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import azure.functions as func
+
+from services.command_executor import CommandRejected, command_executor
+from utils_semantic import _find_script_dynamically, _generate_smart_suggestions
+
+from function_app import (
+    CONTAINER_NAME,
+    diagnosticar_function_app,
+    generar_dashboard_insights,
+    get_blob_client,
+    IS_AZURE,
+    procesar_intencion_semantica,
+    render_tool_response,
+)
+
+
+def _executor_busy_response(error: str, extra: dict) -> func.HttpResponse:
+    """503 cuando el executor de comandos no acepta más trabajo (cola llena)."""
+    return func.HttpResponse(json.dumps({
+        "success": False,
+        "error": error,
+        "exit_code": -1,
+        **extra,
+    }, ensure_ascii=False), status_code=503, mimetype="application/json",
+        headers={"Retry-After": "5"})
+
+
+def generar_guia_contextual(tema: str, parametros: Optional[dict] = None) -> dict:
+    """Genera guías contextuales paso a paso"""
+    guias = {
+        "configurar_blob": {
+            "titulo": "Configurar Azure Blob Storage",
+            "pasos": [
+                "1. Ejecuta: ./sync_to_blob.ps1",
+                "2. Verifica con: az storage container list --account-name boatrentalstorage",
+                "3. Prueba con: leer:mobile-app/package.json"
+            ],
+            "comandos_utiles": [
+                "az storage blob list --container-name boat-rental-project --account-name boatrentalstorage",
+                "az functionapp config appsettings set --name copiloto-semantico-func --settings AZURE_STORAGE_CONNECTION_STRING=<connection-string>"
+            ]
+        },
+        "optimizar_performance": {
+            "titulo": "Optimizar Performance de Function App",
+            "pasos": [
+                "1. Habilitar Application Insights",
+                "2. Configurar auto-scaling",
+                "3. Implementar caché Redis"
+            ],
+            "metricas_clave": ["Latencia < 500ms", "Error rate < 1%", "Availability > 99.9%"]
+        },
+        "debug_errores": {
+            "titulo": "Debugging de Errores",
+            "pasos": [
+                "1. Revisar logs: az webapp log tail --name copiloto-semantico-func",
+                "2. Verificar App Settings",
+                "3. Probar endpoints individualmente"
+            ],
+            "herramientas": ["Azure Portal", "Application Insights", "Log Analytics"]
+        }
+    }
+
+    if tema in guias:
+        return {
+            "exito": True,
+            "guia": guias[tema],
+            "proximos_pasos": ["diagnosticar:completo", "dashboard"]
+        }
+
+    return {
+        "exito": True,
+        "guias_disponibles": list(guias.keys()),
+        "sugerencia": "Especifica un tema de la lista"
+    }
+
+
+def orquestar_flujo_trabajo(flujo: str, parametros: dict = {}) -> dict:
+    """Orquesta flujos de trabajo complejos"""
+    flujos = {
+        "deployment": [
+            {"paso": "Verificar código", "comando": "analizar:src"},
+            {"paso": "Sincronizar archivos", "comando": "sync_to_blob"},
+            {"paso": "Publicar función", "comando": "func azure functionapp publish"},
+            {"paso": "Verificar deployment", "comando": "diagnosticar:completo"}
+        ],
+        "monitoreo": [
+            {"paso": "Obtener métricas", "comando": "dashboard"},
+            {"paso": "Analizar logs", "comando": "analizar:logs"},
+            {"paso": "Generar reporte", "comando": "generar:reporte"}
+        ]
+    }
+
+    if flujo in flujos:
+        return {
+            "exito": True,
+            "flujo": flujo,
+            "pasos": flujos[flujo],
+            "estado": "Listo para ejecutar",
+            "comando_inicio": f"orquestar:ejecutar:{flujo}"
+        }
+
+    return {
+        "exito": True,
+        "flujos_disponibles": list(flujos.keys()),
+        "descripcion": "Flujos de trabajo automatizados"
+    }
+
+
+def ejecutar(req: func.HttpRequest) -> func.HttpResponse:
+    """Versión mejorada del endpoint ejecutar con intenciones extendidas"""
+
+    logging.info('🚀 Endpoint ejecutar (orquestador mejorado) activado')
+
+    # 🧠 OBTENER CONTEXTO SEMÁNTICO DEL WRAPPER AUTOMÁTICO
+    contexto_semantico = getattr(req, '_contexto_semantico', {})
+    memoria_contexto = getattr(req, '_memoria_contexto', {})
+    memoria_prompt = getattr(req, '_memoria_prompt', '')
+    session_info = {
+        'session_id': getattr(req, '_session_id', 'unknown'),
+        'agent_id': getattr(req, '_agent_id', 'unknown')
+    }
+
+    if memoria_contexto and memoria_contexto.get("tiene_historial"):
+        logging.info(
+            f"🧠 Continuando sesión con {memoria_contexto['total_interacciones_sesion']} interacciones previas")
+
+    # Initialize req_body to handle potential exceptions
+    req_body = {}
+
+    try:
+        # Obtener y validar el body
+        try:
+            req_body = req.get_json()
+        except ValueError:
+            req_body = {}
+
+        # Valores por defecto más robustos
+        intencion = req_body.get('intencion', '')
+        parametros = req_body.get('parametros')
+        if parametros is None:
+            parametros = {}
+        contexto = req_body.get('contexto', {})
+        modo = req_body.get('modo', 'normal')
+
+        # VALIDACIÓN: Rechazar intención vacía con 400
+        if not intencion or not intencion.strip():
+            return func.HttpResponse(
+                json.dumps({
+                    "error": "El campo 'intencion' es requerido y no puede estar vacío",
+                    "error_code": "MISSING_REQUIRED_FIELD",
+                    "campo_faltante": "intencion",
+                    "ejemplo_valido": {
+                        "intencion": "dashboard",
+                        "parametros": {},
+                        "modo": "normal"
+                    }
+                }),
+                status_code=400,
+                mimetype="application/json"
+            )
+
+        # Logging mejorado para debug
+        logging.info(f'Procesando: intencion={intencion}, modo={modo}')
+        logging.debug(f'Parametros: {parametros}')
+        logging.debug(f'Contexto: {contexto}')
+
+        # Usar el procesador semántico principal
+        resultado = procesar_intencion_semantica(intencion, parametros)
+        procesador_usado = 'semantico'
+
+        # Si falla, intentar casos especiales
+        if not resultado.get("exito"):
+            logging.info(
+                f"Procesador semántico falló, intentando casos especiales para: {intencion}")
+            procesador_usado = 'fallback'
+
+        # Manejar casos especiales si ambos procesadores fallan
+        if not resultado.get("exito"):
+            if intencion == "dashboard":
+                resultado = generar_dashboard_insights()
+                procesador_usado = 'especial'
+            elif intencion == "diagnosticar:completo":
+                resultado = diagnosticar_function_app()
+                procesador_usado = 'especial'
+            elif intencion.startswith("guia:"):
+                tema = intencion.split(
+                    ":", 1)[1] if ":" in intencion else "ayuda"
+                resultado = generar_guia_contextual(tema, parametros)
+                procesador_usado = 'especial'
+            elif intencion.startswith("orquestar:"):
+                flujo = intencion.split(":", 1)[1] if ":" in intencion else ""
+                resultado = orquestar_flujo_trabajo(flujo, parametros)
+                procesador_usado = 'especial'
+
+        # Asegurar que siempre hay un resultado válido
+        if resultado is None:
+            resultado = {
+                "exito": False,
+                "error": "No se pudo procesar la intención",
+                "intencion_recibida": intencion,
+                "sugerencias": ["dashboard", "diagnosticar:completo", "verificar:almacenamiento", "git:status"]
+            }
+            procesador_usado = 'fallback'
+
+        # Enriquecer respuesta con metadata
+        if not isinstance(resultado, dict):
+            resultado = {"resultado": resultado}
+
+        # Ensure resultado is a mutable dict and add metadata
+        if isinstance(resultado, dict):
+            # Create a completely new mutable dict to avoid type issues
+            nuevo_resultado = {}
+            # Copy all existing data
+            for key, value in resultado.items():
+                nuevo_resultado[key] = value
+
+            # Add metadata
+            nuevo_resultado['metadata'] = {
+                'timestamp': datetime.now().isoformat(),
+                'modo': modo,
+                'intencion_procesada': intencion,
+                'procesador': procesador_usado,
+                'ambiente': 'Azure' if IS_AZURE else 'Local',
+                'copiloto_version': '2.0-orchestrator-extendido',
+                'session_info': session_info,
+                'memoria_disponible': bool(memoria_contexto and memoria_contexto.get("tiene_historial"))
+            }
+
+            # 🧠 AGREGAR CONTEXTO DE MEMORIA
+            if memoria_prompt:
+                nuevo_resultado['contexto_memoria'] = memoria_prompt
+
+            # Si hay error de urgencia alta, agregar diagnóstico
+            if not nuevo_resultado.get('exito', True) and contexto.get('urgencia') == 'alta':
+                nuevo_resultado['diagnostico_automatico'] = {
+                    "mensaje": "Detectada urgencia alta, ejecutando diagnóstico automático",
+                    "comando_sugerido": "diagnosticar:completo"
+                }
+
+            resultado = nuevo_resultado
+
+        # Agregar contexto de ayuda si falló
+        if not resultado.get('exito', True):
+            resultado['ayuda'] = {
+                'intenciones_extendidas': [
+                    "verificar:almacenamiento",
+                    "limpiar:cache",
+                    "generar:resumen",
+                    "git:status",
+                    "analizar:rendimiento",
+                    "confirmar:accion"
+                ],
+                'intenciones_basicas': [
+                    "dashboard",
+                    "diagnosticar:completo",
+                    "buscar:archivos",
+                    "generar:readme",
+                    "guia:configurar_blob"
+                ],
+                'ejemplo': {
+                    "intencion": "verificar:almacenamiento",
+                    "parametros": {},
+                    "modo": "normal"
+                }
+            }
+
+        # Verificar si se solicita respuesta semántica
+        semantic_mode = req_body.get('semantic_response', False)
+
+        if semantic_mode:
+            status_code = 200 if resultado.get('exito', True) else 400
+            semantic_response = render_tool_response(status_code, {
+                "ok": resultado.get('exito', True),
+                "error_code": resultado.get('error') if not resultado.get('exito', True) else None,
+                "cause": resultado.get('error') if not resultado.get('exito', True) else None,
+                "data": resultado
+            })
+            return func.HttpResponse(
+                semantic_response,
+                mimetype="text/plain",
+                status_code=200
+            )
+
+        # NOTA: La memoria semántica se registra automáticamente por el wrapper @registrar_memoria
+
+        return func.HttpResponse(
+            json.dumps(resultado, indent=2, ensure_ascii=False),
+            mimetype="application/json",
+            status_code=200  # Siempre 200 aunque haya error lógico
+        )
+
+    except Exception as e:
+        logging.error(f"Error en ejecutar: {str(e)}")
+        logging.error(f"Traceback: {traceback.format_exc()}")
+
+        # Respuesta de error estructurada
+        error_response = {
+            "error": str(e),
+            "tipo": type(e).__name__,
+            "intencion_recibida": req_body.get('intencion', 'desconocida') if 'req_body' in locals() else 'no_parseado',
+            "sugerencia": "Verifica el formato de la petición",
+            "ejemplo_valido": {
+                "intencion": "verificar:almacenamiento",
+                "parametros": {},
+                "modo": "normal"
+            },
+            "metadata": {
+                'timestamp': datetime.now().isoformat(),
+                'ambiente': 'Azure' if IS_AZURE else 'Local',
+                'version': '2.0-orchestrator-extendido'
+            }
+        }
+
+        # Verificar si se solicita respuesta semántica para errores
+        semantic_mode = req_body.get(
+            'semantic_response', False) if req_body else False
+
+        if semantic_mode:
+            semantic_response = render_tool_response(500, {
+                "ok": False,
+                "error_code": "EXECUTION_ERROR",
+                "cause": str(e)
+            })
+            return func.HttpResponse(
+                semantic_response,
+                mimetype="text/plain",
+                status_code=200
+            )
+
+        return func.HttpResponse(
+            json.dumps(error_response, indent=2),
+            mimetype="application/json",
+            status_code=200  # Cambiar a 200 para evitar problemas con Logic App
+        )
+
+
+def bridge_cli(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Endpoint súper tolerante para agentes problemáticos que combina parsing raw + JSON
+    """
+    request_id = uuid.uuid4().hex[:8]
+    from endpoints.ejecutar_cli import ejecutar_cli_http
+    try:
+        # 🔥 VALIDACIÓN DEFENSIVA DE JSON + raw_body
+        raw_body = req.get_body().decode('utf-8') if req.get_body() else ""
+
+        # ✅ MEJORA: Aceptar body vacío y usar comando por defecto
+        if not raw_body and req.method == "POST":
+            logging.info(
+                f"[BRIDGE-{request_id}] ℹ️ Body vacío en POST, usando comando por defecto")
+            # En lugar de error, usar comando por defecto
+            comando_defecto = "storage account list"
+
+            # Ejecutar comando por defecto directamente
+            mock_req = func.HttpRequest(
+                method="POST",
+                url="http://localhost/api/ejecutar-cli",
+                body=json.dumps({"comando": comando_defecto}).encode(),
+                headers={"Content-Type": "application/json"}
+            )
+
+            result_response = ejecutar_cli_http(mock_req)
+            result_data = json.loads(result_response.get_body().decode())
+
+            # Agregar metadata indicando que se usó comando por defecto
+            if isinstance(result_data, dict):
+                result_data["bridge_metadata"] = {
+                    "request_id": request_id,
+                    "comando_extraido": comando_defecto,
+                    "origen_comando": "default_empty_body",
+                    "mensaje": "Body vacío - usando comando por defecto"
+                }
+
+            return func.HttpResponse(
+                json.dumps(result_data, ensure_ascii=False),
+                mimetype="application/json",
+                status_code=200  # Siempre exitoso con comando por defecto
+            )
+
+        # ✅ SOLUCIÓN: Validar JSON malformado y devolver 400
+        json_body = {}
+        json_parse_error = None
+        is_malformed_json = False
+
+        try:
+            if raw_body.strip():
+                json_body = req.get_json() or {}
+        except ValueError as ve:
+            json_parse_error = str(ve)
+            is_malformed_json = True
+            logging.warning(
+                f"[BRIDGE-{request_id}] ⚠️ JSON inválido: {json_parse_error}")
+
+            # ✅ CORRECCIÓN: Rechazar JSON malformado con 400 en lugar de usar fallback
+            if raw_body.strip() and len(raw_body.strip()) > 5:  # Si hay contenido sustancial pero JSON inválido
+                return func.HttpResponse(
+                    json.dumps({
+                        "exito": False,
+                        "error_code": "MALFORMED_JSON",
+                        "error": "El cuerpo de la solicitud contiene JSON malformado",
+                        "details": {
+                            "parse_error": json_parse_error,
+                            "raw_body_preview": raw_body[:100],
+                            "request_id": request_id
+                        },
+                        "suggestion": "Verifica la sintaxis JSON del cuerpo de la solicitud",
+                        "status": 400
+                    }, ensure_ascii=False),
+                    mimetype="application/json",
+                    status_code=400
+                )
+
+            # Si es contenido mínimo malformado, también rechazar
+            return func.HttpResponse(
+                json.dumps({
+                    "exito": False,
+                    "error_code": "INVALID_REQUEST_BODY",
+                    "error": "Cuerpo de solicitud inválido o malformado",
+                    "details": {
+                        "parse_error": json_parse_error,
+                        "request_id": request_id
+                    },
+                    "status": 422
+                }, ensure_ascii=False),
+                mimetype="application/json",
+                status_code=422
+            )
+
+        except Exception as e:
+            json_parse_error = str(e)
+            logging.error(
+                f"[BRIDGE-{request_id}] 💥 Error crítico parseando JSON: {json_parse_error}")
+
+            # ✅ CORRECCIÓN: Error crítico de parsing también debe devolver error
+            return func.HttpResponse(
+                json.dumps({
+                    "exito": False,
+                    "error_code": "JSON_PARSE_ERROR",
+                    "error": "Error crítico procesando el cuerpo de la solicitud",
+                    "details": {
+                        "parse_error": json_parse_error,
+                        "request_id": request_id
+                    },
+                    "status": 500
+                }, ensure_ascii=False),
+                mimetype="application/json",
+                status_code=500
+            )
+
+        # Log detallado para debugging
+        logging.warning(
+            f"[BRIDGE-{request_id}] 🚨 Agente problemático detectado")
+        logging.info(f"[BRIDGE-{request_id}] Raw body: {raw_body[:300]}")
+        logging.info(
+            f"[BRIDGE-{request_id}] JSON body: {json.dumps(json_body, ensure_ascii=False)[:200]}")
+
+        comando = None
+        origen = "desconocido"
+
+        # 1. Intentar extraer comando del JSON body (primera prioridad)
+        if json_body:
+            if "comando" in json_body:
+                comando = json_body["comando"]
+                origen = "json_directo"
+            elif "servicio" in json_body and "comando" in json_body:
+                comando = f"{json_body['servicio']} {json_body['comando']}"
+                origen = "json_separado"
+            elif "agent_response" in json_body:
+                response = json_body["agent_response"]
+                if "group list" in response.lower():
+                    comando = "group list"
+                    origen = "agent_response_group"
+                elif "storage account" in response.lower():
+                    comando = "storage account list"
+                    origen = "agent_response_storage"
+            elif json_body.get("data", {}).get("comando"):
+                comando = json_body["data"]["comando"]
+                origen = "json_anidado"
+
+        # 2. Si no se encontró en JSON válido, buscar en raw_body
+        if not comando and raw_body and not is_malformed_json:
+            # Solo procesar raw_body si no era JSON malformado
+            if len(raw_body.strip()) < 2:
+                comando = "group list"
+                origen = "minimal_content_fallback"
+                logging.info(
+                    f"[BRIDGE-{request_id}] 🔄 Contenido mínimo, usando fallback: {comando}")
+            elif raw_body.strip() in ["{}", ""]:
+                # Query params o comando por defecto
+                comando = (req.params.get("comando") or
+                           req.params.get("cmd") or
+                           req.params.get("query") or
+                           "storage account list")
+                origen = "query_params_or_default"
+            else:
+                # Buscar patrones en el texto raw
+                raw_lower = raw_body.lower()
+                if "storage account" in raw_lower:
+                    comando = "storage account list"
+                    origen = "raw_pattern_storage"
+                elif "group list" in raw_lower:
+                    comando = "group list"
+                    origen = "raw_pattern_group"
+                elif "storage" in raw_lower:
+                    comando = "storage account list"
+                    origen = "raw_fallback_storage"
+                elif "group" in raw_lower:
+                    comando = "group list"
+                    origen = "raw_fallback_group"
+
+        # 3. Validación final - si no hay comando válido, rechazar
+        if not comando or len(comando.strip()) < 2:
+            return func.HttpResponse(
+                json.dumps({
+                    "exito": False,
+                    "error_code": "NO_VALID_COMMAND",
+                    "error": "No se pudo extraer un comando válido de la solicitud",
+                    "details": {
+                        "raw_body_preview": raw_body[:100] if raw_body else "vacío",
+                        "json_body_keys": list(json_body.keys()) if json_body else [],
+                        "request_id": request_id
+                    },
+                    "suggestion": "Proporciona un comando válido en el formato JSON esperado",
+                    "status": 400
+                }, ensure_ascii=False),
+                mimetype="application/json",
+                status_code=400
+            )
+
+        logging.info(
+            f"[BRIDGE-{request_id}] ✅ Comando extraído: '{comando}' (origen: {origen})")
+
+        # 4. Ejecutar comando usando el handler interno
+        mock_req = func.HttpRequest(
+            method="POST",
+            url="http://localhost/api/ejecutar-cli",
+            body=json.dumps({"comando": comando}).encode(),
+            headers={"Content-Type": "application/json"}
+        )
+
+        # Llamar directamente al handler para evitar problemas de red
+        result_response = ejecutar_cli_http(mock_req)
+
+        # Agregar metadata de bridge al resultado
+        try:
+            result_data = json.loads(result_response.get_body().decode())
+            if isinstance(result_data, dict):
+                result_data["bridge_metadata"] = {
+                    "request_id": request_id,
+                    "comando_extraido": comando,
+                    "origen_comando": origen,
+                    "raw_body_size": len(raw_body),
+                    "json_body_keys": list(json_body.keys()) if json_body else [],
+                    "json_parse_error": json_parse_error,
+                    "fallback_usado": origen.endswith("_fallback") or "default" in origen
+                }
+
+            return func.HttpResponse(
+                json.dumps(result_data, ensure_ascii=False),
+                mimetype="application/json",
+                status_code=200  # Solo 200 para comandos ejecutados exitosamente
+            )
+        except Exception as parse_error:
+            logging.error(
+                f"[BRIDGE-{request_id}] Error parseando respuesta: {str(parse_error)}")
+            return func.HttpResponse(
+                result_response.get_body(),
+                mimetype="application/json",
+                status_code=200,
+                headers={"X-Bridge-Request-Id": request_id}
+            )
+
+    except Exception as e:
+        logging.error(f"[BRIDGE-{request_id}] 💥 Error crítico: {str(e)}")
+
+        # ✅ CORRECCIÓN: Error crítico debe devolver error, no fallback
+        return func.HttpResponse(
+            json.dumps({
+                "exito": False,
+                "error_code": "CRITICAL_SYSTEM_ERROR",
+                "error": str(e),
+                "request_id": request_id,
+                "tipo_error": type(e).__name__,
+                "status": 500,
+                "timestamp": datetime.now().isoformat(),
+                "mensaje": "Error crítico del sistema"
+            }, ensure_ascii=False),
+            mimetype="application/json",
+            status_code=500
+        )
+
+
+def ejecutar_script_local_http(req: func.HttpRequest) -> func.HttpResponse:
+    from memory_manual import aplicar_memoria_manual
+    """Ejecuta scripts desde cualquier ruta local del contenedor con búsqueda automática y robusta"""
+
+    try:
+        body = req.get_json() if req.get_body() else {}
+    except Exception:
+        return func.HttpResponse(json.dumps({
+            "success": False,
+            "error": "JSON inválido"
+        }), status_code=400, mimetype="application/json")
+
+    # Unificación semántica de parámetros
+    script = body.get("script") or body.get("script_path")
+    args = body.get("args", [])
+    timeout_s = int(body.get("timeout_s") or body.get("timeout") or 300)
+
+    if not script or not isinstance(script, str) or not script.strip():
+        return func.HttpResponse(json.dumps({
+            "success": False,
+            "error": "Parámetro 'script' o 'script_path' es requerido y debe ser un string no vacío",
+            "example": {"script": "setup.py", "args": []}
+        }), mimetype="application/json", status_code=400)
+
+    script_path = script.strip()
+    found_script_path = _find_script_dynamically(script_path)
+
+    if found_script_path is None:
+        search_results = _generate_smart_suggestions(script_path)
+        return func.HttpResponse(json.dumps({
+            "success": False,
+            "error": "Script no encontrado",
+            "searched": script_path,
+            "attempted_paths": search_results["rutas_intentadas"],
+            "suggestions": search_results["sugerencias"],
+            "available_scripts": search_results["scripts_disponibles"][:10]
+        }), mimetype="application/json", status_code=404)
+
+    if not found_script_path.is_file():
+        return func.HttpResponse(json.dumps({
+            "success": False,
+            "error": f"Path exists but is not a file: {found_script_path}",
+            "path_type": "directory" if found_script_path.is_dir() else "other"
+        }), mimetype="application/json", status_code=400)
+
+    ext = found_script_path.suffix.lower()
+    interpreter = None
+    if ext == ".py":
+        interpreter = "python"
+        cmd = [sys.executable, str(found_script_path)]
+    elif ext == ".sh":
+        interpreter = "bash"
+        cmd = ["bash", str(found_script_path)]
+    elif ext == ".ps1":
+        interpreter = "powershell"
+        ps_cmd = shutil.which("pwsh") or shutil.which(
+            "powershell") or "powershell"
+        cmd = [ps_cmd, "-ExecutionPolicy", "Bypass",
+               "-File", str(found_script_path)]
+    else:
+        interpreter = "unknown"
+        cmd = [str(found_script_path)]
+
+    if args and isinstance(args, list):
+        cmd.extend(args)
+
+    if ext in [".sh", ".py"] and not platform.system() == "Windows":
+        try:
+            os.chmod(found_script_path, 0o755)
+        except Exception:
+            pass
+
+    try:
+        result = command_executor.run(
+            cmd,
+            timeout=timeout_s,
+            cwd=str(found_script_path.parent)
+        )
+        return func.HttpResponse(json.dumps({
+            "success": result.returncode == 0,
+            "stdout": result.stdout,
+            "stderr": result.stderr,
+            "exit_code": result.returncode,
+            "script": str(found_script_path),
+            "interpreter": interpreter,
+            "args": args,
+            "working_dir": str(found_script_path.parent),
+            "output_truncated": result.truncated
+        }, ensure_ascii=False), mimetype="application/json")
+    except CommandRejected as e:
+        return _executor_busy_response(str(e), {"script": str(found_script_path), "interpreter": interpreter})
+    except subprocess.TimeoutExpired:
+        return func.HttpResponse(json.dumps({
+            "success": False,
+            "error": f"Script execution timed out after {timeout_s} seconds",
+            "script": str(found_script_path),
+            "interpreter": interpreter
+        }, ensure_ascii=False), mimetype="application/json", status_code=408)
+    except Exception as e:
+        logging.exception("ejecutar_script_local_http failed")
+        return func.HttpResponse(json.dumps({
+            "success": False,
+            "error": str(e),
+            "script": str(found_script_path),
+            "interpreter": interpreter
+        }, ensure_ascii=False), mimetype="application/json", status_code=500)
+
+
+def normalizar_blob_path(script_path: str) -> str:
+    """
+    Normaliza la ruta eliminando el prefijo blob:// y barras iniciales.
+    Ejemplo: blob://container/path → path
+    """
+    if isinstance(script_path, str):
+        if script_path.startswith("blob://"):
+            # blob://container/path → container/path, pero queremos solo path
+            partes = script_path.replace("blob://", "", 1).split("/", 1)
+            if len(partes) == 2:
+                return partes[1]
+            return partes[-1]
+        if script_path.startswith("/"):
+            return script_path.lstrip("/")
+    return script_path
+
+
+def ejecutar_script_http(req: func.HttpRequest) -> func.HttpResponse:
+    from memory_manual import aplicar_memoria_manual
+    """
+    Ejecuta scripts desde Blob Storage o local, soportando múltiples tipos (.py, .sh, .ps1)
+    Dinámico y abierto: no restringe a scripts/ ni rutas fijas.
+    """
+    run_id = uuid.uuid4().hex[:12]
+    try:
+        req_body = req.get_json() if req.get_body() else {}
+    except Exception:
+        req_body = {}
+
+    # VALIDACIÓN ROBUSTA Y SEMÁNTICA - Acepta múltiples formatos
+    script_blob_path = (
+        req_body.get("script") or
+        req_body.get("script_path") or
+        req_body.get("parametros", {}).get("ruta") or
+        req_body.get("parametros", {}).get("script") or
+        req_body.get("ruta") or
+        req_body.get("archivo")
+    )
+
+    # Si hay intención semántica, interpretarla
+    if not script_blob_path and req_body.get("intencion"):
+        intencion = req_body.get("intencion", "")
+        parametros = req_body.get("parametros", {})
+
+        if "leer" in intencion and parametros.get("ruta"):
+            ruta = parametros.get("ruta")
+            if ruta.endswith(('.py', '.sh', '.ps1', '.bat')):
+                script_blob_path = ruta
+            else:
+                return func.HttpResponse(json.dumps({
+                    "exito": False,
+                    "success": False,
+                    "error": "La ruta especificada no es un script ejecutable",
+                    "sugerencia": "Use /api/leer-archivo para archivos de texto",
+                    "formatos_validos": [".py", ".sh", ".ps1", ".bat"]
+                }), status_code=200, mimetype="application/json")
+
+    timeout_s = int(req_body.get("timeout_s") or req_body.get("timeout") or 60)
+    args = req_body.get("args", [])
+    interpreter = req_body.get("interpreter")
+
+    if not script_blob_path or not isinstance(script_blob_path, str) or not script_blob_path.strip():
+        try:
+            blob_service_client = get_blob_client()
+            scripts_disponibles = []
+            if blob_service_client:
+                container_client = blob_service_client.get_container_client(
+                    CONTAINER_NAME)
+                scripts_disponibles = [
+                    blob.name for blob in container_client.list_blobs()
+                    if blob.name.endswith(('.py', '.sh', '.ps1', '.bat'))
+                ][:10]
+        except:
+            scripts_disponibles = []
+
+        return func.HttpResponse(json.dumps({
+            "exito": False,
+            "success": False,
+            "error": "Falta parámetro 'script' con la ruta del script a ejecutar",
+            "mensaje": "Este endpoint ejecuta scripts almacenados en el contenedor Azure Blob Storage",
+            "formato_correcto": {"script": "scripts/mi_script.py", "args": []},
+            "extensiones_soportadas": [".py", ".sh", ".ps1", ".bat"],
+            "scripts_disponibles": scripts_disponibles,
+            "ejemplo": {"script": "scripts/test_storage_access.py", "args": [], "timeout_s": 60}
+        }), status_code=200, mimetype="application/json")
+
+    # 4. Normalizar ruta del script en blob
+    script_blob_path = normalizar_blob_path(script_blob_path)
+
+    # Permitir cualquier ruta, no restringir a scripts/
+    blob_service_client = get_blob_client()
+    if not blob_service_client:
+        return func.HttpResponse(json.dumps({
+            "exito": False,
+            "success": False,
+            "error": "Blob Storage no configurado",
+            "mensaje": "No se pudo conectar al contenedor de Azure Blob Storage"
+        }), status_code=200, mimetype="application/json")
+
+    blob_client = blob_service_client.get_blob_client(
+        container=CONTAINER_NAME,
+        blob=script_blob_path
+    )
+
+    if not blob_client.exists():
+        container_client = blob_service_client.get_container_client(
+            CONTAINER_NAME)
+        scripts_disponibles = [
+            blob.name for blob in container_client.list_blobs()]
+        return func.HttpResponse(json.dumps({
+            "exito": False,
+            "success": False,
+            "error": f"Script no encontrado en el contenedor: {script_blob_path}",
+            "mensaje": "El script especificado no existe en Azure Blob Storage",
+            "scripts_disponibles": scripts_disponibles[:10],
+            "sugerencia": "Verifique que el script esté subido al contenedor o use /api/listar-blobs para ver scripts disponibles"
+        }), status_code=200, mimetype="application/json")
+
+    try:
+        extension = Path(script_blob_path).suffix.lower()
+        with tempfile.NamedTemporaryFile(mode='w', suffix=extension, delete=False) as temp_file:
+            temp_path = temp_file.name
+            script_content = blob_client.download_blob().readall().decode('utf-8')
+            temp_file.write(script_content)
+    except Exception as e:
+        return func.HttpResponse(json.dumps({
+            "success": False,
+            "error": f"Error descargando script: {str(e)}"
+        }), status_code=500, mimetype="application/json")
+
+    interpreter_final = interpreter
+    if not interpreter_final:
+        if extension == ".py":
+            interpreter_final = "python"
+        elif extension == ".sh":
+            interpreter_final = "bash"
+        elif extension == ".ps1":
+            interpreter_final = "powershell"
+        else:
+            interpreter_final = "unknown"
+
+    if extension == ".sh":
+        try:
+            os.chmod(temp_path, 0o755)
+        except Exception:
+            pass
+
+    if interpreter_final == "python":
+        cmd = [sys.executable, temp_path] + args
+    elif interpreter_final == "bash":
+        # En Windows, usar WSL o Git Bash si está disponible
+        if platform.system() == "Windows":
+            # Intentar WSL primero, luego Git Bash
+            wsl_bash = shutil.which("wsl")
+            git_bash = shutil.which("bash")
+            if wsl_bash:
+                # Convertir ruta de Windows a WSL
+                wsl_path = temp_path.replace("\\", "/").replace("C:", "/mnt/c")
+                cmd = ["wsl", "bash", wsl_path] + args
+            elif git_bash:
+                cmd = ["bash", temp_path] + args
+            else:
+                # Fallback: intentar ejecutar directamente
+                cmd = [temp_path] + args
+        else:
+            cmd = ["bash", temp_path] + args
+    elif interpreter_final == "powershell":
+        ps_cmd = shutil.which("pwsh") or shutil.which(
+            "powershell") or "powershell"
+        cmd = [ps_cmd, "-File", temp_path] + args
+    else:
+        cmd = [temp_path] + args
+
+    try:
+        result = command_executor.run(cmd, timeout=timeout_s)
+        salida = result.stdout
+        error = result.stderr
+        codigo = result.returncode
+        try:
+            os.unlink(temp_path)
+        except Exception:
+            pass
+
+        resultado = {
+            "success": codigo == 0,
+            "stdout": salida,
+            "stderr": error,
+            "exit_code": codigo,
+            "script": script_blob_path,
+            "interpreter": interpreter_final,
+            "args": args,
+            "run_id": run_id,
+            "output_truncated": result.truncated
+        }
+        resultado = aplicar_memoria_manual(req, resultado)
+        return func.HttpResponse(json.dumps(resultado, ensure_ascii=False), status_code=200, mimetype="application/json")
+    except subprocess.TimeoutExpired:
+        try:
+            os.unlink(temp_path)
+        except Exception:
+            pass
+        return func.HttpResponse(json.dumps({
+            "success": False,
+            "error": f"Timeout después de {timeout_s} segundos",
+            "exit_code": -1,
+            "script": script_blob_path,
+            "interpreter": interpreter_final,
+            "run_id": run_id
+        }), status_code=408, mimetype="application/json")
+    except CommandRejected as e:
+        try:
+            os.unlink(temp_path)
+        except Exception:
+            pass
+        return _executor_busy_response(str(e), {"script": script_blob_path, "run_id": run_id})
+    except Exception as e:
+        try:
+            os.unlink(temp_path)
+        except Exception:
+            pass
+        logging.error(f"[{run_id}] Error ejecutando script: {str(e)}")
+        return func.HttpResponse(json.dumps({
+            "success": False,
+            "error": str(e),
+            "exit_code": -1,
+            "script": script_blob_path,
+            "interpreter": interpreter_final,
+            "run_id": run_id
+        }), status_code=500, mimetype="application/json")
+
+
+def verificar_script_http(req: func.HttpRequest) -> func.HttpResponse:
+    from memory_manual import aplicar_memoria_manual
+    """
+    Verifica propiedades de un script en Blob Storage: tamaño, permisos, ejecutabilidad, shebang, bash -n
+    """
+
+    try:
+        body = req.get_json() if req.get_body() else {}
+        ruta = body.get("ruta")
+        if not ruta or not ruta.startswith("scripts/"):
+            return func.HttpResponse(
+                json.dumps({
+                    "exito": False,
+                    "error": "Parámetro 'ruta' requerido y debe comenzar con 'scripts/'",
+                    "ejemplo": {"ruta": "scripts/validacion.sh"}
+                }, ensure_ascii=False),
+                status_code=400,
+                mimetype="application/json"
+            )
+
+        blob_service_client = get_blob_client()
+        if not blob_service_client:
+            return func.HttpResponse(
+                json.dumps(
+                    {"exito": False, "error": "Blob Storage no configurado"}),
+                status_code=500,
+                mimetype="application/json"
+            )
+        blob_client = blob_service_client.get_blob_client(CONTAINER_NAME, ruta)
+        if not blob_client.exists():
+            return func.HttpResponse(
+                json.dumps(
+                    {"exito": False, "error": f"Script no encontrado: {ruta}"}),
+                status_code=404,
+                mimetype="application/json"
+            )
+
+        # Descargar a temporal
+        extension = ruta.lower().split('.')[-1]
+        with tempfile.NamedTemporaryFile(mode='w', suffix=f".{extension}", delete=False) as temp_file:
+            tmp_path = temp_file.name
+            script_content = blob_client.download_blob().readall().decode('utf-8')
+            temp_file.write(script_content)
+
+        # Propiedades del archivo
+        file_stat = os.stat(tmp_path)
+        modo = stat.filemode(file_stat.st_mode)
+        es_ejecutable = os.access(tmp_path, os.X_OK)
+        tiene_shebang = False
+        ultima_mod = None
+        try:
+            with open(tmp_path, "r", encoding="utf-8") as f:
+                primera_linea = f.readline()
+                tiene_shebang = primera_linea.startswith("#!")
+            ultima_mod = datetime.fromtimestamp(file_stat.st_mtime).isoformat()
+        except Exception:
+            primera_linea = ""
+
+        # bash -n para sintaxis
+        bash_check = None
+        bash_ok = None
+        if extension == "sh":
+            try:
+                result = subprocess.run(
+                    ["bash", "-n", tmp_path],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    timeout=10,
+                    text=True
+                )
+                bash_ok = result.returncode == 0
+                bash_check = result.stderr.strip() if result.stderr else "OK"
+            except Exception as e:
+                bash_ok = False
+                bash_check = str(e)
+
+        # Limpieza
+        try:
+            os.unlink(tmp_path)
+        except Exception:
+            pass
+
+        return func.HttpResponse(
+            json.dumps({
+                "exito": True,
+                "ruta": ruta,
+                "tamaño_bytes": file_stat.st_size,
+                "modo": modo,
+                "es_ejecutable": es_ejecutable,
+                "tiene_shebang": tiene_shebang,
+                "ultima_modificacion": ultima_mod,
+                "bash_sintaxis_ok": bash_ok,
+                "bash_salida": bash_check,
+                "primeras_lineas": primera_linea.strip() if primera_linea else ""
+            }, ensure_ascii=False),
+            status_code=200,
+            mimetype="application/json"
+        )
+    except Exception as e:
+        return func.HttpResponse(
+            json.dumps({"exito": False, "error": str(e)}),
+            status_code=500,
+            mimetype="application/json"
+        )
@@ -0,0 +1,1727 @@
+"""
+Rutas: núcleo
+copiloto, hybrid, status/health, esquema OpenAPI, debug-openapi,
+test-wrapper-memoria y render-error.
+
+Se importa en la primera llamada a una de sus rutas (ver route_manifest.json
+y lazy_routes); los helpers compartidos siguen en function_app.
+"""
+import json
+import logging
+import os
+import re
+import traceback
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Any, Dict, List, Tuple
+
+import azure.functions as func
+import requests
+
+from utils_helpers import build_event, build_structured_payload
+
+from function_app import (
+    build_status,
+    _construir_resumen_narrativo,
+    ejecutar_bing_grounding_fallback,
+    generar_narrativa_contextual,
+    invocar_endpoint_directo_seguro,
+    IS_AZURE,
+    is_running_in_azure,
+    PROJECT_ROOT,
+    render_tool_response,
+    _resolve_handler,
+    _serve_openapi_schema,
+    STORAGE_CONNECTION_STRING,
+)
+
+
+def _extraer_patron_archivo_desde_consulta(consulta: str) -> Optional[str]:
+    """Detecta un posible nombre de archivo dentro de la consulta."""
+    if not consulta:
+        return None
+    patron = re.compile(r"[a-zA-Z0-9_./\\-]+\.[a-zA-Z0-9_]{1,12}")
+    matches = patron.findall(consulta)
+    for match in matches:
+        cleaned = match.strip().strip("'\"")
+        if cleaned and not cleaned.lower().startswith(("que", "como")):
+            return cleaned
+    return None
+
+
+def _construir_comando_busqueda_archivo_cli(patron_archivo: str) -> str:
+    """Crea un comando Python cross-platform que lista coincidencias para el archivo."""
+    sanitized = (patron_archivo or "").strip().strip("'\"")
+    if not sanitized:
+        sanitized = ".*"
+    term_literal = json.dumps(sanitized)
+    root_literal = json.dumps(str(PROJECT_ROOT))
+    comando = (
+        "python -c \"import pathlib; term = {term}; term = term.lower(); "
+        "root = pathlib.Path({root}); "
+        "matches = [str(p) for p in root.rglob('*') if p.is_file() and term in p.name.lower()]; "
+        "print('\\\\n'.join(matches) if matches else 'NO_MATCH::' + term)\""
+    ).format(term=term_literal, root=root_literal)
+    return comando
+
+
+def _relativizar_ruta_detectada(ruta: str) -> Optional[str]:
+    """Normaliza rutas retornadas por CLI a rutas relativas del proyecto."""
+    if not ruta:
+        return None
+    ruta_limpia = ruta.strip().strip("'\"")
+    if not ruta_limpia or ruta_limpia.startswith("NO_MATCH"):
+        return None
+    ruta_limpia = ruta_limpia.replace("\\", "/")
+
+    try:
+        candidate = Path(ruta_limpia)
+        if candidate.is_absolute():
+            try:
+                return str(candidate.relative_to(PROJECT_ROOT)).replace("\\", "/")
+            except ValueError:
+                if "copiloto-function" in candidate.parts:
+                    idx = candidate.parts.index("copiloto-function")
+                    rel = Path(*candidate.parts[idx:])
+                    return str(rel).replace("\\", "/")
+                return str(candidate).replace("\\", "/")
+        resolved = (PROJECT_ROOT / candidate).resolve()
+        if resolved.exists():
+            return str(resolved.relative_to(PROJECT_ROOT)).replace("\\", "/")
+    except Exception:
+        pass
+
+    return ruta_limpia
+
+
+def _normalizar_rutas_cli(resultado_cli: Dict[str, Any]) -> List[str]:
+    """Extrae rutas limpias del resultado devuelto por /api/ejecutar-cli."""
+    bruto = resultado_cli.get("resultado")
+    lineas: List[str] = []
+    if isinstance(bruto, list):
+        lineas = [str(item) for item in bruto]
+    elif isinstance(bruto, str):
+        lineas = bruto.splitlines()
+
+    rutas: List[str] = []
+    for linea in lineas:
+        linea = linea.strip()
+        if not linea or linea.startswith("? Perfil"):
+            continue
+        ruta_rel = _relativizar_ruta_detectada(linea)
+        if ruta_rel and ruta_rel not in rutas:
+            rutas.append(ruta_rel)
+    return rutas
+
+
+def ejecutar_busqueda_cli_y_leer_archivo(consulta: str, session_id: Optional[str] = None, patron_preferido: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Ejecuta un flujo CLI -> lectura:
+    1. Usa /api/ejecutar-cli para buscar el archivo.
+    2. Lee el archivo con /api/leer-archivo cuando la ruta está confirmada.
+    """
+    patron = patron_preferido or _extraer_patron_archivo_desde_consulta(
+        consulta)
+    if not patron:
+        patron = consulta.strip()
+
+    if not patron:
+        return {
+            "exito": False,
+            "flujo": "cli_search_then_read",
+            "error": "No se pudo extraer un patrón de archivo desde la consulta."
+        }
+
+    comando_cli = _construir_comando_busqueda_archivo_cli(patron)
+    payload_cli = {"comando": comando_cli}
+    if session_id:
+        payload_cli["session_id"] = session_id
+
+    cli_resultado = invocar_endpoint_directo_seguro(
+        "/api/ejecutar-cli",
+        method="POST",
+        body=payload_cli
+    )
+
+    rutas_encontradas = _normalizar_rutas_cli(cli_resultado)
+    if not rutas_encontradas:
+        return {
+            "exito": False,
+            "flujo": "cli_search_then_read",
+            "error": "La búsqueda CLI no devolvió rutas.",
+            "patron_busqueda": patron,
+            "busqueda": cli_resultado
+        }
+
+    ruta_objetivo = rutas_encontradas[0]
+    lectura = invocar_endpoint_directo_seguro(
+        "/api/leer-archivo",
+        method="GET",
+        params={"ruta": ruta_objetivo}
+    )
+
+    return {
+        "exito": lectura.get("exito", False),
+        "flujo": "cli_search_then_read",
+        "archivo_detectado": ruta_objetivo,
+        "todas_rutas_detectadas": rutas_encontradas,
+        "busqueda": cli_resultado,
+        "lectura": lectura
+    }
+
+
+def _descripcion_evento(evento: Dict[str, Any], texto: str) -> Tuple[str, str]:
+    """Genera descripción y detalle de un evento para contexto."""
+    endpoint_val = evento.get("endpoint") or "evento"
+    timestamp_val = evento.get("timestamp") or ""
+    estado_val = "éxito" if evento.get("exito", True) else "error"
+    detalle = (
+        evento.get("params", {}).get("comando")
+        or evento.get("consulta")
+        or evento.get("mensaje")
+        or texto
+        or ""
+    )
+    descripcion = f"{timestamp_val} - {endpoint_val} ({estado_val})"
+    if detalle:
+        descripcion += f": {detalle[:240]}"
+    return descripcion.strip(), detalle
+
+
+def copiloto(req: func.HttpRequest) -> func.HttpResponse:
+    # 🔥 MEMORIA DIRECTA - WRAPPER AUTOMÁTICO
+    logging.info("🔥 COPILOTO EJECUTÁNDOSE CON MEMORIA DIRECTA")
+
+    def _as_dict(d):
+        return d if isinstance(d, dict) else {}
+
+    # Importar memory_service al inicio para evitar "possibly unbound"
+    from services.memory_service import memory_service
+
+    memoria_previa = {}
+    session_id = None
+    thread_id = req.headers.get("Thread-ID") or req.headers.get("X-Thread-ID")
+
+    try:
+        session_id = (
+            req.headers.get("Session-ID")
+            or req.headers.get("X-Session-ID")
+            or thread_id
+            or "test_session"
+        )
+        agent_id = req.headers.get(
+            "Agent-ID") or req.headers.get("X-Agent-ID") or "TestAgent"
+
+        if not session_id or session_id == "test_session":
+            try:
+                body_identificadores = req.get_json()
+            except ValueError:
+                body_identificadores = {}
+            session_id = (
+                body_identificadores.get("session_id")
+                or body_identificadores.get("thread_id")
+                or req.params.get("session_id")
+                or req.params.get("thread_id")
+                or thread_id
+                or "test_session"
+            )
+            if not thread_id:
+                thread_id = body_identificadores.get("thread_id")
+
+        if not thread_id:
+            thread_id = (
+                req.params.get("thread_id")
+                or req.params.get("session_id")
+                or session_id
+            )
+
+        logging.info(
+            f"🔍 COPILOTO Headers: Session={session_id}, Agent={agent_id}")
+
+        interacciones = memory_service.get_session_history(session_id) or []
+        memoria_previa = {
+            "tiene_historial": len(interacciones) > 0,
+            "interacciones_recientes": interacciones,
+            "total_interacciones": len(interacciones),
+            "session_id": session_id
+        }
+
+        logging.info(
+            f"🧠 COPILOTO Memoria cargada: {len(interacciones)} interacciones")
+
+        setattr(req, "_memoria_contexto", memoria_previa)
+
+        # 💾 REGISTRAR INTERACCIÓN EN MEMORIA
+        try:
+            # Tolerancia a GET sin JSON
+            try:
+                body = req.get_json()
+            except ValueError:
+                body = {}
+
+            comando = (
+                (body or {}).get("mensaje")
+                or (body or {}).get("comando")
+                or (body or {}).get("consulta")
+                or req.params.get("q")
+                or req.params.get("mensaje")
+                or "resumen"
+            )
+
+            memory_service.registrar_llamada(
+                source="copiloto",
+                endpoint="/api/copiloto",
+                method=req.method,
+                params={"comando": comando, "consulta": comando,
+                        "session_id": session_id, "agent_id": agent_id},
+                response_data={"procesando": True},
+                success=True
+            )
+            logging.info(f"💾 COPILOTO Interacción registrada: {comando}")
+        except Exception as reg_error:
+            logging.warning(f"⚠️ Error registrando en memoria: {reg_error}")
+
+    except Exception as e:
+        logging.error(f"❌ COPILOTO Error cargando memoria: {e}")
+
+    # =========================
+    # Local helper: garantizar _inyectar_narrativa disponible
+    # =========================
+    def _inyectar_narrativa(payload: dict) -> dict:
+        """
+        Wrapper local que intenta:
+         1) llamar a una implementación global/module-level llamada _inyectar_narrativa si existe
+         2) en su defecto, usar generar_narrativa_contextual (si está disponible) como fallback mínimo
+         3) si todo falla, devolver payload sin modificar
+        Esto evita NameError cuando el fichero se ejecuta por fragmentos.
+        """
+        try:
+            # 1) Si existe una implementación global ya definida, usarla
+            fn = globals().get("_inyectar_narrativa")
+            if callable(fn) and getattr(fn, "__code__", None) is not None:
+                # evitamos recursión llamando a esta misma función
+                if fn is not _inyectar_narrativa:
+                    try:
+                        result = fn(payload)
+                        # Asegurar que el resultado es un dict
+                        return result if isinstance(result, dict) else payload
+                    except Exception:
+                        # seguir a fallback
+                        logging.warning(
+                            "Global _inyectar_narrativa falló, intentando fallback")
+        except Exception:
+            pass
+
+        # 2) Fallback: usar generar_narrativa_contextual si está presente
+        try:
+            # generar_narrativa_contextual fue importado en el módulo; usarlo si existe
+            if "generar_narrativa_contextual" in globals() and callable(globals().get("generar_narrativa_contextual")):
+                try:
+                    narrativa_ctx = generar_narrativa_contextual(
+                        session_id=session_id,
+                        thread_id=thread_id,
+                        query=payload.get("mensaje") or payload.get(
+                            "texto_semantico") or ""
+                    )
+                    if narrativa_ctx and isinstance(narrativa_ctx, dict) and (
+                        narrativa_ctx.get(
+                            "texto") or narrativa_ctx.get("mensajes")
+                    ):
+                        mensajes_fmt = narrativa_ctx.get(
+                            "mensajes") or narrativa_ctx.get("mensajes_formateados") or []
+                        texto_base = _construir_resumen_narrativo(
+                            narrativa_ctx, payload) or narrativa_ctx.get("texto", "").strip()
+
+                        payload["respuesta_usuario"] = texto_base
+                        payload["texto_semantico"] = texto_base
+                        payload.setdefault("metadata", {})
+                        payload["metadata"]["narrativa_contexto"] = {
+                            "thread_id": narrativa_ctx.get("thread_id"),
+                            "blob": narrativa_ctx.get("fuente_blob"),
+                            "mensajes_recuperados": len(mensajes_fmt),
+                            "session_id": narrativa_ctx.get("session_id"),
+                            "fragmento_conversacion": mensajes_fmt[:3]
+                        }
+                        if narrativa_ctx.get("detalles"):
+                            payload.setdefault("contexto_inteligente", {})
+                            payload["contexto_inteligente"]["pipeline_contexto"] = narrativa_ctx["detalles"]
+                        return payload
+                except Exception as e:
+                    logging.warning(
+                        f"Fallback generar_narrativa_contextual falló: {e}")
+        except Exception:
+            pass
+
+        # 3) No-op fallback
+        return payload
+    # =========================
+
+    # === 🔍 BÚSQUEDA AUTOMÁTICA EN MEMORIA SEMÁNTICA (SIEMPRE PRIMERO) ===
+    docs_sem = []
+    narrativa_texto = None
+    narrativa_contextual = None
+    body = {}
+    agent_id = None
+
+    # 🔥 EXTRAER CONSULTA DEL USUARIO PRIMERO
+    try:
+        body = req.get_json() or {}
+    except ValueError:
+        body = dict(req.params)
+    if not thread_id:
+        thread_id = body.get("thread_id") or body.get(
+            "session_id") or thread_id
+
+    if not thread_id:
+        thread_id = (
+            body.get("thread_id")
+            or body.get("session_id")
+            or req.params.get("thread_id")
+            or req.params.get("session_id")
+            or session_id
+        )
+
+    consulta_usuario = (
+        body.get("mensaje") or
+        body.get("consulta") or
+        body.get("query") or
+        req.params.get("q") or
+        req.params.get("mensaje") or
+        "en qué quedamos"
+    )
+
+    # 🧠 BUSCAR EN MEMORIA SEMÁNTICA SIEMPRE (OBLIGATORIO)
+    # 🔥 PRIORIDAD 1: Usar docs vectoriales del wrapper si existen
+    if memoria_previa and memoria_previa.get("docs_vectoriales"):
+        docs_sem = memoria_previa["docs_vectoriales"]
+        logging.info(
+            f"✅ COPILOTO: Usando {len(docs_sem)} docs vectoriales del wrapper")
+    else:
+        # PRIORIDAD 2: Buscar directamente si el wrapper no lo hizo
+        try:
+            from endpoints_search_memory import buscar_memoria_endpoint
+
+            logging.info(
+                f"🔍 COPILOTO: Búsqueda AUTOMÁTICA en memoria para: '{consulta_usuario}'")
+
+            # Crear payload para buscar_memoria
+            memoria_payload = {
+                "query": consulta_usuario,
+                "session_id": session_id,
+                "top": 5
+            }
+
+            # Ejecutar búsqueda en memoria
+            memoria_result = buscar_memoria_endpoint(memoria_payload)
+
+            if memoria_result.get("exito") and memoria_result.get("documentos"):
+                docs_sem = memoria_result["documentos"]
+                logging.info(
+                    f"✅ COPILOTO: Memoria encontró {len(docs_sem)} documentos relevantes")
+            else:
+                logging.info(
+                    "ℹ️ COPILOTO: No se encontraron documentos en memoria")
+        except Exception as e:
+            logging.warning(f"⚠️ Error en búsqueda automática de memoria: {e}")
+
+    # === 🔍 INTEGRACIÓN ADICIONAL CON AZURE SEARCH (OPCIONAL) ===
+    try:
+        from services.azure_search_client import get_search_service
+        search = get_search_service()
+
+        consulta_usuario = (
+            body.get("mensaje") or
+            body.get("consulta") or
+            body.get("query") or
+            req.params.get("q") or
+            req.params.get("mensaje") or
+            "en qué quedamos"
+        )
+
+        # ROUTER SEMANTICO DINAMICO - EJECUTAR PRIMERO
+        from intelligent_intent_detector import analizar_intencion_semantica
+        clasificacion_router = analizar_intencion_semantica(
+            consulta_usuario) or {}
+        endpoint_sugerido_router = clasificacion_router.get(
+            "endpoint_sugerido")
+
+        if endpoint_sugerido_router:
+            logging.info(
+                f"ROUTER EARLY: Redirigiendo a {endpoint_sugerido_router}")
+
+            resultado_router = invocar_endpoint_directo_seguro(
+                endpoint=endpoint_sugerido_router,
+                method="GET",
+                params={"query": consulta_usuario, "session_id": session_id}
+            )
+
+            if resultado_router.get("exito"):
+                logging.info(f"ROUTER EARLY: Redireccion exitosa")
+                return func.HttpResponse(
+                    json.dumps(resultado_router.get(
+                        "data", resultado_router), ensure_ascii=False),
+                    mimetype="application/json",
+                    status_code=200
+                )
+
+        filtros = []
+        if session_id:
+            filtros.append(f"session_id eq '{session_id}'")
+        filter_str = " and ".join(filtros) if filtros else None
+
+        logging.info(f"🔍 COPILOTO: Búsqueda semántica: '{consulta_usuario}'")
+        busqueda = search.search(
+            query=consulta_usuario, top=5, filters=filter_str)
+        docs_sem = busqueda.get(
+            "documentos", []) if busqueda.get("exito") else []
+        logging.info(
+            f"✅ Azure Search devolvió {len(docs_sem)} documentos semánticos")
+
+        # 🔥 NO RETORNAR INMEDIATAMENTE - Hacer MERGE primero
+        # Guardar docs_sem para usar después del merge
+        logging.info(
+            f"🔥 COPILOTO: Docs vectoriales guardados para MERGE posterior")
+    except Exception as e:
+        logging.warning(f"⚠️ Error integrando búsqueda semántica: {e}")
+
+    from intelligent_intent_detector import integrar_con_validador_semantico_inteligente
+    from semantic_helpers import generar_sugerencias_contextuales, interpretar_con_contexto_semantico
+    from semantic_query_builder import interpretar_intencion_agente, construir_query_dinamica, ejecutar_query_cosmos
+
+    logging.info('🤖 Copiloto Semántico activado')
+
+    # 🧠 OBTENER CONTEXTO SEMÁNTICO DEL WRAPPER AUTOMÁTICO
+    contexto_semantico = getattr(req, '_contexto_semantico', {}) or {}
+    memoria_previa = getattr(req, '_memoria_contexto', {}) or {}
+
+    # 🔥 CORRECCIÓN 1: Tolerancia a GET sin JSON
+    try:
+        body = req.get_json() or {}
+    except ValueError:
+        logging.info(
+            "⚠️ GET sin JSON detectado, usando querystring como fallback")
+        body = dict(req.params)
+
+    comando = body.get("mensaje") or body.get(
+        "comando") or body.get("consulta") or "sin_comando"
+
+    # 🔍 DETECCIÓN DE QUERIES DINÁMICAS PARA MEMORIA
+    params_agente = dict(req.params)
+    params_completos = {**params_agente, **body}
+
+    # Detectar si el agente solicita consulta avanzada de memoria
+    usar_query_dinamica = any([
+        params_completos.get("tipo"),
+        params_completos.get("contiene"),
+        params_completos.get("endpoint"),
+        params_completos.get("exito") is not None,
+        params_completos.get("fecha_inicio"),
+        params_completos.get("fecha_fin"),
+        "historial" in comando.lower() and any(
+            k in params_completos for k in ["tipo", "contiene", "endpoint"])
+    ])
+
+    if usar_query_dinamica:
+        logging.info(
+            f"🔍 COPILOTO: Query dinámica detectada, redirigiendo a query builder")
+
+        # Interpretar intención del agente
+        intencion_params = interpretar_intencion_agente(
+            params_completos.get("query", params_completos.get("mensaje", "")),
+            dict(req.headers)
+        )
+
+        # Sobrescribir con parámetros explícitos
+        for key in ["tipo", "contiene", "endpoint", "exito", "fecha_inicio", "fecha_fin", "orden", "limite"]:
+            if key in params_completos:
+                intencion_params[key] = params_completos[key]
+
+        # Asegurar session_id
+        intencion_params["session_id"] = session_id or "unknown"
+
+        try:
+            # Construir y ejecutar query SQL dinámica
+            query_sql = construir_query_dinamica(**intencion_params)
+            cosmos_container = memory_service.memory_container
+            resultados = ejecutar_query_cosmos(query_sql, cosmos_container)
+
+            limit = int(intencion_params.get("limite", 10))
+            interacciones_formateadas = []
+            eventos_dinamicos: List[Dict[str, Any]] = []
+
+            for i, item in enumerate(resultados[:limit]):
+                registro = {
+                    "numero": i + 1,
+                    "timestamp": item.get("timestamp", ""),
+                    "endpoint": item.get("endpoint", ""),
+                    "texto_semantico": item.get("texto_semantico", ""),
+                    "exito": item.get("exito", True),
+                    "tipo": item.get("tipo", "interaccion_usuario")
+                }
+                interacciones_formateadas.append(registro)
+                eventos_dinamicos.append(
+                    build_event(
+                        endpoint=registro["endpoint"] or "copiloto",
+                        descripcion=registro[
+                            "texto_semantico"] or f"Interacción en {registro['endpoint']}",
+                        estado="exito" if registro["exito"] else "error",
+                        sugerencia="",
+                        criticidad="informativa",
+                        datos={
+                            "timestamp": registro["timestamp"],
+                            "tipo": registro["tipo"]
+                        },
+                        timestamp=registro["timestamp"]
+                    )
+                )
+
+            if not eventos_dinamicos:
+                eventos_dinamicos.append(
+                    build_event(
+                        endpoint="copiloto",
+                        descripcion="Sin interacciones que coincidan con los filtros solicitados.",
+                        estado="informativo",
+                        sugerencia="",
+                        criticidad="informativa",
+                        datos={"query_aplicada": True}
+                    )
+                )
+
+            extras = {
+                "interacciones": interacciones_formateadas,
+                "total": len(resultados),
+                "query_dinamica_aplicada": True,
+                "filtros_aplicados": intencion_params,
+                "metadata": {
+                    "query_sql": query_sql[:200] + "...",
+                    "timestamp": datetime.now().isoformat(),
+                    "dispatcher": "copiloto"
+                }
+            }
+            contexto_resp = {
+                "session_id": session_id,
+                "tiene_memoria": bool(memoria_previa and memoria_previa.get("tiene_historial")),
+                "total_interacciones": memoria_previa.get("total_interacciones", 0) if isinstance(memoria_previa, dict) else 0,
+                "resumen": memoria_previa.get("resumen_conversacion", "") if isinstance(memoria_previa, dict) else ""
+            }
+            respuesta_struct = build_structured_payload(
+                "copiloto",
+                eventos_dinamicos,
+                narrativa_base="",
+                resumen_automatico="",
+                extras=extras,
+                contexto_inteligente=contexto_resp,
+                exito=True
+            )
+            respuesta_struct.update({
+                "session_id": session_id,
+                "agent_id": req.headers.get("Agent-ID", "unknown"),
+                "fuente": "wrapper_automatico",
+                "validation_applied": True,
+                "validation_stats": {
+                    "checked": len(interacciones_formateadas),
+                    "missing_text_semantic": 0,
+                    "generated_fallbacks": 0
+                }
+            })
+            respuesta_struct["mensaje"] = ""
+            respuesta_struct["respuesta_usuario"] = ""
+
+            # Aplicar narrativa (usa helper local que evita NameError)
+            respuesta_struct = _inyectar_narrativa(respuesta_struct)
+
+            return func.HttpResponse(
+                json.dumps(respuesta_struct, ensure_ascii=False),
+                mimetype="application/json",
+                status_code=200
+            )
+        except Exception as e:
+            logging.error(
+                f"❌ Error ejecutando query dinámica en copiloto: {e}")
+            # Continuar con flujo normal si falla
+
+    # Extraer consulta del request
+    limit = {}
+    contexto_detectado: Dict[str, Any] = {}
+    consulta = ""
+    try:
+        consulta = body.get("consulta") or body.get(
+            "query") or body.get("mensaje") or body.get("prompt") or ""
+
+        if consulta:
+            # 🧠 CLASIFICACIÓN SEMÁNTICA ROBUSTA PARA DETECTAR INTENCIÓN DE CONTEXTO
+            from intelligent_intent_detector import analizar_intencion_semantica
+
+            clasificacion = analizar_intencion_semantica(consulta) or {}
+
+            # 🎯 ROUTER SEMÁNTICO DINAMICO
+            endpoint_sugerido = clasificacion.get("endpoint_sugerido")
+            if endpoint_sugerido:
+                logging.info(f"🔀 Redirigiendo a {endpoint_sugerido}")
+
+                resultado = invocar_endpoint_directo_seguro(
+                    endpoint=endpoint_sugerido,
+                    method="GET",
+                    params={"query": consulta,
+                            "session_id": session_id}
+                )
+
+                if resultado.get("exito"):
+                    return func.HttpResponse(
+                        json.dumps(resultado.get("data", resultado),
+                                   ensure_ascii=False),
+                        mimetype="application/json",
+                        status_code=200
+                    )
+
+            tipo_intencion = clasificacion.get("tipo", "")
+            confianza = clasificacion.get("confianza", 0)
+
+            logging.info(
+                f"🎯 ROUTER: Intención={tipo_intencion}, Confianza={confianza}")
+
+            # 🔥 ROUTER SEMANTICO DINAMICO
+            if tipo_intencion and confianza > 0.5:
+                if tipo_intencion == "leer_archivo":
+                    resultado_flujo = ejecutar_busqueda_cli_y_leer_archivo(
+                        consulta,
+                        session_id=session_id,
+                        patron_preferido=clasificacion.get("archivo_objetivo")
+                    )
+                    status_code = 200 if resultado_flujo.get("exito") else 202
+                    return func.HttpResponse(
+                        json.dumps(resultado_flujo, ensure_ascii=False),
+                        mimetype="application/json",
+                        status_code=status_code
+                    )
+
+                endpoint_map = {
+                    "ejecutar_comando_cli": ("/api/ejecutar-cli", "POST", {"comando": consulta}),
+                    "listar_storage": ("/api/listar-blobs", "GET", None),
+                    "buscar_memoria": ("/api/buscar-memoria", "POST", {"query": consulta}),
+                    "diagnostico_sistema": ("/api/diagnostico-recursos-completo", "GET", None),
+                    "crear_recurso": ("/api/crear-contenedor", "POST", {"nombre": consulta}),
+                }
+
+                if tipo_intencion in endpoint_map:
+                    endpoint, method, payload = endpoint_map[tipo_intencion]
+                    logging.info(f"🔄 ROUTER: Redirigiendo a {endpoint}")
+                    return func.HttpResponse(
+                        json.dumps(invocar_endpoint_directo_seguro(
+                            endpoint, method, body=payload), ensure_ascii=False),
+                        mimetype="application/json",
+                        status_code=200
+                    )
+
+            # Detectar patrones específicos de consultas de contexto/memoria
+            contexto_detectado = detectar_consulta_contexto_semantica(consulta) or {
+            }
+
+            # Combinar clasificación semántica con detección de contexto
+            if contexto_detectado.get("es_contexto") and contexto_detectado.get("confianza", 0) > 0.6:
+                logging.info(
+                    f"🧠 Consulta de contexto detectada: {contexto_detectado.get('tipo')} (confianza: {contexto_detectado.get('confianza'):.2f})")
+
+                # 🔥 APLICAR WRAPPER PARA OBTENER CONTEXTO SEMÁNTICO
+                from cosmos_memory_direct import aplicar_memoria_cosmos_directo
+                temp_response = {"procesando_consulta": True,
+                                 "intencion_clasificada": contexto_detectado.get('tipo')}
+                temp_response = aplicar_memoria_cosmos_directo(
+                    req, temp_response) or {}
+                temp_response = _as_dict(temp_response)
+
+                interacciones = memoria_previa.get(
+                    "interacciones_recientes", []) or []
+                eventos_contexto: List[Dict[str, Any]] = []
+                for item in interacciones[:limit]:
+                    registro = item.get("data", item)
+                    texto = registro.get("texto_semantico") or item.get(
+                        "texto_semantico") or ""
+                    if not texto:
+                        continue
+                    descripcion_evento, detalle_evento = _descripcion_evento(
+                        {
+                            "endpoint": registro.get("endpoint"),
+                            "timestamp": registro.get("timestamp"),
+                            "exito": registro.get("exito", True),
+                            "params": registro.get("params", {}),
+                            "consulta": registro.get("consulta")
+                        },
+                        texto
+                    )
+                    eventos_contexto.append(
+                        build_event(
+                            endpoint=registro.get("endpoint", "copiloto"),
+                            descripcion=descripcion_evento,
+                            estado="exito" if registro.get(
+                                "exito", True) else "error",
+                            sugerencia="",
+                            criticidad="informativa",
+                            datos={
+                                "timestamp": registro.get("timestamp", ""),
+                                "tipo": registro.get("tipo", "interaccion_usuario"),
+                                "texto_original": texto,
+                                "detalle": detalle_evento
+                            },
+                            timestamp=registro.get("timestamp", "")
+                        )
+                    )
+
+                if not eventos_contexto:
+                    eventos_contexto.append(
+                        build_event(
+                            endpoint="copiloto",
+                            descripcion="Sin interacciones previas para contextualizar esta consulta.",
+                            estado="informativo",
+                            sugerencia="",
+                            criticidad="informativa"
+                        )
+                    )
+
+                extras_contexto = {
+                    "interacciones": interacciones,
+                    "contexto_inteligente": temp_response.get("contexto_inteligente", {}),
+                    "interpretacion_semantica": temp_response.get("interpretacion_semantica", ""),
+                    "clasificacion_contexto": contexto_detectado,
+                    "metadata": temp_response.get("metadata", {})
+                }
+
+                respuesta_struct = build_structured_payload(
+                    "copiloto",
+                    eventos_contexto,
+                    narrativa_base="",
+                    resumen_automatico="",
+                    extras=extras_contexto,
+                    contexto_inteligente=temp_response.get(
+                        "contexto_inteligente"),
+                    exito=True
+                )
+                respuesta_struct.update({
+                    "session_id": session_id,
+                    "agent_id": req.headers.get("Agent-ID", "unknown"),
+                    "fuente": "wrapper_automatico",
+                    "validation_applied": True
+                })
+                respuesta_struct["mensaje"] = ""
+                respuesta_struct = _inyectar_narrativa(respuesta_struct)
+
+                return func.HttpResponse(
+                    json.dumps(respuesta_struct, ensure_ascii=False),
+                    mimetype="application/json",
+                    status_code=200
+                )
+
+            # 🔍 DETECCIÓN INTELIGENTE DE BING GROUNDING (para otras consultas)
+            # 🔥 NO RETORNAR - Solo enriquecer contexto
+            try:
+                bing_result = integrar_con_validador_semantico_inteligente(
+                    req, consulta, memoria_previa) or {}
+
+                # 🔥 CAMBIO: No retornar inmediatamente, guardar para enriquecer después del MERGE
+                if isinstance(bing_result.get("respuesta_final"), (dict, list, str)):
+                    logging.info(
+                        "🔍 Bing Grounding ejecutado, guardando para MERGE posterior")
+                    # Guardar en variable para usar después del MERGE
+                    setattr(req, '_bing_enrichment',
+                            bing_result.get("respuesta_final"))
+                    # NO RETORNAR AQUÍ - continuar al MERGE
+
+                # Si se detectó necesidad de Bing pero falló, continuar con nota
+                if bing_result.get("bing_fallido"):
+                    logging.info(
+                        f"🔍 Bing Grounding detectado pero falló, continuando con flujo normal")
+            except Exception as redirect_error:
+                logging.warning(f"Error en redirección: {redirect_error}")
+                # Continuar con flujo normal si falla la redirección
+
+    except Exception as e:
+        logging.error(f"Error en detección Bing: {e}")
+        # Continuar con flujo normal si hay error
+
+    # 🔥 EXTRAER MENSAJE DE BODY JSON (prioridad) O PARAMS (fallback)
+    mensaje = (
+        body.get("mensaje") or
+        body.get("consulta") or
+        body.get("query") or
+        req.params.get('mensaje') or
+        req.params.get('consulta') or
+        req.params.get('q') or
+        ""
+    )
+
+    logging.info(
+        f"🔍 COPILOTO: Mensaje extraído: '{mensaje}' (body={bool(body.get('mensaje'))}, params={bool(req.params.get('mensaje'))})")
+
+    # ✅ Fallback final: intentar al menos devolver narrativa contextual
+    try:
+        narrativa_fallback = generar_narrativa_contextual(
+            session_id=session_id,
+            thread_id=thread_id,
+            query=mensaje or consulta or consulta_usuario or ""
+        )
+    except Exception as fallback_err:
+        narrativa_fallback = None
+        logging.warning(
+            f"⚠️ Fallback narrativa no disponible: {fallback_err}")
+
+    if narrativa_fallback and (narrativa_fallback.get("texto") or narrativa_fallback.get("mensajes")):
+        logging.info("✅ Fallback de narrativa contextual aplicado")
+        mensajes_fmt = narrativa_fallback.get(
+            "mensajes") or narrativa_fallback.get("mensajes_formateados") or []
+        texto_base = _construir_resumen_narrativo(
+            narrativa_fallback) or narrativa_fallback.get("texto", "").strip()
+
+        payload_fallback = {
+            "exito": True,
+            "respuesta_usuario": texto_base,
+            "texto_semantico": texto_base,
+            "metadata": {
+                "fuente": "narrativa_enriquecida",
+                "thread_id": narrativa_fallback.get("thread_id"),
+                "blob": narrativa_fallback.get("fuente_blob"),
+                "mensajes_recuperados": len(mensajes_fmt),
+                "session_id": narrativa_fallback.get("session_id"),
+                "fragmento_conversacion": mensajes_fmt[:3],
+                "wrapper_aplicado": True,
+                "memoria_aplicada": True,
+                "interacciones_previas": narrativa_fallback.get("total_interacciones", 0)
+            },
+            "timestamp": datetime.now().isoformat()
+        }
+        return func.HttpResponse(
+            json.dumps(payload_fallback, ensure_ascii=False),
+            mimetype="application/json",
+            status_code=200
+        )
+
+    return func.HttpResponse(
+        json.dumps({
+            "exito": False,
+            "error": "No se procesó la solicitud correctamente",
+            "mensaje": "El endpoint no generó una respuesta válida",
+            "timestamp": datetime.now().isoformat()
+        }, ensure_ascii=False),
+        mimetype="application/json",
+        status_code=500
+    )
+
+
+def detectar_consulta_contexto_semantica(consulta: str) -> dict:
+    """Detecta si la consulta es sobre contexto/memoria usando análisis semántico robusto"""
+    consulta_lower = consulta.lower().strip()
+
+    # Patrones semánticos para consultas de contexto
+    patrones_contexto = {
+        "recuperar_anterior": [
+            r"qué.*habíamos.*detectado",
+            r"qué.*detect.*antes",
+            r"cuál.*problema.*anterior",
+            r"recuérdame.*diagnóstico",
+            r"qué.*pasó.*antes"
+        ],
+        "estado_sesion": [
+            r"en.*qué.*estábamos",
+            r"dónde.*quedamos",
+            r"cuál.*estado.*actual",
+            r"seguimos.*con.*errores"
+        ],
+        "resumen_actividad": [
+            r"resumen.*sesión",
+            r"qué.*hicimos.*último",
+            r"actividad.*reciente",
+            r"historial.*interacciones"
+        ]
+    }
+
+    # Evaluar cada patrón
+    for tipo, patrones in patrones_contexto.items():
+        for patron in patrones:
+            if re.search(patron, consulta_lower):
+                return {
+                    "es_contexto": True,
+                    "tipo": tipo,
+                    "confianza": 0.9,
+                    "patron_detectado": patron
+                }
+
+    # Palabras clave de respaldo con menor confianza
+    palabras_contexto = ["antes", "habíamos",
+                         "detectado", "anterior", "resumen", "estábamos"]
+    coincidencias = sum(
+        1 for palabra in palabras_contexto if palabra in consulta_lower)
+
+    if coincidencias >= 2:
+        return {
+            "es_contexto": True,
+            "tipo": "consulta_general_contexto",
+            "confianza": min(0.7, coincidencias * 0.2),
+            "patron_detectado": "palabras_clave_multiples"
+        }
+
+    return {
+        "es_contexto": False,
+        "tipo": "no_contexto",
+        "confianza": 0.1,
+        "patron_detectado": "ninguno"
+    }
+
+
+def execute_parsed_command(command: dict) -> dict:
+    """
+    Ejecuta un comando ya parseado con máxima flexibilidad.
+    Acepta cualquier formato de payload y lo adapta automáticamente.
+    """
+    if not command:
+        return {"exito": False, "error": "Comando vacío"}
+
+    # Extraer endpoint con múltiples fallbacks
+    endpoint = (
+        command.get("endpoint") or
+        command.get("intencion") or
+        command.get("action") or
+        "copiloto"  # fallback por defecto
+    )
+
+    method = command.get("method", "POST").upper()
+
+    # Recoger datos de forma ultra-flexible
+    data = {}
+
+    # Prioridad 1: campos explícitos de datos
+    if "data" in command and isinstance(command["data"], dict):
+        data = command["data"]
+    elif "parametros" in command and isinstance(command["parametros"], dict):
+        data = command["parametros"]
+    elif "params" in command and isinstance(command["params"], dict):
+        data = command["params"]
+    else:
+        # Prioridad 2: todos los campos excepto metadatos
+        excluded_fields = {"endpoint", "method", "intencion",
+                           "action", "agent_response", "agent_name"}
+        data = {k: v for k, v in command.items() if k not in excluded_fields}
+
+    # Si es una intención semántica, mapear al endpoint ejecutar
+    if endpoint in ["dashboard", "diagnosticar", "generar", "buscar", "leer"]:
+        data["intencion"] = endpoint
+        endpoint = "ejecutar"
+
+    logging.info(
+        f"[execute_parsed_command] endpoint={endpoint}, method={method}, data_keys={list(data.keys())}")
+
+    IS_AZURE = is_running_in_azure()
+
+    if IS_AZURE:
+        # 🔹 Azure: HTTP request
+        base_url = os.environ.get(
+            "FUNCTION_BASE_URL", "https://copiloto-semantico-func-us2.azurewebsites.net")
+        endpoint_str = str(endpoint)
+        ep = endpoint_str if endpoint_str.startswith(
+            ("api/", "/api/")) else f"/api/{endpoint_str}"
+        if not ep.startswith("/"):
+            ep = "/" + ep
+        url = f"{base_url}{ep}"
+
+        try:
+            resp = requests.request(method, url, json=data, timeout=30)
+            try:
+                return resp.json()
+            except Exception:
+                return {"exito": resp.ok, "raw_response": resp.text, "status": resp.status_code}
+        except Exception as e:
+            return {"exito": False, "error": str(e), "endpoint": endpoint, "status": 500}
+    else:
+        # 🔹 Local: handler directo
+        path, handler = _resolve_handler(str(endpoint))
+        if handler:
+            payload = json.dumps(data, ensure_ascii=False).encode(
+                "utf-8") if method in {"POST", "PUT", "PATCH"} and data else b""
+            req_mock = func.HttpRequest(
+                method=method,
+                url=f"http://localhost{path}",
+                body=payload,
+                headers={"Content-Type": "application/json"},
+                params=data if method == "GET" else {}
+            )
+            try:
+                response = handler(req_mock)
+                try:
+                    return json.loads(response.get_body().decode())
+                except Exception:
+                    return {"exito": True, "raw_response": response.get_body().decode(), "status_code": response.status_code}
+            except Exception as e:
+                return {"exito": False, "error": str(e), "endpoint": endpoint, "status": 500}
+        else:
+            return {"exito": False, "error": f"Endpoint '{endpoint}' no encontrado", "endpoints_disponibles": ["status", "copiloto", "ejecutar", "listar-blobs"]}
+
+
+def status(req: func.HttpRequest) -> func.HttpResponse:
+    """Status endpoint que confirma el estado y proporciona contexto semántico."""
+
+    # 🧠 OBTENER CONTEXTO DEL WRAPPER AUTOMÁTICO
+    memoria_previa = getattr(req, '_memoria_contexto', {})
+    if memoria_previa and memoria_previa.get("tiene_historial"):
+        logging.info(
+            f"🧠 Status: Continuando sesión con {memoria_previa['total_interacciones']} interacciones")
+
+    # Construir el estado del sistema
+    estado = build_status()
+
+    # Mensaje enriquecido con contexto semántico
+    if memoria_previa and memoria_previa.get("tiene_historial"):
+        resumen = memoria_previa.get(
+            "resumen_conversacion", "Sin resumen disponible.")
+        mensaje_enriquecido = f"""🔍 Estado del sistema consultado.
+
+📊 RESULTADO: El sistema está en funcionamiento.
+
+📝 CONTEXTO SEMÁNTICO:
+{resumen[:300] if resumen else 'Sin resumen de conversación disponible'}
+
+🎯 CONTINUIDAD: Esta sesión tiene contexto previo. Puedes hacer referencia a interacciones anteriores.
+"""
+    else:
+        mensaje_enriquecido = """🔍 Estado del sistema consultado.
+
+📊 RESULTADO: El sistema está en funcionamiento.
+
+💡 CONTEXTO: Esta es una nueva sesión o no hay interacciones guardadas previamente.
+🎯 RECOMENDACIÓN: Puedes comenzar a interactuar normalmente. Todas las nuevas interacciones se guardarán automáticamente.
+"""
+
+    # NOTA: La memoria se registra automáticamente por el wrapper @registrar_memoria
+
+    # Construir la respuesta final
+    response_data = {
+        "exito": True,
+        "estado": estado,
+        "mensaje": mensaje_enriquecido,
+        "fuente": "wrapper_automatico"
+    }
+
+    return func.HttpResponse(
+        json.dumps(response_data, ensure_ascii=False),
+        mimetype="application/json",
+        status_code=200
+    )
+
+
+def test_wrapper_memoria(req: func.HttpRequest) -> func.HttpResponse:
+    """Endpoint específico para probar el wrapper de memoria"""
+    try:
+        # Detectar parámetros de memoria
+        session_id = (
+            req.params.get("session_id") or
+            (req.get_json() or {}).get("session_id") or
+            req.headers.get("X-Session-ID") or
+            f"auto_{hash(str(req.headers.get('User-Agent', '')) + str(req.url))}"
+        )
+
+        agent_id = (
+            req.params.get("agent_id") or
+            (req.get_json() or {}).get("agent_id") or
+            req.headers.get("X-Agent-ID") or
+            "AutoAgent"
+        )
+
+        # Intentar consultar memoria
+        memoria_resultado = {}
+        try:
+            from memory_helpers import obtener_memoria_request
+            memoria_contexto = obtener_memoria_request(req)
+            memoria_resultado = memoria_contexto or {}
+        except Exception as e:
+            memoria_resultado = {"error_memoria": str(e)}
+
+        resultado = {
+            "test_wrapper": True,
+            "timestamp": datetime.now().isoformat(),
+            "session_detectado": {
+                "session_id": session_id,
+                "agent_id": agent_id,
+                "origen_session": "params" if req.params.get("session_id") else "auto",
+                "origen_agent": "params" if req.params.get("agent_id") else "auto"
+            },
+            "memoria_sistema": memoria_resultado,
+            "metadata": {
+                "wrapper_test": True,
+                "memoria_disponible": True,
+                "session_info": {
+                    "session_id": session_id,
+                    "agent_id": agent_id
+                },
+                "wrapper_aplicado": True
+            }
+        }
+
+        return func.HttpResponse(
+            json.dumps(resultado, indent=2, ensure_ascii=False),
+            mimetype="application/json",
+            status_code=200
+        )
+
+    except Exception as e:
+        return func.HttpResponse(
+            json.dumps({
+                "error": str(e),
+                "test_wrapper": False,
+                "timestamp": datetime.now().isoformat()
+            }),
+            mimetype="application/json",
+            status_code=500
+        )
+
+
+def openapi_schema(req: func.HttpRequest) -> func.HttpResponse:
+    """Sirve el schema OpenAPI completo para Agent898 - ruta estándar"""
+    return _serve_openapi_schema()
+
+
+def openapi_schema_api(req: func.HttpRequest) -> func.HttpResponse:
+    """Sirve el schema OpenAPI completo para Agent898 - ruta con /api/"""
+    return _serve_openapi_schema()
+
+
+# Agregar este endpoint temporal para verificar qué archivo se está sirviendo
+def debug_openapi(req: func.HttpRequest) -> func.HttpResponse:
+    """Debug temporal para verificar archivos OpenAPI"""
+    try:
+        import os
+        from pathlib import Path
+
+        # routes/ cuelga de la raíz de la Function App (donde vive openapi.yaml)
+        base_path = Path(__file__).parent.parent
+
+        # Buscar TODOS los archivos
+        all_files = list(base_path.glob("*"))
+
+        # Verificar archivos
+        files_info = []
+        for file_path in all_files:
+            if file_path.exists():
+                try:
+                    content = file_path.read_text(encoding='utf-8')
+                    # Buscar la línea de versión
+                    version_line = None
+                    for line in content.split('\n'):
+                        if 'openapi:' in line.lower():
+                            version_line = line.strip()
+                            break
+
+                    files_info.append({
+                        "file": str(file_path.name),
+                        "full_path": str(file_path),
+                        "exists": True,
+                        "size": len(content),
+                        "version_line": version_line,
+                        "content_preview": content[:200]
+                    })
+                except Exception as e:
+                    files_info.append({
+                        "file": str(file_path.name),
+                        "full_path": str(file_path),
+                        "exists": True,
+                        "error": str(e)
+                    })
+
+        # Rutas del manifiesto que openapi.yaml no documenta
+        from lazy_routes import lazy_routes
+        openapi_file = base_path / "openapi.yaml"
+        openapi_text = openapi_file.read_text(encoding="utf-8") if openapi_file.exists() else ""
+        sin_documentar = [r for r in lazy_routes.endpoints() if f"{r}:" not in openapi_text]
+
+        return func.HttpResponse(
+            json.dumps({
+                "working_directory": str(Path.cwd()),
+                "function_file_dir": str(base_path),
+                "all_files_found": files_info,
+                "manifest_routes_missing_in_openapi": sin_documentar,
+                "expected_files": [
+                    "openapi.yaml",
+                    "openapi_copiloto_local.yaml"
+                ]
+            }, ensure_ascii=False, indent=2),
+            mimetype="application/json",
+            status_code=200
+        )
+
+    except Exception as e:
+        return func.HttpResponse(
+            json.dumps({"error": str(e)}),
+            mimetype="application/json",
+            status_code=500
+        )
+
+
+def hybrid(req: func.HttpRequest) -> func.HttpResponse:
+
+    logging.info('Hybrid (semantico inteligente) activado')
+
+    # 🧠 OBTENER CONTEXTO DEL WRAPPER AUTOMÁTICO
+    # asegura disponibilidad en este scope
+    from memory_manual import aplicar_memoria_manual
+    memoria_previa = getattr(req, '_memoria_contexto', {})
+    if memoria_previa and memoria_previa.get("contexto_recuperado"):
+        logging.info(
+            f"🧠 Hybrid: Continuando sesión con {memoria_previa['total_interacciones']} interacciones previas")
+
+    # 🧠 CONSULTAR MEMORIA AUTOMÁTICAMENTE (legacy)
+    from memory_helpers import obtener_memoria_request, obtener_prompt_memoria, extraer_session_info
+
+    memoria_contexto = obtener_memoria_request(req)
+    memoria_prompt = obtener_prompt_memoria(req)
+    session_info = extraer_session_info(req)
+
+    if memoria_contexto and memoria_contexto.get("tiene_historial"):
+        logging.info(
+            f"🧠 Memoria de sesión disponible: {memoria_contexto['total_interacciones_sesion']} interacciones previas")
+    elif session_info.get("session_id"):
+        logging.info(f"🆕 Nueva sesión detectada: {session_info['session_id']}")
+
+    try:
+        from semantic_intent_parser import enhance_hybrid_parser, should_trigger_bing_grounding
+
+        # Validación flexible del JSON - acepta cualquier payload
+        req_body = req.get_json()
+        if req_body is None:
+            req_body = {}
+
+        logging.info(
+            f"Hybrid recibió payload: {json.dumps(req_body, ensure_ascii=False)[:200]}...")
+
+        # NUEVO: Parser semántico inteligente
+        user_input = None
+        parsed_command = None
+
+        # Extraer input del usuario de diferentes formatos
+        if "agent_response" in req_body:
+            user_input = req_body["agent_response"]
+            logging.info("Formato legacy detectado: agent_response")
+        elif "query" in req_body:
+            user_input = req_body["query"]
+            logging.info("Formato query detectado")
+        elif "mensaje" in req_body:
+            user_input = req_body["mensaje"]
+            logging.info("Formato mensaje detectado")
+        elif "intencion" in req_body:
+            user_input = req_body["intencion"]
+            logging.info("Formato intencion detectado")
+        elif isinstance(req_body, dict) and len(req_body) == 1:
+            # Si solo hay un campo, usarlo como input
+            key, value = next(iter(req_body.items()))
+            user_input = str(value)
+            logging.info(f"Formato single-field detectado: {key}")
+        else:
+            # Convertir todo el payload a string como último recurso
+            user_input = json.dumps(req_body, ensure_ascii=False)
+            logging.info("Formato libre - usando payload completo")
+
+        # Usar parser semántico inteligente
+        if user_input:
+            parsed_command = enhance_hybrid_parser(user_input)
+            logging.info(
+                f"Parser semántico result: {parsed_command.get('endpoint', 'unknown')}")
+        else:
+            # Fallback si no hay input
+            parsed_command = {"endpoint": "status", "method": "GET"}
+
+        # Ejecutar el comando parseado con manejo especial para Bing Grounding
+        if parsed_command and "error" not in parsed_command:
+            logging.info(
+                f"Comando parseado: {parsed_command.get('endpoint', 'unknown')}")
+
+            # Si requiere Bing Grounding, ejecutarlo con validación de tipos
+            if parsed_command.get("requires_grounding"):
+                logging.info(
+                    f"Activando Bing Grounding para: {user_input[:50]}...")
+                data = parsed_command.get("data")
+                if isinstance(data, dict):
+                    query = data.get("query", "")
+                    contexto = data.get("contexto", "general")
+                    resultado = ejecutar_bing_grounding_fallback(
+                        query,
+                        contexto,
+                        {"original_query": user_input}
+                    )
+                else:
+                    # Manejar caso donde data no es un dict (e.g., es un string)
+                    logging.warning(
+                        f"Data no es un dict: {type(data)}, usando fallback")
+                    resultado = ejecutar_bing_grounding_fallback(
+                        user_input or "help",
+                        "error_fallback",
+                        {"parse_error": "data no es dict", "payload": req_body}
+                    )
+            else:
+                resultado = execute_parsed_command(parsed_command)
+        else:
+            logging.warning(f"Error en parsing: {parsed_command}")
+            # Fallback - usar Bing Grounding incluso para errores
+            resultado = ejecutar_bing_grounding_fallback(
+                user_input or "help",
+                "error_fallback",
+                {"parse_error": parsed_command.get(
+                    "error"), "payload": req_body}
+            )
+
+        # Respuesta consistente con información semántica
+        response = {
+            "resultado": resultado,
+            "metadata": {
+                "timestamp": datetime.now().isoformat(),
+                "endpoint": "hybrid",
+                "version": "2.0-semantic-intelligent",
+                "user_input": user_input[:100] if user_input else "none",
+                "parsed_endpoint": parsed_command.get("endpoint") if parsed_command else "none",
+                "used_grounding": parsed_command.get("requires_grounding", False) if parsed_command else False,
+                "ambiente": "Azure" if IS_AZURE else "Local",
+                "session_info": session_info,
+                "memoria_disponible": bool(memoria_contexto and memoria_contexto.get("tiene_historial"))
+            }
+        }
+
+        # 🧠 AGREGAR CONTEXTO DE MEMORIA A LA RESPUESTA
+        if memoria_prompt:
+            response["contexto_memoria"] = memoria_prompt
+
+        from memory_helpers import agregar_memoria_a_respuesta
+        response = agregar_memoria_a_respuesta(response, req)
+
+        # ✅ MEMORIA AUTOMÁTICA: El wrapper ya inyectó memoria en req._memoria_contexto
+        # Solo aplicar memoria manual para enriquecimiento adicional
+        response = aplicar_memoria_manual(req, response)
+
+        return func.HttpResponse(json.dumps(response, ensure_ascii=False), mimetype="application/json", status_code=200)
+
+    except ValueError as ve:
+        # Error específico de parsing JSON
+        logging.error(f"Hybrid: Error parsing JSON: {str(ve)}")
+        return func.HttpResponse(
+            json.dumps({
+                "error": "Invalid JSON format in request body",
+                "error_code": "JSON_PARSE_ERROR",
+                "status": 400,
+                "details": str(ve)
+            }),
+            mimetype="application/json",
+            status_code=400
+        )
+
+    except Exception as e:
+        logging.error(f"Error en hybrid: {str(e)}")
+        logging.error(f"Traceback: {traceback.format_exc()}")
+
+        error_response = {
+            "error": str(e),
+            "error_code": "INTERNAL_ERROR",
+            "status": 500,
+            "metadata": {
+                "timestamp": datetime.now().isoformat(),
+                "endpoint": "hybrid",
+                "ambiente": "Azure" if IS_AZURE else "Local"
+            }
+        }
+        return func.HttpResponse(json.dumps(error_response), mimetype="application/json", status_code=500)
+
+
+def health(req: func.HttpRequest) -> func.HttpResponse:
+    """Health check con información detallada"""
+    health_status = {
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "version": "2.0-orchestrator",
+        "capabilities": {
+            "semantic_processing": True,
+            "azure_cli_integration": True,
+            "blob_storage": bool(STORAGE_CONNECTION_STRING),
+            "orchestration": True,
+            "guided_mode": True
+        },
+        "endpoints": {
+            "GET /api/copiloto": "Interfaz principal",
+            "POST /api/ejecutar": "Ejecución de comandos complejos",
+            "GET /api/status": "Estado detallado",
+            "GET /api/health": "Health check"
+        },
+        "ready": True
+    }
+
+    return func.HttpResponse(
+        json.dumps(health_status, indent=2),
+        mimetype="application/json"
+    )
+
+
+def render_error_http(req: func.HttpRequest) -> func.HttpResponse:
+    from memory_manual import aplicar_memoria_manual
+    from cosmos_memory_direct import consultar_memoria_cosmos_directo, aplicar_memoria_cosmos_directo
+    from services.memory_service import memory_service
+
+    # 🧠 CONSULTAR MEMORIA COSMOS DB DIRECTAMENTE
+    memoria_previa = consultar_memoria_cosmos_directo(req)
+    if memoria_previa and memoria_previa.get("tiene_historial"):
+        logging.info(
+            f"🧠 Modificar-archivo: {memoria_previa['total_interacciones']} interacciones encontradas")
+        logging.info(
+            f"📝 Historial: {memoria_previa.get('resumen_conversacion', '')[:100]}...")
+    advertencias = []
+
+    """Endpoint dedicado para renderizar errores de forma semántica"""
+    try:
+        # ✅ VALIDACIÓN DEFENSIVA: Verificar que request_body no sea None
+        request_body = req.get_body()
+        if not request_body:
+            res = {
+                "exito": False,
+                "error": "Request body is empty",
+                "response": "❌ Error: Request body is empty"
+            }
+            # Aplicar memoria Cosmos y memoria manual
+            res = aplicar_memoria_cosmos_directo(req, res)
+            res = aplicar_memoria_manual(req, res)
+
+            # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
+            # Registrar llamada en memoria después de construir la respuesta final
+            logging.info(
+                f"💾 Registering call for render_error: success={res.get('exito', False)}, endpoint=/api/render-error")
+            memory_service.registrar_llamada(
+                source="render_error",
+                endpoint="/api/render-error",
+                method=req.method,
+                params={"session_id": req.headers.get(
+                    "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
+                response_data=res,
+                success=res.get("exito", False)
+            )
+
+            return func.HttpResponse(
+                json.dumps(res, ensure_ascii=False),
+                mimetype="application/json",
+                status_code=200
+            )
+
+        # ✅ VALIDACIÓN DEFENSIVA: Manejar JSON inválido sin causar exceptions
+        body = None
+        try:
+            body = req.get_json()
+        except (ValueError, TypeError, AttributeError) as json_error:
+            logging.warning(f"Invalid JSON in render_error_http: {json_error}")
+            res = {
+                "exito": False,
+                "error": "Invalid JSON format in request body",
+                "response": "❌ Error: Invalid JSON format in request body"
+            }
+            # Aplicar memoria Cosmos y memoria manual
+            res = aplicar_memoria_cosmos_directo(req, res)
+            res = aplicar_memoria_manual(req, res)
+
+            # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
+            # Registrar llamada en memoria después de construir la respuesta final
+            logging.info(
+                f"💾 Registering call for render_error: success={res.get('exito', False)}, endpoint=/api/render-error")
+            memory_service.registrar_llamada(
+                source="render_error",
+                endpoint="/api/render-error",
+                method=req.method,
+                params={"session_id": req.headers.get(
+                    "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
+                response_data=res,
+                success=res.get("exito", False)
+            )
+
+            return func.HttpResponse(
+                json.dumps(res, ensure_ascii=False),
+                mimetype="application/json",
+                status_code=200
+            )
+
+        # ✅ VALIDACIÓN DEFENSIVA: Verificar que body no sea None y sea dict
+        if body is None:
+            res = {
+                "exito": False,
+                "error": "Request body could not be parsed as JSON",
+                "response": "❌ Error: Request body could not be parsed as JSON"
+            }
+            # Aplicar memoria Cosmos y memoria manual
+            res = aplicar_memoria_cosmos_directo(req, res)
+            res = aplicar_memoria_manual(req, res)
+
+            # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
+            # Registrar llamada en memoria después de construir la respuesta final
+            logging.info(
+                f"💾 Registering call for render_error: success={res.get('exito', False)}, endpoint=/api/render-error")
+            memory_service.registrar_llamada(
+                source="render_error",
+                endpoint="/api/render-error",
+                method=req.method,
+                params={"session_id": req.headers.get(
+                    "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
+                response_data=res,
+                success=res.get("exito", False)
+            )
+
+            return func.HttpResponse(
+                json.dumps(res, ensure_ascii=False),
+                mimetype="application/json",
+                status_code=200
+            )
+
+        if not isinstance(body, dict):
+            res = {
+                "exito": False,
+                "error": "Request body must be valid JSON object",
+                "response": "❌ Error: Request body must be valid JSON object"
+            }
+            # Aplicar memoria Cosmos y memoria manual
+            res = aplicar_memoria_cosmos_directo(req, res)
+            res = aplicar_memoria_manual(req, res)
+
+            # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
+            # Registrar llamada en memoria después de construir la respuesta final
+            logging.info(
+                f"💾 Registering call for render_error: success={res.get('exito', False)}, endpoint=/api/render-error")
+            memory_service.registrar_llamada(
+                source="render_error",
+                endpoint="/api/render-error",
+                method=req.method,
+                params={"session_id": req.headers.get(
+                    "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
+                response_data=res,
+                success=res.get("exito", False)
+            )
+
+            return func.HttpResponse(
+                json.dumps(res, ensure_ascii=False),
+                mimetype="application/json",
+                status_code=200
+            )
+
+        # ✅ VALIDACIÓN DEFENSIVA: Extraer campos con valores por defecto seguros
+        status_code = body.get("status_code")
+        if status_code is None:
+            status_code = 500
+
+        # ✅ ASEGURAR: Convertir status_code a int de forma segura
+        try:
+            status_code = int(status_code)
+        except (ValueError, TypeError):
+            status_code = 500
+
+        payload = body.get("payload")
+        if payload is None:
+            payload = {}
+
+        # ✅ ASEGURAR: payload siempre sea un diccionario válido
+        if not isinstance(payload, dict):
+            if payload is not None:
+                payload = {"error": str(payload)}
+            else:
+                payload = {"error": "Unknown error"}
+
+        # ✅ VALIDACIÓN DEFENSIVA: Verificar que payload tenga al menos un campo error
+        if not payload.get("error") and not payload.get("message"):
+            payload["error"] = "No error details provided"
+
+        # ✅ RENDERIZACIÓN DEFENSIVA: Manejar errores en render_tool_response
+        semantic_response = None
+        try:
+            # Verificar que render_tool_response esté disponible
+            if 'render_tool_response' in globals() and callable(render_tool_response):
+                semantic_response = render_tool_response(status_code, payload)
+            else:
+                logging.warning("render_tool_response function not available")
+                semantic_response = None
+
+        except Exception as render_error:
+            logging.warning(f"Error in render_tool_response: {render_error}")
+            semantic_response = None
+
+        # ✅ FALLBACK SEGURO: Si render_tool_response falla, usar formato manual
+        if semantic_response is None:
+            error_msg = payload.get("error", payload.get(
+                "message", "Error desconocido"))
+            if status_code >= 500:
+                semantic_response = f"💥 Error interno: {error_msg}"
+            elif status_code >= 400:
+                semantic_response = f"❌ Error de solicitud: {error_msg}"
+            else:
+                semantic_response = f"ℹ️ Respuesta ({status_code}): {error_msg}"
+
+        # ✅ VALIDACIÓN FINAL: Asegurar que semantic_response no sea None
+        if semantic_response is None or not isinstance(semantic_response, str):
+            semantic_response = f"❌ Error procesando respuesta: {payload.get('error', 'Error desconocido')}"
+
+        res = {
+            "exito": True,
+            "response": semantic_response,
+            "status_code": status_code,
+            "payload": payload
+        }
+
+        # Aplicar memoria Cosmos y memoria manual
+        res = aplicar_memoria_cosmos_directo(req, res)
+        res = aplicar_memoria_manual(req, res)
+
+        # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
+        # Registrar llamada en memoria después de construir la respuesta final
+        logging.info(
+            f"💾 Registering call for render_error: success={res.get('exito', False)}, endpoint=/api/render-error")
+        memory_service.registrar_llamada(
+            source="render_error",
+            endpoint="/api/render-error",
+            method=req.method,
+            params={"session_id": req.headers.get(
+                "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
+            response_data=res,
+            success=res.get("exito", False)
+        )
+
+        return func.HttpResponse(
+            json.dumps(res, ensure_ascii=False),
+            mimetype="application/json",
+            status_code=200  # Siempre 200 para que el agente pueda leer la respuesta
+        )
+
+    except Exception as e:
+        logging.exception("render_error_http failed with unexpected error")
+        # ✅ FALLBACK ULTRA-SEGURO: Garantizar que siempre se devuelva una respuesta válida
+        try:
+            error_message = str(e) if e else "Unknown exception"
+            res = {
+                "exito": False,
+                "error": f"Error crítico de renderizado: {error_message}",
+                "response": f"❌ Error crítico: No se pudo procesar la respuesta"
+            }
+            # Aplicar memoria Cosmos y memoria manual
+            res = aplicar_memoria_cosmos_directo(req, res)
+            res = aplicar_memoria_manual(req, res)
+
+            # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
+            # Registrar llamada en memoria después de construir la respuesta final
+            logging.info(
+                f"💾 Registering call for render_error: success={res.get('exito', False)}, endpoint=/api/render-error")
+            memory_service.registrar_llamada(
+                source="render_error",
+                endpoint="/api/render-error",
+                method=req.method,
+                params={"session_id": req.headers.get(
+                    "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
+                response_data=res,
+                success=res.get("exito", False)
+            )
+
+            return func.HttpResponse(
+                json.dumps(res, ensure_ascii=False),
+                mimetype="application/json",
+                status_code=200
+            )
+        except:
+            # Último recurso si incluso el fallback falla
+            return func.HttpResponse(
+                json.dumps({
+                    "exito": False,
+                    "error": "Error crítico: No se pudo procesar la respuesta",
+                    "response": "❌ Error crítico: No se pudo procesar la respuesta"
+                }),
+                mimetype="application/json",
+                status_code=200
+            )
@@ -0,0 +1,913 @@
+"""
+Rutas: diagnóstico
+diagnóstico de recursos, batería de endpoints, diagnósticos de Azure
+Monitor y verificaciones del sistema, App Insights y Cosmos.
+
+Se importa en la primera llamada a una de sus rutas (ver route_manifest.json
+y lazy_routes); los helpers compartidos siguen en function_app.
+"""
+import json
+import logging
+import os
+import platform
+from datetime import timedelta, datetime
+from typing import Optional
+from urllib.parse import urljoin
+
+import azure.functions as func
+import requests
+from azure.cosmos import CosmosClient
+from azure.identity import DefaultAzureCredential
+
+from lazy_imports import get_monitor_client, mgmt_sdk_available
+from services.memory_service import memory_service
+
+from function_app import (
+    api_err,
+    api_ok,
+    CACHE,
+    CONTAINER_NAME,
+    diagnosticar_function_app_con_sdk,
+    _error,
+    _get_arm_credential,
+    get_blob_client,
+    get_logs_query_client,
+    IS_AZURE,
+    _json,
+    obtener_estado_function_app,
+    obtener_info_storage_account,
+    obtener_metricas_function_app,
+    rest_set_diagnostics,
+    _s,
+    _try_default_credential,
+)
+
+
+def _json_body(req):
+    try:
+        b = req.get_json()
+        return b if isinstance(b, dict) else {}
+    except Exception:
+        return {}
+
+
+def configurar_diagnosticos_azure(resource_id: str, workspace_id: str, setting_name: str = "default", logs: Optional[list] = None, metrics: Optional[list] = None) -> dict:
+    """Configura diagnósticos de Azure Monitor usando REST API"""
+    if not resource_id or not workspace_id:
+        return {"ok": False, "error": "resource_id y workspace_id son requeridos"}
+    return rest_set_diagnostics(resource_id, workspace_id, setting_name)
+
+
+def diagnostico_recursos_completo_http(req: func.HttpRequest) -> func.HttpResponse:
+    from memory_manual import aplicar_memoria_manual
+    from cosmos_memory_direct import consultar_memoria_cosmos_directo, aplicar_memoria_cosmos_directo
+    from services.memory_service import memory_service
+
+    # 🧠 CONSULTAR MEMORIA COSMOS DB DIRECTAMENTE
+    memoria_previa = consultar_memoria_cosmos_directo(req)
+    if memoria_previa and memoria_previa.get("tiene_historial"):
+        logging.info(
+            f"🧠 Modificar-archivo: {memoria_previa['total_interacciones']} interacciones encontradas")
+        logging.info(
+            f"📝 Historial: {memoria_previa.get('resumen_conversacion', '')[:100]}...")
+    advertencias = []
+    # 🧩 Sobrescribir configuración desde headers si vienen en la redirección
+    os.environ["WEBSITE_SITE_NAME"] = req.headers.get(
+        "X-App-Name", os.environ.get("WEBSITE_SITE_NAME", ""))
+    # CORRECCIÓN: Usar siempre el resource group correcto
+    os.environ["RESOURCE_GROUP"] = "boat-rental-app-group"
+    os.environ["AZURE_SUBSCRIPTION_ID"] = req.headers.get(
+        "X-Subscription-Id", os.environ.get("AZURE_SUBSCRIPTION_ID", ""))
+
+    """
+    Diagnóstico completo de recursos Azure usando SDK en lugar de CLI
+    """
+    try:
+        if req.method == "GET":
+            # GET: parámetros opcionales de query string
+            incluir_metricas = req.params.get(
+                "metricas", "true").lower() == "true"
+            incluir_costos = req.params.get(
+                "costos", "false").lower() == "true"
+            recurso_especifico = req.params.get("recurso", "")
+
+            if not incluir_metricas:
+                logging.warning(
+                    "⚠️ Foundry request llegó sin metricas=true — activando por defecto.")
+                incluir_metricas = True
+
+            # Si no hay recurso específico en GET, hacer diagnóstico general
+            if not recurso_especifico:
+                # Diagnóstico general sin necesidad de credenciales específicas
+                diagnostico = {
+                    "timestamp": datetime.now().isoformat(),
+                    "ambiente": "Azure" if IS_AZURE else "Local",
+                    "recursos": {},
+                    "metricas": {},
+                    "alertas": [],
+                    "recomendaciones": [],
+                    "modo": "general"
+                }
+
+                # Usar el diagnóstico con SDK
+                resultado_sdk = diagnosticar_function_app_con_sdk()
+                diagnostico.update(resultado_sdk)
+
+                # Agregar estadísticas de storage sin credenciales ARM
+                try:
+                    client = get_blob_client()
+                    if client:
+                        contenedores = list(client.list_containers())
+                        total_blobs = 0
+                        for container in contenedores:
+                            if container.name:
+                                container_client = client.get_container_client(
+                                    container.name)
+                                total_blobs += sum(
+                                    1 for _ in container_client.list_blobs())
+
+                        diagnostico["recursos"]["storage_stats"] = {
+                            "contenedores": len(contenedores),
+                            "total_blobs": total_blobs,
+                            "contenedor_principal": CONTAINER_NAME
+                        }
+                except Exception as e:
+                    diagnostico["recursos"]["storage_stats"] = {
+                        "error": str(e)}
+
+                # Sistema info
+                diagnostico["sistema"] = {
+                    "cache_archivos": len(CACHE),
+                    "memoria_cache_kb": round(sum(len(str(v)) for v in CACHE.values()) / 1024, 2) if CACHE else 0,
+                    "endpoints_activos": [
+                        "/api/crear-contenedor",
+                        "/api/ejecutar-cli",
+                        "/api/diagnostico-recursos"
+                    ],
+                    "sdk_habilitado": mgmt_sdk_available(),
+                    "cli_habilitado": False
+                }
+
+                # CONSTRUIR MENSAJE ENRIQUECIDO CON CONTEXTO SEMÁNTICO PARA DIAGNÓSTICO GENERAL
+                ambiente = diagnostico.get("ambiente", "Desconocido")
+                cache_archivos = diagnostico["sistema"]["cache_archivos"]
+                memoria_cache = diagnostico["sistema"]["memoria_cache_kb"]
+                storage_contenedores = diagnostico["recursos"].get(
+                    "storage_stats", {}).get("contenedores", 0)
+                storage_blobs = diagnostico["recursos"].get(
+                    "storage_stats", {}).get("total_blobs", 0)
+                alertas_count = len(diagnostico.get("alertas", []))
+                recomendaciones_count = len(
+                    diagnostico.get("recomendaciones", []))
+
+                mensaje_enriquecido = f"""DIAGNOSTICO DE RECURSOS COMPLETADO
+
+RESULTADO: Diagnostico general del sistema completado exitosamente.
+
+AMBIENTE: {ambiente}
+CACHE: {cache_archivos} archivos ({memoria_cache} KB)
+STORAGE: {storage_contenedores} contenedores, {storage_blobs} blobs totales
+ALERTAS: {alertas_count} detectadas
+RECOMENDACIONES: {recomendaciones_count} sugeridas
+
+CONTEXTO SEMANTICO: Sistema operativo en {ambiente}. Cache activo con {cache_archivos} archivos. Storage conectado con {storage_blobs} archivos distribuidos en {storage_contenedores} contenedores. {'Hay alertas criticas que requieren atencion.' if alertas_count > 0 else 'Sistema funcionando normalmente.'}"""
+
+                diagnostico["mensaje"] = mensaje_enriquecido
+                # ✅ ← Necesario para Foundry y tests
+                diagnostico["exito"] = True
+
+                # Aplicar memoria Cosmos y memoria manual
+                diagnostico = aplicar_memoria_cosmos_directo(req, diagnostico)
+                diagnostico = aplicar_memoria_manual(req, diagnostico)
+
+                # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
+                # Registrar llamada en memoria después de construir la respuesta final
+                logging.info(
+                    f"💾 Registering call for diagnostico_recursos_completo: success={diagnostico.get('exito', False)}, endpoint=/api/diagnostico-recursos-completo")
+                memory_service.registrar_llamada(
+                    source="diagnostico_recursos_completo",
+                    endpoint="/api/diagnostico-recursos-completo",
+                    method=req.method,
+                    params={"session_id": req.headers.get(
+                        "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
+                    response_data=diagnostico,
+                    success=diagnostico.get("exito", False)
+                )
+
+                return func.HttpResponse(
+                    json.dumps(diagnostico, indent=2, ensure_ascii=False),
+                    mimetype="application/json",
+                    status_code=200
+                )
+            else:
+                # GET con recurso específico → tratar como POST
+                pass
+
+        # POST o GET con recurso específico
+        body = _json_body(req) if req.method == "POST" else {}
+        rid = _s(body.get("recurso")) or _s(req.params.get("recurso", ""))
+
+        if not rid:
+            res = {"ok": False, "error": "Falta 'recurso'", "next_steps": [
+                "Proporciona 'recurso' en el body (POST) o query string (GET)"]}
+            # Aplicar memoria Cosmos y memoria manual
+            res = aplicar_memoria_cosmos_directo(req, res)
+            res = aplicar_memoria_manual(req, res)
+
+            # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
+            # Registrar llamada en memoria después de construir la respuesta final
+            logging.info(
+                f"💾 Registering call for diagnostico_recursos_completo: success={res.get('ok', False)}, endpoint=/api/diagnostico-recursos-completo")
+            memory_service.registrar_llamada(
+                source="diagnostico_recursos_completo",
+                endpoint="/api/diagnostico-recursos-completo",
+                method=req.method,
+                params={"session_id": req.headers.get(
+                    "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
+                response_data=res,
+                success=res.get("ok", False)
+            )
+            return _error("BadRequest", 400, "Falta 'recurso'",
+                          next_steps=["Proporciona 'recurso' en el body (POST) o query string (GET)"])
+
+        if not _try_default_credential():
+            res = {"ok": False, "error": "No se pudieron obtener credenciales para ARM",
+                   "next_steps": ["Configura identidad administrada o variables de servicio."]}
+            # Aplicar memoria Cosmos y memoria manual
+            res = aplicar_memoria_cosmos_directo(req, res)
+            res = aplicar_memoria_manual(req, res)
+
+            # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
+            # Registrar llamada en memoria después de construir la respuesta final
+            logging.info(
+                f"💾 Registering call for diagnostico_recursos_completo: success={res.get('ok', False)}, endpoint=/api/diagnostico-recursos-completo")
+            memory_service.registrar_llamada(
+                source="diagnostico_recursos_completo",
+                endpoint="/api/diagnostico-recursos-completo",
+                method=req.method,
+                params={"session_id": req.headers.get(
+                    "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
+                response_data=res,
+                success=res.get("ok", False)
+            )
+            return _error("AZURE_AUTH_MISSING", 401, "No se pudieron obtener credenciales para ARM",
+                          next_steps=["Configura identidad administrada o variables de servicio."])
+
+        try:
+            # Lógica de diagnóstico completo para recurso específico
+            diagnostico = {
+                "timestamp": datetime.now().isoformat(),
+                "recurso": rid,
+                "modo": "especifico",
+                "detalle": {},
+                "metricas": {},
+                "recomendaciones": []
+            }
+
+            # Intentar obtener información del recurso usando ARM
+            if mgmt_sdk_available():
+                try:
+                    # Extraer subscription_id del resource_id
+                    parts = rid.split('/')
+                    if len(parts) >= 3:
+                        subscription_id = parts[2]
+
+                        # Determinar tipo de recurso y obtener información específica
+                        if "/Microsoft.Web/sites/" in rid:
+                            # Es una Function App o Web App
+                            resource_group = parts[4] if len(
+                                parts) >= 5 else ""
+                            app_name = parts[8] if len(parts) >= 9 else ""
+
+                            if resource_group and app_name:
+                                diagnostico["detalle"] = obtener_estado_function_app(
+                                    app_name, resource_group, subscription_id)
+
+                                if body.get("incluir_metricas", True):
+                                    diagnostico["metricas"] = obtener_metricas_function_app(
+                                        app_name, resource_group, subscription_id)
+
+                        elif "/Microsoft.Storage/storageAccounts/" in rid:
+                            # Es un Storage Account
+                            resource_group = parts[4] if len(
+                                parts) >= 5 else ""
+                            account_name = parts[8] if len(parts) >= 9 else ""
+
+                            if resource_group and account_name:
+                                diagnostico["detalle"] = obtener_info_storage_account(
+                                    account_name, resource_group, subscription_id)
+
+                        else:
+                            diagnostico["detalle"] = {
+                                "tipo": "recurso_generico",
+                                "resource_id": rid,
+                                "mensaje": "Tipo de recurso no específicamente soportado"
+                            }
+
+                except Exception as e:
+                    diagnostico["detalle"] = {
+                        "error": f"Error específico del recurso: {str(e)}",
+                        "resource_id": rid
+                    }
+            else:
+                diagnostico["detalle"] = {
+                    "error": "SDK de administración no disponible",
+                    "resource_id": rid
+                }
+
+            # Generar recomendaciones basadas en el diagnóstico
+            if diagnostico["detalle"].get("estado") == "Error":
+                diagnostico["recomendaciones"].append({
+                    "nivel": "critico",
+                    "mensaje": "Recurso en estado de error",
+                    "accion": "Revisar configuración y logs del recurso"
+                })
+
+            # CONSTRUIR MENSAJE ENRIQUECIDO CON CONTEXTO SEMÁNTICO PARA RECURSO ESPECÍFICO
+            recurso = diagnostico.get("recurso", "Desconocido")
+            estado_detalle = diagnostico["detalle"].get(
+                "estado", "Desconocido")
+            tipo_recurso = diagnostico["detalle"].get("tipo", "Desconocido")
+            metricas_count = len(diagnostico.get("metricas", {}))
+            recomendaciones_count = len(diagnostico.get("recomendaciones", []))
+
+            mensaje_enriquecido = f"""DIAGNOSTICO DE RECURSO COMPLETADO
+
+RESULTADO: Diagnostico especifico del recurso '{recurso}' completado.
+
+TIPO: {tipo_recurso}
+ESTADO: {estado_detalle}
+METRICAS: {metricas_count} metricas analizadas
+RECOMENDACIONES: {recomendaciones_count} sugeridas
+
+CONTEXTO SEMANTICO: Recurso '{recurso}' de tipo {tipo_recurso} se encuentra en estado {estado_detalle}. {'Se detectaron metricas de rendimiento disponibles.' if metricas_count > 0 else 'No se obtuvieron metricas especificas.'} {'Hay recomendaciones importantes para revisar.' if recomendaciones_count > 0 else 'El recurso parece estar funcionando correctamente.'}"""
+
+            diagnostico["mensaje"] = mensaje_enriquecido
+            diagnostico["exito"] = True
+
+            result = {"ok": True, **diagnostico}
+            # Aplicar memoria Cosmos y memoria manual
+            result = aplicar_memoria_cosmos_directo(req, result)
+            result = aplicar_memoria_manual(req, result)
+
+            # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
+            # Registrar llamada en memoria después de construir la respuesta final
+            logging.info(
+                f"💾 Registering call for diagnostico_recursos_completo: success={result.get('ok', False)}, endpoint=/api/diagnostico-recursos-completo")
+            memory_service.registrar_llamada(
+                source="diagnostico_recursos_completo",
+                endpoint="/api/diagnostico-recursos-completo",
+                method=req.method,
+                params={"session_id": req.headers.get(
+                    "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
+                response_data=result,
+                success=result.get("ok", False)
+            )
+            return _json(result)
+
+        except PermissionError as e:
+            res = {
+                "ok": False,
+                "error": str(e),
+                "next_steps": ["Verifica permisos de la identidad en el recurso especificado."],
+                "timestamp": datetime.now().isoformat(),
+                "recursos": {},
+                "metricas": {},
+                "modo": "permission_error"
+            }
+            # Aplicar memoria Cosmos y memoria manual
+            res = aplicar_memoria_cosmos_directo(req, res)
+            res = aplicar_memoria_manual(req, res)
+
+            # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
+            # Registrar llamada en memoria después de construir la respuesta final
+            logging.info(
+                f"💾 Registering call for diagnostico_recursos_completo: success={res.get('ok', False)}, endpoint=/api/diagnostico-recursos-completo")
+            memory_service.registrar_llamada(
+                source="diagnostico_recursos_completo",
+                endpoint="/api/diagnostico-recursos-completo",
+                method=req.method,
+                params={"session_id": req.headers.get(
+                    "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
+                response_data=res,
+                success=res.get("ok", False)
+            )
+            return _error("AZURE_AUTH_FORBIDDEN", 403, str(e),
+                          next_steps=["Verifica permisos de la identidad en el recurso especificado."])
+        except Exception as e:
+            res = {
+                "ok": False,
+                "error": str(e),
+                "timestamp": datetime.now().isoformat(),
+                "recursos": {},
+                "metricas": {},
+                "modo": "inner_exception"
+            }
+            # Aplicar memoria Cosmos y memoria manual
+            res = aplicar_memoria_cosmos_directo(req, res)
+            res = aplicar_memoria_manual(req, res)
+
+            # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
+            # Registrar llamada en memoria después de construir la respuesta final
+            logging.info(
+                f"💾 Registering call for diagnostico_recursos_completo: success={res.get('ok', False)}, endpoint=/api/diagnostico-recursos-completo")
+            memory_service.registrar_llamada(
+                source="diagnostico_recursos_completo",
+                endpoint="/api/diagnostico-recursos-completo",
+                method=req.method,
+                params={"session_id": req.headers.get(
+                    "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
+                response_data=res,
+                success=res.get("ok", False)
+            )
+            return _error("DiagFullError", 500, str(e))
+
+    except Exception as e:
+        logging.exception("diagnostico_recursos_completo_http failed")
+        # CORRECCIÓN: Asegurar que res tenga todas las claves necesarias
+        res = {
+            "ok": False,
+            "error": str(e),
+            "timestamp": datetime.now().isoformat(),
+            "ambiente": "Azure" if IS_AZURE else "Local",
+            "recursos": {},
+            "metricas": {},
+            "alertas": [],
+            "recomendaciones": [],
+            "sistema": {
+                "cache_archivos": len(CACHE) if 'CACHE' in globals() else 0,
+                "memoria_cache_kb": 0,
+                "endpoints_activos": [],
+                "sdk_habilitado": False,
+                "cli_habilitado": False
+            },
+            "modo": "error_fallback",
+            "mensaje": f"Error en diagnostico: {str(e)}"
+        }
+        # Aplicar memoria Cosmos y memoria manual
+        res = aplicar_memoria_cosmos_directo(req, res)
+        res = aplicar_memoria_manual(req, res)
+
+        # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
+        # Registrar llamada en memoria después de construir la respuesta final
+        logging.info(
+            f"💾 Registering call for diagnostico_recursos_completo: success={res.get('ok', False)}, endpoint=/api/diagnostico-recursos-completo")
+        memory_service.registrar_llamada(
+            source="diagnostico_recursos_completo",
+            endpoint="/api/diagnostico-recursos-completo",
+            method=req.method,
+            params={"session_id": req.headers.get(
+                "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
+            response_data=res,
+            success=res.get("ok", False)
+
+        )
+
+        return _error("UnexpectedError", 500, str(e))
+
+
+def bateria_endpoints_http(req: func.HttpRequest) -> func.HttpResponse:
+    from memory_manual import aplicar_memoria_manual
+    from cosmos_memory_direct import consultar_memoria_cosmos_directo, aplicar_memoria_cosmos_directo
+    from services.memory_service import memory_service
+
+    # 🧠 CONSULTAR MEMORIA COSMOS DB DIRECTAMENTE
+    memoria_previa = consultar_memoria_cosmos_directo(req)
+    if memoria_previa and memoria_previa.get("tiene_historial"):
+        logging.info(
+            f"🧠 Modificar-archivo: {memoria_previa['total_interacciones']} interacciones encontradas")
+        logging.info(
+            f"📝 Historial: {memoria_previa.get('resumen_conversacion', '')[:100]}...")
+    advertencias = []
+
+    endpoint, method = "/api/bateria-endpoints", req.method
+    try:
+        # ✅ ROBUSTO: Acepta cualquier body o sin body, GET o POST
+        request_body = {}
+        if method == "POST":
+            try:
+                if req.get_body():
+                    request_body = req.get_json() or {}
+            except:
+                # Si hay error parseando JSON, continúa con body vacío
+                request_body = {}
+        # GET no necesita body, ya está inicializado como {}
+
+        # Base para invocación HTTP contra SÍ MISMA (sin hardcodear dominio)
+        if IS_AZURE:
+            base_url = f"https://{os.environ.get('WEBSITE_HOSTNAME')}"
+        else:
+            base_url = "http://localhost:7071"
+
+        def call(ep, m="GET", params=None, body=None, timeout=60):
+            # Forzar HTTP para localhost
+            if "localhost" in base_url:
+                url = urljoin("http://localhost:7071", ep)
+            else:
+                url = urljoin(base_url, ep)
+            if m == "GET":
+                r = requests.get(url, params=params or {}, timeout=timeout)
+            else:
+                r = requests.post(url, params=params or {},
+                                  json=body or {}, timeout=timeout)
+            # intenta parsear json
+            data = None
+            try:
+                data = r.json()
+            except Exception:
+                data = {"raw": r.text[:2000]}
+            return {"endpoint": ep, "method": m, "status_code": r.status_code, "ok": (r.status_code == 200), "data": data}
+
+        # --- Definición compacta de tu batería ---
+        tests = [
+            {"ep": "/api/info-archivo",      "m": "GET",
+             "params": {"ruta": "README.md"}},
+            {"ep": "/api/leer-archivo",      "m": "GET",
+                "params": {"ruta": "README.md"}},
+            {"ep": "/api/escribir-archivo",  "m": "POST",
+                "body":  {"ruta": "verificacion/hello.txt", "contenido": "hola mundo"}},
+            {"ep": "/api/modificar-archivo", "m": "POST", "body":  {"ruta": "verificacion/hello.txt",
+                                                                    "operacion": "agregar_final", "contenido": "\\nlínea nueva"}},
+            {"ep": "/api/copiar-archivo",    "m": "POST", "body":  {"origen": "verificacion/hello.txt",
+                                                                    "destino": "verificacion/hello.v2.txt", "overwrite": False}},
+            {"ep": "/api/ejecutar-script",   "m": "POST",
+                "body":  {"script": "scripts/setup.sh"}, "label": "bash setup.sh"},
+            {"ep": "/api/ejecutar-script",   "m": "POST", "body":  {"script": "scripts/lines.py",
+                                                                    "args": ["README.md"]}, "label": "python lines.py"},
+        ]
+        # ------------------------------------------
+
+        results = [call(t["ep"], t.get("m", "GET"), t.get(
+            "params"), t.get("body")) for t in tests]
+        ok_count = sum(1 for r in results if r["ok"])
+        summary = {"total": len(results), "ok": ok_count,
+                   "fail": len(results)-ok_count}
+
+        # extraer runId/exit_code si vienen en el payload de ejecutar-script
+        for r in results:
+            d = r.get("data", {})
+            if isinstance(d, dict):
+                det = d.get("details") or {}
+                r["runId"] = det.get("runId")
+                r["exit_code"] = det.get("exit_code")
+                r["stdout_preview"] = (det.get("stdout_preview") or "")[:200]
+
+        payload = {"summary": summary, "results": results}
+        ok = api_ok(endpoint, method, 200, "Batería ejecutada", payload)
+        ok = aplicar_memoria_manual(req, ok)
+        # Aplicar memoria Cosmos y memoria manual
+        ok = aplicar_memoria_cosmos_directo(req, ok)
+
+        # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
+        # Registrar llamada en memoria después de construir la respuesta final
+        logging.info(
+            f"💾 Registering call for bateria_endpoints: success={ok.get('ok', False)}, endpoint=/api/bateria-endpoints")
+        memory_service.registrar_llamada(
+            source="bateria_endpoints",
+            endpoint="/api/bateria-endpoints",
+            method=req.method,
+            params={"session_id": req.headers.get(
+                "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
+            response_data=ok,
+            success=ok.get("ok", False)
+        )
+
+        return func.HttpResponse(json.dumps(ok, ensure_ascii=False), mimetype="application/json", status_code=200)
+
+    except Exception as e:
+        err = api_err(endpoint, method, 500, "BatteryError", str(e))
+        err = aplicar_memoria_manual(req, err)
+        # Aplicar memoria Cosmos y memoria manual
+        err = aplicar_memoria_cosmos_directo(req, err)
+
+        # REGISTRAR LLAMADA PARA TEXTO SEMANTICO
+        # Registrar llamada en memoria después de construir la respuesta final
+        logging.info(
+            f"💾 Registering call for bateria_endpoints: success={err.get('ok', False)}, endpoint=/api/bateria-endpoints")
+        memory_service.registrar_llamada(
+            source="bateria_endpoints",
+            endpoint="/api/bateria-endpoints",
+            method=req.method,
+            params={"session_id": req.headers.get(
+                "Session-ID"), "agent_id": req.headers.get("Agent-ID")},
+            response_data=err,
+            success=err.get("ok", False)
+        )
+
+        return func.HttpResponse(json.dumps(err, ensure_ascii=False), mimetype="application/json", status_code=500)
+
+
+def diagnostico_configurar_http(req: func.HttpRequest) -> func.HttpResponse:
+    from memory_manual import aplicar_memoria_manual
+    body = _json_body(req)
+    rid = _s(body.get("resourceId"))
+    ws = _s(body.get("workspaceId"))
+    setting = _s(body.get("settingName") or "fa-logs")
+    logs = body.get("logs") or []
+    metrics = body.get("metrics") or []
+
+    if not rid or not ws:
+        return _error("BadRequest", 400, "Parámetros faltantes: resourceId, workspaceId")
+
+    # auth
+    if not _try_default_credential():
+        return _error("AZURE_AUTH_MISSING", 401, "No se pudieron obtener credenciales para ARM",
+                      next_steps=["Configura identidad administrada o variables de servicio."])
+
+    try:
+        result = configurar_diagnosticos_azure(
+            rid, ws, setting_name=setting, logs=logs, metrics=metrics)
+        if result.get("ok"):
+            return _json({"ok": True, "resourceId": rid, "settingName": setting, "result": result})
+        else:
+            code = result.get("status", 500) if isinstance(
+                result, dict) else 500
+            return _error("DiagConfigFailed", code, str(result.get("error", result)))
+    except PermissionError as e:
+        return _error("AZURE_AUTH_FORBIDDEN", 403, str(e))
+    except Exception as e:
+        return _error("DiagConfigError", 500, str(e))
+
+
+def _get_monitor_client_from_rid(resource_id: str):  # type: ignore
+    try:
+        cred = _get_arm_credential()
+        if not resource_id or len(resource_id.split('/')) < 3:
+            return None
+        sub = resource_id.split('/')[2]
+        return get_monitor_client()(cred, sub)  # type: ignore
+    except Exception:
+        return None
+
+
+def diagnostico_listar_http(req: func.HttpRequest) -> func.HttpResponse:
+    from memory_manual import aplicar_memoria_manual  # type: ignore
+    rid = req.params.get("resourceId", "")
+    if not rid:
+        return func.HttpResponse(json.dumps({"ok": False, "error": "resourceId requerido"}), mimetype="application/json", status_code=400)
+    try:
+        client = _get_monitor_client_from_rid(rid)
+        items = []  # type: ignore
+        return func.HttpResponse(json.dumps({"ok": True, "settings": items}, ensure_ascii=False), mimetype="application/json")
+    except Exception as e:
+        return func.HttpResponse(json.dumps({"ok": False, "error": str(e)}), mimetype="application/json", status_code=500)
+
+
+# type: ignore
+def diagnostico_eliminar_http(req: func.HttpRequest) -> func.HttpResponse:
+    body = req.get_json() if req.method == "POST" else {}
+    rid = (body or {}).get("resourceId") or req.params.get("resourceId", "")
+    name = (body or {}).get("settingName") or req.params.get("settingName", "")
+    if not rid or not name:
+        return func.HttpResponse(json.dumps({"ok": False, "error": "resourceId y settingName requeridos"}), mimetype="application/json", status_code=400)
+    try:
+        return func.HttpResponse(json.dumps({"ok": True, "deleted": name, "resourceId": rid}), mimetype="application/json")
+    except Exception as e:
+        return func.HttpResponse(json.dumps({"ok": False, "error": str(e)}), mimetype="application/json", status_code=500)
+
+
+def verificar_estado_sistema(req: func.HttpRequest) -> func.HttpResponse:
+    from memory_manual import aplicar_memoria_manual
+    """Autodiagnóstico completo del sistema"""
+    try:
+        import psutil
+        from services.memory_service import memory_service
+
+        estado = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "sistema": platform.system(),
+            "cpu_percent": psutil.cpu_percent(interval=1),
+            "memoria": psutil.virtual_memory()._asdict(),
+            "disco": psutil.disk_usage("/" if platform.system() != "Windows" else "C:\\")._asdict(),
+            "python_version": platform.python_version(),
+            "app_service_plan": os.environ.get("WEBSITE_SKU", "Unknown"),
+            "app_insights": bool(os.environ.get("APPINSIGHTS_INSTRUMENTATIONKEY")),
+            "cosmos_endpoint": os.environ.get("COSMOSDB_ENDPOINT", "no_definido"),
+            "storage_connected": bool(get_blob_client()),
+            "cache_size": len(CACHE),
+            "ambiente": "Azure" if IS_AZURE else "Local"
+        }
+
+        # 👉 Registrar evento de monitoreo solo si no hubo error
+        memory_service.log_semantic_event({
+            "tipo": "monitoring_event",
+            "texto_semantico": "Monitoreo verificar-sistema OK - Sistema funcionando correctamente"
+        })
+
+        return func.HttpResponse(
+            json.dumps(estado, indent=2),
+            mimetype="application/json",
+            status_code=200
+        )
+
+    except Exception as e:
+        return func.HttpResponse(
+            json.dumps({
+                "error": str(e),
+                "tipo_error": type(e).__name__,
+                "timestamp": datetime.utcnow().isoformat()
+            }),
+            mimetype="application/json",
+            status_code=500
+        )
+
+
+def verificar_app_insights(req: func.HttpRequest) -> func.HttpResponse:
+    from memory_manual import aplicar_memoria_manual
+    """Verifica telemetría de Application Insights sin depender de az CLI"""
+    app_name = os.environ.get(
+        "WEBSITE_SITE_NAME", "copiloto-semantico-func-us2")
+    workspace_id = os.environ.get("APPINSIGHTS_WORKSPACE_ID")
+
+    if not workspace_id:
+        memory_service.log_semantic_event({
+            "tipo": "monitoring_event",
+            "texto_semantico": "Monitoreo verificar-app-insights ERROR - APPINSIGHTS_WORKSPACE_ID no configurado"
+        })
+        return func.HttpResponse(
+            json.dumps({
+                "exito": False,
+                "error": "APPINSIGHTS_WORKSPACE_ID no configurado en las variables de entorno",
+                "app_name": app_name
+            }),
+            mimetype="application/json",
+            status_code=400
+        )
+
+    try:
+        client = get_logs_query_client()
+        query = "Usage | take 5"
+        response = client.query_workspace(
+            workspace_id=workspace_id,
+            query=query,
+            timespan=timedelta(hours=1)
+        )
+
+        eventos_count = 0
+        has_data = False
+        metodo_parseo = "ninguno"
+        parse_error_msg = None
+
+        # Intentar parsear la respuesta con ambos métodos
+        try:
+            # Método 1: primary_table (recomendado por el SDK)
+            primary_table = getattr(response, "primary_table", None)
+            if primary_table is not None:
+                rows = getattr(primary_table, 'rows', None)
+                if rows:
+                    eventos_count = len(rows)
+                    has_data = True
+                    metodo_parseo = "primary_table"
+
+            # Método 2: tables (fallback para compatibilidad)
+            if not has_data:
+                tables = getattr(response, 'tables', None)
+                if tables:
+                    for table in tables:
+                        rows = getattr(table, 'rows', None)
+                        if rows:
+                            eventos_count += len(rows)
+                    has_data = eventos_count > 0
+                    metodo_parseo = "tables_iteration" if has_data else "tables_vacias"
+                else:
+                    metodo_parseo = "sin_atributos_reconocidos"
+
+        except Exception as parse_error:
+            parse_error_msg = f"{type(parse_error).__name__}: {str(parse_error)}"
+            eventos_count = -1  # Indica error en parsing
+            has_data = False
+            metodo_parseo = "error_parsing"
+            memory_service.log_semantic_event({
+                "tipo": "monitoring_event",
+                "texto_semantico": f"Monitoreo verificar-app-insights PARSE_ERROR - {parse_error_msg}"
+            })
+
+        memory_service.log_semantic_event({
+            "tipo": "monitoring_event",
+            "texto_semantico": f"Monitoreo verificar-app-insights OK - {eventos_count} eventos usando {metodo_parseo}"
+        })
+        return func.HttpResponse(
+            json.dumps({
+                "exito": True,
+                "app_name": app_name,
+                "workspace_id": workspace_id,
+                "telemetria_activa": has_data,
+                "eventos_count": eventos_count,
+                "metodo_conexion": "sdk_managed_identity",
+                "metodo_parseo": metodo_parseo,
+                "parse_error": parse_error_msg,
+                "response_type": type(response).__name__,
+                "mensaje": (
+                    "SDK conectado exitosamente pero sin datos en última hora"
+                    if not has_data and eventos_count == 0
+                    else f"Encontrados {eventos_count} eventos usando {metodo_parseo}"
+                    if has_data
+                    else "Error procesando respuesta"
+                )
+            }),
+            mimetype="application/json",
+            status_code=200
+        )
+
+    except Exception as e:
+        memory_service.log_semantic_event({
+            "tipo": "monitoring_event",
+            "texto_semantico": f"Monitoreo verificar-app-insights ERROR - {type(e).__name__}: {str(e)}"
+        })
+        return func.HttpResponse(
+            json.dumps({
+                "exito": False,
+                "error": str(e),
+                "tipo_error": type(e).__name__,
+                "app_name": app_name,
+                "workspace_id": workspace_id or "no_configurado",
+                "metodo": "sdk_managed_identity_error"
+            }),
+            mimetype="application/json",
+            status_code=500
+        )
+
+
+def verificar_cosmos(req: func.HttpRequest) -> func.HttpResponse:
+    """Verifica conectividad y escrituras en CosmosDB usando clave o MI"""
+    endpoint = os.environ.get("COSMOSDB_ENDPOINT")
+    key = os.environ.get("COSMOSDB_KEY")
+    database = os.environ.get("COSMOSDB_DATABASE", "copiloto-db")
+    container_name = os.environ.get("COSMOSDB_CONTAINER", "memory")
+
+    if not endpoint:
+        return func.HttpResponse(
+            json.dumps({
+                "exito": False,
+                "error": "Endpoint de CosmosDB no configurado",
+                "configuracion": {"endpoint": False}
+            }),
+            mimetype="application/json",
+            status_code=200
+        )
+
+    try:
+        auth_method = "MI"
+        client = None
+        db = None
+        container = None
+
+        if key:
+            try:
+                client = CosmosClient(endpoint, key)
+                auth_method = "clave"
+                db = client.get_database_client(database)
+                container = db.get_container_client(container_name)
+                # Test query más simple y segura
+                test_items = list(container.query_items(
+                    "SELECT VALUE COUNT(1) FROM c",
+                    enable_cross_partition_query=True,
+                    max_item_count=1
+                ))
+            except Exception:
+                client = None
+
+        if not client:
+            credential = DefaultAzureCredential()
+            client = CosmosClient(endpoint, credential)
+            auth_method = "MI"
+            db = client.get_database_client(database)
+            container = db.get_container_client(container_name)
+
+        if container:
+            # Query más eficiente y con límites apropiados
+            items = list(container.query_items(
+                "SELECT c.id, c._ts, c.session_id FROM c ORDER BY c._ts DESC OFFSET 0 LIMIT 5",
+                enable_cross_partition_query=True,
+                max_item_count=5
+            ))
+        else:
+            items = []
+
+        return func.HttpResponse(
+            json.dumps({
+                "exito": True,
+                "cosmos_conectado": True,
+                "auth_method": auth_method,
+                "registros_encontrados": len(items),
+                "ultimo_registro": items[0] if items else None,
+                "estado": "funcionando" if items else "sin_escrituras",
+                "database": database,
+                "container": container_name
+            }, indent=2, default=str),
+            mimetype="application/json",
+            status_code=200
+        )
+
+    except Exception as e:
+        return func.HttpResponse(
+            json.dumps({
+                "exito": False,
+                "cosmos_conectado": False,
+                "error": str(e),
+                "tipo_error": type(e).__name__,
+                "sugerencia": "Verificar credenciales y configuración de CosmosDB"
+            }),
+            mimetype="application/json",
+            status_code=200
+        )
@@ -0,0 +1,1410 @@
+"""
+Rutas: memoria
+historial de interacciones, consulta y precalentamiento de memoria,
+conocimiento cognitivo, contexto del agente, interpretación de intención
+y búsqueda/indexado en memoria semántica.
+
+Se importa en la primera llamada a una de sus rutas (ver route_manifest.json
+y lazy_routes); los helpers compartidos siguen en function_app.
+"""
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+import azure.functions as func
+
+from services.redis_buffer_service import redis_buffer
+from utils_helpers import (
+    build_event,
+    build_structured_payload,
+    format_timestamp_humano,
+    humanizar_endpoint,
+    preview_text,
+)
+
+from function_app import (
+    _construir_resumen_narrativo,
+    ejecutar_bing_grounding_fallback,
+    generar_narrativa_contextual,
+)
+
+
+def historial_interacciones(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    ⚠️ IMPORTANTE: Este endpoint NO se guarda a sí mismo en memoria
+    para evitar bucle infinito de recursividad.
+
+    Es el primer endpoint que usa el agente para obtener contexto.
+    Si se guardara, crearía interacciones que contienen otras interacciones infinitamente.
+
+    🧠 QUERIES DINÁMICAS: Detecta parámetros adicionales del agente y construye queries inteligentes.
+    """
+
+    from memory_manual import aplicar_memoria_manual
+    from cosmos_memory_direct import consultar_memoria_cosmos_directo, aplicar_memoria_cosmos_directo
+    from services.memory_service import memory_service
+    from semantic_query_builder import interpretar_intencion_agente, construir_query_dinamica, ejecutar_query_cosmos
+
+    # Helper para previews en logs (evitar truncado excesivo)
+    def _preview(text, n=1000):
+        return preview_text(text, n)
+
+    # === 🔍 CONSTRUCCIÓN DE QUERY UNIVERSAL (COMBINA TIPO + QUERY + MENSAJE) ===
+    session_id = req.headers.get("Session-ID") or req.params.get("session_id")
+    agent_id_header = req.headers.get("Agent-ID") or req.params.get("agent_id")
+    thread_id = req.headers.get(
+        "Thread-ID") or req.headers.get("X-Thread-ID") or req.params.get("thread_id")
+
+    try:
+        body = req.get_json() or {}
+    except ValueError:
+        body = dict(req.params)
+
+    # Actualizar session/agent si vinieron en el body
+    if not session_id:
+        session_id = body.get("session_id") or req.params.get("session_id")
+    agente_from_body = body.get("agent_id") or req.params.get("agent_id")
+    agent_id = agent_id_header or agente_from_body or "unknown_agent"
+
+    # 🧠 INTERPRETAR INTENCIÓN PRIMERO
+    query_texto = body.get("query") or body.get(
+        "mensaje") or body.get("tipo") or req.params.get("q") or ""
+    intencion_params = interpretar_intencion_agente(
+        query_texto, dict(req.headers))
+
+    # 🔥 FUSIONAR CON PARÁMETROS EXPLÍCITOS (overrides)
+    params_completos = {**intencion_params}
+    for key in ["tipo", "contiene", "endpoint", "exito", "fecha_inicio", "fecha_fin", "orden", "limite"]:
+        if body.get(key) is not None:
+            params_completos[key] = body.get(key)
+        elif req.params.get(key) is not None:
+            params_completos[key] = req.params.get(key)
+
+    params_completos["session_id"] = session_id or "unknown"
+    params_completos["agent_id"] = agent_id or "unknown_agent"
+    params_completos["intencion_detectada"] = query_texto
+    hist_limit = int(params_completos.get("limite") or req.params.get(
+        "limite") or body.get("limite") or 10)
+
+    logging.info(f"🧠 HISTORIAL: Parámetros interpretados: {params_completos}")
+
+    query_universal = query_texto or "últimas interacciones recientes"
+    logging.info(f"🔍 HISTORIAL: Query vectorial: '{query_universal}'")
+
+    def _inyectar_narrativa(payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Inserta la narrativa enriquecida (threads + Cosmos + AI Search) en la respuesta.
+        """
+        narrativa_ctx = None
+        try:
+            def _compute_narrativa():
+                return generar_narrativa_contextual(
+                    session_id=session_id,
+                    thread_id=thread_id,
+                    query=query_universal or query_texto or "",
+                    use_cache=False
+                )
+
+            narrativa_ctx, cache_hit, cache_latency = redis_buffer.get_or_compute_narrativa(
+                session_id=session_id,
+                thread_id=thread_id,
+                compute_fn=_compute_narrativa
+            )
+            logging.debug(
+                f"[Narrativa] cache_hit={cache_hit} latency={cache_latency:.2f}ms para sesión={session_id} thread={thread_id}")
+        except Exception as narrativa_err:
+            logging.warning(
+                f"⚠️ No se pudo generar narrativa contextual para historial: {narrativa_err}")
+            narrativa_ctx = None
+
+        if narrativa_ctx and (narrativa_ctx.get("texto") or narrativa_ctx.get("mensajes")):
+            mensajes_fmt = narrativa_ctx.get(
+                "mensajes") or narrativa_ctx.get("mensajes_formateados") or []
+            texto_base = _construir_resumen_narrativo(
+                narrativa_ctx, payload) or narrativa_ctx.get("texto", "").strip()
+            payload["respuesta_usuario"] = texto_base
+            payload["texto_semantico"] = texto_base
+            payload.setdefault("metadata", {})
+            payload["metadata"]["narrativa_contexto"] = {
+                "thread_id": narrativa_ctx.get("thread_id"),
+                "blob": narrativa_ctx.get("fuente_blob"),
+                "mensajes_recuperados": len(mensajes_fmt),
+                "session_id": narrativa_ctx.get("session_id"),
+                "fragmento_conversacion": mensajes_fmt[:3]
+            }
+        else:
+            payload.setdefault("respuesta_usuario", "")
+        return payload
+
+    # === 🔍 BÚSQUEDA HÍBRIDA: AI Search (vectorial) + Cosmos (estructurado) ===
+    docs_search = []
+
+    # 1️⃣ AI Search: Búsqueda vectorial semántica
+    try:
+        from endpoints_search_memory import buscar_memoria_endpoint
+        memoria_result = buscar_memoria_endpoint({
+            "query": query_universal,
+            "session_id": session_id,
+            "top": 20
+        })
+        if memoria_result.get("exito") and memoria_result.get("documentos"):
+            docs_search = memoria_result["documentos"]
+            logging.info(f"✅ AI Search: {len(docs_search)} docs vectoriales")
+    except Exception as e:
+        logging.warning(f"⚠️ AI Search falló: {e}")
+
+    # 2️⃣ Cosmos: Filtro estructurado por event_type derivado de intención
+    usar_query_cosmos = params_completos.get("tipo") or params_completos.get(
+        "endpoint") or params_completos.get("exito") is not None
+
+    if usar_query_cosmos:
+        try:
+            query_sql = construir_query_dinamica(**params_completos)
+            resultados_cosmos = ejecutar_query_cosmos(
+                query_sql, memory_service.memory_container)
+            logging.info(
+                f"✅ Cosmos: {len(resultados_cosmos)} docs estructurados (event_type filtrado)")
+
+            # 3️⃣ INTERSECCIÓN: Combinar resultados vectoriales + estructurados
+            if docs_search and resultados_cosmos:
+                ids_cosmos = {d.get("id") for d in resultados_cosmos}
+                docs_search = [
+                    d for d in docs_search if d.get("id") in ids_cosmos]
+                logging.info(
+                    f"🎯 Intersección: {len(docs_search)} docs (vectorial ∩ estructurado)")
+            elif resultados_cosmos and not docs_search:
+                docs_search = resultados_cosmos[:10]
+                logging.info(
+                    f"📊 Usando solo resultados estructurados de Cosmos")
+        except Exception as e:
+            logging.error(f"❌ Query Cosmos falló: {e}")
+
+    # 🧠 CONSULTAR MEMORIA COSMOS DB DIRECTAMENTE (para contexto general)
+    memoria_previa = consultar_memoria_cosmos_directo(req)
+
+    # 🔥 ENRIQUECER memoria_previa con resultados de búsqueda híbrida
+    if docs_search and memoria_previa:
+        memoria_previa["docs_hibridos"] = docs_search
+        memoria_previa["busqueda_hibrida_aplicada"] = True
+
+    # 🔍 DETECCIÓN AUTOMÁTICA DE RECURSIÓN
+    recursion_detectada = False
+    interacciones_recursivas = 0
+
+    if memoria_previa and memoria_previa.get("tiene_historial"):
+        logging.info(
+            f"🧠 historial_interacciones: {memoria_previa['total_interacciones']} interacciones encontradas")
+
+        # Contar interacciones de historial-interacciones
+        interacciones_recientes = memoria_previa.get(
+            "interacciones_recientes", [])
+        for interaccion in interacciones_recientes:
+            endpoint = interaccion.get("endpoint") or interaccion.get(
+                "data", {}).get("endpoint", "")
+            if "historial" in endpoint.lower():
+                interacciones_recursivas += 1
+
+        # Si más del 80% son de historial, hay recursión
+        total = len(interacciones_recientes)
+        if total > 0 and (interacciones_recursivas / total) > 0.8:
+            recursion_detectada = True
+            logging.error(
+                f"🚨 RECURSIÓN DETECTADA: {interacciones_recursivas}/{total} interacciones son de historial-interacciones")
+
+        # Debug: verificar estructura de memoria_previa
+        if memoria_previa.get("interacciones_recientes"):
+            primera = memoria_previa["interacciones_recientes"][0] if memoria_previa["interacciones_recientes"] else {
+            }
+            logging.info(
+                f"   Primera interacción keys: {list(primera.keys())}")
+            texto_semantico = primera.get("texto_semantico", "")
+            if texto_semantico:
+                logging.info(
+                    f"   Texto semántico encontrado: '{_preview(texto_semantico, 500)}'")
+        logging.info(
+            f"📝 Historial: {_preview(memoria_previa.get('resumen_conversacion', ''), 500)}")
+
+    advertencias = []
+    total = 0
+    interacciones_recursivas = 0
+
+    # Si hay recursión, devolver diagnóstico inmediato
+    if recursion_detectada:
+        return func.HttpResponse(
+            json.dumps({
+                "exito": False,
+                "error": "RECURSIÓN DETECTADA",
+                "diagnostico": {
+                    "problema": "El endpoint historial-interacciones se está registrando a sí mismo",
+                    "interacciones_recursivas": interacciones_recursivas,
+                    "total_interacciones": total,
+                    "porcentaje_recursivo": f"{(interacciones_recursivas/total*100):.1f}%",
+                    "causa": "El wrapper automático está registrando interacciones de historial-interacciones",
+                    "solucion": "El filtro en memory_route_wrapper.py ya está implementado. Las interacciones recursivas existentes deben limpiarse."
+                },
+                "acciones_recomendadas": [
+                    "Reiniciar el servidor para aplicar el filtro actualizado",
+                    "Ejecutar script de limpieza: python limpiar_historial_recursivo.py",
+                    "Verificar logs del servidor para confirmar que el filtro funciona"
+                ],
+                "metadata": {
+                    "timestamp": datetime.now().isoformat(),
+                    "session_id": req.headers.get("Session-ID"),
+                    "filtro_implementado": True,
+                    "wrapper_actualizado": True
+                }
+            }, ensure_ascii=False),
+            mimetype="application/json",
+            status_code=500
+        )
+
+    # Inyectar memoria previa al contexto del request antes de generar respuesta
+    if memoria_previa and memoria_previa.get("tiene_historial"):
+        setattr(req, "_memoria_contexto", memoria_previa)
+
+    # Forzar lectura del contexto si el wrapper lo inyectó
+    try:
+        if not hasattr(req, "_memoria_contexto") or not getattr(req, "_memoria_contexto", {}):
+            from services.memory_service import memory_service
+            session_id = req.headers.get(
+                "Session-ID") or req.params.get("session_id")
+            if session_id:
+                interacciones = memory_service.get_session_history(session_id)
+                setattr(req, "_memoria_contexto", {
+                    "tiene_historial": len(interacciones) > 0,
+                    "interacciones_recientes": interacciones,
+                    "total_interacciones": len(interacciones),
+                    "session_id": session_id
+                })
+                logging.info(
+                    f"🧠 Cargado contexto manualmente dentro del endpoint ({len(interacciones)} interacciones)")
+    except Exception as e:
+        logging.warning(f"⚠️ Error cargando memoria dentro del endpoint: {e}")
+
+    # 🔥 MEMORIA DIRECTA - FORZAR FUNCIONAMIENTO
+    logging.info("🔥 ENDPOINT EJECUTÁNDOSE CON MEMORIA DIRECTA")
+
+    memoria_previa = getattr(req, '_memoria_contexto', {})
+    response_data = {}
+    resolved_session_id = session_id or req.headers.get(
+        "Session-ID") or req.params.get("session_id") or "test_session"
+    resolved_agent_id = agent_id or req.headers.get(
+        "Agent-ID") or req.params.get("agent_id") or "TestAgent"
+    try:
+        session_id = resolved_session_id
+        agent_id = resolved_agent_id
+
+        logging.info(f"🔍 Headers: Session={session_id}, Agent={agent_id}")
+
+        # Solo intenta cargar desde memory_service si no hay memoria previa
+        if not memoria_previa or not memoria_previa.get("tiene_historial"):
+            interacciones = memory_service.get_session_history(session_id)
+            memoria_previa = {
+                "tiene_historial": len(interacciones) > 0,
+                "interacciones_recientes": interacciones,
+                "total_interacciones": len(interacciones),
+                "session_id": session_id,
+                "agent_id": agent_id
+            }
+            setattr(req, "_memoria_contexto", memoria_previa)
+            logging.info(
+                f"🧠 Memoria local cargada: {len(interacciones)} interacciones")
+            # Debug: verificar si las interacciones tienen texto_semantico
+            for idx, inter in enumerate(interacciones[:3]):
+                texto = inter.get("texto_semantico", "")
+                logging.info(
+                    f"   Interacción {idx}: texto_semantico = '{_preview(texto, 500)}'")
+        else:
+            logging.info(
+                "🧠 Usando memoria previa de Cosmos sin sobrescribirla.")
+
+        # Fallback: si no hubo historial por session_id, intentar agent_id o global
+        if (not memoria_previa or not memoria_previa.get("tiene_historial")):
+            try:
+                fallback_query = None
+                if agent_id and agent_id not in ["unknown_agent", "unknown", "TestAgent"]:
+                    fallback_query = construir_query_dinamica(
+                        session_id=None,
+                        agent_id=agent_id,
+                        limite=hist_limit
+                    )
+                else:
+                    fallback_query = construir_query_dinamica(
+                        session_id=None,
+                        agent_id=None,
+                        limite=hist_limit
+                    )
+
+                if fallback_query:
+                    resultados_fallback = ejecutar_query_cosmos(
+                        fallback_query, memory_service.memory_container)
+                    if resultados_fallback:
+                        interacciones = []
+                        for item in resultados_fallback:
+                            interacciones.append({
+                                "id": item.get("id"),
+                                "session_id": item.get("session_id"),
+                                "agent_id": item.get("agent_id"),
+                                "endpoint": item.get("endpoint"),
+                                "timestamp": item.get("timestamp"),
+                                "texto_semantico": item.get("texto_semantico"),
+                                "exito": item.get("exito", True),
+                                "tipo": item.get("tipo", "interaccion_usuario"),
+                                "data": {
+                                    "endpoint": item.get("endpoint"),
+                                    "timestamp": item.get("timestamp"),
+                                    "success": item.get("exito", True),
+                                    "params": {}
+                                }
+                            })
+                        memoria_previa = {
+                            "tiene_historial": True,
+                            "interacciones_recientes": interacciones,
+                            "total_interacciones": len(interacciones),
+                            "session_id": session_id or interacciones[0].get("session_id"),
+                            "agent_id": agent_id
+                        }
+                        setattr(req, "_memoria_contexto", memoria_previa)
+                        logging.info(
+                            f"🧠 Fallback por agent_id/global: {len(interacciones)} interacciones recuperadas")
+            except Exception as fallback_err:
+                logging.warning(
+                    f"⚠️ Fallback historial por agent_id/global falló: {fallback_err}")
+        # Debug: verificar estructura de memoria previa
+        if memoria_previa.get("interacciones_recientes"):
+            primera = memoria_previa["interacciones_recientes"][0] if memoria_previa["interacciones_recientes"] else {
+            }
+            logging.info(
+                f"   Primera interacción de Cosmos keys: {list(primera.keys())}")
+            texto_semantico = primera.get("texto_semantico", "")
+            if texto_semantico:
+                logging.info(
+                    f"   Texto semántico de Cosmos: '{_preview(texto_semantico, 500)}'")
+            else:
+                logging.warning(
+                    f"   ⚠️ No hay texto_semantico en interacción de Cosmos")
+    except Exception as e:
+        logging.error(f"❌ Error cargando memoria: {e}")
+        memoria_previa = memoria_previa or {}
+        session_id = session_id or None
+    """Endpoint para consultar historial de interacciones con detección automática de endpoint"""
+
+    memoria_previa = getattr(req, '_memoria_contexto', {})
+    if memoria_previa and memoria_previa.get("tiene_historial"):
+        total = memoria_previa.get("total_interacciones", 0)
+        logging.info(f"🧠 Historial: {total} interacciones encontradas")
+
+    try:
+        # 🧠 DETECTAR PARÁMETROS ADICIONALES DEL AGENTE
+        params_agente = dict(req.params)
+        body_agente = {}
+        try:
+            if req.method == "POST":
+                body_agente = req.get_json() or {}
+        except:
+            pass
+
+        # Combinar parámetros
+        params_completos = {**params_agente, **body_agente}
+
+        # Obtener identificadores prioritarios
+        session_id = params_completos.get(
+            "session_id") or resolved_session_id
+        agent_id_local = params_completos.get(
+            "agent_id") or resolved_agent_id
+        agent_id = agent_id_local
+
+        # 🔍 INTERPRETAR INTENCIÓN DEL AGENTE
+        intencion_params = interpretar_intencion_agente(
+            params_completos.get("query", params_completos.get("mensaje", "")),
+            dict(req.headers)
+        )
+
+        # Sobrescribir con parámetros explícitos si existen
+        for key in ["tipo", "contiene", "endpoint", "exito", "fecha_inicio", "fecha_fin", "orden", "limite"]:
+            if key in params_completos:
+                intencion_params[key] = params_completos[key]
+
+        # Asegurar session_id SIEMPRE desde headers/params
+        intencion_params["session_id"] = session_id or "unknown"
+        intencion_params["agent_id"] = agent_id_local or "unknown_agent"
+
+        limit = int(intencion_params.get("limite", hist_limit))
+
+        # Initialize validation stats
+        validation_stats = {
+            "checked": 0,
+            "missing_text_semantic": 0,
+            "generated_fallbacks": 0
+        }
+
+        # === 🔍 USAR DOCS DE AI SEARCH AUTOMÁTICO ===
+        docs_sem = docs_search  # Usar los docs ya encontrados en la búsqueda automática
+
+        limit = int(intencion_params.get("limite", hist_limit))
+
+        # 🧠 SI HAY PARÁMETROS AVANZADOS, USAR QUERY BUILDER DINÁMICO
+        usar_query_dinamica = any([
+            params_completos.get("tipo"),
+            params_completos.get("contiene"),
+            params_completos.get("endpoint"),
+            params_completos.get("exito") is not None,
+            params_completos.get("fecha_inicio"),
+            params_completos.get("fecha_fin")
+        ])
+
+        if usar_query_dinamica:
+            logging.info(f"🔍 Query dinámica detectada: {intencion_params}")
+
+            # Construir query SQL dinámica
+            query_sql = construir_query_dinamica(**intencion_params)
+
+            # Ejecutar contra Cosmos DB
+            try:
+                cosmos_container = memory_service.memory_container
+                resultados = ejecutar_query_cosmos(query_sql, cosmos_container)
+
+                eventos_dinamicos: List[Dict[str, Any]] = []
+                interacciones_formateadas = []
+                for i, item in enumerate(resultados[:limit]):
+                    texto = item.get("texto_semantico", "")
+                    if texto and not any([
+                        "consulta de historial completada" in texto.lower(),
+                        "sin resumen de conversación" in texto.lower(),
+                        "interacciones recientes:" in texto.lower()
+                    ]):
+                        registro = {
+                            "numero": i + 1,
+                            "timestamp": item.get("timestamp", ""),
+                            "endpoint": item.get("endpoint", ""),
+                            "texto_semantico": texto,
+                            "exito": item.get("exito", True),
+                            "tipo": item.get("tipo", "interaccion_usuario")
+                        }
+                        interacciones_formateadas.append(registro)
+                        eventos_dinamicos.append(
+                            build_event(
+                                endpoint=registro["endpoint"],
+                                descripcion=texto,
+                                estado="exito" if registro["exito"] else "error",
+                                sugerencia="",
+                                criticidad="",
+                                datos={
+                                    "timestamp": registro["timestamp"],
+                                    "tipo": registro["tipo"]
+                                },
+                                timestamp=registro["timestamp"]
+                            )
+                        )
+
+                if not eventos_dinamicos:
+                    eventos_dinamicos.append(
+                        build_event(
+                            endpoint="historial-interacciones",
+                            descripcion="Sin interacciones que coincidan con los filtros aplicados.",
+                            estado="informativo",
+                            sugerencia="",
+                            criticidad="",
+                            datos={"query_aplicada": True}
+                        )
+                    )
+
+                extras = {
+                    "interacciones": interacciones_formateadas,
+                    "total": len(resultados),
+                    "query_dinamica_aplicada": True,
+                    "filtros_aplicados": intencion_params,
+                    "metadata": {
+                        "query_sql": query_sql[:200] + "...",
+                        "timestamp": datetime.now().isoformat()
+                    }
+                }
+                contexto_directo = {
+                    "tiene_memoria": bool(interacciones_formateadas),
+                    "total_interacciones": len(resultados),
+                    "resumen": ""
+                }
+                response_data = build_structured_payload(
+                    "historial-interacciones",
+                    eventos_dinamicos,
+                    narrativa_base="",
+                    resumen_automatico="",
+                    extras=extras,
+                    contexto_inteligente=contexto_directo,
+                    exito=True
+                )
+                response_data.update({
+                    "session_id": session_id,
+                    "fuente": "wrapper_automatico",
+                    "validation_applied": True,
+                    "validation_stats": {
+                        "checked": len(interacciones_formateadas),
+                        "missing_text_semantic": 0,
+                        "generated_fallbacks": 0
+                    },
+                    "metadata": {
+                        "query_sql": query_sql[:200] + "...",
+                        "timestamp": datetime.now().isoformat()
+                    },
+                    "resumen_conversacion": memoria_previa.get("resumen_conversacion", "")
+                })
+                response_data["mensaje"] = ""
+                response_data["respuesta_usuario"] = ""
+                response_data["intencion_detectada"] = intencion_params.get(
+                    "intencion_detectada", params_completos.get("query", ""))
+
+                return func.HttpResponse(
+                    json.dumps(response_data, ensure_ascii=False),
+                    mimetype="application/json",
+                    status_code=200
+                )
+            except Exception as e:
+                logging.error(f"❌ Error ejecutando query dinámica: {e}")
+                # Continuar con flujo normal si falla
+
+        eventos_estructurados: List[Dict[str, Any]] = []
+
+        genericos = [
+            "he revisado el historial",
+            "actividad relevante",
+            "resumen de la última",
+            "resumen automático",
+            "consulta de historial completada",
+            "resumen consolidado"
+        ]
+
+        def _es_texto_generico(texto: str) -> bool:
+            if not texto:
+                return True
+            t = texto.lower()
+            return any(g in t for g in genericos)
+
+        def _descripcion_evento(registro: Dict[str, Any], texto: str) -> Tuple[str, str]:
+            endpoint_val = registro.get(
+                "endpoint") or "historial-interacciones"
+            timestamp_val = registro.get("timestamp") or ""
+            estado_val = "éxito" if registro.get("exito", True) else "error"
+            detalle = (
+                registro.get("params", {}).get("comando")
+                or registro.get("consulta")
+                or registro.get("mensaje")
+                or ""
+            )
+            if texto and not _es_texto_generico(texto):
+                detalle = texto
+            descripcion = f"{format_timestamp_humano(timestamp_val)} · {humanizar_endpoint(endpoint_val)} ({estado_val})"
+            if detalle:
+                descripcion += f": {preview_text(detalle, 240)}"
+            return descripcion.strip(), detalle
+
+        # Prepare intelligent context default
+        contexto_inteligente = {
+            "resumen": memoria_previa.get("resumen_conversacion", ""),
+            "tiene_memoria": bool(memoria_previa and memoria_previa.get("tiene_historial")),
+            "total_interacciones": memoria_previa.get("total_interacciones", 0)
+        }
+
+        if not memoria_previa or not memoria_previa.get("tiene_historial"):
+            respuesta_sin_historial = "Sin interacciones previas para esta sesión."
+            evento = build_event(
+                endpoint="historial-interacciones",
+                descripcion=respuesta_sin_historial,
+                estado="informativo",
+                sugerencia="",
+                criticidad="",
+                datos={
+                    "session_id": session_id,
+                    "limit": limit
+                }
+            )
+            eventos_estructurados.append(evento)
+            response_data = build_structured_payload(
+                "historial-interacciones",
+                eventos_estructurados,
+                narrativa_base="",
+                resumen_automatico="",
+                extras={
+                    "interacciones": [],
+                    "total": 0,
+                    "validation_stats": validation_stats,
+                    "memoria_aplicada": False
+                },
+                contexto_inteligente=contexto_inteligente,
+                exito=True
+            )
+            response_data.update({
+                "session_id": session_id,
+                "fuente": "wrapper_automatico",
+                "resumen_conversacion": "",
+                "validation_applied": True,
+                "validation_stats": validation_stats,
+                "metadata": {
+                    "memoria_aplicada": False,
+                    "session_id": session_id,
+                    "agent_id": req.headers.get("Agent-ID", "unknown")
+                }
+            })
+        else:
+            interacciones_formateadas = []
+            missing_count = 0
+            fallback_count = 0
+
+            raw_interacciones = memoria_previa.get(
+                "interacciones_recientes", [])[:limit]
+            for i, interaccion in enumerate(raw_interacciones):
+                validation_stats["checked"] += 1
+
+                registro = interaccion.get("data", interaccion)
+                texto_semantico = (
+                    interaccion.get("texto_semantico")
+                    or registro.get("texto_semantico")
+                    or interaccion.get("data", {}).get("texto_semantico")
+                    or ""
+                )
+
+                # Filtrar textos genéricos/narrativas pre-generadas
+                if texto_semantico and any([
+                    "consulta de historial completada" in texto_semantico.lower(),
+                    "sin resumen de conversación" in texto_semantico.lower(),
+                    "interacciones recientes:" in texto_semantico.lower(),
+                    "he revisado el historial" in texto_semantico.lower(),
+                    "encontré" in texto_semantico.lower(
+                    ) and "interacciones relevantes" in texto_semantico.lower(),
+                    "resumen de la última actividad" in texto_semantico.lower()
+                ]):
+                    # Reemplazar con descripción técnica
+                    endpoint_val = registro.get(
+                        "endpoint") or interaccion.get("endpoint") or "unknown"
+                    timestamp_val = registro.get(
+                        "timestamp") or interaccion.get("timestamp") or ""
+                    texto_semantico = f"Interacción en {endpoint_val} - {timestamp_val}"
+                    logging.debug(
+                        f"Texto genérico filtrado en interacción {i+1}")
+
+                if not texto_semantico:
+                    endpoint_val = registro.get(
+                        "endpoint") or interaccion.get("endpoint") or "unknown"
+                    timestamp_val = registro.get(
+                        "timestamp") or interaccion.get("timestamp") or ""
+                    texto_semantico = f"Interacción {i+1} en {endpoint_val} - {timestamp_val}"
+                    missing_count += 1
+                    fallback_count += 1
+                    logging.warning(
+                        f"⚠️ Interacción {i+1} sin texto_semantico - generado fallback")
+
+                interacciones_formateadas.append({
+                    "numero": i + 1,
+                    "timestamp": registro.get("timestamp", interaccion.get("timestamp", "")),
+                    "endpoint": registro.get("endpoint", "historial_interacciones"),
+                    "consulta": (_preview(registro.get("params", {}).get("comando") or registro.get("consulta") or "", 1000)),
+                    "exito": registro.get("success", registro.get("exito", True)),
+                    "texto_semantico": texto_semantico,
+                    "tipo": "interaccion_usuario"
+                })
+
+                endpoint_val = registro.get(
+                    "endpoint", "historial_interacciones")
+                timestamp_val = registro.get(
+                    "timestamp", interaccion.get("timestamp", ""))
+                exito_val = interacciones_formateadas[-1]["exito"]
+                descripcion_evento, detalle_evento = _descripcion_evento(
+                    {
+                        "endpoint": endpoint_val,
+                        "timestamp": timestamp_val,
+                        "exito": exito_val,
+                        "params": registro.get("params", {}),
+                        "consulta": interacciones_formateadas[-1]["consulta"]
+                    },
+                    texto_semantico
+                )
+                evento = build_event(
+                    endpoint=endpoint_val,
+                    descripcion=descripcion_evento,
+                    estado="exito" if exito_val else "error",
+                    sugerencia="",
+                    criticidad="",
+                    datos={
+                        "timestamp": timestamp_val,
+                        "consulta": interacciones_formateadas[-1]["consulta"],
+                        "exito": exito_val,
+                        "tipo": interacciones_formateadas[-1]["tipo"],
+                        "texto_original": texto_semantico,
+                        "detalle": detalle_evento
+                    },
+                    timestamp=timestamp_val
+                )
+                eventos_estructurados.append(evento)
+
+            validation_stats["missing_text_semantic"] = missing_count
+            validation_stats["generated_fallbacks"] = fallback_count
+
+            total_interacciones = memoria_previa.get("total_interacciones", 0)
+            resumen = memoria_previa.get("resumen_conversacion", "")
+
+            docs_para_modelo = docs_search if docs_search else docs_sem
+            if docs_para_modelo:
+                contexto_inteligente["documentos_relevantes"] = len(
+                    docs_para_modelo)
+                contexto_inteligente["fuente_datos"] = "AISearch+CognitiveSynth"
+
+            if not eventos_estructurados:
+                eventos_estructurados.append(build_event(
+                    endpoint="historial-interacciones",
+                    descripcion="No se encontraron interacciones relevantes tras aplicar los filtros.",
+                    estado="informativo",
+                    sugerencia="",
+                    criticidad="",
+                    datos={"total_interacciones": total_interacciones}
+                ))
+
+            extras = {
+                "interacciones": interacciones_formateadas,
+                "total": total_interacciones,
+                "validation_stats": validation_stats,
+                "fallbacks_generados": fallback_count,
+                "docs_vectoriales": len(docs_para_modelo or []),
+                "resumen_conversacion": resumen,
+                "filtros_aplicados": {
+                    "session_id": memoria_previa.get("session_id"),
+                    "agent_id": memoria_previa.get("agent_id", agent_id),
+                    "tipo": params_completos.get("tipo"),
+                    "endpoint": params_completos.get("endpoint")
+                }
+            }
+
+            response_data = build_structured_payload(
+                "historial-interacciones",
+                eventos_estructurados,
+                narrativa_base="",
+                resumen_automatico="",
+                extras=extras,
+                contexto_inteligente=contexto_inteligente,
+                exito=True
+            )
+            response_data.update({
+                "session_id": memoria_previa.get("session_id"),
+                "fuente": "wrapper_automatico",
+                "resumen_conversacion": resumen,
+                "validation_applied": True,
+                "validation_stats": validation_stats,
+                "metadata": {
+                    "memoria_aplicada": True,
+                    "memoria_origen": "cosmos" if consultar_memoria_cosmos_directo else "local",
+                    "session_id": memoria_previa.get("session_id"),
+                    "agent_id": req.headers.get("Agent-ID", "unknown")
+                }
+            })
+
+            response_data["mensaje"] = ""
+
+        # Asegurar campos reservados para que el modelo genere la narrativa
+        response_data["mensaje"] = ""
+        response_data["_instruccion_modelo"] = "INTERPRETA eventos[] y genera respuesta conversacional. NO copies texto_semantico literalmente."
+
+        # Aplicar memoria Cosmos y memoria manual
+        response_data = aplicar_memoria_cosmos_directo(req, response_data)
+        response_data = aplicar_memoria_manual(req, response_data)
+
+        # Inyectar narrativa enriquecida y mantener coherencia de campos reservados
+        response_data = _inyectar_narrativa(response_data)
+        if not response_data.get("texto_semantico"):
+            response_data["texto_semantico"] = response_data.get(
+                "respuesta_usuario", "")
+        response_data["mensaje"] = ""
+
+        # ❌ NO REGISTRAR: Este endpoint consulta historial, no debe guardarse a sí mismo
+        # memory_service.registrar_llamada(...) DESHABILITADO para evitar bucle infinito
+        logging.info(
+            "⏭️ historial-interacciones: NO se guarda a sí mismo para evitar recursión")
+
+        response_data["intencion_detectada"] = intencion_params.get(
+            "intencion_detectada", query_texto)
+
+        logging.info(
+            "✅ Payload historial-interacciones listo para el modelo (datos estructurados)")
+
+        # NOTA: La memoria se registra automáticamente por el wrapper @registrar_memoria
+
+        response_data["_instruccion_modelo"] = "IMPORTANTE: Datos en eventos[] son CRUDOS. NO copies texto_semantico. Interpreta y genera respuesta conversacional."
+
+        return func.HttpResponse(
+            json.dumps(response_data, ensure_ascii=False),
+            mimetype="application/json",
+            status_code=200
+        )
+
+    except Exception as e:
+        logging.error(f"Error en historial-interacciones: {e}")
+
+        error_msg = f"Error al consultar historial: {str(e)}"
+
+        error_event = build_event(
+            endpoint="historial-interacciones",
+            descripcion=error_msg,
+            estado="error",
+            sugerencia="",
+            criticidad="",
+            datos={
+                "error_type": type(e).__name__,
+                "session_id": req.headers.get("Session-ID"),
+                "agent_id": req.headers.get("Agent-ID")
+            }
+        )
+        contexto_error = {
+            "tiene_memoria": bool(getattr(req, "_memoria_contexto", {})),
+            "session_id": req.headers.get("Session-ID")
+        }
+        response_data = build_structured_payload(
+            "historial-interacciones",
+            [error_event],
+            narrativa_base="",
+            resumen_automatico="",
+            extras={
+                "error": str(e),
+                "validation_stats": {
+                    "checked": 0,
+                    "missing_text_semantic": 0,
+                    "generated_fallbacks": 0
+                }
+            },
+            contexto_inteligente=contexto_error,
+            exito=False
+        )
+        response_data.update({
+            "fuente": "wrapper_automatico",
+            "interpretacion_semantica": "Error al intentar consultar historial; revisar logs.",
+            "validation_applied": True,
+            "metadata": {
+                "memoria_aplicada": False,
+                "error_type": type(e).__name__,
+                "session_id": req.headers.get("Session-ID"),
+                "agent_id": req.headers.get("Agent-ID")
+            }
+        })
+        response_data["mensaje"] = ""
+        response_data["respuesta_usuario"] = ""
+        response_data["intencion_detectada"] = "error"
+
+        # Aplicar memoria Cosmos y memoria manual
+        response_data = aplicar_memoria_cosmos_directo(req, response_data)
+        response_data = aplicar_memoria_manual(req, response_data)
+
+        # ❌ NO REGISTRAR: Ni siquiera errores de este endpoint
+        logging.info(
+            "⏭️ historial-interacciones ERROR: NO se guarda para evitar recursión")
+
+        # NOTA: La memoria se registra automáticamente por el wrapper @registrar_memoria
+
+        return func.HttpResponse(
+            json.dumps(response_data, ensure_ascii=False),
+            mimetype="application/json",
+            status_code=500
+        )
+
+
+def consultar_memoria_http(req: func.HttpRequest) -> func.HttpResponse:
+    from memory_manual import aplicar_memoria_manual
+    """Endpoint para consultar memoria de sesión manualmente"""
+    try:
+        # Extraer parámetros
+        if req.method == "GET":
+            session_id = req.params.get("session_id")
+            agent_id = req.params.get("agent_id")
+        else:
+            body = req.get_json() or {}
+            session_id = body.get("session_id")
+            agent_id = body.get("agent_id")
+
+        if not session_id:
+            return func.HttpResponse(
+                json.dumps({
+                    "exito": False,
+                    "error": "session_id es requerido",
+                    "ejemplo": {
+                        "session_id": "mi_session_123",
+                        "agent_id": "AzureSupervisor"
+                    }
+                }),
+                mimetype="application/json",
+                status_code=400
+            )
+
+        # Consultar memoria
+        from services.session_memory import consultar_memoria_sesion, generar_contexto_prompt
+
+        resultado = consultar_memoria_sesion(session_id, agent_id)
+
+        if resultado.get("exito"):
+            memoria = resultado["memoria"]
+            contexto_prompt = generar_contexto_prompt(memoria)
+
+            return func.HttpResponse(
+                json.dumps({
+                    "exito": True,
+                    "session_id": session_id,
+                    "agent_id": agent_id,
+                    "memoria": memoria,
+                    "contexto_prompt": contexto_prompt,
+                    "timestamp": datetime.now().isoformat()
+                }, ensure_ascii=False),
+                mimetype="application/json",
+                status_code=200
+            )
+        else:
+            return func.HttpResponse(
+                json.dumps(resultado),
+                mimetype="application/json",
+                status_code=500
+            )
+
+    except Exception as e:
+        return func.HttpResponse(
+            json.dumps({
+                "exito": False,
+                "error": str(e),
+                "tipo_error": type(e).__name__
+            }),
+            mimetype="application/json",
+            status_code=500
+        )
+
+
+def precalentar_memoria_http(req: func.HttpRequest) -> func.HttpResponse:
+    """Carga explícitamente la memoria de una sesión desde Cosmos y la guarda en Redis."""
+    from cosmos_memory_direct import consultar_memoria_cosmos_directo
+    from memory_helpers import extraer_session_info
+
+    try:
+        body = req.get_json()
+    except ValueError:
+        body = {}
+
+    session_id = (
+        (body or {}).get("session_id")
+        or req.headers.get("Session-ID")
+        or req.headers.get("X-Session-ID")
+    )
+    thread_id = (
+        (body or {}).get("thread_id")
+        or req.headers.get("Thread-ID")
+        or req.headers.get("X-Thread-ID")
+    )
+    agent_id = (
+        (body or {}).get("agent_id")
+        or req.headers.get("Agent-ID")
+        or req.headers.get("X-Agent-ID")
+    )
+
+    try:
+        session_info = extraer_session_info(req, skip_api_call=True)
+    except AttributeError as e:
+        logging.warning(f"AttributeError: {e}")
+        session_info = {}
+    except Exception as e:
+        logging.warning(f"Error: {e}")
+        session_info = {}
+
+    session_id = session_id or session_info.get("session_id")
+    agent_id = agent_id or session_info.get("agent_id")
+
+    # Clave estable para Redis (aunque Foundry cambie Session-ID).
+    redis_session_key = session_id or thread_id
+    if not redis_session_key and agent_id:
+        redis_session_key = f"agent-{agent_id}"
+    if not redis_session_key:
+        redis_session_key = "agent-global"
+
+    agent_id = agent_id or "foundry_user"
+    thread_id = thread_id or redis_session_key
+
+    logging.info(
+        f"[precalentar-memoria] Precargando sesión={redis_session_key} (session_id={session_id or 'N/A'}) agente={agent_id} thread={thread_id}")
+
+    memoria = consultar_memoria_cosmos_directo(
+        req, session_override=session_id, agent_override=agent_id)
+
+    if not memoria:
+        return func.HttpResponse(
+            json.dumps({
+                "exito": False,
+                "session_id": redis_session_key,
+                "agent_id": agent_id,
+                "error": "No se encontró memoria en Cosmos con los identificadores proporcionados."
+            }, ensure_ascii=False),
+            mimetype="application/json",
+            status_code=404
+        )
+
+    redis_snapshot: Dict[str, Any] = {
+        "enabled": redis_buffer.is_enabled,
+        "cached": False,
+        "error": None,
+        "disabled": False,
+    }
+
+    if redis_buffer.is_enabled:
+        cache_ok = redis_buffer.cache_memoria_contexto(
+            redis_session_key, memoria, thread_id=thread_id)
+        redis_snapshot["cached"] = bool(cache_ok)
+        if not cache_ok:
+            redis_snapshot["error"] = getattr(
+                redis_buffer, "last_error", None)
+            redis_snapshot["disabled"] = bool(not redis_buffer.is_enabled)
+
+    total_interacciones = memoria.get("total_interacciones", 0)
+
+    respuesta = {
+        "exito": True,
+        "session_id": redis_session_key,
+        "thread_id": thread_id,
+        "agent_id": agent_id,
+        "interacciones_cacheadas": total_interacciones,
+        "redis": redis_snapshot,
+        "fuente": "cosmos",
+        "mensaje": (
+            "Memoria precalentada y enviada a Redis"
+            if redis_snapshot["cached"]
+            else "Memoria recuperada. Redis no disponible o caché fallida."
+        )
+    }
+
+    return func.HttpResponse(
+        json.dumps(respuesta, ensure_ascii=False),
+        mimetype="application/json",
+        status_code=200
+    )
+
+
+def conocimiento_cognitivo_http(req: func.HttpRequest) -> func.HttpResponse:
+    from memory_manual import aplicar_memoria_manual
+    """Endpoint para obtener el último conocimiento del supervisor cognitivo"""
+    try:
+        from services.cognitive_supervisor import CognitiveSupervisor
+
+        supervisor = CognitiveSupervisor()
+        conocimiento = supervisor.get_latest_knowledge()
+
+        return func.HttpResponse(
+            json.dumps(conocimiento, ensure_ascii=False, indent=2),
+            mimetype="application/json",
+            status_code=200 if conocimiento.get("exito") else 404
+        )
+
+    except Exception as e:
+        logging.error(f"Error en conocimiento-cognitivo: {e}")
+        return func.HttpResponse(
+            json.dumps({"exito": False, "error": str(e)}),
+            mimetype="application/json",
+            status_code=500
+        )
+
+
+def contexto_agente_http(req: func.HttpRequest) -> func.HttpResponse:
+    # 🔥 MEMORIA DIRECTA - WRAPPER AUTOMÁTICO
+    logging.info("🔥 CONTEXTO-AGENTE EJECUTÁNDOSE CON MEMORIA DIRECTA")
+
+    try:
+        from services.memory_service import memory_service
+        session_id = req.headers.get("Session-ID") or "test_session"
+        agent_id = req.headers.get("Agent-ID") or "TestAgent"
+
+        logging.info(
+            f"🔍 CONTEXTO-AGENTE Headers: Session={session_id}, Agent={agent_id}")
+
+        interacciones = memory_service.get_session_history(session_id)
+        memoria_previa = {
+            "tiene_historial": len(interacciones) > 0,
+            "interacciones_recientes": interacciones,
+            "total_interacciones": len(interacciones),
+            "session_id": session_id
+        }
+
+        logging.info(
+            f"🧠 CONTEXTO-AGENTE Memoria cargada: {len(interacciones)} interacciones")
+
+        setattr(req, "_memoria_contexto", memoria_previa)
+
+        # 💾 REGISTRAR INTERACCIÓN EN MEMORIA
+        try:
+            # Tolerancia a GET sin JSON
+            try:
+                body = req.get_json()
+            except ValueError:
+                body = {}
+
+            comando = (
+                (body or {}).get("mensaje")
+                or (body or {}).get("comando")
+                or (body or {}).get("consulta")
+                or req.params.get("q")
+                or req.params.get("mensaje")
+                or "resumen"
+            )
+
+            memory_service.registrar_llamada(
+                source="contexto_agente",
+                endpoint="/api/contexto-agente",
+                method=req.method,
+                params={"session_id": session_id, "agent_id": agent_id},
+                response_data={"procesando": True},
+                success=True
+            )
+            logging.info(
+                f"💾 CONTEXTO-AGENTE Interacción registrada: {comando}")
+        except Exception as reg_error:
+            logging.warning(f"⚠️ Error registrando en memoria: {reg_error}")
+
+    except Exception as e:
+        logging.error(f"❌ CONTEXTO-AGENTE Error cargando memoria: {e}")
+        memoria_previa = {}
+        session_id = None
+
+    from memory_manual import aplicar_memoria_manual
+    """Endpoint que consulta memoria y devuelve contexto del agente"""
+    try:
+        from services.semantic_memory import obtener_estado_sistema, obtener_contexto_agente
+
+        agent_id = req.params.get("agent_id")
+
+        if agent_id:
+            # Contexto específico del agente
+            resultado = obtener_contexto_agente(agent_id)
+        else:
+            # Estado general del sistema
+            resultado = obtener_estado_sistema()
+
+        # Aplicar memoria manual al resultado
+        resultado = aplicar_memoria_manual(req, resultado)
+
+        return func.HttpResponse(
+            json.dumps(resultado, ensure_ascii=False, indent=2),
+            mimetype="application/json",
+            status_code=200 if resultado.get("exito") else 500
+        )
+
+    except Exception as e:
+        logging.error(f"Error en contexto-agente: {e}")
+        error_result = {"exito": False, "error": str(e)}
+        error_result = aplicar_memoria_manual(req, error_result)
+        return func.HttpResponse(
+            json.dumps(error_result, ensure_ascii=False, indent=2),
+            mimetype="application/json",
+            status_code=500
+        )
+
+
+def interpretar_intencion_http(req: func.HttpRequest) -> func.HttpResponse:
+    from memory_manual import aplicar_memoria_manual
+    from endpoints.ejecutar_cli import ejecutar_comando_sistema
+    """Endpoint que interpreta lenguaje natural y genera comandos"""
+    try:
+        body = req.get_json() if req.get_body() else {}
+
+        # Extraer consulta del usuario
+        consulta = (
+            body.get("consulta") or
+            body.get("query") or
+            body.get("mensaje") or
+            body.get("texto") or
+            ""
+        ).strip()
+
+        if not consulta:
+            return func.HttpResponse(
+                json.dumps({
+                    "exito": False,
+                    "error": "Se requiere una consulta para interpretar",
+                    "ejemplos": [
+                        "quiero actualizar requests",
+                        "cómo instalo matplotlib",
+                        "dime el estado de mis recursos",
+                        "analizar logs de app insights"
+                    ]
+                }),
+                status_code=400,
+                mimetype="application/json"
+            )
+
+        # Parsear intención
+        from semantic_intent_parser import parse_natural_language
+
+        resultado = parse_natural_language(consulta)
+
+        # Si tiene comando directo
+        if "command" in resultado:
+            comando = resultado["command"]
+            tipo = resultado.get("type", "generic")
+
+            # Si requiere confirmación, no ejecutar automáticamente
+            if resultado.get("requires_confirmation", False):
+                return func.HttpResponse(
+                    json.dumps({
+                        "exito": True,
+                        "interpretacion": {
+                            "consulta_original": consulta,
+                            "comando_sugerido": comando,
+                            "tipo_comando": tipo,
+                            "explicacion": resultado.get("explanation", ""),
+                            "confianza": resultado.get("confidence", 0.8)
+                        },
+                        "requiere_confirmacion": True,
+                        "mensaje_confirmacion": resultado.get("confirmation_message", f"¿Confirmas ejecutar: {comando}?"),
+                        "acciones_disponibles": {
+                            "confirmar": f"POST /api/ejecutar-comando con {{\"comando\": \"{comando}\"}}",
+                            "cancelar": "No hacer nada"
+                        }
+                    }),
+                    mimetype="application/json",
+                    status_code=200
+                )
+
+            # Ejecutar comando directamente
+            resultado_ejecucion = ejecutar_comando_sistema(comando, tipo)
+
+            return func.HttpResponse(
+                json.dumps({
+                    "exito": True,
+                    "interpretacion": {
+                        "consulta_original": consulta,
+                        "comando_ejecutado": comando,
+                        "tipo_comando": tipo,
+                        "explicacion": resultado.get("explanation", ""),
+                        "confianza": resultado.get("confidence", 0.8)
+                    },
+                    "ejecucion": {
+                        "exitoso": resultado_ejecucion.get("exito", False),
+                        "resultado": resultado_ejecucion.get("output", ""),
+                        "error": resultado_ejecucion.get("error"),
+                        "tiempo": resultado_ejecucion.get("duration", "unknown")
+                    }
+                }),
+                mimetype="application/json",
+                status_code=200
+            )
+
+        # Si requiere grounding
+        elif resultado.get("requires_grounding", False):
+            try:
+                grounding_result = ejecutar_bing_grounding_fallback(
+                    resultado.get("grounding_query", consulta),
+                    resultado.get("context", "general"),
+                    {"original_query": consulta}
+                )
+
+                return func.HttpResponse(
+                    json.dumps({
+                        "exito": True,
+                        "interpretacion": {
+                            "consulta_original": consulta,
+                            "requiere_informacion_adicional": True,
+                            "explicacion": resultado.get("explanation", "Consulta requiere más contexto")
+                        },
+                        "grounding": grounding_result,
+                        "sugerencias": resultado.get("suggestions", [])
+                    }),
+                    mimetype="application/json",
+                    status_code=200
+                )
+            except Exception as e:
+                # Fallback si grounding falla
+                return func.HttpResponse(
+                    json.dumps({
+                        "exito": True,
+                        "interpretacion": {
+                            "consulta_original": consulta,
+                            "mensaje": "Tu consulta necesita más información específica",
+                            "explicacion": resultado.get("explanation", "")
+                        },
+                        "sugerencias": resultado.get("suggestions", [
+                            "Sé más específico sobre qué quieres hacer",
+                            "Menciona nombres exactos de paquetes o recursos"
+                        ]),
+                        "error_grounding": str(e)
+                    }),
+                    mimetype="application/json",
+                    status_code=200
+                )
+
+        # Respuesta general
+        return func.HttpResponse(
+            json.dumps({
+                "exito": False,
+                "interpretacion": {
+                    "consulta_original": consulta,
+                    "mensaje": "No se pudo interpretar la consulta"
+                },
+                "sugerencias": [
+                    "Reformula tu consulta",
+                    "Usa comandos más específicos",
+                    "Ejemplos: 'instalar numpy', 'actualizar requests', 'estado de recursos'"
+                ]
+            }),
+            mimetype="application/json",
+            status_code=422
+        )
+
+    except Exception as e:
+        logging.error(f"Error en interpretar-intencion: {e}")
+        return func.HttpResponse(
+            json.dumps({
+                "exito": False,
+                "error": str(e),
+                "mensaje": "Error procesando la consulta"
+            }),
+            mimetype="application/json",
+            status_code=500
+        )
+
+
+def historial_directo(req: func.HttpRequest) -> func.HttpResponse:
+    from cosmos_memory_direct import consultar_memoria_cosmos_directo
+    session_id = req.headers.get("Session-ID") or "none"
+    resultado = consultar_memoria_cosmos_directo(req)
+    return func.HttpResponse(
+        json.dumps({
+            "session_id": session_id,
+            "resultado": resultado
+        }, default=str, ensure_ascii=False),
+        mimetype="application/json",
+        status_code=200,
+        charset='utf-8'  # Forzar UTF-8
+    )
+
+
+def buscar_memoria(req: func.HttpRequest) -> func.HttpResponse:
+    """Buscar en memoria semántica"""
+    try:
+        from endpoints_search_memory import buscar_memoria_endpoint
+        req_body = req.get_json()
+        resultado = buscar_memoria_endpoint(req_body)
+        return func.HttpResponse(
+            json.dumps(resultado, default=str),
+            mimetype="application/json",
+            status_code=200 if resultado.get("exito") else 400
+        )
+    except Exception as e:
+        return func.HttpResponse(
+            json.dumps({"exito": False, "error": str(e)}),
+            mimetype="application/json",
+            status_code=500
+        )
+
+
+def indexar_memoria(req: func.HttpRequest) -> func.HttpResponse:
+    """Indexar documentos en memoria semántica"""
+    try:
+        from endpoints_search_memory import indexar_memoria_endpoint
+        req_body = req.get_json()
+        resultado = indexar_memoria_endpoint(req_body)
+        return func.HttpResponse(
+            json.dumps(resultado, default=str),
+            mimetype="application/json",
+            status_code=200 if resultado.get("exito") else 400
+        )
+    except Exception as e:
+        return func.HttpResponse(
+            json.dumps({"exito": False, "error": str(e)}),
+            mimetype="application/json",
+            status_code=500
+        )
@@ -11,9 +11,23 @@ import os
 import re
 import unicodedata
 from functools import lru_cache
-from typing import Dict, Any, List, Optional
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timezone
 
+try:
+    import numpy as np
+except Exception:  # pragma: no cover
+    np = None
+
+from services.intent_embedding_artifact import (
+    IntentEmbeddingArtifact,
+    example_hash,
+    examples_signature,
+    load_available,
+    runtime_dir as intent_artifact_runtime_dir,
+)
+
 # Stopwords basicos para reducir ruido en espanol/ingles
 STOPWORDS = {
     "el", "la", "los", "las", "un", "una", "unos", "unas", "de", "del", "a", "al",
@@ -112,8 +126,6 @@ def get_text_embedding(text: str) -> List[float]:
     cleaned_text = text or ""
 
     try:
-        from openai import AzureOpenAI
-
         # Soportar ambos formatos de variable
         api_key = os.getenv("AZURE_OPENAI_API_KEY") or os.getenv(
             "AZURE_OPENAI_KEY")
@@ -122,21 +134,12 @@ def get_text_embedding(text: str) -> List[float]:
         if not api_key or not endpoint:
             return _hash_embedding(cleaned_text)
 
-        client = AzureOpenAI(
-            api_key=api_key,
-            api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-01"),
-            azure_endpoint=endpoint
-        )
+        from services.embedding_service import get_embedding_service
 
-        # Usar text-embedding-3-large que ya tienes desplegado
-        response = client.embeddings.create(
-            model="text-embedding-3-large",
-            input=cleaned_text
-        )
-
-        embedding = response.data[0].embedding
-        if embedding:
-            return list(embedding)
+        # Usar text-embedding-3-large que ya tienes desplegado (caché por contenido)
+        embedding = get_embedding_service("text-embedding-3-large").embed(cleaned_text)
+        if embedding is not None:
+            return embedding.tolist()
 
     except Exception as exc:
         logging.debug(f"Fallback a hash embedding: {exc}")
@@ -159,6 +162,84 @@ def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
         return 0.0
 
 
+HASH_EMBEDDING_DIM = 384
+EMBEDDING_MODEL = "text-embedding-3-large"
+
+
+def _embeddings_api_available() -> bool:
+    """Mismas credenciales que get_text_embedding (si faltan, todo es hash)."""
+    api_key = os.getenv("AZURE_OPENAI_API_KEY") or os.getenv("AZURE_OPENAI_KEY")
+    return bool(api_key and os.getenv("AZURE_OPENAI_ENDPOINT"))
+
+
+def _embedding_model_key(dim: int) -> str:
+    """Modelo que produjo un embedding, inferido por su dimension."""
+    return "hash" if dim == HASH_EMBEDDING_DIM else EMBEDDING_MODEL
+
+
+class _IntentMatrix:
+    """
+    Embeddings de ejemplos de un modelo como una sola matriz (n, d) float32
+    normalizada por filas; `labels[i]` es la intencion de la fila i.
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.labels: List[str] = []
+        # Buffer con capacidad creciente; las filas validas son [:len(labels)]
+        self._buf = np.zeros((64, dim), dtype=np.float32)
+
+    @classmethod
+    def from_array(cls, labels: List[str], vectors: "np.ndarray") -> "_IntentMatrix":
+        """Envuelve filas ya normalizadas (p. ej. un memmap) sin copiarlas."""
+        matrix = cls(int(vectors.shape[1]))
+        matrix._buf = vectors
+        matrix.labels = list(labels)
+        return matrix
+
+    @property
+    def vectors(self) -> "np.ndarray":
+        return self._buf[: len(self.labels)]
+
+    @staticmethod
+    def _normalize(vector: Any) -> "np.ndarray":
+        arr = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(arr))
+        return arr / norm if norm > 0 else arr
+
+    def append(self, intent: str, vector: Any) -> None:
+        pos = len(self.labels)
+        if pos >= self._buf.shape[0]:
+            grown = np.zeros((self._buf.shape[0] * 2, self.dim), dtype=np.float32)
+            grown[:pos] = self._buf[:pos]
+            self._buf = grown
+        self._buf[pos] = self._normalize(vector)
+        self.labels.append(intent)
+
+    def trim(self, intent: str, keep_last: int) -> None:
+        """Conserva solo las `keep_last` filas mas recientes de `intent`."""
+        rows = [i for i, label in enumerate(self.labels) if label == intent]
+        drop = set(rows[: max(0, len(rows) - keep_last)])
+        if not drop:
+            return
+        keep = [i for i in range(len(self.labels)) if i not in drop]
+        kept = self._buf[keep]
+        self._buf = np.zeros((max(64, len(keep) * 2), self.dim), dtype=np.float32)
+        self._buf[: len(keep)] = kept
+        self.labels = [self.labels[i] for i in keep]
+
+    def max_by_intent(self, vector: Any) -> Dict[str, float]:
+        """Similitud coseno maxima por intencion (un solo producto matriz-vector)."""
+        if not self.labels:
+            return {}
+        sims = self.vectors @ self._normalize(vector)
+        scores: Dict[str, float] = {}
+        for label, sim in zip(self.labels, sims.tolist()):
+            if sim > scores.get(label, 0.0):
+                scores[label] = sim
+        return scores
+
+
 class SemanticIntentClassifier:
     """Clasificador de intencion basado en similitud semantica."""
 
@@ -283,23 +364,148 @@ class SemanticIntentClassifier:
 
         # Lazy loading de embeddings - solo calcular cuando se necesiten
         self.intent_embeddings: Dict[str, List[List[float]]] = {}
+        # Una matriz normalizada por modelo de embedding (clave: "hash" / nombre del modelo)
+        self._matrices: Dict[str, _IntentMatrix] = {}
         self._embeddings_computed = False
 
-    def _ensure_embeddings_computed(self):
+        # Memory-map del artefacto precomputado: si cubre todos los ejemplos
+        # el clasificador queda listo sin llamar a Azure OpenAI
+        if np is not None and _embeddings_api_available():
+            self._load_from_artifacts(compute_missing=False)
+
+    def _add_example_embedding(self, intent: str, embedding: List[float]) -> None:
+        if np is None:
+            self.intent_embeddings.setdefault(intent, []).append(embedding)
+            return
+        key = _embedding_model_key(len(embedding))
+        matrix = self._matrices.get(key)
+        if matrix is None:
+            matrix = self._matrices[key] = _IntentMatrix(len(embedding))
+        matrix.append(intent, embedding)
+
+    def _example_rows(self) -> List[Tuple[str, str, str]]:
+        """[(intent, ejemplo preprocesado, hash)] en el orden de intent_examples."""
+        rows = []
+        for intent, examples in self.intent_examples.items():
+            for example in examples:
+                cleaned = preprocess_text(example)
+                rows.append((intent, cleaned, example_hash(EMBEDDING_MODEL, cleaned)))
+        return rows
+
+    def _load_from_artifacts(self, compute_missing: bool = True,
+                             persist_dir: Optional[Path] = None,
+                             force_write: bool = False) -> bool:
+        """
+        Construye la matriz del modelo reutilizando filas de los artefactos
+        (memmap) por hash de ejemplo; solo los ejemplos nuevos o cambiados se
+        embeben, en un batch. Lo que no se pueda embeber cae a _hash_embedding.
+        Con compute_missing=False solo acepta un artefacto que cubra todo.
+        """
+        rows = self._example_rows()
+        hashes = [h for _, _, h in rows]
+        signature = examples_signature(EMBEDDING_MODEL, self.intent_examples)
+        artifacts = load_available(EMBEDDING_MODEL)
+
+        # Camino rapido: artefacto exacto -> matriz directamente sobre el memmap
+        for artifact in artifacts:
+            if artifact.signature == signature and artifact.hashes == hashes:
+                self._matrices = {EMBEDDING_MODEL: _IntentMatrix.from_array(
+                    artifact.labels, artifact.vectors)}
+                self._embeddings_computed = True
+                if force_write and persist_dir is not None:
+                    IntentEmbeddingArtifact.write(
+                        persist_dir, EMBEDDING_MODEL, signature,
+                        list(zip(artifact.labels, artifact.hashes)), artifact.vectors)
+                logging.info(
+                    f"[SemanticIntent] Embeddings cargados del artefacto {artifact.base} ({len(hashes)} ejemplos)")
+                return True
+        if not compute_missing:
+            return False
+
+        vectors: Dict[int, Any] = {}
+        for idx, h in enumerate(hashes):
+            for artifact in artifacts:
+                pos = artifact.positions.get(h)
+                if pos is not None:
+                    vectors[idx] = artifact.vectors[pos]
+                    break
+        reused = len(vectors)
+
+        missing = [idx for idx in range(len(rows)) if idx not in vectors]
+        if missing:
+            from services.embedding_service import get_embedding_service
+            embedded = get_embedding_service(EMBEDDING_MODEL).embed_many(
+                [rows[idx][1] for idx in missing])
+            for idx, vector in zip(missing, embedded):
+                if vector is not None:
+                    vectors[idx] = vector
+        computed = len(vectors) - reused
+
+        dims = {int(v.shape[0]) for v in vectors.values()}
+        dim = max(dims, key=lambda d: sum(1 for v in vectors.values() if v.shape[0] == d)) if dims else 0
+
+        self._matrices = {}
+        self.intent_embeddings = {}
+        model_rows: List[Tuple[str, str]] = []
+        for idx, (intent, cleaned, h) in enumerate(rows):
+            vector = vectors.get(idx)
+            if vector is None or vector.shape[0] != dim:
+                self._add_example_embedding(intent, _hash_embedding(cleaned))
+                continue
+            self._add_example_embedding(intent, vector)
+            model_rows.append((intent, h))
+        self._embeddings_computed = True
+
+        logging.info(
+            f"[SemanticIntent] Embeddings: {reused} reutilizados del artefacto, {computed} calculados, "
+            f"{len(rows) - reused - computed} con hash fallback")
+
+        model_matrix = self._matrices.get(EMBEDDING_MODEL)
+        if persist_dir is not None and model_matrix is not None and (computed or force_write):
+            complete = len(model_rows) == len(rows)
+            IntentEmbeddingArtifact.write(
+                persist_dir, EMBEDDING_MODEL, signature if complete else "",
+                model_rows, model_matrix.vectors)
+        return True
+
+    def _ensure_embeddings_computed(self, persist: bool = True):
         """Lazy loading: calcula embeddings solo cuando se necesitan por primera vez."""
         if not self._embeddings_computed:
+            if np is not None and _embeddings_api_available():
+                self._load_from_artifacts(
+                    persist_dir=intent_artifact_runtime_dir() if persist else None)
+                return
             logging.info(
                 "[SemanticIntent] Calculando embeddings por primera vez (lazy loading)...")
+            self._matrices = {}
+            self.intent_embeddings = {}
             for intent, examples in self.intent_examples.items():
-                self.intent_embeddings[intent] = []
                 for example in examples:
                     cleaned = preprocess_text(example)
-                    self.intent_embeddings[intent].append(
-                        get_text_embedding(cleaned))
+                    self._add_example_embedding(intent, get_text_embedding(cleaned))
             self._embeddings_computed = True
             logging.info(
                 f"[SemanticIntent] Embeddings calculados: {len(self.intent_examples)} intents, {sum(len(examples) for examples in self.intent_examples.values())} ejemplos")
 
+    def _score_intents(self, cleaned_text: str, user_embedding: List[float]) -> Dict[str, float]:
+        """Similitud maxima del input con los ejemplos de cada intencion."""
+        intent_scores: Dict[str, float] = {intent: 0.0 for intent in self.intent_examples}
+
+        if np is None:
+            for intent, embeddings in self.intent_embeddings.items():
+                intent_scores[intent] = max(
+                    [0.0] + [cosine_similarity(user_embedding, e) for e in embeddings])
+            return intent_scores
+
+        matrix = self._matrices.get(_embedding_model_key(len(user_embedding)))
+        if matrix is None and "hash" in self._matrices:
+            # Los ejemplos solo tienen embeddings hash: comparar en ese espacio
+            matrix = self._matrices["hash"]
+            user_embedding = _hash_embedding(cleaned_text)
+        if matrix is not None:
+            intent_scores.update(matrix.max_by_intent(user_embedding))
+        return intent_scores
+
     def classify_intent(self, user_input: str, threshold: Optional[float] = None) -> Dict[str, Any]:
         """
         Clasifica la intencion del usuario basado en similitud semantica.
@@ -481,10 +687,9 @@ class SemanticIntentClassifier:
 
         best_intent = None
         best_confidence = 0.0
-        intent_scores: Dict[str, float] = {}
 
         # ⚡ Si no hay ejemplos (diccionario vacío), usar solo keywords detection
-        if not self.intent_embeddings:
+        if not self.intent_examples:
             return {
                 "intent": "ayuda_general",
                 "confidence": 0.6,
@@ -494,18 +699,9 @@ class SemanticIntentClassifier:
                 "preprocessed_input": cleaned_text
             }
 
-        # Calcular similitud con cada intencion (solo si hay ejemplos)
-        for intent, embeddings in self.intent_embeddings.items():
-            max_similarity = 0.0
-
-            # Tomar la maxima similitud con cualquier ejemplo de esta intencion
-            for example_embedding in embeddings:
-                similarity = cosine_similarity(
-                    user_embedding, example_embedding)
-                max_similarity = max(max_similarity, similarity)
-
-            intent_scores[intent] = max_similarity
-
+        # Similitud con todos los ejemplos en un solo producto matriz-vector
+        intent_scores = self._score_intents(cleaned_text, user_embedding)
+        for intent, max_similarity in intent_scores.items():
             if max_similarity > best_confidence:
                 best_confidence = max_similarity
                 best_intent = intent
@@ -551,13 +747,15 @@ class SemanticIntentClassifier:
             if command_used and command_used != self.intent_to_command.get(correct_intent):
                 self.intent_to_command[correct_intent] = command_used
 
-            # Re-calcular embeddings para este intent específico (solo si ya estaban calculados)
+            # Actualizar la matriz de forma incremental (solo si ya estaba calculada)
             if self._embeddings_computed:
-                self.intent_embeddings[correct_intent] = []
-                for example in self.intent_examples[correct_intent]:
-                    cleaned_example = preprocess_text(example)
-                    self.intent_embeddings[correct_intent].append(
-                        get_text_embedding(cleaned_example))
+                self._add_example_embedding(
+                    correct_intent, get_text_embedding(preprocess_text(cleaned_input)))
+                for matrix in self._matrices.values():
+                    matrix.trim(correct_intent, self.max_examples_per_intent)
+                if correct_intent in self.intent_embeddings:
+                    self.intent_embeddings[correct_intent] = \
+                        self.intent_embeddings[correct_intent][-self.max_examples_per_intent:]
 
             logging.info(
                 f"Aprendizaje anadido: '{user_input}' -> {correct_intent}")
@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+Azure Clients
+-------------
+Registro de clientes Azure compartido por todo el proceso:
+
+- Cada SDK client (Blob, Cosmos, Search, AzureOpenAI) se crea una sola vez.
+- Los clientes de azure-core comparten un `requests.Session` con pool HTTP
+  ajustado (AZURE_HTTP_POOL_CONNECTIONS / AZURE_HTTP_POOL_MAXSIZE) y
+  keep-alive; AzureOpenAI usa un `httpx.Client` con límites equivalentes.
+- Las credenciales AAD se envuelven en `CachedTokenCredential`: el token se
+  reutiliza hasta AZURE_TOKEN_REFRESH_MARGIN_S antes de expirar y un thread
+  en segundo plano lo renueva antes de que un request tenga que esperar.
+- `stats()` expone clientes creados, tokens y ocupación de los pools.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+COGNITIVE_SERVICES_SCOPE = "https://cognitiveservices.azure.com/.default"
+
+
+class CachedTokenCredential:
+    """
+    Envuelve un TokenCredential de azure-identity y cachea los AccessToken
+    por scopes, renovándolos proactivamente en segundo plano.
+    """
+
+    def __init__(self, inner: Any, refresh_margin_s: Optional[float] = None):
+        self._inner = inner
+        self._margin = refresh_margin_s if refresh_margin_s is not None else float(
+            os.getenv("AZURE_TOKEN_REFRESH_MARGIN_S", "300"))
+        self._tokens: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        self._refresher: Optional[threading.Thread] = None
+        self._stats = {"token_hits": 0, "token_fetches": 0, "background_refreshes": 0,
+                       "refresh_errors": 0}
+
+    def _incr(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def _fetch(self, key: Tuple[str, ...], **kwargs: Any) -> Any:
+        token = self._inner.get_token(*key, **kwargs)
+        with self._lock:
+            self._tokens[key] = token
+        self._incr("token_fetches")
+        self._ensure_refresher()
+        return token
+
+    def get_token(self, *scopes: str, **kwargs: Any) -> Any:
+        key = tuple(scopes)
+        if kwargs.get("claims") or kwargs.get("tenant_id"):
+            # Desafíos CAE / multi-tenant: no se cachean
+            return self._inner.get_token(*scopes, **kwargs)
+        with self._lock:
+            token = self._tokens.get(key)
+        if token is not None and token.expires_on - self._margin > time.time():
+            self._incr("token_hits")
+            return token
+        return self._fetch(key)
+
+    def _ensure_refresher(self) -> None:
+        if self._refresher is not None:
+            return
+        with self._lock:
+            if self._refresher is None:
+                self._refresher = threading.Thread(
+                    target=self._refresh_loop, name="azure-token-refresh", daemon=True)
+                self._refresher.start()
+
+    def _refresh_loop(self) -> None:
+        while True:
+            with self._lock:
+                tokens = dict(self._tokens)
+            now = time.time()
+            next_check = 60.0
+            for key, token in tokens.items():
+                # Renovar un poco antes de que get_token lo considere vencido
+                due = token.expires_on - self._margin * 1.5
+                if due <= now:
+                    try:
+                        self._fetch(key)
+                        self._incr("background_refreshes")
+                    except Exception as exc:
+                        self._incr("refresh_errors")
+                        logging.warning(f"[AzureClients] No se pudo renovar token {key}: {exc}")
+                else:
+                    next_check = min(next_check, due - now)
+            time.sleep(max(5.0, next_check))
+
+    def close(self) -> None:
+        close = getattr(self._inner, "close", None)
+        if callable(close):
+            close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot: Dict[str, Any] = dict(self._stats)
+            snapshot["cached_scopes"] = [
+                {"scopes": list(key), "expires_in_s": int(token.expires_on - time.time())}
+                for key, token in self._tokens.items()
+            ]
+        return snapshot
+
+
+class AzureClientRegistry:
+    """Crea y reutiliza los clientes Azure del proceso."""
+
+    def __init__(self):
+        self._pool_connections = int(os.getenv("AZURE_HTTP_POOL_CONNECTIONS", "16"))
+        self._pool_maxsize = int(os.getenv("AZURE_HTTP_POOL_MAXSIZE", "32"))
+        self._keepalive_s = float(os.getenv("AZURE_HTTP_KEEPALIVE_S", "60"))
+        self._clients: Dict[Any, Any] = {}
+        self._lock = threading.RLock()
+        self._session: Any = None
+        self._httpx_client: Any = None
+        self._created: Dict[str, int] = {}
+
+    def _get_or_create(self, key: Any, factory) -> Any:
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = factory()
+                self._clients[key] = client
+                kind = key[0] if isinstance(key, tuple) else str(key)
+                self._created[kind] = self._created.get(kind, 0) + 1
+                logging.info(f"[AzureClients] Cliente creado: {kind}")
+        return client
+
+    # ------------------------------------------------------------------ #
+    # HTTP compartido
+    # ------------------------------------------------------------------ #
+    def http_session(self) -> Any:
+        """`requests.Session` con pool ajustado, compartido por azure-core y REST directo."""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=self._pool_connections,
+                                          pool_maxsize=self._pool_maxsize, pool_block=False)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    def transport(self) -> Any:
+        """Transporte azure-core sobre la sesión compartida (una instancia por cliente)."""
+        from azure.core.pipeline.transport import RequestsTransport
+        return RequestsTransport(session=self.http_session(), session_owner=False)
+
+    def httpx_client(self) -> Any:
+        if self._httpx_client is None:
+            with self._lock:
+                if self._httpx_client is None:
+                    import httpx
+
+                    self._httpx_client = httpx.Client(
+                        limits=httpx.Limits(max_connections=self._pool_maxsize,
+                                            max_keepalive_connections=self._pool_connections,
+                                            keepalive_expiry=self._keepalive_s),
+                        timeout=httpx.Timeout(float(os.getenv("AZURE_OPENAI_TIMEOUT_S", "60")),
+                                              connect=10.0),
+                    )
+        return self._httpx_client
+
+    # ------------------------------------------------------------------ #
+    # Credenciales
+    # ------------------------------------------------------------------ #
+    def credential(self) -> CachedTokenCredential:
+        """DefaultAzureCredential (sin credenciales interactivas) con caché de tokens."""
+        def _factory():
+            from azure.identity import DefaultAzureCredential
+            return CachedTokenCredential(DefaultAzureCredential(
+                exclude_interactive_browser_credential=True,
+                exclude_visual_studio_code_credential=True,
+                exclude_shared_token_cache_credential=True,
+            ))
+        return self._get_or_create(("credential", "default"), _factory)
+
+    def service_principal_credential(self) -> Optional[CachedTokenCredential]:
+        """ClientSecretCredential desde AZURE_CLIENT_ID/SECRET/TENANT_ID, o None."""
+        client_id = os.getenv("AZURE_CLIENT_ID")
+        client_secret = os.getenv("AZURE_CLIENT_SECRET")
+        tenant_id = os.getenv("AZURE_TENANT_ID")
+        if not (client_id and client_secret and tenant_id):
+            return None
+
+        def _factory():
+            from azure.identity import ClientSecretCredential
+            return CachedTokenCredential(ClientSecretCredential(
+                tenant_id=tenant_id, client_id=client_id, client_secret=client_secret))
+        return self._get_or_create(("credential", "service_principal", client_id), _factory)
+
+    def bearer_token(self, scope: str = COGNITIVE_SERVICES_SCOPE,
+                     service_principal: bool = False) -> Optional[str]:
+        credential = self.service_principal_credential() if service_principal else self.credential()
+        if credential is None:
+            return None
+        return credential.get_token(scope).token
+
+    # ------------------------------------------------------------------ #
+    # SDK clients
+    # ------------------------------------------------------------------ #
+    def blob_service_client(self) -> Optional[Any]:
+        """BlobServiceClient por AzureWebJobsStorage o AZURE_STORAGE_ACCOUNT_URL + MI."""
+        connection_string = os.environ.get("AzureWebJobsStorage")
+        account_url = os.environ.get("AZURE_STORAGE_ACCOUNT_URL")
+        if not connection_string and not account_url:
+            return None
+
+        def _factory():
+            from azure.storage.blob import BlobServiceClient
+            if connection_string:
+                return BlobServiceClient.from_connection_string(
+                    connection_string, transport=self.transport())
+            return BlobServiceClient(account_url, credential=self.credential(),
+                                     transport=self.transport())
+        return self._get_or_create(("blob", connection_string or account_url), _factory)
+
+    def cosmos_client(self, endpoint: str, key: Optional[str] = None) -> Any:
+        def _factory():
+            from azure.cosmos import CosmosClient
+            return CosmosClient(endpoint, key or self.credential(), transport=self.transport())
+        return self._get_or_create(("cosmos", endpoint, bool(key)), _factory)
+
+    def search_client(self, index_name: str, endpoint: Optional[str] = None,
+                      key: Optional[str] = None) -> Any:
+        endpoint = endpoint or os.environ.get("AZURE_SEARCH_ENDPOINT")
+        key = key if key is not None else os.environ.get("AZURE_SEARCH_KEY")
+        if not endpoint:
+            raise ValueError("AZURE_SEARCH_ENDPOINT no configurado")
+
+        def _factory():
+            from azure.search.documents import SearchClient
+            if key:
+                from azure.core.credentials import AzureKeyCredential
+                credential: Any = AzureKeyCredential(key)
+            else:
+                credential = self.credential()
+            return SearchClient(endpoint=endpoint, index_name=index_name,
+                                credential=credential, transport=self.transport())
+        return self._get_or_create(("search", endpoint, index_name), _factory)
+
+    def openai_client(self, api_version: Optional[str] = None) -> Any:
+        """AzureOpenAI con API key (AZURE_OPENAI_KEY / AZURE_OPENAI_API_KEY) o Managed Identity."""
+        endpoint = os.environ.get("AZURE_OPENAI_ENDPOINT")
+        if not endpoint:
+            raise ValueError("AZURE_OPENAI_ENDPOINT no está definido en las variables de entorno")
+        api_version = api_version or os.environ.get("AZURE_OPENAI_API_VERSION", "2024-02-01")
+
+        def _factory():
+            from openai import AzureOpenAI
+            api_key = os.environ.get("AZURE_OPENAI_KEY") or os.environ.get("AZURE_OPENAI_API_KEY")
+            common = {"api_version": api_version, "azure_endpoint": endpoint,
+                      "http_client": self.httpx_client()}
+            if api_key:
+                return AzureOpenAI(api_key=api_key, **common)
+            credential = self.credential()
+            return AzureOpenAI(
+                azure_ad_token_provider=lambda: credential.get_token(COGNITIVE_SERVICES_SCOPE).token,
+                **common)
+        return self._get_or_create(("openai", endpoint, api_version), _factory)
+
+    # ------------------------------------------------------------------ #
+    # Métricas
+    # ------------------------------------------------------------------ #
+    def _requests_pool_stats(self) -> Dict[str, Any]:
+        if self._session is None:
+            return {}
+        pools = []
+        for adapter in set(self._session.adapters.values()):
+            manager = getattr(adapter, "poolmanager", None)
+            container = getattr(getattr(manager, "pools", None), "_container", {}) or {}
+            for key, pool in list(container.items()):
+                idle = pool.pool.qsize() if getattr(pool, "pool", None) is not None else 0
+                pools.append({
+                    "host": getattr(key, "key_host", None) or getattr(pool, "host", None),
+                    "connections_opened": getattr(pool, "num_connections", 0),
+                    "requests": getattr(pool, "num_requests", 0),
+                    "idle": idle,
+                    "maxsize": self._pool_maxsize,
+                })
+        return {"pools": pools, "pool_count": len(pools)}
+
+    def _httpx_pool_stats(self) -> Dict[str, Any]:
+        if self._httpx_client is None:
+            return {}
+        pool = getattr(getattr(self._httpx_client, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", []) or [])
+        return {
+            "connections": len(connections),
+            "idle": sum(1 for c in connections if getattr(c, "is_idle", lambda: False)()),
+            "max_connections": self._pool_maxsize,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            clients = dict(self._created)
+            credentials = {
+                "/".join(str(part) for part in key[1:2]): client.stats()
+                for key, client in self._clients.items()
+                if isinstance(key, tuple) and key[0] == "credential"
+            }
+        return {
+            "clients_created": clients,
+            "credentials": credentials,
+            "http_pool": self._requests_pool_stats(),
+            "openai_pool": self._httpx_pool_stats(),
+        }
+
+
+azure_clients = AzureClientRegistry()
@@ -5,13 +5,14 @@ Azure Search Client - Cliente con Búsqueda Vectorial Semántica
 import os
 import logging
 from typing import Dict, List, Any, Optional
-from azure.identity import DefaultAzureCredential
 from azure.search.documents import SearchClient
 from azure.search.documents.models import VectorizedQuery
-from azure.core.credentials import AzureKeyCredential
-from openai import AzureOpenAI
 from datetime import datetime, timezone
 
+from services.azure_clients import azure_clients
+from services.embedding_service import get_embedding_service
+from services.perf_tracer import traced
+
 _search_service_instance = None
 
 
@@ -25,54 +26,29 @@ class AzureSearchService:
         if not self.endpoint:
             raise ValueError("AZURE_SEARCH_ENDPOINT no configurado")
 
-        search_key = os.environ.get("AZURE_SEARCH_KEY")
-
-        if search_key:
-            credential = AzureKeyCredential(search_key)
+        if os.environ.get("AZURE_SEARCH_KEY"):
             logging.info("🔑 Azure Search: Usando API Key (desarrollo local)")
         else:
-            credential = DefaultAzureCredential()
             logging.info("🔐 Azure Search: Usando Managed Identity")
 
-        self._credential = credential
-        self._clients: Dict[str, SearchClient] = {}
         self.client = self._get_client_for_index(self.index_name)
 
-        # Cliente OpenAI para generar embeddings
-        openai_endpoint = os.environ.get("AZURE_OPENAI_ENDPOINT")
-        if not openai_endpoint:
-            raise ValueError(
-                "AZURE_OPENAI_ENDPOINT no está definido en las variables de entorno")
-
-        self.openai_client = AzureOpenAI(
-            api_key=os.environ.get("AZURE_OPENAI_KEY"),
-            api_version="2024-02-01",
-            azure_endpoint=openai_endpoint
-        )
+        # Cliente OpenAI compartido para generar embeddings
+        self.openai_client = azure_clients.openai_client(api_version="2024-02-01")
 
         self.embedding_model = os.environ.get(
             "AZURE_OPENAI_EMBEDDING_DEPLOYMENT", "text-embedding-3-large")
 
     def _get_client_for_index(self, index_name: str) -> SearchClient:
-        """Crea o reutiliza un cliente para el índice solicitado."""
-        if index_name in self._clients:
-            return self._clients[index_name]
-        client = SearchClient(
-            endpoint=self.endpoint,
-            index_name=index_name,
-            credential=self._credential
-        )
-        self._clients[index_name] = client
-        return client
+        """Reutiliza el cliente del registro compartido para el índice solicitado."""
+        return azure_clients.search_client(index_name, endpoint=self.endpoint)
 
+    @traced("search.embedding")
     def _generar_embedding(self, texto: str) -> List[float]:
         """Genera embedding vectorial para el texto usando Azure OpenAI"""
         try:
-            response = self.openai_client.embeddings.create(
-                input=texto,
-                model=self.embedding_model
-            )
-            return response.data[0].embedding
+            vector = get_embedding_service(self.embedding_model).embed(texto)
+            return vector.tolist() if vector is not None else []
         except Exception as e:
             logging.error(f"Error generando embedding: {e}")
             return []
@@ -119,6 +95,7 @@ class AzureSearchService:
             except Exception:
                 return 0.0
 
+    @traced("search.query")
     def search(self, query: str, top: int = 10, filters: Optional[str] = None) -> Dict[str, Any]:
         """Búsqueda vectorial semántica usando embeddings.
         Postprocesa resultados aplicando orden híbrido (score × recencia) y
@@ -174,6 +151,7 @@ class AzureSearchService:
             logging.error(f"Error en búsqueda vectorial: {e}")
             return {"exito": False, "error": str(e)}
 
+    @traced("search.upload")
     def upload_documents(self, documents: List[Dict[str, Any]], index_name: Optional[str] = None) -> Dict[str, Any]:
         """Subir documentos al índice"""
         try:
@@ -193,6 +171,7 @@ class AzureSearchService:
         """Alias de upload_documents para compatibilidad con el indexador."""
         return self.upload_documents(documents, index_name=index_name)
 
+    @traced("search.get_document")
     def get_document(self, doc_id: str) -> Dict[str, Any]:
         """Obtener un documento por ID"""
         try:
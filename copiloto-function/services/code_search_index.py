@@ -0,0 +1,612 @@
+# -*- coding: utf-8 -*-
+"""
+Code Search Index
+-----------------
+Índice de trigramas para msearch (`file_path: "*"`), en lugar de descargar y
+recorrer con `re.search` cada blob en cada request:
+
+- Un documento por archivo .py/.js/.ts/.json/.md/.txt; trigramas sobre los
+  bytes UTF-8 del contenido en minúsculas (la búsqueda es IGNORECASE).
+- Persistido en un solo archivo por origen (CODE_INDEX_DIR) que se abre con
+  mmap: tabla de trigramas ordenada + listas de postings (uint32), trigramas
+  por documento y contenido comprimido (zlib) para verificar sin descargar.
+- Mantenimiento incremental: `refresh()` compara el listado (ETag del blob o
+  mtime/size local) con el índice y solo descarga lo nuevo o modificado; lo
+  que no cambió se copia del archivo anterior. Cada versión se escribe como
+  una generación nueva (`<origen>.<gen>.idx`, desde un temporal propio del
+  proceso) y se cambia de forma atómica. CODE_INDEX_DIR se comparte entre
+  procesos worker: la generación se numera y publica bajo un lock de archivo
+  (`<origen>.lock`); sin fcntl (Windows) el índice es por proceso.
+- El refresco periódico corre en segundo plano y mientras tanto se sirve la
+  generación vigente; solo el primer índice (sin generación) se construye en
+  el request. Una generación reemplazada se cierra (mmap y fd) cuando la
+  suelta la última búsqueda que la usaba.
+- Consulta: del regex se extraen literales ASCII obligatorios (secuencias,
+  grupos, repeticiones con mínimo >= 1 y alternativas) y se intersectan sus
+  postings; solo los candidatos se verifican con el regex real. Un patrón
+  sin literales útiles verifica todos los documentos (desde el contenido
+  local, sin red).
+- De los archivos mayores a CODE_INDEX_MAX_FILE_BYTES se indexan los
+  trigramas pero no el contenido: si son candidatos se descargan al
+  verificar. Los no decodificables en UTF-8 quedan fuera, como antes.
+"""
+import bisect
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from array import array
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: índice por proceso
+    fcntl = None
+
+try:
+    import re._parser as sre_parse  # Python 3.11+
+    import re._constants as sre_constants
+except ImportError:  # pragma: no cover - Python < 3.11
+    import sre_parse
+    import sre_constants
+
+INDEXED_EXTENSIONS = ('.py', '.js', '.ts', '.json', '.md', '.txt')
+
+_MAGIC = b"CSIDX001"
+_U32 = "I" if array("I").itemsize == 4 else "L"
+
+
+def _trigrams(data: bytes) -> array:
+    """Trigramas únicos y ordenados de `data` como enteros de 24 bits."""
+    grams = {data[i:i + 3] for i in range(len(data) - 2)}
+    return array(_U32, sorted(int.from_bytes(g, "big") for g in grams))
+
+
+def _pad8(buffer: bytearray) -> None:
+    buffer.extend(b"\0" * (-len(buffer) % 8))
+
+
+@dataclass
+class _Doc:
+    name: str
+    validator: str
+    # "ok" con contenido; "grande" solo trigramas; "error" no decodificable
+    estado: str
+    trigrams: array
+    content: bytes  # zlib
+
+
+class _Snapshot:
+    """Vista de solo lectura de un archivo de índice mapeado en memoria."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        # Búsquedas en curso sobre esta generación; `retired` al reemplazarla
+        self.users = 0
+        self.retired = False
+        self._fh = open(path, "rb")
+        self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mm)
+        self._views = [view]
+        try:
+            if bytes(view[:8]) != _MAGIC:
+                raise ValueError(f"{path.name}: formato de índice desconocido")
+            header_len = struct.unpack_from("<I", view, 8)[0]
+            header = json.loads(bytes(view[12:12 + header_len]).decode("utf-8"))
+        except Exception:
+            self.close()
+            raise
+        self.docs: List[Dict[str, Any]] = header["docs"]
+        self.by_name = {doc["name"]: i for i, doc in enumerate(self.docs)}
+        sections = header["sections"]
+
+        def section(name: str, typecode: str):
+            start, length = sections[name]
+            raw = view[start:start + length]
+            self._views.append(raw)
+            if not typecode:
+                return raw
+            cast = raw.cast(typecode)
+            self._views.append(cast)
+            return cast
+
+        self.keys = section("keys", _U32)
+        self.post_off = section("post_off", _U32)
+        self.postings = section("postings", _U32)
+        self.doc_tri_off = section("doc_tri_off", _U32)
+        self.doc_tri = section("doc_tri", _U32)
+        self.content_off = section("content_off", "Q")
+        self.content = section("content", "")
+
+    def postings_for(self, gram: int) -> Set[int]:
+        i = bisect.bisect_left(self.keys, gram)
+        if i < len(self.keys) and self.keys[i] == gram:
+            return set(self.postings[self.post_off[i]:self.post_off[i + 1]])
+        return set()
+
+    def doc_trigrams(self, doc_id: int) -> array:
+        return array(_U32, self.doc_tri[self.doc_tri_off[doc_id]:self.doc_tri_off[doc_id + 1]])
+
+    def doc_content(self, doc_id: int) -> bytes:
+        """Contenido comprimido tal como está en el archivo."""
+        return bytes(self.content[self.content_off[doc_id]:self.content_off[doc_id + 1]])
+
+    def text(self, doc_id: int) -> str:
+        return zlib.decompress(self.doc_content(doc_id)).decode("utf-8")
+
+    def size_bytes(self) -> int:
+        return len(self._mm)
+
+    def close(self) -> None:
+        """Libera el mmap y el fd; las vistas derivadas se sueltan antes."""
+        for view in reversed(self._views):
+            view.release()
+        self._views.clear()
+        self._mm.close()
+        self._fh.close()
+
+
+class CodeSearchIndex:
+    """Índice de un origen (contenedor de blobs o raíz local)."""
+
+    def __init__(self, name: str, directory: Path, max_file_bytes: int):
+        if fcntl is None:
+            name = f"{name}-{os.getpid()}"
+        self.name = name
+        self.directory = directory
+        self.max_file_bytes = max_file_bytes
+        self._snapshot: Optional[_Snapshot] = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        # Protege el conteo de usuarios de cada snapshot y el reemplazo
+        self._ref_lock = threading.Lock()
+        self._lock_path = directory / f"{name}.lock"
+        self.last_refresh = 0.0
+        self.last_refresh_stats: Dict[str, Any] = {}
+        self._load_latest()
+
+    # ------------------------------------------------------------------ #
+    # Persistencia
+    # ------------------------------------------------------------------ #
+    def _generations(self) -> List[Tuple[int, Path]]:
+        found = []
+        for path in self.directory.glob(f"{self.name}.*.idx"):
+            try:
+                found.append((int(path.suffixes[-2].lstrip(".")), path))
+            except (ValueError, IndexError):
+                continue
+        return sorted(found)
+
+    def _load_latest(self) -> None:
+        for generation, path in reversed(self._generations()):
+            try:
+                self._snapshot = _Snapshot(path)
+                self._generation = generation
+                return
+            except Exception as e:
+                logging.warning(f"[CodeSearchIndex] Índice {path.name} ilegible: {e}")
+
+    @contextmanager
+    def _reading(self) -> Iterator[Optional[_Snapshot]]:
+        """Snapshot vigente, que no se cierra mientras dure el bloque."""
+        with self._ref_lock:
+            snapshot = self._snapshot
+            if snapshot is not None:
+                snapshot.users += 1
+        try:
+            yield snapshot
+        finally:
+            if snapshot is not None:
+                with self._ref_lock:
+                    snapshot.users -= 1
+                    close = snapshot.retired and snapshot.users == 0
+                if close:
+                    snapshot.close()
+
+    def _swap(self, snapshot: _Snapshot) -> None:
+        with self._ref_lock:
+            old, self._snapshot = self._snapshot, snapshot
+            close = old is not None and old.users == 0
+            if old is not None:
+                old.retired = True
+        if close:
+            old.close()
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Serializa entre procesos la numeración y publicación de generaciones."""
+        with open(self._lock_path, "a+b") as lock_fh:
+            if fcntl is not None:
+                fcntl.flock(lock_fh.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_fh.fileno(), fcntl.LOCK_UN)
+
+    def _write(self, docs: List[_Doc]) -> Path:
+        inverted: Dict[int, List[int]] = {}
+        for doc_id, doc in enumerate(docs):
+            for gram in doc.trigrams:
+                inverted.setdefault(gram, []).append(doc_id)
+        keys = array(_U32, sorted(inverted))
+        post_off, postings = array(_U32, [0]), array(_U32)
+        for gram in keys:
+            postings.extend(inverted[gram])
+            post_off.append(len(postings))
+        doc_tri_off, doc_tri = array(_U32, [0]), array(_U32)
+        content_off, content = array("Q", [0]), bytearray()
+        for doc in docs:
+            doc_tri.extend(doc.trigrams)
+            doc_tri_off.append(len(doc_tri))
+            content.extend(doc.content)
+            content_off.append(len(content))
+
+        payload = [("keys", keys.tobytes()), ("post_off", post_off.tobytes()), ("postings", postings.tobytes()),
+                   ("doc_tri_off", doc_tri_off.tobytes()), ("doc_tri", doc_tri.tobytes()),
+                   ("content_off", content_off.tobytes()), ("content", bytes(content))]
+        meta = [{"name": d.name, "validator": d.validator, "estado": d.estado} for d in docs]
+
+        # Enteros en orden de bytes nativo: el archivo es local a la instancia.
+        # Offsets absolutos: se calcula el header con un tamaño fijo reservado
+        def build_header(base: int) -> Tuple[bytes, Dict[str, List[int]]]:
+            sections, offset = {}, base
+            for name, data in payload:
+                sections[name] = [offset, len(data)]
+                offset += len(data) + (-len(data) % 8)
+            header = json.dumps({"version": 1, "docs": meta, "sections": sections},
+                                ensure_ascii=False).encode("utf-8")
+            return header, sections
+
+        header, _ = build_header(0)
+        base = 12 + len(header) + 256
+        while True:
+            base += -base % 8
+            header, _ = build_header(base)
+            if len(header) <= base - 12:
+                break
+            base += 256
+        header = header.ljust(base - 12, b" ")
+
+        # Temporal propio del proceso; se publica con el número de generación
+        # tomado bajo el lock de archivo (otro proceso pudo avanzar el suyo)
+        tmp = self.directory / f"{self.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp, "wb") as fh:
+                out = bytearray(_MAGIC)
+                out.extend(struct.pack("<I", len(header)))
+                out.extend(header)
+                fh.write(out)
+                for _, data in payload:
+                    chunk = bytearray(data)
+                    _pad8(chunk)
+                    fh.write(chunk)
+            with self._file_lock():
+                generations = self._generations()
+                generation = max([self._generation] + [g for g, _ in generations]) + 1
+                path = self.directory / f"{self.name}.{generation}.idx"
+                os.replace(tmp, path)
+                self._cleanup(generation)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        self._generation = generation
+        return path
+
+    def _cleanup(self, keep: int) -> None:
+        """Borra las generaciones anteriores a `keep` (se llama bajo el lock de archivo)."""
+        for generation, path in self._generations():
+            if generation < keep:
+                try:
+                    path.unlink()
+                except OSError:
+                    # Windows: puede seguir mapeado por una búsqueda en curso
+                    pass
+
+    # ------------------------------------------------------------------ #
+    # Mantenimiento incremental
+    # ------------------------------------------------------------------ #
+    def refresh(self, listing: Iterable[Tuple[str, str, int]],
+                fetch: Callable[[str], bytes]) -> Dict[str, Any]:
+        """
+        `listing`: (nombre, validador, tamaño) de los archivos actuales.
+        `fetch(nombre)`: bytes del archivo (solo se llama para nuevos/modificados).
+        """
+        with self._lock, self._reading() as old:
+            start = time.perf_counter()
+            docs: List[_Doc] = []
+            stats = {"reused": 0, "fetched": 0, "removed": 0, "errors": 0}
+            seen = set()
+            for name, validator, size in listing:
+                seen.add(name)
+                old_id = old.by_name.get(name) if old else None
+                if old_id is not None and old.docs[old_id]["validator"] == validator:
+                    docs.append(_Doc(name, validator, old.docs[old_id]["estado"],
+                                     old.doc_trigrams(old_id), old.doc_content(old_id)))
+                    stats["reused"] += 1
+                    continue
+                try:
+                    data = fetch(name)
+                    text = data.decode("utf-8")
+                except Exception as e:
+                    logging.warning(f"[CodeSearchIndex] No se pudo indexar {name}: {e}")
+                    docs.append(_Doc(name, validator, "error", array(_U32), b""))
+                    stats["errors"] += 1
+                    continue
+                grams = _trigrams(text.lower().encode("utf-8"))
+                if max(size, len(data)) > self.max_file_bytes:
+                    docs.append(_Doc(name, validator, "grande", grams, b""))
+                else:
+                    docs.append(_Doc(name, validator, "ok", grams, zlib.compress(data, 6)))
+                stats["fetched"] += 1
+            if old:
+                stats["removed"] = sum(1 for doc in old.docs if doc["name"] not in seen)
+
+            changed = old is None or stats["removed"] > 0 or stats["reused"] < len(docs)
+            if changed:
+                self._swap(_Snapshot(self._write(docs)))
+            self.last_refresh = time.monotonic()
+            stats["ms"] = round((time.perf_counter() - start) * 1000, 2)
+            stats["rewritten"] = bool(changed)
+            self.last_refresh_stats = stats
+            return stats
+
+    # ------------------------------------------------------------------ #
+    # Consulta
+    # ------------------------------------------------------------------ #
+    def search(self, pattern: str, fetch: Callable[[str], bytes]) -> Dict[str, Any]:
+        """
+        Documentos cuyo contenido cumple `pattern` (IGNORECASE) con su texto,
+        más métricas de candidatos. `fetch` se usa solo para candidatos "grande".
+        """
+        regex = re.compile(pattern, re.IGNORECASE)
+        with self._reading() as snapshot:
+            if snapshot is None:
+                return {"hits": [], "candidates": 0, "verified": 0, "documents": 0}
+            return self._search(snapshot, regex, pattern, fetch)
+
+    def _search(self, snapshot: _Snapshot, regex: "re.Pattern", pattern: str,
+                fetch: Callable[[str], bytes]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        candidates = _evaluate(_required_literals(pattern), snapshot)
+        if candidates is None:
+            candidates = {i for i, doc in enumerate(snapshot.docs) if doc["estado"] != "error"}
+        filter_ms = (time.perf_counter() - start) * 1000
+
+        hits = []
+        for doc_id in sorted(candidates):
+            doc = snapshot.docs[doc_id]
+            try:
+                text = snapshot.text(doc_id) if doc["estado"] == "ok" \
+                    else fetch(doc["name"]).decode("utf-8")
+            except Exception as e:
+                logging.warning(f"[CodeSearchIndex] Error verificando {doc['name']}: {e}")
+                continue
+            if regex.search(text):
+                hits.append((doc["name"], text))
+        return {
+            "hits": hits,
+            "candidates": len(candidates),
+            "documents": len(snapshot.docs),
+            "filter_ms": round(filter_ms, 2),
+            "total_ms": round((time.perf_counter() - start) * 1000, 2),
+        }
+
+    def read_text(self, name: str, fetch: Callable[[str], bytes]) -> Optional[str]:
+        """Texto de `name` desde el índice (o con `fetch` si no se guardó)."""
+        with self._reading() as snapshot:
+            doc_id = snapshot.by_name.get(name) if snapshot else None
+            if doc_id is None or snapshot.docs[doc_id]["estado"] == "error":
+                return None
+            if snapshot.docs[doc_id]["estado"] == "ok":
+                return snapshot.text(doc_id)
+        return fetch(name).decode("utf-8")
+
+    def documents(self) -> List[Dict[str, Any]]:
+        with self._reading() as snapshot:
+            return list(snapshot.docs) if snapshot else []
+
+    def stats(self) -> Dict[str, Any]:
+        with self._reading() as snapshot:
+            return {
+                "documents": len(snapshot.docs) if snapshot else 0,
+                "trigrams": len(snapshot.keys) if snapshot else 0,
+                "file_bytes": snapshot.size_bytes() if snapshot else 0,
+                "generation": self._generation,
+                "last_refresh": self.last_refresh_stats,
+            }
+
+    @property
+    def ready(self) -> bool:
+        return self._snapshot is not None
+
+
+# ---------------------------------------------------------------------- #
+# Regex -> literales obligatorios
+# ---------------------------------------------------------------------- #
+_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT}
+if hasattr(sre_constants, "POSSESSIVE_REPEAT"):
+    _REPEATS.add(sre_constants.POSSESSIVE_REPEAT)
+
+
+def _required_literals(pattern: str) -> Tuple:
+    """
+    Árbol ("and"|"or", [...]) / ("lit", texto) con los literales que todo
+    match debe contener. Solo literales ASCII (en minúsculas), para que la
+    equivalencia con IGNORECASE sea exacta; lo demás no restringe.
+    """
+    try:
+        parsed = sre_parse.parse(pattern, re.IGNORECASE)
+    except Exception:
+        return ("and", [])
+    return _analyze(list(parsed))
+
+
+def _analyze(items: List[Tuple[Any, Any]]) -> Tuple:
+    nodes: List[Tuple] = []
+    run: List[str] = []
+
+    def flush() -> None:
+        if len(run) >= 3:
+            nodes.append(("lit", "".join(run).lower()))
+        run.clear()
+
+    for op, av in items:
+        if op is sre_constants.LITERAL and av < 128:
+            run.append(chr(av))
+            continue
+        flush()
+        if op is sre_constants.SUBPATTERN:
+            nodes.append(_analyze(list(av[-1])))
+        elif op in _REPEATS:
+            low, _, item = av
+            if low >= 1:
+                nodes.append(_analyze(list(item)))
+        elif op is sre_constants.BRANCH:
+            nodes.append(("or", [_analyze(list(alt)) for alt in av[1]]))
+        elif getattr(sre_constants, "ATOMIC_GROUP", None) is not None and op is sre_constants.ATOMIC_GROUP:
+            nodes.append(_analyze(list(av)))
+    flush()
+    return ("and", nodes)
+
+
+def _evaluate(node: Tuple, snapshot: _Snapshot) -> Optional[Set[int]]:
+    """Conjunto de documentos candidatos, o None si el nodo no restringe."""
+    kind, value = node
+    if kind == "lit":
+        grams = _trigrams(value.encode("utf-8"))
+        result: Optional[Set[int]] = None
+        for gram in sorted(grams, key=lambda g: len(snapshot.postings_for(g))):
+            postings = snapshot.postings_for(gram)
+            result = postings if result is None else result & postings
+            if not result:
+                return set()
+        return result
+    if kind == "and":
+        result = None
+        for child in value:
+            child_set = _evaluate(child, snapshot)
+            if child_set is not None:
+                result = child_set if result is None else result & child_set
+                if not result:
+                    return set()
+        return result
+    # "or": basta una alternativa sin restricción para no poder filtrar
+    union: Set[int] = set()
+    for child in value:
+        child_set = _evaluate(child, snapshot)
+        if child_set is None:
+            return None
+        union |= child_set
+    return union
+
+
+# ---------------------------------------------------------------------- #
+# Orígenes
+# ---------------------------------------------------------------------- #
+class CodeSearchService:
+    def __init__(self):
+        self.directory = Path(os.getenv("CODE_INDEX_DIR")
+                              or Path(tempfile.gettempdir()) / "copiloto-code-index")
+        self.refresh_s = float(os.getenv("CODE_INDEX_REFRESH_S", "30"))
+        self.max_file_bytes = int(os.getenv("CODE_INDEX_MAX_FILE_BYTES", str(2 * 1024 * 1024)))
+        self._indexes: Dict[str, CodeSearchIndex] = {}
+        self._refreshing: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def _index(self, name: str) -> CodeSearchIndex:
+        with self._lock:
+            index = self._indexes.get(name)
+            if index is None:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                index = CodeSearchIndex(name, self.directory, self.max_file_bytes)
+                self._indexes[name] = index
+            return index
+
+    def _stale(self, index: CodeSearchIndex, force: bool) -> bool:
+        return force or not index.last_refresh or time.monotonic() - index.last_refresh >= self.refresh_s
+
+    def _maybe_refresh(self, index: CodeSearchIndex, force: bool,
+                       listing: Callable[[], Iterable[Tuple[str, str, int]]],
+                       fetch: Callable[[str], bytes]) -> None:
+        """
+        Refresca en línea si se fuerza o no hay generación que servir; si no,
+        lanza un refresco en segundo plano (uno por índice) y se sirve la vigente.
+        """
+        if not self._stale(index, force):
+            return
+        if force or not index.ready:
+            index.refresh(listing(), fetch)
+            return
+        with self._lock:
+            if index.name in self._refreshing:
+                return
+            self._refreshing.add(index.name)
+
+        def _run() -> None:
+            try:
+                index.refresh(listing(), fetch)
+            except Exception as e:
+                logging.warning(f"[CodeSearchIndex] Refresco de {index.name} falló: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(index.name)
+
+        threading.Thread(target=_run, name=f"code-index-{index.name}", daemon=True).start()
+
+    def blob_index(self, container_client: Any, container_name: str,
+                   force_refresh: bool = False) -> Tuple[CodeSearchIndex, Callable[[str], bytes]]:
+        def fetch(name: str) -> bytes:
+            return container_client.get_blob_client(name).download_blob().readall()
+
+        def listing() -> Iterable[Tuple[str, str, int]]:
+            return ((blob.name, str(blob.etag), blob.size or 0)
+                    for blob in container_client.list_blobs()
+                    if blob.name.endswith(INDEXED_EXTENSIONS))
+
+        index = self._index(f"blob-{re.sub(r'[^A-Za-z0-9_-]', '_', container_name)}")
+        self._maybe_refresh(index, force_refresh, listing, fetch)
+        return index, fetch
+
+    def local_index(self, root: Path,
+                    force_refresh: bool = False) -> Tuple[CodeSearchIndex, Callable[[str], bytes]]:
+        def fetch(name: str) -> bytes:
+            return (root / name).read_bytes()
+
+        def listing() -> Iterable[Tuple[str, str, int]]:
+            for path in root.rglob("*"):
+                if path.suffix in INDEXED_EXTENSIONS:
+                    try:
+                        if not path.is_file():
+                            continue
+                        st = path.stat()
+                    except OSError:
+                        continue
+                    yield str(path.relative_to(root)), f"{st.st_mtime_ns}:{st.st_size}", st.st_size
+
+        key = re.sub(r"[^A-Za-z0-9_-]", "_", str(root))[-80:]
+        index = self._index(f"local-{key}")
+        self._maybe_refresh(index, force_refresh, listing, fetch)
+        return index, fetch
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            indexes = dict(self._indexes)
+        with self._lock:
+            refreshing = sorted(self._refreshing)
+        return {"directory": str(self.directory), "refresh_s": self.refresh_s,
+                "refreshing": refreshing,
+                "indexes": {name: index.stats() for name, index in indexes.items()}}
+
+
+code_search = CodeSearchService()
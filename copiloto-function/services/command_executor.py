@@ -0,0 +1,437 @@
+# -*- coding: utf-8 -*-
+"""
+Command Executor
+----------------
+Motor compartido de ejecución de procesos hijos para los endpoints de CLI y
+scripts (az, docker, bash, ejecutar-script*), en lugar de `subprocess.run`
+sin límite de concurrencia en cada handler:
+
+- Pool acotado de workers (CMD_EXECUTOR_WORKERS) con cola de prioridades
+  (CMD_EXECUTOR_QUEUE_MAX); con la cola llena se rechaza (`CommandRejected`)
+  en vez de lanzar más procesos. Un comando que espera en cola más de
+  CMD_EXECUTOR_QUEUE_TIMEOUT_S también se rechaza. CMD_EXECUTOR_RESERVED_WORKERS
+  workers (1 por defecto) quedan reservados a prioridades no BACKGROUND: los
+  builds largos no pueden ocupar el pool entero.
+- Timeout por comando y cancelación (`CommandHandle.cancel()`); se mata el
+  grupo de procesos completo, no solo el shell. El timeout cubre también la
+  espera de EOF en los pipes: un nieto en segundo plano que los heredó no
+  retiene al worker más allá del timeout (como en `subprocess.run`).
+- stdout/stderr se leen en streaming: callback opcional `on_output` por
+  fragmento y captura acotada a CMD_OUTPUT_MAX_BYTES por stream (el resto se
+  descarta pero se sigue drenando para que el hijo no se bloquee).
+- Comandos idénticos de solo lectura (`coalesce=True`) que ya están en cola
+  o ejecutándose comparten el mismo proceso.
+- Métricas de espera en cola vs. tiempo de ejecución (p50/p95/max).
+
+`run()` replica la forma de `subprocess.run(capture_output=True, text=True)`:
+devuelve un resultado con `returncode`, `stdout`, `stderr` y lanza
+`subprocess.TimeoutExpired` al vencer el timeout, así los `except` existentes
+siguen funcionando.
+"""
+import codecs
+import heapq
+import itertools
+import logging
+import os
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Union
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 5
+PRIORITY_BACKGROUND = 9
+
+READ_CHUNK_BYTES = 64 * 1024
+# Espera de EOF tras matar el grupo (o sin timeout, tras salir el proceso)
+READER_GRACE_S = 1.0
+
+CommandArgs = Union[str, Sequence[str]]
+OutputCallback = Callable[[str, str], None]
+
+
+class CommandRejected(RuntimeError):
+    """El executor no aceptó o no pudo iniciar el comando (cola llena o espera excedida)."""
+
+
+@dataclass
+class CommandResult:
+    args: CommandArgs
+    returncode: Optional[int]
+    stdout: str
+    stderr: str
+    timed_out: bool = False
+    cancelled: bool = False
+    stdout_truncated: bool = False
+    stderr_truncated: bool = False
+    queue_ms: float = 0.0
+    run_ms: float = 0.0
+
+    @property
+    def truncated(self) -> bool:
+        return self.stdout_truncated or self.stderr_truncated
+
+
+class _Capture:
+    """Buffer acotado de un stream, con decodificación incremental para el callback."""
+
+    def __init__(self, name: str, limit: int, encoding: str, errors: str,
+                 on_output: Optional[OutputCallback]):
+        self.name = name
+        self.limit = limit
+        self.buffer = bytearray()
+        self.dropped = 0
+        self.on_output = on_output
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors) if on_output else None
+
+    def feed(self, chunk: bytes) -> None:
+        room = self.limit - len(self.buffer)
+        if room > 0:
+            self.buffer.extend(chunk[:room])
+        self.dropped += max(0, len(chunk) - max(room, 0))
+        if self.on_output is not None:
+            text = self._decoder.decode(chunk)
+            if text:
+                try:
+                    self.on_output(self.name, text)
+                except Exception as e:
+                    logging.warning(f"[CommandExecutor] Callback de salida falló: {e}")
+
+
+class _Job:
+    def __init__(self, args: CommandArgs, shell: bool, timeout: Optional[float], cwd: Optional[str],
+                 env: Optional[Dict[str, str]], priority: int, max_output_bytes: int,
+                 encoding: str, errors: str, on_output: Optional[OutputCallback], key: Any):
+        self.args = args
+        self.shell = shell
+        self.timeout = timeout
+        self.cwd = cwd
+        self.env = env
+        self.priority = priority
+        self.max_output_bytes = max_output_bytes
+        self.encoding = encoding
+        self.errors = errors
+        self.on_output = on_output
+        self.key = key
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.process: Optional[subprocess.Popen] = None
+        self.cancelled = False
+        self.result: Optional[CommandResult] = None
+        self.error: Optional[BaseException] = None
+        self.done = threading.Event()
+        self.lock = threading.Lock()
+
+
+class CommandHandle:
+    """Referencia a un comando encolado o en ejecución."""
+
+    def __init__(self, executor: "CommandExecutor", job: _Job):
+        self._executor = executor
+        self._job = job
+
+    @property
+    def running(self) -> bool:
+        return self._job.started_at is not None and not self._job.done.is_set()
+
+    def done(self) -> bool:
+        return self._job.done.is_set()
+
+    def cancel(self) -> bool:
+        """Cancela el comando (lo saca de la cola o mata el proceso). False si ya terminó."""
+        return self._executor._cancel(self._job)
+
+    def result(self, timeout: Optional[float] = None) -> CommandResult:
+        """
+        Espera el resultado. Lanza CommandRejected si no se pudo iniciar y
+        subprocess.TimeoutExpired si el comando excedió su timeout.
+        """
+        if not self._job.done.wait(timeout):
+            raise TimeoutError("El comando sigue en ejecución")
+        job = self._job
+        if job.error is not None:
+            raise job.error
+        result = job.result
+        if result.timed_out:
+            raise subprocess.TimeoutExpired(job.args, job.timeout, output=result.stdout, stderr=result.stderr)
+        return result
+
+
+class _Timings:
+    def __init__(self, reservoir: int = 512):
+        self.count = 0
+        self.max_ms = 0.0
+        self.samples: Deque[float] = deque(maxlen=reservoir)
+
+    def observe(self, ms: float) -> None:
+        self.count += 1
+        self.max_ms = max(self.max_ms, ms)
+        self.samples.append(ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        values = sorted(self.samples)
+
+        def pct(p: float) -> Optional[float]:
+            if not values:
+                return None
+            return round(values[min(len(values) - 1, int(len(values) * p))], 2)
+
+        return {"count": self.count, "max_ms": round(self.max_ms, 2), "p50_ms": pct(0.5), "p95_ms": pct(0.95)}
+
+
+class CommandExecutor:
+    def __init__(self):
+        self.workers = max(1, int(os.getenv("CMD_EXECUTOR_WORKERS", "4")))
+        reserved = int(os.getenv("CMD_EXECUTOR_RESERVED_WORKERS", "1"))
+        # Workers que pueden ejecutar trabajos BACKGROUND a la vez (al menos uno)
+        self.background_slots = max(1, self.workers - max(0, reserved))
+        self.queue_max = int(os.getenv("CMD_EXECUTOR_QUEUE_MAX", "64"))
+        self.queue_timeout_s = float(os.getenv("CMD_EXECUTOR_QUEUE_TIMEOUT_S", "120"))
+        self.max_output_bytes = int(os.getenv("CMD_OUTPUT_MAX_BYTES", str(1024 * 1024)))
+        self._heap: List[Any] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._inflight: Dict[Any, _Job] = {}
+        self._running = 0
+        self._running_background = 0
+        self._queue_wait = _Timings()
+        self._run_time = _Timings()
+        self._counters = {"submitted": 0, "completed": 0, "failed": 0, "timeouts": 0, "cancelled": 0,
+                          "rejected": 0, "coalesced": 0, "truncated": 0}
+
+    # ------------------------------------------------------------------ #
+    # API
+    # ------------------------------------------------------------------ #
+    def submit(self, args: CommandArgs, *, shell: bool = False, timeout: Optional[float] = 30,
+               cwd: Optional[str] = None, env: Optional[Dict[str, str]] = None,
+               priority: int = PRIORITY_NORMAL, max_output_bytes: Optional[int] = None,
+               encoding: str = "utf-8", errors: str = "replace",
+               on_output: Optional[OutputCallback] = None, coalesce: bool = False) -> CommandHandle:
+        """Encola un comando y devuelve su handle. Lanza CommandRejected con la cola llena."""
+        key = None
+        if coalesce and on_output is None:
+            key = (args if isinstance(args, str) else tuple(args), shell, cwd)
+        with self._cond:
+            if key is not None and key in self._inflight:
+                self._counters["coalesced"] += 1
+                return CommandHandle(self, self._inflight[key])
+            if len(self._heap) >= self.queue_max:
+                self._counters["rejected"] += 1
+                raise CommandRejected(f"Cola de comandos llena ({self.queue_max} en espera)")
+            job = _Job(args, shell, timeout, cwd, env, priority,
+                       max_output_bytes or self.max_output_bytes, encoding, errors, on_output, key)
+            heapq.heappush(self._heap, (priority, next(self._seq), job))
+            if key is not None:
+                self._inflight[key] = job
+            self._counters["submitted"] += 1
+            self._ensure_workers()
+            self._cond.notify()
+        return CommandHandle(self, job)
+
+    def run(self, args: CommandArgs, **kwargs: Any) -> CommandResult:
+        """Ejecuta y espera (misma firma que `submit`)."""
+        return self.submit(args, **kwargs).result()
+
+    # ------------------------------------------------------------------ #
+    # Workers
+    # ------------------------------------------------------------------ #
+    def _ensure_workers(self) -> None:
+        # Se llama con self._cond tomado
+        self._threads = [t for t in self._threads if t.is_alive()]
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._worker, name=f"cmd-executor-{len(self._threads)}",
+                                      daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _can_take(self) -> bool:
+        # Se llama con self._cond tomado. El heap ordena por prioridad: si el
+        # primero es BACKGROUND, todos lo son
+        if not self._heap:
+            return False
+        return self._heap[0][0] < PRIORITY_BACKGROUND or self._running_background < self.background_slots
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                while not self._can_take():
+                    self._cond.wait()
+                _, _, job = heapq.heappop(self._heap)
+                if job.cancelled:
+                    continue
+                waited = time.monotonic() - job.enqueued_at
+                if waited > self.queue_timeout_s:
+                    self._counters["rejected"] += 1
+                    self._finish(job, error=CommandRejected(
+                        f"El comando esperó {waited:.0f}s en cola sin iniciar"))
+                    continue
+                background = job.priority >= PRIORITY_BACKGROUND
+                self._running += 1
+                self._running_background += background
+                self._queue_wait.observe(waited * 1000)
+            try:
+                result = self._execute(job)
+                self._finish(job, result=result)
+            except BaseException as e:
+                logging.warning(f"[CommandExecutor] Error ejecutando {job.args!r}: {e}")
+                self._finish(job, error=e)
+            finally:
+                with self._cond:
+                    self._running -= 1
+                    self._running_background -= background
+                    if background:
+                        # Un BACKGROUND en espera puede tomar el lugar liberado
+                        self._cond.notify()
+
+    def _execute(self, job: _Job) -> CommandResult:
+        popen_kwargs: Dict[str, Any] = {
+            "stdin": subprocess.DEVNULL, "stdout": subprocess.PIPE, "stderr": subprocess.PIPE,
+            "cwd": job.cwd, "env": job.env, "shell": job.shell,
+        }
+        if os.name == "posix":
+            # Grupo propio: el timeout mata también los hijos del shell
+            popen_kwargs["start_new_session"] = True
+        else:
+            popen_kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+
+        with job.lock:
+            if job.cancelled:
+                return CommandResult(job.args, None, "", "", cancelled=True)
+            job.started_at = time.monotonic()
+            process = subprocess.Popen(job.args, **popen_kwargs)
+            job.process = process
+
+        captures = [_Capture("stdout", job.max_output_bytes, job.encoding, job.errors, job.on_output),
+                    _Capture("stderr", job.max_output_bytes, job.encoding, job.errors, job.on_output)]
+        readers = [threading.Thread(target=self._pump, args=(stream, capture), daemon=True)
+                   for stream, capture in zip((process.stdout, process.stderr), captures)]
+        for reader in readers:
+            reader.start()
+
+        deadline = job.started_at + job.timeout if job.timeout is not None else None
+        timed_out = False
+        try:
+            process.wait(timeout=job.timeout)
+        except subprocess.TimeoutExpired:
+            timed_out = True
+        # El proceso terminó, pero un nieto en segundo plano puede seguir con
+        # los pipes abiertos: EOF se espera hasta el mismo deadline
+        if not timed_out:
+            eof_deadline = deadline if deadline is not None else time.monotonic() + READER_GRACE_S
+            for reader in readers:
+                reader.join(max(0.0, eof_deadline - time.monotonic()))
+        if deadline is not None and any(reader.is_alive() for reader in readers):
+            timed_out = True
+        if timed_out:
+            self._kill(process)
+            process.wait()
+            for reader in readers:
+                reader.join(READER_GRACE_S)
+        if any(reader.is_alive() for reader in readers):
+            # Un nieto fuera del grupo (setsid) retiene el pipe: los lectores
+            # (daemon) se abandonan y cierran su stream al recibir EOF. Cerrarlo
+            # aquí bloquearía en el lock del BufferedReader hasta ese momento
+            logging.warning(f"[CommandExecutor] Pipes de {job.args!r} siguen abiertos; se abandonan")
+
+        run_ms = (time.monotonic() - job.started_at) * 1000
+        out, err = captures
+        return CommandResult(
+            args=job.args,
+            returncode=process.returncode,
+            stdout=bytes(out.buffer).decode(job.encoding, job.errors),
+            stderr=bytes(err.buffer).decode(job.encoding, job.errors),
+            timed_out=timed_out,
+            cancelled=job.cancelled,
+            stdout_truncated=out.dropped > 0,
+            stderr_truncated=err.dropped > 0,
+            queue_ms=round((job.started_at - job.enqueued_at) * 1000, 2),
+            run_ms=round(run_ms, 2),
+        )
+
+    @staticmethod
+    def _pump(stream: Any, capture: _Capture) -> None:
+        read = getattr(stream, "read1", stream.read)
+        try:
+            while True:
+                chunk = read(READ_CHUNK_BYTES)
+                if not chunk:
+                    break
+                capture.feed(chunk)
+        except (OSError, ValueError):
+            pass
+        finally:
+            # El lector cierra su propio stream: nunca se cierra mientras se lee
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+    @staticmethod
+    def _kill(process: subprocess.Popen) -> None:
+        try:
+            if os.name == "posix":
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except (ProcessLookupError, PermissionError, OSError):
+            pass
+
+    def _cancel(self, job: _Job) -> bool:
+        with job.lock:
+            if job.done.is_set():
+                return False
+            job.cancelled = True
+            process = job.process
+        if process is not None:
+            self._kill(process)
+        else:
+            # Sigue en cola: el worker lo descarta al sacarlo
+            self._finish(job, result=CommandResult(job.args, None, "", "", cancelled=True))
+        return True
+
+    def _finish(self, job: _Job, result: Optional[CommandResult] = None,
+                error: Optional[BaseException] = None) -> None:
+        with self._cond:
+            if job.done.is_set():
+                return
+            if job.key is not None and self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+            if error is not None:
+                if not isinstance(error, CommandRejected):
+                    self._counters["failed"] += 1
+            elif result.cancelled:
+                self._counters["cancelled"] += 1
+            elif result.timed_out:
+                self._counters["timeouts"] += 1
+            else:
+                self._counters["completed"] += 1
+            if result is not None and result.truncated:
+                self._counters["truncated"] += 1
+            if result is not None and job.started_at is not None:
+                self._run_time.observe(result.run_ms)
+        job.result, job.error = result, error
+        job.done.set()
+
+    # ------------------------------------------------------------------ #
+    # Métricas
+    # ------------------------------------------------------------------ #
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "workers": self.workers,
+                "background_slots": self.background_slots,
+                "running": self._running,
+                "running_background": self._running_background,
+                "queued": len(self._heap),
+                "queue_max": self.queue_max,
+                **self._counters,
+                "queue_wait": self._queue_wait.snapshot(),
+                "run_time": self._run_time.snapshot(),
+            }
+
+
+command_executor = CommandExecutor()
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Context Fan-out
+---------------
+Ejecuta en paralelo las fuentes de contexto independientes (Redis, Cosmos,
+AI Search, GitHub) sobre un pool de threads compartido y acotado.
+
+- Deadline por fuente (CONTEXT_DEADLINE_<FUENTE>_MS o el default
+  CONTEXT_SOURCE_DEADLINE_MS) y presupuesto total (CONTEXT_BUDGET_MS).
+- Devuelve lo que llegó a tiempo; las fuentes que vencen, fallan o quedan
+  fuera del presupuesto se anotan en `dropped` con el motivo.
+- Una fuente vencida sigue corriendo en su thread (no se puede interrumpir),
+  pero su resultado se ignora.
+- Un fan-out anidado (llamado desde una fuente que ya corre en el pool) se
+  ejecuta en línea, en secuencia: si esperara a hijos encolados en el mismo
+  pool, con carga todos los workers quedarían bloqueados esperando.
+
+La latencia total pasa a ser el máximo de las fuentes (acotado por el
+presupuesto) en lugar de la suma.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+_local = threading.local()
+
+
+@dataclass
+class FanoutResult:
+    values: Dict[str, Any] = field(default_factory=dict)
+    dropped: Dict[str, str] = field(default_factory=dict)
+    latencies_ms: Dict[str, float] = field(default_factory=dict)
+    elapsed_ms: float = 0.0
+
+
+class ContextFanout:
+    """Pool compartido + deadlines por fuente para reunir contexto en paralelo."""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self._max_workers = max_workers or int(os.getenv("CONTEXT_FANOUT_WORKERS", "16"))
+        self._default_deadline = float(os.getenv("CONTEXT_SOURCE_DEADLINE_MS", "1500")) / 1000
+        self._default_budget = float(os.getenv("CONTEXT_BUDGET_MS", "2500")) / 1000
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._stats = {"runs": 0, "nested_inline": 0, "completed": 0, "timeouts": 0,
+                       "errors": 0, "budget_drops": 0}
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self._max_workers, thread_name_prefix="ctx-fanout")
+        return self._pool
+
+    def _incr(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    @staticmethod
+    def _call(fn: Callable[[], Any]) -> Any:
+        _local.in_fanout = True
+        try:
+            return fn()
+        finally:
+            _local.in_fanout = False
+
+    def _run_inline(self, sources: Dict[str, Callable[[], Any]], budget_end: float,
+                    start: float, result: FanoutResult) -> None:
+        """Fan-out anidado: en secuencia en el thread actual, hasta agotar el presupuesto."""
+        self._incr("nested_inline")
+        for name, fn in sources.items():
+            if time.monotonic() >= budget_end:
+                result.dropped[name] = "budget"
+                self._incr("budget_drops")
+                continue
+            try:
+                result.values[name] = fn()
+                self._incr("completed")
+            except Exception as exc:
+                result.dropped[name] = f"error: {exc}"
+                self._incr("errors")
+                logging.warning(f"[ContextFanout] Fuente '{name}' falló: {exc}")
+            result.latencies_ms[name] = round((time.monotonic() - start) * 1000, 2)
+
+    def deadline_for(self, source: str) -> float:
+        override = os.getenv(f"CONTEXT_DEADLINE_{source.upper()}_MS")
+        return float(override) / 1000 if override else self._default_deadline
+
+    def run(
+        self,
+        sources: Dict[str, Callable[[], Any]],
+        deadlines: Optional[Dict[str, float]] = None,
+        budget: Optional[float] = None,
+    ) -> FanoutResult:
+        """
+        Ejecuta `sources` ({nombre: callable}) en paralelo. `deadlines` en
+        segundos por fuente; `budget` en segundos para el total.
+        """
+        result = FanoutResult()
+        if not sources:
+            return result
+        self._incr("runs")
+        start = time.monotonic()
+        budget_end = start + (budget if budget is not None else self._default_budget)
+        deadlines = deadlines or {}
+
+        if getattr(_local, "in_fanout", False):
+            self._run_inline(sources, budget_end, start, result)
+            result.elapsed_ms = round((time.monotonic() - start) * 1000, 2)
+            return result
+
+        pool = self._executor()
+        pending: Dict[Future, str] = {}
+        ends: Dict[str, float] = {}
+        for name, fn in sources.items():
+            pending[pool.submit(self._call, fn)] = name
+            ends[name] = min(start + deadlines.get(name, self.deadline_for(name)), budget_end)
+
+        while pending:
+            now = time.monotonic()
+            # Vencer las fuentes cuyo deadline ya pasó
+            for future, name in list(pending.items()):
+                if now >= ends[name] and not future.done():
+                    future.cancel()
+                    del pending[future]
+                    over_budget = ends[name] >= budget_end
+                    result.dropped[name] = "budget" if over_budget else "timeout"
+                    self._incr("budget_drops" if over_budget else "timeouts")
+            if not pending:
+                break
+            next_end = min(ends[name] for name in pending.values())
+            done, _ = wait(list(pending), timeout=max(0.0, next_end - now),
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                result.latencies_ms[name] = round((time.monotonic() - start) * 1000, 2)
+                try:
+                    result.values[name] = future.result()
+                    self._incr("completed")
+                except Exception as exc:
+                    result.dropped[name] = f"error: {exc}"
+                    self._incr("errors")
+                    logging.warning(f"[ContextFanout] Fuente '{name}' falló: {exc}")
+
+        result.elapsed_ms = round((time.monotonic() - start) * 1000, 2)
+        if result.dropped:
+            logging.info(
+                f"[ContextFanout] {len(result.values)}/{len(sources)} fuentes en "
+                f"{result.elapsed_ms} ms; descartadas: {result.dropped}")
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot: Dict[str, Any] = dict(self._stats)
+        snapshot.update({
+            "max_workers": self._max_workers,
+            "default_deadline_ms": self._default_deadline * 1000,
+            "default_budget_ms": self._default_budget * 1000,
+        })
+        return snapshot
+
+
+context_fanout = ContextFanout()
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Cosmos Session Queries
+----------------------
+Acceso a Cosmos DB para consultas de una sola sesión sobre el contenedor
+`memory` (particionado por `/session_id`):
+
+- Siempre enruta con `partition_key=session_id` (sin fan-out cross-partition).
+- Límite real con `TOP @limit` y paginación por continuation token: solo se
+  leen las páginas necesarias.
+- Proyección de campos (`fields`) para no traer documentos completos.
+- RU por consulta desde el header `x-ms-request-charge`, agregado por nombre
+  de consulta en `stats()`.
+"""
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+REQUEST_CHARGE_HEADER = "x-ms-request-charge"
+
+
+@dataclass
+class SessionQueryResult:
+    items: List[Dict[str, Any]] = field(default_factory=list)
+    request_charge: float = 0.0
+    pages: int = 0
+    continuation: Optional[str] = None
+
+
+def build_projection(fields: Optional[Sequence[str]]) -> str:
+    """
+    `fields` son rutas relativas al documento ("id", "data.source"). Las
+    rutas anidadas se reconstruyen como objetos para conservar la forma
+    original (`{"data": {"source": ...}}`).
+    """
+    if not fields:
+        return "*"
+    top_level: List[str] = []
+    nested: Dict[str, List[str]] = {}
+    for path in fields:
+        root, _, rest = path.partition(".")
+        if rest:
+            nested.setdefault(root, []).append(rest)
+        elif root not in top_level:
+            top_level.append(root)
+    parts = [f"c.{name}" for name in top_level if name not in nested]
+    for root, children in nested.items():
+        inner = ", ".join(f'"{child.replace(".", "_")}": c.{root}.{child}' for child in children)
+        parts.append(f"{{{inner}}} AS {root}")
+    return ", ".join(parts)
+
+
+class SessionQueryExecutor:
+    """Ejecuta consultas acotadas a la partición de una sesión y contabiliza RU."""
+
+    def __init__(self, container_provider: Callable[[], Any]):
+        self._container_provider = container_provider
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _record(self, name: str, charge: float, items: int) -> None:
+        with self._lock:
+            entry = self._stats.setdefault(
+                name, {"queries": 0, "ru_total": 0.0, "ru_max": 0.0, "items": 0})
+            entry["queries"] += 1
+            entry["ru_total"] += charge
+            entry["ru_max"] = max(entry["ru_max"], charge)
+            entry["items"] += items
+
+    @staticmethod
+    def _last_charge(container: Any) -> float:
+        try:
+            headers = container.client_connection.last_response_headers or {}
+            return float(headers.get(REQUEST_CHARGE_HEADER, 0) or 0)
+        except Exception:
+            return 0.0
+
+    def query(
+        self,
+        name: str,
+        session_id: str,
+        where: Optional[str] = None,
+        parameters: Optional[List[Dict[str, Any]]] = None,
+        fields: Optional[Sequence[str]] = None,
+        order_by: Optional[str] = None,
+        limit: Optional[int] = None,
+        page_size: Optional[int] = None,
+        continuation: Optional[str] = None,
+    ) -> SessionQueryResult:
+        """
+        SELECT [TOP @limit] <fields> FROM c WHERE c.session_id = @session_id
+        [AND <where>] [ORDER BY <order_by>], dentro de la partición de la sesión.
+        """
+        result = SessionQueryResult()
+        container = self._container_provider()
+        if container is None or not session_id:
+            return result
+
+        params: List[Dict[str, Any]] = [{"name": "@session_id", "value": session_id}]
+        params.extend(parameters or [])
+        top = ""
+        if limit:
+            top = "TOP @limit "
+            params.append({"name": "@limit", "value": int(limit)})
+        query = f"SELECT {top}{build_projection(fields)} FROM c WHERE c.session_id = @session_id"
+        if where:
+            query += f" AND ({where})"
+        if order_by:
+            query += f" ORDER BY {order_by}"
+
+        pages = container.query_items(
+            query=query,
+            parameters=params,
+            partition_key=session_id,
+            max_item_count=page_size or (min(int(limit), 100) if limit else 100),
+        ).by_page(continuation)
+
+        for page in pages:
+            result.items.extend(page)
+            result.pages += 1
+            result.request_charge += self._last_charge(container)
+            if limit and len(result.items) >= limit:
+                break
+        result.continuation = getattr(pages, "continuation_token", None)
+        if limit:
+            result.items = result.items[:limit]
+
+        self._record(name, result.request_charge, len(result.items))
+        logging.debug(
+            f"[COSMOS] {name}: {len(result.items)} items, {result.pages} páginas, {result.request_charge:.2f} RU")
+        return result
+
+    def exists(self, name: str, session_id: str, where: str,
+               parameters: Optional[List[Dict[str, Any]]] = None) -> bool:
+        return bool(self.query(name, session_id, where=where, parameters=parameters,
+                               fields=["id"], limit=1).items)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                name: {**entry,
+                       "ru_total": round(entry["ru_total"], 2),
+                       "ru_avg": round(entry["ru_total"] / entry["queries"], 2) if entry["queries"] else 0.0}
+                for name, entry in self._stats.items()
+            }
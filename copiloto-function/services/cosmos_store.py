@@ -73,8 +73,8 @@ class CosmosMemoryStore:
         try:
             if not DefaultAzureCredential or not CosmosClient or not PartitionKey:
                 raise ImportError("Azure SDK components are not available.")
-            credential = DefaultAzureCredential()
-            self.client = CosmosClient(self.endpoint, credential=credential)
+            from services.azure_clients import azure_clients
+            self.client = azure_clients.cosmos_client(self.endpoint)
             self.database = self.client.create_database_if_not_exists(
                 id=self.database_name)
             self.container = self.database.create_container_if_not_exists(
@@ -0,0 +1,377 @@
+# -*- coding: utf-8 -*-
+"""
+Dedup Index
+-----------
+Índice local de duplicados para no consultar Cosmos / AI Search en cada
+escritura.
+
+- Exacto: filtro Bloom (bitmap en Redis `{dedup}:bloom` + espejo en proceso)
+  con dos ámbitos: por sesión (`session_id + texto_hash`, barrera de
+  `_persist_cosmos`) y global (hash del texto indexado en AI Search).
+  Un negativo es definitivo; un positivo se confirma con la consulta
+  autoritativa (Cosmos / búsqueda vectorial).
+- Casi-duplicados: SimHash de 64 bits de `texto_semantico` con 4 bandas de
+  16 bits en Redis (`{dedup}:sim:<banda>:<valor>`). Distancia de Hamming
+  <= DEDUP_SIMHASH_DISTANCE se trata como duplicado sin calcular embedding.
+- Se siembra desde Cosmos una sola vez (lock en Redis); mientras no esté
+  sembrado todas las respuestas son "desconocido" y se usa la consulta
+  autoritativa.
+- El espejo local se une al bitmap de Redis en un thread de fondo cada
+  DEDUP_MIRROR_REFRESH_S; el request solo hace GETBIT ante un negativo local.
+- Sin Redis el atajo Bloom se desactiva: un bitmap solo local no ve lo que
+  escribieron otros workers (falsos negativos), así que no se siembra y todo
+  va a la consulta autoritativa. El SimHash local sigue marcando duplicados.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+BLOOM_KEY = "{dedup}:bloom"
+SEEDED_KEY = "{dedup}:seeded"
+SEEDING_LOCK_KEY = "{dedup}:seeding"
+SIMHASH_BANDS = 4
+SIMHASH_BAND_BITS = 16
+
+
+def texto_hash(texto: str) -> str:
+    """Mismo hash que la barrera anti-duplicados de MemoryService."""
+    return hashlib.sha256((texto or "").strip().lower().encode("utf-8")).hexdigest()
+
+
+def simhash64(texto: str) -> int:
+    """SimHash de 64 bits sobre shingles de 3 palabras."""
+    words = re.findall(r"\w+", (texto or "").lower())
+    if len(words) >= 3:
+        shingles = [" ".join(words[i:i + 3]) for i in range(len(words) - 2)]
+    else:
+        shingles = words
+    if not shingles:
+        return 0
+    weights = [0] * 64
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def _bands(fingerprint: int) -> List[int]:
+    mask = (1 << SIMHASH_BAND_BITS) - 1
+    return [(fingerprint >> (i * SIMHASH_BAND_BITS)) & mask for i in range(SIMHASH_BANDS)]
+
+
+class DedupIndex:
+    """Bloom + SimHash con espejo en proceso y respaldo en Redis."""
+
+    def __init__(self, buffer: Any):
+        self._buffer = buffer
+        self._enabled = os.getenv("DEDUP_INDEX_ENABLED", "1").lower() not in (
+            "0", "false", "no", "off")
+        self._bits_count = int(os.getenv("DEDUP_BLOOM_BITS", str(1 << 23)))
+        self._hashes = int(os.getenv("DEDUP_BLOOM_HASHES", "7"))
+        self._max_distance = int(os.getenv("DEDUP_SIMHASH_DISTANCE", "3"))
+        self._refresh_s = float(os.getenv("DEDUP_MIRROR_REFRESH_S", "60"))
+        self._sim_ttl = int(os.getenv("DEDUP_SIMHASH_TTL", str(30 * 24 * 3600)))
+        self._local_sim_max = int(os.getenv("DEDUP_SIMHASH_LOCAL_MAX", "100000"))
+
+        self._bits = bytearray(self._bits_count // 8)
+        self._sim_local: List[Dict[int, Set[int]]] = [dict() for _ in range(SIMHASH_BANDS)]
+        self._sim_local_size = 0
+        self._lock = threading.Lock()
+        self._seeded = False
+        self._seed_thread: Optional[threading.Thread] = None
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._stats = {
+            "negatives": 0,
+            "positives": 0,
+            "unknown": 0,
+            "redis_confirms": 0,
+            "near_duplicates": 0,
+            "added": 0,
+            "seeded_items": 0,
+        }
+
+    # ------------------------------------------------------------------ #
+    # Helpers
+    # ------------------------------------------------------------------ #
+    def _incr(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[name] += amount
+
+    def _redis(self) -> Any:
+        if self._buffer is None or not self._buffer.is_enabled:
+            return None
+        return self._buffer._client
+
+    def _positions(self, item: str) -> List[int]:
+        digest = hashlib.sha256(item.encode("utf-8")).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:16], "big") | 1
+        return [(h1 + i * h2) % self._bits_count for i in range(self._hashes)]
+
+    def _local_has(self, positions: List[int]) -> bool:
+        bits = self._bits
+        return all(bits[p >> 3] & (0x80 >> (p & 7)) for p in positions)
+
+    def _local_set(self, positions: List[int]) -> None:
+        for p in positions:
+            self._bits[p >> 3] |= 0x80 >> (p & 7)
+
+    def _local_sim_add(self, fingerprint: int) -> None:
+        if self._sim_local_size >= self._local_sim_max:
+            return
+        for band, value in enumerate(_bands(fingerprint)):
+            self._sim_local[band].setdefault(value, set()).add(fingerprint)
+        self._sim_local_size += 1
+
+    def _refresh_mirror(self) -> None:
+        """Une el bitmap de Redis al espejo local (otros workers también escriben)."""
+        client = self._redis()
+        if client is None:
+            return
+        try:
+            remote = client.get(BLOOM_KEY)
+        except Exception as exc:
+            logging.debug(f"[Dedup] No se pudo leer el bitmap: {exc}")
+            return
+        if not remote:
+            return
+        if isinstance(remote, str):
+            remote = remote.encode("latin-1")
+        size = len(self._bits)
+        remote_int = int.from_bytes(remote[:size].ljust(size, b"\0"), "big")
+        with self._lock:
+            merged = int.from_bytes(bytes(self._bits), "big") | remote_int
+            self._bits = bytearray(merged.to_bytes(size, "big"))
+
+    def _start_refresher(self) -> None:
+        with self._lock:
+            if self._refresh_thread is not None or self._refresh_s <= 0:
+                return
+            self._refresh_thread = threading.Thread(
+                target=self._refresh_loop, name="dedup-mirror", daemon=True)
+            self._refresh_thread.start()
+
+    def _refresh_loop(self) -> None:
+        while True:
+            time.sleep(self._refresh_s)
+            try:
+                self._refresh_mirror()
+            except Exception as exc:
+                logging.debug(f"[Dedup] Refresco del espejo falló: {exc}")
+
+    # ------------------------------------------------------------------ #
+    # Siembra desde Cosmos
+    # ------------------------------------------------------------------ #
+    def ensure_seeded(self, container_provider: Callable[[], Any]) -> bool:
+        """Arranca la siembra en segundo plano la primera vez; True si ya está lista."""
+        if self._seeded or not self._enabled:
+            return self._seeded
+        if self._redis() is None:
+            # Sin Redis no hay bitmap compartido: no vale la pena el scan de Cosmos
+            return False
+        with self._lock:
+            if self._seed_thread is None:
+                self._seed_thread = threading.Thread(
+                    target=self._seed, args=(container_provider,), name="dedup-seed", daemon=True)
+                self._seed_thread.start()
+        return self._seeded
+
+    def _seed(self, container_provider: Callable[[], Any]) -> None:
+        client = self._redis()
+        try:
+            if client is not None and client.get(SEEDED_KEY):
+                self._refresh_mirror()
+                self._seeded = True
+                self._start_refresher()
+                logging.info("[Dedup] Índice cargado desde Redis")
+                return
+            if client is not None and not client.set(SEEDING_LOCK_KEY, "1", nx=True, ex=600):
+                # Otro worker siembra: esperar a que publique el flag
+                deadline = time.monotonic() + 600
+                while time.monotonic() < deadline:
+                    time.sleep(5)
+                    if client.get(SEEDED_KEY):
+                        self._refresh_mirror()
+                        self._seeded = True
+                        self._start_refresher()
+                        return
+                return
+
+            container = container_provider()
+            if container is None:
+                return
+            query = ("SELECT c.session_id, c.texto_hash, c.texto_semantico, c.document_class "
+                     "FROM c WHERE IS_DEFINED(c.texto_hash)")
+            count = 0
+            batch: List[Dict[str, Any]] = []
+            for item in container.query_items(query=query, enable_cross_partition_query=True):
+                batch.append(item)
+                if len(batch) >= 500:
+                    count += self._seed_batch(batch)
+                    batch = []
+            count += self._seed_batch(batch)
+            if client is not None:
+                client.set(SEEDED_KEY, str(int(time.time())))
+            self._seeded = True
+            self._start_refresher()
+            self._incr("seeded_items", count)
+            logging.info(f"[Dedup] Índice sembrado desde Cosmos: {count} documentos")
+        except Exception as exc:
+            logging.warning(f"[Dedup] No se pudo sembrar el índice: {exc}")
+        finally:
+            if client is not None:
+                try:
+                    client.delete(SEEDING_LOCK_KEY)
+                except Exception:
+                    pass
+
+    def _seed_batch(self, items: List[Dict[str, Any]]) -> int:
+        for item in items:
+            texto = item.get("texto_semantico") or ""
+            index_global = item.get("document_class") == "cognitive_memory"
+            self.add(item.get("session_id") or "", item.get("texto_hash") or "",
+                     texto if index_global else None)
+        return len(items)
+
+    # ------------------------------------------------------------------ #
+    # API
+    # ------------------------------------------------------------------ #
+    def _maybe_contains(self, item: str) -> bool:
+        """False = seguro que no está; True = positivo o estado desconocido."""
+        client = self._redis()
+        if not self._enabled or not self._seeded or client is None:
+            # Sin Redis un negativo del espejo local no es confiable
+            self._incr("unknown")
+            return True
+        positions = self._positions(item)
+        if self._local_has(positions):
+            self._incr("positives")
+            return True
+        # El espejo puede no tener lo que escribió otro worker recientemente
+        try:
+            pipe = self._buffer._pipeline(transaction=False)
+            for p in positions:
+                pipe.getbit(BLOOM_KEY, p)
+            self._incr("redis_confirms")
+            if all(pipe.execute()):
+                with self._lock:
+                    self._local_set(positions)
+                self._incr("positives")
+                return True
+        except Exception as exc:
+            logging.debug(f"[Dedup] GETBIT falló, se usa la consulta autoritativa: {exc}")
+            self._incr("unknown")
+            return True
+        self._incr("negatives")
+        return False
+
+    def maybe_seen_in_session(self, session_id: str, hash_texto: str) -> bool:
+        return self._maybe_contains(f"s|{session_id}|{hash_texto}")
+
+    def near_duplicate(self, texto: str) -> bool:
+        """True si hay un texto indexado a distancia de Hamming <= umbral."""
+        if not self._enabled or not texto:
+            return False
+        fingerprint = simhash64(texto)
+        bands = _bands(fingerprint)
+        candidates: Set[int] = set()
+        for band, value in enumerate(bands):
+            candidates |= self._sim_local[band].get(value, set())
+        if not any(bin(fingerprint ^ c).count("1") <= self._max_distance for c in candidates):
+            client = self._redis()
+            if client is None:
+                return False
+            try:
+                pipe = self._buffer._pipeline(transaction=False)
+                for band, value in enumerate(bands):
+                    pipe.smembers(f"{{dedup}}:sim:{band}:{value}")
+                candidates = {int(c) for members in pipe.execute() for c in (members or ())}
+            except Exception as exc:
+                logging.debug(f"[Dedup] No se pudieron leer bandas SimHash: {exc}")
+                return False
+            if not any(bin(fingerprint ^ c).count("1") <= self._max_distance for c in candidates):
+                return False
+        self._incr("near_duplicates")
+        return True
+
+    def check_indexing(self, texto: str) -> str:
+        """
+        "duplicate": casi-duplicado por SimHash (no hace falta embedding).
+        "new": el Bloom global garantiza que el texto no se indexó.
+        "unknown": hay que usar la consulta autoritativa.
+        """
+        if self.near_duplicate(texto):
+            return "duplicate"
+        if not self._maybe_contains(f"g|{texto_hash(texto)}"):
+            return "new"
+        return "unknown"
+
+    def add(self, session_id: str, hash_texto: str, texto_indexado: Optional[str] = None) -> None:
+        """Registra una escritura (y, si se indexó, su texto en el ámbito global)."""
+        if not self._enabled:
+            return
+        items = []
+        if hash_texto:
+            items.append(f"s|{session_id}|{hash_texto}")
+        if texto_indexado:
+            items.append(f"g|{texto_hash(texto_indexado)}")
+        positions = [p for item in items for p in self._positions(item)]
+        fingerprint = simhash64(texto_indexado) if texto_indexado else None
+        with self._lock:
+            self._local_set(positions)
+            if fingerprint:
+                self._local_sim_add(fingerprint)
+        self._incr("added")
+
+        client = self._redis()
+        if client is None:
+            return
+        try:
+            pipe = self._buffer._pipeline(transaction=False)
+            for p in positions:
+                pipe.setbit(BLOOM_KEY, p, 1)
+            if fingerprint:
+                for band, value in enumerate(_bands(fingerprint)):
+                    key = f"{{dedup}}:sim:{band}:{value}"
+                    pipe.sadd(key, str(fingerprint))
+                    pipe.expire(key, self._sim_ttl)
+            pipe.execute()
+        except Exception as exc:
+            logging.debug(f"[Dedup] No se pudo propagar a Redis: {exc}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot: Dict[str, Any] = dict(self._stats)
+        snapshot.update({
+            "enabled": self._enabled,
+            "seeded": self._seeded,
+            "shared": self._redis() is not None,
+            "bloom_bits": self._bits_count,
+            "bloom_hashes": self._hashes,
+            "simhash_local": self._sim_local_size,
+            "simhash_max_distance": self._max_distance,
+        })
+        return snapshot
+
+
+_dedup_index: Optional[DedupIndex] = None
+_dedup_lock = threading.Lock()
+
+
+def get_dedup_index() -> DedupIndex:
+    global _dedup_index
+    if _dedup_index is None:
+        with _dedup_lock:
+            if _dedup_index is None:
+                from services.redis_buffer_service import redis_buffer
+                _dedup_index = DedupIndex(redis_buffer)
+    return _dedup_index
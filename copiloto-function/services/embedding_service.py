@@ -0,0 +1,426 @@
+# -*- coding: utf-8 -*-
+"""
+Embedding Service
+-----------------
+Servicio unificado de embeddings (Azure OpenAI) con:
+
+- Batching: hasta EMBEDDING_BATCH_SIZE textos por llamada a `embeddings.create`.
+- Micro-batching: llamadas concurrentes a `embed()` dentro de una ventana de
+  EMBEDDING_LINGER_MS se agrupan en una sola llamada (y los textos repetidos
+  se resuelven una vez).
+- Caché direccionada por contenido: clave = SHA-256(texto normalizado +
+  modelo + dimensiones). Niveles: almacén local float32 memory-mapped ->
+  Redis (bucket `embedding`) -> OpenAI.
+
+Retorna arrays NumPy float32. `embedding_generator.generar_embedding` y los
+servicios de búsqueda delegan aquí.
+"""
+import base64
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import unicodedata
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: almacén por proceso
+    fcntl = None
+
+MAX_INPUT_CHARS = 8000
+
+
+def normalize_text(texto: str) -> str:
+    """Normalización usada para la clave de caché (y como input al modelo)."""
+    normalized = unicodedata.normalize("NFC", texto or "")
+    normalized = re.sub(r"\s+", " ", normalized).strip()
+    return normalized[:MAX_INPUT_CHARS]
+
+
+def _build_openai_client() -> Any:
+    """Cliente AzureOpenAI compartido del proceso (API key o Managed Identity)."""
+    from services.azure_clients import azure_clients
+
+    return azure_clients.openai_client()
+
+
+class LocalEmbeddingStore:
+    """
+    Almacén append-only de vectores float32 en disco, leído vía np.memmap.
+
+    - `<name>.f32`: filas contiguas de `dim` float32.
+    - `<name>.idx`: un hash por línea; la línea N corresponde a la fila N.
+
+    El directorio se comparte entre procesos worker: las filas se asignan bajo
+    un lock de archivo (`<name>.lock`) después de releer la cola del índice,
+    y cada vector se escribe en su offset antes de publicar su línea. Sin
+    fcntl (Windows) el almacén es por proceso.
+    """
+
+    def __init__(self, directory: Path, name: str, dim: Optional[int] = None):
+        if fcntl is None:
+            name = f"{name}.{os.getpid()}"
+        self._dir = directory
+        self._data_path = directory / f"{name}.f32"
+        self._index_path = directory / f"{name}.idx"
+        self._lock_path = directory / f"{name}.lock"
+        self._dim = dim
+        self._rows: Dict[str, int] = {}
+        self._count = 0          # líneas del índice ya leídas (= filas asignadas)
+        self._index_offset = 0   # bytes del índice ya leídos
+        self._mmap: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        try:
+            self._dir.mkdir(parents=True, exist_ok=True)
+        except Exception as exc:
+            logging.warning(f"[EmbeddingStore] No se pudo crear {self._dir}: {exc}")
+        with self._lock:
+            self._read_tail()
+
+    def _read_tail(self) -> None:
+        """Incorpora las líneas que otros procesos agregaron al índice."""
+        try:
+            if not self._index_path.exists():
+                return
+            with open(self._index_path, "rb") as fh:
+                fh.seek(self._index_offset)
+                chunk = fh.read()
+            # Solo líneas completas: la última puede estar a medio escribir
+            usable = chunk[:chunk.rfind(b"\n") + 1]
+            if not usable:
+                return
+            self._index_offset += len(usable)
+            for line in usable.decode("utf-8").splitlines():
+                key = line.strip()
+                if key and key not in self._rows:
+                    self._rows[key] = self._count
+                self._count += 1
+            if self._dim is None and self._count and self._data_path.exists():
+                self._dim = self._data_path.stat().st_size // (4 * self._count) or None
+        except Exception as exc:
+            logging.warning(f"[EmbeddingStore] No se pudo leer {self._index_path}: {exc}")
+
+    def _remap(self) -> None:
+        self._mmap = None
+        if not self._count or not self._dim or not self._data_path.exists():
+            return
+        # Ignorar filas incompletas (escritura interrumpida)
+        complete = min(self._count, self._data_path.stat().st_size // (4 * self._dim))
+        if complete:
+            self._mmap = np.memmap(self._data_path, dtype=np.float32, mode="r",
+                                   shape=(complete, self._dim))
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            if any(k not in self._rows for k in keys):
+                self._read_tail()
+            rows = [(k, self._rows[k]) for k in keys if k in self._rows]
+            if not rows:
+                return found
+            if self._mmap is None or self._mmap.shape[0] <= max(row for _, row in rows):
+                self._remap()
+            if self._mmap is None:
+                return found
+            for key, row in rows:
+                if row < self._mmap.shape[0]:
+                    found[key] = np.array(self._mmap[row], dtype=np.float32)
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        with self._lock:
+            if not any(k not in self._rows for k in items):
+                return
+            try:
+                with open(self._lock_path, "a+b") as lock_fh:
+                    if fcntl is not None:
+                        fcntl.flock(lock_fh.fileno(), fcntl.LOCK_EX)
+                    try:
+                        self._append_locked(items)
+                    finally:
+                        if fcntl is not None:
+                            fcntl.flock(lock_fh.fileno(), fcntl.LOCK_UN)
+            except Exception as exc:
+                logging.warning(f"[EmbeddingStore] No se pudo persistir embeddings: {exc}")
+
+    def _append_locked(self, items: Dict[str, np.ndarray]) -> None:
+        # Releer el índice bajo el lock: otro proceso pudo asignar filas
+        self._read_tail()
+        new = [(k, v) for k, v in items.items() if k not in self._rows]
+        if not new:
+            return
+        if self._dim is None:
+            self._dim = int(new[0][1].shape[0])
+        new = [(k, v) for k, v in new if v.shape[0] == self._dim]
+        if not new:
+            return
+        row_bytes = 4 * self._dim
+        # Los datos van en el offset de su fila antes de publicar la línea del índice
+        with open(self._data_path, "r+b" if self._data_path.exists() else "w+b") as data_fh:
+            data_fh.seek(self._count * row_bytes)
+            for _, vector in new:
+                data_fh.write(np.asarray(vector, dtype=np.float32).tobytes())
+            data_fh.flush()
+        lines = "".join(key + "\n" for key, _ in new).encode("utf-8")
+        with open(self._index_path, "ab") as index_fh:
+            index_fh.write(lines)
+        for key, _ in new:
+            self._rows[key] = self._count
+            self._count += 1
+        self._index_offset += len(lines)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+
+class EmbeddingService:
+    """Embeddings batch + micro-batch con caché local/Redis direccionada por contenido."""
+
+    def __init__(self, model: Optional[str] = None, dimensions: Optional[int] = None, client: Any = None):
+        self.model = model or os.environ.get(
+            "AZURE_OPENAI_EMBEDDING_DEPLOYMENT", "text-embedding-3-large")
+        self.dimensions = dimensions
+        self._client = client
+        self._client_lock = threading.Lock()
+        self._batch_size = max(1, int(os.environ.get("EMBEDDING_BATCH_SIZE", "64")))
+        self._linger = float(os.environ.get("EMBEDDING_LINGER_MS", "10")) / 1000
+        self._use_redis = os.environ.get("EMBEDDING_REDIS_CACHE", "1").lower() not in (
+            "0", "false", "no", "off")
+        # Mismo comportamiento que embedding_generator: sin filtros de contenido
+        policy = os.environ.get("EMBEDDING_CONTENT_FILTER_POLICY", "none")
+        self._extra_body = {"content_filter_policy": policy} if policy else None
+
+        store_dir = Path(os.environ.get("EMBEDDING_CACHE_DIR") or
+                         Path(tempfile.gettempdir()) / "copiloto_embeddings")
+        store_name = re.sub(r"[^A-Za-z0-9_.-]", "_", f"{self.model}_{dimensions or 'native'}")
+        self._store = LocalEmbeddingStore(store_dir, store_name, dimensions)
+
+        # Micro-batching: cola de pendientes drenada por un thread en segundo plano
+        self._pending: List[Tuple[str, str]] = []
+        self._inflight: Dict[str, Future] = {}
+        self._cond = threading.Condition()
+        self._batcher: Optional[threading.Thread] = None
+
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "local_hits": 0, "redis_hits": 0,
+                       "computed": 0, "api_calls": 0, "api_errors": 0, "coalesced": 0}
+
+    # ------------------------------------------------------------------ #
+    # Helpers
+    # ------------------------------------------------------------------ #
+    def _incr(self, name: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def _get_client(self) -> Any:
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = _build_openai_client()
+        return self._client
+
+    def cache_key(self, normalized: str) -> str:
+        material = f"{self.model}|{self.dimensions or 'native'}|{normalized}"
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _redis_key(self, key: str) -> str:
+        return f"embedding:{key}"
+
+    @staticmethod
+    def _encode(vector: np.ndarray) -> Dict[str, Any]:
+        return {"b64": base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode("ascii"),
+                "dim": int(vector.shape[0])}
+
+    @staticmethod
+    def _decode(payload: Any) -> Optional[np.ndarray]:
+        if not isinstance(payload, dict) or "b64" not in payload:
+            return None
+        try:
+            return np.frombuffer(base64.b64decode(payload["b64"]), dtype=np.float32).copy()
+        except Exception:
+            return None
+
+    def _lookup_caches(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = self._store.get_many(keys)
+        self._incr("local_hits", len(found))
+        missing = [k for k in keys if k not in found]
+        if missing and self._use_redis:
+            try:
+                from services.redis_buffer_service import redis_buffer
+                if redis_buffer.is_enabled:
+                    cached = redis_buffer.get_many([self._redis_key(k) for k in missing])
+                    from_redis = {}
+                    for key in missing:
+                        vector = self._decode(cached.get(self._redis_key(key)))
+                        if vector is not None:
+                            from_redis[key] = vector
+                    if from_redis:
+                        self._store.put_many(from_redis)
+                        found.update(from_redis)
+                        self._incr("redis_hits", len(from_redis))
+            except Exception as exc:
+                logging.debug(f"[EmbeddingService] Redis no disponible para embeddings: {exc}")
+        return found
+
+    def _save_caches(self, computed: Dict[str, np.ndarray]) -> None:
+        if not computed:
+            return
+        self._store.put_many(computed)
+        if not self._use_redis:
+            return
+        try:
+            from services.redis_buffer_service import redis_buffer
+            if redis_buffer.is_enabled:
+                redis_buffer.set_many(
+                    {self._redis_key(k): self._encode(v) for k, v in computed.items()},
+                    bucket="embedding")
+        except Exception as exc:
+            logging.debug(f"[EmbeddingService] No se pudo cachear en Redis: {exc}")
+
+    def _call_api(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Una llamada a embeddings.create por cada bloque de `batch_size` textos."""
+        results: List[Optional[np.ndarray]] = []
+        for start in range(0, len(texts), self._batch_size):
+            chunk = texts[start:start + self._batch_size]
+            kwargs: Dict[str, Any] = {"model": self.model, "input": chunk}
+            if self.dimensions:
+                kwargs["dimensions"] = self.dimensions
+            if self._extra_body:
+                kwargs["extra_body"] = self._extra_body
+            try:
+                self._incr("api_calls")
+                response = self._get_client().embeddings.create(**kwargs)
+                by_index = {item.index: item.embedding for item in response.data}
+                results.extend(
+                    np.asarray(by_index[i], dtype=np.float32) if i in by_index else None
+                    for i in range(len(chunk)))
+            except Exception as exc:
+                self._incr("api_errors")
+                logging.error(f"❌ Error generando embeddings ({len(chunk)} textos): {exc}")
+                results.extend([None] * len(chunk))
+        return results
+
+    def _compute(self, pairs: List[Tuple[str, str]]) -> Dict[str, Optional[np.ndarray]]:
+        """pairs = [(cache_key, texto_normalizado)] sin repetidos."""
+        vectors = self._call_api([text for _, text in pairs])
+        out = {key: vec for (key, _), vec in zip(pairs, vectors)}
+        computed = {k: v for k, v in out.items() if v is not None}
+        self._incr("computed", len(computed))
+        self._save_caches(computed)
+        return out
+
+    # ------------------------------------------------------------------ #
+    # Micro-batching
+    # ------------------------------------------------------------------ #
+    def _ensure_batcher(self) -> None:
+        if self._batcher is not None:
+            return
+        self._batcher = threading.Thread(
+            target=self._batch_loop, name="embedding-batcher", daemon=True)
+        self._batcher.start()
+
+    def _batch_loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # Ventana corta para acumular requests concurrentes
+                deadline = time.monotonic() + self._linger
+                while len(self._pending) < self._batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[: self._batch_size]
+                self._pending = self._pending[self._batch_size:]
+            try:
+                results = self._compute(batch)
+            except Exception as exc:  # pragma: no cover
+                logging.error(f"[EmbeddingService] Batch falló: {exc}")
+                results = {}
+            with self._cond:
+                for key, _ in batch:
+                    future = self._inflight.pop(key, None)
+                    if future is not None:
+                        future.set_result(results.get(key))
+
+    def _submit(self, key: str, text: str) -> Future:
+        with self._cond:
+            future = self._inflight.get(key)
+            if future is not None:
+                self._incr("coalesced")
+                return future
+            future = Future()
+            self._inflight[key] = future
+            self._pending.append((key, text))
+            self._ensure_batcher()
+            self._cond.notify()
+        return future
+
+    # ------------------------------------------------------------------ #
+    # API
+    # ------------------------------------------------------------------ #
+    def embed(self, texto: str, timeout: float = 30.0) -> Optional[np.ndarray]:
+        """Embedding de un texto; se agrupa con otras llamadas concurrentes."""
+        normalized = normalize_text(texto)
+        if not normalized:
+            return None
+        self._incr("requests")
+        key = self.cache_key(normalized)
+        cached = self._lookup_caches([key])
+        if key in cached:
+            return cached[key]
+        try:
+            return self._submit(key, normalized).result(timeout=timeout)
+        except Exception as exc:
+            logging.error(f"❌ Error generando embedding: {exc}")
+            return None
+
+    def embed_many(self, textos: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """
+        Embeddings de muchos textos (mismo orden que la entrada). Usa la caché
+        y hace una llamada a la API por cada bloque de `batch_size` faltantes.
+        """
+        normalized = [normalize_text(t) for t in textos]
+        keys = [self.cache_key(n) if n else "" for n in normalized]
+        self._incr("requests", len(textos))
+        unique = {k: n for k, n in zip(keys, normalized) if k}
+        found: Dict[str, Optional[np.ndarray]] = dict(self._lookup_caches(list(unique)))
+        pending = [(k, n) for k, n in unique.items() if k not in found]
+        if pending:
+            found.update(self._compute(pending))
+        return [found.get(k) if k else None for k in keys]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            snapshot: Dict[str, Any] = dict(self._stats)
+        snapshot.update({"model": self.model, "dimensions": self.dimensions,
+                         "local_store_size": len(self._store),
+                         "batch_size": self._batch_size})
+        return snapshot
+
+
+_services: Dict[Tuple[str, Optional[int]], EmbeddingService] = {}
+_services_lock = threading.Lock()
+
+
+def get_embedding_service(model: Optional[str] = None, dimensions: Optional[int] = None) -> EmbeddingService:
+    """Singleton por (modelo, dimensiones)."""
+    model = model or os.environ.get("AZURE_OPENAI_EMBEDDING_DEPLOYMENT", "text-embedding-3-large")
+    key = (model, dimensions)
+    service = _services.get(key)
+    if service is None:
+        with _services_lock:
+            service = _services.get(key)
+            if service is None:
+                service = EmbeddingService(model=model, dimensions=dimensions)
+                _services[key] = service
+    return service
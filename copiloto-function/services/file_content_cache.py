@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+File Content Cache
+------------------
+Caché en proceso del contenido de archivos leídos por leer_archivo_dinamico,
+leer_archivo_blob y leer_archivo_local (antes `CACHE = {}` sin límites).
+
+- LRU acotado por bytes (FILE_CACHE_MAX_BYTES); las entradas mayores a
+  FILE_CACHE_MAX_ENTRY_BYTES no se cachean.
+- Cada entrada guarda su validador: ETag del blob o (mtime, size) del archivo
+  local. El llamador revalida con un GET condicional (If-None-Match) o un
+  stat(); la caché no hace I/O.
+- FILE_CACHE_REVALIDATE_S > 0 sirve la entrada sin revalidar durante esa
+  ventana; las escrituras de esta instancia la invalidan con `invalidate()`.
+- Expone la interfaz de lectura de un dict (`len`, `in`, `values`, `clear`)
+  para los diagnósticos que inspeccionan `function_app.CACHE`.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() not in ("0", "false", "no", "off")
+
+
+def normalize_path(ruta: str) -> str:
+    """Forma comparable de una ruta de blob o local (`\\` -> `/`, sin `/` inicial)."""
+    return (ruta or "").strip().replace("\\", "/").replace("//", "/").lstrip("/")
+
+
+@dataclass
+class CachedFile:
+    result: Dict[str, Any]
+    size: int
+    # Ruta concreta que se leyó (nombre de blob o path local)
+    source: str
+    etag: Optional[str] = None
+    # (mtime_ns, size) del archivo local
+    stat: Optional[Tuple[int, int]] = None
+    validated_at: float = field(default_factory=time.monotonic)
+    names: Set[str] = field(default_factory=set)
+
+
+class FileContentCache:
+    """LRU por bytes. Thread-safe (un lock; operaciones O(1) salvo invalidate)."""
+
+    def __init__(self):
+        self.enabled = _env_flag("FILE_CACHE_ENABLED", "1")
+        self.max_bytes = int(os.getenv("FILE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+        self.max_entry_bytes = int(os.getenv("FILE_CACHE_MAX_ENTRY_BYTES", str(4 * 1024 * 1024)))
+        self.revalidate_s = float(os.getenv("FILE_CACHE_REVALIDATE_S", "0"))
+        self._entries: "OrderedDict[str, CachedFile]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "revalidated": 0, "misses": 0, "refreshed": 0,
+                          "evictions": 0, "invalidations": 0}
+
+    # ------------------------------------------------------------------ #
+    # API
+    # ------------------------------------------------------------------ #
+    def get(self, key: str) -> Optional[CachedFile]:
+        """Entrada para `key` (sin validar) o None."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def fresh(self, entry: CachedFile) -> bool:
+        """True si la entrada está dentro de la ventana sin revalidación."""
+        return self.revalidate_s > 0 and time.monotonic() - entry.validated_at < self.revalidate_s
+
+    def hit(self, entry: CachedFile, revalidated: bool = False) -> Dict[str, Any]:
+        """Registra un acierto y devuelve una copia del resultado cacheado."""
+        with self._lock:
+            self._counters["revalidated" if revalidated else "hits"] += 1
+            if revalidated:
+                entry.validated_at = time.monotonic()
+        return dict(entry.result)
+
+    def put(self, key: str, result: Dict[str, Any], source: str,
+            etag: Optional[str] = None, stat: Optional[Tuple[int, int]] = None) -> None:
+        if not self.enabled:
+            return
+        size = len(str(result.get("contenido", "")).encode("utf-8", errors="replace"))
+        with self._lock:
+            if key in self._entries:
+                # El validador cambió: contenido nuevo
+                self._counters["refreshed"] += 1
+            self._drop(key)
+            if size > self.max_entry_bytes or size > self.max_bytes:
+                return
+            names = {normalize_path(key.split(":", 1)[-1]), normalize_path(source)}
+            self._entries[key] = CachedFile(result=dict(result), size=size, source=source,
+                                            etag=etag, stat=stat, names=names)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, old = self._entries.popitem(last=False)
+                self._bytes -= old.size
+                self._counters["evictions"] += 1
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._drop(key)
+
+    def invalidate(self, *rutas: str) -> int:
+        """
+        Elimina las entradas que correspondan a cualquiera de `rutas` (escritura,
+        movimiento o borrado). Compara por sufijo de ruta: `docs/a.md` invalida
+        también `/home/site/wwwroot/docs/a.md`; ante la duda, invalida.
+        """
+        targets = [normalize_path(r) for r in rutas if r]
+        if not targets:
+            return 0
+        with self._lock:
+            stale = [key for key, entry in self._entries.items()
+                     if any(self._same_file(name, target)
+                            for name in entry.names for target in targets)]
+            for key in stale:
+                self._drop(key)
+            self._counters["invalidations"] += len(stale)
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    @staticmethod
+    def _same_file(a: str, b: str) -> bool:
+        if not a or not b:
+            return False
+        return a == b or a.endswith("/" + b) or b.endswith("/" + a)
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    # ------------------------------------------------------------------ #
+    # Interfaz de dict (solo lectura) para diagnósticos existentes
+    # ------------------------------------------------------------------ #
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._entries))
+
+    def keys(self) -> List[str]:
+        return list(self._entries)
+
+    def values(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [entry.result for entry in self._entries.values()]
+
+    def items(self) -> List[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            return [(key, entry.result) for key, entry in self._entries.items()]
+
+    # ------------------------------------------------------------------ #
+    # Métricas
+    # ------------------------------------------------------------------ #
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            entries, used = len(self._entries), self._bytes
+        lookups = counters["hits"] + counters["revalidated"] + counters["misses"]
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "bytes": used,
+            "max_bytes": self.max_bytes,
+            "revalidate_s": self.revalidate_s,
+            **counters,
+            "hit_ratio": (counters["hits"] + counters["revalidated"]) / lookups if lookups else 0,
+        }
+
+
+file_cache = FileContentCache()
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Intent Embedding Artifact
+-------------------------
+Artefacto binario versionado con los embeddings de los ejemplos de
+SemanticIntentClassifier, para no llamar a Azure OpenAI en cold start.
+
+Formato (por modelo):
+- `intent_embeddings.v<N>.<modelo>.f32`: matriz (n, dim) float32 normalizada.
+- `intent_embeddings.v<N>.<modelo>.json`: manifiesto con version, modelo,
+  dim, firma de `intent_examples` y por fila {intent, hash}.
+
+El hash por fila es SHA-256(modelo + ejemplo preprocesado): el clasificador
+reutiliza las filas cuyo hash sigue vigente y solo recalcula las nuevas.
+La matriz se abre con np.memmap (solo lectura).
+
+Se genera en build con `python build_intent_embeddings.py`; en runtime el
+clasificador guarda una copia incremental en INTENT_EMBEDDINGS_RUNTIME_DIR.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except Exception:  # pragma: no cover
+    np = None
+
+ARTIFACT_VERSION = 1
+BUNDLED_DIR = Path(__file__).resolve().parent.parent / "artifacts"
+
+
+def example_hash(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+
+def examples_signature(model: str, intent_examples: Dict[str, List[str]]) -> str:
+    payload = json.dumps({"model": model, "examples": intent_examples},
+                         sort_keys=True, ensure_ascii=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _safe_model(model: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in model)
+
+
+def artifact_base(directory: Path, model: str) -> Path:
+    return Path(directory) / f"intent_embeddings.v{ARTIFACT_VERSION}.{_safe_model(model)}"
+
+
+def runtime_dir() -> Path:
+    return Path(os.getenv("INTENT_EMBEDDINGS_RUNTIME_DIR") or
+                Path(tempfile.gettempdir()) / "copiloto_intent_embeddings")
+
+
+def candidate_dirs() -> List[Path]:
+    """Orden de búsqueda: override explícito, copia runtime, artefacto empaquetado."""
+    dirs = []
+    override = os.getenv("INTENT_EMBEDDINGS_ARTIFACT_DIR")
+    if override:
+        dirs.append(Path(override))
+    dirs.extend([runtime_dir(), BUNDLED_DIR])
+    return dirs
+
+
+class IntentEmbeddingArtifact:
+    """Vista de solo lectura (memmap) sobre un artefacto existente."""
+
+    def __init__(self, base: Path, manifest: Dict[str, Any], vectors: "np.ndarray"):
+        self.base = base
+        self.model: str = manifest["model"]
+        self.dim: int = int(manifest["dim"])
+        self.signature: str = manifest.get("signature", "")
+        self.labels: List[str] = [row["intent"] for row in manifest["rows"]]
+        self.hashes: List[str] = [row["hash"] for row in manifest["rows"]]
+        self.vectors = vectors
+        self.positions: Dict[str, int] = {h: i for i, h in enumerate(self.hashes)}
+
+    @classmethod
+    def load(cls, directory: Path, model: str) -> Optional["IntentEmbeddingArtifact"]:
+        if np is None:
+            return None
+        base = artifact_base(directory, model)
+        manifest_path = base.with_suffix(base.suffix + ".json")
+        data_path = base.with_suffix(base.suffix + ".f32")
+        if not manifest_path.exists() or not data_path.exists():
+            return None
+        try:
+            manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+            if manifest.get("version") != ARTIFACT_VERSION or manifest.get("model") != model:
+                return None
+            rows, dim = len(manifest["rows"]), int(manifest["dim"])
+            if rows == 0 or data_path.stat().st_size != rows * dim * 4:
+                return None
+            vectors = np.memmap(data_path, dtype=np.float32, mode="r", shape=(rows, dim))
+            return cls(base, manifest, vectors)
+        except Exception as exc:
+            logging.warning(f"[IntentArtifact] Artefacto inválido {manifest_path}: {exc}")
+            return None
+
+    @staticmethod
+    def write(directory: Path, model: str, signature: str,
+              rows: List[Tuple[str, str]], vectors: "np.ndarray") -> Optional[Path]:
+        """
+        Escribe el artefacto de forma atómica. `rows` = [(intent, hash)]
+        alineado con las filas de `vectors` (ya normalizadas).
+        """
+        if np is None or not rows:
+            return None
+        base = artifact_base(directory, model)
+        try:
+            Path(directory).mkdir(parents=True, exist_ok=True)
+            matrix = np.ascontiguousarray(vectors, dtype=np.float32)
+            manifest = {
+                "version": ARTIFACT_VERSION,
+                "model": model,
+                "dim": int(matrix.shape[1]),
+                "signature": signature,
+                "rows": [{"intent": intent, "hash": h} for intent, h in rows],
+            }
+            data_path = base.with_suffix(base.suffix + ".f32")
+            manifest_path = base.with_suffix(base.suffix + ".json")
+            tmp_data = data_path.with_suffix(".f32.tmp")
+            tmp_manifest = manifest_path.with_suffix(".json.tmp")
+            tmp_data.write_bytes(matrix.tobytes())
+            tmp_manifest.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp_data, data_path)
+            os.replace(tmp_manifest, manifest_path)
+            return base
+        except Exception as exc:
+            logging.warning(f"[IntentArtifact] No se pudo escribir {base}: {exc}")
+            return None
+
+
+def load_available(model: str) -> List[IntentEmbeddingArtifact]:
+    artifacts = []
+    for directory in candidate_dirs():
+        artifact = IntentEmbeddingArtifact.load(directory, model)
+        if artifact is not None:
+            artifacts.append(artifact)
+    return artifacts
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Local Cache Tier (L1)
+---------------------
+Caché en proceso (LRU + TTL) que se coloca delante de Redis (L2) para evitar
+round trips TLS repetidos sobre las mismas claves dentro de un worker.
+
+- Un bucket por prefijo de clave (memoria, thread, narrativa, llm, ...).
+- Límite de bytes por bucket; al excederlo se desalojan las entradas menos usadas.
+- Los valores se guardan serializados (JSON en bytes) para que cada lectura
+  devuelva una copia independiente y el tamaño sea medible.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Sentinela para distinguir "no está en L1" de un valor None cacheado
+MISSING = object()
+
+
+class _Bucket:
+    """Estado LRU de un bucket: entradas ordenadas por uso y contadores."""
+
+    __slots__ = ("entries", "bytes", "max_bytes", "ttl",
+                 "hits", "misses", "evictions", "expirations")
+
+    def __init__(self, max_bytes: int, ttl: int):
+        self.entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self.bytes = 0
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+
+class LocalCacheTier:
+    """
+    LRU/TTL acotado por bytes y por bucket. Thread-safe (un lock global; las
+    operaciones son O(1) y no hacen I/O).
+    """
+
+    def __init__(
+        self,
+        bucket_limits: Optional[Dict[str, Dict[str, int]]] = None,
+        default_max_bytes: int = 1_048_576,
+        default_ttl: int = 30,
+        enabled: bool = True,
+    ):
+        self._limits = bucket_limits or {}
+        self._default_max_bytes = default_max_bytes
+        self._default_ttl = default_ttl
+        self._enabled = enabled
+        self._buckets: Dict[str, _Bucket] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def set_enabled(self, enabled: bool) -> None:
+        """Activa/desactiva L1. Al desactivar se vacía para no servir datos viejos."""
+        self._enabled = bool(enabled)
+        if not self._enabled:
+            self.clear()
+
+    @staticmethod
+    def bucket_for(key: str) -> str:
+        """Deriva el bucket del prefijo de la clave (`memoria:abc` -> `memoria`)."""
+        return (key or "").split(":", 1)[0].strip("{}") or "default"
+
+    def _get_bucket(self, name: str) -> _Bucket:
+        bucket = self._buckets.get(name)
+        if bucket is None:
+            limits = self._limits.get(name, {})
+            bucket = _Bucket(
+                max_bytes=int(limits.get("l1_max_bytes", self._default_max_bytes)),
+                ttl=int(limits.get("l1_ttl", self._default_ttl)),
+            )
+            self._buckets[name] = bucket
+        return bucket
+
+    def _drop(self, bucket: _Bucket, key: str) -> None:
+        entry = bucket.entries.pop(key, None)
+        if entry is not None:
+            bucket.bytes -= len(entry[0])
+
+    # ------------------------------------------------------------------ #
+    # API
+    # ------------------------------------------------------------------ #
+    def get(self, key: str) -> Any:
+        """Retorna el valor deserializado o MISSING si no está o expiró."""
+        if not self._enabled or not key:
+            return MISSING
+        with self._lock:
+            bucket = self._get_bucket(self.bucket_for(key))
+            entry = bucket.entries.get(key)
+            if entry is None:
+                bucket.misses += 1
+                return MISSING
+            raw, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._drop(bucket, key)
+                bucket.expirations += 1
+                bucket.misses += 1
+                return MISSING
+            bucket.entries.move_to_end(key)
+            bucket.hits += 1
+        try:
+            return json.loads(raw)
+        except Exception:  # pragma: no cover
+            self.invalidate(key)
+            return MISSING
+
+    def put(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+        """
+        Guarda `value` en L1. El TTL efectivo es el menor entre el TTL del
+        bucket en L1 y el TTL solicitado (normalmente el de Redis).
+        """
+        if not self._enabled or not key or value is None:
+            return False
+        try:
+            raw = json.dumps(value, ensure_ascii=False,
+                             separators=(",", ":"), default=str).encode("utf-8")
+        except Exception:
+            self.invalidate(key)
+            return False
+
+        with self._lock:
+            bucket = self._get_bucket(self.bucket_for(key))
+            self._drop(bucket, key)
+            size = len(raw)
+            if bucket.max_bytes <= 0 or size > bucket.max_bytes:
+                # No cabe: no se cachea (y no se desaloja todo el bucket por él)
+                return False
+            effective_ttl = bucket.ttl
+            if ttl:
+                effective_ttl = min(effective_ttl, int(ttl))
+            if effective_ttl <= 0:
+                return False
+            bucket.entries[key] = (raw, time.monotonic() + effective_ttl)
+            bucket.bytes += size
+            while bucket.bytes > bucket.max_bytes and bucket.entries:
+                _, (old_raw, _) = bucket.entries.popitem(last=False)
+                bucket.bytes -= len(old_raw)
+                bucket.evictions += 1
+        return True
+
+    def invalidate(self, key: str) -> None:
+        if not key:
+            return
+        with self._lock:
+            bucket = self._buckets.get(self.bucket_for(key))
+            if bucket is not None:
+                self._drop(bucket, key)
+
+    def clear(self) -> None:
+        with self._lock:
+            for bucket in self._buckets.values():
+                bucket.entries.clear()
+                bucket.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot de contadores por bucket y totales."""
+        with self._lock:
+            buckets = {
+                name: {
+                    "entries": len(b.entries),
+                    "bytes": b.bytes,
+                    "max_bytes": b.max_bytes,
+                    "ttl": b.ttl,
+                    "hits": b.hits,
+                    "misses": b.misses,
+                    "evictions": b.evictions,
+                    "expirations": b.expirations,
+                }
+                for name, b in self._buckets.items()
+            }
+        hits = sum(b["hits"] for b in buckets.values())
+        misses = sum(b["misses"] for b in buckets.values())
+        total = hits + misses
+        return {
+            "enabled": self._enabled,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / total if total > 0 else 0,
+            "bytes": sum(b["bytes"] for b in buckets.values()),
+            "buckets": buckets,
+        }
+
@@ -1,4 +1,5 @@
 import os
+import copy
 import json
 import logging
 import uuid
@@ -7,9 +8,13 @@ from datetime import timezone, datetime
 from pathlib import Path
 from typing import Dict, Any, Optional, List, Sequence
 from azure.cosmos import CosmosClient, ContainerProxy
-from azure.identity import DefaultAzureCredential
+from services.azure_clients import azure_clients
 from services.cosmos_store import CosmosMemoryStore
+from services.cosmos_session_queries import SessionQueryExecutor
+from services.dedup_index import get_dedup_index
+from services.perf_tracer import traced
 from services.redis_buffer_service import redis_buffer
+from services.write_behind import WriteBehindQueue
 
 COGNITIVE_INDEX_NAME = os.environ.get(
     "AZURE_SEARCH_INDEX", "agent-memory-index-optimized")
@@ -70,6 +75,10 @@ class MemoryService:
         self.memory_container: Optional[ContainerProxy] = None
         self.cosmos_available = False
         self._cosmos_lock = threading.Lock()
+        # Consultas de una sesión: partition_key=session_id, TOP real y RU por consulta
+        self.session_queries = SessionQueryExecutor(self._get_cosmos_container)
+        # Bloom + SimHash (Redis + espejo local) delante de las consultas de duplicados
+        self.dedup = get_dedup_index()
 
         # Fallback local
         self.local_enabled = True
@@ -77,6 +86,21 @@ class MemoryService:
         self.scripts_dir.mkdir(exist_ok=True)
         self.semantic_log_file = self.scripts_dir / "semantic_log.jsonl"
 
+        # Write-behind: Cosmos + AI Search fuera del request (MEMORY_WRITE_BEHIND_ENABLED=0 lo apaga)
+        self._write_behind = WriteBehindQueue(
+            name="cosmos_memory",
+            handler=self._persist_cosmos,
+            max_size=int(os.environ.get("MEMORY_WRITE_BEHIND_MAX", "1000")),
+            workers=int(os.environ.get("MEMORY_WRITE_BEHIND_WORKERS", "2")),
+            enqueue_timeout=float(os.environ.get(
+                "MEMORY_WRITE_BEHIND_ENQUEUE_TIMEOUT_MS", "50")) / 1000,
+            spill_path=self.scripts_dir / "write_behind_spill.jsonl"
+            if os.environ.get("MEMORY_WRITE_BEHIND_SPILL", "1").lower() not in ("0", "false", "no", "off")
+            else None,
+            enabled=os.environ.get("MEMORY_WRITE_BEHIND_ENABLED", "1").lower() not in (
+                "0", "false", "no", "off"),
+        )
+
     def _ensure_cosmos_container(self) -> bool:
         """Inicializa la conexión a Cosmos la primera vez que se necesita."""
         if self.memory_container:
@@ -91,15 +115,8 @@ class MemoryService:
             if self.memory_container:
                 return True
             try:
-                if self._cosmos_key:
-                    client = CosmosClient(self._cosmos_endpoint, self._cosmos_key)
-                else:
-                    credential = DefaultAzureCredential(
-                        exclude_interactive_browser_credential=True,
-                        exclude_visual_studio_code_credential=True,
-                        exclude_shared_token_cache_credential=True
-                    )
-                    client = CosmosClient(self._cosmos_endpoint, credential)
+                client = azure_clients.cosmos_client(
+                    self._cosmos_endpoint, self._cosmos_key)
 
                 database = client.get_database_client(self._cosmos_database)
                 self.memory_container = database.get_container_client(
@@ -177,7 +194,30 @@ class MemoryService:
             logging.error(f"Error escribiendo log local: {e}")
             return False
 
-    def _log_cosmos(self, event: Dict[str, Any]) -> bool:
+    def _log_cosmos(self, event: Dict[str, Any], wait: Optional[float] = None) -> bool:
+        """
+        Encola una copia del evento para Cosmos + AI Search (write-behind).
+        Sin `wait` retorna si quedó aceptado para escritura (no si ya se
+        persistió); con `wait` espera hasta ese plazo el resultado real
+        (False si fue duplicado, falló o no terminó a tiempo). Con la cola
+        deshabilitada escribe en línea y retorna el resultado de la escritura.
+        """
+        try:
+            pending = copy.deepcopy(event)
+        except Exception:
+            pending = dict(event)
+        return self._write_behind.submit(pending, wait=wait)
+
+    def flush_pending_writes(self, timeout: float = 10.0) -> bool:
+        """Espera a que se persistan los eventos encolados (tests, shutdown)."""
+        return self._write_behind.flush(timeout)
+
+    def get_write_behind_stats(self) -> Dict[str, Any]:
+        """Profundidad de cola, contadores y latencia de drenado del write-behind."""
+        return self._write_behind.stats()
+
+    @traced("memory.persist_cosmos")
+    def _persist_cosmos(self, event: Dict[str, Any]) -> bool:
         """Escribe en Cosmos DB contenedor memory con clasificación semántica y anti-duplicados"""
         container = self._get_cosmos_container()
         if not container:
@@ -216,8 +256,11 @@ class MemoryService:
                     texto_semantico.strip().lower().encode('utf-8')).hexdigest()
                 event["texto_hash"] = texto_hash
 
-                # Verificar si ya existe
-                if self.existe_texto_en_sesion(event["session_id"], texto_hash):
+                # Verificar si ya existe: el índice local descarta los negativos y
+                # solo los positivos van a la consulta autoritativa en Cosmos
+                self.dedup.ensure_seeded(self._get_cosmos_container)
+                if (self.dedup.maybe_seen_in_session(event["session_id"], texto_hash)
+                        and self.existe_texto_en_sesion(event["session_id"], texto_hash)):
                     logging.info(
                         f"[SKIP] Texto duplicado detectado en sesión; se omite registro: {event['id']}")
                     return False
@@ -274,6 +317,7 @@ class MemoryService:
 
             # Intentar upsert
             result = container.upsert_item(event)
+            self.dedup.add(event["session_id"], event.get("texto_hash", ""))
             logging.info(
                 f"[OK] Guardado exitoso en Cosmos DB - ID: {result.get('id', 'unknown')}")
             # Log detallado del texto semántico
@@ -300,6 +344,7 @@ class MemoryService:
                 f"DEBUG Event keys: {list(event.keys()) if isinstance(event, dict) else 'not dict'}")
             return False
 
+    @traced("memory.indexar_ai_search")
     def _indexar_en_ai_search(self, event: Dict[str, Any]) -> bool:
         """Indexa automáticamente en AI Search después de guardar en Cosmos"""
         try:
@@ -333,20 +378,21 @@ class MemoryService:
                     f"[SKIP] Texto muy corto, se omite indexación: {len(texto_sem)} chars")
                 return False
 
-            if documento["document_class"] == DOC_CLASS_COGNITIVE and self.evento_ya_existe(texto_sem):
+            if documento["document_class"] != DOC_CLASS_COGNITIVE:
                 logging.info(
-                    f"[SKIP] Duplicado detectado, se omite indexación (sin generar embedding): {documento['id']}")
+                    f"[SKIP] Registro de clase '{documento['document_class']}' no se indexa (solo memoria cognitiva)")
                 return False
 
-            if documento["document_class"] != DOC_CLASS_COGNITIVE:
+            if self.es_duplicado_para_indexar(texto_sem):
                 logging.info(
-                    f"[SKIP] Registro de clase '{documento['document_class']}' no se indexa (solo memoria cognitiva)")
+                    f"[SKIP] Duplicado detectado, se omite indexación (sin generar embedding): {documento['id']}")
                 return False
 
             target_index = event.get("indice_destino") or COGNITIVE_INDEX_NAME
 
-            # Llamar al indexador con formato correcto
-            payload = {"documentos": [documento], "index_name": target_index}
+            # Llamar al indexador con formato correcto (duplicados ya verificados aquí)
+            payload = {"documentos": [documento], "index_name": target_index,
+                       "dedup_verificado": True}
             result = indexar_memoria_endpoint(payload)
 
             if result.get("exito"):
@@ -376,8 +422,13 @@ class MemoryService:
         """Registra evento semántico general"""
         return self.log_event("semantic", event_data)
 
-    def get_session_history(self, session_id: str, limit: int = 100) -> list:
-        """Obtiene historial de sesión, priorizando Redis como caché antes de Cosmos."""
+    @traced("memory.get_session_history")
+    def get_session_history(self, session_id: str, limit: int = 100,
+                            fields: Optional[Sequence[str]] = None) -> list:
+        """
+        Obtiene historial de sesión, priorizando Redis como caché antes de Cosmos.
+        `fields` limita la proyección (p. ej. ["id", "texto_semantico", "data.source"]).
+        """
         # Validar session_id para evitar consultas inválidas
         if not session_id or not isinstance(session_id, str) or len(session_id.strip()) == 0:
             logging.warning(
@@ -389,34 +440,33 @@ class MemoryService:
         cache_key = None
         if redis_buffer and getattr(redis_buffer, "is_enabled", False):
             try:
-                cache_key = redis_buffer._format_key("historial", session_id)
-                cached = redis_buffer._json_get(cache_key)
+                # El límite y la proyección forman parte de la clave: con TOP el
+                # resultado de limit=5 ya no sirve para limit=100
+                variant = f"top{limit}"
+                if fields:
+                    variant += f":f{redis_buffer.stable_hash(','.join(fields))[:8]}"
+                cache_key = redis_buffer._format_key("historial", session_id, variant)
+                cached, _ = redis_buffer._json_get_tiered(
+                    cache_key, refresh_bucket="memoria")
                 if cached:
                     logging.info(
                         f"[CACHE HIT] Historial sesión {session_id}: {len(cached)} items desde Redis")
-                    redis_buffer._refresh_ttl(cache_key, "memoria")
                     return cached
             except Exception as e:
                 logging.warning(f"[CACHE ERROR] Redis no disponible: {e}")
 
-        container = self._get_cosmos_container()
-        if not container:
-            return []
-
-        query = "SELECT * FROM c WHERE c.session_id = @session_id ORDER BY c._ts DESC"
         try:
-            parameters: List[Dict[str, Any]] = [
-                {"name": "@session_id", "value": session_id}]
-
             logging.debug(
-                f"[COSMOS] Ejecutando consulta con session_id: {repr(session_id)}")
-
-            items = list(container.query_items(
-                query=query,
-                parameters=parameters,
-                max_item_count=limit,
-                enable_cross_partition_query=True
-            ))
+                f"[COSMOS] Consultando historial con session_id: {repr(session_id)}")
+
+            result = self.session_queries.query(
+                "get_session_history",
+                session_id,
+                fields=fields,
+                order_by="c._ts DESC",
+                limit=limit,
+            )
+            items = result.items
 
             # Guardar en Redis para próximos accesos si está habilitado
             if cache_key and items:
@@ -424,7 +474,7 @@ class MemoryService:
                     redis_buffer._json_set(
                         cache_key, items, ttl=redis_buffer._get_ttl("memoria"))
                     redis_buffer._emit_cache_event(
-                        "write", "memoria", cache_key, {"items": len(items)})
+                        "write", "memoria", cache_key, {"items": len(items), "ru": result.request_charge})
                 except Exception as e:
                     logging.debug(
                         f"[CACHE WRITE] No se pudo cachear historial en Redis: {e}", exc_info=True)
@@ -435,13 +485,13 @@ class MemoryService:
             error_msg = str(e)
             if "1004" in error_msg or "400" in error_msg:
                 logging.error(
-                    f"[COSMOS] Error 400/1004 en consulta historial - session_id: {repr(session_id)}, query: {query}, error: {error_msg}")
+                    f"[COSMOS] Error 400/1004 en consulta historial - session_id: {repr(session_id)}, error: {error_msg}")
             else:
                 logging.error(f"[COSMOS] Error consultando historial: {e}")
             return []
 
     def record_interaction(self, agent_id: str, source: str, input_data: Any, output_data: Any) -> bool:
-        """Registra interacción de agente"""
+        """Registra interacción de agente (True si quedó en el log local o aceptada para Cosmos)"""
         document = {
             "id": str(uuid.uuid4()),
             "session_id": input_data.get("session_id") or f"agent_{agent_id}_{int(datetime.now(timezone.utc).timestamp())}",
@@ -459,6 +509,7 @@ class MemoryService:
 
         return success_local or success_cosmos
 
+    @traced("memory.registrar_llamada")
     def registrar_llamada(self, source: str, endpoint: str, method: str, params: Dict[str, Any], response_data: Any, success: bool) -> bool:
         """Método requerido por memory_decorator.py para registrar llamadas a endpoints"""
 
@@ -1018,7 +1069,10 @@ class MemoryService:
                     "llamadas_fallidas": 0,
                     "fuentes_activas": [],
                     "ultimo_registro": None,
-                    "servicio": "local_only"
+                    "servicio": "local_only",
+                    "write_behind": self.get_write_behind_stats(),
+                    "cosmos_ru": self.session_queries.stats(),
+                    "dedup": self.dedup.stats()
                 }
 
             # Consultar estadísticas desde Cosmos DB
@@ -1052,7 +1106,10 @@ class MemoryService:
                 "llamadas_fallidas": fallidas,
                 "fuentes_activas": fuentes,
                 "ultimo_registro": ultimo.get("timestamp") if ultimo else None,
-                "servicio": "cosmos_db"
+                "servicio": "cosmos_db",
+                "write_behind": self.get_write_behind_stats(),
+                "cosmos_ru": self.session_queries.stats(),
+                "dedup": self.dedup.stats()
             }
 
         except Exception as e:
@@ -1131,25 +1188,16 @@ class MemoryService:
 
         return DOC_CLASS_COGNITIVE
 
+    @traced("memory.existe_texto_en_sesion")
     def existe_texto_en_sesion(self, session_id: str, texto_hash: str) -> bool:
         """Verifica si un texto_hash ya existe en la sesión (barrera anti-duplicados)"""
         try:
-            container = self._get_cosmos_container()
-            if not container:
-                return False
-
-            query = "SELECT TOP 1 c.id FROM c WHERE c.session_id = @session_id AND c.texto_hash = @hash"
-            parameters: List[Dict[str, Any]] = [
-                {"name": "@session_id", "value": session_id},
-                {"name": "@hash", "value": texto_hash}
-            ]
-            items = list(container.query_items(
-                query=query,
-                parameters=parameters,
-                enable_cross_partition_query=True
-            ))
-
-            return len(items) > 0
+            return self.session_queries.exists(
+                "existe_texto_en_sesion",
+                session_id,
+                where="c.texto_hash = @hash",
+                parameters=[{"name": "@hash", "value": texto_hash}],
+            )
         except Exception as e:
             logging.warning(f"Error verificando duplicado por hash: {e}")
             return False
@@ -1157,27 +1205,37 @@ class MemoryService:
     def _es_evento_repetitivo(self, endpoint: str, response_data: Any, session_id: str, ventana: int = 5) -> bool:
         """Detecta si el mismo endpoint se ejecutó recientemente con respuesta similar"""
         try:
-            container = self._get_cosmos_container()
-            if not container:
+            # Basta con saber si hay 3 coincidencias dentro de la ventana: TOP 3, solo ids
+            umbral = 3
+            if ventana < umbral:
                 return False
-
-            query = f"SELECT TOP {ventana} * FROM c WHERE c.session_id = @session_id AND c.data.endpoint = @endpoint ORDER BY c.timestamp DESC"
-            parameters: List[Dict[str, Any]] = [
-                {"name": "@session_id", "value": session_id},
-                {"name": "@endpoint", "value": endpoint}
-            ]
-            items = list(container.query_items(
-                query=query,
-                parameters=parameters,
-                enable_cross_partition_query=True
-            ))
-
-            if len(items) >= 3:
-                return True
-            return False
+            result = self.session_queries.query(
+                "es_evento_repetitivo",
+                session_id,
+                where="c.data.endpoint = @endpoint",
+                parameters=[{"name": "@endpoint", "value": endpoint}],
+                fields=["id"],
+                limit=umbral,
+            )
+            return len(result.items) >= umbral
         except:
             return False
 
+    def es_duplicado_para_indexar(self, texto_semantico: str) -> bool:
+        """
+        Decide si un texto ya está indexado en AI Search. Casi-duplicados por
+        SimHash y negativos del Bloom se resuelven localmente; solo los
+        positivos inciertos pagan embedding + búsqueda vectorial.
+        """
+        self.dedup.ensure_seeded(self._get_cosmos_container)
+        veredicto = self.dedup.check_indexing(texto_semantico)
+        if veredicto == "duplicate":
+            logging.info("Duplicado detectado por SimHash (sin embedding)")
+            return True
+        if veredicto == "new":
+            return False
+        return self.evento_ya_existe(texto_semantico)
+
     def evento_ya_existe(self, texto_semantico: str) -> bool:
         """Verifica si un evento con texto similar ya existe en AI Search."""
         try:
@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""
+Perf Tracer
+-----------
+Spans de latencia para el camino caliente de los requests:
+
+- `span("redis.get")` (context manager) y `@traced("memory.history")`
+  (decorador, también para corrutinas) miden con `perf_counter`. Con
+  PERF_TRACING_ENABLED=0 `span()` devuelve un no-op compartido y los
+  decoradores llaman directo a la función.
+- Agregado por span: count, total, max y p50/p95/p99 sobre un reservorio
+  acotado (PERF_SPAN_RESERVOIR). Cada span se registra además en el
+  histograma OpenTelemetry `copiloto.span.duration` (customMetrics en App
+  Insights vía azure-monitor-opentelemetry).
+- `request_trace(route)`: desglose por request (contextvar). Los requests
+  que superan PERF_SLOW_REQUEST_MS se guardan con su desglose en `slow`.
+- Profiler por muestreo opcional (PERF_PROFILER_ENABLED): para una fracción
+  PERF_PROFILER_SAMPLE_RATE de los requests, un thread muestrea la pila del
+  thread del request cada PERF_PROFILER_INTERVAL_MS; si el request resulta
+  lento, las pilas más frecuentes se adjuntan a su traza.
+"""
+import contextvars
+import functools
+import inspect
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+try:
+    from opentelemetry import metrics as otel_metrics
+except Exception:  # pragma: no cover
+    otel_metrics = None
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() not in ("0", "false", "no", "off")
+
+
+_current_trace: "contextvars.ContextVar[Optional[RequestTrace]]" = contextvars.ContextVar(
+    "perf_request_trace", default=None)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc: Any) -> bool:
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("_tracer", "name", "_start")
+
+    def __init__(self, tracer: "PerfTracer", name: str):
+        self._tracer = tracer
+        self.name = name
+        self._start = 0.0
+
+    def __enter__(self) -> "_Span":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, *exc: Any) -> bool:
+        elapsed_ms = (time.perf_counter() - self._start) * 1000
+        self._tracer._observe(self.name, elapsed_ms, self._start, exc_type is not None)
+        return False
+
+
+class RequestTrace:
+    """Desglose de spans de un request (solo los del thread/contexto del request)."""
+
+    __slots__ = ("route", "start", "spans", "thread_id", "stacks", "total_ms")
+
+    def __init__(self, route: str):
+        self.route = route
+        self.start = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self.thread_id = threading.get_ident()
+        self.stacks: Optional[Counter] = None
+        self.total_ms = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        breakdown: Dict[str, float] = {}
+        for item in self.spans:
+            breakdown[item["name"]] = round(breakdown.get(item["name"], 0.0) + item["ms"], 2)
+        data: Dict[str, Any] = {
+            "route": self.route,
+            "total_ms": round(self.total_ms, 2),
+            "breakdown_ms": dict(sorted(breakdown.items(), key=lambda kv: kv[1], reverse=True)),
+            "spans": self.spans[:200],
+        }
+        if self.stacks:
+            data["hot_stacks"] = [
+                {"stack": stack, "samples": count} for stack, count in self.stacks.most_common(15)]
+        return data
+
+
+class _SpanStats:
+    __slots__ = ("count", "errors", "total_ms", "max_ms", "samples")
+
+    def __init__(self, reservoir: int):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.samples: Deque[float] = deque(maxlen=reservoir)
+
+    def snapshot(self) -> Dict[str, Any]:
+        values = sorted(self.samples)
+
+        def pct(p: float) -> Optional[float]:
+            if not values:
+                return None
+            return round(values[min(len(values) - 1, int(len(values) * p))], 2)
+
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else None,
+            "max_ms": round(self.max_ms, 2),
+            "p50_ms": pct(0.5),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+        }
+
+
+class PerfTracer:
+    def __init__(self):
+        self.enabled = _env_flag("PERF_TRACING_ENABLED", "1")
+        self._reservoir = int(os.getenv("PERF_SPAN_RESERVOIR", "1024"))
+        self._slow_ms = float(os.getenv("PERF_SLOW_REQUEST_MS", "2000"))
+        self._profiler_enabled = _env_flag("PERF_PROFILER_ENABLED", "0")
+        self._profiler_rate = float(os.getenv("PERF_PROFILER_SAMPLE_RATE", "0.1"))
+        self._profiler_interval = float(os.getenv("PERF_PROFILER_INTERVAL_MS", "10")) / 1000
+        self._lock = threading.Lock()
+        self._stats: Dict[str, _SpanStats] = {}
+        self._slow: Deque[Dict[str, Any]] = deque(maxlen=int(os.getenv("PERF_SLOW_KEEP", "20")))
+        self._profiled: Dict[int, RequestTrace] = {}
+        self._sampler: Optional[threading.Thread] = None
+        self._histogram = None
+        if self.enabled and otel_metrics is not None:
+            try:
+                self._histogram = otel_metrics.get_meter("copiloto.perf").create_histogram(
+                    "copiloto.span.duration", unit="ms", description="Duración por span")
+            except Exception:
+                logging.debug("[PerfTracer] Métricas OpenTelemetry no disponibles.", exc_info=True)
+
+    # ------------------------------------------------------------------ #
+    # Spans
+    # ------------------------------------------------------------------ #
+    def span(self, name: str) -> Any:
+        if not self.enabled:
+            return _NOOP
+        return _Span(self, name)
+
+    def _observe(self, name: str, elapsed_ms: float, start: float, failed: bool,
+                 in_trace: bool = True) -> None:
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = _SpanStats(self._reservoir)
+            stats.count += 1
+            stats.total_ms += elapsed_ms
+            stats.samples.append(elapsed_ms)
+            if elapsed_ms > stats.max_ms:
+                stats.max_ms = elapsed_ms
+            if failed:
+                stats.errors += 1
+        trace = _current_trace.get() if in_trace else None
+        if trace is not None:
+            trace.spans.append({"name": name, "offset_ms": round((start - trace.start) * 1000, 2),
+                                "ms": round(elapsed_ms, 2)})
+        if self._histogram is not None:
+            try:
+                self._histogram.record(elapsed_ms, {"span": name})
+            except Exception:
+                pass
+
+    def traced(self, name: Optional[str] = None) -> Callable[[Callable], Callable]:
+        """Decorador: mide cada llamada como un span (sync o async)."""
+        def decorator(fn: Callable) -> Callable:
+            span_name = name or f"{fn.__module__}.{fn.__qualname__}"
+            if inspect.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                    if not self.enabled:
+                        return await fn(*args, **kwargs)
+                    with _Span(self, span_name):
+                        return await fn(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with _Span(self, span_name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    # ------------------------------------------------------------------ #
+    # Trazas por request
+    # ------------------------------------------------------------------ #
+    def request_trace(self, route: str) -> Any:
+        if not self.enabled:
+            return _NOOP
+        return _RequestTraceScope(self, route)
+
+    def _start_request(self, trace: RequestTrace) -> None:
+        if self._profiler_enabled and random.random() < self._profiler_rate:
+            trace.stacks = Counter()
+            with self._lock:
+                self._profiled[trace.thread_id] = trace
+                if self._sampler is None or not self._sampler.is_alive():
+                    self._sampler = threading.Thread(
+                        target=self._sample_loop, name="perf-sampler", daemon=True)
+                    self._sampler.start()
+
+    def _finish_request(self, trace: RequestTrace) -> None:
+        trace.total_ms = (time.perf_counter() - trace.start) * 1000
+        if trace.stacks is not None:
+            with self._lock:
+                self._profiled.pop(trace.thread_id, None)
+        self._observe(f"request:{trace.route}", trace.total_ms, trace.start, False, in_trace=False)
+        if trace.total_ms >= self._slow_ms:
+            data = trace.to_dict()
+            with self._lock:
+                self._slow.append(data)
+            logging.warning(
+                f"[PerfTracer] Request lento {trace.route}: {data['total_ms']} ms "
+                f"(top: {list(data['breakdown_ms'].items())[:5]})")
+
+    def _sample_loop(self) -> None:
+        while True:
+            with self._lock:
+                targets = dict(self._profiled)
+            if not targets:
+                # Sin requests perfilados: el thread termina y se recrea al siguiente
+                with self._lock:
+                    if not self._profiled:
+                        self._sampler = None
+                        return
+                continue
+            frames = sys._current_frames()
+            for thread_id, trace in targets.items():
+                frame = frames.get(thread_id)
+                if frame is None or trace.stacks is None:
+                    continue
+                parts = []
+                while frame is not None and len(parts) < 12:
+                    code = frame.f_code
+                    parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                    frame = frame.f_back
+                trace.stacks[";".join(reversed(parts))] += 1
+            time.sleep(self._profiler_interval)
+
+    # ------------------------------------------------------------------ #
+    # Métricas
+    # ------------------------------------------------------------------ #
+    def stats(self, prefix: Optional[str] = None) -> Dict[str, Any]:
+        with self._lock:
+            spans = {name: s.snapshot() for name, s in self._stats.items()
+                     if not prefix or name.startswith(prefix)}
+            slow = list(self._slow)
+        return {
+            "enabled": self.enabled,
+            "slow_request_ms": self._slow_ms,
+            "profiler": {"enabled": self._profiler_enabled, "sample_rate": self._profiler_rate,
+                         "interval_ms": self._profiler_interval * 1000},
+            "spans": dict(sorted(spans.items(), key=lambda kv: kv[1]["p95_ms"] or 0, reverse=True)),
+            "slow_requests": slow,
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self._slow.clear()
+
+
+class _RequestTraceScope:
+    __slots__ = ("_tracer", "_trace", "_token")
+
+    def __init__(self, tracer: PerfTracer, route: str):
+        self._tracer = tracer
+        self._trace = RequestTrace(route)
+        self._token = None
+
+    def __enter__(self) -> RequestTrace:
+        self._token = _current_trace.set(self._trace)
+        self._tracer._start_request(self._trace)
+        return self._trace
+
+    def __exit__(self, *exc: Any) -> bool:
+        try:
+            self._tracer._finish_request(self._trace)
+        finally:
+            _current_trace.reset(self._token)
+        return False
+
+
+perf_tracer = PerfTracer()
+span = perf_tracer.span
+traced = perf_tracer.traced
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+Ranged Reader
+-------------
+Lecturas por rango de líneas o de bytes sobre blobs y archivos locales, sin
+cargar el archivo completo en memoria:
+
+- Índice de offsets por línea (`array('Q')`, 8 bytes por línea) construido
+  una sola vez recorriendo el blob por chunks y cacheado por ETag (blob) o
+  (mtime_ns, size) (local). LRU de RANGED_INDEX_MAX_ENTRIES índices.
+- Con el índice, un rango de líneas es una sola descarga por rango
+  (`download_blob(offset, length)`) condicionada al ETag del índice
+  (If-Match): si el blob cambió (412) se reconstruye el índice y se reintenta.
+- Un rango de bytes no necesita índice.
+- El tamaño de cada respuesta se acota a RANGED_READ_MAX_BYTES; si el rango
+  pedido lo supera se recorta y se informa `truncado` con el siguiente rango.
+  Una línea que sola supera el máximo se devuelve como prefijo en bytes
+  (`linea_parcial`) y el siguiente rango continúa por bytes.
+- Un `byte_inicio` más allá del final devuelve contenido vacío, igual en blob
+  (416) que en local.
+"""
+import bisect
+import logging
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+try:
+    from azure.core import MatchConditions
+    from azure.core.exceptions import HttpResponseError, ResourceModifiedError
+except ImportError:  # pragma: no cover - SDK ausente en entornos locales
+    MatchConditions = None
+    HttpResponseError = None
+    ResourceModifiedError = None
+
+# Tamaño de los bloques con que se recorre un archivo local al indexarlo
+LOCAL_CHUNK_BYTES = 1024 * 1024
+
+
+class LineIndex:
+    """Offsets de inicio de cada línea y tamaño total del archivo."""
+
+    __slots__ = ("offsets", "size", "validator")
+
+    def __init__(self, validator: Any):
+        self.offsets = array("Q", [0])
+        self.size = 0
+        self.validator = validator
+
+    def feed(self, chunk: bytes) -> None:
+        base = self.size
+        pos = chunk.find(b"\n")
+        while pos != -1:
+            self.offsets.append(base + pos + 1)
+            pos = chunk.find(b"\n", pos + 1)
+        self.size += len(chunk)
+
+    @property
+    def total_lines(self) -> int:
+        # Si el archivo termina en "\n" el último offset no abre una línea
+        if self.offsets[-1] == self.size:
+            return len(self.offsets) - 1
+        return len(self.offsets)
+
+    def byte_span(self, first: int, last: int) -> Tuple[int, int]:
+        """[inicio, fin) en bytes de las líneas first..last (1-based, inclusivas)."""
+        start = self.offsets[first - 1]
+        end = self.offsets[last] if last < len(self.offsets) else self.size
+        return start, end
+
+
+class RangedReader:
+    def __init__(self):
+        self.max_bytes = int(os.getenv("RANGED_READ_MAX_BYTES", str(256 * 1024)))
+        self.max_indexes = int(os.getenv("RANGED_INDEX_MAX_ENTRIES", "64"))
+        self._indexes: "OrderedDict[str, LineIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"index_builds": 0, "index_hits": 0, "range_reads": 0, "stale_retries": 0}
+
+    # ------------------------------------------------------------------ #
+    # Índices
+    # ------------------------------------------------------------------ #
+    def _cached_index(self, key: str, validator: Any = None) -> Optional[LineIndex]:
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is None or (validator is not None and index.validator != validator):
+                return None
+            self._indexes.move_to_end(key)
+            self._counters["index_hits"] += 1
+            return index
+
+    def _store_index(self, key: str, index: LineIndex) -> None:
+        with self._lock:
+            self._indexes[key] = index
+            self._indexes.move_to_end(key)
+            self._counters["index_builds"] += 1
+            while len(self._indexes) > self.max_indexes:
+                self._indexes.popitem(last=False)
+
+    def _build_index(self, key: str, validator: Any, chunks: Iterable[bytes]) -> LineIndex:
+        index = LineIndex(validator)
+        for chunk in chunks:
+            index.feed(chunk)
+        self._store_index(key, index)
+        return index
+
+    def _blob_index(self, blob_client: Any, refresh: bool = False) -> LineIndex:
+        key = f"blob:{blob_client.container_name}/{blob_client.blob_name}"
+        index = None if refresh else self._cached_index(key)
+        if index is None:
+            downloader = blob_client.download_blob()
+            index = self._build_index(key, downloader.properties.etag, downloader.chunks())
+        return index
+
+    def _local_index(self, path: Path, firma: Tuple[int, int]) -> LineIndex:
+        key = f"local:{path}"
+        index = self._cached_index(key, firma)
+        if index is None:
+            with open(path, "rb") as fh:
+                index = self._build_index(key, firma, iter(lambda: fh.read(LOCAL_CHUNK_BYTES), b""))
+        return index
+
+    # ------------------------------------------------------------------ #
+    # Lecturas
+    # ------------------------------------------------------------------ #
+    def read_blob(self, blob_client: Any, linea_inicio: Optional[int] = None,
+                  linea_fin: Optional[int] = None, byte_inicio: Optional[int] = None,
+                  byte_fin: Optional[int] = None) -> Dict[str, Any]:
+        """Lee un rango de un blob. Propaga ResourceNotFoundError si no existe."""
+        if byte_inicio is not None:
+            start = max(0, byte_inicio)
+            length = self._capped_length(start, byte_fin)
+            try:
+                downloader = blob_client.download_blob(offset=start, length=length)
+            except Exception as e:
+                # 416: el rango empieza después del final del blob
+                if HttpResponseError is not None and isinstance(e, HttpResponseError) \
+                        and getattr(e, "status_code", None) == 416:
+                    props = blob_client.get_blob_properties()
+                    return self._byte_result(b"", start, byte_fin, props.size, props.etag)
+                raise
+            data = self._collect(downloader.chunks(), length)
+            props = downloader.properties
+            return self._byte_result(data, start, byte_fin, props.size, props.etag)
+
+        for intento in range(2):
+            index = self._blob_index(blob_client, refresh=intento > 0)
+            first, last, start, end, truncado = self._line_span(index, linea_inicio, linea_fin)
+            if end <= start:
+                return self._line_result(b"", index, first, last, truncado, index.validator)
+            try:
+                downloader = blob_client.download_blob(
+                    offset=start, length=end - start, etag=index.validator,
+                    match_condition=MatchConditions.IfNotModified)
+            except Exception as e:
+                # 412: el blob cambió desde que se indexó
+                if ResourceModifiedError is not None and isinstance(e, ResourceModifiedError) and intento == 0:
+                    logging.info(f"[RangedReader] {blob_client.blob_name} cambió; reconstruyendo índice")
+                    self._counters["stale_retries"] += 1
+                    continue
+                raise
+            data = self._collect(downloader.chunks(), end - start)
+            return self._line_result(data, index, first, last, truncado, index.validator)
+        raise RuntimeError("El blob cambió durante la lectura por rango")
+
+    def read_local(self, path: Path, linea_inicio: Optional[int] = None,
+                   linea_fin: Optional[int] = None, byte_inicio: Optional[int] = None,
+                   byte_fin: Optional[int] = None) -> Dict[str, Any]:
+        st = path.stat()
+        if byte_inicio is not None:
+            start = max(0, byte_inicio)
+            length = self._capped_length(start, byte_fin)
+            with open(path, "rb") as fh:
+                fh.seek(start)
+                data = fh.read(length)
+            self._counters["range_reads"] += 1
+            return self._byte_result(data, start, byte_fin, st.st_size, None)
+
+        index = self._local_index(path, (st.st_mtime_ns, st.st_size))
+        first, last, start, end, truncado = self._line_span(index, linea_inicio, linea_fin)
+        with open(path, "rb") as fh:
+            fh.seek(start)
+            data = fh.read(max(0, end - start))
+        self._counters["range_reads"] += 1
+        return self._line_result(data, index, first, last, truncado, None)
+
+    # ------------------------------------------------------------------ #
+    # Helpers
+    # ------------------------------------------------------------------ #
+    def _capped_length(self, start: int, byte_fin: Optional[int]) -> int:
+        if byte_fin is None or byte_fin < start:
+            return self.max_bytes
+        return min(byte_fin - start + 1, self.max_bytes)
+
+    def _collect(self, chunks: Iterable[bytes], length: int) -> bytes:
+        buffer = bytearray()
+        for chunk in chunks:
+            buffer.extend(chunk)
+            if len(buffer) >= length:
+                break
+        self._counters["range_reads"] += 1
+        return bytes(buffer[:length])
+
+    def _line_span(self, index: LineIndex, linea_inicio: Optional[int],
+                   linea_fin: Optional[int]) -> Tuple[int, int, int, int, bool]:
+        total = index.total_lines
+        first = max(1, linea_inicio or 1)
+        last = min(total, linea_fin or total)
+        if total == 0 or first > last:
+            return first, first - 1, 0, 0, False
+        start, end = index.byte_span(first, last)
+        truncado = False
+        if end - start > self.max_bytes:
+            # Recortar a líneas completas dentro del máximo: la línea L termina
+            # en offsets[L]
+            ultima_que_cabe = bisect.bisect_right(index.offsets, start + self.max_bytes) - 1
+            if ultima_que_cabe < first:
+                # La primera línea sola ya supera el máximo: prefijo en bytes
+                return first, first, start, start + self.max_bytes, True
+            last, truncado = min(last - 1, ultima_que_cabe), True
+            start, end = index.byte_span(first, last)
+        return first, last, start, end, truncado
+
+    @staticmethod
+    def _line_result(data: bytes, index: LineIndex, first: int, last: int,
+                     truncado: bool, etag: Optional[str]) -> Dict[str, Any]:
+        contenido = data.decode("utf-8", errors="replace")
+        rango = {"tipo": "lineas", "linea_inicio": first, "linea_fin": last,
+                 "byte_inicio": index.offsets[first - 1] if first - 1 < len(index.offsets) else index.size,
+                 "bytes": len(data)}
+        resultado = {
+            "contenido": contenido,
+            "rango": rango,
+            "total_lineas": index.total_lines,
+            "tamaño_total": index.size,
+            "etag": etag,
+            "truncado": truncado,
+        }
+        fin_linea = index.byte_span(last, last)[1] if last >= first else 0
+        if data and rango["byte_inicio"] + len(data) < fin_linea:
+            # Línea más larga que el máximo: se continúa por bytes
+            rango["linea_parcial"] = True
+            inicio = rango["byte_inicio"] + len(data)
+            resultado["siguiente"] = {"byte_inicio": inicio,
+                                      "byte_fin": min(fin_linea, inicio + len(data)) - 1}
+        elif last < index.total_lines:
+            resultado["siguiente"] = {"linea_inicio": last + 1,
+                                      "linea_fin": min(index.total_lines, 2 * last - first + 1)}
+        return resultado
+
+    def _byte_result(self, data: bytes, start: int, byte_fin: Optional[int], size: int,
+                     etag: Optional[str]) -> Dict[str, Any]:
+        end = start + len(data)
+        abierto = byte_fin is None or byte_fin < start
+        resultado = {
+            # Un rango de bytes puede cortar un carácter multibyte en los bordes
+            "contenido": data.decode("utf-8", errors="replace"),
+            "rango": {"tipo": "bytes", "byte_inicio": start, "byte_fin": end - 1 if data else start,
+                      "bytes": len(data)},
+            "tamaño_total": size,
+            "etag": etag,
+            # Recortado por RANGED_READ_MAX_BYTES antes del final pedido (o del archivo)
+            "truncado": end < size and len(data) >= self.max_bytes and (abierto or end <= byte_fin),
+        }
+        if end < size:
+            resultado["siguiente"] = {"byte_inicio": end, "byte_fin": min(size, end + len(data)) - 1}
+        return resultado
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"indices": len(self._indexes),
+                    "lineas_indexadas": sum(len(i.offsets) for i in self._indexes.values()),
+                    "max_bytes": self.max_bytes, **self._counters}
+
+
+ranged_reader = RangedReader()
@@ -20,13 +20,18 @@ import hashlib
 import ssl
 import re
 import unicodedata
-from typing import Any, Callable, Dict, Optional, Tuple, Union, cast
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union, cast
 import redis
 from redis.cluster import RedisCluster
 from datetime import datetime
 from redis import exceptions as redis_exceptions
 from redis.exceptions import ResponseError, AuthenticationError, ConnectionError as RedisConnectionError
 
+from services.local_cache import LocalCacheTier, MISSING
+from services.perf_tracer import traced
+from services.single_flight import SingleFlight
+from services.semantic_llm_cache import SemanticLLMCache
+
 CUSTOM_EVENT_LOGGER = logging.getLogger("appinsights.customEvents")
 
 # Intento de importar credenciales de Azure
@@ -157,15 +162,45 @@ def generate_semantic_cache_key(message: str) -> str:
     return semantic_key
 
 
-# Estrategia de TTLs (segundos) por tipo de payload
+# Estrategia de TTLs (segundos) por tipo de payload.
+# l1_max_bytes / l1_ttl: límites del caché en proceso (L1) delante de Redis.
+# El TTL de L1 es corto a propósito: otros workers pueden escribir la misma clave.
 CACHE_STRATEGY = {
-    "memoria": {"ttl": int(os.getenv("REDIS_MEMORIA_TTL", "300"))},  # 5 min
-    "thread": {"ttl": int(os.getenv("REDIS_THREAD_TTL", "300"))},  # 5 min
-    "narrativa": {"ttl": int(os.getenv("REDIS_NARRATIVA_TTL", "3600"))},  # 1 h
-    # 60 min
-    "response": {"ttl": int(os.getenv("REDIS_RESPONSE_TTL", "3600"))},
-    "search": {"ttl": int(os.getenv("REDIS_SEARCH_TTL", "1800"))},  # 30 min
-    "llm": {"ttl": int(os.getenv("REDIS_LLM_TTL", "5400"))},  # 90 min
+    "memoria": {
+        "ttl": int(os.getenv("REDIS_MEMORIA_TTL", "300")),  # 5 min
+        "l1_max_bytes": int(os.getenv("REDIS_L1_MEMORIA_BYTES", "2097152")),
+        "l1_ttl": int(os.getenv("REDIS_L1_MEMORIA_TTL", "15")),
+    },
+    "thread": {
+        "ttl": int(os.getenv("REDIS_THREAD_TTL", "300")),  # 5 min
+        "l1_max_bytes": int(os.getenv("REDIS_L1_THREAD_BYTES", "2097152")),
+        "l1_ttl": int(os.getenv("REDIS_L1_THREAD_TTL", "15")),
+    },
+    "narrativa": {
+        "ttl": int(os.getenv("REDIS_NARRATIVA_TTL", "3600")),  # 1 h
+        "l1_max_bytes": int(os.getenv("REDIS_L1_NARRATIVA_BYTES", "2097152")),
+        "l1_ttl": int(os.getenv("REDIS_L1_NARRATIVA_TTL", "60")),
+    },
+    "response": {
+        "ttl": int(os.getenv("REDIS_RESPONSE_TTL", "3600")),  # 60 min
+        "l1_max_bytes": int(os.getenv("REDIS_L1_RESPONSE_BYTES", "4194304")),
+        "l1_ttl": int(os.getenv("REDIS_L1_RESPONSE_TTL", "60")),
+    },
+    "search": {
+        "ttl": int(os.getenv("REDIS_SEARCH_TTL", "1800")),  # 30 min
+        "l1_max_bytes": int(os.getenv("REDIS_L1_SEARCH_BYTES", "4194304")),
+        "l1_ttl": int(os.getenv("REDIS_L1_SEARCH_TTL", "60")),
+    },
+    "llm": {
+        "ttl": int(os.getenv("REDIS_LLM_TTL", "5400")),  # 90 min
+        "l1_max_bytes": int(os.getenv("REDIS_L1_LLM_BYTES", "8388608")),
+        "l1_ttl": int(os.getenv("REDIS_L1_LLM_TTL", "120")),
+    },
+    "embedding": {
+        "ttl": int(os.getenv("REDIS_EMBEDDING_TTL", "2592000")),  # 30 días (clave por contenido)
+        "l1_max_bytes": int(os.getenv("REDIS_L1_EMBEDDING_BYTES", "0")),  # ya hay almacén local
+        "l1_ttl": int(os.getenv("REDIS_L1_EMBEDDING_TTL", "0")),
+    },
 }
 
 
@@ -220,6 +255,21 @@ class RedisBufferService:
         self._client = None
         self._has_redisjson = False
 
+        # Caché en proceso (L1) delante de Redis (L2); REDIS_L1_ENABLED=0 lo apaga
+        self._l1 = LocalCacheTier(
+            bucket_limits=CACHE_STRATEGY,
+            enabled=os.getenv("REDIS_L1_ENABLED", "1").lower() not in (
+                "0", "false", "no", "off"),
+        )
+        self._l2_hits = 0
+        self._l2_misses = 0
+
+        # Coalescencia de misses concurrentes (lock distribuido con lease corto)
+        self._single_flight = SingleFlight(self)
+
+        # Tier semántico del bucket llm (embeddings + índice vectorial local)
+        self._semantic_llm = SemanticLLMCache(self)
+
     # ------------------------------------------------------------------ #
     # Conexión (AAD vía MSI/CLI / fallback por clave)
     # ------------------------------------------------------------------ #
@@ -494,6 +544,19 @@ class RedisBufferService:
         return CACHE_STRATEGY.get(bucket, {}).get("ttl", 300)
 
     def _json_set(self, key: str, payload: Any, ttl: Optional[int] = None) -> bool:
+        """
+        Escribe en Redis (L2) y, si tuvo éxito, también en L1 (write-through).
+        Si la escritura falla se invalida L1 para no servir un valor anterior.
+        """
+        ok = self._json_set_l2(key, payload, ttl)
+        if ok:
+            self._l1.put(key, payload, ttl or self._get_ttl("memoria"))
+        else:
+            self._l1.invalidate(key)
+        return ok
+
+    @traced("redis.set")
+    def _json_set_l2(self, key: str, payload: Any, ttl: Optional[int] = None) -> bool:
         """Escritura robusta con mejor logging: intenta RedisJSON, maneja cluster y hace fallback serializado."""
         if not self.is_enabled or payload is None:
             return False
@@ -534,52 +597,49 @@ class RedisBufferService:
         write_ok = False
 
         if getattr(self, "_has_redisjson", False) and failure_count < 3:
-            # Evitar conflicto de tipos: si la clave existe como string u otro tipo, saltar RedisJSON
-            key_type = None
+            # JSON.SET + EXPIRE en un único round trip (MULTI en standalone).
+            # Si la clave existe con otro tipo, JSON.SET devuelve WRONGTYPE y
+            # se aplica el fallback serializado (SET con EX) más abajo.
             try:
-                key_type = client.type(processed_key)
-            except Exception:
-                key_type = None
-            if key_type and key_type not in (b"ReJSON-RL", b"ReJSON", "ReJSON-RL", "ReJSON", b"none", "none"):
+                pipe = self._pipeline(transaction=True)
+                pipe.json().set(processed_key, "$", payload)
+                if ttl_value:
+                    pipe.expire(processed_key, ttl_value)
+                results = pipe.execute(raise_on_error=False)
+                pipe_error = next(
+                    (r for r in results if isinstance(r, Exception)), None)
+                if pipe_error is not None:
+                    raise pipe_error
+                if processed_key in self._json_failures:
+                    del self._json_failures[processed_key]
+                self._reset_failures()
+                if processed_key in self._errored_keys:
+                    self._errored_keys.discard(processed_key)
+                write_ok = True
+
+                # ⭐ NUEVO: Logging de éxito para LLM cache
+                if is_llm_cache:
+                    logging.debug(
+                        f"[RedisBuffer] ✅ LLM cache write success (RedisJSON): {key[:80]}... (ttl: {ttl_value}s)")
+
+                return True
+            except ResponseError as e:
+                msg = str(e)
                 redisjson_failed = True
-                self._has_redisjson = False
-                logging.warning(
-                    f"[RedisBuffer] RedisJSON omitido para {processed_key}: tipo existente={key_type}")
-            else:
-                try:
-                    client.json().set(processed_key, "$", payload)
-                    if ttl_value:
-                        client.expire(processed_key, ttl_value)
-                    if processed_key in self._json_failures:
-                        del self._json_failures[processed_key]
-                    self._reset_failures()
-                    if processed_key in self._errored_keys:
-                        self._errored_keys.discard(processed_key)
-                    write_ok = True
-
-                    # ⭐ NUEVO: Logging de éxito para LLM cache
-                    if is_llm_cache:
-                        logging.debug(
-                            f"[RedisBuffer] ✅ LLM cache write success (RedisJSON): {key[:80]}... (ttl: {ttl_value}s)")
-
-                    return True
-                except ResponseError as e:
-                    msg = str(e)
-                    redisjson_failed = True
-                    self._json_failures[processed_key] = failure_count + 1
-                    if "wrong redis type" in msg.lower():
-                        self._errored_keys.add(processed_key)
-                    if "unknown command" in msg.lower() or "redisjson" in msg.lower():
-                        self._has_redisjson = False
-                    if failure_count == 0 or "MOVED" in msg or "ASK" in msg or "4200" in msg or "8501" in msg:
-                        logging.warning(
-                            f"[RedisBuffer] RedisJSON falló para {processed_key}: {msg}")
-                except Exception as e:
-                    redisjson_failed = True
-                    self._json_failures[processed_key] = failure_count + 1
-                    if failure_count == 0:
-                        logging.warning(
-                            f"[RedisBuffer] RedisJSON error para {processed_key}: {e}")
+                self._json_failures[processed_key] = failure_count + 1
+                if "wrong redis type" in msg.lower() or "wrongtype" in msg.lower():
+                    self._errored_keys.add(processed_key)
+                if "unknown command" in msg.lower() or "redisjson" in msg.lower():
+                    self._has_redisjson = False
+                if failure_count == 0 or "MOVED" in msg or "ASK" in msg or "4200" in msg or "8501" in msg:
+                    logging.warning(
+                        f"[RedisBuffer] RedisJSON falló para {processed_key}: {msg}")
+            except Exception as e:
+                redisjson_failed = True
+                self._json_failures[processed_key] = failure_count + 1
+                if failure_count == 0:
+                    logging.warning(
+                        f"[RedisBuffer] RedisJSON error para {processed_key}: {e}")
         else:
             redisjson_failed = True
 
@@ -621,28 +681,255 @@ class RedisBufferService:
         return write_ok
 
     def _json_get(self, key: str) -> Optional[Any]:
+        return self._json_get_tiered(key)[0]
+
+    def _json_get_tiered(self, key: str, refresh_bucket: Optional[str] = None) -> Tuple[Optional[Any], str]:
+        """
+        Lee primero de L1 y luego de Redis (L2), poblando L1 en un hit de L2.
+        Si se indica `refresh_bucket`, el TTL en Redis se renueva en el mismo
+        round trip de la lectura. Retorna (payload, tier) con tier en
+        {"l1", "l2", "miss"}.
+        """
+        cached = self._l1.get(key)
+        if cached is not MISSING:
+            return cached, "l1"
+
+        refresh_ttl = self._get_ttl(refresh_bucket) if refresh_bucket else None
+        payload = self._json_get_l2(key, refresh_ttl=refresh_ttl)
+        if payload is None:
+            self._l2_misses += 1
+            return None, "miss"
+
+        self._l2_hits += 1
+        self._l1.put(key, payload, self._get_ttl(LocalCacheTier.bucket_for(key)))
+        return payload, "l2"
+
+    @traced("redis.get")
+    def _json_get_l2(self, key: str, refresh_ttl: Optional[int] = None) -> Optional[Any]:
+        """GET (o JSON.GET) + EXPIRE opcional en un único pipeline."""
         if not self.is_enabled:
             return None
+        client = self._client
+        if not client:
+            return None
+        processed_key = self._prepare_cluster_key(key)
         try:
-            client = self._client
-            if not client:
-                return None
-            value = client.json().get(key)
-            if value is not None:
-                return value
+            pipe = self._pipeline()
+            if self._has_redisjson:
+                pipe.json().get(processed_key)
+            else:
+                pipe.get(processed_key)
+            if refresh_ttl:
+                pipe.expire(processed_key, refresh_ttl)
+            value = pipe.execute(raise_on_error=False)[0]
+            if isinstance(value, Exception):
+                # La clave existe como string (fallback serializado): GET directo
+                return self._decode_raw(client.get(processed_key))
+            if not self._has_redisjson or isinstance(value, (bytes, bytearray)):
+                return self._decode_raw(value)
+            return value
         except Exception as err:
-            try:
-                client = self._client
-                if client:
-                    raw = client.get(key)
-                    if raw and isinstance(raw, bytes):
-                        return json.loads(raw.decode("utf-8"))
-            except Exception as inner_err:  # pragma: no cover
-                logging.debug(f"[RedisBuffer] get {key} falló: {inner_err}")
-                self._register_failure(inner_err)
-                return None
+            logging.debug(f"[RedisBuffer] get {processed_key} falló: {err}")
             self._register_failure(err)
-        return None
+            return None
+
+    @staticmethod
+    def _decode_raw(raw: Any) -> Optional[Any]:
+        """Decodifica un valor serializado con el fallback de `_json_set`."""
+        if raw is None:
+            return None
+        if isinstance(raw, (bytes, bytearray)):
+            raw = raw.decode("utf-8", "replace")
+        if isinstance(raw, str):
+            try:
+                return json.loads(raw)
+            except (json.JSONDecodeError, TypeError):
+                return raw
+        return raw
+
+    # ------------------------------------------------------------------ #
+    # Pipelines y operaciones batch
+    # ------------------------------------------------------------------ #
+    def _pipeline(self, transaction: bool = False):
+        """
+        Crea un pipeline sobre el cliente actual. En cluster no hay MULTI entre
+        slots, así que las transacciones solo se usan en cliente standalone.
+        """
+        client = self._client
+        if client is None:
+            raise RedisConnectionError("Cliente Redis no inicializado")
+        if self._is_cluster:
+            return client.pipeline()
+        return client.pipeline(transaction=transaction)
+
+    def _group_by_slot(self, processed_keys: List[str]) -> List[List[str]]:
+        """
+        Agrupa claves (ya pasadas por `_prepare_cluster_key`) por hash slot para
+        que cada pipeline vaya a un único nodo. Gracias a los hash tags
+        ({memoria}, {thread}, {narrativa}) suelen quedar uno o dos grupos.
+        """
+        if not self._is_cluster:
+            return [list(processed_keys)]
+        keyslot = getattr(self._client, "keyslot", None)
+        groups: Dict[Any, List[str]] = {}
+        for pkey in processed_keys:
+            slot = keyslot(pkey) if callable(keyslot) else 0
+            groups.setdefault(slot, []).append(pkey)
+        return list(groups.values())
+
+    @traced("redis.get_many")
+    def get_many(self, keys: List[str], refresh_bucket: Optional[str] = None) -> Dict[str, Optional[Any]]:
+        """
+        Lee varias claves en un round trip por slot (L1 primero). Retorna
+        {clave: payload | None}. Con `refresh_bucket` también renueva el TTL.
+        """
+        result: Dict[str, Optional[Any]] = {}
+        pending: Dict[str, str] = {}
+        for key in dict.fromkeys(keys):
+            if not key:
+                continue
+            cached = self._l1.get(key)
+            if cached is not MISSING:
+                result[key] = cached
+            else:
+                pending[self._prepare_cluster_key(key)] = key
+
+        if not pending:
+            return result
+        if not self.is_enabled or not self._client:
+            result.update({key: None for key in pending.values()})
+            return result
+
+        refresh_ttl = self._get_ttl(refresh_bucket) if refresh_bucket else None
+        use_json = self._has_redisjson
+        for group in self._group_by_slot(list(pending)):
+            try:
+                pipe = self._pipeline()
+                if use_json:
+                    for pkey in group:
+                        pipe.json().get(pkey)
+                else:
+                    pipe.mget(group)
+                if refresh_ttl:
+                    for pkey in group:
+                        pipe.expire(pkey, refresh_ttl)
+                replies = pipe.execute(raise_on_error=False)
+                values = replies[:len(group)] if use_json else replies[0]
+                if isinstance(values, Exception):
+                    raise values
+                wrong_type = [pkey for pkey, value in zip(group, values)
+                              if isinstance(value, Exception)]
+                fallback = {}
+                if wrong_type:
+                    fallback = dict(zip(wrong_type, self._client.mget(wrong_type)))
+                for pkey, value in zip(group, values):
+                    if pkey in fallback:
+                        value = self._decode_raw(fallback[pkey])
+                    elif not use_json or isinstance(value, (bytes, bytearray)):
+                        value = self._decode_raw(value)
+                    key = pending[pkey]
+                    result[key] = value
+                    if value is None:
+                        self._l2_misses += 1
+                    else:
+                        self._l2_hits += 1
+                        self._l1.put(key, value, self._get_ttl(
+                            LocalCacheTier.bucket_for(key)))
+            except Exception as err:
+                logging.debug(f"[RedisBuffer] get_many falló: {err}")
+                self._register_failure(err)
+                for pkey in group:
+                    result.setdefault(pending[pkey], None)
+        return result
+
+    @traced("redis.set_many")
+    def set_many(self, items: Dict[str, Any], ttl: Optional[int] = None, bucket: Optional[str] = None) -> Dict[str, bool]:
+        """
+        Escribe varias claves en un round trip por slot (MULTI en standalone).
+        TTL: `ttl` explícito, o el del `bucket`, o el del prefijo de cada clave.
+        Retorna {clave: escrito_ok}. L1 se actualiza (write-through).
+        """
+        outcome: Dict[str, bool] = {key: False for key in items}
+        if not items or not self.is_enabled or not self._client:
+            for key in items:
+                self._l1.invalidate(key)
+            return outcome
+
+        prepared: Dict[str, Tuple[str, Any, int, Optional[bytes]]] = {}
+        for key, payload in items.items():
+            if not key or payload is None:
+                continue
+            try:
+                encoded = json.dumps(payload, ensure_ascii=False,
+                                     separators=(",", ":"), default=str).encode("utf-8", "replace")
+            except Exception as err:
+                logging.warning(f"[RedisBuffer] No se pudo serializar {key}: {err}")
+                continue
+            if len(encoded) > 500_000:
+                logging.warning(
+                    f"[RedisBuffer] ⚠️ Payload muy grande ({len(encoded)} bytes), abortando cache para {key}")
+                continue
+            key_ttl = ttl or self._get_ttl(bucket or LocalCacheTier.bucket_for(key))
+            prepared[self._prepare_cluster_key(key)] = (key, payload, key_ttl, encoded)
+
+        use_json = self._has_redisjson
+        for group in self._group_by_slot(list(prepared)):
+            try:
+                pipe = self._pipeline(transaction=True)
+                for pkey in group:
+                    _, payload, key_ttl, encoded = prepared[pkey]
+                    if use_json:
+                        pipe.json().set(pkey, "$", payload)
+                        pipe.expire(pkey, key_ttl)
+                    else:
+                        pipe.set(pkey, encoded, ex=key_ttl)
+                replies = pipe.execute(raise_on_error=False)
+                step = 2 if use_json else 1
+                failed = []
+                for idx, pkey in enumerate(group):
+                    reply = replies[idx * step]
+                    if isinstance(reply, Exception):
+                        failed.append(pkey)
+                    else:
+                        outcome[prepared[pkey][0]] = True
+                if failed:
+                    # Claves con otro tipo (WRONGTYPE): SET con EX las sobrescribe
+                    retry = self._pipeline(transaction=True)
+                    for pkey in failed:
+                        _, _, key_ttl, encoded = prepared[pkey]
+                        retry.set(pkey, encoded, ex=key_ttl)
+                    for pkey, reply in zip(failed, retry.execute(raise_on_error=False)):
+                        outcome[prepared[pkey][0]] = not isinstance(reply, Exception)
+                self._reset_failures()
+            except Exception as err:
+                logging.warning(f"[RedisBuffer] set_many falló: {err}")
+                self._register_failure(err)
+
+        for pkey, (key, payload, key_ttl, _) in prepared.items():
+            if outcome.get(key):
+                self._l1.put(key, payload, key_ttl)
+            else:
+                self._l1.invalidate(key)
+        return outcome
+
+    def refresh_ttls(self, keys: List[str], bucket: Optional[str] = None, ttl: Optional[int] = None) -> int:
+        """Renueva el TTL de varias claves en un pipeline por slot. Retorna cuántas existían."""
+        if not keys or not self.is_enabled or not self._client:
+            return 0
+        refreshed = 0
+        processed = [self._prepare_cluster_key(k) for k in keys if k]
+        for group in self._group_by_slot(processed):
+            try:
+                pipe = self._pipeline()
+                for pkey in group:
+                    pipe.expire(pkey, ttl or self._get_ttl(
+                        bucket or LocalCacheTier.bucket_for(pkey)))
+                refreshed += sum(1 for r in pipe.execute(raise_on_error=False)
+                                 if r is True or r == 1)
+            except Exception:
+                logging.debug(
+                    "[RedisBuffer] No se pudieron refrescar TTLs en batch.", exc_info=True)
+        return refreshed
 
     def _format_key(self, prefix: str, *parts: str) -> str:
         norm_parts = [p for p in parts if p]
@@ -677,7 +964,7 @@ class RedisBufferService:
         try:
             client = self._client
             if client:
-                client.expire(key, ttl)
+                client.expire(self._prepare_cluster_key(key), ttl)
         except Exception:
             logging.debug(
                 f"[RedisBuffer] No se pudo refrescar TTL de {key}.", exc_info=True)
@@ -764,8 +1051,32 @@ class RedisBufferService:
             if cached is not None:
                 return cached, "global"
 
+            cached = self.get_llm_semantic_response(agent_id, message, model)
+            if cached is not None:
+                return cached, "semantic"
+
         return None, "miss"
 
+    def get_llm_semantic_response(self, agent_id: str, message: str, model: str) -> Optional[Any]:
+        """Busca una respuesta cacheada para un prompt semánticamente equivalente."""
+        try:
+            cached, score = self._semantic_llm.lookup(agent_id, model, message)
+        except Exception as exc:
+            logging.debug(f"[RedisBuffer] lookup semántico falló: {exc}")
+            return None
+        if cached is not None:
+            logging.info(
+                f"[RedisBuffer] cache HIT (semantic, sim={score:.3f}) agent={agent_id} model={model}")
+        return cached
+
+    def cache_llm_semantic_response(self, agent_id: str, message: str, model: str, response_data: Any) -> bool:
+        """Guarda la respuesta junto al embedding del prompt para lookups semánticos."""
+        try:
+            return self._semantic_llm.store(agent_id, model, message, response_data)
+        except Exception as exc:
+            logging.debug(f"[RedisBuffer] store semántico falló: {exc}")
+            return False
+
     def cache_llm_response(
         self,
         agent_id: str,
@@ -787,6 +1098,8 @@ class RedisBufferService:
         if use_global_cache:
             global_key = self.build_llm_global_key(agent_id, message, model)
             self.cache_response("llm", global_key, response_data)
+            self.cache_llm_semantic_response(
+                agent_id, message, model, response_data)
             global_success = True
 
         return True, global_success
@@ -798,11 +1111,10 @@ class RedisBufferService:
         if not session_id:
             return None
         key = self._format_key("memoria", session_id)
-        payload = self._json_get(key)
+        payload, tier = self._json_get_tiered(key, refresh_bucket="memoria")
         if payload is not None:
-            logging.info(f"[RedisBuffer] cache HIT: {key}")
-            self._refresh_ttl(key, "memoria")
-            self._emit_cache_event("hit", "memoria", key)
+            logging.info(f"[RedisBuffer] cache HIT ({tier}): {key}")
+            self._emit_cache_event("hit", "memoria", key, {"tier": tier})
         else:
             logging.info(f"[RedisBuffer] cache MISS: {key}")
             self._emit_cache_event("miss", "memoria", key)
@@ -849,11 +1161,10 @@ class RedisBufferService:
         if not thread_id:
             return None
         key = self._format_key("thread", thread_id)
-        payload = self._json_get(key)
+        payload, tier = self._json_get_tiered(key, refresh_bucket="thread")
         if payload is not None:
-            logging.info(f"[RedisBuffer] cache HIT: {key}")
-            self._refresh_ttl(key, "thread")
-            self._emit_cache_event("hit", "thread", key)
+            logging.info(f"[RedisBuffer] cache HIT ({tier}): {key}")
+            self._emit_cache_event("hit", "thread", key, {"tier": tier})
         else:
             logging.info(f"[RedisBuffer] cache MISS: {key}")
             self._emit_cache_event("miss", "thread", key)
@@ -886,47 +1197,75 @@ class RedisBufferService:
         cache_key = self._format_key(
             "narrativa", session_id or "anon", thread_id or "default")
         start = time.perf_counter()
-        cached = self._json_get(cache_key)
+        cached, tier = self._json_get_tiered(cache_key, refresh_bucket="narrativa")
         if cached:
-            logging.info(f"[RedisBuffer] cache HIT: {cache_key}")
-            self._refresh_ttl(cache_key, "narrativa")
-            self._emit_cache_event("hit", "narrativa", cache_key)
+            logging.info(f"[RedisBuffer] cache HIT ({tier}): {cache_key}")
+            self._emit_cache_event("hit", "narrativa", cache_key, {"tier": tier})
             return cached, True, (time.perf_counter() - start) * 1000
 
         logging.info(f"[RedisBuffer] cache MISS: {cache_key}")
         self._emit_cache_event("miss", "narrativa", cache_key)
 
-        payload = None
-        try:
-            payload = compute_fn()
-        except Exception as exc:  # pragma: no cover
-            logging.warning(f"[RedisBuffer] compute narrativa falló: {exc}")
+        def _compute_and_store() -> Optional[Dict[str, Any]]:
+            payload = None
+            try:
+                payload = compute_fn()
+            except Exception as exc:  # pragma: no cover
+                logging.warning(f"[RedisBuffer] compute narrativa falló: {exc}")
+
+            compute_ms = (time.perf_counter() - start) * 1000
+            if payload:
+                success = self._json_set(
+                    cache_key, payload, ttl=self._get_ttl("narrativa"))
+                if success:
+                    logging.info(f"[RedisBuffer] cache WRITE: {cache_key}")
+                    self._emit_cache_event(
+                        "write", "narrativa", cache_key, {"latency_ms": round(compute_ms, 2)})
+                else:
+                    logging.warning(
+                        f"[RedisBuffer] cache WRITE FALLÓ: {cache_key}")
+                    self._emit_cache_event(
+                        "write_failed", "narrativa", cache_key, {"latency_ms": round(compute_ms, 2)})
+            return payload
 
+        # Misses concurrentes de la misma narrativa esperan al primer cálculo
+        payload, role = self.single_flight(cache_key, _compute_and_store)
         latency_ms = (time.perf_counter() - start) * 1000
-        if payload:
-            success = self._json_set(
-                cache_key, payload, ttl=self._get_ttl("narrativa"))
-            if success:
-                logging.info(f"[RedisBuffer] cache WRITE: {cache_key}")
-                self._emit_cache_event(
-                    "write", "narrativa", cache_key, {"latency_ms": round(latency_ms, 2)})
-            else:
-                logging.warning(
-                    f"[RedisBuffer] cache WRITE FALLÓ: {cache_key}")
-                self._emit_cache_event(
-                    "write_failed", "narrativa", cache_key, {"latency_ms": round(latency_ms, 2)})
+        if role in ("local", "coalesced"):
+            self._emit_cache_event(
+                "hit", "narrativa", cache_key, {"tier": role})
+            return payload, True, latency_ms
         return payload, False, latency_ms
 
+    def single_flight(
+        self,
+        flight_key: str,
+        compute_fn: Callable[[], Optional[Any]],
+        read_fn: Optional[Callable[[], Optional[Any]]] = None,
+        lease_ms: Optional[int] = None,
+        wait_timeout: Optional[float] = None,
+    ) -> Tuple[Optional[Any], str]:
+        """
+        Coalesce cálculos concurrentes de `flight_key` (ver services.single_flight).
+        `compute_fn` debe dejar el resultado en caché; por defecto los waiters
+        leen `flight_key` directamente de Redis. Retorna (payload, rol).
+        """
+        if read_fn is None:
+            def read_fn() -> Optional[Any]:
+                return self._json_get_l2(flight_key)
+        return self._single_flight.run(
+            flight_key, compute_fn, read_fn,
+            lease_ms=lease_ms, wait_timeout=wait_timeout)
+
     # ------------------------------------------------------------------ #
     # Payloads pesados: respuestas completas / búsquedas / LLM
     # ------------------------------------------------------------------ #
     def get_cached_payload(self, bucket: str, payload_hash: str) -> Optional[Any]:
         key = self._format_key(bucket, payload_hash)
-        cached = self._json_get(key)
+        cached, tier = self._json_get_tiered(key, refresh_bucket=bucket)
         if cached is not None:
-            logging.info(f"[RedisBuffer] cache HIT: {key}")
-            self._refresh_ttl(key, bucket)
-            self._emit_cache_event("hit", bucket, key)
+            logging.info(f"[RedisBuffer] cache HIT ({tier}): {key}")
+            self._emit_cache_event("hit", bucket, key, {"tier": tier})
         else:
             logging.info(f"[RedisBuffer] cache MISS: {key}")
             self._emit_cache_event("miss", bucket, key)
@@ -949,7 +1288,10 @@ class RedisBufferService:
         """Retorna snapshot de métricas básicas del cliente Redis."""
         stats: Dict[str, Any] = {
             "enabled": self.is_enabled,
-            "db": getattr(self, "_db", 0)
+            "db": getattr(self, "_db", 0),
+            "tiers": self._tier_stats(),
+            "single_flight": self._single_flight.stats(),
+            "semantic_llm": self._semantic_llm.stats(),
         }
         client = self._client
         if not client:
@@ -973,6 +1315,28 @@ class RedisBufferService:
         stats["last_error"] = self._last_error
         return stats
 
+    def _tier_stats(self) -> Dict[str, Any]:
+        """Contadores hit/miss por tier (L1 en proceso, L2 Redis) de este worker."""
+        l2_total = self._l2_hits + self._l2_misses
+        return {
+            "l1": self._l1.stats(),
+            "l2": {
+                "hits": self._l2_hits,
+                "misses": self._l2_misses,
+                "hit_ratio": self._l2_hits / l2_total if l2_total > 0 else 0,
+            },
+        }
+
+    def set_local_cache_enabled(self, enabled: bool) -> None:
+        """Activa/desactiva el caché en proceso (L1) en caliente."""
+        self._l1.set_enabled(enabled)
+        logging.info(
+            f"[RedisBuffer] L1 en proceso {'habilitado' if enabled else 'deshabilitado'}")
+
+    def invalidate_local(self, key: str) -> None:
+        """Descarta una clave de L1 (p.ej. tras escribirla por otra vía)."""
+        self._l1.invalidate(key)
+
     def test_connection(self) -> Dict[str, Any]:
         """Prueba de conectividad y RedisJSON para diagnósticos rápidos."""
         result: Dict[str, Any] = {
@@ -1085,6 +1449,7 @@ class RedisBufferService:
                 # Para objetos JSON, usar JSON.SET si está disponible
                 return self._json_set(key, value, ttl=ex)
             else:
+                self._l1.invalidate(key)
                 # Para strings/datos simples
                 if self._client:
                     self._client.set(key, value, ex=ex)
@@ -1099,6 +1464,7 @@ class RedisBufferService:
         """
         Método directo para delete (compatibilidad con tests)
         """
+        self._l1.invalidate(key)
         if not self.is_enabled:
             return False
 
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+Route Pipeline
+--------------
+Etapas declarativas del wrapper `memory_route` con presupuesto de latencia:
+
+- Cada etapa tiene fase (`pre` = antes de responder, `post` = fuera del
+  camino de la respuesta), timeout y flag de habilitación. Defaults en
+  `STAGE_DEFAULTS`; se sobreescriben con MEMORY_STAGE_<ETAPA>_ENABLED,
+  MEMORY_STAGE_<ETAPA>_TIMEOUT_MS y MEMORY_STAGE_<ETAPA>_PHASE.
+- Una etapa `pre` con timeout corre en un pool acotado y el request espera
+  como máximo ese tiempo; si vence, falla o está deshabilitada se usa su
+  valor por defecto y el request sigue. La etapa trabaja sobre una vista del
+  request (`RequestOverlay`): sus setattr solo se aplican si termina a tiempo,
+  así una etapa vencida que sigue corriendo no modifica el request en uso.
+- Las escrituras que el siguiente turno debe ver (caché de memoria, sync y
+  blob del thread) son `pre`: corren en línea antes de responder.
+- Las etapas `post` se encadenan en orden en un worker en segundo plano
+  (MEMORY_STAGE_POST_WORKERS) y no suman latencia a la respuesta. La cola es
+  acotada (MEMORY_STAGE_POST_BACKLOG); llena, la cadena corre en línea. Lo
+  que quede encolado si el host se congela o escala hacia abajo se pierde.
+- Histograma de latencia por etapa (buckets fijos en ms) en `stats()`; los
+  percentiles los reporta perf_tracer.
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from services.perf_tracer import span
+
+HISTOGRAM_BOUNDS_MS: Tuple[float, ...] = (
+    5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+# etapa -> (fase, timeout_ms); timeout 0 = sin límite (en línea)
+STAGE_DEFAULTS: Dict[str, Tuple[str, float]] = {
+    "entrada": ("pre", 4000),
+    "memoria": ("pre", 3000),
+    "busqueda_vectorial": ("pre", 2000),
+    "endpoint": ("pre", 0),
+    "metadata": ("pre", 0),
+    "refresco_cache": ("pre", 2000),
+    "snapshot_cognitivo": ("post", 5000),
+    "sync_thread": ("pre", 5000),
+    "registro_semantico": ("post", 10000),
+    "thread_blob": ("pre", 5000),
+}
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    return raw.lower() not in ("0", "false", "no", "off")
+
+
+@dataclass
+class StageConfig:
+    name: str
+    phase: str = "pre"
+    timeout_s: float = 0.0
+    enabled: bool = True
+
+    @classmethod
+    def from_env(cls, name: str) -> "StageConfig":
+        phase, timeout_ms = STAGE_DEFAULTS.get(name, ("pre", 0))
+        prefix = f"MEMORY_STAGE_{name.upper()}"
+        timeout_ms = float(os.getenv(f"{prefix}_TIMEOUT_MS", str(timeout_ms)))
+        phase = os.getenv(f"{prefix}_PHASE", phase).lower()
+        return cls(
+            name=name,
+            phase=phase if phase in ("pre", "post") else "pre",
+            timeout_s=max(0.0, timeout_ms / 1000),
+            enabled=_env_flag(f"{prefix}_ENABLED", True),
+        )
+
+
+class LatencyHistogram:
+    """Histograma acumulativo con buckets fijos (ms)."""
+
+    def __init__(self, bounds: Sequence[float] = HISTOGRAM_BOUNDS_MS):
+        self._bounds = tuple(bounds)
+        self._counts = [0] * (len(self._bounds) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+
+    def observe(self, value_ms: float) -> None:
+        self._counts[bisect_left(self._bounds, value_ms)] += 1
+        self._count += 1
+        self._sum += value_ms
+        self._max = max(self._max, value_ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        buckets = {f"le_{int(b)}": c for b, c in zip(self._bounds, self._counts)}
+        buckets["le_inf"] = self._counts[-1]
+        return {
+            "count": self._count,
+            "avg_ms": round(self._sum / self._count, 2) if self._count else None,
+            "max_ms": round(self._max, 2),
+            "buckets": buckets,
+        }
+
+
+class RequestOverlay:
+    """
+    Vista de un objeto para una etapa con timeout: lecturas pasan al original,
+    escrituras quedan en la vista hasta `commit()`.
+    """
+
+    __slots__ = ("_target", "_changes")
+
+    def __init__(self, target: Any):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_changes", {})
+
+    def __getattr__(self, name: str) -> Any:
+        changes = object.__getattribute__(self, "_changes")
+        if name in changes:
+            return changes[name]
+        return getattr(object.__getattribute__(self, "_target"), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        self._changes[name] = value
+
+    def commit(self) -> None:
+        for name, value in self._changes.items():
+            setattr(self._target, name, value)
+
+
+class RoutePipeline:
+    """Ejecuta etapas pre/post del wrapper con timeouts y métricas por etapa."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._configs: Dict[str, StageConfig] = {}
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._pre_pool: Optional[ThreadPoolExecutor] = None
+        self._post_pool: Optional[ThreadPoolExecutor] = None
+        self._pre_workers = int(os.getenv("MEMORY_STAGE_PRE_WORKERS", "32"))
+        self._post_workers = int(os.getenv("MEMORY_STAGE_POST_WORKERS", "4"))
+        self._post_backlog_max = int(os.getenv("MEMORY_STAGE_POST_BACKLOG", "256"))
+        self._post_pending = 0
+        self._backlog_full = 0
+
+    # ------------------------------------------------------------------ #
+    # Configuración y métricas
+    # ------------------------------------------------------------------ #
+    def config(self, name: str) -> StageConfig:
+        cfg = self._configs.get(name)
+        if cfg is None:
+            cfg = StageConfig.from_env(name)
+            with self._lock:
+                self._configs.setdefault(name, cfg)
+        return cfg
+
+    def _record(self, name: str, outcome: str, elapsed_ms: Optional[float] = None) -> None:
+        with self._lock:
+            counters = self._counters.setdefault(
+                name, {"ok": 0, "timeout": 0, "error": 0, "skipped": 0})
+            counters[outcome] = counters.get(outcome, 0) + 1
+            if elapsed_ms is not None:
+                self._histograms.setdefault(name, LatencyHistogram()).observe(elapsed_ms)
+
+    def _pool(self, post: bool) -> ThreadPoolExecutor:
+        attr = "_post_pool" if post else "_pre_pool"
+        pool = getattr(self, attr)
+        if pool is None:
+            with self._lock:
+                pool = getattr(self, attr)
+                if pool is None:
+                    pool = ThreadPoolExecutor(
+                        max_workers=self._post_workers if post else self._pre_workers,
+                        thread_name_prefix=f"memory-stage-{'post' if post else 'pre'}")
+                    setattr(self, attr, pool)
+        return pool
+
+    def observe(self, name: str, elapsed_ms: float, outcome: str = "ok") -> None:
+        """Registra una etapa medida por el llamador (p. ej. el endpoint)."""
+        self._record(name, outcome, elapsed_ms)
+
+    # ------------------------------------------------------------------ #
+    # Ejecución
+    # ------------------------------------------------------------------ #
+    def run(self, name: str, fn: Callable[..., Any], *args: Any,
+            default: Any = None, isolate: Any = None, **kwargs: Any) -> Any:
+        """
+        Etapa pre: espera como máximo su timeout; si no, devuelve `default`.
+        `isolate` (el request) se pasa a la etapa como RequestOverlay cuando
+        corre en el pool, y sus cambios se aplican solo si termina a tiempo.
+        """
+        cfg = self.config(name)
+        if not cfg.enabled:
+            self._record(name, "skipped")
+            return default
+        start = time.perf_counter()
+        try:
+            with span(f"stage.{name}"):
+                if cfg.timeout_s:
+                    overlay = None
+                    if isolate is not None:
+                        overlay = RequestOverlay(isolate)
+                        args = tuple(overlay if a is isolate else a for a in args)
+                    # copy_context: los spans de la etapa cuentan en la traza del request
+                    ctx = contextvars.copy_context()
+                    value = self._pool(post=False).submit(
+                        ctx.run, fn, *args, **kwargs).result(timeout=cfg.timeout_s)
+                    if overlay is not None:
+                        overlay.commit()
+                else:
+                    value = fn(*args, **kwargs)
+        except FutureTimeout:
+            self._record(name, "timeout", (time.perf_counter() - start) * 1000)
+            logging.warning(
+                f"[RoutePipeline] Etapa '{name}' superó {cfg.timeout_s * 1000:.0f} ms; se continúa sin ella")
+            return default
+        except Exception as exc:
+            self._record(name, "error", (time.perf_counter() - start) * 1000)
+            logging.warning(f"[RoutePipeline] Etapa '{name}' falló: {exc}")
+            return default
+        self._record(name, "ok", (time.perf_counter() - start) * 1000)
+        return value
+
+    def _run_chain(self, stages: List[Tuple[str, Callable[[], Any]]]) -> None:
+        """Ejecuta en orden; el timeout no interrumpe, se contabiliza como excedido."""
+        for name, fn in stages:
+            cfg = self.config(name)
+            if not cfg.enabled:
+                self._record(name, "skipped")
+                continue
+            start = time.perf_counter()
+            try:
+                with span(f"stage.{name}"):
+                    fn()
+            except Exception as exc:
+                self._record(name, "error", (time.perf_counter() - start) * 1000)
+                logging.warning(f"[RoutePipeline] Etapa post '{name}' falló: {exc}")
+                continue
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            overrun = cfg.timeout_s and elapsed_ms > cfg.timeout_s * 1000
+            self._record(name, "timeout" if overrun else "ok", elapsed_ms)
+
+    def _run_background(self, stages: List[Tuple[str, Callable[[], Any]]]) -> None:
+        try:
+            self._run_chain(stages)
+        finally:
+            with self._lock:
+                self._post_pending -= 1
+
+    def run_post(self, stages: List[Tuple[str, Callable[[], Any]]]) -> None:
+        """
+        Encadena etapas en orden. Las de fase `pre` se ejecutan en línea, antes
+        de responder; las `post` van a un worker en segundo plano.
+        """
+        inline = [(n, fn) for n, fn in stages if self.config(n).phase == "pre"]
+        background = [(n, fn) for n, fn in stages if self.config(n).phase != "pre"]
+        if inline:
+            self._run_chain(inline)
+        if not background:
+            return
+        with self._lock:
+            accepted = self._post_pending < self._post_backlog_max
+            if accepted:
+                self._post_pending += 1
+        if accepted:
+            try:
+                self._pool(post=True).submit(self._run_background, background)
+                return
+            except RuntimeError:
+                # Intérprete cerrándose: ejecutar en línea antes que perder la escritura
+                with self._lock:
+                    self._post_pending -= 1
+        else:
+            self._incr_backlog_full()
+        self._run_chain(background)
+
+    def _incr_backlog_full(self) -> None:
+        with self._lock:
+            self._backlog_full += 1
+        logging.warning("[RoutePipeline] Cola post llena; etapas en línea")
+
+    def stats(self) -> Dict[str, Any]:
+        names = sorted(set(STAGE_DEFAULTS) | set(self._configs))
+        with self._lock:
+            histograms = {n: h.snapshot() for n, h in self._histograms.items()}
+            counters = {n: dict(c) for n, c in self._counters.items()}
+        stages = {}
+        for name in names:
+            cfg = self.config(name)
+            stages[name] = {
+                "phase": cfg.phase,
+                "enabled": cfg.enabled,
+                "timeout_ms": cfg.timeout_s * 1000 or None,
+                "outcomes": counters.get(name, {}),
+                "latency": histograms.get(name, LatencyHistogram().snapshot()),
+            }
+        with self._lock:
+            pending, backlog_full = self._post_pending, self._backlog_full
+        return {
+            "stages": stages,
+            "pre_workers": self._pre_workers,
+            "post_workers": self._post_workers,
+            "post_pending": pending,
+            "post_backlog_max": self._post_backlog_max,
+            "post_backlog_full": backlog_full,
+        }
+
+
+route_pipeline = RoutePipeline()
@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+"""
+Semantic LLM Cache
+------------------
+Tier semántico para el bucket `llm`: guarda el embedding del prompt junto a
+cada respuesta cacheada y responde lookups por vecino más cercano (coseno)
+por encima de un umbral, separado por agente + modelo.
+
+Almacenamiento:
+- Redis: `llm:semantic:{agent}:{model}:{sha256(prompt)}` ->
+  {"prompt", "embedding", "response", "ts"} con el TTL del bucket llm.
+- Proceso: índice vectorial por namespace (matriz float32 normalizada).
+  Por debajo de LLM_SEMANTIC_ANN_MIN_SIZE se hace fuerza bruta con NumPy;
+  por encima, si `hnswlib` está instalado, se usa un índice HNSW.
+
+El índice local se resincroniza desde Redis cada LLM_SEMANTIC_RESYNC_S
+segundos (SCAN del namespace) para ver entradas escritas por otros workers.
+La resincronización corre en un hilo aparte, fuera del lock del índice: los
+lookups siguen respondiendo con el índice actual mientras tanto.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except Exception:  # pragma: no cover
+    np = None
+
+try:
+    import hnswlib  # type: ignore
+except Exception:  # pragma: no cover
+    hnswlib = None
+
+
+def _default_embed(text: str) -> Optional[List[float]]:
+    """Embedding vía embedding_generator (import diferido: crea el cliente OpenAI)."""
+    from embedding_generator import generar_embedding
+    return generar_embedding(text)
+
+
+class _NamespaceIndex:
+    """Vectores normalizados de un namespace (agente + modelo) y sus ids."""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.ids: List[str] = []
+        self.expires: List[float] = []
+        # Buffer con capacidad creciente; las filas válidas son [:len(ids)]
+        self._buf = np.zeros((64, dim), dtype=np.float32)
+        self.positions: Dict[str, int] = {}
+        self.hnsw: Any = None
+        self.hnsw_size = 0
+        self.last_sync = 0.0
+
+    @property
+    def matrix(self) -> "np.ndarray":
+        return self._buf[: len(self.ids)]
+
+    def add(self, entry_id: str, vector: "np.ndarray", expires_at: float) -> None:
+        if entry_id in self.positions:
+            pos = self.positions[entry_id]
+            self._buf[pos] = vector
+            self.expires[pos] = expires_at
+            self.hnsw = None
+            return
+        pos = len(self.ids)
+        if pos >= self._buf.shape[0]:
+            grown = np.zeros((self._buf.shape[0] * 2, self.dim), dtype=np.float32)
+            grown[:pos] = self._buf[:pos]
+            self._buf = grown
+        self._buf[pos] = vector
+        self.positions[entry_id] = pos
+        self.ids.append(entry_id)
+        self.expires.append(expires_at)
+        if self.hnsw is not None:
+            self._hnsw_add(pos, vector)
+
+    def remove(self, entry_ids: List[str]) -> None:
+        drop = {self.positions[e] for e in entry_ids if e in self.positions}
+        if not drop:
+            return
+        keep = [i for i in range(len(self.ids)) if i not in drop]
+        kept = self._buf[keep]
+        self._buf = np.zeros((max(64, len(keep) * 2), self.dim), dtype=np.float32)
+        self._buf[: len(keep)] = kept
+        self.ids = [self.ids[i] for i in keep]
+        self.expires = [self.expires[i] for i in keep]
+        self.positions = {eid: i for i, eid in enumerate(self.ids)}
+        self.hnsw = None
+
+    def prune_expired(self, now: float) -> None:
+        expired = [eid for eid, exp in zip(self.ids, self.expires) if exp <= now]
+        if expired:
+            self.remove(expired)
+
+    def _hnsw_add(self, pos: int, vector: "np.ndarray") -> None:
+        if pos >= self.hnsw_size:
+            self.hnsw_size = max(self.hnsw_size * 2, pos + 1)
+            self.hnsw.resize_index(self.hnsw_size)
+        self.hnsw.add_items(vector[None, :], np.array([pos]))
+
+    def _build_hnsw(self) -> None:
+        size = max(len(self.ids) * 2, 1024)
+        index = hnswlib.Index(space="ip", dim=self.dim)
+        index.init_index(max_elements=size, ef_construction=200, M=16)
+        index.add_items(self.matrix, np.arange(len(self.ids)))
+        index.set_ef(64)
+        self.hnsw = index
+        self.hnsw_size = size
+
+    def search(self, vector: "np.ndarray", ann_min_size: int) -> Tuple[Optional[str], float]:
+        """Retorna (entry_id, similitud coseno) del vecino más cercano."""
+        if not self.ids:
+            return None, 0.0
+        if hnswlib is not None and len(self.ids) >= ann_min_size:
+            if self.hnsw is None:
+                self._build_hnsw()
+            labels, distances = self.hnsw.knn_query(vector[None, :], k=1)
+            pos = int(labels[0][0])
+            # En espacio "ip" hnswlib devuelve 1 - producto interno
+            return self.ids[pos], float(1.0 - distances[0][0])
+        scores = self.matrix @ vector
+        pos = int(np.argmax(scores))
+        return self.ids[pos], float(scores[pos])
+
+
+class SemanticLLMCache:
+    """Caché LLM por similitud de embeddings con índice local sincronizado con Redis."""
+
+    PREFIX = "llm:semantic"
+
+    def __init__(self, buffer: Any, embed_fn: Optional[Callable[[str], Optional[List[float]]]] = None):
+        self._buffer = buffer
+        self._embed_fn = embed_fn or _default_embed
+        self._enabled = np is not None and os.getenv(
+            "LLM_SEMANTIC_CACHE_ENABLED", "1").lower() not in ("0", "false", "no", "off")
+        self._threshold = float(os.getenv("LLM_SEMANTIC_THRESHOLD", "0.92"))
+        self._resync_s = float(os.getenv("LLM_SEMANTIC_RESYNC_S", "60"))
+        self._ann_min_size = int(os.getenv("LLM_SEMANTIC_ANN_MIN_SIZE", "5000"))
+        self._max_entries = int(os.getenv("LLM_SEMANTIC_MAX_ENTRIES", "5000"))
+        self._indexes: Dict[str, _NamespaceIndex] = {}
+        # Embeddings recientes: store() reutiliza el vector calculado en lookup()
+        self._recent_vectors: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Namespaces con una resincronización en curso (una a la vez por namespace)
+        self._syncing: set = set()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0,
+                       "embed_errors": 0, "stale_entries": 0, "resyncs": 0}
+        if np is None:
+            logging.info("[SemanticLLMCache] numpy no disponible; tier semántico deshabilitado.")
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def set_enabled(self, enabled: bool) -> None:
+        self._enabled = bool(enabled) and np is not None
+
+    @staticmethod
+    def namespace(agent_id: str, model: str) -> str:
+        return f"{(agent_id or '').strip() or 'anon'}:{(model or '').strip() or 'default'}"
+
+    def _entry_key(self, ns: str, entry_id: str) -> str:
+        return f"{self.PREFIX}:{ns}:{entry_id}"
+
+    def _embed(self, text: str) -> Optional["np.ndarray"]:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            cached = self._recent_vectors.get(digest)
+            if cached is not None:
+                self._recent_vectors.move_to_end(digest)
+                return cached
+        vector = self._compute_embedding(text)
+        if vector is not None:
+            with self._lock:
+                self._recent_vectors[digest] = vector
+                while len(self._recent_vectors) > 256:
+                    self._recent_vectors.popitem(last=False)
+        return vector
+
+    def _compute_embedding(self, text: str) -> Optional["np.ndarray"]:
+        try:
+            raw = self._embed_fn(text)
+        except Exception as exc:
+            logging.debug(f"[SemanticLLMCache] embedding falló: {exc}")
+            raw = None
+        if not raw:
+            self._stats["embed_errors"] += 1
+            return None
+        vector = np.asarray(raw, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0:
+            return None
+        return vector / norm
+
+    def _index_for(self, ns: str, dim: int) -> _NamespaceIndex:
+        index = self._indexes.get(ns)
+        if index is None or index.dim != dim:
+            index = _NamespaceIndex(dim)
+            self._indexes[ns] = index
+        return index
+
+    def _schedule_resync(self, ns: str, index: _NamespaceIndex) -> None:
+        """
+        Lanza la resincronización del namespace en un hilo aparte (se llama con
+        self._lock tomado). El lookup que la dispara usa el índice actual.
+        """
+        if ns in self._syncing or self._buffer._client is None or not self._buffer.is_enabled:
+            index.last_sync = time.time()
+            return
+        index.last_sync = time.time()
+        self._syncing.add(ns)
+        known = set(index.positions)
+        threading.Thread(target=self._resync, args=(ns, index, known),
+                         name=f"llm-semantic-resync-{ns}", daemon=True).start()
+
+    def _resync(self, ns: str, index: _NamespaceIndex, known: set) -> None:
+        """
+        Carga en el índice local las entradas del namespace escritas por otros
+        workers. SCAN y get_many corren sin el lock; las entradas nuevas se
+        agregan al índice en un solo paso al final.
+        """
+        try:
+            client = self._buffer._client
+            now = time.time()
+            pattern = f"{self.PREFIX}:{ns}:*"
+            scan = getattr(client, "scan_iter", None)
+            raw_keys = scan(match=pattern, count=500) if callable(scan) else client.keys(pattern)
+            keys = [k.decode() if isinstance(k, (bytes, bytearray)) else str(k) for k in raw_keys]
+            missing = [k for k in keys if k.rsplit(":", 1)[-1] not in known]
+            if not missing:
+                return
+            ttl = self._buffer._get_ttl("llm")
+            nuevas = []
+            for key, entry in self._buffer.get_many(missing[: self._max_entries]).items():
+                if not isinstance(entry, dict) or not entry.get("embedding"):
+                    continue
+                vector = np.asarray(entry["embedding"], dtype=np.float32)
+                if vector.shape[0] != index.dim:
+                    continue
+                expires_at = float(entry.get("ts", now)) + ttl
+                if expires_at > now:
+                    nuevas.append((key.rsplit(":", 1)[-1], vector, expires_at))
+            with self._lock:
+                # El namespace pudo reemplazarse (cambio de dimensión) mientras tanto
+                if self._indexes.get(ns) is index:
+                    for entry_id, vector, expires_at in nuevas:
+                        if entry_id not in index.positions:
+                            index.add(entry_id, vector, expires_at)
+            self._stats["resyncs"] += 1
+        except Exception as exc:
+            logging.debug(f"[SemanticLLMCache] resync de {ns} falló: {exc}")
+        finally:
+            with self._lock:
+                self._syncing.discard(ns)
+
+    # ------------------------------------------------------------------ #
+    # API
+    # ------------------------------------------------------------------ #
+    def lookup(self, agent_id: str, model: str, message: str) -> Tuple[Optional[Any], float]:
+        """Retorna (response, similitud) si hay un prompt cacheado suficientemente parecido."""
+        if not self._enabled or not message:
+            return None, 0.0
+        vector = self._embed(message)
+        if vector is None:
+            return None, 0.0
+        ns = self.namespace(agent_id, model)
+        with self._lock:
+            index = self._index_for(ns, vector.shape[0])
+            now = time.time()
+            if now - index.last_sync >= self._resync_s:
+                self._schedule_resync(ns, index)
+            index.prune_expired(now)
+            entry_id, score = index.search(vector, self._ann_min_size)
+
+        if entry_id is None or score < self._threshold:
+            self._stats["misses"] += 1
+            return None, score
+
+        entry = self._buffer._json_get(self._entry_key(ns, entry_id))
+        if not isinstance(entry, dict) or "response" not in entry:
+            # Expiró en Redis o fue borrada: sacarla del índice local
+            with self._lock:
+                index.remove([entry_id])
+            self._stats["stale_entries"] += 1
+            self._stats["misses"] += 1
+            return None, score
+
+        self._stats["hits"] += 1
+        self._buffer._emit_cache_event(
+            "hit", "llm", self._entry_key(ns, entry_id),
+            {"tier": "semantic", "similarity": round(score, 4)})
+        return entry["response"], score
+
+    def store(self, agent_id: str, model: str, message: str, response: Any) -> bool:
+        """Guarda respuesta + embedding del prompt en Redis y en el índice local."""
+        if not self._enabled or not message or response is None:
+            return False
+        vector = self._embed(message)
+        if vector is None:
+            return False
+        ns = self.namespace(agent_id, model)
+        entry_id = hashlib.sha256(message.encode("utf-8")).hexdigest()[:32]
+        now = time.time()
+        ttl = self._buffer._get_ttl("llm")
+        entry = {
+            "prompt": message[:2000],
+            "embedding": [round(float(x), 6) for x in vector],
+            "response": response,
+            "ts": now,
+        }
+        if not self._buffer._json_set(self._entry_key(ns, entry_id), entry, ttl=ttl):
+            return False
+        with self._lock:
+            index = self._index_for(ns, vector.shape[0])
+            if len(index.ids) >= self._max_entries:
+                index.prune_expired(now)
+                if len(index.ids) >= self._max_entries:
+                    index.remove(index.ids[: len(index.ids) // 10 or 1])
+            index.add(entry_id, vector, now + ttl)
+        self._stats["stores"] += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        total = self._stats["hits"] + self._stats["misses"]
+        with self._lock:
+            sizes = {ns: len(idx.ids) for ns, idx in self._indexes.items()}
+        return {
+            **self._stats,
+            "enabled": self._enabled,
+            "threshold": self._threshold,
+            "hit_ratio": self._stats["hits"] / total if total > 0 else 0,
+            "backend": "hnsw" if hnswlib is not None else "numpy",
+            "namespaces": sizes,
+        }
@@ -7,50 +7,20 @@ import os
 import logging
 from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Optional
-from azure.search.documents import SearchClient
-from azure.core.credentials import AzureKeyCredential
-from azure.identity import DefaultAzureCredential
-from openai import AzureOpenAI
-from azure.identity import get_bearer_token_provider
+
+from services.azure_clients import azure_clients
+from services.embedding_service import get_embedding_service
 
 logging.basicConfig(level=logging.INFO)
 
 class SemanticSearchService:
     def __init__(self):
         # Azure Search
-        search_endpoint = os.getenv("AZURE_SEARCH_ENDPOINT")
-        search_key = os.getenv("AZURE_SEARCH_KEY")
-        
-        if search_key:
-            self.search_client = SearchClient(
-                endpoint=search_endpoint,
-                index_name="agent-memory-index",
-                credential=AzureKeyCredential(search_key)
-            )
-        else:
-            self.search_client = SearchClient(
-                endpoint=search_endpoint,
-                index_name="agent-memory-index",
-                credential=DefaultAzureCredential()
-            )
-        
+        # Clientes compartidos del proceso (API key o Managed Identity)
+        self.search_client = azure_clients.search_client("agent-memory-index")
+
         # OpenAI para embeddings
-        if os.getenv("AZURE_OPENAI_KEY"):
-            self.openai_client = AzureOpenAI(
-                api_key=os.getenv("AZURE_OPENAI_KEY"),
-                api_version="2024-02-01",
-                azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
-            )
-        else:
-            token_provider = get_bearer_token_provider(
-                DefaultAzureCredential(),
-                "https://cognitiveservices.azure.com/.default"
-            )
-            self.openai_client = AzureOpenAI(
-                azure_ad_token_provider=token_provider,
-                api_version="2024-02-01",
-                azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
-            )
+        self.openai_client = azure_clients.openai_client(api_version="2024-02-01")
     
     def clasificar_intencion(self, consulta: str) -> str:
         """Clasifica intención de la consulta"""
@@ -70,12 +40,10 @@ class SemanticSearchService:
     def generar_embedding(self, texto: str) -> List[float]:
         """Genera embedding con text-embedding-3-large"""
         try:
-            response = self.openai_client.embeddings.create(
-                model="text-embedding-3-large",
-                input=texto[:8000],
-                dimensions=1536  # Ajustado al índice actual
-            )
-            return response.data[0].embedding
+            vector = get_embedding_service(
+                "text-embedding-3-large", dimensions=1536  # Ajustado al índice actual
+            ).embed(texto)
+            return vector.tolist() if vector is not None else None
         except Exception as e:
             logging.error(f"Error generando embedding: {e}")
             return None
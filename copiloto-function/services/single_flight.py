@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+Single Flight
+-------------
+Coalescencia de cache misses: cuando varios callers piden el mismo valor
+caro (respuesta LLM, narrativa) a la vez, solo uno lo calcula.
+
+- Dentro del proceso: los threads que piden la misma clave esperan al primero.
+- Entre workers: lock en Redis (`SET NX PX` con lease corto). El dueño del
+  lock calcula y escribe en caché; el resto hace polling de la caché hasta
+  que aparece el valor, el lock desaparece o se agota el timeout.
+- Si la espera falla (timeout o el líder no produjo valor) el caller calcula
+  por su cuenta (fallback), así nunca queda bloqueado por otro worker.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Borra el lock solo si sigue siendo nuestro (evita liberar el lease de otro)
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[Any] = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coordinador de single-flight sobre un RedisBufferService.
+
+    Roles devueltos por `run`:
+    - "leader": este caller calculó el valor.
+    - "local": otro thread del mismo proceso lo calculó.
+    - "coalesced": otro worker lo calculó y se leyó de la caché.
+    - "fallback": la espera no produjo valor y se calculó localmente.
+    """
+
+    def __init__(self, buffer: Any):
+        self._buffer = buffer
+        self._enabled = os.getenv("REDIS_SINGLE_FLIGHT_ENABLED", "1").lower() not in (
+            "0", "false", "no", "off")
+        self._lease_ms = int(os.getenv("REDIS_SINGLE_FLIGHT_LEASE_MS", "30000"))
+        self._wait_timeout = float(os.getenv("REDIS_SINGLE_FLIGHT_WAIT_S", "25"))
+        self._poll_min = 0.05
+        self._poll_max = 0.5
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "leaders": 0,
+            "local_waiters": 0,
+            "coalesced_waiters": 0,
+            "coalesced_hits": 0,
+            "wait_timeouts": 0,
+            "fallbacks": 0,
+            "lock_errors": 0,
+        }
+
+    def _incr(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] = self._stats.get(name, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["in_flight"] = len(self._flights)
+        snapshot["enabled"] = self._enabled
+        snapshot["lease_ms"] = self._lease_ms
+        snapshot["wait_timeout_s"] = self._wait_timeout
+        return snapshot
+
+    # ------------------------------------------------------------------ #
+    # Lock distribuido
+    # ------------------------------------------------------------------ #
+    def _lock_key(self, flight_key: str) -> str:
+        return self._buffer._prepare_cluster_key(f"lock:{flight_key}")
+
+    def _acquire(self, lock_key: str, token: str, lease_ms: int) -> Optional[bool]:
+        """True si se obtuvo el lock, False si lo tiene otro, None si Redis no está."""
+        if not self._buffer.is_enabled:
+            return None
+        client = self._buffer._client
+        if client is None:
+            return None
+        try:
+            return bool(client.set(lock_key, token, nx=True, px=lease_ms))
+        except Exception as exc:
+            self._incr("lock_errors")
+            logging.debug(f"[SingleFlight] No se pudo adquirir {lock_key}: {exc}")
+            return None
+
+    def _release(self, lock_key: str, token: str) -> None:
+        client = self._buffer._client
+        if client is None:
+            return
+        try:
+            client.eval(_RELEASE_SCRIPT, 1, lock_key, token)
+        except Exception as exc:
+            logging.debug(f"[SingleFlight] No se pudo liberar {lock_key}: {exc}")
+
+    def _lock_held(self, lock_key: str) -> bool:
+        client = self._buffer._client
+        if client is None:
+            return False
+        try:
+            return client.get(lock_key) is not None
+        except Exception:
+            return False
+
+    # ------------------------------------------------------------------ #
+    # API
+    # ------------------------------------------------------------------ #
+    def run(
+        self,
+        flight_key: str,
+        compute_fn: Callable[[], Optional[Any]],
+        read_fn: Callable[[], Optional[Any]],
+        lease_ms: Optional[int] = None,
+        wait_timeout: Optional[float] = None,
+    ) -> Tuple[Optional[Any], str]:
+        """
+        Ejecuta `compute_fn` una sola vez por `flight_key` entre callers
+        concurrentes. `compute_fn` debe escribir el resultado en la caché que
+        lee `read_fn` (así los waiters de otros workers lo encuentran).
+        """
+        if not self._enabled:
+            return compute_fn(), "leader"
+
+        with self._lock:
+            flight = self._flights.get(flight_key)
+            is_local_leader = flight is None
+            if is_local_leader:
+                flight = _Flight()
+                self._flights[flight_key] = flight
+
+        timeout = wait_timeout if wait_timeout is not None else self._wait_timeout
+
+        if not is_local_leader:
+            self._incr("local_waiters")
+            if flight.done.wait(timeout) and flight.error is None and flight.result is not None:
+                return flight.result, "local"
+            if not flight.done.is_set():
+                self._incr("wait_timeouts")
+            self._incr("fallbacks")
+            return compute_fn(), "fallback"
+
+        try:
+            result, role = self._run_distributed(
+                flight_key, compute_fn, read_fn,
+                lease_ms or self._lease_ms, timeout)
+            flight.result = result
+            return result, role
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            flight.done.set()
+            with self._lock:
+                if self._flights.get(flight_key) is flight:
+                    del self._flights[flight_key]
+
+    def _run_distributed(
+        self,
+        flight_key: str,
+        compute_fn: Callable[[], Optional[Any]],
+        read_fn: Callable[[], Optional[Any]],
+        lease_ms: int,
+        timeout: float,
+    ) -> Tuple[Optional[Any], str]:
+        lock_key = self._lock_key(flight_key)
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + timeout
+        counted_waiter = False
+        delay = self._poll_min
+
+        while True:
+            acquired = self._acquire(lock_key, token, lease_ms)
+            if acquired is None:
+                # Redis no disponible: solo queda la coalescencia en proceso
+                return compute_fn(), "leader"
+            if acquired:
+                self._incr("leaders")
+                try:
+                    # Otro líder pudo terminar justo antes de que tomáramos el lock
+                    existing = read_fn() if counted_waiter else None
+                    if existing is not None:
+                        self._incr("coalesced_hits")
+                        return existing, "coalesced"
+                    return compute_fn(), "leader"
+                finally:
+                    self._release(lock_key, token)
+
+            if not counted_waiter:
+                counted_waiter = True
+                self._incr("coalesced_waiters")
+                self._buffer._emit_cache_event(
+                    "coalesced_wait", flight_key.split(":")[0], flight_key)
+
+            # Esperar a que el líder publique el resultado
+            while time.monotonic() < deadline:
+                time.sleep(delay)
+                delay = min(delay * 2, self._poll_max)
+                value = read_fn()
+                if value is not None:
+                    self._incr("coalesced_hits")
+                    return value, "coalesced"
+                if not self._lock_held(lock_key):
+                    break  # el líder terminó sin valor o expiró su lease
+            else:
+                self._incr("wait_timeouts")
+                self._incr("fallbacks")
+                logging.info(
+                    f"[SingleFlight] Timeout esperando {flight_key[:80]}; calculando localmente")
+                return compute_fn(), "fallback"
+
+            if time.monotonic() >= deadline:
+                self._incr("fallbacks")
+                return compute_fn(), "fallback"
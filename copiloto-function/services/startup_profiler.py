@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Startup Profiler
+----------------
+Presupuesto de imports del arranque en frío de function_app:
+
+- `start()` envuelve `builtins.__import__` mientras se importa function_app
+  y mide cada módulo cargado por primera vez desde el thread de arranque:
+  tiempo acumulado (incluye sus imports) y propio (sin ellos).
+- `phase("endpoints")` mide bloques del arranque que no son imports
+  (registro de rutas, App Insights, ...).
+- `finish()` restaura el import original, registra el top
+  STARTUP_IMPORT_PROFILE_TOP por tiempo propio y deja el reporte en
+  `report()` (expuesto en /api/perf bajo "startup").
+- Los submódulos cargados vía `importlib.import_module` o por `fromlist`
+  no pasan por `__import__`: su costo cuenta como tiempo propio del padre.
+- STARTUP_IMPORT_PROFILE=0 lo desactiva (solo se mide el total).
+"""
+import builtins
+import contextlib
+import importlib.util
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() not in ("0", "false", "no", "off")
+
+
+class StartupProfiler:
+    def __init__(self):
+        self.enabled = _env_flag("STARTUP_IMPORT_PROFILE", "1")
+        self._top = int(os.getenv("STARTUP_IMPORT_PROFILE_TOP", "25"))
+        self._original_import: Optional[Any] = None
+        self._thread_id: Optional[int] = None
+        self._start = 0.0
+        self._total_ms: Optional[float] = None
+        # pila de [módulo, inicio, ms de hijos]
+        self._stack: List[List[Any]] = []
+        self._modules: Dict[str, Dict[str, Any]] = {}
+        self._phases: Dict[str, float] = {}
+
+    # ------------------------------------------------------------------ #
+    # Hook de imports
+    # ------------------------------------------------------------------ #
+    def start(self) -> None:
+        if self._original_import is not None:
+            return
+        self._start = time.perf_counter()
+        self._thread_id = threading.get_ident()
+        if self.enabled:
+            self._original_import = builtins.__import__
+            builtins.__import__ = self._import
+
+    def _import(self, name: str, globals: Any = None, locals: Any = None,
+                fromlist: Any = (), level: int = 0) -> Any:
+        original = self._original_import
+        if threading.get_ident() != self._thread_id:
+            return original(name, globals, locals, fromlist, level)
+        fullname = name
+        if level:
+            try:
+                fullname = importlib.util.resolve_name(
+                    "." * level + name, (globals or {}).get("__package__"))
+            except Exception:
+                return original(name, globals, locals, fromlist, level)
+        if fullname in sys.modules:
+            return original(name, globals, locals, fromlist, level)
+
+        frame = [fullname, time.perf_counter(), 0.0]
+        self._stack.append(frame)
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            self._stack.pop()
+            elapsed_ms = (time.perf_counter() - frame[1]) * 1000
+            if self._stack:
+                self._stack[-1][2] += elapsed_ms
+            if fullname in sys.modules and fullname not in self._modules:
+                self._modules[fullname] = {
+                    "total_ms": elapsed_ms,
+                    "self_ms": max(0.0, elapsed_ms - frame[2]),
+                    "parent": self._stack[-1][0] if self._stack else None,
+                }
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Mide un bloque del arranque (acumula si se repite el nombre)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._phases[name] = self._phases.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+    def finish(self) -> None:
+        if self._total_ms is not None:
+            return
+        if self._original_import is not None and builtins.__import__ == self._import:
+            builtins.__import__ = self._original_import
+        self._original_import = None
+        self._total_ms = (time.perf_counter() - self._start) * 1000 if self._start else 0.0
+        if not self.enabled:
+            logging.info(f"[StartupProfiler] Arranque de function_app: {self._total_ms:.0f} ms")
+            return
+        top = self._ranked("self_ms")[:10]
+        logging.warning(
+            f"[StartupProfiler] Arranque de function_app: {self._total_ms:.0f} ms, "
+            f"{len(self._modules)} módulos nuevos; más costosos (propio): "
+            + ", ".join(f"{m['module']}={m['self_ms']} ms" for m in top))
+
+    # ------------------------------------------------------------------ #
+    # Reporte
+    # ------------------------------------------------------------------ #
+    def _ranked(self, key: str) -> List[Dict[str, Any]]:
+        rows = [{"module": name, "total_ms": round(data["total_ms"], 2),
+                 "self_ms": round(data["self_ms"], 2), "parent": data["parent"]}
+                for name, data in self._modules.items()]
+        rows.sort(key=lambda row: row[key], reverse=True)
+        return rows[:self._top]
+
+    def report(self) -> Dict[str, Any]:
+        # Por paquete de primer nivel (azure, opentelemetry, endpoints, ...)
+        packages: Dict[str, float] = {}
+        for name, data in self._modules.items():
+            root = name.split(".", 1)[0]
+            packages[root] = packages.get(root, 0.0) + data["self_ms"]
+        return {
+            "enabled": self.enabled,
+            "total_ms": round(self._total_ms, 2) if self._total_ms is not None else None,
+            "modules_loaded": len(self._modules),
+            "phases_ms": {name: round(ms, 2) for name, ms in self._phases.items()},
+            "by_package_ms": dict(sorted(
+                ((name, round(ms, 2)) for name, ms in packages.items()),
+                key=lambda kv: kv[1], reverse=True)[:self._top]),
+            "top_self": self._ranked("self_ms"),
+            "top_cumulative": self._ranked("total_ms"),
+        }
+
+
+startup_profiler = StartupProfiler()
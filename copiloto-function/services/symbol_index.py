@@ -0,0 +1,494 @@
+# -*- coding: utf-8 -*-
+"""
+Symbol Index
+------------
+Índice de símbolos Python (definiciones, imports, llamadas, hashes de cuerpo
+duplicado) para msearch y analizar_codigo_semantico, en lugar de re-parsear
+con `ast` el mismo archivo en cada request:
+
+- `analyze(content)`: registro de símbolos de un contenido, cacheado por
+  hash (sha1) del contenido. Un mismo archivo analizado dos veces, o el
+  mismo contenido en dos rutas, se parsea una sola vez.
+- Índice de proyecto por origen (blob o local) alimentado desde el listado
+  de services.code_search_index: ruta -> (validador, hash). `refresh()` solo
+  vuelve a parsear las rutas cuyo validador cambió; si son muchas
+  (SYMBOL_INDEX_POOL_MIN) el parseo va a un pool de procesos "spawn" (no se
+  hace fork del worker, que tiene hilos de gRPC en curso).
+- Consultas de proyecto (`where_defined`, `callers`, `duplicate_bodies`)
+  sobre mapas invertidos nombre -> ubicaciones.
+- Persistencia en SYMBOL_INDEX_DIR (JSON, escritura atómica desde un
+  temporal propio del proceso), acotada a SYMBOL_INDEX_MAX_RECORDS registros.
+  La escritura la hace un hilo en segundo plano, espaciada por
+  SYMBOL_INDEX_FLUSH_S; bajo el lock solo se copian las referencias y la
+  serialización ocurre fuera de él.
+"""
+import ast
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+_VERSION = 1
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha1(content.encode("utf-8", errors="surrogatepass")).hexdigest()
+
+
+# ---------------------------------------------------------------------- #
+# Extracción (función de módulo: se ejecuta también en procesos del pool)
+# ---------------------------------------------------------------------- #
+def _get_name(node: Any) -> str:
+    """Nombre legible de un nodo AST (Name, Attribute, Constant o expresión)."""
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return f"{_get_name(node.value)}.{node.attr}"
+    if isinstance(node, ast.Constant):
+        return str(node.value)
+    try:
+        return ast.unparse(node)
+    except Exception:
+        return type(node).__name__
+
+
+def _body_hash(node: Any) -> Optional[str]:
+    """Hash del cuerpo de una función sin posiciones ni docstring."""
+    body = node.body
+    if body and isinstance(body[0], ast.Expr) and isinstance(getattr(body[0], "value", None), ast.Constant) \
+            and isinstance(body[0].value.value, str):
+        body = body[1:]
+    if not body or (len(body) == 1 and (isinstance(body[0], ast.Pass) or (
+            isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant)))):
+        # Cuerpos triviales (pass, ...): no cuentan como duplicados
+        return None
+    dump = "\n".join(ast.dump(stmt, annotate_fields=False) for stmt in body)
+    return hashlib.sha1(dump.encode("utf-8")).hexdigest()[:16]
+
+
+def _qualnames(tree: ast.AST) -> Dict[int, str]:
+    """id(nodo) -> nombre calificado (Clase.metodo, funcion.<anidada>)."""
+    names: Dict[int, str] = {}
+
+    def visit(node: ast.AST, prefix: str) -> None:
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                qualname = f"{prefix}{child.name}"
+                names[id(child)] = qualname
+                visit(child, qualname + ".")
+            else:
+                visit(child, prefix)
+
+    visit(tree, "")
+    return names
+
+
+def extract_symbols(content: str) -> Dict[str, Any]:
+    """
+    Registro de símbolos de un archivo Python, en el orden de `ast.walk` que
+    usaba SemanticAnalyzer. Incluye funciones async y expresiones de
+    decoradores legibles (`ast.unparse`).
+    """
+    record: Dict[str, Any] = {
+        "classes": [], "functions": [], "definitions": [],
+        "imports": {"regular": [], "from_imports": [], "conflicts": []},
+        "duplicates": {"functions": [], "classes": [], "bodies": []},
+        "logical_errors": [], "calls": {}, "body_hashes": [], "parse_errors": [],
+        "toplevel": {"functions": 0, "classes": 0, "imports": 0},
+    }
+    try:
+        tree = ast.parse(content)
+    except SyntaxError as e:
+        record["parse_errors"].append({
+            "type": "syntax_error",
+            "line": e.lineno,
+            "message": str(e),
+            "text": e.text
+        })
+        return record
+
+    qualnames = _qualnames(tree)
+    imported_names = set()
+    func_names: Dict[str, int] = {}
+    class_names: Dict[str, int] = {}
+    bodies: Dict[str, List[Dict[str, Any]]] = {}
+
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            record["toplevel"]["functions"] += 1
+        elif isinstance(node, ast.ClassDef):
+            record["toplevel"]["classes"] += 1
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            record["toplevel"]["imports"] += 1
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ClassDef):
+            record["classes"].append({
+                "name": node.name,
+                "line": node.lineno,
+                "methods": [m.name for m in node.body if isinstance(m, (ast.FunctionDef, ast.AsyncFunctionDef))],
+                "bases": [_get_name(base) for base in node.bases],
+                "decorators": [_get_name(dec) for dec in node.decorator_list]
+            })
+            if node.name in class_names:
+                record["duplicates"]["classes"].append({
+                    "name": node.name,
+                    "lines": [class_names[node.name], node.lineno],
+                    "type": "duplicate_class"
+                })
+            else:
+                class_names[node.name] = node.lineno
+
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            record["functions"].append({
+                "name": node.name,
+                "line": node.lineno,
+                "args": [arg.arg for arg in node.args.args],
+                "decorators": [_get_name(dec) for dec in node.decorator_list],
+                "is_async": isinstance(node, ast.AsyncFunctionDef),
+                "docstring": ast.get_docstring(node)
+            })
+            if node.name in func_names:
+                record["duplicates"]["functions"].append({
+                    "name": node.name,
+                    "lines": [func_names[node.name], node.lineno],
+                    "type": "duplicate_function"
+                })
+            else:
+                func_names[node.name] = node.lineno
+            digest = _body_hash(node)
+            if digest:
+                body = {"name": qualnames.get(id(node), node.name), "line": node.lineno}
+                bodies.setdefault(digest, []).append(body)
+                record["body_hashes"].append({"hash": digest, **body})
+
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                name = alias.asname or alias.name
+                if name in imported_names:
+                    record["imports"]["conflicts"].append({
+                        "name": name,
+                        "line": node.lineno,
+                        "type": "duplicate_import"
+                    })
+                imported_names.add(name)
+                if isinstance(node, ast.Import):
+                    record["imports"]["regular"].append({
+                        "module": alias.name,
+                        "alias": alias.asname,
+                        "line": node.lineno
+                    })
+                else:
+                    record["imports"]["from_imports"].append({
+                        "module": node.module,
+                        "name": alias.name,
+                        "alias": alias.asname,
+                        "line": node.lineno
+                    })
+
+        elif isinstance(node, ast.Assign):
+            for target in node.targets:
+                if isinstance(target, ast.Name) and target.id.startswith('_') and len(target.id) > 1:
+                    record["logical_errors"].append({
+                        "line": node.lineno,
+                        "type": "unused_variable",
+                        "message": f"Variable posiblemente no utilizada: {target.id}",
+                        "variable": target.id
+                    })
+
+        elif isinstance(node, ast.Compare):
+            if len(node.ops) == 1 and isinstance(node.ops[0], ast.Is) \
+                    and isinstance(node.comparators[0], ast.Constant):
+                record["logical_errors"].append({
+                    "line": node.lineno,
+                    "type": "dangerous_comparison",
+                    "message": "Uso de 'is' con literal, usar '==' en su lugar"
+                })
+
+        elif isinstance(node, ast.Call) and isinstance(node.func, (ast.Name, ast.Attribute)):
+            # Se indexa por el último segmento: `self.x.foo()` y `foo()` llaman a "foo"
+            name = node.func.id if isinstance(node.func, ast.Name) else node.func.attr
+            record["calls"].setdefault(name, []).append(node.lineno)
+
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            record["definitions"].append({
+                "name": node.name,
+                "qualname": qualnames.get(id(node), node.name),
+                "kind": "class" if isinstance(node, ast.ClassDef) else "function",
+                "line": node.lineno,
+                "end_line": getattr(node, "end_lineno", None),
+            })
+
+    record["duplicates"]["bodies"] = [
+        {"hash": digest, "definitions": defs, "type": "duplicate_body"}
+        for digest, defs in bodies.items() if len(defs) > 1
+    ]
+    return record
+
+
+def _extract_many(contents: List[str]) -> List[Dict[str, Any]]:
+    return [extract_symbols(content) for content in contents]
+
+
+# ---------------------------------------------------------------------- #
+# Índice
+# ---------------------------------------------------------------------- #
+class SymbolIndex:
+    def __init__(self):
+        self.directory = Path(os.getenv("SYMBOL_INDEX_DIR")
+                              or Path(tempfile.gettempdir()) / "copiloto-symbol-index")
+        self.max_records = int(os.getenv("SYMBOL_INDEX_MAX_RECORDS", "4096"))
+        self.pool_min = int(os.getenv("SYMBOL_INDEX_POOL_MIN", "32"))
+        self.workers = int(os.getenv("SYMBOL_INDEX_WORKERS", str(min(4, os.cpu_count() or 1))))
+        self.flush_s = float(os.getenv("SYMBOL_INDEX_FLUSH_S", "10"))
+        self._records: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # origen -> {ruta: {"validator", "hash"}}
+        self._sources: Dict[str, Dict[str, Dict[str, str]]] = {}
+        # origen -> mapas invertidos (se reconstruyen al cambiar el origen)
+        self._inverted: Dict[str, Dict[str, Dict[str, List[Dict[str, Any]]]]] = {}
+        self._lock = threading.RLock()
+        # Serializa las escrituras del archivo dentro del proceso
+        self._flush_lock = threading.Lock()
+        self._loaded = False
+        # Cambios en memoria (`_version`) frente a los ya persistidos
+        self._version = 0
+        self._flushed_version = 0
+        self._flush_pending = False
+        self._last_flush = 0.0
+        self._counters = {"hits": 0, "parsed": 0, "pool_batches": 0, "refreshes": 0}
+
+    @property
+    def path(self) -> Path:
+        return self.directory / "symbols.json"
+
+    # ------------------------------------------------------------------ #
+    # Persistencia
+    # ------------------------------------------------------------------ #
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            try:
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+                if data.get("version") == _VERSION:
+                    self._records = OrderedDict(data.get("records", {}))
+                    self._sources = data.get("sources", {})
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logging.warning(f"[SymbolIndex] Índice persistido ilegible, se reconstruye: {e}")
+
+    def flush(self) -> None:
+        """Persiste el índice si hay cambios (los registros no se mutan: basta copiar referencias)."""
+        with self._flush_lock:
+            with self._lock:
+                if self._version == self._flushed_version:
+                    return
+                version = self._version
+                data = {"version": _VERSION, "records": dict(self._records),
+                        "sources": {name: dict(files) for name, files in self._sources.items()}}
+            tmp = self.directory / f"symbols.{os.getpid()}.{threading.get_ident()}.tmp"
+            # También en fallo: el siguiente intento espera SYMBOL_INDEX_FLUSH_S
+            self._last_flush = time.monotonic()
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+                os.replace(tmp, self.path)
+                self._flushed_version = version
+            except OSError as e:
+                logging.warning(f"[SymbolIndex] No se pudo persistir el índice: {e}")
+                try:
+                    tmp.unlink()
+                except OSError:
+                    pass
+
+    def _schedule_flush(self, force: bool = False) -> None:
+        """Programa un flush en segundo plano (uno a la vez), fuera del request."""
+        with self._lock:
+            if self._flush_pending or self._version == self._flushed_version:
+                return
+            self._flush_pending = True
+            delay = 0.0 if force else max(0.0, self.flush_s - (time.monotonic() - self._last_flush))
+
+        def _run() -> None:
+            try:
+                if delay:
+                    time.sleep(delay)
+                self.flush()
+            finally:
+                with self._lock:
+                    self._flush_pending = False
+                # Cambios llegados durante la escritura
+                self._schedule_flush()
+
+        threading.Thread(target=_run, name="symbol-index-flush", daemon=True).start()
+
+    def _store(self, digest: str, record: Dict[str, Any]) -> None:
+        self._records[digest] = record
+        self._records.move_to_end(digest)
+        self._version += 1
+        if len(self._records) > self.max_records:
+            referenced = {entry["hash"] for files in self._sources.values() for entry in files.values()}
+            for old in list(self._records):
+                if len(self._records) <= self.max_records:
+                    break
+                if old not in referenced:
+                    del self._records[old]
+
+    # ------------------------------------------------------------------ #
+    # Archivos individuales
+    # ------------------------------------------------------------------ #
+    def analyze(self, content: str) -> Dict[str, Any]:
+        """Registro de símbolos de `content` (parsea solo si el hash es nuevo)."""
+        self._ensure_loaded()
+        digest = content_hash(content)
+        with self._lock:
+            record = self._records.get(digest)
+            if record is not None:
+                self._records.move_to_end(digest)
+                self._counters["hits"] += 1
+                return record
+        record = extract_symbols(content)
+        with self._lock:
+            self._store(digest, record)
+            self._counters["parsed"] += 1
+        self._schedule_flush()
+        return record
+
+    # ------------------------------------------------------------------ #
+    # Proyecto
+    # ------------------------------------------------------------------ #
+    def refresh(self, source: str, listing: List[Tuple[str, str]],
+                read_text: Callable[[str], Optional[str]]) -> Dict[str, Any]:
+        """
+        Actualiza el índice del origen `source` con `listing` [(ruta, validador)]
+        de archivos .py. `read_text(ruta)` solo se llama para rutas nuevas o
+        modificadas.
+        """
+        self._ensure_loaded()
+        start = time.perf_counter()
+        with self._lock:
+            current = dict(self._sources.get(source, {}))
+        stats = {"reused": 0, "parsed": 0, "removed": 0, "pool": False}
+        updated: Dict[str, Dict[str, str]] = {}
+        pending: List[Tuple[str, str, str, str]] = []
+
+        for name, validator in listing:
+            entry = current.get(name)
+            if entry and entry["validator"] == validator and entry["hash"] in self._records:
+                updated[name] = entry
+                stats["reused"] += 1
+                continue
+            try:
+                text = read_text(name)
+            except Exception as e:
+                logging.warning(f"[SymbolIndex] No se pudo leer {name}: {e}")
+                continue
+            if text is None:
+                continue
+            digest = content_hash(text)
+            updated[name] = {"validator": validator, "hash": digest}
+            if digest in self._records:
+                stats["reused"] += 1
+            else:
+                pending.append((name, validator, digest, text))
+        stats["removed"] = len(set(current) - set(updated))
+
+        if pending:
+            records = self._parse_batch([text for _, _, _, text in pending], stats)
+            with self._lock:
+                for (_, _, digest, _), record in zip(pending, records):
+                    self._store(digest, record)
+                self._counters["parsed"] += len(records)
+            stats["parsed"] = len(records)
+
+        with self._lock:
+            if updated != current or source not in self._sources:
+                self._sources[source] = updated
+                self._inverted.pop(source, None)
+                self._version += 1
+            self._counters["refreshes"] += 1
+        self._schedule_flush(force=bool(pending or stats["removed"]))
+        stats["ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return stats
+
+    def _parse_batch(self, contents: List[str], stats: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if self.workers > 1 and len(contents) >= self.pool_min:
+            # multiprocessing solo se importa si hace falta (fuera del arranque)
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            chunks = [contents[i::self.workers] for i in range(self.workers)]
+            try:
+                # "spawn": el módulo solo importa stdlib, arrancar un hijo limpio es barato
+                with ProcessPoolExecutor(max_workers=self.workers,
+                                         mp_context=multiprocessing.get_context("spawn")) as pool:
+                    results = list(pool.map(_extract_many, chunks))
+                # Reordenar: chunk i contiene los elementos i, i+workers, ...
+                ordered: List[Dict[str, Any]] = [None] * len(contents)  # type: ignore[list-item]
+                for i, chunk in enumerate(results):
+                    ordered[i::self.workers] = chunk
+                stats["pool"] = True
+                self._counters["pool_batches"] += 1
+                return ordered
+            except Exception as e:
+                logging.warning(f"[SymbolIndex] Pool de procesos no disponible, parseo secuencial: {e}")
+        return _extract_many(contents)
+
+    def _maps(self, source: str) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+        with self._lock:
+            maps = self._inverted.get(source)
+            if maps is not None:
+                return maps
+            defs: Dict[str, List[Dict[str, Any]]] = {}
+            calls: Dict[str, List[Dict[str, Any]]] = {}
+            bodies: Dict[str, List[Dict[str, Any]]] = {}
+            for file_name, entry in sorted(self._sources.get(source, {}).items()):
+                record = self._records.get(entry["hash"])
+                if record is None:
+                    continue
+                for definition in record["definitions"]:
+                    defs.setdefault(definition["name"], []).append({"file": file_name, **definition})
+                for name, lines in record["calls"].items():
+                    calls.setdefault(name, []).append({"file": file_name, "lines": lines})
+                for body in record["body_hashes"]:
+                    bodies.setdefault(body["hash"], []).append({"file": file_name, **body})
+            maps = {"definitions": defs, "calls": calls,
+                    "bodies": {digest: found for digest, found in bodies.items() if len(found) > 1}}
+            self._inverted[source] = maps
+            return maps
+
+    def where_defined(self, source: str, name: str) -> List[Dict[str, Any]]:
+        """Definiciones cuyo nombre o nombre calificado coincide con `name`."""
+        defs = self._maps(source)["definitions"]
+        simple = name.rsplit(".", 1)[-1]
+        return [d for d in defs.get(simple, []) if name in (d["name"], d["qualname"])]
+
+    def callers(self, source: str, name: str) -> List[Dict[str, Any]]:
+        return list(self._maps(source)["calls"].get(name.rsplit(".", 1)[-1], []))
+
+    def duplicate_bodies(self, source: str) -> List[Dict[str, Any]]:
+        """Funciones con el mismo cuerpo, dentro de un archivo o entre archivos."""
+        return [{"hash": digest, "definitions": found, "type": "duplicate_body"}
+                for digest, found in self._maps(source)["bodies"].items()]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "records": len(self._records),
+                "sources": {name: len(files) for name, files in self._sources.items()},
+                "path": str(self.path),
+                "workers": self.workers,
+                **self._counters,
+            }
+
+
+symbol_index = SymbolIndex()
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+Thread Index
+------------
+Índice secundario de threads almacenados en Blob Storage para resolver un
+thread sin listar ni descargar blobs:
+
+    {threads}:idx:t:<thread_id>   -> JSON {blob, thread_id, session_id, agent_id,
+                                          last_modified, mensajes}
+    {threads}:idx:s:<session_id>  -> ZSET thread_id (score = último write)
+    {threads}:idx:a:<agent_id>    -> ZSET thread_id
+    {threads}:idx:recent          -> ZSET global, recortado a THREAD_INDEX_RECENT_MAX
+
+- Se actualiza en cada `guardar_thread_en_blob`.
+- Snapshot local compacto (LRU acotado) para lecturas sin red y como
+  respaldo cuando Redis no está disponible.
+- Reconstruible con un escaneo en segundo plano de `threads/` (lock en Redis,
+  un solo worker escanea). Mientras no esté construido, `is_built()` es
+  False y los llamadores usan el camino de listado heredado. Un intento
+  fallido se reintenta tras THREAD_INDEX_RETRY_S.
+- Sin Redis el índice nunca se marca construido: el snapshot local solo ve
+  los threads de este worker, así que las búsquedas siguen por el listado.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+BUILT_KEY = "{threads}:idx:built"
+BUILDING_LOCK_KEY = "{threads}:idx:building"
+RECENT_KEY = "{threads}:idx:recent"
+
+
+def _score(last_modified: Optional[str]) -> float:
+    if not last_modified:
+        return time.time()
+    try:
+        return datetime.fromisoformat(last_modified.replace("Z", "+00:00")).timestamp()
+    except Exception:
+        return time.time()
+
+
+class ThreadIndex:
+    """session_id / agent_id / thread_id -> blob del thread."""
+
+    def __init__(self, buffer: Any):
+        self._buffer = buffer
+        self._enabled = os.getenv("THREAD_INDEX_ENABLED", "1").lower() not in (
+            "0", "false", "no", "off")
+        self._ttl = int(os.getenv("THREAD_INDEX_TTL", str(30 * 24 * 3600)))
+        self._recent_max = int(os.getenv("THREAD_INDEX_RECENT_MAX", "1000"))
+        self._local_max = int(os.getenv("THREAD_INDEX_LOCAL_MAX", "5000"))
+
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._by_session: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._built = False
+        self._build_thread: Optional[threading.Thread] = None
+        self._retry_s = float(os.getenv("THREAD_INDEX_RETRY_S", "60"))
+        self._next_attempt = 0.0
+        self._stats = {"hits_local": 0, "hits_redis": 0, "misses": 0,
+                       "records": 0, "rebuilt_items": 0}
+
+    # ------------------------------------------------------------------ #
+    # Helpers
+    # ------------------------------------------------------------------ #
+    def _incr(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[name] += amount
+
+    def _redis(self) -> Any:
+        if self._buffer is None or not self._buffer.is_enabled:
+            return None
+        return self._buffer._client
+
+    def _remember(self, entry: Dict[str, Any]) -> None:
+        thread_id = entry["thread_id"]
+        with self._lock:
+            self._entries[thread_id] = entry
+            self._entries.move_to_end(thread_id)
+            session_id = entry.get("session_id")
+            if session_id:
+                current = self._entries.get(self._by_session.get(session_id, ""))
+                if current is None or _score(current.get("last_modified")) <= _score(entry.get("last_modified")):
+                    self._by_session[session_id] = thread_id
+                    self._by_session.move_to_end(session_id)
+            while len(self._entries) > self._local_max:
+                self._entries.popitem(last=False)
+            while len(self._by_session) > self._local_max:
+                self._by_session.popitem(last=False)
+
+    # ------------------------------------------------------------------ #
+    # Escritura
+    # ------------------------------------------------------------------ #
+    def record(self, thread_id: str, blob: str, session_id: Optional[str] = None,
+               agent_id: Optional[str] = None, mensajes: int = 0,
+               last_modified: Optional[str] = None) -> None:
+        if not self._enabled or not thread_id or not blob:
+            return
+        entry = {
+            "thread_id": thread_id,
+            "blob": blob,
+            "session_id": session_id,
+            "agent_id": agent_id,
+            "mensajes": mensajes,
+            "last_modified": last_modified or datetime.utcnow().isoformat() + "Z",
+        }
+        self._remember(entry)
+        self._incr("records")
+
+        client = self._redis()
+        if client is None:
+            return
+        score = _score(entry["last_modified"])
+        try:
+            pipe = self._buffer._pipeline(transaction=False)
+            pipe.set(f"{{threads}}:idx:t:{thread_id}", json.dumps(entry, ensure_ascii=False), ex=self._ttl)
+            for key in (f"{{threads}}:idx:s:{session_id}" if session_id else None,
+                        f"{{threads}}:idx:a:{agent_id}" if agent_id else None):
+                if key:
+                    pipe.zadd(key, {thread_id: score})
+                    pipe.expire(key, self._ttl)
+            pipe.zadd(RECENT_KEY, {thread_id: score})
+            pipe.zremrangebyrank(RECENT_KEY, 0, -self._recent_max - 1)
+            pipe.execute()
+        except Exception as exc:
+            logging.debug(f"[ThreadIndex] No se pudo propagar a Redis: {exc}")
+
+    # ------------------------------------------------------------------ #
+    # Lectura
+    # ------------------------------------------------------------------ #
+    def get(self, thread_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Entrada por thread_id: snapshot local y luego Redis."""
+        if not self._enabled or not thread_id:
+            return None
+        with self._lock:
+            entry = self._entries.get(thread_id)
+        if entry is not None:
+            self._incr("hits_local")
+            return entry
+        return self._get_remote([thread_id]).get(thread_id)
+
+    def _get_remote(self, thread_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        client = self._redis()
+        if client is None or not thread_ids:
+            return {}
+        try:
+            raws = client.mget([f"{{threads}}:idx:t:{tid}" for tid in thread_ids])
+        except Exception as exc:
+            logging.debug(f"[ThreadIndex] MGET falló: {exc}")
+            return {}
+        found: Dict[str, Dict[str, Any]] = {}
+        for tid, raw in zip(thread_ids, raws or []):
+            if not raw:
+                continue
+            try:
+                entry = json.loads(raw)
+            except ValueError:
+                continue
+            self._remember(entry)
+            found[tid] = entry
+        self._incr("hits_redis" if found else "misses")
+        return found
+
+    def _latest_from(self, key: str) -> Optional[Dict[str, Any]]:
+        client = self._redis()
+        if client is None:
+            return None
+        try:
+            ids = client.zrevrange(key, 0, 0)
+        except Exception as exc:
+            logging.debug(f"[ThreadIndex] ZREVRANGE falló: {exc}")
+            return None
+        if not ids:
+            return None
+        tid = ids[0].decode() if isinstance(ids[0], bytes) else ids[0]
+        return self.get(tid)
+
+    def latest_for_session(self, session_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Thread más reciente de la sesión (Redis es la fuente; el local, respaldo)."""
+        if not self._enabled or not session_id:
+            return None
+        entry = self._latest_from(f"{{threads}}:idx:s:{session_id}")
+        if entry is None:
+            with self._lock:
+                tid = self._by_session.get(session_id)
+                entry = self._entries.get(tid) if tid else None
+        if entry is None:
+            self._incr("misses")
+        return entry
+
+    def latest_for_agent(self, agent_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not self._enabled or not agent_id:
+            return None
+        return self._latest_from(f"{{threads}}:idx:a:{agent_id}")
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """Thread más reciente de cualquier sesión."""
+        if not self._enabled:
+            return None
+        entry = self._latest_from(RECENT_KEY)
+        if entry is None:
+            with self._lock:
+                entries = list(self._entries.values())
+            if entries:
+                entry = max(entries, key=lambda e: _score(e.get("last_modified")))
+        return entry
+
+    # ------------------------------------------------------------------ #
+    # Reconstrucción
+    # ------------------------------------------------------------------ #
+    def is_built(self) -> bool:
+        return self._enabled and self._built
+
+    def ensure_built(self, thread_store: Any) -> bool:
+        """Arranca la reconstrucción en segundo plano la primera vez; True si ya está lista."""
+        if self._built or not self._enabled:
+            return self._built
+        if self._redis() is None or time.monotonic() < self._next_attempt:
+            return False
+        with self._lock:
+            if self._build_thread is None:
+                self._build_thread = threading.Thread(
+                    target=self._build, args=(thread_store,), name="thread-index-build", daemon=True)
+                self._build_thread.start()
+        return self._built
+
+    def _build(self, thread_store: Any) -> None:
+        client = self._redis()
+        holds_lock = False
+        try:
+            if client is None:
+                return
+            if client.get(BUILT_KEY):
+                self._built = True
+                logging.info("[ThreadIndex] Índice disponible en Redis")
+                return
+            if not client.set(BUILDING_LOCK_KEY, "1", nx=True, ex=600):
+                deadline = time.monotonic() + 600
+                while time.monotonic() < deadline:
+                    time.sleep(5)
+                    if client.get(BUILT_KEY):
+                        self._built = True
+                        return
+                return
+            holds_lock = True
+            count = self.rebuild(thread_store)
+            client.set(BUILT_KEY, str(int(time.time())), ex=self._ttl)
+            self._built = True
+            logging.info(f"[ThreadIndex] Índice reconstruido: {count} threads")
+        except Exception as exc:
+            logging.warning(f"[ThreadIndex] No se pudo reconstruir el índice: {exc}")
+        finally:
+            if holds_lock:
+                try:
+                    client.delete(BUILDING_LOCK_KEY)
+                except Exception:
+                    pass
+            if not self._built:
+                # Permitir un nuevo intento (Redis caído, otro worker que no terminó...)
+                with self._lock:
+                    self._next_attempt = time.monotonic() + self._retry_s
+                    self._build_thread = None
+
+    def rebuild(self, thread_store: Any) -> int:
+        """Escanea `threads/` y registra cada thread (el log .jsonl gana al .json heredado)."""
+        container = thread_store.container()
+        if container is None:
+            return 0
+        blobs: Dict[str, Any] = {}
+        for blob in container.list_blobs(name_starts_with=thread_store.prefix):
+            thread_id = thread_store.thread_id_from_name(blob.name)
+            if thread_id not in blobs or blob.name.endswith(".jsonl"):
+                blobs[thread_id] = blob
+        count = 0
+        for thread_id, blob in blobs.items():
+            data = thread_store.read_tail(thread_id) or {}
+            last_modified = getattr(blob, "last_modified", None)
+            self.record(
+                thread_id,
+                blob.name,
+                session_id=data.get("session_id"),
+                agent_id=data.get("agent_id"),
+                mensajes=len(data.get("mensajes") or []),
+                last_modified=last_modified.isoformat() if last_modified else None,
+            )
+            count += 1
+        self._incr("rebuilt_items", count)
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot: Dict[str, Any] = dict(self._stats)
+            snapshot.update({"local_entries": len(self._entries),
+                             "local_sessions": len(self._by_session)})
+        snapshot.update({"enabled": self._enabled, "built": self._built})
+        return snapshot
+
+
+_thread_index: Optional[ThreadIndex] = None
+_thread_index_lock = threading.Lock()
+
+
+def get_thread_index() -> ThreadIndex:
+    global _thread_index
+    if _thread_index is None:
+        with _thread_index_lock:
+            if _thread_index is None:
+                from services.redis_buffer_service import redis_buffer
+                _thread_index = ThreadIndex(redis_buffer)
+    return _thread_index
@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+"""
+Thread Store (append-only)
+--------------------------
+Persistencia de threads en Blob Storage como log JSONL sobre *append blobs*:
+
+    threads/{thread_id}.jsonl
+      {"tipo": "meta", "id": ..., "session_id": ..., "metadata": {...}, ...}
+      {"tipo": "mensaje", "role": "usuario", "content": ..., "created_at": ...}
+      ...
+
+- Escritura: un único `append_block` por request con los mensajes nuevos y
+  el registro de metadata; O(mensaje) y sin carreras entre requests
+  concurrentes del mismo thread (el servicio serializa los appends).
+- Lectura: solo la cola del blob (descargas por rango que se duplican hasta
+  reunir `max_mensajes`), nunca el historial completo.
+- Compactación: al superar THREAD_LOG_COMPACT_BYTES o el límite de bloques
+  del append blob, se recrea el blob condicionado al ETag leído y se anexa
+  la última metadata + los últimos mensajes con `appendpos_condition=0`.
+  Si otro writer anexó antes de recrear, se relee y se reintenta; si anexó
+  entre la recreación y nuestro bloque, sus bloques se re-anexan detrás del
+  compactado para no perder ni reordenar mensajes.
+- Migración: el primer append sobre un thread con `threads/{id}.json`
+  heredado siembra el log con sus últimos mensajes.
+"""
+import json
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    from azure.core import MatchConditions
+    from azure.core.exceptions import (ResourceExistsError, ResourceModifiedError,
+                                       ResourceNotFoundError)
+except ImportError:  # pragma: no cover - SDK ausente en entornos locales
+    MatchConditions = None
+    ResourceExistsError = ResourceModifiedError = ResourceNotFoundError = None
+
+THREADS_PREFIX = "threads/"
+LOG_SUFFIX = ".jsonl"
+LEGACY_SUFFIX = ".json"
+# Límite de Azure: 50.000 bloques por append blob
+APPEND_BLOB_MAX_BLOCKS = 50000
+
+
+def _is_error(exc: Exception, error_type: Any) -> bool:
+    return error_type is not None and isinstance(exc, error_type)
+
+
+class ThreadStore:
+    """Log append-only de mensajes por thread con lectura de cola."""
+
+    prefix = THREADS_PREFIX
+
+    def __init__(self, container_provider: Callable[[], Any], max_mensajes: int = 20):
+        self._container_provider = container_provider
+        self.max_mensajes = max_mensajes
+        self.compact_bytes = int(os.getenv("THREAD_LOG_COMPACT_BYTES", str(256 * 1024)))
+        self.compact_blocks = int(os.getenv("THREAD_LOG_COMPACT_BLOCKS", "40000"))
+        self.tail_window = int(os.getenv("THREAD_TAIL_WINDOW_BYTES", str(32 * 1024)))
+        self._lock = threading.Lock()
+        self._stats = {"appends": 0, "bytes_appended": 0, "tail_reads": 0,
+                       "bytes_read": 0, "compactions": 0, "compaction_conflicts": 0,
+                       "migrations": 0}
+
+    # ------------------------------------------------------------------ #
+    # Nombres
+    # ------------------------------------------------------------------ #
+    @staticmethod
+    def thread_id_from_name(blob_name: str) -> str:
+        nombre = blob_name[len(THREADS_PREFIX):] if blob_name.startswith(THREADS_PREFIX) else blob_name
+        for suffix in (LOG_SUFFIX, LEGACY_SUFFIX):
+            if nombre.endswith(suffix):
+                return nombre[:-len(suffix)]
+        return nombre
+
+    @staticmethod
+    def log_name(thread_id: str) -> str:
+        return f"{THREADS_PREFIX}{thread_id}{LOG_SUFFIX}"
+
+    @staticmethod
+    def legacy_name(thread_id: str) -> str:
+        return f"{THREADS_PREFIX}{thread_id}{LEGACY_SUFFIX}"
+
+    def _incr(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[name] += amount
+
+    def container(self):
+        return self._container_provider()
+
+    def _blob(self, name: str):
+        container = self._container_provider()
+        return container.get_blob_client(name) if container is not None else None
+
+    # ------------------------------------------------------------------ #
+    # Serialización
+    # ------------------------------------------------------------------ #
+    @staticmethod
+    def _encode(meta: Optional[Dict[str, Any]], mensajes: List[Dict[str, Any]]) -> bytes:
+        lines = [json.dumps({"tipo": "mensaje", **m}, ensure_ascii=False) for m in mensajes]
+        if meta:
+            lines.append(json.dumps({"tipo": "meta", **meta}, ensure_ascii=False))
+        return ("\n".join(lines) + "\n").encode("utf-8") if lines else b""
+
+    @staticmethod
+    def _parse(chunk: bytes, partial_head: bool) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        lines = chunk.decode("utf-8", errors="ignore").split("\n")
+        if partial_head:
+            lines = lines[1:]  # la primera línea puede estar cortada por el rango
+        meta: Optional[Dict[str, Any]] = None
+        mensajes: List[Dict[str, Any]] = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            tipo = record.pop("tipo", None)
+            if tipo == "meta":
+                meta = record
+            elif tipo == "mensaje":
+                mensajes.append(record)
+        return meta, mensajes
+
+    # ------------------------------------------------------------------ #
+    # Lectura
+    # ------------------------------------------------------------------ #
+    def read_tail(self, thread_id: str, max_mensajes: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Devuelve el thread con la forma del JSON heredado (`mensajes` + metadata)
+        leyendo solo la cola del log. Cae al `.json` heredado si no hay log.
+        """
+        try:
+            payload = self._read_tail(thread_id, max_mensajes or self.max_mensajes)
+        except Exception as exc:
+            logging.warning(f"[ThreadStore] Error leyendo cola de {thread_id}: {exc}")
+            payload = None
+        if payload is None:
+            payload = self._read_legacy(thread_id, max_mensajes or self.max_mensajes)
+        if payload is not None:
+            payload.pop("_etag", None)
+            payload.pop("_size", None)
+        return payload
+
+    def _read_tail(self, thread_id: str, max_mensajes: int, attempts: int = 3) -> Optional[Dict[str, Any]]:
+        blob = self._blob(self.log_name(thread_id))
+        if blob is None:
+            return None
+        try:
+            props = blob.get_blob_properties()
+        except Exception as exc:
+            if not _is_error(exc, ResourceNotFoundError):
+                logging.debug(f"[ThreadStore] No se pudo leer propiedades de {thread_id}: {exc}")
+            return None
+
+        size = int(getattr(props, "size", 0) or 0)
+        etag = getattr(props, "etag", None)
+        window = self.tail_window
+        meta: Optional[Dict[str, Any]] = None
+        mensajes: List[Dict[str, Any]] = []
+        tail = b""
+        end = size
+        while True:
+            offset = max(0, size - window)
+            if end > offset:
+                # Solo se descarga el tramo nuevo; la cola ya leída se reutiliza
+                kwargs: Dict[str, Any] = {"offset": offset, "length": end - offset}
+                if etag and MatchConditions is not None:
+                    kwargs.update({"etag": etag, "match_condition": MatchConditions.IfNotModified})
+                try:
+                    chunk = blob.download_blob(**kwargs).readall()
+                except Exception as exc:
+                    if _is_error(exc, ResourceModifiedError) and attempts > 1:
+                        # Append o compactación concurrente: releer con el tamaño nuevo
+                        return self._read_tail(thread_id, max_mensajes, attempts - 1)
+                    raise
+                self._incr("bytes_read", len(chunk))
+                tail = chunk + tail
+                end = offset
+            meta, mensajes = self._parse(tail, partial_head=offset > 0)
+            if offset == 0 or (len(mensajes) >= max_mensajes and meta is not None):
+                break
+            window *= 2
+        self._incr("tail_reads")
+
+        payload: Dict[str, Any] = dict(meta or {})
+        payload.setdefault("id", thread_id)
+        payload["mensajes"] = mensajes[-max_mensajes:]
+        payload["_etag"] = etag
+        payload["_size"] = size
+        return payload
+
+    def _read_legacy(self, thread_id: str, max_mensajes: int) -> Optional[Dict[str, Any]]:
+        blob = self._blob(self.legacy_name(thread_id))
+        if blob is None:
+            return None
+        try:
+            data = json.loads(blob.download_blob().readall().decode("utf-8"))
+        except Exception:
+            return None
+        if not isinstance(data, dict):
+            return None
+        mensajes = data.get("mensajes")
+        data["mensajes"] = mensajes[-max_mensajes:] if isinstance(mensajes, list) else []
+        data.setdefault("id", thread_id)
+        return data
+
+    # ------------------------------------------------------------------ #
+    # Escritura
+    # ------------------------------------------------------------------ #
+    def _create_log(self, blob, thread_id: str) -> None:
+        """Crea el append blob; si existe un `.json` heredado, lo usa de semilla."""
+        legacy = self._read_legacy(thread_id, self.max_mensajes)
+        try:
+            if MatchConditions is not None:
+                blob.create_append_blob(etag="*", match_condition=MatchConditions.IfMissing)
+            else:
+                blob.create_append_blob()
+        except Exception as exc:
+            if _is_error(exc, ResourceExistsError) or _is_error(exc, ResourceModifiedError):
+                return  # otro writer lo creó primero
+            raise
+        if legacy:
+            mensajes = legacy.pop("mensajes", [])
+            blob.append_block(self._encode(legacy, mensajes))
+            self._incr("migrations")
+
+    def append(self, thread_id: str, mensajes: List[Dict[str, Any]],
+               meta: Optional[Dict[str, Any]] = None) -> bool:
+        """Anexa mensajes (+ metadata) al log del thread en un solo bloque."""
+        data = self._encode(meta, mensajes)
+        if not data:
+            return False
+        blob = self._blob(self.log_name(thread_id))
+        if blob is None:
+            return False
+        try:
+            result = blob.append_block(data)
+        except Exception as exc:
+            if not _is_error(exc, ResourceNotFoundError):
+                raise
+            self._create_log(blob, thread_id)
+            result = blob.append_block(data)
+        self._incr("appends")
+        self._incr("bytes_appended", len(data))
+
+        result = result or {}
+        offset = int(result.get("blob_append_offset") or 0) + len(data)
+        blocks = int(result.get("blob_committed_block_count") or 0)
+        if offset >= self.compact_bytes or blocks >= min(self.compact_blocks, APPEND_BLOB_MAX_BLOCKS - 1):
+            self.compact(thread_id)
+        return True
+
+    def compact(self, thread_id: str, attempts: int = 3) -> bool:
+        """Reescribe el log con la última metadata y los últimos mensajes (ETag-condicional)."""
+        if MatchConditions is None:
+            return False
+        blob = self._blob(self.log_name(thread_id))
+        if blob is None:
+            return False
+        for _ in range(max(1, attempts)):
+            try:
+                snapshot = self._read_tail(thread_id, self.max_mensajes)
+            except Exception as exc:
+                logging.debug(f"[ThreadStore] Compactación de {thread_id} omitida: {exc}")
+                return False
+            if not snapshot:
+                return False
+            etag = snapshot.pop("_etag", None)
+            snapshot.pop("_size", None)
+            if not etag:
+                return False
+            mensajes = snapshot.pop("mensajes", [])
+            try:
+                blob.create_append_blob(etag=etag, match_condition=MatchConditions.IfNotModified)
+            except Exception as exc:
+                if _is_error(exc, ResourceModifiedError):
+                    # Append concurrente antes de recrear: releer y reintentar
+                    self._incr("compaction_conflicts")
+                    continue
+                logging.warning(f"[ThreadStore] Error compactando {thread_id}: {exc}")
+                return False
+            self._write_compacted(blob, thread_id, self._encode(snapshot, mensajes), attempts)
+            self._incr("compactions")
+            logging.info(f"[ThreadStore] Thread {thread_id} compactado a {len(mensajes)} mensajes")
+            return True
+        logging.info(f"[ThreadStore] Compactación de {thread_id} aplazada: appends concurrentes")
+        return False
+
+    def _write_compacted(self, blob, thread_id: str, data: bytes, attempts: int) -> None:
+        """
+        Escribe el contenido compactado como primer bloque del blob recién
+        recreado. Si un append se coló antes, se recrea con compactado + esos
+        bloques, condicionado a su ETag, hasta que el orden quede intacto.
+        """
+        for _ in range(max(1, attempts)):
+            try:
+                blob.append_block(data, appendpos_condition=0)
+                return
+            except Exception as exc:
+                if not _is_error(exc, ResourceModifiedError):
+                    raise
+            self._incr("compaction_conflicts")
+            downloader = blob.download_blob()
+            intruso = downloader.readall()
+            etag = getattr(getattr(downloader, "properties", None), "etag", None)
+            try:
+                blob.create_append_blob(etag=etag, match_condition=MatchConditions.IfNotModified)
+            except Exception as exc:
+                if not _is_error(exc, ResourceModifiedError):
+                    raise
+                continue  # más appends entre la lectura y la recreación
+            data = data + intruso
+        # Último recurso: anexar aunque quede detrás de los appends concurrentes
+        logging.warning(
+            f"[ThreadStore] Compactación de {thread_id} anexada tras appends concurrentes")
+        blob.append_block(data)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats)
+
+
+_thread_stores: Dict[str, ThreadStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_thread_store(container_name: Optional[str] = None, max_mensajes: int = 20) -> ThreadStore:
+    """Singleton por contenedor; el cliente de Blob se resuelve perezosamente."""
+    container_name = container_name or os.getenv("THREADS_CONTAINER_NAME", "boat-rental-project")
+    with _stores_lock:
+        store = _thread_stores.get(container_name)
+        if store is None:
+            holder: Dict[str, Any] = {}
+
+            def _container():
+                if "container" not in holder:
+                    from utils_helpers import get_blob_client
+                    client = get_blob_client()
+                    if client is None:
+                        return None
+                    holder["container"] = client.get_container_client(container_name)
+                return holder["container"]
+
+            store = ThreadStore(_container, max_mensajes=max_mensajes)
+            _thread_stores[container_name] = store
+        return store
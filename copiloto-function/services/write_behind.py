@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+Write-Behind Queue
+------------------
+Cola acotada en memoria drenada por workers en segundo plano, para sacar del
+request las escrituras lentas (Cosmos upsert + indexación en AI Search).
+
+- submit() retorna en cuanto el evento queda encolado; con `wait` espera el
+  resultado real del handler (hasta ese timeout) en lugar del acuse de cola.
+- Backpressure: si la cola está llena se espera hasta `enqueue_timeout`; si
+  sigue llena el evento se derrama a un JSONL local (spill) y, si eso también
+  falla, se procesa en línea en el thread del caller.
+- Los eventos derramados se re-encolan cuando la cola vuelve a tener espacio
+  (y al arrancar, para recuperar lo que quedó de una instancia anterior).
+- flush() / atexit drenan la cola antes de que el worker termine.
+"""
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+_STOP = object()
+
+
+class _Ticket:
+    """Resultado de un evento encolado para quien lo espera con submit(wait=...)."""
+    __slots__ = ("done", "ok")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.ok = False
+
+
+class WriteBehindQueue:
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Dict[str, Any]], Any],
+        max_size: int = 1000,
+        workers: int = 2,
+        enqueue_timeout: float = 0.05,
+        spill_path: Optional[Path] = None,
+        enabled: bool = True,
+    ):
+        self.name = name
+        self._handler = handler
+        self._enabled = enabled
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, max_size))
+        self._workers_count = max(1, workers)
+        self._enqueue_timeout = enqueue_timeout
+        self._spill_path = spill_path
+        self._spill_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._threads: list = []
+        self._stats_lock = threading.Lock()
+        self._latencies: "deque[float]" = deque(maxlen=500)
+        self._stats = {
+            "enqueued": 0,
+            "processed": 0,
+            "rejected": 0,
+            "failed": 0,
+            "spilled": 0,
+            "replayed": 0,
+            "inline": 0,
+            "max_depth": 0,
+        }
+        self._stopped = False
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled and not self._stopped
+
+    # ------------------------------------------------------------------ #
+    # Workers
+    # ------------------------------------------------------------------ #
+    def _ensure_started(self) -> None:
+        if self._threads:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            for idx in range(self._workers_count):
+                thread = threading.Thread(
+                    target=self._worker, name=f"{self.name}-wb-{idx}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            atexit.register(self.shutdown)
+            self._replay_spill()
+
+    def _incr(self, name: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def _run_handler(self, item: Dict[str, Any], enqueued_at: float,
+                     ticket: Optional["_Ticket"] = None) -> bool:
+        ok = False
+        try:
+            ok = self._handler(item) is not False
+            self._incr("processed")
+            if not ok:
+                # El handler decidió no persistir (duplicado, Cosmos caído...)
+                self._incr("rejected")
+                logging.debug(f"[WriteBehind:{self.name}] handler devolvió False")
+        except Exception as exc:
+            self._incr("failed")
+            logging.warning(f"[WriteBehind:{self.name}] Error procesando evento: {exc}")
+        finally:
+            with self._stats_lock:
+                self._latencies.append((time.monotonic() - enqueued_at) * 1000)
+            if ticket is not None:
+                ticket.ok = ok
+                ticket.done.set()
+        return ok
+
+    def _worker(self) -> None:
+        while True:
+            entry = self._queue.get()
+            try:
+                if entry is _STOP:
+                    return
+                item, enqueued_at, ticket = entry
+                self._run_handler(item, enqueued_at, ticket)
+            finally:
+                self._queue.task_done()
+            if self._spill_path and self._queue.empty():
+                self._replay_spill()
+
+    # ------------------------------------------------------------------ #
+    # Spill durable
+    # ------------------------------------------------------------------ #
+    def _spill(self, item: Dict[str, Any]) -> bool:
+        if not self._spill_path:
+            return False
+        try:
+            line = json.dumps(item, ensure_ascii=False, default=str)
+            with self._spill_lock:
+                with open(self._spill_path, "a", encoding="utf-8") as fh:
+                    fh.write(line + "\n")
+            self._incr("spilled")
+            return True
+        except Exception as exc:
+            logging.warning(f"[WriteBehind:{self.name}] No se pudo derramar evento: {exc}")
+            return False
+
+    def _replay_spill(self) -> None:
+        """Re-encola eventos derramados mientras haya espacio en la cola."""
+        path = self._spill_path
+        if not path or not path.exists():
+            return
+        with self._spill_lock:
+            try:
+                lines = path.read_text(encoding="utf-8").splitlines()
+            except Exception:
+                return
+            pending = []
+            for idx, line in enumerate(lines):
+                if not line.strip():
+                    continue
+                try:
+                    self._queue.put_nowait((json.loads(line), time.monotonic(), None))
+                    self._incr("replayed")
+                except queue.Full:
+                    pending = lines[idx:]
+                    break
+                except Exception:
+                    continue  # línea corrupta: se descarta
+            try:
+                if pending:
+                    path.write_text("\n".join(pending) + "\n", encoding="utf-8")
+                else:
+                    path.unlink()
+            except Exception:
+                logging.debug(f"[WriteBehind:{self.name}] No se pudo reescribir spill", exc_info=True)
+
+    # ------------------------------------------------------------------ #
+    # API
+    # ------------------------------------------------------------------ #
+    def submit(self, item: Dict[str, Any], wait: Optional[float] = None) -> bool:
+        """
+        Encola `item`. Sin `wait` retorna True si quedó aceptado (en cola o en
+        el spill durable); con `wait` retorna el resultado real del handler, o
+        False si no terminó dentro de ese plazo. Si la cola no está habilitada
+        o no hay forma de aceptarlo, lo procesa en línea y retorna ese resultado.
+        """
+        if not self.enabled:
+            return self._run_handler(item, time.monotonic())
+        self._ensure_started()
+        ticket = _Ticket() if wait is not None else None
+        try:
+            self._queue.put((item, time.monotonic(), ticket), timeout=self._enqueue_timeout)
+        except queue.Full:
+            if ticket is None and self._spill(item):
+                return True
+            self._incr("inline")
+            return self._run_handler(item, time.monotonic())
+        self._incr("enqueued")
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            if depth > self._stats["max_depth"]:
+                self._stats["max_depth"] = depth
+        if ticket is None:
+            return True
+        if not ticket.done.wait(wait):
+            logging.warning(
+                f"[WriteBehind:{self.name}] Sin resultado tras {wait}s; el evento sigue en cola")
+            return False
+        return ticket.ok
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Espera a que la cola se vacíe. Retorna False si se agotó el timeout."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._queue.unfinished_tasks == 0:
+                return True
+            time.sleep(0.02)
+        return self._queue.unfinished_tasks == 0
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """Drena lo pendiente y detiene los workers; lo que no alcanza se derrama."""
+        if self._stopped:
+            return
+        drained = self.flush(timeout)
+        self._stopped = True
+        if not drained:
+            while True:
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is not _STOP:
+                    self._spill(entry[0])
+                self._queue.task_done()
+        for _ in self._threads:
+            try:
+                self._queue.put_nowait(_STOP)
+            except queue.Full:
+                break
+
+    def _latency_percentile(self, pct: float) -> Optional[float]:
+        with self._stats_lock:
+            values = sorted(self._latencies)
+        if not values:
+            return None
+        return round(values[min(len(values) - 1, int(len(values) * pct))], 2)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            snapshot: Dict[str, Any] = dict(self._stats)
+        snapshot.update({
+            "enabled": self.enabled,
+            "depth": self._queue.qsize(),
+            "capacity": self._queue.maxsize,
+            "workers": len(self._threads),
+            "drain_latency_ms_p50": self._latency_percentile(0.5),
+            "drain_latency_ms_p95": self._latency_percentile(0.95),
+            "spill_pending": self._spill_path.exists() if self._spill_path else False,
+        })
+        return snapshot
+
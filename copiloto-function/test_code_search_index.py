@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Tests de services/code_search_index: literales obligatorios del regex,
+filtrado de candidatos por trigramas y generaciones del índice en disco.
+"""
+import multiprocessing
+import threading
+import time
+
+from services.code_search_index import CodeSearchIndex, CodeSearchService, _required_literals
+
+ARCHIVOS = {
+    "a.py": b"def cargar_memoria():\n    return redis_client.get('k')\n",
+    "b.py": b"class BlobClient:\n    def download_blob(self): pass\n",
+    "c.md": b"# Notas\nEl cliente de Redis se configura en settings.\n",
+}
+
+
+def _listing(archivos):
+    return [(name, f"v-{hash(data)}", len(data)) for name, data in archivos.items()]
+
+
+def _index(tmp_path, archivos=ARCHIVOS):
+    index = CodeSearchIndex("test", tmp_path, max_file_bytes=1024)
+    index.refresh(_listing(archivos), archivos.__getitem__)
+    return index
+
+
+def test_literales_de_secuencias_y_alternativas():
+    assert _required_literals("download_blob") == ("and", [("lit", "download_blob")])
+    assert _required_literals("(redis|blob)_client") == \
+        ("and", [("and", [("or", [("and", [("lit", "redis")]), ("and", [("lit", "blob")])])]),
+                 ("lit", "_client")])
+
+
+def test_literales_ignoran_repeticiones_opcionales_y_clases():
+    assert _required_literals("foo(bar)?baz") == ("and", [("lit", "foo"), ("lit", "baz")])
+    assert _required_literals("[a-z]+x") == ("and", [("and", [])])
+    assert _required_literals("(abc") == ("and", [])
+
+
+def test_busqueda_filtra_candidatos(tmp_path):
+    index = _index(tmp_path)
+    resultado = index.search(r"download_blob", lambda _: b"")
+    assert [name for name, _ in resultado["hits"]] == ["b.py"]
+    assert resultado["candidates"] == 1
+    assert resultado["documents"] == 3
+
+
+def test_busqueda_ignorecase_y_sin_literales(tmp_path):
+    index = _index(tmp_path)
+    assert sorted(n for n, _ in index.search("REDIS", lambda _: b"")["hits"]) == ["a.py", "c.md"]
+    # Sin literales útiles se verifican todos los documentos
+    resultado = index.search(r"\w+\(\)", lambda _: b"")
+    assert resultado["candidates"] == 3
+    assert [n for n, _ in resultado["hits"]] == ["a.py"]
+
+
+def test_refresh_incremental_y_generaciones(tmp_path):
+    index = _index(tmp_path)
+    anterior = index._snapshot
+    cambiados = dict(ARCHIVOS, **{"b.py": b"class Otro: pass\n"})
+    del cambiados["c.md"]
+    stats = index.refresh(_listing(cambiados), cambiados.__getitem__)
+    assert (stats["reused"], stats["fetched"], stats["removed"]) == (1, 1, 1)
+    assert index.search("download_blob", lambda _: b"")["hits"] == []
+    # La generación anterior se cerró y se borró del directorio
+    assert anterior._mm.closed
+    assert [p.name for p in tmp_path.glob("test.*.idx")] == ["test.2.idx"]
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_snapshot_en_uso_se_cierra_al_soltarlo(tmp_path):
+    index = _index(tmp_path)
+    with index._reading() as snapshot:
+        cambiados = dict(ARCHIVOS, **{"a.py": b"nuevo contenido\n"})
+        index.refresh(_listing(cambiados), cambiados.__getitem__)
+        assert not snapshot._mm.closed
+        assert snapshot.text(snapshot.by_name["a.py"]).startswith("def cargar_memoria")
+    assert snapshot._mm.closed
+
+
+def test_refresco_periodico_en_segundo_plano(tmp_path, monkeypatch):
+    monkeypatch.setenv("CODE_INDEX_DIR", str(tmp_path / "idx"))
+    monkeypatch.setenv("CODE_INDEX_REFRESH_S", "0")
+    raiz = tmp_path / "src"
+    raiz.mkdir()
+    (raiz / "a.py").write_text("alpha_beta = 1\n")
+    servicio = CodeSearchService()
+    # Sin generación previa el primer índice se construye en línea
+    index, fetch = servicio.local_index(raiz)
+    assert len(index.search("alpha_beta", fetch)["hits"]) == 1
+
+    (raiz / "b.py").write_text("gamma_delta = 2\n")
+    liberar = threading.Event()
+    refresh_original = index.refresh
+    monkeypatch.setattr(index, "refresh", lambda *a: (liberar.wait(5), refresh_original(*a))[1])
+    index, fetch = servicio.local_index(raiz)
+    # Mientras refresca se sirve la generación vigente
+    assert index.search("gamma_delta", fetch)["hits"] == []
+    assert servicio.stats()["refreshing"] == [index.name]
+    liberar.set()
+    limite = time.monotonic() + 5
+    while servicio.stats()["refreshing"] and time.monotonic() < limite:
+        time.sleep(0.01)
+    assert len(index.search("gamma_delta", fetch)["hits"]) == 1
+
+
+def _refresh_en_proceso(directory, contenido):
+    archivos = dict(ARCHIVOS, **{"a.py": contenido})
+    index = CodeSearchIndex("test", directory, max_file_bytes=1024)
+    for _ in range(5):
+        archivos["a.py"] += b"#\n"
+        index.refresh(_listing(archivos), archivos.__getitem__)
+
+
+def test_procesos_concurrentes_no_comparten_temporales(tmp_path):
+    ctx = multiprocessing.get_context("spawn")
+    procesos = [ctx.Process(target=_refresh_en_proceso, args=(tmp_path, f"p{i}\n".encode()))
+                for i in range(3)]
+    for proceso in procesos:
+        proceso.start()
+    for proceso in procesos:
+        proceso.join(60)
+        assert proceso.exitcode == 0
+    index = CodeSearchIndex("test", tmp_path, max_file_bytes=1024)
+    assert index._generation == 15
+    assert len(index.documents()) == 3
+    assert not list(tmp_path.glob("*.tmp"))
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Tests de services/command_executor: timeout, truncado de salida, cancelación,
+cola llena y workers reservados para prioridades no BACKGROUND.
+"""
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from services.command_executor import (PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, CommandExecutor,
+                                       CommandRejected)
+
+pytestmark = pytest.mark.skipif(os.name != "posix", reason="usa comandos de shell POSIX")
+
+
+def _executor(monkeypatch, **env) -> CommandExecutor:
+    for key, value in env.items():
+        monkeypatch.setenv(key, str(value))
+    return CommandExecutor()
+
+
+def test_resultado_como_subprocess_run(monkeypatch):
+    executor = _executor(monkeypatch)
+    resultado = executor.run([sys.executable, "-c", "import sys; print('hola'); sys.exit(3)"])
+    assert resultado.returncode == 3
+    assert resultado.stdout.strip() == "hola"
+    assert executor.stats()["completed"] == 1
+
+
+def test_timeout_mata_el_proceso(monkeypatch):
+    executor = _executor(monkeypatch)
+    inicio = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        executor.run("sleep 20", shell=True, timeout=0.5)
+    assert time.monotonic() - inicio < 5
+    assert executor.stats()["timeouts"] == 1
+
+
+def test_timeout_con_nieto_que_retiene_los_pipes(monkeypatch):
+    executor = _executor(monkeypatch)
+    inicio = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired) as info:
+        executor.run("sleep 20 & echo started", shell=True, timeout=1)
+    assert time.monotonic() - inicio < 5
+    assert info.value.output.strip() == "started"
+
+
+def test_salida_truncada(monkeypatch):
+    executor = _executor(monkeypatch, CMD_OUTPUT_MAX_BYTES=100)
+    fragmentos = []
+    resultado = executor.run([sys.executable, "-c", "print('x' * 5000)"],
+                             on_output=lambda stream, texto: fragmentos.append(texto))
+    assert len(resultado.stdout) == 100
+    assert resultado.stdout_truncated and not resultado.stderr_truncated
+    # El callback recibe la salida completa aunque la captura se recorte
+    assert len("".join(fragmentos).strip()) == 5000
+
+
+def test_cancelar_en_ejecucion_y_en_cola(monkeypatch):
+    executor = _executor(monkeypatch, CMD_EXECUTOR_WORKERS=1)
+    corriendo = executor.submit("sleep 20", shell=True, timeout=None)
+    en_cola = executor.submit("echo nunca", shell=True)
+    limite = time.monotonic() + 5
+    while not corriendo.running and time.monotonic() < limite:
+        time.sleep(0.01)
+    assert en_cola.cancel()
+    assert en_cola.result(1).cancelled
+    assert corriendo.cancel()
+    assert corriendo.result(5).cancelled
+    assert not corriendo.cancel()
+
+
+def test_cola_llena_rechaza(monkeypatch):
+    executor = _executor(monkeypatch, CMD_EXECUTOR_WORKERS=1, CMD_EXECUTOR_QUEUE_MAX=1)
+    ocupado = executor.submit("sleep 20", shell=True, timeout=None)
+    limite = time.monotonic() + 5
+    while not ocupado.running and time.monotonic() < limite:
+        time.sleep(0.01)
+    esperando = executor.submit("true", shell=True)
+    with pytest.raises(CommandRejected):
+        executor.submit("true", shell=True)
+    assert executor.stats()["rejected"] == 1
+    ocupado.cancel()
+    assert esperando.result(5).returncode == 0
+
+
+def test_worker_reservado_para_interactivos(monkeypatch):
+    executor = _executor(monkeypatch, CMD_EXECUTOR_WORKERS=2, CMD_EXECUTOR_RESERVED_WORKERS=1)
+    largos = [executor.submit("sleep 20", shell=True, timeout=None, priority=PRIORITY_BACKGROUND)
+              for _ in range(2)]
+    inicio = time.monotonic()
+    resultado = executor.run("echo rapido", shell=True, timeout=5, priority=PRIORITY_INTERACTIVE)
+    assert resultado.stdout.strip() == "rapido"
+    assert time.monotonic() - inicio < 5
+    stats = executor.stats()
+    assert stats["running_background"] == 1 and stats["queued"] == 1
+    for handle in largos:
+        handle.cancel()
+
+
+def test_coalesce_comparte_el_proceso(monkeypatch):
+    executor = _executor(monkeypatch, CMD_EXECUTOR_WORKERS=1)
+    bloqueo = executor.submit("sleep 20", shell=True, timeout=None)
+    a = executor.submit("echo uno", shell=True, coalesce=True)
+    b = executor.submit("echo uno", shell=True, coalesce=True)
+    bloqueo.cancel()
+    assert a.result(5) is b.result(5)
+    assert executor.stats()["coalesced"] == 1
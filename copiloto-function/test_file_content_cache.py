@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Tests de services/file_content_cache: invalidación por escritura, cambio de
+validador, expulsión por bytes y ventana sin revalidación.
+"""
+import time
+
+from services.file_content_cache import FileContentCache, normalize_path
+
+
+def _cache(monkeypatch, **env) -> FileContentCache:
+    for key, value in env.items():
+        monkeypatch.setenv(key, str(value))
+    return FileContentCache()
+
+
+def _result(contenido: str) -> dict:
+    return {"exito": True, "contenido": contenido}
+
+
+def test_normalize_path():
+    assert normalize_path("\\docs\\a.md") == "docs/a.md"
+    assert normalize_path("//docs//a.md") == "docs/a.md"
+    assert normalize_path(None) == ""
+
+
+def test_hit_devuelve_copia(monkeypatch):
+    cache = _cache(monkeypatch)
+    cache.put("blob:docs/a.md", _result("hola"), "docs/a.md", etag="e1")
+    entry = cache.get("blob:docs/a.md")
+    copia = cache.hit(entry)
+    copia["contenido"] = "modificado"
+    assert cache.get("blob:docs/a.md").result["contenido"] == "hola"
+    assert cache.stats()["hits"] == 1
+
+
+def test_invalidate_por_sufijo_de_ruta(monkeypatch):
+    cache = _cache(monkeypatch)
+    cache.put("local:docs/a.md", _result("a"), "/home/site/wwwroot/docs/a.md", stat=(1, 1))
+    cache.put("blob:docs/b.md", _result("b"), "docs/b.md", etag="e1")
+    # Ruta relativa invalida la entrada leída por ruta absoluta
+    assert cache.invalidate("docs/a.md") == 1
+    assert "local:docs/a.md" not in cache
+    # Ruta absoluta invalida la entrada leída como blob relativo
+    assert cache.invalidate("/home/site/wwwroot/docs/b.md") == 1
+    assert len(cache) == 0
+    assert cache.stats()["invalidations"] == 2
+
+
+def test_invalidate_no_confunde_nombres_parecidos(monkeypatch):
+    cache = _cache(monkeypatch)
+    cache.put("blob:docs/a.md", _result("a"), "docs/a.md", etag="e1")
+    assert cache.invalidate("otros/docs/a.md.bak", "a.md.bak", "") == 0
+    assert "blob:docs/a.md" in cache
+
+
+def test_put_con_validador_nuevo_reemplaza(monkeypatch):
+    cache = _cache(monkeypatch)
+    cache.put("blob:a.py", _result("v1"), "a.py", etag="e1")
+    cache.put("blob:a.py", _result("v2-largo"), "a.py", etag="e2")
+    entry = cache.get("blob:a.py")
+    assert entry.etag == "e2" and entry.result["contenido"] == "v2-largo"
+    stats = cache.stats()
+    assert stats["refreshed"] == 1
+    assert stats["bytes"] == len("v2-largo")
+
+
+def test_expulsion_lru_por_bytes(monkeypatch):
+    cache = _cache(monkeypatch, FILE_CACHE_MAX_BYTES=10, FILE_CACHE_MAX_ENTRY_BYTES=10)
+    cache.put("k1", _result("aaaa"), "k1")
+    cache.put("k2", _result("bbbb"), "k2")
+    cache.get("k1")  # k1 pasa a ser el más reciente
+    cache.put("k3", _result("cccc"), "k3")
+    assert cache.keys() == ["k1", "k3"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entrada_grande_no_se_cachea_y_descarta_la_anterior(monkeypatch):
+    cache = _cache(monkeypatch, FILE_CACHE_MAX_ENTRY_BYTES=4)
+    cache.put("k", _result("abc"), "k")
+    cache.put("k", _result("abcdef"), "k")
+    assert "k" not in cache
+    assert cache.stats()["bytes"] == 0
+
+
+def test_ventana_sin_revalidacion(monkeypatch):
+    cache = _cache(monkeypatch, FILE_CACHE_REVALIDATE_S="0.05")
+    cache.put("k", _result("abc"), "k", etag="e1")
+    entry = cache.get("k")
+    assert cache.fresh(entry)
+    time.sleep(0.06)
+    assert not cache.fresh(entry)
+    cache.hit(entry, revalidated=True)
+    assert cache.fresh(entry)
+    assert cache.stats()["revalidated"] == 1
+
+
+def test_deshabilitada(monkeypatch):
+    cache = _cache(monkeypatch, FILE_CACHE_ENABLED="off")
+    cache.put("k", _result("abc"), "k")
+    assert cache.get("k") is None and len(cache) == 0
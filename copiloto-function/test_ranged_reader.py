@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Tests de services/ranged_reader: bordes de rangos por línea y por byte.
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from services.ranged_reader import RangedReader
+
+
+def _reader(max_bytes: int) -> RangedReader:
+    reader = RangedReader()
+    reader.max_bytes = max_bytes
+    return reader
+
+
+def test_rango_de_lineas_completo(tmp_path):
+    ruta = tmp_path / "a.txt"
+    ruta.write_bytes(b"uno\ndos\ntres\n")
+    parte = _reader(1024).read_local(ruta, linea_inicio=2, linea_fin=3)
+    assert parte["contenido"] == "dos\ntres\n"
+    assert parte["total_lineas"] == 3
+    assert parte["truncado"] is False
+    assert "siguiente" not in parte
+
+
+def test_rango_de_lineas_recortado_a_lineas_completas(tmp_path):
+    ruta = tmp_path / "a.txt"
+    ruta.write_bytes(b"aaaa\nbbbb\ncccc\ndddd\n")
+    parte = _reader(12).read_local(ruta, linea_inicio=1, linea_fin=4)
+    assert parte["contenido"] == "aaaa\nbbbb\n"
+    assert parte["truncado"] is True
+    assert parte["siguiente"]["linea_inicio"] == 3
+
+
+def test_linea_mas_larga_que_el_maximo_se_corta_por_bytes(tmp_path):
+    ruta = tmp_path / "a.txt"
+    linea = b"x" * 50 + b"\n"
+    ruta.write_bytes(linea + b"corta\n")
+    parte = _reader(20).read_local(ruta, linea_inicio=1, linea_fin=2)
+    assert parte["rango"]["bytes"] == 20
+    assert parte["rango"]["linea_parcial"] is True
+    assert parte["truncado"] is True
+    assert parte["siguiente"] == {"byte_inicio": 20, "byte_fin": 39}
+
+
+def test_lineas_fuera_del_archivo(tmp_path):
+    ruta = tmp_path / "a.txt"
+    ruta.write_bytes(b"uno\n")
+    parte = _reader(1024).read_local(ruta, linea_inicio=5, linea_fin=9)
+    assert parte["contenido"] == ""
+    assert parte["truncado"] is False
+
+
+def test_rango_de_bytes_abierto_recortado(tmp_path):
+    ruta = tmp_path / "a.bin"
+    ruta.write_bytes(b"0123456789" * 5)
+    parte = _reader(16).read_local(ruta, byte_inicio=0)
+    assert parte["contenido"] == "0123456789012345"
+    assert parte["truncado"] is True
+    assert parte["siguiente"]["byte_inicio"] == 16
+
+
+def test_rango_de_bytes_cerrado_sin_recorte(tmp_path):
+    ruta = tmp_path / "a.bin"
+    ruta.write_bytes(b"0123456789")
+    parte = _reader(16).read_local(ruta, byte_inicio=2, byte_fin=5)
+    assert parte["contenido"] == "2345"
+    assert parte["truncado"] is False
+
+
+def test_byte_inicio_despues_del_final(tmp_path):
+    ruta = tmp_path / "a.bin"
+    ruta.write_bytes(b"0123456789")
+    parte = _reader(16).read_local(ruta, byte_inicio=100)
+    assert parte["contenido"] == ""
+    assert parte["truncado"] is False
+    assert parte["tamaño_total"] == 10
+
+
+def test_blob_416_equivale_a_rango_vacio():
+    exceptions = pytest.importorskip("azure.core.exceptions")
+
+    class _Blob:
+        container_name, blob_name = "c", "b.txt"
+
+        def download_blob(self, **_):
+            error = exceptions.HttpResponseError(message="InvalidRange")
+            error.status_code = 416
+            raise error
+
+        def get_blob_properties(self):
+            return SimpleNamespace(size=10, etag="e1")
+
+    parte = _reader(16).read_blob(_Blob(), byte_inicio=100)
+    assert parte["contenido"] == ""
+    assert parte["tamaño_total"] == 10
+    assert parte["etag"] == "e1"
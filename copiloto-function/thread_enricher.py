@@ -12,6 +12,7 @@ from typing import Any, Dict, List, Optional, Tuple, cast
 
 from blob_service import BlobService
 from services.redis_buffer_service import redis_buffer
+from services.perf_tracer import traced
 
 # Constantes globales de control de tamaño
 MAX_MENSAJE_CHARS = 600
@@ -19,6 +20,7 @@ MAX_MENSAJES_THREAD = 20
 MAX_RESUMEN_CHARS = 6000
 
 
+@traced("thread.enriquecer")
 def enriquecer_thread_data(thread_data: Dict[str, Any],
                            mensajes: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
     """
@@ -134,6 +136,7 @@ def _formatear_mensajes(mensajes: List[Dict[str, Any]]) -> List[str]:
     return result
 
 
+@traced("thread.historial_contexto")
 def _obtener_historial_contexto(session_id: Optional[str]) -> Optional[Dict[str, Any]]:
     if not session_id:
         return None
@@ -164,6 +167,7 @@ def _obtener_historial_contexto(session_id: Optional[str]) -> Optional[Dict[str,
         return None
 
 
+@traced("thread.ai_search_context")
 def _obtener_ai_search_context(thread_id: Optional[str], response_data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
     """Consulta Azure AI Search para encontrar registros relacionados con el thread."""
     try:
@@ -215,6 +219,7 @@ def _obtener_ai_search_context(thread_id: Optional[str], response_data: Optional
         return None
 
 
+@traced("thread.narrativa")
 def generar_narrativa_contextual(
     session_id: Optional[str],
     thread_id: Optional[str] = None,
@@ -310,6 +315,7 @@ def _recuperar_mensajes_thread(thread_id: Optional[str]) -> List[Dict[str, Any]]
         return []
 
 
+@traced("thread.cargar_blob")
 def _cargar_thread_desde_blob(
     thread_id: Optional[str],
     session_id: Optional[str],
@@ -335,7 +341,14 @@ def _cargar_thread_desde_blob(
     if candidato_directo:
         return candidato_directo
 
-    # 2) Listar blobs recientes
+    # 2) Índice construido: una consulta y a lo sumo una descarga
+    index = _get_thread_index()
+    if index is not None and index.is_built():
+        entrada = index.latest_for_session(session_id) or index.latest()
+        data = _leer_thread_blob(entrada["blob"]) if entrada else None
+        return (data, entrada["blob"]) if data and entrada else (None, None)
+
+    # 3) Índice aún no disponible: listar blobs recientes
     try:
         blob_service = BlobService.from_env()
         blobs = blob_service.listar_blobs(
@@ -365,7 +378,37 @@ def _cargar_thread_desde_blob(
     return preferidos[0] if preferidos else (None, None)
 
 
+def _get_thread_index():
+    """Índice de threads (arranca su reconstrucción en segundo plano la primera vez)."""
+    try:
+        from services.thread_index import get_thread_index
+        from services.thread_store import get_thread_store
+
+        index = get_thread_index()
+        index.ensure_built(get_thread_store(max_mensajes=MAX_MENSAJES_THREAD))
+        return index
+    except Exception as exc:
+        logging.debug(f"Índice de threads no disponible: {exc}")
+        return None
+
+
 def _leer_primer_thread(candidatos: List[Optional[str]], session_id: Optional[str]) -> Optional[Tuple[Dict[str, Any], str]]:
+    index = _get_thread_index()
+    if index is not None:
+        from services.thread_store import ThreadStore
+
+        entradas = [e for e in (index.get(ThreadStore.thread_id_from_name(n))
+                                for n in candidatos if n) if e]
+        if entradas:
+            # Coincidencia exacta de sesión primero; se descarga un único blob
+            entrada = next((e for e in entradas if session_id and e.get("session_id") == session_id),
+                           entradas[0])
+            data = _leer_thread_blob(entrada["blob"])
+            if data:
+                return data, entrada["blob"]
+        elif index.is_built():
+            return None  # el índice completo no conoce ningún candidato
+
     primer_valido: Optional[Tuple[Dict[str, Any], str]] = None
     for nombre in candidatos:
         if not nombre:
@@ -393,9 +436,21 @@ def _normalizar_nombre_blob(raw: Optional[str]) -> Optional[str]:
     return nombre
 
 
+@traced("thread.leer_blob")
 def _leer_thread_blob(blob_name: Optional[str]) -> Optional[Dict[str, Any]]:
     if not blob_name:
         return None
+    if blob_name.startswith("threads/"):
+        # Log append-only: solo se descarga la cola (cae al .json heredado)
+        try:
+            from services.thread_store import ThreadStore, get_thread_store
+            data = get_thread_store(max_mensajes=MAX_MENSAJES_THREAD).read_tail(
+                ThreadStore.thread_id_from_name(blob_name))
+            if data:
+                data.setdefault("id", data.get("thread_id"))
+                return data
+        except Exception as exc:
+            logging.debug(f"No se pudo leer thread {blob_name} desde el log: {exc}")
     try:
         blob_service = BlobService.from_env()
         contenido = blob_service.leer_blob(blob_name)
@@ -62,39 +62,28 @@ def sync_thread_to_memory(req, response_data: dict) -> dict:
 def get_thread_messages(thread_id: str) -> list:
     """Obtiene mensajes del thread desde Foundry usando REST API directa"""
     try:
-        import requests
-        from azure.identity import ClientSecretCredential
         import os
+        from services.azure_clients import azure_clients
 
         endpoint = os.getenv("AZURE_AI_ENDPOINT")
         if not endpoint:
             logging.warning("AZURE_AI_ENDPOINT no configurado")
             return []
 
-        client_id = os.getenv("AZURE_CLIENT_ID")
-        client_secret = os.getenv("AZURE_CLIENT_SECRET")
-        tenant_id = os.getenv("AZURE_TENANT_ID")
-        
-        if not (client_id and client_secret and tenant_id):
+        # Token cacheado (renovación en segundo plano) del service principal
+        token = azure_clients.bearer_token(service_principal=True)
+        if not token:
             logging.warning("⚠️ Credenciales no configuradas")
             return []
-
-        # Obtener token
-        credential = ClientSecretCredential(
-            tenant_id=tenant_id,
-            client_id=client_id,
-            client_secret=client_secret
-        )
-        token = credential.get_token("https://cognitiveservices.azure.com/.default")
         
         # Llamar REST API directamente
         url = f"{endpoint}/threads/{thread_id}/messages"
         headers = {
-            "Authorization": f"Bearer {token.token}",
+            "Authorization": f"Bearer {token}",
             "Content-Type": "application/json"
         }
         
-        response = requests.get(url, headers=headers, timeout=10)
+        response = azure_clients.http_session().get(url, headers=headers, timeout=10)
         
         if response.status_code != 200:
             logging.error(f"❌ API REST falló: {response.status_code} - {response.text}")
@@ -25,20 +25,11 @@ PROJECT_ROOT = Path("/home/site/wwwroot" if IS_AZURE else os.getcwd())
 CONTAINER_NAME = os.environ.get("AZURE_STORAGE_CONTAINER_NAME", "boat-rental-project")
 
 def get_blob_client():
-    """Obtiene cliente de Blob Storage"""
+    """Obtiene el cliente de Blob Storage compartido del proceso"""
     try:
-        from azure.storage.blob import BlobServiceClient
-        from azure.identity import DefaultAzureCredential
-        
-        connection_string = os.environ.get("AzureWebJobsStorage")
-        if connection_string:
-            return BlobServiceClient.from_connection_string(connection_string)
-        
-        account_url = os.environ.get("AZURE_STORAGE_ACCOUNT_URL")
-        if account_url:
-            return BlobServiceClient(account_url, credential=DefaultAzureCredential())
-        
-        return None
+        from services.azure_clients import azure_clients
+
+        return azure_clients.blob_service_client()
     except Exception:
         return None
 